@@ -33,7 +33,7 @@ PY_EXTENSIONS = {".py", ".sh"}
 FQ_SOURCE_ROOT = "family-quest/src"
 FQ_EXTENSIONS = {".ts", ".tsx", ".js", ".jsx"}
 
-EXCLUDE_PARTS = {"tests", "__pycache__", "node_modules", "migrations"}
+EXCLUDE_PARTS = {"tests", "benchmarks", "__pycache__", "node_modules", "migrations"}
 EXCLUDE_SUFFIXES = {".d.ts"}
 
 
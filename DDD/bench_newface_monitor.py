@@ -0,0 +1,87 @@
+# DDD/bench_newface_monitor.py
+"""
+newface_monitor.py の巡回1回分の所要時間と転送量を、ローカルの偽サイトで比較するベンチマーク。
+
+- 従来: 全サイトを1件ずつ順番に、毎回ランダム待機 → 無条件GET → 解析 (fetch_current_casts)
+- 現在 (初回): ホストごとに並行取得 (待機はホスト単位)、全サイトを解析
+- 現在 (2回目以降): ETag / Last-Modified の条件付きGETで304を受け、解析を省略
+
+偽サイトは test_newface_monitor_fetch.SiteFixtureServer を使う (1ホスト = 1ポート)。
+実際のサイト・Discord には一切アクセスしない。
+
+使い方:
+    python DDD/bench_newface_monitor.py [--hosts 8] [--sites-per-host 2] [--delay 0.3] [--casts 60]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+from test_newface_monitor_fetch import SiteFixtureServer, make_site, render_page  # noqa: E402
+
+
+def _legacy_run(sites) -> None:
+    monitor = module.WebMonitor()
+    try:
+        for site in sites:
+            monitor.fetch_current_casts(site)
+    finally:
+        monitor.close()
+
+
+def _current_run(sites) -> None:
+    with patch.object(module.MonitorConfig, "SITES", sites):
+        module._run_monitor_locked()
+
+
+def _measure(label: str, servers, fn, sites) -> None:
+    before = sum(s.bytes_sent for s in servers)
+    started = time.perf_counter()
+    fn(sites)
+    elapsed = time.perf_counter() - started
+    fetched = sum(s.bytes_sent for s in servers) - before
+    print(f"{label:<22} {elapsed:8.2f}s  {fetched / 1024:10.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=8, help="偽サイトのホスト数")
+    parser.add_argument("--sites-per-host", type=int, default=2, help="1ホストあたりの監視サイト数")
+    parser.add_argument("--delay", type=float, default=0.3, help="リクエスト前のランダム待機の上限(秒)")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽サイトの応答遅延(秒)")
+    parser.add_argument("--casts", type=int, default=60, help="1ページあたりのキャスト数")
+    parser.add_argument("--padding", type=int, default=40000, help="1ページに足す余分なバイト数")
+    args = parser.parse_args()
+
+    servers = [SiteFixtureServer(latency=args.latency) for _ in range(args.hosts)]
+    sites = []
+    for h, server in enumerate(servers):
+        for i in range(args.sites_per_host):
+            name = f"h{h}s{i}"
+            server.set_page(f"/{name}/", render_page(range(args.casts), padding=args.padding))
+            sites.append(make_site(server, name))
+
+    module.MonitorConfig.POLITE_DELAY_RANGE = (args.delay / 2, args.delay)
+    module.DiscordNotifier.notify = lambda self, casts, site_name="", site_id="": None
+    module._maybe_send_daily_summary = lambda notifier: None
+    print(f"{len(sites)} sites / {args.hosts} hosts / delay <= {args.delay}s / parser: {module.MonitorConfig.HTML_PARSER}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        module.MonitorConfig.get_data_dir = classmethod(lambda cls: Path(tmp))
+        try:
+            _measure("従来 (直列・無条件GET)", servers, _legacy_run, sites)
+            _measure("現在 (初回)", servers, _current_run, sites)
+            _measure("現在 (2回目・304)", servers, _current_run, sites)
+        finally:
+            for server in servers:
+                server.close()
+
+
+if __name__ == "__main__":
+    main()
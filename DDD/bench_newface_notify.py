@@ -0,0 +1,93 @@
+# DDD/bench_newface_notify.py
+"""
+newface_monitor.py の Discord 通知の所要時間と POST 回数を、ローカルの偽Webhookで比較するベンチマーク。
+
+- 従来: 新規キャスト1名ごとに1回 POST し、毎回 --legacy-sleep 秒待つ (429 は urllib3 の Retry 任せ)
+- 現在: サイトごとに埋め込み10件・6000文字以内へまとめて POST し、
+  X-RateLimit-Remaining が尽きたときだけ X-RateLimit-Reset-After まで待つ
+
+偽Webhookは test_newface_monitor_notify.FakeWebhookServer を使う (--limit 回 / --window 秒を超えると 429)。
+実際の Discord には一切アクセスしない。
+
+使い方:
+    python DDD/bench_newface_notify.py [--sites 3] [--casts 30] [--limit 5] [--window 2.0]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+from test_newface_monitor_notify import FakeWebhookServer, cast  # noqa: E402
+
+
+def _legacy_run(server, batches, legacy_sleep: float) -> None:
+    notifier = module.DiscordNotifier(server.url)
+    try:
+        for site_name, casts in batches:
+            for c in casts:
+                payload = module.DiscordNotifier.build_payloads([c], site_name)[0]
+                time.sleep(legacy_sleep)
+                response = notifier.session.post(server.url, json=payload, timeout=10)
+                if response.status_code == 429:
+                    # urllib3 の Retry と同じく Retry-After だけ待って再送する
+                    time.sleep(float(response.headers.get("Retry-After", 1)))
+                    notifier.session.post(server.url, json=payload, timeout=10)
+    finally:
+        notifier.close()
+
+
+def _current_run(server, batches, legacy_sleep: float) -> None:
+    notifier = module.DiscordNotifier(server.url)
+    try:
+        for site_name, casts in batches:
+            notifier.notify(casts, site_name=site_name, site_id=site_name)
+    finally:
+        notifier.close()
+
+
+def _measure(label: str, fn, server, batches, legacy_sleep: float) -> None:
+    requests_before, limited_before = server.requests, server.rate_limited
+    server.messages.clear()
+    started = time.perf_counter()
+    fn(server, batches, legacy_sleep)
+    elapsed = time.perf_counter() - started
+    delivered = sum(len(m["embeds"]) for m in server.messages)
+    print(
+        f"{label:<26} {elapsed:8.2f}s  POST {server.requests - requests_before:4d}回"
+        f"  429 {server.rate_limited - limited_before:3d}回  配信 {delivered}名"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=3, help="新人が出たサイト数")
+    parser.add_argument("--casts", type=int, default=30, help="1サイトあたりの新規キャスト数")
+    parser.add_argument("--limit", type=int, default=5, help="偽Webhookが window 秒あたりに受け付ける回数")
+    parser.add_argument("--window", type=float, default=2.0, help="偽Webhookのレート制限の窓(秒)")
+    parser.add_argument("--legacy-sleep", type=float, default=1.0, help="従来方式の POST 前の固定待機(秒)")
+    args = parser.parse_args()
+
+    batches = [
+        (f"site{s}", [cast(s * 1000 + i) for i in range(args.casts)]) for s in range(args.sites)
+    ]
+    print(f"{args.sites} sites x {args.casts} casts / rate limit {args.limit} per {args.window}s")
+
+    server = FakeWebhookServer(limit=args.limit, window=args.window)
+    with tempfile.TemporaryDirectory() as tmp:
+        module.MonitorConfig.get_data_dir = classmethod(lambda cls: Path(tmp))
+        try:
+            _measure("従来 (1名1通・固定待機)", _legacy_run, server, batches, args.legacy_sleep)
+            # 従来方式で使い切った枠が戻るのを待ってから測る
+            time.sleep(args.window)
+            _measure("現在 (まとめ送信・ヘッダー追従)", _current_run, server, batches, args.legacy_sleep)
+        finally:
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
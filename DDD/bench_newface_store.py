@@ -0,0 +1,116 @@
+# DDD/bench_newface_store.py
+"""
+newface_monitor.py の既知キャスト保存 (DataManager) の、差分検知1回分の時間と書き込み量を比較するベンチマーク。
+
+- 従来: known_casts_*.json を全件読み込み → Python の set 差分 → 全件を書き直し (tmp + replace)
+- 現在: SQLite ストアへ DataManager.update_casts (一時テーブル + SQL 差分 + 変化した行だけ upsert)。
+  互換用JSONの書き出し (MonitorConfig.EXPORT_JSON) あり/なしの両方を計測する
+
+--sites × --casts 件の既知キャストを用意し、「変化なし」と「各サイトで --churn 人入れ替わり」の
+2パターンで1回分 (全サイト) を計測する。書き込み量は /proc/self/io の wchar (write() したバイト数) の差分。
+一時ディレクトリで計測し、実際のデータには触れない。
+
+使い方:
+    python DDD/bench_newface_store.py [--sites 50] [--casts 500] [--churn 5]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+
+
+def _written_bytes() -> int:
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _site(n: int) -> module.SiteConfig:
+    return module.SiteConfig(
+        site_id=f"site{n:02d}", name=f"サイト{n}", target_url=f"https://site{n}.example.com/newface/",
+        selector_container="li", selector_name="a", selector_link="a", selector_image="img",
+    )
+
+
+def _listing(site_no: int, start: int, count: int):
+    return {
+        module.CastMember(
+            id=str(i), name=f"キャスト{site_no}-{i}", detail_url=f"https://site{site_no}.example.com/profile.php?id={i}",
+            image_url=f"https://site{site_no}.example.com/img/{i}.jpg", age=str(20 + i % 15),
+        )
+        for i in range(start, start + count)
+    }
+
+
+def _legacy_update(data_file: Path, current) -> int:
+    """従来の DataManager.load_known_casts / save_known_casts と同じ処理。新規件数を返す"""
+    known = set()
+    if data_file.exists():
+        with open(data_file, "r", encoding="utf-8") as f:
+            known = {module.CastMember(**item) for item in json.load(f)}
+    new_casts = current - known
+    casts = known.union(current) if new_casts else current
+    tmp_path = data_file.with_suffix(data_file.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([c.to_dict() for c in casts], f, ensure_ascii=False, indent=2)
+    tmp_path.replace(data_file)
+    return len(new_casts)
+
+
+def _measure(label: str, fn) -> None:
+    before = _written_bytes()
+    started = time.perf_counter()
+    found = fn()
+    elapsed = time.perf_counter() - started
+    written = _written_bytes() - before
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {written / 1024:10.1f} KiB written  (new: {found})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=50, help="サイト数")
+    parser.add_argument("--casts", type=int, default=500, help="1サイトあたりの掲載キャスト数")
+    parser.add_argument("--churn", type=int, default=5, help="入れ替わりパターンで1サイトあたり増減する人数")
+    args = parser.parse_args()
+
+    sites = [_site(n) for n in range(args.sites)]
+    base = [_listing(n, 0, args.casts) for n in range(args.sites)]
+    churned = [_listing(n, args.churn, args.casts) for n in range(args.sites)]
+    print(f"{args.sites} sites x {args.casts} casts, churn {args.churn}/site")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_dir = Path(tmp) / "legacy"
+        legacy_dir.mkdir()
+        files = [legacy_dir / site.get_data_filename() for site in sites]
+        for data_file, current in zip(files, base):
+            _legacy_update(data_file, current)
+        _measure("従来 JSON (変化なし)", lambda: sum(_legacy_update(f, c) for f, c in zip(files, base)))
+        _measure("従来 JSON (入れ替わり)", lambda: sum(_legacy_update(f, c) for f, c in zip(files, churned)))
+
+        def store_run(listings):
+            return sum(len(module.DataManager.update_casts(s, c).new) for s, c in zip(sites, listings))
+
+        for export in (True, False):
+            store_dir = Path(tmp) / f"store_{int(export)}"
+            store_dir.mkdir()
+            module.MonitorConfig.get_data_dir = classmethod(lambda cls, d=store_dir: d)
+            module.MonitorConfig.EXPORT_JSON = export
+            suffix = "JSONあり" if export else "JSONなし"
+            store_run(base)
+            _measure(f"SQLite {suffix} (変化なし)", lambda: store_run(base))
+            _measure(f"SQLite {suffix} (入れ替わり)", lambda: store_run(churned))
+
+if __name__ == "__main__":
+    main()
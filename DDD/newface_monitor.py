@@ -20,10 +20,14 @@ import sys
 import logging
 import hashlib
 import fcntl
-from dataclasses import dataclass, asdict
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from pathlib import Path
-from typing import List, Set, Dict, Optional
+from typing import Callable, Iterable, List, Set, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse, parse_qs
 
 # プロジェクトルート（DDDの親ディレクトリ）をパスに追加
@@ -37,6 +41,13 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup, NavigableString
 
+# lxml があれば BeautifulSoup のパーサーに使う (html.parser より高速。セレクタは共通)
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
 # MY_HOME_SYSTEM Core Imports
 try:
     # システム統合環境下でのインポート
@@ -189,6 +200,14 @@ class SiteConfig:
         """
         return self.data_filename or f"known_casts_{self.site_id}.json"
 
+    def get_http_cache_filename(self) -> str:
+        """HTTPの再検証用情報(ETag/Last-Modified/本文ハッシュ)の保存先ファイル名を返す。
+
+        Returns:
+            str: site_id から導出したファイル名（既知キャストのファイルと同じディレクトリに置く）。
+        """
+        return f"http_cache_{self.site_id}.json"
+
 
 class MonitorConfig:
     """モニタリング設定および定数管理クラス。"""
@@ -1175,6 +1194,11 @@ class MonitorConfig:
     BASE_DIR: Path = Path(__file__).resolve().parent
     NAS_DIR_STR: str = '/mnt/nas/home_system/newface_monitor/data'  # 本環境のNASパスに適宜変更してください
     LOCAL_DIR_STR: str = str(BASE_DIR / 'data')
+    # 既知キャスト・日次サマリを保存する SQLite (データディレクトリ内)
+    DB_FILENAME: str = 'newface_monitor.db'
+    # 既知キャストに変化があったとき、従来形式の known_casts_*.json にも書き出すか
+    # (旧バージョン・外部ツール互換用。不要なら NEWFACE_EXPORT_JSON=0 で書き込み量を減らせる)
+    EXPORT_JSON: bool = os.getenv('NEWFACE_EXPORT_JSON', '1') != '0'
     MOUNT_POINT: str = '/mnt/nas'
     
     # Network Settings
@@ -1186,9 +1210,24 @@ class MonitorConfig:
     TIMEOUT: int = 30  # seconds
     RETRY_TOTAL: int = 3
     RETRY_BACKOFF: float = 1.0
+    # Bot検知回避のため、同じホストへのリクエスト前に入れるランダム待機(秒)の範囲。
+    # 待機はホスト単位で、別ホストのサイトは並行して取得する。
+    POLITE_DELAY_RANGE: Tuple[float, float] = (1.0, 3.0)
+    # 並行して巡回するホスト数の上限
+    MAX_FETCH_WORKERS: int = 4
+    # BeautifulSoup のパーサー（lxml が無い環境では html.parser）
+    HTML_PARSER: str = _HTML_PARSER
 
     # Notification Settings
     DISCORD_WEBHOOK_URL: Optional[str] = os.getenv('DISCORD_WEBHOOK_URL')
+    # 1メッセージに詰める埋め込みの件数・文字数の上限（Discordの制限値）
+    DISCORD_MAX_EMBEDS: int = 10
+    DISCORD_EMBED_CHAR_BUDGET: int = 6000
+    # 429 の待ち時間がこれを超える、または再送がこの回数を超える場合は、次回の実行で再送する
+    DISCORD_MAX_WAIT_SEC: float = 60.0
+    DISCORD_MAX_429_RETRIES: int = 3
+    # 未送信メッセージを再送する最大回数（1時間毎の実行で約1日分。超えたら破棄してログに残す）
+    DISCORD_PENDING_MAX_ATTEMPTS: int = 24
 
     @classmethod
     def get_data_dir(cls) -> Path:
@@ -1218,6 +1257,27 @@ class MonitorConfig:
         """
         return cls.get_data_dir() / site.get_data_filename()
 
+    @classmethod
+    def get_db_file(cls) -> Path:
+        """既知キャスト・日次サマリを保存する SQLite ファイルのパスを取得する。
+
+        Returns:
+            Path: データディレクトリ内の DB_FILENAME。
+        """
+        return cls.get_data_dir() / cls.DB_FILENAME
+
+    @classmethod
+    def get_http_cache_file(cls, site: SiteConfig) -> Path:
+        """指定サイトのHTTP再検証用情報の保存先JSONファイルのパスを取得する。
+
+        Args:
+            site (SiteConfig): 対象サイトの設定。
+
+        Returns:
+            Path: 既知キャストデータと同じディレクトリ内のファイルパス。
+        """
+        return cls.get_data_dir() / site.get_http_cache_filename()
+
 
 # ==========================================
 # Data Models
@@ -1258,42 +1318,74 @@ class CastMember:
         return asdict(self)
 
 
+@dataclass
+class FetchResult:
+    """1サイト分のページ取得結果。
+
+    Attributes:
+        site (SiteConfig): 対象サイトの設定。
+        status (str): 'fetched'（本文が前回から変わった）/ 'not_modified'（304応答）/
+            'unchanged'（200応答だが本文のハッシュが前回と同じ）/ 'error'（通信エラー）。
+        body (bytes): 'fetched' のときのページ本文。
+        validators (Dict[str, str]): 次回の条件付きGETに使う情報
+            （url / etag / last_modified / content_hash）。
+    """
+    site: SiteConfig
+    status: str
+    body: bytes = b""
+    validators: Dict[str, str] = field(default_factory=dict)
+
+
 # ==========================================
 # Services
 # ==========================================
 
 class DiscordNotifier:
-    """Discordへの通知を担当するサービスクラス。"""
+    """Discordへの通知を担当するサービスクラス。
+
+    新規キャストはサイトごとに、1メッセージあたり最大 DISCORD_MAX_EMBEDS 件・埋め込みの合計文字数
+    DISCORD_EMBED_CHAR_BUDGET 以内にまとめて送る。送信間隔は固定の待機ではなく、応答の
+    X-RateLimit-Remaining / X-RateLimit-Reset-After に合わせて、残り回数が尽きたときだけ待つ。
+    429 は Retry-After だけ待って再送し、送れなかったメッセージは DataManager に保存して
+    次回の実行の最初 (resend_pending) に再送する。巡回で見つけた新規キャストは、
+    DataManager.update_casts が既知キャストの更新と同じトランザクションで未送信メッセージとして保存し、
+    resend_pending(その id) で送る（保存後・送信前に落ちても、次回の実行で再送される）。
+    """
 
-    def __init__(self, webhook_url: Optional[str]):
+    def __init__(self, webhook_url: Optional[str], sleep: Callable[[float], None] = time.sleep):
         """
         Args:
             webhook_url (Optional[str]): DiscordのWebhook URL。
+            sleep (Callable[[float], None]): 待機に使う関数（テスト用に差し替え可能）。
         """
         self.webhook_url = webhook_url
         self.session = self._create_rate_limited_session()
+        self._sleep = sleep
+        # 直近の応答から読み取ったレート制限の状態
+        self._remaining: Optional[int] = None
+        self._reset_at: float = 0.0
+        # Webhook が無効 (401/404)・送信できない状態になったら、この実行中は送信を試みず保存だけ行う
+        self._halted = False
 
     def _create_rate_limited_session(self) -> requests.Session:
-        """Discordのレート制限(429)に自動追従するHTTPセッションを作成する。
+        """5xx時に自動リトライするHTTPセッションを作成する。
 
-        Discord WebhookはバーストしたPOSTに対して429を返すことがあり、
-        毎回1秒待つだけの固定sleepでは足りずに大量のリクエストが失敗して
-        通知が失われる問題があった(新人一括検知時など)。urllib3のRetryは
-        429応答に付与される'Retry-After'ヘッダーを尊重して自動的に
-        バックオフ・リトライするため、これに委譲する。
+        429 はレート制限ヘッダーを読んで待機時間を決めるため、ここではリトライせず
+        _post で扱う（urllib3のRetryに任せると待ち時間の上限や未送信分の保存ができない）。
 
         Returns:
-            requests.Session: 429/5xx時に自動リトライするセッション。
+            requests.Session: 5xx時に自動リトライするセッション。
         """
         session = requests.Session()
         retries = Retry(
             total=MonitorConfig.RETRY_TOTAL,
             backoff_factor=MonitorConfig.RETRY_BACKOFF,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[500, 502, 503, 504],
             allowed_methods=["POST"],
-            respect_retry_after_header=True,
+            raise_on_status=False,
         )
         adapter = HTTPAdapter(max_retries=retries)
+        session.mount('http://', adapter)
         session.mount('https://', adapter)
         return session
 
@@ -1302,63 +1394,79 @@ class DiscordNotifier:
         if self.session:
             self.session.close()
 
-    def notify(self, new_casts: List[CastMember], site_name: str = "") -> None:
+    def is_configured(self) -> bool:
+        return bool(self.webhook_url) and 'YOUR_DISCORD' not in self.webhook_url
+
+    @staticmethod
+    def _build_embed(cast: CastMember, site_prefix: str) -> Dict:
+        fields = [{"name": "Name", "value": cast.name, "inline": True}]
+        if cast.age:
+            # 一覧ページ上に年齢表記が見つかったキャストのみ追加
+            # (見つからない場合はフィールド自体を省略する)
+            fields.append({"name": "Age", "value": f"{cast.age}歳", "inline": True})
+        fields.append({"name": "Link", "value": f"[詳細ページへ]({cast.detail_url})", "inline": True})
+        return {
+            # Discordの埋め込みタイトルは256文字制限
+            "title": f"✨ 新人キャスト情報{site_prefix}: {cast.name}"[:256],
+            "description": "新しいキャストが追加されました！",
+            "url": cast.detail_url,
+            "color": 16738740,  # Pinkish
+            "fields": fields,
+            "thumbnail": {"url": cast.image_url} if cast.image_url else {}
+        }
+
+    @staticmethod
+    def _embed_size(embed: Dict) -> int:
+        """Discord が埋め込みの文字数制限で数える部分（タイトル・説明・フィールド・フッター・作者名）の文字数。"""
+        size = len(embed.get("title", "")) + len(embed.get("description", ""))
+        size += sum(len(f.get("name", "")) + len(f.get("value", "")) for f in embed.get("fields", []))
+        size += len(embed.get("footer", {}).get("text", "")) + len(embed.get("author", {}).get("name", ""))
+        return size
+
+    @classmethod
+    def build_payloads(cls, new_casts: List[CastMember], site_name: str = "") -> List[Dict]:
+        """1サイト分の新規キャストを、Discordの制限内に収まるメッセージ群に詰める。
+
+        Args:
+            new_casts (List[CastMember]): 通知対象の新規キャストリスト。
+            site_name (str): 通知元サイトの表示名（埋め込みタイトルに付与する）。
+
+        Returns:
+            List[Dict]: Webhook に POST するペイロードのリスト。
+        """
+        site_prefix = f"【{site_name}】" if site_name else ""
+        payloads: List[Dict] = []
+        embeds: List[Dict] = []
+        size = 0
+        for cast in new_casts:
+            embed = cls._build_embed(cast, site_prefix)
+            embed_size = cls._embed_size(embed)
+            if embeds and (
+                len(embeds) >= MonitorConfig.DISCORD_MAX_EMBEDS
+                or size + embed_size > MonitorConfig.DISCORD_EMBED_CHAR_BUDGET
+            ):
+                payloads.append({"username": "New Face Monitor", "embeds": embeds})
+                embeds, size = [], 0
+            embeds.append(embed)
+            size += embed_size
+        if embeds:
+            payloads.append({"username": "New Face Monitor", "embeds": embeds})
+        return payloads
+
+    def notify(self, new_casts: List[CastMember], site_name: str = "", site_id: str = "") -> None:
         """新規キャスト情報をDiscordに通知する。
 
         Args:
             new_casts (List[CastMember]): 通知対象の新規キャストリスト。
             site_name (str): 通知元サイトの表示名。複数サイト運用時に
                 どのサイトの新着かを区別できるよう埋め込みタイトルに付与する。
+            site_id (str): 通知元サイトのID（未送信分を保存する際の識別に使う）。
         """
-        if not self.webhook_url or 'YOUR_DISCORD' in self.webhook_url:
+        if not self.is_configured():
             logger.warning("Discord Webhook URL is not configured. Skipping notification.")
             return
 
-        site_prefix = f"【{site_name}】" if site_name else ""
-
-        for cast in new_casts:
-            fields = [{"name": "Name", "value": cast.name, "inline": True}]
-            if cast.age:
-                # 一覧ページ上に年齢表記が見つかったキャストのみ追加
-                # (見つからない場合はフィールド自体を省略する)
-                fields.append({"name": "Age", "value": f"{cast.age}歳", "inline": True})
-            fields.append({"name": "Link", "value": f"[詳細ページへ]({cast.detail_url})", "inline": True})
-
-            payload = {
-                "username": "New Face Monitor",
-                "embeds": [
-                    {
-                        "title": f"✨ 新人キャスト情報{site_prefix}: {cast.name}",
-                        "description": "新しいキャストが追加されました！",
-                        "url": cast.detail_url,
-                        "color": 16738740,  # Pinkish
-                        "fields": fields,
-                        "thumbnail": {"url": cast.image_url} if cast.image_url else {}
-                    }
-                ]
-            }
-            try:
-                # レート制限回避のための待機（429時のバックオフはself.sessionのRetryに委譲）
-                time.sleep(1)
-                response = self.session.post(self.webhook_url, json=payload, timeout=10)
-                response.raise_for_status()
-                logger.info(f"Notification sent successfully for: {cast.name}")
-            except requests.HTTPError as e:
-                status = e.response.status_code if e.response is not None else None
-                # レスポンス本文にDiscord側の検証エラー詳細（フィールド長超過等）が
-                # 含まれるため、原因究明用にログへ残す
-                body = e.response.text[:300] if e.response is not None else ""
-                logger.error(f"Failed to send notification for {cast.name}: {e} | body: {body}")
-                if status in (401, 404):
-                    # Webhook自体が無効/失効している可能性が高く、残り件数分リトライしても
-                    # 無駄なだけなので打ち切る（サーキットブレーカー）。
-                    logger.error(
-                        f"Discord Webhook returned {status} — URL is likely invalid or revoked. "
-                        "Aborting remaining notifications for this run."
-                    )
-                    break
-            except requests.RequestException as e:
-                logger.error(f"Failed to send notification for {cast.name}: {e}")
+        self._deliver(self.build_payloads(new_casts, site_name), site_id or site_name)
 
     def notify_daily_summary(self, counts: Dict[str, int], site_names: Dict[str, str], date_str: str) -> None:
         """その日に新規検知したサイト別件数を、テキスト形式でDiscordに通知する。
@@ -1371,7 +1479,7 @@ class DiscordNotifier:
             site_names (Dict[str, str]): site_id -> 表示名 の対応表。
             date_str (str): サマリ対象日（'YYYY-MM-DD'）。
         """
-        if not self.webhook_url or 'YOUR_DISCORD' in self.webhook_url:
+        if not self.is_configured():
             logger.warning("Discord Webhook URL is not configured. Skipping daily summary notification.")
             return
 
@@ -1393,20 +1501,272 @@ class DiscordNotifier:
             content = content[:1900] + "\n...(以下省略)"
 
         payload = {"username": "New Face Monitor", "content": content}
+        self._deliver([payload], "daily_summary")
+
+    def resend_pending(self, pending_ids: Optional[Iterable[int]] = None) -> None:
+        """保存済みの未送信メッセージを、古い順に送る。
+
+        Args:
+            pending_ids (Optional[Iterable[int]]): 送るメッセージの id。省略時はすべて
+                （前回までの実行で送れなかったもの）。
+        """
+        if not self.is_configured():
+            return
+
+        only = None if pending_ids is None else set(pending_ids)
+        for pending_id, site, payload, attempts in DataManager.load_pending_notifications():
+            if only is not None and pending_id not in only:
+                continue
+            if self._halted:
+                break
+            outcome = self._post(payload)
+            if outcome in ('sent', 'drop'):
+                DataManager.delete_pending_notification(pending_id)
+            elif attempts + 1 >= MonitorConfig.DISCORD_PENDING_MAX_ATTEMPTS:
+                logger.error(
+                    f"Giving up pending notification for '{site}' after {attempts + 1} attempts."
+                )
+                DataManager.delete_pending_notification(pending_id)
+            else:
+                DataManager.mark_pending_notification_failed(pending_id)
+
+    def _deliver(self, payloads: List[Dict], site: str) -> None:
+        """メッセージを順に送り、送れなかった残りは次回の実行で再送するよう保存する。"""
+        for index, payload in enumerate(payloads):
+            outcome = 'retry' if self._halted else self._post(payload)
+            if outcome in ('retry', 'abort'):
+                DataManager.save_pending_notifications(site, payloads[index:])
+                logger.warning(
+                    f"Saved {len(payloads) - index} undelivered Discord messages for '{site}' to retry next run."
+                )
+                return
+
+    def _post(self, payload: Dict) -> str:
+        """メッセージを1件送る。
+
+        Returns:
+            str: 'sent'（送信済み）/ 'drop'（内容の問題で送れない。再送しない）/
+                'retry'（一時的に送れない。次回再送）/ 'abort'（Webhook が無効。次回再送）。
+        """
+        for _ in range(MonitorConfig.DISCORD_MAX_429_RETRIES + 1):
+            if not self._wait_for_rate_limit():
+                self._halted = True
+                return 'retry'
+            try:
+                response = self.session.post(self.webhook_url, json=payload, timeout=10)
+            except requests.RequestException as e:
+                logger.error(f"Failed to send Discord notification: {e}")
+                self._halted = True
+                return 'retry'
+            self._update_rate_limit(response)
+
+            status = response.status_code
+            if 200 <= status < 300:
+                logger.info(f"Notification sent successfully ({len(payload.get('embeds', [])) or 1} items).")
+                return 'sent'
+            if status == 429:
+                wait = self._retry_after(response)
+                if wait > MonitorConfig.DISCORD_MAX_WAIT_SEC:
+                    logger.warning(f"Discord rate limited for {wait:.1f}s. Deferring to next run.")
+                    self._halted = True
+                    return 'retry'
+                logger.warning(f"Discord rate limited. Retrying after {wait:.2f}s.")
+                self._sleep(wait)
+                continue
+
+            # レスポンス本文にDiscord側の検証エラー詳細（フィールド長超過等）が
+            # 含まれるため、原因究明用にログへ残す
+            logger.error(f"Failed to send Discord notification: HTTP {status} | body: {response.text[:300]}")
+            if status in (401, 404):
+                # Webhook自体が無効/失効している可能性が高く、この実行中に残りを送っても
+                # 無駄なだけなので打ち切る（サーキットブレーカー）。未送信分は保存して次回再送する。
+                logger.error(
+                    f"Discord Webhook returned {status} — URL is likely invalid or revoked. "
+                    "Aborting remaining notifications for this run."
+                )
+                self._halted = True
+                return 'abort'
+            if status >= 500:
+                self._halted = True
+                return 'retry'
+            return 'drop'
+
+        self._halted = True
+        return 'retry'
+
+    def _wait_for_rate_limit(self) -> bool:
+        """直近の応答で残り回数が尽きていれば、リセットまで待つ。
+
+        Returns:
+            bool: 送信してよければTrue。リセットまで DISCORD_MAX_WAIT_SEC を超えて待つ必要がある場合は
+                待たずにFalseを返す（呼び出し元は残りを保存して次回の実行で再送する）。
+        """
+        if self._remaining is not None and self._remaining <= 0:
+            wait = self._reset_at - time.monotonic()
+            if wait > MonitorConfig.DISCORD_MAX_WAIT_SEC:
+                logger.warning(f"Discord rate limit resets in {wait:.1f}s. Deferring to next run.")
+                return False
+            if wait > 0:
+                self._sleep(wait)
+            self._remaining = None
+        return True
+
+    def _update_rate_limit(self, response: requests.Response) -> None:
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_after = response.headers.get('X-RateLimit-Reset-After')
         try:
-            response = self.session.post(self.webhook_url, json=payload, timeout=10)
-            response.raise_for_status()
-            logger.info(f"Daily summary notification sent successfully for {date_str}.")
-        except requests.RequestException as e:
-            logger.error(f"Failed to send daily summary notification: {e}")
+            if remaining is not None:
+                self._remaining = int(remaining)
+            if reset_after is not None:
+                self._reset_at = time.monotonic() + float(reset_after)
+        except ValueError:
+            self._remaining = None
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """429応答の待ち時間（秒）。本文の retry_after を優先し、無ければ Retry-After ヘッダー。"""
+        try:
+            return float(response.json().get('retry_after'))
+        except (ValueError, TypeError, AttributeError):
+            pass
+        try:
+            return float(response.headers.get('Retry-After', 1))
+        except ValueError:
+            return 1.0
+
+
+@dataclass
+class CastDiff:
+    """SQLiteストアへの反映結果（1サイト・1回分）。
+
+    Attributes:
+        new (List[CastMember]): 初めて掲載されたキャスト（通知対象）。
+        departed (List[CastMember]): 前回まで掲載されていて、今回の一覧から消えたキャスト。
+        pending_ids (List[int]): new の通知として同じトランザクションで保存した未送信メッセージの id。
+    """
+    new: List[CastMember] = field(default_factory=list)
+    departed: List[CastMember] = field(default_factory=list)
+    pending_ids: List[int] = field(default_factory=list)
 
 
 class DataManager:
-    """データの永続化と読み込みを担当するクラス。"""
+    """データの永続化と読み込みを担当するクラス。
+
+    既知キャストと日次サマリは、データディレクトリの SQLite (MonitorConfig.DB_FILENAME) に保存する。
+    以前の known_casts_*.json / daily_summary.json は、サイトごと・初回アクセス時に1度だけ
+    取り込み、以後は内容が変わったときだけ互換用にJSONへ書き出す（MonitorConfig.EXPORT_JSON）。
+
+    casts テーブルには一度でも掲載されたキャストを残し、掲載中かどうかを active で表す。
+    「新人」は一度も掲載されたことのないキャストで、掲載終了後に再掲載されたキャストは通知しない。
+    first_seen は初めて掲載された時刻、last_seen は行を最後に書き換えた時刻
+    （新規・再掲載・内容変更・掲載終了の検知時）。一覧に変化が無い実行では何も書き込まない。
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS casts (
+            site TEXT NOT NULL,
+            cast_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            detail_url TEXT NOT NULL,
+            image_url TEXT NOT NULL,
+            age TEXT NOT NULL DEFAULT '',
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (site, cast_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sites (
+            site TEXT PRIMARY KEY,
+            imported_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS daily_counts (
+            date TEXT NOT NULL,
+            site TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (date, site)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pending_notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+    """
+    _CAST_COLUMNS = "cast_id, name, detail_url, image_url, age"
+    # このプロセスでスキーマを作成・確認済みのDBファイル
+    _schema_ready: Set[str] = set()
+
+    @staticmethod
+    @contextmanager
+    def _connect():
+        """ストアへの接続を開き、ブロックを1トランザクションとして実行する。
+
+        データディレクトリはNAS上のことがあるため、共有メモリを使うWALではなく
+        既定のロールバックジャーナルを使う（多重起動は run_monitor のロックで防いでいる）。
+        行が小さく1回の変化も疎なため、ページサイズを小さくして（新規作成時のみ有効）
+        1行の変化あたりの書き込み量（本体 + ジャーナル）を抑える。
+        スキーマの作成はDBファイルごとにプロセスで1度だけ行う（ファイルが消えていれば作り直す）。
+        """
+        db_file = MonitorConfig.get_db_file()
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        key = str(db_file)
+        needs_schema = key not in DataManager._schema_ready or not db_file.exists()
+        conn = sqlite3.connect(key, timeout=30)
+        try:
+            conn.execute("PRAGMA temp_store = MEMORY")
+            if needs_schema:
+                conn.execute("PRAGMA page_size = 1024")
+                conn.executescript(DataManager._SCHEMA)
+                DataManager._schema_ready.add(key)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_cast(row) -> CastMember:
+        return CastMember(id=row[0], name=row[1], detail_url=row[2], image_url=row[3], age=row[4])
+
+    @staticmethod
+    def _ensure_imported(conn: sqlite3.Connection, site: SiteConfig) -> None:
+        """サイトの既知キャストをまだ取り込んでいなければ、既存のJSONファイルから取り込む（1度だけ）。"""
+        row = conn.execute("SELECT imported_at FROM sites WHERE site = ?", (site.site_id,)).fetchone()
+        if row and row[0]:
+            return
+
+        now = datetime.now().isoformat(timespec='seconds')
+        data_file = MonitorConfig.get_data_file(site)
+        if data_file.exists():
+            try:
+                with open(data_file, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+                casts = [CastMember(**item) for item in items]
+            except (json.JSONDecodeError, IOError, TypeError) as e:
+                logger.error(f"Failed to import legacy data from {data_file}: {e}")
+                casts = []
+            # JSONには初回掲載時刻が無いため、ファイルの更新時刻で代用する
+            seen = datetime.fromtimestamp(data_file.stat().st_mtime).isoformat(timespec='seconds')
+            conn.executemany(
+                "INSERT OR IGNORE INTO casts (site, cast_id, name, detail_url, image_url, age, first_seen, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(site.site_id, c.id, c.name, c.detail_url, c.image_url, c.age, seen, seen) for c in casts],
+            )
+            logger.info(f"Imported {len(casts)} known casts for site '{site.site_id}' from {data_file.name}")
+
+        conn.execute(
+            "INSERT INTO sites (site, imported_at) VALUES (?, ?)"
+            " ON CONFLICT(site) DO UPDATE SET imported_at = excluded.imported_at",
+            (site.site_id, now),
+        )
 
     @staticmethod
     def load_known_casts(site: SiteConfig) -> Set[CastMember]:
-        """指定サイトの保存済みキャストデータを読み込む。
+        """指定サイトの既知キャスト（掲載終了したキャストを含む）を読み込む。
 
         Args:
             site (SiteConfig): 対象サイトの設定。
@@ -1414,102 +1774,283 @@ class DataManager:
         Returns:
             Set[CastMember]: 既知のキャストの集合。読み込み失敗時は空集合を返す。
         """
-        data_file = MonitorConfig.get_data_file(site)
-        if not data_file.exists():
-            logger.debug(f"No existing data found for site '{site.site_id}'. Starting with empty state.")
+        try:
+            with DataManager._connect() as conn:
+                DataManager._ensure_imported(conn, site)
+                rows = conn.execute(
+                    f"SELECT {DataManager._CAST_COLUMNS} FROM casts WHERE site = ?", (site.site_id,)
+                ).fetchall()
+            return {DataManager._row_to_cast(row) for row in rows}
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load known casts for site '{site.site_id}': {e}")
             return set()
 
+    @staticmethod
+    def has_known_casts(site: SiteConfig) -> bool:
+        """指定サイトの既知キャストが1件でもあるかを返す（読み込み失敗時はFalse）。"""
         try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return {CastMember(**item) for item in data}
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Failed to load data from {data_file}: {e}")
-            # データ破損時は安全側に倒して空集合（再通知される可能性があるがシステム停止よりマシ）
-            return set()
+            with DataManager._connect() as conn:
+                DataManager._ensure_imported(conn, site)
+                row = conn.execute("SELECT 1 FROM casts WHERE site = ? LIMIT 1", (site.site_id,)).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.error(f"Failed to query known casts for site '{site.site_id}': {e}")
+            return False
 
     @staticmethod
-    def save_known_casts(site: SiteConfig, casts: Set[CastMember]) -> None:
-        """指定サイトのキャストデータをJSONファイルに保存する。
+    def update_casts(site: SiteConfig, current: Set[CastMember], notify: bool = False) -> Optional[CastDiff]:
+        """今回の一覧をストアへ反映し、新規掲載・掲載終了のキャストだけを返す。
+
+        一覧を一時テーブルに入れ、既知キャストとの差分をSQLで求める。書き込むのは
+        新規・掲載終了・再掲載・内容(名前等)が変わった行だけで、変化が無ければ何も書き込まない。
+        変化があった場合は互換用のJSONも書き出す。
+
+        notify=True の場合、新規キャストの通知メッセージを pending_notifications へ同じトランザクションで
+        保存する。既知キャストとして記録した後・通知を送る前にプロセスが落ちても、通知は失われず次回再送される。
 
         Args:
             site (SiteConfig): 対象サイトの設定。
-            casts (Set[CastMember]): 保存対象のキャスト集合。
+            current (Set[CastMember]): 今回の一覧から抽出したキャスト。
+            notify (bool): 新規キャストの通知メッセージを保存するか（Webhook 未設定時は False）。
+
+        Returns:
+            Optional[CastDiff]: 反映結果。ストアへの書き込みに失敗した場合はNone。
         """
-        data_file = MonitorConfig.get_data_file(site)
+        now = datetime.now().isoformat(timespec='seconds')
         try:
-            data_file.parent.mkdir(parents=True, exist_ok=True)
-            data = [c.to_dict() for c in casts]
+            with DataManager._connect() as conn:
+                DataManager._ensure_imported(conn, site)
+                conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS current_casts ("
+                    " cast_id TEXT PRIMARY KEY, name TEXT, detail_url TEXT, image_url TEXT, age TEXT)"
+                )
+                conn.execute("DELETE FROM current_casts")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO current_casts VALUES (?, ?, ?, ?, ?)",
+                    [(c.id, c.name, c.detail_url, c.image_url, c.age) for c in current],
+                )
+
+                new_rows = conn.execute(
+                    "SELECT c.cast_id, c.name, c.detail_url, c.image_url, c.age FROM current_casts c"
+                    " WHERE NOT EXISTS (SELECT 1 FROM casts k WHERE k.site = ? AND k.cast_id = c.cast_id)"
+                    " ORDER BY c.cast_id",
+                    (site.site_id,),
+                ).fetchall()
+                departed_rows = conn.execute(
+                    f"SELECT {DataManager._CAST_COLUMNS} FROM casts k WHERE k.site = ? AND k.active = 1"
+                    " AND NOT EXISTS (SELECT 1 FROM current_casts c WHERE c.cast_id = k.cast_id)"
+                    " ORDER BY k.cast_id",
+                    (site.site_id,),
+                ).fetchall()
+
+                conn.execute(
+                    "UPDATE casts SET active = 0, last_seen = ? WHERE site = ? AND active = 1"
+                    " AND cast_id NOT IN (SELECT cast_id FROM current_casts)",
+                    (now, site.site_id),
+                )
+                # 新規・再掲載・内容の変わった行だけを書き込む (変化の無い行は WHERE で除外)
+                cursor = conn.execute(
+                    "INSERT INTO casts (site, cast_id, name, detail_url, image_url, age, first_seen, last_seen)"
+                    " SELECT ?, cast_id, name, detail_url, image_url, age, ?, ? FROM current_casts WHERE true"
+                    " ON CONFLICT(site, cast_id) DO UPDATE SET"
+                    " name = excluded.name, detail_url = excluded.detail_url, image_url = excluded.image_url,"
+                    " age = excluded.age, last_seen = excluded.last_seen, active = 1"
+                    " WHERE casts.active = 0 OR casts.name IS NOT excluded.name"
+                    " OR casts.detail_url IS NOT excluded.detail_url OR casts.image_url IS NOT excluded.image_url"
+                    " OR casts.age IS NOT excluded.age",
+                    (site.site_id, now, now),
+                )
+                new = [DataManager._row_to_cast(row) for row in new_rows]
+                pending_ids = []
+                if notify and new:
+                    pending_ids = DataManager._insert_pending(
+                        conn, site.site_id, DiscordNotifier.build_payloads(new, site.name)
+                    )
+                if MonitorConfig.EXPORT_JSON and (cursor.rowcount > 0 or departed_rows):
+                    DataManager._export_known_casts(conn, site)
+
+            return CastDiff(
+                new=new,
+                departed=[DataManager._row_to_cast(row) for row in departed_rows],
+                pending_ids=pending_ids,
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to update known casts for site '{site.site_id}': {e}", exc_info=True)
+            return None
 
+    @staticmethod
+    def _export_known_casts(conn: sqlite3.Connection, site: SiteConfig) -> None:
+        """既知キャストを従来形式の known_casts_*.json に書き出す（旧バージョン・外部ツールとの互換用）。"""
+        data_file = MonitorConfig.get_data_file(site)
+        rows = conn.execute(
+            f"SELECT {DataManager._CAST_COLUMNS} FROM casts WHERE site = ? ORDER BY cast_id", (site.site_id,)
+        ).fetchall()
+        try:
             # アトミック書き込み: 一時ファイルに書き出してから置き換えることで、
             # 書き込み中断時に既存データが破損/空になるのを防ぐ
-            # (batch_download_discord.py の _purge_skipped_tasks と同じパターン)
             tmp_path = data_file.with_suffix(data_file.suffix + '.tmp')
             with open(tmp_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                json.dump(
+                    [dict(zip(('id', 'name', 'detail_url', 'image_url', 'age'), row)) for row in rows],
+                    f, ensure_ascii=False, indent=2,
+                )
             tmp_path.replace(data_file)
-
-            logger.debug(f"Saved {len(casts)} casts to {data_file}")
         except IOError as e:
-            logger.error(f"Failed to save data: {e}", exc_info=True)
+            logger.warning(f"Failed to export known casts to {data_file}: {e}")
 
     @staticmethod
-    def _daily_summary_file() -> Path:
-        """日次サマリの集計状態を保存するファイルのパスを返す。
+    def load_http_cache(site: SiteConfig) -> Dict[str, str]:
+        """指定サイトのHTTP再検証用情報を読み込む。
 
-        全サイト共通で1ファイルに集計するため、サイト単位のknown_casts_*.json
-        とは別にトップレベルのファイルとして管理する。
-        """
-        return MonitorConfig.get_data_dir() / 'daily_summary.json'
+        既知キャストが無い場合（初回実行・データ消失・保存先の切り替わり）は、
+        304/本文未変更で解析を省略すると新人検知の基準が作られないため、空辞書を返して
+        無条件に取得・解析させる。
 
-    @staticmethod
-    def load_daily_summary() -> Dict:
-        """日次サマリの集計状態を読み込む。
+        Args:
+            site (SiteConfig): 対象サイトの設定。
 
         Returns:
-            Dict: {'date': 'YYYY-MM-DD', 'counts': {site_id: count},
-                'last_sent_date': 'YYYY-MM-DD'} 形式の集計状態。
-                ファイルが存在しない・読み込みに失敗した場合は空辞書を返す。
+            Dict[str, str]: url / etag / last_modified / content_hash。無い場合は空辞書。
         """
-        summary_file = DataManager._daily_summary_file()
-        if not summary_file.exists():
+        if not DataManager.has_known_casts(site):
+            return {}
+
+        cache_file = MonitorConfig.get_http_cache_file(site)
+        if not cache_file.exists():
             return {}
 
         try:
-            with open(summary_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
         except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Failed to load daily summary from {summary_file}: {e}")
+            logger.warning(f"Failed to load HTTP cache from {cache_file}: {e}")
             return {}
 
     @staticmethod
-    def save_daily_summary(data: Dict) -> None:
-        """日次サマリの集計状態をJSONファイルに保存する。
+    def save_http_cache(site: SiteConfig, validators: Dict[str, str]) -> None:
+        """指定サイトのHTTP再検証用情報をJSONファイルに保存する。
 
         Args:
-            data (Dict): 保存対象の集計状態。
+            site (SiteConfig): 対象サイトの設定。
+            validators (Dict[str, str]): FetchResult.validators。
         """
-        summary_file = DataManager._daily_summary_file()
+        cache_file = MonitorConfig.get_http_cache_file(site)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+            # アトミック書き込み: _export_known_castsと同じパターン
+            tmp_path = cache_file.with_suffix(cache_file.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(validators, f, ensure_ascii=False, indent=2)
+            tmp_path.replace(cache_file)
+        except IOError as e:
+            logger.error(f"Failed to save HTTP cache: {e}", exc_info=True)
+
+    @staticmethod
+    def _insert_pending(conn: sqlite3.Connection, site: str, payloads: List[Dict]) -> List[int]:
+        """未送信メッセージを保存し、振られた id を送る順に返す。"""
+        now = datetime.now().isoformat(timespec='seconds')
+        return [
+            conn.execute(
+                "INSERT INTO pending_notifications (site, payload, created_at) VALUES (?, ?, ?)",
+                (site, json.dumps(p, ensure_ascii=False), now),
+            ).lastrowid
+            for p in payloads
+        ]
+
+    @staticmethod
+    def save_pending_notifications(site: str, payloads: List[Dict]) -> None:
+        """送れなかった Discord メッセージを、次回の実行で再送するために保存する。"""
+        try:
+            with DataManager._connect() as conn:
+                DataManager._insert_pending(conn, site, payloads)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save pending notifications for '{site}': {e}", exc_info=True)
+
+    @staticmethod
+    def load_pending_notifications() -> List[Tuple[int, str, Dict, int]]:
+        """未送信の Discord メッセージを古い順に返す（id, site, payload, attempts）。"""
         try:
-            summary_file.parent.mkdir(parents=True, exist_ok=True)
+            with DataManager._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, site, payload, attempts FROM pending_notifications ORDER BY id"
+                ).fetchall()
+            return [(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load pending notifications: {e}")
+            return []
+
+    @staticmethod
+    def delete_pending_notification(pending_id: int) -> None:
+        """送信済み（または破棄した）未送信メッセージを削除する。"""
+        try:
+            with DataManager._connect() as conn:
+                conn.execute("DELETE FROM pending_notifications WHERE id = ?", (pending_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to delete pending notification {pending_id}: {e}")
+
+    @staticmethod
+    def mark_pending_notification_failed(pending_id: int) -> None:
+        """未送信メッセージの再送失敗回数を加算する。"""
+        try:
+            with DataManager._connect() as conn:
+                conn.execute(
+                    "UPDATE pending_notifications SET attempts = attempts + 1 WHERE id = ?", (pending_id,)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to update pending notification {pending_id}: {e}")
+
+    @staticmethod
+    def _daily_summary_file() -> Path:
+        """日次サマリの互換用JSONファイルのパスを返す。"""
+        return MonitorConfig.get_data_dir() / 'daily_summary.json'
+
+    @staticmethod
+    def _ensure_daily_imported(conn: sqlite3.Connection) -> None:
+        """既存の daily_summary.json を1度だけ取り込む。"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'daily_summary_imported'").fetchone():
+            return
 
-            # アトミック書き込み: save_known_castsと同じパターン
+        summary_file = DataManager._daily_summary_file()
+        if summary_file.exists():
+            try:
+                with open(summary_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('date'):
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO daily_counts (date, site, count) VALUES (?, ?, ?)",
+                        [(data['date'], site_id, int(count)) for site_id, count in data.get('counts', {}).items()],
+                    )
+                if data.get('last_sent_date'):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sent_date', ?)",
+                        (data['last_sent_date'],),
+                    )
+            except (json.JSONDecodeError, IOError, AttributeError, ValueError) as e:
+                logger.error(f"Failed to import daily summary from {summary_file}: {e}")
+
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('daily_summary_imported', '1')")
+
+    @staticmethod
+    def _export_daily_summary(conn: sqlite3.Connection, date_str: str) -> None:
+        """当日分の集計を従来形式の daily_summary.json に書き出す（互換用）。"""
+        counts = dict(conn.execute("SELECT site, count FROM daily_counts WHERE date = ?", (date_str,)).fetchall())
+        row = conn.execute("SELECT value FROM meta WHERE key = 'last_sent_date'").fetchone()
+        data = {'date': date_str, 'counts': counts, 'last_sent_date': row[0] if row else ''}
+        summary_file = DataManager._daily_summary_file()
+        try:
             tmp_path = summary_file.with_suffix(summary_file.suffix + '.tmp')
             with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             tmp_path.replace(summary_file)
         except IOError as e:
-            logger.error(f"Failed to save daily summary: {e}", exc_info=True)
+            logger.warning(f"Failed to export daily summary to {summary_file}: {e}")
 
     @staticmethod
     def record_daily_new_casts(site_id: str, count: int) -> None:
         """サイト単位で検知した新規キャスト件数を、当日分の集計に加算する。
 
-        cron等により1時間毎に別プロセスとして実行される前提のため、
-        実行毎にファイルを読み書きして状態を永続化する。集計中の日付が
-        当日と異なる場合（日付が変わった後の最初の検知）は、集計を
-        リセットしてから加算する。
-
         Args:
             site_id (str): 検知元サイトのID。
             count (int): 当該サイトで新たに検知した件数。
@@ -1518,13 +2059,55 @@ class DataManager:
             return
 
         today_str = datetime.now().strftime('%Y-%m-%d')
-        data = DataManager.load_daily_summary()
-        if data.get('date') != today_str:
-            data = {'date': today_str, 'counts': {}, 'last_sent_date': data.get('last_sent_date', '')}
+        try:
+            with DataManager._connect() as conn:
+                DataManager._ensure_daily_imported(conn)
+                conn.execute(
+                    "INSERT INTO daily_counts (date, site, count) VALUES (?, ?, ?)"
+                    " ON CONFLICT(date, site) DO UPDATE SET count = count + excluded.count",
+                    (today_str, site_id, count),
+                )
+                DataManager._export_daily_summary(conn, today_str)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record daily summary: {e}", exc_info=True)
 
-        counts = data.setdefault('counts', {})
-        counts[site_id] = counts.get(site_id, 0) + count
-        DataManager.save_daily_summary(data)
+    @staticmethod
+    def get_daily_counts(date_str: str) -> Dict[str, int]:
+        """指定日に新規検知したサイト別件数（site_id -> 件数）を返す。"""
+        try:
+            with DataManager._connect() as conn:
+                DataManager._ensure_daily_imported(conn)
+                return dict(conn.execute(
+                    "SELECT site, count FROM daily_counts WHERE date = ?", (date_str,)
+                ).fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load daily summary: {e}")
+            return {}
+
+    @staticmethod
+    def get_last_summary_sent_date() -> str:
+        """日次サマリを最後に送信した日付（'YYYY-MM-DD'、未送信なら空文字）を返す。"""
+        try:
+            with DataManager._connect() as conn:
+                DataManager._ensure_daily_imported(conn)
+                row = conn.execute("SELECT value FROM meta WHERE key = 'last_sent_date'").fetchone()
+            return row[0] if row else ''
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load daily summary: {e}")
+            return ''
+
+    @staticmethod
+    def mark_daily_summary_sent(date_str: str) -> None:
+        """日次サマリを送信済みとして記録する。"""
+        try:
+            with DataManager._connect() as conn:
+                DataManager._ensure_daily_imported(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sent_date', ?)", (date_str,)
+                )
+                DataManager._export_daily_summary(conn, date_str)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save daily summary: {e}", exc_info=True)
 
 
 class WebMonitor:
@@ -1533,6 +2116,9 @@ class WebMonitor:
     def __init__(self):
         """HTTPセッションの初期化を行う。"""
         self.session = self._create_robust_session()
+        # 取得件数・転送量の集計（並行取得のワーカーから更新するためロックで保護）
+        self.stats: Dict[str, int] = {"requests": 0, "bytes": 0, "not_modified": 0, "unchanged": 0}
+        self._stats_lock = threading.Lock()
 
     def _create_robust_session(self) -> requests.Session:
         """リトライロジックを組み込んだ堅牢なHTTPセッションを作成する。
@@ -1554,7 +2140,7 @@ class WebMonitor:
         return session
 
     def fetch_current_casts(self, site: SiteConfig) -> Set[CastMember]:
-        """指定サイトのターゲットURLから現在のキャスト一覧を取得する。
+        """指定サイトのターゲットURLから現在のキャスト一覧を取得する（条件付きGETなし）。
 
         Args:
             site (SiteConfig): 対象サイトの設定。
@@ -1566,21 +2152,140 @@ class WebMonitor:
             requests.RequestException: 通信エラー時。
         """
         try:
-            # Bot検知回避のためのランダム待機
-            time.sleep(random.uniform(1.0, 3.0))
+            self._polite_wait()
 
             logger.debug(f"Fetching URL: {site.target_url}")
             response = self.session.get(site.target_url, timeout=MonitorConfig.TIMEOUT)
+            self._count("requests", "bytes", len(response.content))
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return self._parse_html(soup, site)
+            return self.parse_body(response.content, site)
 
         except requests.RequestException as e:
             # 呼び出し元でハンドリングするために再送出、ただしログは記録する
             logger.error(f"Network error during scraping of site '{site.site_id}': {e}")
             raise
 
+    def fetch_all(self, sites: List[SiteConfig], caches: Dict[str, Dict[str, str]]) -> Dict[str, FetchResult]:
+        """全サイトのページを、ホストごとに並行して条件付きGETで取得する。
+
+        同じホストのサイトは1つのワーカーが順番に取得し、リクエストの前に毎回
+        POLITE_DELAY_RANGE のランダム待機を入れる（待機はホスト単位で、全体では直列にならない）。
+
+        Args:
+            sites (List[SiteConfig]): 取得対象のサイト。
+            caches (Dict[str, Dict[str, str]]): site_id -> 前回の再検証用情報
+                （DataManager.load_http_cache の戻り値）。
+
+        Returns:
+            Dict[str, FetchResult]: site_id -> 取得結果。
+        """
+        by_host: Dict[str, List[SiteConfig]] = {}
+        for site in sites:
+            by_host.setdefault(urlparse(site.target_url).netloc, []).append(site)
+        if not by_host:
+            return {}
+
+        results: Dict[str, FetchResult] = {}
+        workers = max(1, min(MonitorConfig.MAX_FETCH_WORKERS, len(by_host)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="newface_fetch") as pool:
+            futures = [pool.submit(self._fetch_host, host_sites, caches) for host_sites in by_host.values()]
+            for future in futures:
+                results.update(future.result())
+        return results
+
+    def _fetch_host(self, sites: List[SiteConfig], caches: Dict[str, Dict[str, str]]) -> Dict[str, FetchResult]:
+        """1ホスト分のサイトを順番に取得する（ワーカースレッドごとに専用のセッションを使う）。"""
+        results: Dict[str, FetchResult] = {}
+        session = self._create_robust_session()
+        try:
+            for site in sites:
+                self._polite_wait()
+                try:
+                    results[site.site_id] = self.fetch_site(site, caches.get(site.site_id, {}), session)
+                except requests.RequestException as e:
+                    logger.error(f"Network error during scraping of site '{site.site_id}': {e}")
+                    results[site.site_id] = FetchResult(site=site, status='error')
+        finally:
+            session.close()
+        return results
+
+    def fetch_site(
+        self, site: SiteConfig, cache: Dict[str, str], session: Optional[requests.Session] = None
+    ) -> FetchResult:
+        """前回の ETag / Last-Modified で条件付きGETを行い、本文が変わったかを判定する。
+
+        304応答、または200応答でも本文のハッシュが前回と同じ場合は、解析(_parse_html)を
+        省略できるよう body を持たない結果を返す。
+
+        Args:
+            site (SiteConfig): 対象サイトの設定。
+            cache (Dict[str, str]): 前回の再検証用情報（無ければ空辞書）。
+            session (Optional[requests.Session]): 使用するセッション（省略時は self.session）。
+
+        Returns:
+            FetchResult: 取得結果。
+
+        Raises:
+            requests.RequestException: 通信エラー時。
+        """
+        session = session or self.session
+        # URLを変更した場合は前回の情報を使わない
+        if cache.get('url') != site.target_url:
+            cache = {}
+
+        headers = {}
+        if cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+
+        logger.debug(f"Fetching URL: {site.target_url} (conditional: {bool(headers)})")
+        response = session.get(site.target_url, headers=headers, timeout=MonitorConfig.TIMEOUT)
+        body = response.content
+        self._count("requests", "bytes", len(body))
+
+        if response.status_code == 304:
+            self._count("not_modified")
+            return FetchResult(site=site, status='not_modified', validators=cache)
+        response.raise_for_status()
+
+        validators = {
+            'url': site.target_url,
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'content_hash': hashlib.sha256(body).hexdigest(),
+        }
+        if cache and cache.get('content_hash') == validators['content_hash']:
+            self._count("unchanged")
+            return FetchResult(site=site, status='unchanged', validators=validators)
+        return FetchResult(site=site, status='fetched', body=body, validators=validators)
+
+    def parse_body(self, body: bytes, site: SiteConfig) -> Set[CastMember]:
+        """ページ本文を MonitorConfig.HTML_PARSER で解析し、キャスト情報を抽出する。
+
+        Args:
+            body (bytes): ページ本文。
+            site (SiteConfig): 対象サイトの設定。
+
+        Returns:
+            Set[CastMember]: 抽出されたキャストの集合。
+        """
+        soup = BeautifulSoup(body, MonitorConfig.HTML_PARSER)
+        return self._parse_html(soup, site)
+
+    def _polite_wait(self) -> None:
+        """Bot検知回避のためのランダム待機。"""
+        low, high = MonitorConfig.POLITE_DELAY_RANGE
+        if high > 0:
+            time.sleep(random.uniform(low, high))
+
+    def _count(self, key: str, bytes_key: Optional[str] = None, nbytes: int = 0) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+            if bytes_key:
+                self.stats[bytes_key] += nbytes
+
     def _parse_html(self, soup: BeautifulSoup, site: SiteConfig) -> Set[CastMember]:
         """HTMLスープからキャスト情報を抽出する。
 
@@ -1744,8 +2449,10 @@ class WebMonitor:
 # Main Execution Flow
 # ==========================================
 
-def _check_site(monitor: WebMonitor, notifier: DiscordNotifier, site: SiteConfig) -> None:
-    """1サイト分の巡回・差分検知・通知・保存を行う。
+def _check_site(
+    monitor: WebMonitor, notifier: DiscordNotifier, site: SiteConfig, result: Optional[FetchResult] = None
+) -> None:
+    """1サイト分の差分検知・通知・保存を行う。
 
     サイト単位の処理を分離することで、あるサイトの通信障害・レイアウト変更が
     他サイトの監視処理に波及しないようにする。
@@ -1754,19 +2461,34 @@ def _check_site(monitor: WebMonitor, notifier: DiscordNotifier, site: SiteConfig
         monitor (WebMonitor): 使い回すWebMonitorインスタンス。
         notifier (DiscordNotifier): 使い回すDiscordNotifierインスタンス。
         site (SiteConfig): 処理対象のサイト設定。
+        result (Optional[FetchResult]): WebMonitor.fetch_all で取得済みの結果。
+            省略時はこの場で条件付きGETを行う。
     """
     logger.debug(f"--- Checking site '{site.site_id}' ({site.name}) ---")
 
-    # 1. Load Data
-    known_casts = DataManager.load_known_casts(site)
+    # 1. Fetch Data
+    if result is None:
+        try:
+            result = monitor.fetch_site(site, DataManager.load_http_cache(site))
+        except requests.RequestException as e:
+            logger.error(f"Network error during scraping of site '{site.site_id}': {e}")
+            result = FetchResult(site=site, status='error')
 
-    # 2. Fetch Data
-    try:
-        current_casts = monitor.fetch_current_casts(site)
-    except requests.RequestException:
+    if result.status == 'error':
         logger.error(f"Aborting monitor run for site '{site.site_id}' due to network failure.")
         return
 
+    if result.status in ('not_modified', 'unchanged'):
+        # 前回の実行時から本文が変わっていない = 新人も増えていないので、解析・保存を省略する
+        logger.debug(f"Page not changed for site '{site.site_id}' ({result.status}). Skipping parse.")
+        if result.status == 'unchanged':
+            # ETag等だけ変わった場合に次回304を受けられるよう更新しておく
+            DataManager.save_http_cache(site, result.validators)
+        return
+
+    # 2. Parse
+    current_casts = monitor.parse_body(result.body, site)
+
     if not current_casts:
         logger.debug(
             f"No casts found via scraping for site '{site.site_id}'. "
@@ -1774,21 +2496,26 @@ def _check_site(monitor: WebMonitor, notifier: DiscordNotifier, site: SiteConfig
         )
         return
 
-    # 3. Detect Diff
-    new_casts_set = current_casts - known_casts
-    new_casts = list(new_casts_set)
+    # 3. Detect Diff & Update (SQLiteストア上で差分を求め、変化のあった行だけを書き込む)
+    # 新規キャストの通知メッセージも同じトランザクションで未送信として保存する
+    diff = DataManager.update_casts(site, current_casts, notify=notifier.is_configured())
+    if diff is None:
+        # 保存に失敗したのに再検証用情報を更新すると、次回304で解析を省略して
+        # 同じ新人を検知し直せなくなるため、ここで打ち切る
+        return
 
-    # 4. Notify & Update
-    if new_casts:
-        logger.info(f"Detected {len(new_casts)} new casts on site '{site.site_id}'.")
-        notifier.notify(new_casts, site_name=site.name)
-        DataManager.record_daily_new_casts(site.site_id, len(new_casts))
+    if diff.departed:
+        logger.info(f"{len(diff.departed)} casts are no longer listed on site '{site.site_id}'.")
 
-        updated_casts = known_casts.union(current_casts)
-        DataManager.save_known_casts(site, updated_casts)
+    # 4. Notify
+    if diff.new:
+        logger.info(f"Detected {len(diff.new)} new casts on site '{site.site_id}'.")
+        notifier.resend_pending(diff.pending_ids)
+        DataManager.record_daily_new_casts(site.site_id, len(diff.new))
     else:
         logger.debug(f"No new casts detected for site '{site.site_id}'.")
-        DataManager.save_known_casts(site, current_casts)
+
+    DataManager.save_http_cache(site, result.validators)
 
 
 def _maybe_send_daily_summary(notifier: DiscordNotifier) -> None:
@@ -1797,7 +2524,7 @@ def _maybe_send_daily_summary(notifier: DiscordNotifier) -> None:
     このスクリプトはcron等により1時間毎に別プロセスとして起動される前提
     (デーモン常駐ではない)のため、「21時になったら送る」という時刻トリガーは
     実行時刻の時(hour)が21かどうかで判定する。同日中に複数回21時台の実行が
-    走った場合の重複送信を避けるため、送信済み日付をdaily_summary.jsonに
+    走った場合の重複送信を避けるため、送信済み日付をSQLiteストアに
     永続化して判定に用いる。
 
     Args:
@@ -1808,18 +2535,13 @@ def _maybe_send_daily_summary(notifier: DiscordNotifier) -> None:
         return
 
     today_str = now.strftime('%Y-%m-%d')
-    data = DataManager.load_daily_summary()
-    if data.get('last_sent_date') == today_str:
+    if DataManager.get_last_summary_sent_date() == today_str:
         return
 
-    counts = data.get('counts', {}) if data.get('date') == today_str else {}
+    counts = DataManager.get_daily_counts(today_str)
     site_names = {site.site_id: site.name for site in MonitorConfig.SITES}
     notifier.notify_daily_summary(counts, site_names, today_str)
-
-    data['date'] = data.get('date', today_str)
-    data.setdefault('counts', {})
-    data['last_sent_date'] = today_str
-    DataManager.save_daily_summary(data)
+    DataManager.mark_daily_summary_sent(today_str)
 
 
 # M-7-4: 多重起動防止ロック。cron等での実行が重複すると、既知キャストリストや
@@ -1849,7 +2571,11 @@ def run_monitor() -> None:
 
 
 def _run_monitor_locked() -> None:
-    """モニタープロセスのメインロジック。MonitorConfig.SITESに登録された全サイトを順に処理する。"""
+    """モニタープロセスのメインロジック。MonitorConfig.SITESに登録された全サイトを処理する。
+
+    ページの取得はホストごとに並行して行い(WebMonitor.fetch_all)、差分検知・通知・保存は
+    MonitorConfig.SITES の順に1サイトずつ行う。
+    """
     logger.debug("=== NewFace Monitor Started ===")
 
     data_dir = MonitorConfig.get_data_dir()
@@ -1865,10 +2591,19 @@ def _run_monitor_locked() -> None:
         # リソースを必要とするインスタンス化はウォームアップ確認後に実行
         monitor = WebMonitor()
         notifier = DiscordNotifier(MonitorConfig.DISCORD_WEBHOOK_URL)
+        # 前回までに送れなかった通知を、今回の新着より先に送る
+        notifier.resend_pending()
+
+        caches = {site.site_id: DataManager.load_http_cache(site) for site in MonitorConfig.SITES}
+        results = monitor.fetch_all(MonitorConfig.SITES, caches)
+        logger.debug(
+            f"Fetched {monitor.stats['requests']} pages ({monitor.stats['bytes']} bytes, "
+            f"304: {monitor.stats['not_modified']}, unchanged: {monitor.stats['unchanged']})"
+        )
 
         for site in MonitorConfig.SITES:
             try:
-                _check_site(monitor, notifier, site)
+                _check_site(monitor, notifier, site, results.get(site.site_id))
             except Exception as e:
                 # 1サイトの予期しない例外で他サイトの処理を止めない
                 logger.critical(f"Critical error while checking site '{site.site_id}': {e}", exc_info=True)
@@ -0,0 +1,342 @@
+# DDD/test_newface_monitor_fetch.py
+"""
+newface_monitor.py のページ取得 (条件付きGET・本文ハッシュ・ホスト単位の並行取得・lxml解析) のテスト。
+
+DDDにはpytest基盤(conftest.py等)が無いため、本ファイルは
+`pytest DDD/test_newface_monitor_fetch.py` のように直接指定して実行する
+(MY_HOME_SYSTEM/pytest.ini の testpaths=tests のスコープ外)。
+
+ローカルの偽サイト (SiteFixtureServer) を使い、実際のサイトには一切アクセスしない。
+- 2回目の巡回では ETag/Last-Modified による304応答で解析・保存を省略すること
+- 再検証に対応しないサイトでも、本文のハッシュが同じなら解析を省略すること
+- ページが変わったときは新人を検知・通知し、再検証用情報を更新すること
+- 既知キャストが無い場合・保存に失敗した場合は再検証用情報を使わない/更新しないこと
+- 同じホストのサイトは待機を挟んで順番に、別ホストのサイトは並行して取得すること
+- lxml と html.parser で同じ SiteConfig セレクタの抽出結果が一致すること
+"""
+import email.utils
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+
+
+def render_page(cast_ids, padding: int = 0) -> bytes:
+    """ぷちぷちどりーむ形式 (ul.gallist li / article h3 a / div.ph img) の一覧ページ"""
+    items = "".join(
+        f'<li><article><h3><a href="/profile.php?id={cid}">キャスト{cid}(2{cid % 10})</a></h3>'
+        f'<div class="ph"><img class="list_today" src="/today.png"><img src="/img/{cid}.jpg"></div></article></li>'
+        for cid in cast_ids
+    )
+    filler = f"<!-- {'x' * padding} -->" if padding else ""
+    return f"<html><body>{filler}<ul class='gallist'>{items}</ul></body></html>".encode("utf-8")
+
+
+class SiteFixtureServer:
+    """
+    1ホスト分の偽サイト。パス -> 本文を持ち、ETag / Last-Modified による条件付きGETに応答する
+    (validators=False なら常に200で本文を返す)。リクエストの時刻・ヘッダーを記録する。
+    """
+
+    def __init__(self, validators: bool = True, latency: float = 0.0):
+        self.pages = {}
+        self.modified = {}
+        self.validators = validators
+        self.latency = latency
+        self.requests = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.pages.get(self.path)
+                with server._lock:
+                    server.requests.append((time.monotonic(), self.path, dict(self.headers)))
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                last_modified = email.utils.formatdate(server.modified[self.path], usegmt=True)
+                if server.validators and (
+                    self.headers.get("If-None-Match") == etag
+                    or (self.headers.get("If-None-Match") is None
+                        and self.headers.get("If-Modified-Since") == last_modified)
+                ):
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if server.validators:
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def set_page(self, path: str, body: bytes) -> None:
+        self.pages[path] = body
+        self.modified[path] = time.time()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_site(server: SiteFixtureServer, name: str) -> module.SiteConfig:
+    return module.SiteConfig(
+        site_id=name,
+        name=name,
+        target_url=f"{server.url}/{name}/",
+        selector_container='ul.gallist li',
+        selector_name='article h3 a',
+        selector_link='article h3 a',
+        selector_image='div.ph img:not(.list_today)',
+        id_query_param='id',
+    )
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """データ保存先を tmp_path にし、待機を無くし、通知を記録するだけにした実行環境"""
+    monkeypatch.setattr(module.MonitorConfig, "get_data_dir", classmethod(lambda cls: tmp_path))
+    monkeypatch.setattr(module.MonitorConfig, "POLITE_DELAY_RANGE", (0.0, 0.0))
+    monkeypatch.setattr(module, "wait_for_storage_warmup", lambda _dir: True)
+    monkeypatch.setattr(module, "_maybe_send_daily_summary", lambda notifier: None)
+    monkeypatch.setattr(module.MonitorConfig, "DISCORD_WEBHOOK_URL", "http://127.0.0.1:9/api/webhooks/1/token")
+    notified = []
+
+    def post(self, payload):
+        site = payload["embeds"][0]["title"].split("【", 1)[1].split("】", 1)[0]
+        notified.append((site, sorted(e["url"].rsplit("id=", 1)[1] for e in payload["embeds"])))
+        return 'sent'
+
+    monkeypatch.setattr(module.DiscordNotifier, "_post", post)
+    servers = []
+
+    def start(**kwargs):
+        server = SiteFixtureServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start, notified, tmp_path
+    for server in servers:
+        server.close()
+
+
+def run_once(sites):
+    """SITES を差し替えて1回巡回し、(WebMonitor.stats, _parse_html の呼び出し回数) を返す"""
+    captured = {}
+    original_init = module.WebMonitor.__init__
+
+    def init(self):
+        original_init(self)
+        captured["monitor"] = self
+
+    parse_calls = []
+    original_parse = module.WebMonitor._parse_html
+
+    def counting_parse(self, soup, site):
+        parse_calls.append(site.site_id)
+        return original_parse(self, soup, site)
+
+    with patch.object(module.MonitorConfig, "SITES", sites), \
+            patch.object(module.WebMonitor, "__init__", init), \
+            patch.object(module.WebMonitor, "_parse_html", counting_parse):
+        module._run_monitor_locked()
+    return captured["monitor"].stats, parse_calls
+
+
+class TestConditionalFetch:
+    def test_second_run_revalidates_with_304_and_skips_parse(self, env):
+        start, notified, data_dir = env
+        server = start()
+        sites = [make_site(server, f"s{i}") for i in range(3)]
+        for i, site in enumerate(sites):
+            server.set_page(f"/s{i}/", render_page(range(i * 10, i * 10 + 5)))
+
+        stats, parsed = run_once(sites)
+        assert sorted(parsed) == ["s0", "s1", "s2"]
+        assert stats["bytes"] > 0
+        assert [name for name, _ in notified] == ["s0", "s1", "s2"]
+        assert (data_dir / "http_cache_s0.json").exists()
+
+        notified.clear()
+        stats, parsed = run_once(sites)
+        assert parsed == []
+        assert stats["not_modified"] == 3
+        assert stats["bytes"] == 0
+        assert notified == []
+        assert all("If-None-Match" in headers for _, _, headers in server.requests[-3:])
+
+    def test_unchanged_body_is_not_reparsed_when_server_ignores_validators(self, env):
+        start, notified, _ = env
+        server = start(validators=False)
+        site = make_site(server, "plain")
+        server.set_page("/plain/", render_page(range(5)))
+
+        run_once([site])
+        stats, parsed = run_once([site])
+
+        assert parsed == []
+        assert stats["unchanged"] == 1
+        assert stats["bytes"] > 0  # 本文は受信するが解析はしない
+
+    def test_changed_page_is_parsed_and_new_cast_notified(self, env):
+        start, notified, data_dir = env
+        server = start()
+        site = make_site(server, "s0")
+        server.set_page("/s0/", render_page(range(5)))
+        run_once([site])
+        old_cache = (data_dir / "http_cache_s0.json").read_text()
+
+        notified.clear()
+        server.set_page("/s0/", render_page(range(6)))
+        stats, parsed = run_once([site])
+
+        assert parsed == ["s0"]
+        assert notified == [("s0", ["5"])]
+        assert (data_dir / "http_cache_s0.json").read_text() != old_cache
+
+    def test_missing_known_casts_forces_unconditional_fetch(self, env):
+        start, notified, data_dir = env
+        server = start()
+        site = make_site(server, "s0")
+        server.set_page("/s0/", render_page(range(5)))
+        run_once([site])
+
+        # ストアも互換用JSONも失われた状態
+        module.MonitorConfig.get_db_file().unlink()
+        module.MonitorConfig.get_data_file(site).unlink()
+        notified.clear()
+        stats, parsed = run_once([site])
+
+        assert "If-None-Match" not in server.requests[-1][2]
+        assert parsed == ["s0"]
+        assert notified == [("s0", ["0", "1", "2", "3", "4"])]
+
+    def test_http_cache_is_not_updated_when_known_casts_cannot_be_saved(self, env):
+        start, _, data_dir = env
+        server = start()
+        site = make_site(server, "s0")
+        server.set_page("/s0/", render_page(range(5)))
+
+        with patch.object(module.DataManager, "update_casts", return_value=None):
+            run_once([site])
+
+        assert not (data_dir / "http_cache_s0.json").exists()
+
+
+class TestPerHostConcurrency:
+    def test_hosts_are_fetched_in_parallel_with_per_host_delay(self, env, monkeypatch):
+        start, _, _ = env
+        delay = 0.2
+        monkeypatch.setattr(module.MonitorConfig, "POLITE_DELAY_RANGE", (delay, delay))
+        servers = [start() for _ in range(4)]
+        sites = []
+        for h, server in enumerate(servers):
+            for i in range(2):
+                site = make_site(server, f"h{h}s{i}")
+                server.set_page(f"/h{h}s{i}/", render_page(range(3)))
+                sites.append(site)
+
+        monitor = module.WebMonitor()
+        try:
+            started = time.monotonic()
+            results = monitor.fetch_all(sites, {})
+            elapsed = time.monotonic() - started
+        finally:
+            monitor.close()
+
+        assert {r.status for r in results.values()} == {"fetched"}
+        # 直列なら 8 * delay かかる。ホスト単位の並行取得なら 2 * delay 程度
+        assert elapsed < 8 * delay * 0.6
+        for server in servers:
+            (t1, _, _), (t2, _, _) = server.requests
+            assert t2 - t1 >= delay * 0.9  # 同じホストへは待機を挟んで順番に
+
+    def test_network_error_on_one_host_does_not_affect_others(self, env):
+        start, _, _ = env
+        server = start()
+        good = make_site(server, "good")
+        server.set_page("/good/", render_page(range(3)))
+        dead = module.SiteConfig(
+            site_id="dead", name="dead", target_url="http://127.0.0.1:9/dead/",
+            selector_container='ul.gallist li', selector_name='a', selector_link='a', selector_image='img',
+        )
+
+        with patch.object(module.MonitorConfig, "RETRY_TOTAL", 0):
+            monitor = module.WebMonitor()
+            try:
+                results = monitor.fetch_all([dead, good], {})
+            finally:
+                monitor.close()
+
+        assert results["dead"].status == "error"
+        assert results["good"].status == "fetched"
+
+
+class TestHtmlParser:
+    @pytest.mark.skipif(module._HTML_PARSER != "lxml", reason="lxml is not installed")
+    def test_lxml_and_html_parser_extract_the_same_casts(self, monkeypatch):
+        site = module.SiteConfig(
+            site_id="mixed", name="mixed", target_url="https://example.com/list/",
+            selector_container='div.item', selector_name='p.name', selector_link='a',
+            selector_image='span.thumb', image_from_style=True, name_first_text_only=True,
+        )
+        body = (
+            "<div class='item'><a href='/cast/1/?utm=x'><p class='name'><small>Name</small>さな<span>(27)</span></p>"
+            "<span class='thumb' style=\"background-image:url('/a.jpg')\"></span></a></div>"
+            "<div class='item'><p class='name'>芹沢 (40歳)</p><img src='/b.jpg'></div>"
+        ).encode("utf-8")
+        listing = module.SiteConfig(
+            site_id="listing", name="listing", target_url="https://example.com/newface/",
+            selector_container='ul.gallist li', selector_name='article h3 a',
+            selector_link='article h3 a', selector_image='div.ph img:not(.list_today)', id_query_param='id',
+        )
+        monitor = module.WebMonitor()
+        try:
+            results = {}
+            for parser in ("lxml", "html.parser"):
+                monkeypatch.setattr(module.MonitorConfig, "HTML_PARSER", parser)
+                results[parser] = (
+                    {c.id: c.to_dict() for c in monitor.parse_body(body, site)},
+                    {c.id: c.to_dict() for c in monitor.parse_body(render_page(range(10)), listing)},
+                )
+        finally:
+            monitor.close()
+
+        assert results["lxml"] == results["html.parser"]
+        mixed, casts = results["lxml"]
+        assert mixed["1"]["name"] == "さな"
+        assert mixed["1"]["age"] == "27"
+        assert len(casts) == 10
+        assert casts["3"]["image_url"] == "https://example.com/img/3.jpg"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,301 @@
+# DDD/test_newface_monitor_notify.py
+"""
+newface_monitor.py の DiscordNotifier (まとめ送信・レート制限への追従・未送信分の再送) のテスト。
+
+DDDにはpytest基盤(conftest.py等)が無いため、本ファイルは
+`pytest DDD/test_newface_monitor_notify.py` のように直接指定して実行する
+(MY_HOME_SYSTEM/pytest.ini の testpaths=tests のスコープ外)。
+
+ローカルの偽Webhook (FakeWebhookServer) を使い、実際のDiscordには一切アクセスしない。
+偽Webhookは Discord と同じく、一定時間あたりの回数を超えると 429 を返し、
+X-RateLimit-Remaining / X-RateLimit-Reset-After を応答に付け、埋め込み10件・6000文字を超える内容は 400 にする。
+- 新規キャストをサイトごとに、10件・6000文字以内のメッセージへまとめること
+- レート制限ヘッダーに合わせて待ち、429 を受けずに送り切ること。429 を受けたら Retry-After だけ待って再送すること
+- 待ち時間 (Retry-After・X-RateLimit-Reset-After) が DISCORD_MAX_WAIT_SEC を超える場合は待たずに保存し、次回に回すこと
+- 送れなかったメッセージ (5xx・401/404) を保存し、次回の実行で古い順に再送すること
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+
+
+class FakeWebhookServer:
+    """
+    Discord Webhook の偽物。window 秒あたり limit 回まで受け付け、超えたら 429 を返す。
+    fail_with に積んだステータスは、次のリクエストからその順に返す (受け付けたものとしては記録しない)。
+    """
+
+    def __init__(self, limit: int = 5, window: float = 0.5, latency: float = 0.0):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.fail_with = []
+        self.messages = []
+        self.requests = 0
+        self.rate_limited = 0
+        self._window_start = 0.0
+        self._used = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if server.latency:
+                    time.sleep(server.latency)
+                status, headers, payload = server._handle(json.loads(body))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/api/webhooks/1/token"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def _handle(self, message):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start, self._used = now, 0
+            reset_after = max(self.window - (now - self._window_start), 0.0)
+            if self._used >= self.limit:
+                self.rate_limited += 1
+                headers = {"Retry-After": f"{reset_after:.3f}", "X-RateLimit-Remaining": "0",
+                           "X-RateLimit-Reset-After": f"{reset_after:.3f}"}
+                return 429, headers, {"message": "You are being rate limited.",
+                                      "retry_after": round(reset_after, 3), "global": False}
+            self._used += 1
+            headers = {"X-RateLimit-Limit": str(self.limit),
+                       "X-RateLimit-Remaining": str(self.limit - self._used),
+                       "X-RateLimit-Reset-After": f"{reset_after:.3f}"}
+            if self.fail_with:
+                return self.fail_with.pop(0), headers, {"message": "error"}
+            embeds = message.get("embeds", [])
+            if len(embeds) > 10 or sum(module.DiscordNotifier._embed_size(e) for e in embeds) > 6000:
+                return 400, headers, {"message": "Invalid Form Body"}
+            self.messages.append(message)
+            return 204, headers, {}
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def cast(cid, name=None):
+    return module.CastMember(
+        id=str(cid), name=name or f"キャスト{cid}", detail_url=f"https://example.com/p/{cid}",
+        image_url=f"https://example.com/i/{cid}.jpg", age="22",
+    )
+
+
+def names(messages):
+    return [embed["fields"][0]["value"] for m in messages for embed in m["embeds"]]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(module.MonitorConfig, "get_data_dir", classmethod(lambda cls: tmp_path))
+    monkeypatch.setattr(module.MonitorConfig, "RETRY_TOTAL", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def webhook():
+    servers = []
+
+    def start(**kwargs):
+        server = FakeWebhookServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def make_notifier(server):
+    notifier = module.DiscordNotifier(server.url)
+    notifier.slept = []
+    original = notifier._sleep
+
+    def sleep(sec):
+        notifier.slept.append(sec)
+        original(sec)
+
+    notifier._sleep = sleep
+    return notifier
+
+
+class TestBatching:
+    def test_casts_are_packed_ten_per_message_per_site(self, data_dir, webhook):
+        server = webhook(limit=50)
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(i) for i in range(25)], site_name="サイトA", site_id="a")
+        notifier.notify([cast(i) for i in range(100, 103)], site_name="サイトB", site_id="b")
+
+        assert [len(m["embeds"]) for m in server.messages] == [10, 10, 5, 3]
+        assert names(server.messages) == [f"キャスト{i}" for i in list(range(25)) + [100, 101, 102]]
+        for message in server.messages:
+            sites = {e["title"].split("】")[0] for e in message["embeds"]}
+            assert len(sites) == 1
+        assert server.messages[0]["embeds"][0]["title"] == "✨ 新人キャスト情報【サイトA】: キャスト0"
+        assert notifier.slept == []
+
+    def test_messages_stay_within_embed_character_budget(self, data_dir, webhook):
+        server = webhook(limit=50)
+        notifier = make_notifier(server)
+        long_casts = [cast(i, name=f"{i:02d}" + "名" * 400) for i in range(10)]
+
+        notifier.notify(long_casts, site_name="サイトA", site_id="a")
+
+        assert server.rate_limited == 0
+        assert len(server.messages) > 1
+        assert all(
+            sum(module.DiscordNotifier._embed_size(e) for e in m["embeds"]) <= 6000 for m in server.messages
+        )
+        assert names(server.messages) == [c.name for c in long_casts]
+        assert all(len(e["title"]) <= 256 for m in server.messages for e in m["embeds"])
+
+
+class TestRateLimit:
+    def test_paces_on_rate_limit_headers_without_hitting_429(self, data_dir, webhook):
+        server = webhook(limit=2, window=0.3)
+        notifier = make_notifier(server)
+
+        for site in range(3):
+            notifier.notify([cast(site * 100 + i) for i in range(25)], site_name=f"s{site}", site_id=f"s{site}")
+
+        assert server.rate_limited == 0
+        assert len(server.messages) == 9
+        assert len(names(server.messages)) == 75
+        # 残り回数が尽きたときだけ待つ (9通 / 2通ごと = 4回)
+        assert len(notifier.slept) == 4
+
+    def test_429_is_retried_after_retry_after(self, data_dir, webhook):
+        server = webhook(limit=1, window=0.3)
+        notifier = make_notifier(server)
+        # ヘッダーを読む前 (別プロセス等) に枠を使い切られた状態を作る
+        server._handle({"embeds": []})
+
+        notifier.notify([cast(1)], site_name="サイトA", site_id="a")
+
+        assert server.rate_limited == 1
+        assert names(server.messages) == ["キャスト1"]
+        assert 0 < notifier.slept[0] <= 0.3
+
+    def test_long_retry_after_defers_to_next_run(self, data_dir, webhook, monkeypatch):
+        monkeypatch.setattr(module.MonitorConfig, "DISCORD_MAX_WAIT_SEC", 0.01)
+        server = webhook(limit=1, window=5.0)
+        server._handle({"embeds": []})
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(1)], site_name="サイトA", site_id="a")
+
+        assert notifier.slept == []
+        assert len(module.DataManager.load_pending_notifications()) == 1
+
+    def test_long_rate_limit_reset_defers_to_next_run(self, data_dir, webhook, monkeypatch):
+        monkeypatch.setattr(module.MonitorConfig, "DISCORD_MAX_WAIT_SEC", 1.0)
+        server = webhook(limit=1, window=60.0)
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(i) for i in range(25)], site_name="サイトA", site_id="a")
+        notifier.notify([cast(100)], site_name="サイトB", site_id="b")
+
+        # 1通目で残り回数が尽き、リセットまで60秒かかるため待たずに残りを保存する
+        assert notifier.slept == []
+        assert server.requests == 1 and server.rate_limited == 0
+        pending = module.DataManager.load_pending_notifications()
+        assert [(site, len(payload["embeds"])) for _, site, payload, _ in pending] == [("a", 10), ("a", 5), ("b", 1)]
+
+
+class TestPendingRetry:
+    def test_undelivered_messages_are_resent_on_next_run(self, data_dir, webhook):
+        server = webhook(limit=50)
+        server.fail_with = [204, 503]
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(i) for i in range(25)], site_name="サイトA", site_id="a")
+        # 送信できない状態になったら、同じ実行中の他サイトの分は送らずに保存する
+        notifier.notify([cast(100)], site_name="サイトB", site_id="b")
+
+        assert server.requests == 2
+        pending = module.DataManager.load_pending_notifications()
+        assert [(site, len(payload["embeds"])) for _, site, payload, _ in pending] == [("a", 10), ("a", 5), ("b", 1)]
+
+        make_notifier(server).resend_pending()
+
+        assert names(server.messages) == [f"キャスト{i}" for i in range(10, 25)] + ["キャスト100"]
+        assert module.DataManager.load_pending_notifications() == []
+
+    def test_invalid_webhook_aborts_and_keeps_messages(self, data_dir, webhook):
+        server = webhook(limit=50)
+        server.fail_with = [404]
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(i) for i in range(15)], site_name="サイトA", site_id="a")
+
+        assert server.requests == 1
+        assert len(module.DataManager.load_pending_notifications()) == 2
+
+    def test_rejected_message_is_dropped_and_rest_are_sent(self, data_dir, webhook):
+        server = webhook(limit=50)
+        server.fail_with = [400]
+        notifier = make_notifier(server)
+
+        notifier.notify([cast(i) for i in range(15)], site_name="サイトA", site_id="a")
+
+        assert names(server.messages) == [f"キャスト{i}" for i in range(10, 15)]
+        assert module.DataManager.load_pending_notifications() == []
+
+    def test_pending_message_is_given_up_after_max_attempts(self, data_dir, webhook, monkeypatch):
+        monkeypatch.setattr(module.MonitorConfig, "DISCORD_PENDING_MAX_ATTEMPTS", 2)
+        server = webhook(limit=50)
+        module.DataManager.save_pending_notifications("a", [{"username": "New Face Monitor", "embeds": []}])
+
+        server.fail_with = [503]
+        make_notifier(server).resend_pending()
+        assert module.DataManager.load_pending_notifications()[0][3] == 1
+
+        server.fail_with = [503]
+        make_notifier(server).resend_pending()
+        assert module.DataManager.load_pending_notifications() == []
+
+    def test_run_resends_pending_before_new_casts(self, data_dir, webhook, monkeypatch):
+        server = webhook(limit=50)
+        module.DataManager.save_pending_notifications(
+            "a", module.DiscordNotifier.build_payloads([cast(1)], site_name="サイトA")
+        )
+        monkeypatch.setattr(module.MonitorConfig, "DISCORD_WEBHOOK_URL", server.url)
+        monkeypatch.setattr(module.MonitorConfig, "SITES", [])
+        monkeypatch.setattr(module, "wait_for_storage_warmup", lambda _dir: True)
+        monkeypatch.setattr(module, "_maybe_send_daily_summary", lambda notifier: None)
+
+        module._run_monitor_locked()
+
+        assert names(server.messages) == ["キャスト1"]
+        assert module.DataManager.load_pending_notifications() == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
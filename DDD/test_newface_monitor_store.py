@@ -0,0 +1,245 @@
+# DDD/test_newface_monitor_store.py
+"""
+newface_monitor.py の DataManager (SQLite ストア) のテスト。
+
+DDDにはpytest基盤(conftest.py等)が無いため、本ファイルは
+`pytest DDD/test_newface_monitor_store.py` のように直接指定して実行する
+(MY_HOME_SYSTEM/pytest.ini の testpaths=tests のスコープ外)。
+
+- update_casts が新規掲載・掲載終了のキャストだけを返し、再掲載は新人扱いしないこと
+- 変化の無い実行では casts の行を書き換えず、互換用JSONも書き出さないこと
+- 新規キャストの通知メッセージを、既知キャストの更新と同じトランザクションで未送信として保存すること
+- スキーマの作成はプロセスで1度だけ (DBファイルが消えたら作り直す) であること
+- 既存の known_casts_*.json / daily_summary.json を1度だけ取り込むこと
+- 日次サマリの加算・送信済み日付の記録と、互換用 daily_summary.json の書き出し
+"""
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+DDD_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DDD_DIR))
+
+import newface_monitor as module  # noqa: E402
+
+SITE = module.SiteConfig(
+    site_id="s0", name="サイト0", target_url="https://example.com/newface/",
+    selector_container="li", selector_name="a", selector_link="a", selector_image="img",
+)
+
+
+def cast(cid, name=None):
+    return module.CastMember(
+        id=str(cid), name=name or f"キャスト{cid}", detail_url=f"https://example.com/p/{cid}",
+        image_url=f"https://example.com/i/{cid}.jpg", age="22",
+    )
+
+
+def ids(casts):
+    return [c.id for c in casts]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(module.MonitorConfig, "get_data_dir", classmethod(lambda cls: tmp_path))
+    return tmp_path
+
+
+def rows(data_dir, sql, params=()):
+    conn = sqlite3.connect(str(data_dir / module.MonitorConfig.DB_FILENAME))
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+class TestUpdateCasts:
+    def test_first_run_reports_all_as_new(self, data_dir):
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+
+        assert ids(diff.new) == ["1", "2"]
+        assert diff.departed == []
+        assert module.DataManager.has_known_casts(SITE)
+
+    def test_reports_only_new_and_departed_casts(self, data_dir):
+        module.DataManager.update_casts(SITE, {cast(1), cast(2), cast(3)})
+
+        diff = module.DataManager.update_casts(SITE, {cast(2), cast(3), cast(4)})
+
+        assert ids(diff.new) == ["4"]
+        assert ids(diff.departed) == ["1"]
+        assert rows(data_dir, "SELECT cast_id, active FROM casts ORDER BY cast_id") == [
+            ("1", 0), ("2", 1), ("3", 1), ("4", 1)
+        ]
+
+    def test_returning_cast_is_reactivated_but_not_reported_as_new(self, data_dir):
+        module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+        module.DataManager.update_casts(SITE, {cast(2)})
+
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+
+        assert diff.new == []
+        assert diff.departed == []
+        assert rows(data_dir, "SELECT active FROM casts WHERE cast_id = '1'") == [(1,)]
+
+    def test_unchanged_listing_does_not_rewrite_rows_or_export(self, data_dir):
+        module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+        export = module.MonitorConfig.get_data_file(SITE)
+        os.utime(export, (0, 0))
+        conn = sqlite3.connect(str(data_dir / module.MonitorConfig.DB_FILENAME))
+        conn.execute("UPDATE casts SET last_seen = 'marker'")
+        conn.commit()
+        conn.close()
+
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+
+        assert diff.new == [] and diff.departed == []
+        assert rows(data_dir, "SELECT DISTINCT last_seen FROM casts") == [("marker",)]
+        assert export.stat().st_mtime == 0
+
+    def test_changed_name_updates_row_and_export(self, data_dir):
+        module.DataManager.update_casts(SITE, {cast(1)})
+
+        diff = module.DataManager.update_casts(SITE, {cast(1, name="改名")})
+
+        assert diff.new == []
+        assert rows(data_dir, "SELECT name FROM casts") == [("改名",)]
+        exported = json.loads(module.MonitorConfig.get_data_file(SITE).read_text(encoding="utf-8"))
+        assert exported[0]["name"] == "改名"
+
+    def test_sites_are_independent(self, data_dir):
+        other = module.SiteConfig(
+            site_id="s1", name="サイト1", target_url="https://example.org/",
+            selector_container="li", selector_name="a", selector_link="a", selector_image="img",
+        )
+        module.DataManager.update_casts(SITE, {cast(1)})
+
+        diff = module.DataManager.update_casts(other, {cast(1)})
+
+        assert ids(diff.new) == ["1"]
+        assert module.DataManager.update_casts(SITE, {cast(1)}).departed == []
+
+    def test_returns_none_when_store_cannot_be_written(self, data_dir, monkeypatch):
+        monkeypatch.setattr(module.MonitorConfig, "get_db_file", classmethod(lambda cls: data_dir))
+
+        assert module.DataManager.update_casts(SITE, {cast(1)}) is None
+
+    def test_new_casts_are_queued_for_notification_in_the_same_transaction(self, data_dir):
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2)}, notify=True)
+
+        pending = module.DataManager.load_pending_notifications()
+        assert [pending_id for pending_id, *_ in pending] == diff.pending_ids
+        assert [(site, len(payload["embeds"])) for _, site, payload, _ in pending] == [("s0", 2)]
+        assert module.DataManager.update_casts(SITE, {cast(1), cast(2)}, notify=True).pending_ids == []
+
+    def test_queued_notifications_roll_back_with_the_casts(self, data_dir, monkeypatch):
+        def fail(conn, site):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(module.MonitorConfig, "EXPORT_JSON", True)
+        monkeypatch.setattr(module.DataManager, "_export_known_casts", staticmethod(fail))
+
+        assert module.DataManager.update_casts(SITE, {cast(1)}, notify=True) is None
+        assert rows(data_dir, "SELECT COUNT(*) FROM casts") == [(0,)]
+        assert module.DataManager.load_pending_notifications() == []
+
+    def test_schema_is_created_once_per_process(self, data_dir, monkeypatch):
+        scripts = []
+
+        class CountingConnection(sqlite3.Connection):
+            def executescript(self, script):
+                scripts.append(script)
+                return super().executescript(script)
+
+        original_connect = sqlite3.connect
+        monkeypatch.setattr(
+            module.sqlite3, "connect", lambda *args, **kwargs: original_connect(*args, factory=CountingConnection, **kwargs)
+        )
+        for _ in range(3):
+            module.DataManager.has_known_casts(SITE)
+        module.DataManager.update_casts(SITE, {cast(1)})
+        assert len(scripts) == 1
+
+        # DBファイルが消えた場合は作り直す
+        module.MonitorConfig.get_db_file().unlink()
+        module.DataManager.has_known_casts(SITE)
+        assert len(scripts) == 2
+
+
+class TestLegacyImport:
+    def test_known_casts_json_is_imported_once(self, data_dir):
+        legacy = module.MonitorConfig.get_data_file(SITE)
+        legacy.write_text(json.dumps([cast(1).to_dict(), cast(2).to_dict()], ensure_ascii=False), encoding="utf-8")
+
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2), cast(3)})
+        assert ids(diff.new) == ["3"]
+
+        # 取り込み後は JSON を書き換えても再取り込みしない (互換用の書き出し先になる)
+        legacy.write_text(json.dumps([cast(9).to_dict()]), encoding="utf-8")
+        assert sorted(ids(module.DataManager.load_known_casts(SITE))) == ["1", "2", "3"]
+
+    def test_store_is_rebuilt_from_exported_json_when_db_is_lost(self, data_dir):
+        module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+        module.MonitorConfig.get_db_file().unlink()
+
+        diff = module.DataManager.update_casts(SITE, {cast(1), cast(2)})
+
+        assert diff.new == []
+
+    def test_broken_json_is_skipped(self, data_dir):
+        module.MonitorConfig.get_data_file(SITE).write_text("{broken", encoding="utf-8")
+
+        diff = module.DataManager.update_casts(SITE, {cast(1)})
+
+        assert ids(diff.new) == ["1"]
+
+    def test_daily_summary_json_is_imported(self, data_dir):
+        today = datetime.now().strftime("%Y-%m-%d")
+        (data_dir / "daily_summary.json").write_text(json.dumps(
+            {"date": today, "counts": {"s0": 2}, "last_sent_date": "2026-01-01"}
+        ), encoding="utf-8")
+
+        assert module.DataManager.get_daily_counts(today) == {"s0": 2}
+        assert module.DataManager.get_last_summary_sent_date() == "2026-01-01"
+
+
+class TestDailySummary:
+    def test_counts_are_accumulated_per_site_and_exported(self, data_dir):
+        today = datetime.now().strftime("%Y-%m-%d")
+        module.DataManager.record_daily_new_casts("s0", 2)
+        module.DataManager.record_daily_new_casts("s0", 3)
+        module.DataManager.record_daily_new_casts("s1", 1)
+        module.DataManager.record_daily_new_casts("s1", 0)
+
+        assert module.DataManager.get_daily_counts(today) == {"s0": 5, "s1": 1}
+        exported = json.loads((data_dir / "daily_summary.json").read_text(encoding="utf-8"))
+        assert exported == {"date": today, "counts": {"s0": 5, "s1": 1}, "last_sent_date": ""}
+
+    def test_summary_is_sent_once_per_day_at_21(self, data_dir, monkeypatch):
+        class At21(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime(2026, 10, 17, 21, 5)
+
+        monkeypatch.setattr(module, "datetime", At21)
+        module.DataManager.record_daily_new_casts("s0", 4)
+        sent = []
+
+        class Notifier:
+            def notify_daily_summary(self, counts, site_names, date_str):
+                sent.append((counts, date_str))
+
+        module._maybe_send_daily_summary(Notifier())
+        module._maybe_send_daily_summary(Notifier())
+
+        assert sent == [({"s0": 4}, "2026-10-17")]
+        assert module.DataManager.get_last_summary_sent_date() == "2026-10-17"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
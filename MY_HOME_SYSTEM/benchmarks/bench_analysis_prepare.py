@@ -0,0 +1,101 @@
+# MY_HOME_SYSTEM/benchmarks/bench_analysis_prepare.py
+"""
+ダッシュボード向けのDataFrame前処理 (services/analysis_service.py の process_dataframe +
+apply_friendly_names + sensor_view) を、行ごとの旧方式と一括変換で比較するベンチマーク。
+
+load_sensor_data と同じ列構成の合成データ (naive / Z / +09:00 が混在するタイムスタンプ、
+数十台のデバイス) を行数ごとに作り、
+- 旧方式: タイムスタンプを `.apply(_parse_timestamp_to_jst)` で1行ずつ変換し、表示名・設置場所を
+  全行に Series.map する
+- 一括: pd.to_datetime(..., format="ISO8601") で変換し、表示名はデバイスごとに1回だけ引く。
+  続けてタブごとの列の切り出しと数値列の縮小 (sensor_view) も行う
+の所要時間、全列と気温タブ用の列 (temperature) の配列サイズ、結果が一致するかを表示する。
+
+使い方:
+    python benchmarks/bench_analysis_prepare.py [--rows 10000 100000 1000000] [--devices 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from services import analysis_service
+
+
+def _make_frame(rows: int, devices: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2026-01-10 00:00:00")
+    seconds = np.sort(rng.integers(0, 30 * 86400, rows))[::-1]
+    naive = (base + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%dT%H:%M:%S")
+    # 新しい記録は +09:00 付き、古い記録は naive、一部は UTC (Z)
+    suffix = rng.choice(np.array(["", "+09:00", "Z"], dtype=object), rows, p=[0.3, 0.6, 0.1])
+    ids = rng.integers(0, devices, rows)
+    return pd.DataFrame({
+        "timestamp": np.asarray(naive, dtype=object) + suffix,
+        "device_id": [f"dev{i}" for i in ids],
+        "device_name": [f"センサー{i}" if i % 3 else "" for i in ids],
+        "device_type": np.where(ids % 2 == 0, "Meter", "Nature Remo E Lite"),
+        "temperature_celsius": rng.normal(24, 3, rows).round(1),
+        "humidity_percent": rng.integers(30, 70, rows).astype(float),
+        "power_watts": rng.integers(0, 1500, rows).astype(float),
+        "contact_state": rng.choice(np.array([None, "open", "close"], dtype=object), rows),
+        "movement_state": rng.choice(np.array([None, "detected"], dtype=object), rows),
+    })
+
+
+def _legacy(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["timestamp"] = df["timestamp"].apply(analysis_service._parse_timestamp_to_jst)
+    devices_by_id = analysis_service.device_registry.snapshot().device_by_id
+    id_map = {k: d.get("name", k) for k, d in devices_by_id.items()}
+    loc_map = {k: d.get("location", "その他") for k, d in devices_by_id.items()}
+    latest = df.sort_values("timestamp", ascending=False).drop_duplicates(subset="device_id", keep="first")
+    latest = latest[latest["device_name"].notna() & (latest["device_name"] != "")]
+    id_map.update(latest.set_index("device_id")["device_name"].to_dict())
+    df["friendly_name"] = df["device_id"].map(id_map).fillna(df["device_name"]).fillna(df["device_id"])
+    df["location"] = df["device_id"].map(loc_map).fillna("その他")
+    df["friendly_name"] = df["friendly_name"].replace(analysis_service.FRIENDLY_NAME_FIXES)
+    return df
+
+
+def _vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    return analysis_service.apply_friendly_names(analysis_service.process_dataframe(df))
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="行数")
+    parser.add_argument("--devices", type=int, default=40, help="デバイス数")
+    args = parser.parse_args()
+
+    config.MONITOR_DEVICES = [
+        {"id": f"dev{i}", "name": f"設定名{i}", "location": "伊丹" if i % 2 else "高砂"} for i in range(args.devices)
+    ]
+    print(f"{'rows':>10} {'legacy':>10} {'vectorized':>11} {'speedup':>8} {'views':>8} {'MB':>7} {'MB view':>8} {'equal':>6}")
+    for rows in args.rows:
+        df = _make_frame(rows, args.devices)
+        expected, legacy_sec = _timed(_legacy, df)
+        result, new_sec = _timed(_vectorized, df)
+        views, view_sec = _timed(lambda: {v: analysis_service.sensor_view(result, v) for v in analysis_service.SENSOR_VIEW_COLUMNS})
+        equal = expected.equals(result)
+        # 列の切り出しでは文字列オブジェクト自体は共有されるため、deep=False (配列の大きさ) で比べる
+        full_mb = result.memory_usage().sum() / 2**20
+        view_mb = views["temperature"].memory_usage().sum() / 2**20
+        print(f"{rows:>10} {legacy_sec:>9.3f}s {new_sec:>10.3f}s {legacy_sec / new_sec:>7.1f}x "
+              f"{view_sec:>7.3f}s {full_mb:>7.1f} {view_mb:>8.1f} {str(equal):>6}")
+
+
+if __name__ == "__main__":
+    main()
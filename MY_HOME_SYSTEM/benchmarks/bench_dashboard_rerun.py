@@ -0,0 +1,228 @@
+# MY_HOME_SYSTEM/benchmarks/bench_dashboard_rerun.py
+"""
+ダッシュボード (dashboard.py) の再実行1回あたりの所要時間と SQL 実行数を、タブごとに測るベンチマーク。
+
+一時DBに合成データ (センサー3テーブル x --rows 行、健康記録・車・駐輪場・NAS・AIレポート・ランキング) を入れ、
+streamlit.testing.v1.AppTest で dashboard.py を実行する。SQL は sqlite3.connect を包んで
+各接続に set_trace_callback を付け、PRAGMA / BEGIN / COMMIT を除いた文を数える。
+- legacy loaders: 以前の dashboard.py が再実行のたびに行っていた読み込み (全タブ分) を直接呼んだ場合
+- タブごと: キャッシュを捨てた状態 (cold) と、TTL 内にもう一度再実行した状態 (warm)
+- sensor TTL expired: センサーデータの TTL 切れ後、--new-rows 行が追加された状態での再実行 (差分の読み込み)
+を表示する。運行情報・ルート検索は既定では外部へ問い合わせず固定の応答を返す (--online で実際に取得する)。
+
+使い方:
+    python benchmarks/bench_dashboard_rerun.py [--rows 20000] [--new-rows 50] [--online]
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import pytz
+
+# bare mode (AppTest) の「missing ScriptRunContext」等の警告を抑える
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'dashboard.py'))
+JST = pytz.timezone("Asia/Tokyo")
+
+_statements = [0]
+_original_connect = sqlite3.connect
+
+
+def _trace(sql: str) -> None:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if head not in ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"):
+        _statements[0] += 1
+
+
+def _traced_connect(*args, **kwargs):
+    conn = _original_connect(*args, **kwargs)
+    conn.set_trace_callback(_trace)
+    return conn
+
+
+def _seed(rows: int) -> None:
+    from core.database import get_db_cursor
+
+    now = datetime.now(JST)
+    step = timedelta(days=3) / rows
+
+    def ts(i):
+        # 実運用と同じく、id の順 (追加順) に記録時刻が新しくなるようにする
+        return (now - step * (rows - 1 - i)).isoformat()
+
+    with get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {config.SQLITE_TABLE_SWITCHBOT_LOGS} (device_id, device_name, temperature, humidity, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(f"meter{i % 6}", f"温湿度計{i % 6}", 20 + i % 10 * 0.5, 40 + i % 20, ts(i)) for i in range(rows)],
+        )
+        cur.executemany(
+            f"INSERT INTO {config.SQLITE_TABLE_POWER_USAGE} (device_id, device_name, wattage, timestamp) VALUES (?, ?, ?, ?)",
+            [(f"plug{i % 4}", f"プラグ{i % 4}", i % 1500, ts(i)) for i in range(rows)],
+        )
+        cur.executemany(
+            "INSERT INTO device_records (timestamp, device_id, device_name, device_type, contact_state, power_watts) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(ts(i), f"contact{i % 5}", f"開閉センサー{i % 5}", "Contact Sensor", "open" if i % 2 else "close", None)
+             for i in range(rows)],
+        )
+        for table in (config.SQLITE_TABLE_CHILD, config.SQLITE_TABLE_DEFECATION, config.SQLITE_TABLE_FOOD,
+                      config.SQLITE_TABLE_CAR, "security_logs", config.SQLITE_TABLE_BICYCLE, config.SQLITE_TABLE_NAS,
+                      config.SQLITE_TABLE_AI_REPORT):
+            _seed_generic(cur, table, now)
+        # app_rankings は init_unified_db では作られない (ランキング収集側が作る) ため、ここで用意する
+        cur.execute("CREATE TABLE IF NOT EXISTS app_rankings "
+                    "(id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, ranking_type TEXT, rank INTEGER, title TEXT, app_id TEXT)")
+        cur.executemany(
+            "INSERT INTO app_rankings (date, ranking_type, rank, title, app_id) VALUES (?, ?, ?, ?, ?)",
+            [((now - timedelta(weeks=w)).strftime("%Y-%m-%d"), kind, r, f"アプリ{r}", f"com.example.app{r}")
+             for w in range(3) for kind in ("free", "grossing") for r in range(1, 11)],
+        )
+
+
+def _has_table(cur, table: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cur.fetchone() is not None
+
+
+def _seed_generic(cur, table: str, now: datetime, rows: int = 200) -> None:
+    """テーブルの列定義を見て、NOT NULL の列に適当な値を入れた行を作る"""
+    if not _has_table(cur, table):
+        return
+    cur.execute(f"PRAGMA table_info({table})")
+    columns = [(r[1], r[2].upper(), r[3]) for r in cur.fetchall() if r[1] != "id"]
+    names = [c[0] for c in columns]
+
+    def value(name, col_type, i):
+        if name in ("timestamp", "created_at", "recorded_at", "date") or "TIME" in col_type or "DATE" in col_type:
+            return (now - timedelta(minutes=15 * i)).isoformat()
+        if "INT" in col_type or "REAL" in col_type:
+            return i % 10
+        if name.startswith("status"):
+            return "OK"
+        return f"{name}{i % 7}"
+
+    cur.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+        [tuple(value(n, t, i) for n, t, _ in columns) for i in range(rows)],
+    )
+
+
+def _append_sensor_rows(count: int) -> None:
+    from core.database import get_db_cursor
+    now = datetime.now(JST).isoformat()
+    with get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {config.SQLITE_TABLE_POWER_USAGE} (device_id, device_name, wattage, timestamp) VALUES (?, ?, ?, ?)",
+            [(f"plug{i % 4}", f"プラグ{i % 4}", 100 + i, now) for i in range(count)],
+        )
+
+
+def _offline_train_service() -> None:
+    from services import train_service
+    status = {"status": "🟢 平常運転", "detail": "遅れはありません", "is_delay": False,
+              "is_suspended": False, "is_unavailable": False}
+    train_service.get_jr_traffic_status = lambda: {"宝塚線": dict(status), "神戸線": dict(status)}
+    train_service.get_route_info = lambda from_station="", to_station="": {
+        "summary": "取得失敗", "departure": "", "arrival": "", "duration": "", "cost": "", "transfer": "",
+        "details": [], "url": "",
+    }
+
+
+def _measure(func):
+    _statements[0] = 0
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started, _statements[0]
+
+
+def _legacy_loaders() -> None:
+    """以前の dashboard.py が再実行のたびに (選択タブに関係なく) 行っていた読み込み"""
+    from services import analysis_service, train_service
+    df = analysis_service.load_sensor_data(limit=10000)
+    {v: analysis_service.sensor_view(df, v) for v in analysis_service.SENSOR_VIEW_COLUMNS}
+    for table in (config.SQLITE_TABLE_CHILD, config.SQLITE_TABLE_DEFECATION, config.SQLITE_TABLE_FOOD,
+                  config.SQLITE_TABLE_CAR):
+        analysis_service.load_generic_data(table)
+    analysis_service.apply_friendly_names(analysis_service.load_generic_data("security_logs", limit=100))
+    analysis_service.load_bicycle_data(limit=3000)
+    analysis_service.load_nas_status()
+    analysis_service.load_ai_report()
+    analysis_service.calculate_monthly_cost_cumulative()
+    train_service.get_jr_traffic_status()  # サマリー
+    train_service.get_jr_traffic_status()  # 電車遅延タブ
+    analysis_service.load_yearly_temperature_stats(datetime.now(JST).year)
+    analysis_service.load_nas_status()  # システム管理タブ
+    for date_str in analysis_service.load_ranking_dates(limit=3):
+        for kind in ("free", "grossing"):
+            analysis_service.load_ranking_data(date_str, kind)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="センサーテーブル1つあたりの行数")
+    parser.add_argument("--new-rows", type=int, default=50, help="TTL 切れ前に追加するセンサーデータの行数")
+    parser.add_argument("--online", action="store_true", help="運行情報・ルート検索を実際に取得する")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+    logging.disable(logging.ERROR)
+    warnings.simplefilter("ignore", FutureWarning)
+
+    sqlite3.connect = _traced_connect
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench_dashboard.db")
+        import init_unified_db
+        init_unified_db.init_db()
+        _seed(args.rows)
+        if not args.online:
+            _offline_train_service()
+        from views.dashboard import data
+
+        print(f"sensor rows: {args.rows} x 3 tables")
+        print(f"{'scenario':<30} {'cold ms':>9} {'SQL':>5} {'warm ms':>9} {'SQL':>5}")
+        legacy_sec, legacy_sql = _measure(_legacy_loaders)
+        print(f"{'legacy loaders (all tabs)':<30} {legacy_sec * 1000:>9.1f} {legacy_sql:>5}    (every rerun)")
+
+        # AppTest の button_group は単一選択の segmented_control の値を扱えないため、
+        # 実行ごとに新しい AppTest を作り、選択タブは session_state で渡す (キャッシュはプロセス内で共有される)
+        def rerun(label=None):
+            at = AppTest.from_file(APP_PATH, default_timeout=300)
+            if label is not None:
+                at.session_state["dashboard_tab"] = label
+            at.run()
+            # dashboard.py は例外を捕まえて st.error (システムエラー) と traceback を表示する
+            failed = [e.value for e in at.error if "システムエラー" in e.value] or [e.message for e in at.exception]
+            if failed:
+                sys.exit(f"dashboard.py failed ({label}): {failed[0]}\n{[c.value for c in at.code]}")
+            return at
+
+        options = rerun().button_group(key="dashboard_tab").options
+        # 先頭の絵文字は content_icon に分けて保持されている
+        labels = [f"{o.content_icon} {o.content}" if o.content_icon else o.content for o in options]
+        for label in labels:
+            data.clear()
+            cold_sec, cold_sql = _measure(lambda: rerun(label))
+            warm_sec, warm_sql = _measure(lambda: rerun(label))
+            print(f"{label:<29} {cold_sec * 1000:>9.1f} {cold_sql:>5} {warm_sec * 1000:>9.1f} {warm_sql:>5}")
+
+        _append_sensor_rows(args.new_rows)
+        data.sensor_bundle.clear()
+        expired_sec, expired_sql = _measure(lambda: rerun(labels[0]))
+        print(f"{f'sensor TTL expired (+{args.new_rows})':<30} {expired_sec * 1000:>9.1f} {expired_sql:>5}")
+        print(f"sensor cache: {data._sensor_cache().stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# MY_HOME_SYSTEM/benchmarks/bench_db_pool.py
+"""
+core/database.py の接続プール導入効果を測るマイクロベンチマーク。
+
+従来の「呼び出しごとに sqlite3.connect + PRAGMA を実行する」経路と、
+プール経由の get_db_cursor / execute_read_query の ops/sec を比較する。
+本番DBには触れず、一時ディレクトリに作成したDBで計測する。
+
+使い方:
+    python benchmarks/bench_db_pool.py [--ops 5000]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import core.database as db
+
+
+@contextmanager
+def _legacy_get_db_cursor(commit: bool = False):
+    """プール導入前の get_db_cursor 相当 (比較用)"""
+    conn = sqlite3.connect(config.SQLITE_DB_PATH, timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    try:
+        yield conn.cursor()
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _legacy_execute_read_query(query: str, params: tuple = ()) -> str:
+    conn = sqlite3.connect(f"file:{config.SQLITE_DB_PATH}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return json.dumps([dict(r) for r in rows], ensure_ascii=False, default=str)
+
+
+def _measure(label: str, ops: int, fn) -> float:
+    started = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    rate = ops / elapsed if elapsed else float("inf")
+    print(f"{label:<34} {rate:>12,.0f} ops/sec  ({elapsed:.3f}s)")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=5000, help="各シナリオの実行回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench.db")
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("CREATE TABLE kv (id INTEGER PRIMARY KEY, v TEXT)")
+            cur.executemany("INSERT INTO kv (id, v) VALUES (?, ?)", [(i, f"v{i}") for i in range(1000)])
+        db.reset_connection_pools()
+        db._rw_pool.reset_stats()
+        db._ro_pool.reset_stats()
+
+        def legacy_select(i):
+            with _legacy_get_db_cursor() as cur:
+                cur.execute("SELECT v FROM kv WHERE id = ?", (i % 1000,)).fetchone()
+
+        def pooled_select(i):
+            with db.get_db_cursor() as cur:
+                cur.execute("SELECT v FROM kv WHERE id = ?", (i % 1000,)).fetchone()
+
+        def legacy_write(i):
+            with _legacy_get_db_cursor(commit=True) as cur:
+                cur.execute("UPDATE kv SET v = ? WHERE id = ?", (f"w{i}", i % 1000))
+
+        def pooled_write(i):
+            with db.get_db_cursor(commit=True) as cur:
+                cur.execute("UPDATE kv SET v = ? WHERE id = ?", (f"w{i}", i % 1000))
+
+        def legacy_read_query(i):
+            _legacy_execute_read_query("SELECT v FROM kv WHERE id = ?", (i % 1000,))
+
+        def pooled_read_query(i):
+            db.execute_read_query("SELECT v FROM kv WHERE id = ?", (i % 1000,))
+
+        print(f"SQLite {sqlite3.sqlite_version} / ops={args.ops}")
+        results = [
+            ("get_db_cursor SELECT", _measure("legacy  get_db_cursor SELECT", args.ops, legacy_select),
+             _measure("pooled  get_db_cursor SELECT", args.ops, pooled_select)),
+            ("get_db_cursor UPDATE+commit", _measure("legacy  get_db_cursor UPDATE+commit", args.ops, legacy_write),
+             _measure("pooled  get_db_cursor UPDATE+commit", args.ops, pooled_write)),
+            ("execute_read_query", _measure("legacy  execute_read_query", args.ops, legacy_read_query),
+             _measure("pooled  execute_read_query", args.ops, pooled_read_query)),
+        ]
+
+        print()
+        for name, legacy, pooled in results:
+            print(f"{name:<30} speedup x{pooled / legacy:.1f}")
+        print()
+        print("pool stats:", json.dumps(db.get_pool_stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# MY_HOME_SYSTEM/benchmarks/bench_ingest_queue.py
+"""
+core/ingest_queue.py (書き込みバッファ) の導入効果を測るマイクロベンチマーク。
+
+従来の「1行ごとに save_log_generic (INSERT + COMMIT)」と、
+IngestQueue へ投入して executemany でまとめて書き込む経路の rows/sec を比較する。
+本番DBには触れず、一時ディレクトリに作成したDBで計測する。
+
+使い方:
+    python benchmarks/bench_ingest_queue.py [--rows 20000] [--batch 200]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import core.database as db
+from core.ingest_queue import IngestQueue
+
+COLUMNS = ["device_id", "device_name", "temperature", "humidity", "timestamp"]
+
+
+def _row(i):
+    return (f"dev{i % 8}", "温湿度計", 20.0 + (i % 100) / 10, 50.0, f"2026-01-01T00:00:{i % 60:02d}")
+
+
+def _measure(label: str, rows: int, fn) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else float("inf")
+    print(f"{label:<34} {rate:>12,.0f} rows/sec  ({elapsed:.3f}s)")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="書き込む行数")
+    parser.add_argument("--batch", type=int, default=200, help="IngestQueue のバッチ行数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench.db")
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute(
+                "CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id TEXT, device_name TEXT,"
+                " temperature REAL, humidity REAL, timestamp TEXT)"
+            )
+
+        def per_row():
+            for i in range(args.rows):
+                db.save_log_generic("logs", COLUMNS, _row(i))
+
+        queue = IngestQueue(batch_rows=args.batch, flush_interval_sec=0.5, max_pending_rows=args.batch * 50)
+
+        def queued():
+            for i in range(args.rows):
+                queue.enqueue("logs", COLUMNS, _row(i))
+            queue.shutdown()
+
+        print(f"SQLite {sqlite3.sqlite_version} / rows={args.rows} / batch={args.batch}")
+        legacy = _measure("per-row save_log_generic", args.rows, per_row)
+        batched = _measure("IngestQueue enqueue + flush", args.rows, queued)
+
+        with db.get_db_cursor() as cur:
+            total = cur.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        print()
+        print(f"speedup x{batched / legacy:.1f}  (rows in table: {total})")
+        print("queue stats:", json.dumps(queue.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# MY_HOME_SYSTEM/benchmarks/bench_line_webhook.py
+"""
+LINE Webhook イベント処理 (handlers/line_handler.py) の経路を比較するマイクロベンチマーク。
+
+署名付きの合成イベントを --events 件 (--users 人に均等) 同時に受信したとして、
+全件の処理が終わるまでの events/sec と、Webhook へ 200 を返すまでの平均時間を比較する。
+
+- 従来: リクエストごとに asyncio.to_thread(WebhookHandler.handle) し、スレッド内で
+  イベントごとに asyncio.run() で新しいイベントループを作って処理する。
+- 現在: リクエスト内で署名検証・パースし、KeyedDispatcher でユーザーごとのキューへ積んで即応答。
+  処理はサーバーのイベントループ上で、同じユーザーは順番に、異なるユーザーは並行に行う。
+
+イベント1件の処理は --work-ms ミリ秒の待ち (返信 API 等の I/O 相当) で模擬し、
+プロフィール取得も --profile-ms ミリ秒の待ちで模擬する (どちらもキャッシュ付き)。
+LINE API・DB には触れない。
+
+使い方:
+    python benchmarks/bench_line_webhook.py [--events 500] [--users 10] [--work-ms 20]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from linebot.v3 import WebhookHandler
+from linebot.v3.webhooks import MessageEvent, TextMessageContent
+
+from core.async_cache import AsyncTTLCache
+from core.keyed_dispatcher import KeyedDispatcher
+
+SECRET = "bench-channel-secret"
+
+
+def _requests(events: int, users: int):
+    """(body, signature) のリスト。1リクエスト1イベント"""
+    out = []
+    for i in range(events):
+        body = json.dumps({"destination": "Ubot", "events": [{
+            "type": "message", "mode": "active", "timestamp": 1_700_000_000_000 + i,
+            "source": {"type": "user", "userId": f"U{i % users:03d}"},
+            "webhookEventId": f"EV{i:06d}", "deliveryContext": {"isRedelivery": False},
+            "replyToken": f"tok{i}",
+            "message": {"id": str(i), "type": "text", "quoteToken": f"q{i}", "text": f"msg-{i}"},
+        }]})
+        digest = hmac.new(SECRET.encode(), body.encode(), hashlib.sha256).digest()
+        out.append((body, base64.b64encode(digest).decode()))
+    return out
+
+
+async def run_legacy(reqs, work_sec: float, profile_sec: float):
+    handler = WebhookHandler(SECRET)
+    profile_cache = {}
+    done = []
+
+    def get_display_name(user_id):
+        if user_id not in profile_cache:
+            time.sleep(profile_sec)
+            profile_cache[user_id] = "名前"
+        return profile_cache[user_id]
+
+    async def process(user_id, text):
+        await asyncio.sleep(work_sec)
+        done.append((user_id, text))
+
+    @handler.add(MessageEvent, message=TextMessageContent)
+    def handle_message(event):
+        get_display_name(event.source.user_id)
+        asyncio.run(process(event.source.user_id, event.message.text))
+
+    async def callback(body, sig):
+        started = time.perf_counter()
+        await asyncio.to_thread(handler.handle, body, sig)
+        return time.perf_counter() - started
+
+    acks = await asyncio.gather(*(callback(b, s) for b, s in reqs))
+    return done, acks
+
+
+async def run_dispatcher(reqs, work_sec: float, profile_sec: float):
+    parser = WebhookHandler(SECRET).parser
+    done = []
+
+    async def fetch_name(user_id):
+        await asyncio.to_thread(time.sleep, profile_sec)
+        return "名前"
+
+    profile_cache = AsyncTTLCache(fetch_name, ttl_sec=3600)
+
+    async def handle(event):
+        await profile_cache.get(event.source.user_id)
+        await asyncio.sleep(work_sec)
+        done.append((event.source.user_id, event.message.text))
+
+    dispatcher = KeyedDispatcher(handle, max_pending=len(reqs))
+
+    async def callback(body, sig):
+        started = time.perf_counter()
+        for event in parser.parse(body, sig):
+            dispatcher.submit(event.source.user_id, event)
+        return time.perf_counter() - started
+
+    acks = await asyncio.gather(*(callback(b, s) for b, s in reqs))
+    await dispatcher.join()
+    await dispatcher.shutdown()
+    return done, acks
+
+
+def _in_user_order(done, users: int) -> bool:
+    for n in range(users):
+        seq = [int(text.split("-")[1]) for uid, text in done if uid == f"U{n:03d}"]
+        if seq != sorted(seq):
+            return False
+    return True
+
+
+def _measure(label: str, runner, reqs, args) -> float:
+    started = time.perf_counter()
+    done, acks = asyncio.run(runner(reqs, args.work_ms / 1000, args.profile_ms / 1000))
+    elapsed = time.perf_counter() - started
+    rate = len(done) / elapsed if elapsed else float("inf")
+    ack_ms = sum(acks) / len(acks) * 1000
+    ordered = "順序OK" if _in_user_order(done, args.users) else "順序崩れ"
+    print(f"{label:<26} {rate:>10,.0f} events/sec  ({elapsed:.3f}s, 応答まで平均 {ack_ms:8.2f}ms, {ordered})")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500, help="合成イベント数")
+    parser.add_argument("--users", type=int, default=10, help="送信元ユーザー数")
+    parser.add_argument("--work-ms", type=float, default=20.0, help="イベント1件の処理で待つミリ秒")
+    parser.add_argument("--profile-ms", type=float, default=50.0, help="プロフィール取得で待つミリ秒")
+    args = parser.parse_args()
+
+    reqs = _requests(args.events, args.users)
+    print(f"{args.events} events / {args.users} users / work {args.work_ms}ms / profile {args.profile_ms}ms")
+    legacy = _measure("従来 (to_thread+asyncio.run)", run_legacy, reqs, args)
+    current = _measure("現在 (KeyedDispatcher)", run_dispatcher, reqs, args)
+    print(f"速度比: x{current / legacy:.1f}")
+
+
+if __name__ == "__main__":
+    main()
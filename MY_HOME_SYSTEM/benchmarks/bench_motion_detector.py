@@ -0,0 +1,120 @@
+# MY_HOME_SYSTEM/benchmarks/bench_motion_detector.py
+"""
+動き検知 (monitors/smart_timelapse_generator.py の MotionDetector) を、従来の1スレッド逐次処理と
+パイプライン版 (読み込みスレッド + 静止フレームの MOG2 省略 + ファイル単位のプロセス並列) で比較するベンチマーク。
+
+`ffmpeg -f lavfi` で、ノイズの乗った静止背景に時々白い四角が横切る合成録画 (既定: 10分 x 4本) を作り、
+- 従来方式: ffmpeg のパイプから1フレームずつ読み、全フレームに MOG2 をかける (前のファイルの背景モデルを引き継ぐ)
+- パイプライン (逐次): 1プロセスで detect を順に呼ぶ
+- パイプライン (並列): detect_many で複数プロセスに分ける (2本目以降は直前ファイルの末尾で暖機)
+の解析フレーム数/秒と、従来方式に対する動き記録数・イベント数の差を表示する。ffmpeg が必要。
+
+使い方:
+    python benchmarks/bench_motion_detector.py [--clips 4] [--clip-sec 600] [--fps 1] [--workers 0]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from monitors import smart_timelapse_generator as stg
+from monitors.smart_timelapse_generator import EventBuilder, MotionDetector, MotionRecord
+
+
+def _make_clip(path: str, seconds: int, seed: int) -> None:
+    # 60秒ごとに 15秒間、四角が横切る。背景には時間的なノイズを乗せる
+    graph = (f"color=c=gray:s=640x360:r=15,noise=alls=6:allf=t:all_seed={seed}[bg];"
+             "color=c=white:s=60x60:r=15[box];"
+             f"[bg][box]overlay=x='mod(t*{40 + seed * 5},580)':y=150:enable='between(mod(t+{seed * 7},60),20,35)'")
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", graph, "-t", str(seconds),
+                    "-c:v", "libx264", "-preset", "ultrafast", path], check=True)
+
+
+def _legacy_detect(detector: MotionDetector, input_path: str) -> list:
+    """パイプライン化前の MotionDetector.detect の解析ループ"""
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin', '-i', input_path,
+           '-vf', f'fps={stg.FPS_ANALYZE},scale={stg.WIDTH}:{stg.HEIGHT}',
+           '-f', 'image2pipe', '-pix_fmt', 'gray', '-vcodec', 'rawvideo', '-']
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    records, current_sec, frame_size = [], 0, stg.WIDTH * stg.HEIGHT
+    while True:
+        raw_frame = process.stdout.read(frame_size)
+        if len(raw_frame) != frame_size:
+            break
+        frame = np.frombuffer(raw_frame, dtype=np.uint8).reshape((stg.HEIGHT, stg.WIDTH))
+        roi_frame = frame[stg.ROI_Y:stg.ROI_Y + stg.ROI_H, stg.ROI_X:stg.ROI_X + stg.ROI_W]
+        fgmask = detector.fgbg.apply(roi_frame)
+        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, detector.kernel)
+        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_CLOSE, detector.kernel)
+        contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contours:
+            largest_area = cv2.contourArea(max(contours, key=cv2.contourArea))
+            if largest_area > stg.MIN_AREA_THRESHOLD:
+                records.append(MotionRecord(current_sec, largest_area, len(contours)))
+        current_sec += 1
+    process.stdout.close()
+    process.wait()
+    return records
+
+
+def _events(records: list, work_dir: str) -> int:
+    return len(EventBuilder().build(list(records), work_dir))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=4, help="合成録画の本数")
+    parser.add_argument("--clip-sec", type=int, default=600, help="1本の長さ (秒)")
+    parser.add_argument("--fps", type=int, default=1, help="解析フレームレート (TIMELAPSE_FPS_ANALYZE)")
+    parser.add_argument("--workers", type=int, default=0, help="並列プロセス数 (0: CPU コア数と負荷から決める)")
+    args = parser.parse_args()
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is not installed")
+    stg.FPS_ANALYZE = args.fps
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        clips = []
+        for i in range(args.clips):
+            path = os.path.join(tmp, f"20260110_{9 + i:02d}0000.mp4")
+            _make_clip(path, args.clip_sec, i)
+            clips.append((path, float(args.clip_sec)))
+        print(f"synthetic clips: {args.clips} x {args.clip_sec}s ({time.perf_counter() - started:.1f}s to create)")
+        frames = args.clips * args.clip_sec * args.fps
+
+        started = time.perf_counter()
+        legacy_detector = MotionDetector()
+        legacy = [_legacy_detect(legacy_detector, path) for path, _ in clips]
+        legacy_sec = time.perf_counter() - started
+
+        started = time.perf_counter()
+        detector = MotionDetector()
+        sequential = detector.detect_many(clips, tmp, workers=1)
+        sequential_sec = time.perf_counter() - started
+
+        started = time.perf_counter()
+        parallel = MotionDetector().detect_many(clips, tmp, workers=args.workers or None)
+        parallel_sec = time.perf_counter() - started
+
+        print(f"static frames skipped (sequential run): {detector.stats['skipped']} / {detector.stats['frames']}")
+        print()
+        print(f"{'mode':<24} {'wall':>8} {'frames/s':>9} {'records':>8} {'events':>7} {'event diff':>11}")
+        legacy_events = [_events(r, tmp) for r in legacy]
+        for label, results, sec in (("legacy (1 thread)", legacy, legacy_sec),
+                                    ("pipeline sequential", sequential, sequential_sec),
+                                    ("pipeline parallel", parallel, parallel_sec)):
+            events = [_events(r, tmp) for r in results]
+            diff = sum(abs(a - b) for a, b in zip(events, legacy_events))
+            print(f"{label:<24} {sec:>7.2f}s {frames / sec:>9.1f} {sum(map(len, results)):>8} {sum(events):>7} {diff:>11}")
+
+
+if __name__ == "__main__":
+    main()
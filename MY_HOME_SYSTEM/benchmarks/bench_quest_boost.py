@@ -0,0 +1,174 @@
+# MY_HOME_SYSTEM/benchmarks/bench_quest_boost.py
+"""
+クエストのブースト算出・完了状況判定を一括集計 (fetch_completion_stats) に
+置き換えた効果を測るベンチマーク。
+
+既定では 50クエスト × 5ユーザー × 10,000件の履歴を一時DBに投入し、
+- 従来の「クエスト×ユーザーごとに直近履歴を1件ずつ問い合わせる」ブースト算出
+- 従来の「クエストごとに1ヶ月分の履歴全体を走査する」完了判定
+と、集計クエリ1回 + dict参照による新方式の所要時間を比較する。
+(user_id, quest_id, completed_at, status) インデックスの有無による差も併せて表示する。
+
+使い方:
+    python benchmarks/bench_quest_boost.py [--quests 50] [--users 5] [--history 10000] [--repeat 20]
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+INDEX_NAME = "idx_quest_history_user_quest_completed"
+
+
+def _seed(quests: int, users: int, history: int) -> None:
+    import common
+    rng = random.Random(0)
+    now = datetime.datetime.now()
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            "INSERT INTO quest_users (user_id, name, job_class, level, exp, gold, role) VALUES (?, ?, 'Warrior', 1, 0, 0, 'role_adult')",
+            [(f"u{i}", f"User{i}") for i in range(users)],
+        )
+        cur.executemany(
+            "INSERT INTO quest_master (quest_id, title, quest_type, target_user, exp_gain, gold_gain, reset_period) "
+            "VALUES (?, ?, ?, ?, 10, 5, ?)",
+            [
+                (1000 + i, f"Quest{i}", "infinite" if i % 10 == 0 else "daily",
+                 f"u{i % users}" if i % 2 else "all", "weekly" if i % 5 == 0 else "daily")
+                for i in range(quests)
+            ],
+        )
+        cur.executemany(
+            "INSERT INTO quest_history (user_id, quest_id, quest_title, exp_earned, gold_earned, completed_at, status) "
+            "VALUES (?, ?, 't', 10, 5, ?, 'approved')",
+            [
+                (f"u{rng.randrange(users)}", 1000 + rng.randrange(quests),
+                 (now - datetime.timedelta(minutes=rng.randrange(60 * 24 * 90))).isoformat(timespec="seconds"))
+                for _ in range(history)
+            ],
+        )
+
+
+def _legacy_boost_all(cur, service, quests, users) -> None:
+    """ブースト算出の従来実装相当: (ユーザー, クエスト) ごとに直近履歴を問い合わせる"""
+    for q in quests:
+        if q['quest_type'] != 'daily' or q['day_of_week']:
+            continue
+        for u in users:
+            row = cur.execute(
+                "SELECT completed_at FROM quest_history WHERE user_id = ? AND quest_id = ? AND status = 'approved' "
+                "ORDER BY completed_at DESC LIMIT 1",
+                (u, q['quest_id']),
+            ).fetchone()
+            if row:
+                datetime.datetime.fromisoformat(row['completed_at']).date()
+
+
+def _legacy_completed(cur, service, quests) -> list:
+    """完了判定の従来実装相当: クエストごとに1ヶ月分の履歴全体を走査し、毎回ISO文字列を解釈する"""
+    one_month_ago = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
+    recent = [dict(r) for r in cur.execute(
+        "SELECT * FROM quest_history WHERE status='approved' AND completed_at >= ? ORDER BY completed_at DESC",
+        (one_month_ago,),
+    )]
+    valid = []
+    for q in quests:
+        reset_period = q['reset_period'] or 'daily'
+        seen = set()
+        for c in recent:
+            if c['quest_id'] != q['quest_id']:
+                continue
+            if q['quest_type'] == 'infinite':
+                if service.is_within_reset_period(c['completed_at'], reset_period):
+                    valid.append(c)
+            elif c['user_id'] not in seen:
+                if service.is_within_reset_period(c['completed_at'], reset_period):
+                    valid.append(c)
+                seen.add(c['user_id'])
+    return valid
+
+
+def _set_based(cur, service, quests, users) -> list:
+    """GameSystem._build_view_data と同じ手順: 集計クエリ1回 + dict参照"""
+    from services.quest_service import JST, fetch_completion_stats
+    today = datetime.datetime.now(JST).date()
+    since = (today - datetime.timedelta(days=today.weekday() + 1)).strftime("%Y-%m-%d")
+    stats = fetch_completion_stats(cur, since=since)
+    stats_by_quest = {}
+    for (_, q_id), stat in stats.items():
+        stats_by_quest.setdefault(q_id, []).append(stat)
+
+    valid = []
+    for q in quests:
+        for u in users:
+            service.calculate_quest_boost(cur, u, q, stats=stats)
+        reset_period = q['reset_period'] or 'daily'
+        for stat in stats_by_quest.get(q['quest_id'], []):
+            if q['quest_type'] == 'infinite':
+                valid.extend(c for c in stat['recent'] if service.is_within_reset_period(c['completed_at'], reset_period, today))
+            elif stat['recent'] and service.is_within_reset_period(stat['last_date'], reset_period, today):
+                valid.append(stat['recent'][0])
+    return valid
+
+
+def _measure(label: str, repeat: int, fn) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    median = statistics.median(samples)
+    print(f"{label:<40} median={median:9.2f}ms  min={min(samples):9.2f}ms")
+    return median
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quests", type=int, default=50, help="クエスト数")
+    parser.add_argument("--users", type=int, default=5, help="ユーザー数")
+    parser.add_argument("--history", type=int, default=10000, help="履歴件数")
+    parser.add_argument("--repeat", type=int, default=20, help="各シナリオの繰り返し回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench.db")
+
+        import common
+        import init_unified_db
+        from services.quest_service import GameSystem, QuestService
+
+        init_unified_db.init_db()
+        _seed(args.quests, args.users, args.history)
+        service = QuestService()
+        game_system = GameSystem()
+
+        with common.get_db_cursor() as cur:
+            quests = [dict(r) for r in cur.execute("SELECT * FROM quest_master")]
+            users = [r['user_id'] for r in cur.execute("SELECT user_id FROM quest_users")]
+
+            print(f"quests={args.quests} users={args.users} history={args.history} repeat={args.repeat}")
+            legacy = _measure("legacy  per-quest boost + history scan", args.repeat,
+                              lambda: (_legacy_boost_all(cur, service, quests, users), _legacy_completed(cur, service, quests)))
+            new = _measure("set-based completion stats", args.repeat, lambda: _set_based(cur, service, quests, users))
+
+        view = _measure("GameSystem._build_view_data", args.repeat, game_system._build_view_data)
+
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        view_no_index = _measure("GameSystem._build_view_data (no index)", args.repeat, game_system._build_view_data)
+
+        print()
+        print(f"completion/boost speedup   x{legacy / new:.1f}")
+        print(f"index effect on view build x{view_no_index / view:.2f}")
+
+
+if __name__ == "__main__":
+    main()
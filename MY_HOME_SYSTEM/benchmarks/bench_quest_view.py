@@ -0,0 +1,129 @@
+# MY_HOME_SYSTEM/benchmarks/bench_quest_view.py
+"""
+/api/quest/data の表示データキャッシュ導入効果を測る負荷テスト。
+
+複数スレッドから同時にポーリングした際のレイテンシ (p50/p99) を、
+キャッシュ無効 (QUEST_VIEW_CACHE_TTL_SEC=0)・キャッシュ有効・
+If-None-Match による 304 応答の3パターンで比較する。
+本番DBには触れず、一時ディレクトリに作成したDBに履歴を投入して計測する。
+
+使い方:
+    python benchmarks/bench_quest_view.py [--clients 8] [--requests 200] [--history 5000]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+
+def _seed_history(rows: int) -> None:
+    import common
+    now = datetime.now()
+    with common.get_db_cursor() as cur:
+        quests = [r["quest_id"] for r in cur.execute("SELECT quest_id FROM quest_master").fetchall()]
+        users = [r["user_id"] for r in cur.execute("SELECT user_id FROM quest_users").fetchall()]
+    if not quests or not users:
+        return
+    rng = random.Random(0)
+    history = []
+    for i in range(rows):
+        ts = (now - timedelta(minutes=rows - i)).strftime("%Y-%m-%d %H:%M:%S")
+        history.append((rng.choice(users), rng.choice(quests), "bench", 10, 5, ts, "approved"))
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            "INSERT INTO quest_history (user_id, quest_id, quest_title, exp_earned, gold_earned, completed_at, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            history,
+        )
+
+
+def _run(label: str, client, clients: int, requests: int, headers=None) -> dict:
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        local_status = {}
+        for _ in range(requests):
+            started = time.perf_counter()
+            res = client.get("/api/quest/data", headers=headers or {})
+            local.append((time.perf_counter() - started) * 1000)
+            local_status[res.status_code] = local_status.get(res.status_code, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for code, n in local_status.items():
+                statuses[code] = statuses.get(code, 0) + n
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    rps = len(latencies) / elapsed if elapsed else float("inf")
+    print(f"{label:<22} p50={p50:8.2f}ms  p99={p99:8.2f}ms  {rps:>9,.0f} req/sec  status={statuses}")
+    return {"p50": p50, "p99": p99, "rps": rps}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="同時ポーリングするクライアント数")
+    parser.add_argument("--requests", type=int, default=200, help="クライアントあたりのリクエスト数")
+    parser.add_argument("--history", type=int, default=5000, help="投入するクエスト履歴の件数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench.db")
+
+        import init_unified_db
+        init_unified_db.init_db()
+
+        from starlette.testclient import TestClient
+        import unified_server
+        from services import quest_service as quest_service_module
+
+        quest_service_module.game_system.sync_master_data()
+        _seed_history(args.history)
+
+        # リクエストごとの httpx アクセスログを抑止する
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        logging.getLogger("httpx2").setLevel(logging.WARNING)
+        client = TestClient(unified_server.app)
+        print(f"clients={args.clients} requests/client={args.requests} history={args.history}")
+
+        original_ttl = config.QUEST_VIEW_CACHE_TTL_SEC
+        config.QUEST_VIEW_CACHE_TTL_SEC = 0
+        uncached = _run("uncached (TTL=0)", client, args.clients, args.requests)
+
+        config.QUEST_VIEW_CACHE_TTL_SEC = original_ttl or 30
+        quest_service_module.invalidate_view_cache()
+        cached = _run("cached", client, args.clients, args.requests)
+
+        etag = client.get("/api/quest/data").headers["etag"]
+        not_modified = _run("cached + 304", client, args.clients, args.requests, headers={"If-None-Match": etag})
+
+        print()
+        print(f"p50 speedup (cached)       x{uncached['p50'] / cached['p50']:.1f}")
+        print(f"p50 speedup (cached + 304) x{uncached['p50'] / not_modified['p50']:.1f}")
+        print("cache stats:", json.dumps(quest_service_module._view_cache.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
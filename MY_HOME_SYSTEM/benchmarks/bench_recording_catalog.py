@@ -0,0 +1,126 @@
+# MY_HOME_SYSTEM/benchmarks/bench_recording_catalog.py
+"""
+NVR録画の検索を、従来のディレクトリ走査と録画カタログ (services/recording_catalog.py) で比較するベンチマーク。
+
+一時ディレクトリに 10分ごとの空の mp4 (既定: 5万件、カメラ3台に分配) を作り、
+- 最新の録画: `**/*.mp4` の再帰glob + mtime ソート (旧 camera_monitor) / catalog.newest
+- イベント時刻の録画: 日付glob + 線形探索 (旧 timelapse_generator) / catalog.clip_at
+- 1日分の一覧: 日付glob (旧 camera_service・daily_timelapse_job) / catalog.clips_on
+の1回あたりの所要時間と、カタログの初回走査・差分走査 (変更なし) の時間を表示する。
+ローカルディスク上の計測のため、stat が遅い NAS 上では差がさらに大きくなる。
+
+使い方:
+    python benchmarks/bench_recording_catalog.py [--files 50000] [--cameras 3] [--queries 200]
+"""
+import argparse
+import datetime
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import init_unified_db
+from services.recording_catalog import RecordingCatalog
+
+
+def _make_tree(root: str, files: int, cameras: int, end: datetime.datetime) -> list:
+    names = [f"cam{i}" for i in range(cameras)]
+    per_camera = files // cameras
+    for name in names:
+        folder = os.path.join(root, name)
+        os.makedirs(folder)
+        for i in range(per_camera):
+            start = end - datetime.timedelta(minutes=10 * (per_camera - i))
+            path = os.path.join(folder, f"{start:%Y%m%d_%H%M%S}.mp4")
+            open(path, "wb").close()
+            mtime = (start + datetime.timedelta(minutes=10)).timestamp()
+            os.utime(path, (mtime, mtime))
+    return names
+
+
+def _legacy_newest(root: str, camera: str) -> str:
+    files = sorted(glob.glob(os.path.join(root, camera, "**", "*.mp4"), recursive=True), key=os.path.getmtime, reverse=True)
+    return files[0]
+
+
+def _legacy_clip_at(root: str, camera: str, moment: datetime.datetime) -> str:
+    found = sorted(glob.glob(os.path.join(root, camera, f"{moment:%Y%m%d}_*.mp4")))
+    src = None
+    for f in found:
+        if datetime.datetime.strptime(os.path.basename(f).split(".")[0], "%Y%m%d_%H%M%S") <= moment:
+            src = f
+        else:
+            break
+    return src
+
+
+def _legacy_day(root: str, camera: str, day: datetime.date) -> list:
+    return sorted(glob.glob(os.path.join(root, camera, f"{day:%Y%m%d}_*.mp4")))
+
+
+def _per_call(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50000, help="合成する録画ファイル数")
+    parser.add_argument("--cameras", type=int, default=3, help="カメラ (フォルダ) 数")
+    parser.add_argument("--queries", type=int, default=200, help="イベント時刻の検索回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.SQLITE_DB_PATH = os.path.join(tmp, "bench.db")
+        init_unified_db.init_db()
+        root = os.path.join(tmp, "nvr")
+        end = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        started = time.perf_counter()
+        cameras = _make_tree(root, args.files, args.cameras, end)
+        print(f"synthetic tree: {args.files} files / {args.cameras} cameras ({time.perf_counter() - started:.1f}s to create)")
+
+        catalog = RecordingCatalog(root=lambda: root)
+        started = time.perf_counter()
+        for camera in cameras:
+            catalog.reconcile(camera)
+        initial_scan = time.perf_counter() - started
+        started = time.perf_counter()
+        for camera in cameras:
+            catalog.reconcile(camera)
+        rescan = time.perf_counter() - started
+
+        camera = cameras[0]
+        span_min = 10 * (args.files // args.cameras)
+        rng = random.Random(0)
+        moments = [end - datetime.timedelta(minutes=rng.randrange(span_min)) for _ in range(args.queries)]
+        day = moments[0].date()
+
+        rows = [
+            ("newest clip", lambda: _legacy_newest(root, camera), lambda: catalog.newest(camera, max_age=3600), 3),
+            ("clip at event time", lambda: _legacy_clip_at(root, camera, rng.choice(moments)),
+             lambda: catalog.clip_at(camera, rng.choice(moments), max_age=3600), args.queries),
+            ("clips of one day", lambda: _legacy_day(root, camera, day),
+             lambda: catalog.clips_on(camera, day, max_age=3600), 20),
+        ]
+        assert catalog.newest(camera, max_age=3600).path == _legacy_newest(root, camera)
+
+        print()
+        print(f"{'query':<22} {'directory scan':>15} {'catalog':>11} {'speedup':>9}")
+        for label, legacy, indexed, repeat in rows:
+            legacy_sec = _per_call(legacy, repeat)
+            indexed_sec = _per_call(indexed, repeat)
+            print(f"{label:<22} {legacy_sec * 1000:>13.2f}ms {indexed_sec * 1000:>9.3f}ms {legacy_sec / indexed_sec:>8.0f}x")
+        print()
+        print(f"catalog initial scan: {initial_scan:.2f}s / rescan without changes: {rescan:.3f}s "
+              f"(files stat'd in total: {catalog.stats['stats']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# MY_HOME_SYSTEM/benchmarks/bench_scheduler_startup.py
+"""
+scheduler_boot.py の常駐モード (inprocess / worker) 導入で削減される
+1日あたりのCPU時間を見積もるベンチマーク。
+
+subprocess モードでは実行のたびに「Python起動 + 監視モジュールのimport」が発生する。
+各タスクのエントリモジュールをimportするだけの子プロセスを起動し、その子プロセスの
+CPU時間 (user + sys) を計測して、1日の実行回数 (86400 / 実行間隔) を掛けたものを
+削減量として表示する。監視処理そのもの (API呼び出し・DB書き込み) はどちらのモードでも
+同じため計測対象に含めない。外部APIやDBには触れない。
+
+使い方:
+    python benchmarks/bench_scheduler_startup.py [--repeat 5]
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scheduler_boot
+
+
+def _child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _measure_import(module_name: str, repeat: int) -> tuple:
+    """モジュールをimportするだけの子プロセスの (CPU秒, 経過秒) の中央値を返す"""
+    code = (
+        "import sys, importlib; "
+        f"sys.path.insert(0, {scheduler_boot.PROJECT_ROOT!r}); "
+        f"importlib.import_module({module_name!r})"
+    )
+    env = os.environ.copy()
+    env["PYTHONPATH"] = scheduler_boot.PROJECT_ROOT
+    cpu_samples, wall_samples = [], []
+    for _ in range(repeat):
+        cpu_before = _child_cpu()
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, check=False)
+        wall_samples.append(time.perf_counter() - started)
+        cpu_samples.append(_child_cpu() - cpu_before)
+    return statistics.median(cpu_samples), statistics.median(wall_samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="各タスクの計測回数")
+    args = parser.parse_args()
+
+    print(f"{'task':<26} {'interval':>8} {'runs/day':>9} {'cpu/run':>9} {'wall/run':>9} {'cpu-sec/day':>12}")
+    total = 0.0
+    for task in scheduler_boot.TASKS:
+        module_name = task.entry.partition(":")[0]
+        cpu, wall = _measure_import(module_name, args.repeat)
+        runs_per_day = 86400 / task.interval
+        per_day = cpu * runs_per_day
+        total += per_day
+        print(f"{task.name:<26} {task.interval:>7.0f}s {runs_per_day:>9.0f} {cpu:>8.2f}s {wall:>8.2f}s {per_day:>11.0f}s")
+
+    print()
+    print(f"estimated CPU-seconds saved per day: {total:,.0f}s ({total / 60:.1f} min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# MY_HOME_SYSTEM/benchmarks/bench_snapshot_latency.py
+"""
+動体検知の通知から画像が手元に揃うまでの遅延を、旧方式とスナップショットサービス
+(services/snapshot_service.py) で比較するベンチマーク。
+
+`ffmpeg -f lavfi -i testsrc` で合成録画 (既定: 1280x720 15fps 10分) を NVR フォルダ構成で作り、
+- 旧方式: 通知ごとに最新の録画を `ffmpeg -sseof -1` で /tmp へ切り出して読み込む (extract_from_recording)
+- ライブ: ライブ配信の ffmpeg が上書きし続ける latest.jpg を読み込む (更新時刻が変わるたびに1回)
+- メモリ: 鮮度内の画像を SnapshotService のメモリから返す
+- HTTP: camera_monitor と同じく /api/cameras/{id}/snapshot.jpg を TestClient 経由で取得する (メモリ命中)
+の1回あたりの遅延 (中央値 / p95 / 最大) を表示する。ffmpeg が必要。
+
+使い方:
+    python benchmarks/bench_snapshot_latency.py [--notifications 20] [--source-sec 600]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from services import snapshot_service
+from services.snapshot_service import SnapshotService
+
+
+def _make_source(path: str, seconds: int) -> None:
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=15",
+                    "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-g", "30", path],
+                   check=True)
+
+
+def _report(label: str, samples) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label:<22} {statistics.median(ms):>10.2f} {p95:>10.2f} {ms[-1]:>10.2f} {len(ms):>6}")
+
+
+def _time(func, n: int):
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        assert func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notifications", type=int, default=20, help="通知の回数")
+    parser.add_argument("--source-sec", type=int, default=600, help="合成録画の長さ (秒)")
+    args = parser.parse_args()
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "nvr", "bench")
+        os.makedirs(folder)
+        started = time.perf_counter()
+        _make_source(os.path.join(folder, "20260110_090000.mp4"), args.source_sec)
+        print(f"synthetic recording: {args.source_sec}s 1280x720 ({time.perf_counter() - started:.1f}s to create)")
+        config.NVR_RECORD_DIR = os.path.join(tmp, "nvr")
+        cam = {"id": "bench", "name": "bench", "nas_folder": "bench"}
+
+        live_path = os.path.join(tmp, "live", "bench", snapshot_service.LIVE_SNAPSHOT_NAME)
+        os.makedirs(os.path.dirname(live_path))
+        with open(live_path, "wb") as f:
+            f.write(snapshot_service.extract_from_recording(cam))
+
+        def read_live():
+            # 通知ごとにライブ配信の ffmpeg が新しいフレームを書いた状態を再現する
+            os.utime(live_path)
+            service.forget(cam["id"])
+            return service.get(cam, fallback=False)
+
+        service = SnapshotService(live_path=lambda cam_id: live_path)
+        print()
+        print(f"{'path':<22} {'median ms':>10} {'p95 ms':>10} {'max ms':>10} {'count':>6}")
+        _report("recording (legacy)", _time(lambda: snapshot_service.extract_from_recording(cam), args.notifications))
+        _report("live latest.jpg", _time(read_live, args.notifications))
+        _report("memory", _time(lambda: service.get(cam, fallback=False), args.notifications))
+
+        from fastapi.testclient import TestClient
+        from services import camera_service
+        import unified_server
+        config.CAMERAS = [dict(cam, ip="127.0.0.1")]
+        camera_service.snapshots = service
+        # lifespan (カメラ監視等の子プロセス起動) は走らせない
+        client = TestClient(unified_server.app)
+        url = "/api/cameras/bench/snapshot.jpg"
+        _report("http (memory hit)", _time(lambda: client.get(url, params={"fallback": "false"}).status_code == 200,
+                                           args.notifications))
+
+
+if __name__ == "__main__":
+    main()
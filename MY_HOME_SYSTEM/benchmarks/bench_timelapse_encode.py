@@ -0,0 +1,104 @@
+# MY_HOME_SYSTEM/benchmarks/bench_timelapse_encode.py
+"""
+タイムラプスのクリップ切り出しを、旧方式と並列エンコード
+(monitors/smart_timelapse_generator.py の EncodeScheduler) で比較するベンチマーク。
+
+`ffmpeg -f lavfi -i testsrc` で合成録画 (既定: 1280x720 15fps 10分) を作り、等間隔のイベント
+(既定: 24件 x 20秒) について
+- 旧方式: イベントごとに libx264 で1本ずつ再エンコードし、続けてサムネイル用の ffmpeg を起動する
+- 並列: CPU コア数と負荷から決めた並列数で再エンコードし、サムネイルは同じ ffmpeg の2つ目の出力で書く
+- 自動コピー: FAST_STREAM_COPY_MODE="auto"。イベント開始がキーフレームに揃っていればストリームコピー
+の所要時間 (壁時計) と、子プロセス (ffmpeg) の CPU 時間 / (壁時計 x コア数) で求めた CPU 使用率を表示する。
+ffmpeg が必要。
+
+使い方:
+    python benchmarks/bench_timelapse_encode.py [--events 24] [--event-sec 20] [--source-sec 600] [--workers 0]
+"""
+import argparse
+import datetime
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from monitors import smart_timelapse_generator as stg
+from monitors.smart_timelapse_generator import EncodeScheduler, EventRecord, VideoBuilder
+
+
+def _make_source(path: str, seconds: int) -> None:
+    # 2秒ごとのキーフレーム (NVR の一般的な GOP)
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=15",
+                    "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-g", "30", "-sc_threshold", "0", path],
+                   check=True)
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _measure(label: str, func) -> None:
+    cpu_before = _children_cpu()
+    started = time.perf_counter()
+    clips = func()
+    wall = time.perf_counter() - started
+    cpu = _children_cpu() - cpu_before
+    utilization = cpu / (wall * (os.cpu_count() or 1)) * 100
+    print(f"{label:<26} {wall:>8.2f}s {cpu:>9.2f}s {utilization:>7.0f}% {clips:>6}")
+
+
+def _legacy(builder: VideoBuilder, jobs, temp_dir: str) -> int:
+    done = 0
+    for input_path, ev, start_dt in jobs:
+        clip_path = os.path.join(temp_dir, f"{ev.event_id}.mp4")
+        cmd = builder._build_ffmpeg_command(input_path, ev, clip_path, start_dt, copy=False)
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=3600)
+        builder._generate_thumbnail(clip_path, clip_path.replace(".mp4", ".jpg"))
+        done += 1
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=24, help="イベント数")
+    parser.add_argument("--event-sec", type=int, default=20, help="1イベントの長さ (秒)")
+    parser.add_argument("--source-sec", type=int, default=600, help="合成録画の長さ (秒)")
+    parser.add_argument("--workers", type=int, default=0, help="並列数 (0: CPU コア数と負荷から決める)")
+    args = parser.parse_args()
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        sys.exit("ffmpeg is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.mp4")
+        started = time.perf_counter()
+        _make_source(source, args.source_sec)
+        print(f"synthetic source: {args.source_sec}s 1280x720 ({time.perf_counter() - started:.1f}s to create)")
+
+        step = max(args.event_sec, args.source_sec // args.events)
+        step -= step % 2  # イベント開始をキーフレーム (2秒ごと) に揃える
+        events = [EventRecord(event_id=f"Event{i + 1:03d}", start_sec=i * step, end_sec=i * step + args.event_sec - 1, max_area=1.0)
+                  for i in range(args.events) if i * step + args.event_sec <= args.source_sec]
+        jobs = [(source, ev, datetime.datetime(2026, 1, 10, 9, 0, 0)) for ev in events]
+        scheduler = EncodeScheduler(workers=args.workers or None)
+        builder = VideoBuilder(scheduler=scheduler)
+        print(f"events: {len(events)} x {args.event_sec}s / cpus: {os.cpu_count()} / workers: {scheduler.workers}")
+        print()
+        print(f"{'mode':<26} {'wall':>9} {'cpu time':>10} {'cpu use':>8} {'clips':>6}")
+
+        for label, mode, func in (
+            ("sequential (legacy)", False, lambda d: _legacy(builder, jobs, d)),
+            ("parallel encode", False, lambda d: len(builder.build_clips(jobs, d)[0])),
+            ("parallel auto copy", "auto", lambda d: len(builder.build_clips(jobs, d)[0])),
+        ):
+            stg.FAST_STREAM_COPY_MODE = mode
+            out_dir = tempfile.mkdtemp(dir=tmp)
+            _measure(label, lambda: func(out_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# MY_HOME_SYSTEM/benchmarks/bench_vod_playlist.py
+"""
+当日分の録画プレイリストが最初に返るまでの時間を、旧方式と差分生成
+(services/vod_playlist_builder.py) で比較するベンチマーク。
+
+`ffmpeg -f lavfi -i testsrc` で本日付の合成録画 (既定: 1時間 x 24本) を一時ディレクトリに作り、
+- 旧方式: 全ファイルを ffconcat で連結して `-hls_playlist_type vod` で変換する。
+  プレイリストは変換の完了時に書かれるため、応答までの時間 = 全体の変換時間。
+  録画が1本増えるたびに同じ時間がかかる。
+- 差分生成: 最初の1本を分割した時点でプレイリストを返し、残りはバックグラウンドで追記する。
+  録画が1本増えたときは、その1本の分割時間だけで済む。
+を計測する。ffmpeg が必要。合成録画の生成には本数 x 長さに応じた時間がかかる
+(--clip-sec で短くできる)。
+
+使い方:
+    python benchmarks/bench_vod_playlist.py [--clips 24] [--clip-sec 3600] [--keep DIR]
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.vod_playlist_builder import VodPlaylistBuilder
+
+
+def _make_clips(source_dir: str, date: str, clips: int, clip_sec: int) -> None:
+    for i in range(clips):
+        hhmmss = time.strftime("%H%M%S", time.gmtime(i * clip_sec % 86400))
+        path = os.path.join(source_dir, f"{date}_{hhmmss}.mp4")
+        if os.path.exists(path):
+            continue
+        subprocess.run(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=10:duration={clip_sec}",
+             "-c:v", "libx264", "-preset", "ultrafast", "-g", "40", path],
+            check=True,
+        )
+        print(f"  generated {os.path.basename(path)}", flush=True)
+    # 書き込み中の録画と判定されないよう、更新時刻を過去にする
+    old = time.time() - 3600
+    for path in glob.glob(os.path.join(source_dir, "*.mp4")):
+        os.utime(path, (old, old))
+
+
+def _legacy(source_dir: str, out_dir: str, date: str) -> float:
+    """旧 camera_service.generate_record_playlist と同じ ffconcat → HLS VOD 変換の所要時間"""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    mp4_files = sorted(glob.glob(os.path.join(source_dir, f"{date}_*.mp4")))
+    concat_path = os.path.join(out_dir, f"concat_{date}.txt")
+    with open(concat_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for mp4 in mp4_files:
+            f.write(f"file '{mp4}'\n")
+    started = time.perf_counter()
+    subprocess.run(
+        ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", concat_path,
+         "-c:v", "copy", "-an", "-f", "hls", "-hls_time", "4", "-hls_playlist_type", "vod",
+         os.path.join(out_dir, f"record_{date}.m3u8")],
+        check=True,
+    )
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=24, help="合成録画の本数")
+    parser.add_argument("--clip-sec", type=int, default=3600, help="合成録画1本の長さ (秒)")
+    parser.add_argument("--keep", help="合成録画を保存・再利用するディレクトリ (省略時は一時ディレクトリ)")
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is not installed")
+
+    date = datetime.now().strftime("%Y%m%d")
+    work_dir = tempfile.mkdtemp(prefix="bench_vod_")
+    source_dir = args.keep or os.path.join(work_dir, "nvr")
+    os.makedirs(source_dir, exist_ok=True)
+    last_clip = held_back = ""
+    try:
+        print(f"generating {args.clips} x {args.clip_sec}s testsrc clips in {source_dir} ...")
+        _make_clips(source_dir, date, args.clips, args.clip_sec)
+        last_clip = sorted(glob.glob(os.path.join(source_dir, f"{date}_*.mp4")))[-1]
+        held_back = last_clip + ".held"
+
+        legacy_first = _legacy(source_dir, os.path.join(work_dir, "legacy"), date)
+
+        # 最後の1本を除いた状態で初回を生成し、後から1本追加されたときの更新時間も測る
+        os.rename(last_clip, held_back)
+        out_dir = os.path.join(work_dir, "incremental")
+        builder = VodPlaylistBuilder(settle_sec=0, max_jobs=1)
+        started = time.perf_counter()
+        day = builder.request("bench", date, out_dir, source_dir)
+        builder.wait_playlist_sync(day, timeout=3600)
+        incremental_first = time.perf_counter() - started
+        builder.wait_idle(day)
+        incremental_full = time.perf_counter() - started
+
+        os.rename(held_back, last_clip)
+        started = time.perf_counter()
+        day = builder.request("bench", date, out_dir, source_dir)
+        builder.wait_idle(day)
+        incremental_refresh = time.perf_counter() - started
+    finally:
+        if held_back and os.path.exists(held_back):
+            os.rename(held_back, last_clip)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print(f"{'':<28} {'first playlist':>15} {'+1 recording':>13}")
+    print(f"{'legacy (concat -> vod)':<28} {legacy_first:>14.2f}s {legacy_first:>12.2f}s")
+    print(f"{'incremental (per file)':<28} {incremental_first:>14.2f}s {incremental_refresh:>12.2f}s")
+    print(f"(incremental: all {args.clips - 1} files segmented in background after {incremental_full:.2f}s)")
+    print(f"speedup: first playlist x{legacy_first / incremental_first:.1f}, refresh x{legacy_first / incremental_refresh:.1f}")
+
+
+if __name__ == "__main__":
+    main()
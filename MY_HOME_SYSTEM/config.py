@@ -176,7 +176,7 @@ ENABLE_BLUETOOTH: bool = False
 # ==========================================
 SWITCHBOT_API_TOKEN: Optional[str] = os.getenv("SWITCHBOT_API_TOKEN")
 SWITCHBOT_API_SECRET: Optional[str] = os.getenv("SWITCHBOT_API_SECRET")
-SWITCHBOT_API_HOST = "https://api.switch-bot.com"
+SWITCHBOT_API_HOST = os.getenv("SWITCHBOT_API_HOST", "https://api.switch-bot.com")
 NATURE_REMO_ACCESS_TOKEN: Optional[str] = os.getenv("NATURE_REMO_ACCESS_TOKEN")
 NATURE_REMO_ACCESS_TOKEN_TAKASAGO: Optional[str] = os.getenv("NATURE_REMO_ACCESS_TOKEN_TAKASAGO")
 
@@ -185,6 +185,14 @@ LINE_CHANNEL_SECRET: Optional[str] = os.getenv("LINE_CHANNEL_SECRET")
 LINE_USER_ID: Optional[str] = os.getenv("LINE_USER_ID")
 LINE_PARENTS_GROUP_ID: str = os.getenv("LINE_PARENTS_GROUP_ID", "")
 
+# LINE Webhook イベントの処理キュー (handlers/line_handler.py, core/keyed_dispatcher.py)
+# 送信元ユーザーごとに処理待ちにできる最大件数 (超えた分は破棄してログに残す)
+LINE_EVENT_QUEUE_PER_USER: int = int(os.getenv("LINE_EVENT_QUEUE_PER_USER", "20"))
+# この秒数イベントが来なかったユーザーの処理ワーカーを片付ける
+LINE_EVENT_WORKER_IDLE_SEC: float = float(os.getenv("LINE_EVENT_WORKER_IDLE_SEC", "30"))
+# サーバー終了時に処理待ちのイベントを処理し切るまで待つ最大秒数
+LINE_EVENT_DRAIN_ON_EXIT_SEC: float = float(os.getenv("LINE_EVENT_DRAIN_ON_EXIT_SEC", "10"))
+
 # SwitchBot WebhookはLINEと異なり署名検証機構がないため、
 # 任意で共有シークレットをクエリパラメータ(?token=...)で要求できるようにする。
 # 未設定の場合は従来通り検証なし（後方互換）。
@@ -197,10 +205,45 @@ DISCORD_WEBHOOK_REPORT: Optional[str] = os.getenv("DISCORD_WEBHOOK_REPORT")
 DISCORD_WEBHOOK_NOTIFY: Optional[str] = os.getenv("DISCORD_WEBHOOK_NOTIFY")
 DISCORD_WEBHOOK_URL: Optional[str] = DISCORD_WEBHOOK_NOTIFY or os.getenv("DISCORD_WEBHOOK_URL")
 
+# 通知の送信箱 (services/notification_dispatcher.py)
+# coalesce_key 付きの通知 (センサーのしきい値通知等) は、この秒数の間に届いた分を1通にまとめる
+NOTIFY_COALESCE_WINDOW_SEC: float = float(os.getenv("NOTIFY_COALESCE_WINDOW_SEC", "5"))
+# 一時的なエラー (5xx・通信エラー) の再試行回数と間隔 (指数バックオフ)。上限を超えたら配達不能キューへ移す
+NOTIFY_MAX_ATTEMPTS: int = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_RETRY_BASE_SEC: float = float(os.getenv("NOTIFY_RETRY_BASE_SEC", "5"))
+NOTIFY_RETRY_MAX_SEC: float = float(os.getenv("NOTIFY_RETRY_MAX_SEC", "1800"))
+# ワーカーが送信箱を見に行く間隔 (他プロセスが積んだ通知・再試行待ちの通知を拾う)
+NOTIFY_POLL_INTERVAL_SEC: float = float(os.getenv("NOTIFY_POLL_INTERVAL_SEC", "1"))
+# LINE の月間送信数 (get_message_quota / get_message_quota_consumption) を問い合わせ直す間隔
+NOTIFY_LINE_QUOTA_CHECK_SEC: float = float(os.getenv("NOTIFY_LINE_QUOTA_CHECK_SEC", "600"))
+# プロセス終了時に送信箱の残りを送り切るまで待つ最大秒数 (cron 等の短命プロセス向け)
+NOTIFY_DRAIN_ON_EXIT_SEC: float = float(os.getenv("NOTIFY_DRAIN_ON_EXIT_SEC", "10"))
+# 配達不能キュー (notification_dead_letters) の保持日数。画像・動画もBLOBのまま残るため、これより古い行は削除する (0以下で削除しない)
+NOTIFY_DEAD_LETTER_RETENTION_DAYS: int = int(os.getenv("NOTIFY_DEAD_LETTER_RETENTION_DAYS", "14"))
+
+# エラーログの Discord 通知 (core/logger.py)
+# 同じエラーの2回目以降はこの秒数ごとに「x37 in last 60s」の形でまとめて送る
+LOG_DISCORD_DIGEST_SEC: float = float(os.getenv("LOG_DISCORD_DIGEST_SEC", "60"))
+# Webhook ごとの送信数の上限 (トークンバケット: 連続で送れる数と、1分あたりに回復する数)
+LOG_DISCORD_BURST: int = int(os.getenv("LOG_DISCORD_BURST", "5"))
+LOG_DISCORD_PER_MINUTE: float = float(os.getenv("LOG_DISCORD_PER_MINUTE", "10"))
+
 # GMAIL & Gemini
 GMAIL_USER: Optional[str] = os.getenv("GMAIL_USER")
 GMAIL_APP_PASSWORD: Optional[str] = os.getenv("GMAIL_APP_PASSWORD")
 GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
+# LINE の AI 応答 (services/ai_service.py)
+# ユーザーごとの会話セッションを保持する人数・最終利用からの保持秒数・履歴の最大件数
+AI_CHAT_SESSION_MAX_USERS: int = int(os.getenv("AI_CHAT_SESSION_MAX_USERS", "32"))
+AI_CHAT_SESSION_TTL_SEC: float = float(os.getenv("AI_CHAT_SESSION_TTL_SEC", "1800"))
+AI_CHAT_HISTORY_MAX_CONTENTS: int = int(os.getenv("AI_CHAT_HISTORY_MAX_CONTENTS", "20"))
+# search_db の結果 (SQLと参照テーブルのデータ版ごと) と、検索に基づく回答を覚えておく件数。
+# データ版は行の追加・削除で変わるが更新は検知できないため、AI_CACHE_TTL_SEC 秒を過ぎたものも使わない
+AI_SEARCH_CACHE_SIZE: int = int(os.getenv("AI_SEARCH_CACHE_SIZE", "128"))
+AI_ANSWER_CACHE_SIZE: int = int(os.getenv("AI_ANSWER_CACHE_SIZE", "128"))
+AI_CACHE_TTL_SEC: float = float(os.getenv("AI_CACHE_TTL_SEC", "600"))
+# Gemini 呼び出しのレート制限に達したとき、空きを待つ最大秒数 (超えたら混雑メッセージを返す)
+AI_RATE_LIMIT_WAIT_SEC: float = float(os.getenv("AI_RATE_LIMIT_WAIT_SEC", "5"))
 SALARY_MAIL_SENDER: Optional[str] = os.getenv("SALARY_MAIL_SENDER")
 
 # 不動産情報 (WebURLは 9. 不動産情報(REINFOLIB)設定 を参照)
@@ -221,6 +264,49 @@ NAS_PROJECT_ROOT: str = os.path.join(NAS_MOUNT_POINT, "home_system")
 # (未設定時は従来通りのデフォルトパスを使用)
 SQLITE_DB_PATH: str = os.getenv("SQLITE_DB_PATH") or os.path.join(BASE_DIR, "home_system.db")
 
+# 接続プール設定 (core/database.py)
+# スレッドごとに保持するアイドル接続数の上限と、接続単位のプリペアドステートメントキャッシュ数
+SQLITE_POOL_MAX_IDLE_PER_THREAD: int = int(os.getenv("SQLITE_POOL_MAX_IDLE_PER_THREAD", "2"))
+SQLITE_STATEMENT_CACHE_SIZE: int = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+
+# センサーログの書き込みバッファ設定 (core/ingest_queue.py)
+# 件数または経過時間のどちらかのしきい値に達した時点でまとめて書き込む
+INGEST_BATCH_ROWS: int = int(os.getenv("INGEST_BATCH_ROWS", "200"))
+INGEST_FLUSH_INTERVAL_MS: int = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "500"))
+INGEST_MAX_PENDING_ROWS: int = int(os.getenv("INGEST_MAX_PENDING_ROWS", "10000"))
+
+# センサーログの集計(ロールアップ)と保持期間設定 (services/rollup_service.py)
+# 生データは集計済みの行のみ、保持日数を過ぎたものから削除する (0 で削除しない)。
+# device_records は動体検知・開閉イベント等の集計対象外の情報も含むため既定では削除しない。
+SENSOR_RAW_RETENTION_DAYS: int = int(os.getenv("SENSOR_RAW_RETENTION_DAYS", "180"))
+DEVICE_RECORDS_RETENTION_DAYS: int = int(os.getenv("DEVICE_RECORDS_RETENTION_DAYS", "0"))
+ROLLUP_MINUTE_RETENTION_DAYS: int = int(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "14"))
+ROLLUP_BATCH_ROWS: int = int(os.getenv("ROLLUP_BATCH_ROWS", "20000"))
+
+# 定期タスクのスケジューラ設定 (scheduler_boot.py / core/task_scheduler.py)
+# "inprocess": 各監視モジュールを1度だけimportして常駐プロセス内で呼び出す (既定)
+# "subprocess": 従来どおり実行のたびに新しいPythonプロセスを起動する (フォールバック)
+SCHEDULER_MODE: str = os.getenv("SCHEDULER_MODE", "inprocess")
+# 全タスクが同じ瞬間に実行されないよう、実行間隔に加える揺らぎの上限(秒)
+SCHEDULER_JITTER_SEC: float = float(os.getenv("SCHEDULER_JITTER_SEC", "15"))
+SCHEDULER_RUNS_RETENTION_DAYS: int = int(os.getenv("SCHEDULER_RUNS_RETENTION_DAYS", "30"))
+
+# SwitchBot / Nature Remo のポーリング設定 (core/http_client.py, monitors/*_monitor.py)
+# SwitchBot API は1アカウントあたり1日10,000回まで。コマンド送信・デバイス一覧取得の分を残すため、
+# ポーリングには SWITCHBOT_POLL_BUDGET_RATIO の割合だけを使い、超える場合は間隔を自動で延ばす。
+SWITCHBOT_API_DAILY_LIMIT: int = int(os.getenv("SWITCHBOT_API_DAILY_LIMIT", "10000"))
+SWITCHBOT_POLL_BUDGET_RATIO: float = float(os.getenv("SWITCHBOT_POLL_BUDGET_RATIO", "0.8"))
+SWITCHBOT_RATE_BURST: int = int(os.getenv("SWITCHBOT_RATE_BURST", "20"))
+# 電力を消費中 (ACTIVE_WATTS 以上) のプラグは短い間隔で、それ以外は長い間隔でポーリングする
+SWITCHBOT_POLL_ACTIVE_INTERVAL_SEC: int = int(os.getenv("SWITCHBOT_POLL_ACTIVE_INTERVAL_SEC", "60"))
+SWITCHBOT_POLL_IDLE_INTERVAL_SEC: int = int(os.getenv("SWITCHBOT_POLL_IDLE_INTERVAL_SEC", "300"))
+SWITCHBOT_POLL_ACTIVE_WATTS: float = float(os.getenv("SWITCHBOT_POLL_ACTIVE_WATTS", "5"))
+# 同時に問い合わせるデバイス数の上限 (HTTP接続プールの上限も兼ねる)
+DEVICE_POLL_CONCURRENCY: int = int(os.getenv("DEVICE_POLL_CONCURRENCY", "4"))
+# Nature Remo API はアクセストークンあたり5分間に30回まで
+NATURE_REMO_API_HOST: str = os.getenv("NATURE_REMO_API_HOST", "https://api.nature.global")
+NATURE_REMO_RATE_PER_5MIN: int = int(os.getenv("NATURE_REMO_RATE_PER_5MIN", "30"))
+
 ASSETS_DIR: str = ensure_safe_path_with_backoff(
     os.path.join(NAS_PROJECT_ROOT, "assets"),
     "assets"
@@ -294,23 +380,32 @@ CAR_RULE_KEYWORDS: Dict[str, List[str]] = {
 }
 
 # --- デバイス設定の読み込み (devices.json) ---
-CAMERAS: List[Dict[str, Any]] = []
-MONITOR_DEVICES: List[Dict[str, Any]] = []
-
-if os.path.exists(DEVICES_JSON_PATH):
+def load_devices_json(path: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """
+    devices.json を検証して {"cameras": [...], "monitor_devices": [...]} を返す。
+    ファイルが存在しない場合は空のリスト、不正な内容の場合は None を返す (起動は継続する)。
+    core/device_registry.py の再読み込みからも使われる。
+    """
+    if not os.path.exists(path):
+        logger.info(f"ℹ️ devices.json not found at {path}. Running without device config.")
+        return {"cameras": [], "monitor_devices": []}
     try:
-        with open(DEVICES_JSON_PATH, "r", encoding="utf-8") as f:
-            _devices_data = json.load(f)
-            if "cameras" in _devices_data:
-                CAMERAS = [CameraConfig(**c).model_dump(by_alias=True) for c in _devices_data["cameras"]]
-            if "monitor_devices" in _devices_data:
-                MONITOR_DEVICES = [DeviceConfig(**d).model_dump() for d in _devices_data["monitor_devices"]]
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {
+            "cameras": [CameraConfig(**c).model_dump(by_alias=True) for c in data.get("cameras", [])],
+            "monitor_devices": [DeviceConfig(**d).model_dump() for d in data.get("monitor_devices", [])],
+        }
     except ValidationError as ve:
         logger.error(f"❌ devices.json Validation Error: {ve}")
     except Exception as e:
         logger.warning(f"⚠️ devices.json load failed: {e}")
-else:
-    logger.info(f"ℹ️ devices.json not found at {DEVICES_JSON_PATH}. Running without device config.")
+    return None
+
+
+_devices_data = load_devices_json(DEVICES_JSON_PATH) or {}
+CAMERAS: List[Dict[str, Any]] = _devices_data.get("cameras", [])
+MONITOR_DEVICES: List[Dict[str, Any]] = _devices_data.get("monitor_devices", [])
 
 # カメラ互換性用変数
 if CAMERAS:
@@ -324,6 +419,12 @@ else:
 # デフォルトは60秒。.envで上書き可能。
 MOTION_COOLDOWN_SEC: int = int(os.getenv("MOTION_COOLDOWN_SEC", "60"))
 
+# ONVIFイベントの後段処理 (クールダウン判定・DB記録・スナップショット) を行うワーカースレッド数
+# (monitors/camera_event_queue.py)。PullMessages のループはイベントの解析と投入だけを行う
+CAMERA_EVENT_WORKERS: int = int(os.getenv("CAMERA_EVENT_WORKERS", "2"))
+# イベントキューの深さ・処理遅延をログへ出力する間隔（秒）
+CAMERA_EVENT_STATS_INTERVAL_SEC: float = float(os.getenv("CAMERA_EVENT_STATS_INTERVAL_SEC", "600"))
+
 # ==========================================
 # 5. 給与(Salary)設定
 # ==========================================
@@ -411,6 +512,11 @@ NAS_CHECK_TIMEOUT: int = 5
 _default_quest_dir = os.path.join(os.path.dirname(BASE_DIR), "family-quest", "dist")
 QUEST_DIST_DIR: str = os.getenv("QUEST_DIST_DIR", _default_quest_dir)
 
+# /api/quest/data の表示データキャッシュ (services/quest_service.py)
+# 本プロセス内の更新操作では即時に無効化される。この秒数は reset_game.py 等の
+# 別プロセスからのDB更新が反映されるまでの上限 (0 でキャッシュ無効)。
+QUEST_VIEW_CACHE_TTL_SEC: float = float(os.getenv("QUEST_VIEW_CACHE_TTL_SEC", "30"))
+
 FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://192.168.1.200:8000/quest")
 # M-8-2: 以前はここ(config.py)と unified_server.py の両方に別々のCORS許可
 # オリジンリストがあり、実際に使われるのは unified_server.py 側のハードコード
@@ -444,6 +550,13 @@ TMP_VIDEO_DIR: str = ensure_safe_path_with_backoff(
 
 # NVR録画ファイルのベースディレクトリ
 NVR_RECORD_DIR: str = os.path.join(NAS_MOUNT_POINT, "home_system", "nvr_recordings")
+# 録画カタログ (services/recording_catalog.py)
+# NVR の1ファイルの標準の長さ (最終更新時刻から長さを推定できない場合に使う)
+RECORDING_CLIP_SEC: float = float(os.getenv("RECORDING_CLIP_SEC", "600"))
+# 最終更新からこの秒数が経過した録画は書き込み済みとみなし、以降の走査で stat しない
+RECORDING_SETTLE_SEC: float = float(os.getenv("RECORDING_SETTLE_SEC", "120"))
+# 問い合わせ時、最終走査がこの秒数より古ければフォルダを差分走査してから答える
+RECORDING_CATALOG_MAX_AGE_SEC: float = float(os.getenv("RECORDING_CATALOG_MAX_AGE_SEC", "60"))
 
 # タイムラプス生成設定
 # (monitors/smart_timelapse_generator.py, monitors/scheduled_timelapse.py が
@@ -466,7 +579,30 @@ TIMELAPSE_GAP_THRESH: int = 5
 TIMELAPSE_BUFFER_SEC: int = 3
 TIMELAPSE_SPEEDUP_FACTOR: int = 4
 TIMELAPSE_DEBUG_FFMPEG: bool = False
-TIMELAPSE_FAST_STREAM_COPY_MODE: bool = False
+# クリップの切り出し方式。"false" (既定): 常に再エンコード / "true": 常にストリームコピー /
+# "auto": 全イベントの開始位置がキーフレームに揃っている場合だけストリームコピー
+# (ストリームコピー時の撮影時刻・EventID の表示は、結合時の再エンコードで重ねる)
+TIMELAPSE_FAST_STREAM_COPY_MODE: str = os.getenv("TIMELAPSE_FAST_STREAM_COPY_MODE", "false")
+# キーフレームに揃っているとみなす開始位置のずれ (秒)
+TIMELAPSE_KEYFRAME_TOLERANCE_SEC: float = float(os.getenv("TIMELAPSE_KEYFRAME_TOLERANCE_SEC", "0.1"))
+# クリップを並列にエンコードする ffmpeg の最大数。0 なら CPU コア数と現在の負荷から決める
+TIMELAPSE_ENCODE_MAX_WORKERS: int = int(os.getenv("TIMELAPSE_ENCODE_MAX_WORKERS", "0"))
+# 動き検知: ffmpeg の出力を先読みしておくフレーム数 (320x180 グレーで 1フレーム約56KB)
+TIMELAPSE_FRAME_RING_SIZE: int = int(os.getenv("TIMELAPSE_FRAME_RING_SIZE", "64"))
+# 動き検知: 直前に背景差分へ渡したフレームからほぼ変化していないフレームは MOG2 を省略する
+TIMELAPSE_SKIP_STATIC_FRAMES: bool = os.getenv("TIMELAPSE_SKIP_STATIC_FRAMES", "True").lower() == "true"
+# 画素値の差がこの値を超えた画素を「変化あり」と数える
+TIMELAPSE_STATIC_DIFF_THRESH: int = int(os.getenv("TIMELAPSE_STATIC_DIFF_THRESH", "10"))
+# 変化ありの画素がこの数以下なら静止フレームとみなす
+TIMELAPSE_STATIC_MAX_PIXELS: int = int(os.getenv("TIMELAPSE_STATIC_MAX_PIXELS", "20"))
+# 静止フレームが続いても、このフレーム数ごとに MOG2 へ渡して背景モデルを更新する
+TIMELAPSE_STATIC_REFRESH_FRAMES: int = int(os.getenv("TIMELAPSE_STATIC_REFRESH_FRAMES", "10"))
+# motion.csv をまとめて書き出す行数
+TIMELAPSE_MOTION_CSV_FLUSH_ROWS: int = int(os.getenv("TIMELAPSE_MOTION_CSV_FLUSH_ROWS", "256"))
+# 複数ファイルを並列に解析するとき、直前のファイルの末尾この秒数で背景モデルを暖機する
+TIMELAPSE_WARMUP_SEC: int = int(os.getenv("TIMELAPSE_WARMUP_SEC", "30"))
+# 複数ファイルを並列に解析するプロセス数の上限。0 なら CPU コア数と現在の負荷から決める
+TIMELAPSE_ANALYZE_MAX_WORKERS: int = int(os.getenv("TIMELAPSE_ANALYZE_MAX_WORKERS", "0"))
 TIMELAPSE_FONT_FILE: str = "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc"
 TIMELAPSE_MAX_FILE_SIZE_MB: int = 22
 
@@ -484,6 +620,45 @@ TIMELAPSE_BITRATE: str = "1500k"
 TIMELAPSE_MAXRATE: str = "2000k"
 TIMELAPSE_SEGMENT_TIME: str = "40"
 
+# ライブHLS配信 (services/live_session_manager.py)
+# 視聴者のプレイリスト/セグメント取得が途絶えてから ffmpeg を停止するまでの秒数
+LIVE_IDLE_TIMEOUT_SEC: float = float(os.getenv("LIVE_IDLE_TIMEOUT_SEC", "30"))
+# 最後の取得からこの秒数以内のクライアントを「視聴中」とみなす (HLSのセグメント長2秒 x 再取得間隔の余裕)
+LIVE_VIEWER_TTL_SEC: float = float(os.getenv("LIVE_VIEWER_TTL_SEC", "10"))
+# 同時に起動するライブ用 ffmpeg の上限 (Raspberry Pi の CPU・帯域保護)
+LIVE_MAX_SESSIONS: int = int(os.getenv("LIVE_MAX_SESSIONS", "3"))
+# 最初のプレイリスト生成を待つ最大秒数
+LIVE_READY_TIMEOUT_SEC: float = float(os.getenv("LIVE_READY_TIMEOUT_SEC", "8"))
+
+# カメラのスナップショット (services/snapshot_service.py)
+# メモリ上の画像をこの秒数まで「最新」として返す (超えたらライブ配信の画像か録画からの切り出しに切り替える)
+SNAPSHOT_MAX_AGE_SEC: float = float(os.getenv("SNAPSHOT_MAX_AGE_SEC", "5"))
+# ライブHLS配信中に ffmpeg の2つ目の出力で latest.jpg を書く頻度 (fps、0で無効)
+SNAPSHOT_LIVE_FPS: float = float(os.getenv("SNAPSHOT_LIVE_FPS", "1"))
+# camera_monitor から参照する unified_server のURLと待ち時間
+SNAPSHOT_SERVER_URL: str = os.getenv("SNAPSHOT_SERVER_URL", "http://127.0.0.1:8000")
+SNAPSHOT_FETCH_TIMEOUT_SEC: float = float(os.getenv("SNAPSHOT_FETCH_TIMEOUT_SEC", "1"))
+
+# 録画VODプレイリスト (services/vod_playlist_builder.py)
+# 最新の録画ファイルの更新がこの秒数止まるまでは NVR が書き込み中とみなして分割しない
+VOD_SOURCE_SETTLE_SEC: float = float(os.getenv("VOD_SOURCE_SETTLE_SEC", "60"))
+# 同時に実行する録画分割 (ffmpeg) の上限
+VOD_MAX_JOBS: int = int(os.getenv("VOD_MAX_JOBS", "2"))
+# 最初の1ファイル分のプレイリストができるまで待つ最大秒数
+VOD_FIRST_PLAYLIST_TIMEOUT_SEC: float = float(os.getenv("VOD_FIRST_PLAYLIST_TIMEOUT_SEC", "20"))
+
+# ダッシュボードのデータキャッシュ (views/dashboard/data.py, services/dashboard_data.py)
+# センサーデータ: この秒数ごとに前回以降の追加分だけを読み足す
+DASHBOARD_SENSOR_TTL_SEC: float = float(os.getenv("DASHBOARD_SENSOR_TTL_SEC", "30"))
+# センサーデータを全件読み直す間隔 (保持期間による削除・行の更新を反映する)
+DASHBOARD_SENSOR_FULL_REFRESH_SEC: float = float(os.getenv("DASHBOARD_SENSOR_FULL_REFRESH_SEC", "600"))
+# 健康記録・車・防犯ログ・駐輪場・NAS・運行情報などの記録と状態
+DASHBOARD_RECORDS_TTL_SEC: float = float(os.getenv("DASHBOARD_RECORDS_TTL_SEC", "60"))
+# AIレポート・電気代の月次概算
+DASHBOARD_REPORT_TTL_SEC: float = float(os.getenv("DASHBOARD_REPORT_TTL_SEC", "600"))
+# 天気の履歴 (年間気温)・アプリランキング (1日〜1週間に1回しか更新されない)
+DASHBOARD_SLOW_TTL_SEC: float = float(os.getenv("DASHBOARD_SLOW_TTL_SEC", "10800"))
+
 # ==========================================
 # 12. 保持期間・クリーンアップ設定
 # ==========================================
@@ -0,0 +1,63 @@
+# MY_HOME_SYSTEM/core/async_cache.py
+"""
+イベントループ上で使う TTL 付きキャッシュ。
+
+同じキーの値がキャッシュに無い状態で同時に取得された場合、読み込み (loader) は1回だけ実行し、
+待っている全員で結果を共有する (single-flight)。読み込みに失敗した場合は何も覚えず、
+待っていた全員に同じ例外を返す。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class AsyncTTLCache:
+    """loader(key) の結果を ttl_sec 秒覚える非同期キャッシュ"""
+
+    def __init__(
+        self,
+        loader: Callable[[Any], Awaitable[Any]],
+        ttl_sec: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.loader = loader
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self._values: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "loads": 0, "shared": 0}
+
+    async def get(self, key: Hashable) -> Any:
+        cached = self._values.get(key)
+        if cached is not None and self.clock() - cached[1] < self.ttl_sec:
+            self.stats["hits"] += 1
+            return cached[0]
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.stats["shared"] += 1
+            # 待っている側がキャンセルされても、読み込み自体は止めない
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        self.stats["loads"] += 1
+        try:
+            value = await self.loader(key)
+        except BaseException as e:
+            future.set_exception(e)
+            # 待っている者がいなくても「取り出されなかった例外」の警告を出さない
+            future.exception()
+            raise
+        else:
+            self._values[key] = (value, self.clock())
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._inflight.clear()
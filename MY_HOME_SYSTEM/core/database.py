@@ -1,58 +1,272 @@
 import sqlite3
+import os
 import time
 import json
 import logging
 import asyncio
-from typing import List
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 from contextlib import contextmanager
 import config
 
 logger = logging.getLogger("core.database")
 
-@contextmanager
-def get_db_cursor(commit: bool = False):
-    """DB接続コンテキストマネージャ (接続確立のみリトライ。yieldは必ず1回だけ行う)"""
-    conn = None
-    max_retries = 5
-    retry_delay = 1.0
+# ==========================================
+# Connection Pool
+# ==========================================
+# 以前は get_db_cursor() / execute_read_query() / analysis_service.get_ro_db_connection()
+# のいずれも呼び出しのたびに sqlite3.connect を行い、PRAGMA(WAL/foreign_keys)も毎回
+# 実行していた。Webhook・クエスト操作・ダッシュボードの全クエリが接続確立コストを
+# 払っていたため、スレッド単位で接続を使い回すプールを導入する。
+# sqlite3の接続はデフォルトで作成スレッド以外から使えない(check_same_thread)ため、
+# プールはスレッドローカルなアイドルリストとして実装している。
+
+MAX_CONNECT_RETRIES = 5
+CONNECT_RETRY_DELAY_SEC = 1.0
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    close() で実際には閉じず、取得元プールへ返却する sqlite3.Connection。
+
+    pandas.read_sql_query 等が isinstance(conn, sqlite3.Connection) で判定するため、
+    ラッパーではなくサブクラスとして実装している。
+    """
+    _pool: Optional["ConnectionPool"] = None
+    _pool_path: str = ""
+    _file_id: Optional[Tuple[int, int]] = None
+
+    def close(self) -> None:
+        pool = self._pool
+        if pool is None or not pool._release(self):
+            super().close()
+
+    def close_physically(self) -> None:
+        """プールへ返却せず、実際に接続を閉じる"""
+        self._pool = None
+        super().close()
+
+
+def _file_identity(path: str) -> Optional[Tuple[int, int]]:
+    """DBファイルの (st_dev, st_ino)。ファイル差し替え(削除・復元)の検知に使う"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+class ConnectionPool:
+    """
+    スレッド単位のSQLite接続プール。
+
+    - 接続ごとのPRAGMA設定は接続確立時の1回だけ行う。
+    - sqlite3モジュールのステートメントキャッシュ(cached_statements)は接続単位のため、
+      接続を使い回すことでプリペアドステートメントも再利用される。
+    - 同一スレッド内でネストして取得された場合は別の接続を払い出す
+      (トランザクションを共有して外側の処理を巻き込まないようにするため)。
+    - config.SQLITE_DB_PATH の変更(テストでの差し替え等)や、DBファイル自体の
+      差し替え(削除・バックアップからの復元)を検知した場合は古い接続を破棄する。
+    """
+
+    def __init__(self, name: str, read_only: bool = False,
+                 max_idle_per_thread: int = 2, timeout: float = 30.0) -> None:
+        self.name = name
+        self.read_only = read_only
+        self.max_idle_per_thread = max_idle_per_thread
+        self.timeout = timeout
+        self._local = threading.local()
+        self._generation = 0
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {}
+        self.reset_stats()
+
+    # --- Stats ---
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats = {
+                "hits": 0,
+                "misses": 0,
+                "busy_retries": 0,
+                "discarded": 0,
+                "wait_time_sec": 0.0,
+            }
+
+    def _incr(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        total = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / total, 4) if total else 0.0
+        snapshot["wait_time_sec"] = round(snapshot["wait_time_sec"], 6)
+        return snapshot
+
+    # --- Pool internals ---
+    def _idle_list(self, path: str) -> List[PooledConnection]:
+        local = self._local
+        if getattr(local, "path", None) != path or getattr(local, "generation", None) != self._generation:
+            for stale in getattr(local, "idle", []):
+                self._discard(stale)
+            local.path = path
+            local.generation = self._generation
+            local.idle = []
+        return local.idle
+
+    def _discard(self, conn: PooledConnection) -> None:
+        self._incr("discarded")
+        try:
+            conn.close_physically()
+        except sqlite3.Error:
+            pass
 
-    for attempt in range(max_retries):
+    def _connect(self, path: str) -> PooledConnection:
+        """接続を新規確立する (DBロック時のみリトライ)"""
+        conn = None
+        for attempt in range(MAX_CONNECT_RETRIES):
+            try:
+                if self.read_only:
+                    conn = sqlite3.connect(
+                        f"file:{path}?mode=ro", uri=True, timeout=self.timeout,
+                        factory=PooledConnection,
+                        cached_statements=config.SQLITE_STATEMENT_CACHE_SIZE,
+                    )
+                else:
+                    conn = sqlite3.connect(
+                        path, timeout=self.timeout,
+                        factory=PooledConnection,
+                        cached_statements=config.SQLITE_STATEMENT_CACHE_SIZE,
+                    )
+                    conn.row_factory = sqlite3.Row
+                    conn.execute("PRAGMA journal_mode=WAL;")
+                    conn.execute("PRAGMA foreign_keys=ON;")
+                return conn
+            except sqlite3.OperationalError as e:
+                if conn is not None:
+                    sqlite3.Connection.close(conn)
+                    conn = None
+                if "locked" in str(e) and attempt < MAX_CONNECT_RETRIES - 1:
+                    self._incr("busy_retries")
+                    logger.warning(f"⚠️ DB is locked. Retrying connection... ({attempt+1}/{MAX_CONNECT_RETRIES})")
+                    time.sleep(CONNECT_RETRY_DELAY_SEC)
+                    continue
+                logger.error(f"❌ DB接続エラー: {e}")
+                raise
+        raise sqlite3.OperationalError("DB connection retries exhausted")  # pragma: no cover
+
+    def acquire(self, db_path: Optional[str] = None) -> PooledConnection:
+        path = db_path or config.SQLITE_DB_PATH
+        started = time.perf_counter()
+        try:
+            # インメモリDBは接続ごとに別DBになる仕様のため、従来通り毎回新規接続とする
+            if path == ":memory:":
+                self._incr("misses")
+                return self._connect(path)
+
+            idle = self._idle_list(path)
+            current_id = _file_identity(path)
+            while idle:
+                conn = idle.pop()
+                if current_id is not None and conn._file_id == current_id:
+                    self._incr("hits")
+                    return conn
+                self._discard(conn)
+
+            self._incr("misses")
+            conn = self._connect(path)
+            conn._pool = self
+            conn._pool_path = path
+            conn._file_id = _file_identity(path)
+            return conn
+        finally:
+            self._incr("wait_time_sec", time.perf_counter() - started)
+
+    def _release(self, conn: PooledConnection) -> bool:
+        """接続をアイドルリストへ戻す。戻せなかった場合はFalse(呼び出し元で実際にクローズする)"""
+        local = self._local
+        if (
+            conn._pool_path != getattr(local, "path", None)
+            or getattr(local, "generation", None) != self._generation
+            or len(local.idle) >= self.max_idle_per_thread
+        ):
+            return False
         try:
-            conn = sqlite3.connect(config.SQLITE_DB_PATH, timeout=30.0)
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA journal_mode=WAL;")
-            conn.execute("PRAGMA foreign_keys=ON;")
-            break
-        except sqlite3.OperationalError as e:
-            if conn:
-                conn.close()
-                conn = None
-            if "locked" in str(e) and attempt < max_retries - 1:
-                logger.warning(f"⚠️ DB is locked. Retrying connection... ({attempt+1}/{max_retries})")
-                time.sleep(retry_delay)
-                continue
-            logger.error(f"❌ DB接続エラー: {e}")
-            raise
+            # 未コミットの変更は従来のclose()と同様に破棄する
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None if self.read_only else sqlite3.Row
+        except sqlite3.Error:
+            return False
+        local.idle.append(conn)
+        return True
+
+    def clear(self) -> None:
+        """全スレッドのアイドル接続を無効化する (他スレッド分は次回取得時に破棄される)"""
+        self._generation += 1
+        local = self._local
+        for stale in getattr(local, "idle", []):
+            self._discard(stale)
+        local.idle = []
+
+
+_rw_pool = ConnectionPool("rw", read_only=False, max_idle_per_thread=config.SQLITE_POOL_MAX_IDLE_PER_THREAD, timeout=30.0)
+_ro_pool = ConnectionPool("ro", read_only=True, max_idle_per_thread=config.SQLITE_POOL_MAX_IDLE_PER_THREAD, timeout=10.0)
+
 
+def get_ro_connection() -> sqlite3.Connection:
+    """
+    読み取り専用プールから接続を取得する。
+    呼び出し元は通常の sqlite3 接続と同様に close() すること(実際にはプールへ返却される)。
+    """
+    return _ro_pool.acquire()
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """接続プールのヒット数・待ち時間・ロック時リトライ回数などの統計を返す"""
+    return {"rw": _rw_pool.stats(), "ro": _ro_pool.stats()}
+
+
+def reset_connection_pools() -> None:
+    """プール済み接続を破棄する (DBファイルの差し替え後やテストでの利用を想定)"""
+    _rw_pool.clear()
+    _ro_pool.clear()
+
+
+@contextmanager
+def get_db_cursor(commit: bool = False, db_path: Optional[str] = None):
+    """
+    DB接続コンテキストマネージャ (接続確立のみリトライ。yieldは必ず1回だけ行う)
+
+    db_path を省略した場合は config.SQLITE_DB_PATH を使う。書き込みを後から
+    まとめて行う処理(core.ingest_queue)が、受付時点のDBへ確実に書き込むために指定する。
+    """
+    conn = _rw_pool.acquire(db_path)
+    cursor = conn.cursor()
     try:
-        yield conn.cursor()
+        yield cursor
         if commit:
             conn.commit()
     except Exception:
         conn.rollback()
         raise
     finally:
+        cursor.close()
         conn.close()
 
 def execute_read_query(query: str, params: tuple = ()) -> str:
     """読み取り専用モードで安全にSELECTを実行する"""
     try:
-        conn = sqlite3.connect(f"file:{config.SQLITE_DB_PATH}?mode=ro", uri=True)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        conn = get_ro_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
 
         if not rows: return "該当するデータはありませんでした。"
         return json.dumps([dict(r) for r in rows], ensure_ascii=False, default=str)
@@ -75,4 +289,4 @@ def save_log_generic(table: str, columns_list: List[str], values_list: tuple) ->
 async def save_log_async(table: str, columns_list: List[str], values_list: tuple) -> bool:
     """save_log_generic の非同期ラッパー"""
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, save_log_generic, table, columns_list, values_list)
\ No newline at end of file
+    return await loop.run_in_executor(None, save_log_generic, table, columns_list, values_list)
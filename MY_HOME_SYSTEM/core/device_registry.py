@@ -0,0 +1,311 @@
+# MY_HOME_SYSTEM/core/device_registry.py
+"""
+カメラ・監視デバイスの設定 (devices.json) を検索用にインデックス化したレジストリ。
+
+これまで SwitchBot Webhook は受信のたびに config.MONITOR_DEVICES を線形探索し、
+カメラAPIは HLS/VOD のリクエストごとに config.CAMERAS を next() で走査していた。
+また SwitchBot API から取得したデバイス名は switchbot_service.DEVICE_NAME_CACHE、
+タイムラプスのカメラ名→NASフォルダ対応はハードコードの TARGET_CAM_MAP と、
+同じデバイス情報の写しが散在していた。
+
+本モジュールはそれらを1つの不変スナップショット (RegistrySnapshot) にまとめる。
+- ID・MAC・名前・設置場所ごとの dict を構築し、検索は O(1) で行う。
+- 各エントリは読み取り専用 (MappingProxyType)。呼び出し側で書き換えることはできない。
+- 更新 (devices.json の再読み込み・カメラ設定の変更) は新しいスナップショットを作ってから
+  参照を1回差し替えるため、読み取り側は常に一貫した状態を見る (ロック不要)。
+- config.CAMERAS / config.MONITOR_DEVICES は互換性のため引き続き更新する。これらのリストが
+  差し替えられた場合 (テストの monkeypatch 等) は、次回アクセス時にインデックスを作り直す。
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import config
+from core.logger import setup_logging
+
+logger = setup_logging("core.device_registry")
+
+DeviceEntry = Mapping[str, Any]
+
+def normalize_mac(value: Optional[str]) -> str:
+    """
+    MACアドレス表記を揃える。SwitchBot のデバイスIDは区切りなしの大文字MAC
+    ("AABBCCDDEE01")、Webhook の deviceMac は区切りあり ("AA:BB:CC:DD:EE:01") のため。
+    """
+    return "".join(ch for ch in (value or "") if ch.isalnum()).upper()
+
+
+def _freeze(entries: Iterable[Dict[str, Any]]) -> Tuple[DeviceEntry, ...]:
+    return tuple(MappingProxyType(dict(e)) for e in entries if e.get("id"))
+
+
+def _group(entries: Iterable[DeviceEntry], key: str) -> Mapping[str, Tuple[DeviceEntry, ...]]:
+    groups: Dict[str, List[DeviceEntry]] = {}
+    for e in entries:
+        if e.get(key):
+            groups.setdefault(e[key], []).append(e)
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+def _first_by(entries: Iterable[DeviceEntry], key: str, normalize=lambda v: v) -> Mapping[str, DeviceEntry]:
+    """key ごとの最初のエントリ (devices.json 上で先に定義されたものを優先)"""
+    index: Dict[str, DeviceEntry] = {}
+    for e in entries:
+        value = e.get(key)
+        if value:
+            index.setdefault(normalize(value), e)
+    return MappingProxyType(index)
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """ある時点のデバイス設定とそのインデックス (読み取り専用)"""
+    cameras: Tuple[DeviceEntry, ...] = ()
+    devices: Tuple[DeviceEntry, ...] = ()
+    api_names: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    # 構築元の config のリスト (差し替えの検知用)
+    camera_source: Any = field(default=None, compare=False, repr=False)
+    device_source: Any = field(default=None, compare=False, repr=False)
+    # 以下は __post_init__ で構築するインデックス
+    camera_by_id: Mapping[str, DeviceEntry] = field(init=False, compare=False, repr=False)
+    camera_by_name: Mapping[str, DeviceEntry] = field(init=False, compare=False, repr=False)
+    cameras_by_location: Mapping[str, Tuple[DeviceEntry, ...]] = field(init=False, compare=False, repr=False)
+    device_by_id: Mapping[str, DeviceEntry] = field(init=False, compare=False, repr=False)
+    device_by_mac: Mapping[str, DeviceEntry] = field(init=False, compare=False, repr=False)
+    device_by_name: Mapping[str, DeviceEntry] = field(init=False, compare=False, repr=False)
+    devices_by_location: Mapping[str, Tuple[DeviceEntry, ...]] = field(init=False, compare=False, repr=False)
+    api_name_by_mac: Mapping[str, str] = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        indexes = {
+            "camera_by_id": _first_by(self.cameras, "id"),
+            "camera_by_name": _first_by(self.cameras, "name"),
+            "cameras_by_location": _group(self.cameras, "location"),
+            "device_by_id": _first_by(self.devices, "id"),
+            "device_by_mac": _first_by(self.devices, "id", normalize_mac),
+            "device_by_name": _first_by(self.devices, "name"),
+            "devices_by_location": _group(self.devices, "location"),
+            "api_name_by_mac": MappingProxyType({normalize_mac(k): v for k, v in self.api_names.items()}),
+        }
+        for name, index in indexes.items():
+            object.__setattr__(self, name, index)
+
+    @classmethod
+    def build(cls, cameras: List[Dict[str, Any]], devices: List[Dict[str, Any]],
+              api_names: Optional[Mapping[str, str]] = None) -> "RegistrySnapshot":
+        return cls(
+            cameras=_freeze(cameras),
+            devices=_freeze(devices),
+            api_names=MappingProxyType(dict(api_names or {})),
+            camera_source=cameras,
+            device_source=devices,
+        )
+
+
+class DeviceRegistry:
+    """devices.json のデバイス設定を保持するレジストリ (読み取りはロックフリー、更新は直列化)"""
+
+    def __init__(self) -> None:
+        self._snapshot: Optional[RegistrySnapshot] = None
+        self._loaded: Optional[Tuple[str, Optional[int]]] = None
+        self._lock = threading.Lock()
+
+    # --- スナップショット管理 ---
+    def snapshot(self) -> RegistrySnapshot:
+        snap = self._snapshot
+        if (
+            snap is not None
+            and snap.camera_source is config.CAMERAS
+            and snap.device_source is config.MONITOR_DEVICES
+        ):
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if (
+                snap is None
+                or snap.camera_source is not config.CAMERAS
+                or snap.device_source is not config.MONITOR_DEVICES
+            ):
+                api_names = snap.api_names if snap is not None else None
+                snap = RegistrySnapshot.build(config.CAMERAS, config.MONITOR_DEVICES, api_names)
+                self._snapshot = snap
+            return snap
+
+    def _publish(self, cameras: List[Dict[str, Any]], devices: List[Dict[str, Any]]) -> RegistrySnapshot:
+        """新しいスナップショットを構築してから config と参照を差し替える (呼び出し側で _lock を保持)"""
+        current = self._snapshot
+        snap = RegistrySnapshot.build(cameras, devices, current.api_names if current else None)
+        config.CAMERAS = cameras
+        config.MONITOR_DEVICES = devices
+        self._snapshot = snap
+        return snap
+
+    def reload(self, path: Optional[str] = None) -> bool:
+        """
+        devices.json を読み直してスナップショットを差し替える。
+        内容が不正な場合は現在の設定を維持して False を返す。
+        """
+        path = path or config.DEVICES_JSON_PATH
+        with self._lock:
+            mtime = _mtime_ns(path)
+            data = config.load_devices_json(path)
+            if data is None:
+                logger.warning("⚠️ Device registry reload skipped, keeping current configuration.")
+                return False
+            snap = self._publish(data["cameras"], data["monitor_devices"])
+            self._loaded = (path, mtime)
+        logger.info(f"🔄 Device registry reloaded: {len(snap.cameras)} cameras, {len(snap.devices)} devices")
+        return True
+
+    def reload_if_modified(self, path: Optional[str] = None) -> bool:
+        """
+        別プロセス (unified_server の PUT /settings 等) が devices.json を書き換えていれば読み直す。
+        常駐するスケジューラ・監視プロセスが周期の先頭で呼ぶ。
+        """
+        path = path or config.DEVICES_JSON_PATH
+        mtime = _mtime_ns(path)
+        if self._loaded is None or self._loaded[0] != path:
+            # 初回 (またはパスの切り替え直後) は config.py が読み込んだ内容を基準とし、記録だけする
+            self._loaded = (path, mtime)
+            return False
+        if mtime == self._loaded[1]:
+            return False
+        return self.reload(path)
+
+    def set_camera_enabled(self, camera_id: str, enabled: bool) -> bool:
+        """
+        メモリ上のカメラ設定の enabled を差し替える (devices.json の書き込みは camera_service が行う)。
+        該当カメラがなければ False。
+        """
+        with self._lock:
+            cameras = list(config.CAMERAS)
+            for idx, cam in enumerate(cameras):
+                if cam.get("id") == camera_id:
+                    cameras[idx] = {**cam, "enabled": enabled}
+                    break
+            else:
+                return False
+            self._publish(cameras, config.MONITOR_DEVICES)
+            self._loaded = (config.DEVICES_JSON_PATH, _mtime_ns(config.DEVICES_JSON_PATH))
+        return True
+
+    def set_api_names(self, names: Mapping[str, str]) -> None:
+        """SwitchBot API から取得したデバイス名 (deviceId -> deviceName) を登録する"""
+        with self._lock:
+            current = self._snapshot
+            cameras = current.camera_source if current else config.CAMERAS
+            devices = current.device_source if current else config.MONITOR_DEVICES
+            self._snapshot = RegistrySnapshot.build(cameras, devices, names)
+
+    # --- 検索 ---
+    def cameras(self, enabled_only: bool = False) -> Tuple[DeviceEntry, ...]:
+        cams = self.snapshot().cameras
+        if enabled_only:
+            return tuple(c for c in cams if c.get("enabled", True))
+        return cams
+
+    def get_camera(self, camera_id: str) -> Optional[DeviceEntry]:
+        return self.snapshot().camera_by_id.get(camera_id)
+
+    def get_camera_by_name(self, name: str) -> Optional[DeviceEntry]:
+        return self.snapshot().camera_by_name.get(name)
+
+    def cameras_at(self, location: str) -> Tuple[DeviceEntry, ...]:
+        return self.snapshot().cameras_by_location.get(location, ())
+
+    def devices(self) -> Tuple[DeviceEntry, ...]:
+        return self.snapshot().devices
+
+    def get_device(self, device_id: str) -> Optional[DeviceEntry]:
+        snap = self.snapshot()
+        return snap.device_by_id.get(device_id) or snap.device_by_mac.get(normalize_mac(device_id))
+
+    def get_device_by_name(self, name: str) -> Optional[DeviceEntry]:
+        return self.snapshot().device_by_name.get(name)
+
+    def devices_at(self, location: str) -> Tuple[DeviceEntry, ...]:
+        return self.snapshot().devices_by_location.get(location, ())
+
+    def api_name(self, device_id: str) -> Optional[str]:
+        snap = self.snapshot()
+        return snap.api_names.get(device_id) or snap.api_name_by_mac.get(normalize_mac(device_id))
+
+    def device_name(self, device_id: str) -> Optional[str]:
+        """表示名: SwitchBot アプリ上の名前を優先し、なければ devices.json の name"""
+        name = self.api_name(device_id)
+        if name:
+            return name
+        device = self.get_device(device_id)
+        return device.get("name") if device else None
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+_default_registry = DeviceRegistry()
+
+
+def snapshot() -> RegistrySnapshot:
+    return _default_registry.snapshot()
+
+
+def reload(path: Optional[str] = None) -> bool:
+    return _default_registry.reload(path)
+
+
+def reload_if_modified(path: Optional[str] = None) -> bool:
+    return _default_registry.reload_if_modified(path)
+
+
+def set_camera_enabled(camera_id: str, enabled: bool) -> bool:
+    return _default_registry.set_camera_enabled(camera_id, enabled)
+
+
+def set_api_names(names: Mapping[str, str]) -> None:
+    _default_registry.set_api_names(names)
+
+
+def cameras(enabled_only: bool = False) -> Tuple[DeviceEntry, ...]:
+    return _default_registry.cameras(enabled_only)
+
+
+def get_camera(camera_id: str) -> Optional[DeviceEntry]:
+    return _default_registry.get_camera(camera_id)
+
+
+def get_camera_by_name(name: str) -> Optional[DeviceEntry]:
+    return _default_registry.get_camera_by_name(name)
+
+
+def cameras_at(location: str) -> Tuple[DeviceEntry, ...]:
+    return _default_registry.cameras_at(location)
+
+
+def devices() -> Tuple[DeviceEntry, ...]:
+    return _default_registry.devices()
+
+
+def get_device(device_id: str) -> Optional[DeviceEntry]:
+    return _default_registry.get_device(device_id)
+
+
+def get_device_by_name(name: str) -> Optional[DeviceEntry]:
+    return _default_registry.get_device_by_name(name)
+
+
+def devices_at(location: str) -> Tuple[DeviceEntry, ...]:
+    return _default_registry.devices_at(location)
+
+
+def api_name(device_id: str) -> Optional[str]:
+    return _default_registry.api_name(device_id)
+
+
+def device_name(device_id: str) -> Optional[str]:
+    return _default_registry.device_name(device_id)
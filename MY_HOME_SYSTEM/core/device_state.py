@@ -0,0 +1,284 @@
+# MY_HOME_SYSTEM/core/device_state.py
+"""
+デバイスごとの「最新状態」を保持するインメモリストア (SQLite バックアップ付き)。
+
+sensor_service.process_power_data は閾値クロス判定のために、サンプルを1件保存するたびに
+power_usage を `ORDER BY timestamp DESC LIMIT 1` で問い合わせていた(さらに書き込みバッファに
+未反映の行があれば先にフラッシュしていた)。また Webhook の見守り状態 (IS_ACTIVE)・
+開閉通知のクールダウン (LAST_NOTIFY_TIME) はプロセス内の dict、switchbot_power_monitor の
+前回ステータスは JSON ファイル (switchbot_device_states.json) と、状態の置き場所が分散していた。
+
+本モジュールはそれらを1か所にまとめる。
+- 起動時 (DBごとに最初のアクセス時) に1度だけ、device_state テーブルと
+  power_usage / switchbot_logs の「デバイスごとの最新行」から状態を復元する。
+- 以降の読み取りはメモリのみで完結し、書き込み時にメモリ上の状態を更新する。
+- アナログ値 (電力・温湿度) は各ログテーブル自体が永続化先のため、メモリのみ更新する。
+- デジタル状態 (開閉・見守り・通知時刻・監視ステータス) は変更された列だけを
+  flush() で device_state テーブルへ UPSERT する。unified_server とスケジューラの
+  別プロセスが同じ行を更新しても、互いの列を上書きしない。
+"""
+import atexit
+import copy
+import json
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Set
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+from core.utils import get_now_iso
+
+logger = setup_logging("core.device_state")
+
+TABLE_NAME = "device_state"
+
+# device_state テーブルへ永続化する列 (アナログ値はログテーブルから復元する)
+_PERSISTED_FIELDS = ("device_name", "contact_state", "motion_active", "last_notify_at", "status", "last_seen")
+
+
+@dataclass(frozen=True)
+class DeviceSnapshot:
+    """1デバイスの最新状態 (読み取り専用のスナップショット)"""
+    device_id: str
+    device_name: Optional[str] = None
+    wattage: Optional[float] = None
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    contact_state: Optional[str] = None
+    motion_active: bool = False
+    last_notify_at: float = 0.0
+    status: Optional[Dict[str, Any]] = None
+    last_seen: Optional[str] = None
+
+
+def _max_ts(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class DeviceStateStore:
+    """デバイス状態のストア (スレッドセーフ)。DBパスが切り替わった場合は読み込み直す"""
+
+    def __init__(self) -> None:
+        self._states: Dict[str, DeviceSnapshot] = {}
+        self._dirty: Dict[str, Set[str]] = {}
+        self._db_path: Optional[str] = None
+        self._lock = threading.RLock()
+
+    # --- 復元 ---
+    def _ensure_loaded(self) -> None:
+        if self._db_path == config.SQLITE_DB_PATH:
+            return
+        with self._lock:
+            if self._db_path == config.SQLITE_DB_PATH:
+                return
+            db_path = config.SQLITE_DB_PATH
+            try:
+                states = self._load(db_path)
+            except Exception as e:
+                logger.warning(f"⚠️ Device state warm-up failed, starting empty: {e}")
+                states = {}
+            self._states = states
+            self._dirty = {}
+            self._db_path = db_path
+            logger.debug(f"Device state loaded: {len(states)} devices")
+
+    def _load(self, db_path: str) -> Dict[str, DeviceSnapshot]:
+        states: Dict[str, DeviceSnapshot] = {}
+        with get_db_cursor(db_path=db_path) as cur:
+            for row in cur.execute(f"SELECT * FROM {TABLE_NAME}"):
+                status = None
+                if row["status"]:
+                    try:
+                        status = json.loads(row["status"])
+                    except ValueError:
+                        logger.warning(f"⚠️ Invalid status JSON for {row['device_id']}, ignored")
+                states[row["device_id"]] = DeviceSnapshot(
+                    device_id=row["device_id"],
+                    device_name=row["device_name"],
+                    contact_state=row["contact_state"],
+                    motion_active=bool(row["motion_active"]),
+                    last_notify_at=row["last_notify_at"] or 0.0,
+                    status=status,
+                    last_seen=row["last_seen"],
+                )
+
+            # SQLite は MAX() と同じ SELECT 内の素の列を「最大値の行」の値で返す。
+            # (device_id, timestamp DESC) インデックスによりデバイス数ぶんの読み取りで済む
+            latest_queries = (
+                (f"SELECT device_id, device_name, wattage, MAX(timestamp) AS ts "
+                 f"FROM {config.SQLITE_TABLE_POWER_USAGE} WHERE device_id IS NOT NULL GROUP BY device_id",
+                 ("wattage",)),
+                (f"SELECT device_id, device_name, temperature, humidity, MAX(timestamp) AS ts "
+                 f"FROM {config.SQLITE_TABLE_SWITCHBOT_LOGS} WHERE device_id IS NOT NULL GROUP BY device_id",
+                 ("temperature", "humidity")),
+            )
+            for sql, columns in latest_queries:
+                for row in cur.execute(sql):
+                    current = states.get(row["device_id"]) or DeviceSnapshot(device_id=row["device_id"])
+                    values = {c: row[c] for c in columns}
+                    states[row["device_id"]] = replace(
+                        current,
+                        device_name=current.device_name or row["device_name"],
+                        last_seen=_max_ts(current.last_seen, row["ts"]),
+                        **values,
+                    )
+        return states
+
+    # --- 読み取り ---
+    def get(self, device_id: str) -> Optional[DeviceSnapshot]:
+        self._ensure_loaded()
+        with self._lock:
+            snapshot = self._states.get(device_id)
+        if snapshot is not None and snapshot.status is not None:
+            snapshot = replace(snapshot, status=copy.deepcopy(snapshot.status))
+        return snapshot
+
+    def snapshot(self) -> Dict[str, DeviceSnapshot]:
+        """全デバイスの状態を返す (呼び出し側で変更しても内部状態に影響しない)"""
+        self._ensure_loaded()
+        with self._lock:
+            states = dict(self._states)
+        return {
+            k: replace(v, status=copy.deepcopy(v.status)) if v.status is not None else v
+            for k, v in states.items()
+        }
+
+    # --- 書き込み ---
+    def update(self, device_id: str, **changes: Any) -> DeviceSnapshot:
+        """
+        状態を更新して更新後のスナップショットを返す。
+        last_seen を省略した場合は現在時刻を記録する。変更された永続化対象の列は
+        flush() まで device_state テーブルへの書き込みを保留する。
+        """
+        unknown = set(changes) - set(DeviceSnapshot.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown device state fields: {sorted(unknown)}")
+        if changes.get("status") is not None:
+            changes["status"] = copy.deepcopy(changes["status"])
+        changes.setdefault("last_seen", get_now_iso())
+
+        self._ensure_loaded()
+        with self._lock:
+            current = self._states.get(device_id) or DeviceSnapshot(device_id=device_id)
+            if changes.get("device_name") is None:
+                changes.pop("device_name", None)
+            updated = replace(current, **changes)
+            self._states[device_id] = updated
+            changed = {f for f in _PERSISTED_FIELDS if getattr(current, f) != getattr(updated, f)}
+            # アナログ値のみの更新では last_seen だけを永続化しない (ログテーブルから復元できる)
+            if changed - {"last_seen", "device_name"}:
+                self._dirty.setdefault(device_id, set()).update(changed)
+        if updated.status is not None:
+            updated = replace(updated, status=copy.deepcopy(updated.status))
+        return updated
+
+    def record_power(self, device_id: str, device_name: str, wattage: float, timestamp: Optional[str] = None) -> Optional[float]:
+        """電力サンプルを反映し、直前の電力値 (なければ None) を返す"""
+        self._ensure_loaded()
+        with self._lock:
+            previous = self._states.get(device_id)
+            self.update(device_id, device_name=device_name, wattage=wattage,
+                        last_seen=timestamp or get_now_iso())
+        return previous.wattage if previous else None
+
+    def record_meter(self, device_id: str, device_name: str, temperature: float, humidity: float,
+                     timestamp: Optional[str] = None) -> None:
+        self.update(device_id, device_name=device_name, temperature=temperature, humidity=humidity,
+                    last_seen=timestamp or get_now_iso())
+
+    def dirty_count(self) -> int:
+        with self._lock:
+            return len(self._dirty)
+
+    def flush(self) -> int:
+        """変更のあった永続化対象の列を device_state テーブルへ書き込み、書き込んだデバイス数を返す"""
+        with self._lock:
+            if not self._dirty or self._db_path is None:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            db_path = self._db_path
+            rows = []
+            for device_id, fields in dirty.items():
+                state = self._states[device_id]
+                values = {f: getattr(state, f) for f in sorted(fields)}
+                if "status" in values and values["status"] is not None:
+                    values["status"] = json.dumps(values["status"], ensure_ascii=False)
+                if "motion_active" in values:
+                    values["motion_active"] = int(values["motion_active"])
+                rows.append((device_id, values))
+
+        try:
+            with get_db_cursor(commit=True, db_path=db_path) as cur:
+                for device_id, values in rows:
+                    columns = list(values)
+                    placeholders = ", ".join(["?"] * (len(columns) + 1))
+                    updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+                    cur.execute(
+                        f"INSERT INTO {TABLE_NAME} (device_id, {', '.join(columns)}) VALUES ({placeholders}) "
+                        f"ON CONFLICT(device_id) DO UPDATE SET {updates}",
+                        (device_id, *values.values()),
+                    )
+        except Exception as e:
+            logger.error(f"❌ Device state flush failed: {e}")
+            with self._lock:
+                # 失敗した列は次回の flush で再試行する
+                for device_id, fields in dirty.items():
+                    self._dirty.setdefault(device_id, set()).update(fields)
+            return 0
+        return len(rows)
+
+    def reset(self) -> None:
+        """メモリ上の状態を破棄し、次回アクセス時にDBから読み込み直す (プロセス再起動相当)"""
+        with self._lock:
+            self._states = {}
+            self._dirty = {}
+            self._db_path = None
+
+
+_default_store = DeviceStateStore()
+
+
+def get(device_id: str) -> Optional[DeviceSnapshot]:
+    return _default_store.get(device_id)
+
+
+def snapshot() -> Dict[str, DeviceSnapshot]:
+    return _default_store.snapshot()
+
+
+def update(device_id: str, **changes: Any) -> DeviceSnapshot:
+    return _default_store.update(device_id, **changes)
+
+
+def record_power(device_id: str, device_name: str, wattage: float, timestamp: Optional[str] = None) -> Optional[float]:
+    return _default_store.record_power(device_id, device_name, wattage, timestamp)
+
+
+def record_meter(device_id: str, device_name: str, temperature: float, humidity: float,
+                 timestamp: Optional[str] = None) -> None:
+    _default_store.record_meter(device_id, device_name, temperature, humidity, timestamp)
+
+
+def dirty_count() -> int:
+    return _default_store.dirty_count()
+
+
+def flush() -> int:
+    return _default_store.flush()
+
+
+def reset() -> None:
+    _default_store.reset()
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    try:
+        _default_store.flush()
+    except Exception:
+        pass
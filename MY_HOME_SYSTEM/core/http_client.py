@@ -0,0 +1,154 @@
+# MY_HOME_SYSTEM/core/http_client.py
+"""
+外部APIポーリング用の共有非同期HTTPクライアントとレート制限。
+
+SwitchBot / Nature Remo の監視スクリプトは、デバイスごとに requests で同期的に問い合わせ、
+リクエストのたびにセッション (TCP/TLS接続) を作り直していた。本モジュールは
+- AsyncHttpClient: aiohttp の接続プール (keep-alive) を1回のポーリング周期の間で共有し、
+  タイムアウト・接続エラー・5xx は指数バックオフで再試行する (4xx は即座に諦める)。
+- TokenBucket: APIの利用上限 (1日あたり / 一定時間あたり) に合わせたトークンバケット。
+  プロセス内で共有し、イベントループをまたいで使えるよう threading.Lock で保護する。
+を提供する。どちらも失敗時は例外ではなく None を返す (Fail-Soft)。
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+from core.logger import setup_logging
+
+logger = setup_logging("core.http_client")
+
+
+class TokenBucket:
+    """rate_per_sec で補充され、最大 capacity 個まで貯まるトークンバケット"""
+
+    def __init__(self, rate_per_sec: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.rejected = 0
+
+    @classmethod
+    def per_period(cls, calls: float, period_sec: float, burst: Optional[float] = None, **kwargs: Any) -> "TokenBucket":
+        """「period_sec 秒あたり calls 回」の上限に合わせたバケットを作る"""
+        return cls(calls / period_sec, burst if burst is not None else calls, **kwargs)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_sec)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """トークンを取得できれば 0.0、できなければ取得可能になるまでの待ち秒数を返す"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += 1
+                return 0.0
+            if self.rate_per_sec <= 0:
+                return float("inf")
+            return (tokens - self._tokens) / self.rate_per_sec
+
+    async def acquire(self, max_wait: float = 0.0, tokens: float = 1.0) -> bool:
+        """max_wait 秒までトークンの補充を待つ。待っても取得できない場合は False"""
+        deadline = self._clock() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if self._clock() + wait > deadline:
+                with self._lock:
+                    self.rejected += 1
+                return False
+            await asyncio.sleep(wait)
+
+
+class AsyncHttpClient:
+    """
+    keep-alive の接続プールを共有する非同期HTTPクライアント。
+    aiohttp のセッションはイベントループに紐づくため、`async with` の範囲 (1回のポーリング周期) で使う。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 8,
+        timeout_sec: float = 10.0,
+        max_retries: int = 3,
+        backoff_sec: float = 1.0,
+        limiter_wait_sec: float = 0.0,
+    ) -> None:
+        self.max_connections = max_connections
+        self.timeout_sec = timeout_sec
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.limiter_wait_sec = limiter_wait_sec
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout_sec)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_json(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        limiter: Optional[TokenBucket] = None,
+        headers_factory: Optional[Callable[[], Dict[str, str]]] = None,
+    ) -> Optional[Any]:
+        """
+        GET して JSON を返す。失敗時・レート上限到達時は None。
+        headers_factory を指定した場合は試行ごとにヘッダーを作り直す (署名付きAPIの nonce 対策)。
+        リトライも1回のAPI呼び出しとして limiter のトークンを消費する。
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncHttpClient must be used with 'async with'")
+
+        for attempt in range(self.max_retries):
+            if limiter is not None and not await limiter.acquire(self.limiter_wait_sec):
+                self.stats["rate_limited"] += 1
+                logger.warning(f"⚠️ API rate budget exhausted, skipped: {url}")
+                return None
+
+            self.stats["requests"] += 1
+            try:
+                async with self._session.get(url, headers=headers_factory() if headers_factory else headers) as res:
+                    if res.status >= 500:
+                        raise aiohttp.ClientResponseError(
+                            res.request_info, res.history, status=res.status, message=res.reason or ""
+                        )
+                    if res.status >= 400:
+                        # 認証エラー(401)・レート超過(429)等はリトライしても解決しないため即座に諦める
+                        self.stats["errors"] += 1
+                        logger.error(f"❌ API error {res.status}: {url}")
+                        return None
+                    return await res.json(content_type=None)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientResponseError) as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ API connection issue (Attempt {attempt + 1}/{self.max_retries}): {url} {type(e).__name__}: {e}")
+            except (aiohttp.ClientError, ValueError) as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ API fatal error: {url} {type(e).__name__}: {e}")
+                return None
+
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(self.backoff_sec * (2 ** attempt))
+
+        logger.warning(f"⚠️ API completely failed after retries: {url}")
+        return None
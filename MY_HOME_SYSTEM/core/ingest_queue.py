@@ -0,0 +1,246 @@
+# MY_HOME_SYSTEM/core/ingest_queue.py
+"""
+センサーログ用の書き込みバッファ (write-behind)。
+
+save_log_generic / save_log_async はサンプル1件ごとに INSERT + COMMIT を行うため、
+SwitchBot Webhook・電力/温湿度のポーリング・ONVIF動体検知の1件ごとにWALのfsyncが
+発生していた。本モジュールは受け付けた行を (DBパス, テーブル, カラム) 単位で
+バッファし、件数(INGEST_BATCH_ROWS)または経過時間(INGEST_FLUSH_INTERVAL_MS)の
+しきい値に達した時点で、1トランザクション内の executemany でまとめて書き込む。
+
+- メモリ上限: バッファ中の行数が INGEST_MAX_PENDING_ROWS に達した場合、
+  受付側のスレッドがその場でフラッシュを実行してから受け付ける(バックプレッシャー)。
+  行を捨てることはしない。
+- 失敗時: バッチ単位の executemany が失敗した場合は1行ずつ再試行し、
+  不正な行だけを save_log_generic と同じ形式でエラーログに残す。
+- 終了時: unified_server の lifespan 終了処理、および atexit で残りをフラッシュする。
+"""
+import asyncio
+import atexit
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+
+logger = setup_logging("core.ingest_queue")
+
+# (db_path, table, columns)
+_BatchKey = Tuple[str, str, Tuple[str, ...]]
+
+
+class IngestQueue:
+    """テーブル単位で行をバッファし、まとめて書き込むキュー (スレッドセーフ)"""
+
+    def __init__(
+        self,
+        batch_rows: int = 200,
+        flush_interval_sec: float = 0.5,
+        max_pending_rows: int = 10000,
+    ) -> None:
+        self.batch_rows = batch_rows
+        self.flush_interval_sec = flush_interval_sec
+        self.max_pending_rows = max_pending_rows
+
+        self._buffers: Dict[_BatchKey, List[tuple]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # フラッシュは常に1つずつ実行し、同一テーブル内の書き込み順序を保つ
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "flushes": 0,
+            "backpressure_flushes": 0,
+        }
+
+    # --- 受付 ---
+    def _key(self, table: str, columns_list: List[str], values_list: tuple) -> Optional[_BatchKey]:
+        if len(columns_list) != len(values_list):
+            logger.error(f"データ保存失敗 ({table}): カラム数と値の数が一致しません")
+            return None
+        return (config.SQLITE_DB_PATH, table, tuple(columns_list))
+
+    def _try_append(self, key: _BatchKey, values_list: tuple) -> bool:
+        """上限に空きがあれば1行を追加する。上限の確認と追加は同じロック内で行う"""
+        with self._lock:
+            if self._pending >= self.max_pending_rows:
+                self._stats["backpressure_flushes"] += 1
+                return False
+            self._buffers.setdefault(key, []).append(tuple(values_list))
+            self._pending += 1
+            self._stats["enqueued"] += 1
+            if self._pending >= self.batch_rows:
+                self._wakeup.notify()
+            return True
+
+    def enqueue(self, table: str, columns_list: List[str], values_list: tuple) -> bool:
+        """
+        1行をバッファへ追加する。書き込みは非同期に行われるため、戻り値は
+        「受け付けたかどうか」であり、DBへの書き込み成否ではない。
+        """
+        key = self._key(table, columns_list, values_list)
+        if key is None:
+            return False
+        self._ensure_worker()
+
+        while not self._try_append(key, values_list):
+            # バックプレッシャー: 受付側で書き込みを肩代わりし、メモリ使用量を上限内に保つ
+            self.flush()
+        return True
+
+    async def enqueue_async(self, table: str, columns_list: List[str], values_list: tuple) -> bool:
+        """enqueue の非同期版。イベントループ上では書き込みを行わず、上限に達している場合はスレッドへ逃がす"""
+        key = self._key(table, columns_list, values_list)
+        if key is None:
+            return False
+        self._ensure_worker()
+
+        if self._try_append(key, values_list):
+            return True
+        return await asyncio.to_thread(self.enqueue, table, columns_list, values_list)
+
+    # --- 書き込み ---
+    def _take(self, table: Optional[str]) -> Dict[_BatchKey, List[tuple]]:
+        with self._lock:
+            if table is None:
+                taken, self._buffers = self._buffers, {}
+            else:
+                taken = {k: v for k, v in self._buffers.items() if k[1] == table}
+                for k in taken:
+                    del self._buffers[k]
+            self._pending -= sum(len(rows) for rows in taken.values())
+        return taken
+
+    def _write_batch(self, key: _BatchKey, rows: List[tuple]) -> None:
+        db_path, table, columns = key
+        placeholders = ", ".join(["?"] * len(columns))
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        try:
+            with get_db_cursor(commit=True, db_path=db_path) as cur:
+                cur.executemany(sql, rows)
+            written, failed = len(rows), 0
+        except Exception as batch_error:
+            # 1行の不正データでバッチ全体を失わないよう、1行ずつ再試行する
+            logger.warning(f"⚠️ Batch insert into {table} failed ({len(rows)} rows), retrying row by row: {batch_error}")
+            written, failed = 0, 0
+            for row in rows:
+                try:
+                    with get_db_cursor(commit=True, db_path=db_path) as cur:
+                        cur.execute(sql, row)
+                    written += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"データ保存失敗 ({table}): {e}")
+        with self._lock:
+            self._stats["written"] += written
+            self._stats["failed"] += failed
+
+    def flush(self, table: Optional[str] = None) -> int:
+        """
+        バッファ済みの行を書き込む。table を指定した場合はそのテーブル分のみ。
+        書き込みを試みた行数を返す。
+        """
+        with self._flush_lock:
+            taken = self._take(table)
+            if not taken:
+                return 0
+            for key, rows in taken.items():
+                self._write_batch(key, rows)
+            with self._lock:
+                self._stats["flushes"] += 1
+            return sum(len(rows) for rows in taken.values())
+
+    def pending_count(self, table: Optional[str] = None) -> int:
+        with self._lock:
+            if table is None:
+                return self._pending
+            return sum(len(v) for k, v in self._buffers.items() if k[1] == table)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = self._pending
+        return snapshot
+
+    # --- バックグラウンドスレッド ---
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="ingest-queue-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._stopping and self._pending < self.batch_rows:
+                    self._wakeup.wait(timeout=self.flush_interval_sec)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ingest queue flush error: {e}")
+            if stopping:
+                return
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """バックグラウンドスレッドを停止し、残りの行をすべて書き込む"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with self._lock:
+                self._stopping = True
+                self._wakeup.notify()
+            thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+
+_default_queue = IngestQueue(
+    batch_rows=config.INGEST_BATCH_ROWS,
+    flush_interval_sec=config.INGEST_FLUSH_INTERVAL_MS / 1000.0,
+    max_pending_rows=config.INGEST_MAX_PENDING_ROWS,
+)
+
+
+def enqueue_log(table: str, columns_list: List[str], values_list: tuple) -> bool:
+    """save_log_generic のバッファ版 (書き込みはバックグラウンドでまとめて行われる)"""
+    return _default_queue.enqueue(table, columns_list, values_list)
+
+
+async def enqueue_log_async(table: str, columns_list: List[str], values_list: tuple) -> bool:
+    """save_log_async のバッファ版"""
+    return await _default_queue.enqueue_async(table, columns_list, values_list)
+
+
+def flush(table: Optional[str] = None) -> int:
+    return _default_queue.flush(table)
+
+
+def pending_count(table: Optional[str] = None) -> int:
+    return _default_queue.pending_count(table)
+
+
+def get_stats() -> Dict[str, Any]:
+    return _default_queue.stats()
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    _default_queue.shutdown(timeout)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    # 監視スクリプト等の短命プロセスでも、終了時にバッファを取りこぼさないようにする
+    try:
+        _default_queue.shutdown(timeout=2.0)
+    except Exception:
+        pass
@@ -0,0 +1,110 @@
+# MY_HOME_SYSTEM/core/keyed_dispatcher.py
+"""
+キー (LINE のユーザーID等) ごとに順序を保ってイベントを処理する、イベントループ上のディスパッチャ。
+
+- submit: 呼び出し元のイベントループ上でキーごとの asyncio.Queue へ積むだけで戻る (Webhook の応答を待たせない)。
+- 同じキーのイベントは1つのワーカータスクが届いた順に1件ずつ処理し、異なるキーは並行に処理する。
+- キューはキーごとに max_pending 件までで、あふれた分は捨ててログに残す (Webhook の再送や連打で
+  メモリを使い続けないため)。
+- ワーカーは idle_sec 秒イベントが来なければ終了し、キーごとの状態を片付ける。
+- 別のイベントループから submit された場合 (テストや再起動)、前のループの状態は捨てて作り直す。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from core.logger import setup_logging
+
+logger = setup_logging("core.keyed_dispatcher")
+
+
+class KeyedDispatcher:
+    """キーごとの順序付き・上限付きキューで、非同期ハンドラを呼び出す"""
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        max_pending: int = 20,
+        idle_sec: float = 30.0,
+        name: str = "dispatcher",
+    ) -> None:
+        self.handler = handler
+        self.max_pending = max_pending
+        self.idle_sec = idle_sec
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Dict[Hashable, asyncio.Queue] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+        self.stats: Dict[str, int] = {"submitted": 0, "processed": 0, "failed": 0, "dropped": 0}
+
+    def submit(self, key: Hashable, item: Any) -> bool:
+        """item を key のキューへ積む。実行中のイベントループ上から呼ぶこと。キューが満杯なら False"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queues = {}
+            self._workers = {}
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_pending)
+            self._queues[key] = queue
+            self._workers[key] = loop.create_task(self._work(key, queue), name=f"{self.name}:{key}")
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning(f"⚠️ {self.name}: キューが満杯のためイベントを破棄しました (key={key})")
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _work(self, key: Hashable, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=self.idle_sec)
+            except asyncio.TimeoutError:
+                # 待っている間に積まれていなければ片付ける (ここから削除までの間に await は無い)
+                if queue.empty():
+                    if self._queues.get(key) is queue:
+                        del self._queues[key]
+                        del self._workers[key]
+                    return
+                continue
+            try:
+                await self.handler(item)
+                self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"❌ {self.name}: イベント処理エラー (key={key}): {e}")
+            finally:
+                queue.task_done()
+
+    def pending(self) -> int:
+        """キューに残っている (処理待ちの) 件数"""
+        return sum(q.qsize() for q in self._queues.values())
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """現在のイベントループで積まれたイベントをすべて処理し終えるまで待つ。timeout 内に終われば True"""
+        if self._loop is not asyncio.get_running_loop():
+            return True
+        queues = list(self._queues.values())
+        if not queues:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in queues)), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """処理待ちのイベントを timeout 秒まで処理してから、ワーカーを止める"""
+        if not await self.join(timeout):
+            logger.warning(f"⚠️ {self.name}: 終了時に {self.pending()} 件のイベントを処理しきれませんでした")
+        if self._loop is not asyncio.get_running_loop():
+            return
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._queues = {}
+        self._workers = {}
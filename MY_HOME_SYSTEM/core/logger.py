@@ -1,55 +1,185 @@
+import atexit
+import copy
 import logging
+import queue
 import threading
+import time
 import traceback
 import os
 import requests
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Any, Dict, List, Optional, Tuple
 import config
 
 # === ロギング設定 ===
+# ログの出力はプロセスで1つの経路にまとめる:
+#   各ロガー -> PipelineHandler (キューへ積むだけ) -> QueueListener (1スレッド) -> コンソール / ファイル / Discord
+# 以前は setup_logging のたびにロガーごとにファイルハンドラを作り、エラーログ1件ごとに
+# Discord 送信用のスレッドを立てていたため、エラーが続くとスレッドと送信が際限なく増えていた。
+
+DISCORD_CONTENT_LIMIT = 2000
+STACK_TRACE_LIMIT = 1000
+
+
 class DiscordErrorHandler(logging.Handler):
-    """エラーログをDiscordに通知するハンドラ (スタックトレース対応版)"""
+    """
+    エラーログをDiscordに通知するハンドラ (スタックトレース対応版)
+
+    送信は専用の1スレッドで行い、emit() はすぐ戻る。同じエラー (ロガー・発生箇所・本文が同じ) は
+    最初の1件だけをすぐ送り、2回目以降は LOG_DISCORD_DIGEST_SEC 秒ごとに「x37 in last 60s」の形で
+    まとめて送る。Webhook ごとにトークンバケット (LOG_DISCORD_BURST / LOG_DISCORD_PER_MINUTE) で
+    送信数を抑え、あふれた分もまとめ送信へ回す。
+    """
     # ★追加: 初期化時にWebhook URLを受け取れるようにする
-    def __init__(self, webhook_url=None):
+    def __init__(self, webhook_url=None, digest_sec=None, burst=None, per_minute=None, clock=time.monotonic):
         super().__init__()
         self.webhook_url = webhook_url
-    
-    
+        # None の場合は config の値を毎回参照する (実行中の設定変更・テストでの差し替えに追従する)
+        self.digest_sec = digest_sec
+        self.burst = burst
+        self.per_minute = per_minute
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        # (url, fingerprint) -> [前回のまとめ送信以降の件数, 表示用の本文]
+        self._seen: Dict[Tuple[str, Any], List[Any]] = {}
+        # url -> [残りトークン, 最終更新時刻]
+        self._buckets: Dict[str, List[float]] = {}
+        self._next_digest_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.stats = {"received": 0, "sent": 0, "aggregated": 0, "digests": 0}
+
     def emit(self, record):
         # M-5-5(Low): record.msg は例外オブジェクト等の非文字列が渡される場合もあるため、
         # str化してから比較する("Discord" not in record.msg は非文字列だとTypeErrorになりうる)。
-        if record.levelno >= logging.ERROR and "Discord" not in str(record.msg):
-            try:
+        if record.levelno < logging.ERROR or "Discord" in str(record.msg):
+            return
+        try:
+            # PipelineHandler を通ったログはロガーごとの送信先を持つ (None は Discord へ送らないロガー)
+            if hasattr(record, "discord_webhook_url"):
+                url = record.discord_webhook_url
+            else:
                 # ★修正: 指定されたURLがあれば使い、なければデフォルト設定を使う
                 url = self.webhook_url or config.DISCORD_WEBHOOK_ERROR
-                if not url:
-                    return
+            if not url:
+                return
+
+            message = record.getMessage()
+            fingerprint = (record.name, record.levelno, record.pathname, record.lineno, message)
+            with self._cond:
+                self.stats["received"] += 1
+                now = self.clock()
+                seen = self._seen.get((url, fingerprint))
+                if seen is None and self._take_token(url, now):
+                    self._seen[(url, fingerprint)] = [0, message]
+                    self._pending.append((url, {"content": self._render(record)}))
+                elif seen is None:
+                    self._seen[(url, fingerprint)] = [1, message]
+                    self.stats["aggregated"] += 1
+                else:
+                    seen[0] += 1
+                    self.stats["aggregated"] += 1
+                if self._next_digest_at is None:
+                    self._next_digest_at = now + self._digest_sec()
+                self._ensure_thread()
+                self._cond.notify()
+        except Exception:
+            pass
+
+    def _render(self, record) -> str:
+        log_msg = self.format(record)
+
+        stack_trace = getattr(record, "discord_stack", None)
+        if stack_trace is None:
+            if record.exc_info:
+                stack_trace = "".join(traceback.format_exception(*record.exc_info))
+            else:
+                stack_trace = "".join(traceback.format_stack())
+
+        content = f"😰 **システムエラー発生**\n```python\n{log_msg}\n```"
+
+        if stack_trace:
+            trace_snippet = stack_trace[-STACK_TRACE_LIMIT:]
+            content += f"\n**Stack Trace (End):**\n```python\n{trace_snippet}```"
+        return content[:DISCORD_CONTENT_LIMIT]
 
+    def _digest_sec(self) -> float:
+        return config.LOG_DISCORD_DIGEST_SEC if self.digest_sec is None else self.digest_sec
 
-                log_msg = self.format(record)
+    def _take_token(self, url: str, now: float) -> bool:
+        burst = config.LOG_DISCORD_BURST if self.burst is None else self.burst
+        per_minute = config.LOG_DISCORD_PER_MINUTE if self.per_minute is None else self.per_minute
+        bucket = self._buckets.setdefault(url, [float(burst), now])
+        bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * per_minute / 60.0)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
 
-                stack_trace = ""
-                if record.exc_info:
-                    stack_trace = "".join(traceback.format_exception(*record.exc_info))
-                elif record.levelno >= logging.ERROR:
-                    stack_trace = "".join(traceback.format_stack())
+    def _collect_digests(self, now: float, final: bool = False) -> List[Tuple[str, Dict[str, Any]]]:
+        """件数の溜まったエラーを Webhook ごとに1通へまとめる。この期間に1件も無かったエラーは忘れる"""
+        window = int(self._digest_sec())
+        lines: Dict[str, List[str]] = {}
+        for key, seen in list(self._seen.items()):
+            url = key[0]
+            if seen[0] == 0:
+                del self._seen[key]
+            else:
+                lines.setdefault(url, []).append(f"x{seen[0]} in last {window}s: {seen[1][:300]}")
+        digests = []
+        for url, url_lines in lines.items():
+            # 送れない (トークン切れ) 場合は件数を持ち越して次の期間にまとめる。終了時は上限を無視して送る
+            if not final and not self._take_token(url, now):
+                continue
+            body = "\n".join(url_lines)
+            content = f"🔁 **エラーの集約**\n```\n{body}"[:DISCORD_CONTENT_LIMIT - 4] + "\n```"
+            digests.append((url, {"content": content}))
+            for key, seen in self._seen.items():
+                if key[0] == url:
+                    seen[0] = 0
+        return digests
 
-                content = f"😰 **システムエラー発生**\n```python\n{log_msg}\n```"
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="discord-error-log", daemon=True)
+            self._thread.start()
 
-                if stack_trace:
-                    trace_snippet = stack_trace[-1000:]
-                    content += f"\n**Stack Trace (End):**\n```python\n{trace_snippet}```"
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping and (
+                    self._next_digest_at is None or self.clock() < self._next_digest_at
+                ):
+                    timeout = None if self._next_digest_at is None else self._next_digest_at - self.clock()
+                    self._cond.wait(timeout)
+                sends, self._pending = self._pending, []
+                now = self.clock()
+                if self._stopping or (self._next_digest_at is not None and now >= self._next_digest_at):
+                    digests = self._collect_digests(now, final=self._stopping)
+                    self.stats["digests"] += len(digests)
+                    sends.extend(digests)
+                    self._next_digest_at = now + self._digest_sec() if self._seen else None
+                stopping = self._stopping
+            for url, payload in sends:
+                self._send_webhook(url, payload)
+                with self._cond:
+                    self.stats["sent"] += 1
+            if stopping:
+                return
 
-                payload = {"content": content}
-                # M-5-5: emit()はログ出力のたびにリクエスト処理スレッド上で呼ばれるため、
-                # ここで同期的にrequests.postすると、Discord側が遅い/落ちている場合に
-                # そのスレッドをtimeout秒(最大5秒)ブロックしてしまう。バックグラウンド
-                # スレッドで送信し、emit()自体は即座に返すようにする。
-                threading.Thread(
-                    target=self._send_webhook, args=(url, payload), daemon=True
-                ).start()
-            except Exception:
-                pass
+    def close(self) -> None:
+        """送信待ちと、まとめ送信前の件数を送ってからスレッドを止める"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            thread.join(timeout=10)
+        super().close()
 
     @staticmethod
     def _send_webhook(url, payload):
@@ -58,45 +188,121 @@ class DiscordErrorHandler(logging.Handler):
         except Exception:
             pass
 
+
+class PipelineHandler(QueueHandler):
+    """ロガーに付けるハンドラ。レコードを整えてプロセス共通のキューへ積むだけで、出力は QueueListener が行う"""
+
+    def __init__(self, log_queue, webhook_url: Optional[str] = None):
+        super().__init__(log_queue)
+        self.webhook_url = webhook_url
+
+    def prepare(self, record):
+        # 別スレッドで出力するため、引数の展開と例外・呼び出し元のスタックの文字列化はここ (ログを出したスレッド) で行う
+        record = copy.copy(record)
+        message = record.getMessage()
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            if self.webhook_url and record.levelno >= logging.ERROR:
+                record.discord_stack = "".join(traceback.format_exception(*record.exc_info))
+        elif self.webhook_url and record.levelno >= logging.ERROR:
+            record.discord_stack = _caller_stack()
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.discord_webhook_url = self.webhook_url
+        return record
+
+    def emit(self, record):
+        listener = _listener
+        if listener is None:
+            # 終了処理で出力経路を止めた後のログは、呼び出し元のスレッドでそのまま出力する
+            record = self.prepare(record)
+            for handler in _sinks:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        super().emit(record)
+
+
+def _caller_stack() -> str:
+    """ログを出した箇所までのスタック (logging と このモジュールのフレームは除く)"""
+    frames = [f for f in traceback.extract_stack() if f.filename not in (logging.__file__, __file__)]
+    return "".join(traceback.format_list(frames))
+
+
+_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+_setup_lock = threading.Lock()
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_sinks: List[logging.Handler] = []
+_listener: Optional[QueueListener] = None
+
+
+def _start_pipeline() -> None:
+    """出力先 (コンソール・ファイル・Discord) と QueueListener をプロセスで1回だけ用意する"""
+    global _listener
+    if _listener is not None:
+        return
+    if not _sinks:
+        # コンソール出力
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(_formatter)
+
+        # ファイル出力
+        log_dir = os.path.join(config.BASE_DIR, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        log_file = os.path.join(log_dir, "home_system.log")
+        file_handler = TimedRotatingFileHandler(
+            filename=log_file,
+            when='midnight',
+            interval=1,
+            backupCount=7,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(_formatter)
+
+        # Discord通知 (送信先はロガーごとに PipelineHandler がレコードへ付ける)
+        discord_handler = DiscordErrorHandler()
+        discord_handler.setLevel(logging.ERROR)
+        discord_handler.setFormatter(_formatter)
+        _sinks.extend([stream_handler, file_handler, discord_handler])
+
+    _listener = QueueListener(_queue, *_sinks, respect_handler_level=True)
+    _listener.start()
+
+
+@atexit.register
+def shutdown_logging() -> None:
+    """キューに残ったログを出力し、Discord のまとめ送信を送ってから出力経路を止める (以降のログは同期出力)"""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+    for handler in _sinks:
+        if isinstance(handler, DiscordErrorHandler):
+            handler.close()
+
+
 def setup_logging(name: str, webhook_url: str = None) -> logging.Logger:
-    """ロガーのセットアップ"""
+    """
+    ロガーのセットアップ
+
+    何度呼んでも同じロガーに付くハンドラは PipelineHandler 1つだけで、出力先はプロセス全体で共有する。
+    """
     logger = logging.getLogger(name)
-    logger.propagate = False
-    
-    if logger.handlers:
-        logger.handlers.clear()
-    
-    logger.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-
-    # コンソール出力
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
-    # ファイル出力
-    log_dir = os.path.join(config.BASE_DIR, "logs")
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, "home_system.log")
-    file_handler = TimedRotatingFileHandler(
-        filename=log_file,
-        when='midnight',
-        interval=1,
-        backupCount=7,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-    # Discord通知
     # ★追加: 引数でURLが指定されていれば優先、なければconfig.DISCORD_WEBHOOK_ERRORを使用
     target_url = webhook_url or getattr(config, "DISCORD_WEBHOOK_ERROR", None)
 
-    if target_url:
-        discord_handler = DiscordErrorHandler(webhook_url=target_url)
-        discord_handler.setLevel(logging.ERROR)
-        discord_handler.setFormatter(formatter)
-        logger.addHandler(discord_handler)
+    with _setup_lock:
+        _start_pipeline()
+        handlers = logger.handlers
+        if not (len(handlers) == 1 and isinstance(handlers[0], PipelineHandler)
+                and handlers[0].webhook_url == target_url):
+            handlers.clear()
+            logger.addHandler(PipelineHandler(_queue, target_url))
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
 
     return logger
 
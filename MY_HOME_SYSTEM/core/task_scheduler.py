@@ -0,0 +1,407 @@
+# MY_HOME_SYSTEM/core/task_scheduler.py
+"""
+常駐型の定期タスクスケジューラ (scheduler_boot.py から利用)。
+
+従来は実行のたびに subprocess.run で新しいPythonプロセスを起動していたため、
+Raspberry Pi 上では毎回 pandas / requests / pydantic 等のimportに数秒のCPUと
+一時的なメモリ消費が発生していた。本モジュールは各監視モジュールを1度だけimportし、
+エントリ関数 ("パッケージ.モジュール:関数名") を常駐プロセス内で呼び出す。
+
+- 実行モード:
+  - inprocess: スケジューラのスレッドプール上で直接呼び出す。
+    スレッドは強制終了できないため、タイムアウト超過は警告と "timeout" 記録のみ行い、
+    終了するまで同じタスクの次回実行をスキップする。
+  - worker: タスク専用の常駐ワーカープロセス (multiprocessing spawn) で実行する。
+    クラッシュ・ハングしうるタスク向けで、タイムアウト時はワーカーを強制終了し、
+    次回実行時に再起動する。
+  - subprocess: 従来どおり実行ごとに新しいプロセスを起動する (フォールバック)。
+- スケジュール: time.monotonic 基準の固定間隔 + 揺らぎ(jitter)。揺らぎは次回だけに加え、
+  間隔の基準時刻には累積させない。
+- 実行結果 (所要時間・CPU時間・結果) は scheduler_runs テーブルへ記録する。
+"""
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+
+logger = setup_logging("core.task_scheduler")
+
+MODE_INPROCESS = "inprocess"
+MODE_WORKER = "worker"
+MODE_SUBPROCESS = "subprocess"
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CRASH = "crash"
+OUTCOME_SKIPPED = "skipped"
+
+
+@dataclass
+class ScheduledTask:
+    """定期実行するタスクの定義"""
+    name: str
+    # subprocess モード(フォールバック)で実行するスクリプトのパス (プロジェクトルートからの相対)
+    script: str
+    interval: float
+    # 常駐モードで呼び出すエントリ関数 ("monitors.nas_monitor:main")。None なら常に subprocess
+    entry: Optional[str] = None
+    # True なら専用の常駐ワーカープロセスで実行する
+    isolate: bool = False
+    timeout: float = 3600.0
+    args: List[str] = field(default_factory=list)
+    # subprocess モードで実行するときの間隔。実行ごとにPythonを起動するため、
+    # 常駐モード向けの短い間隔をそのまま使いたくないタスクで指定する (None なら interval)
+    subprocess_interval: Optional[float] = None
+
+
+# ==========================================
+# エントリ関数の解決と実行
+# ==========================================
+_entry_cache: Dict[str, Callable[[], Any]] = {}
+
+
+def resolve_entry(entry: str) -> Callable[[], Any]:
+    """"module:function" 形式のエントリを関数へ解決する (モジュールのimportは初回のみ)"""
+    fn = _entry_cache.get(entry)
+    if fn is None:
+        module_name, _, func_name = entry.partition(":")
+        module = importlib.import_module(module_name)
+        fn = getattr(module, func_name or "main")
+        _entry_cache[entry] = fn
+    return fn
+
+
+def call_entry(entry: str) -> None:
+    """エントリ関数を呼び出す。async 関数の場合は専用のイベントループで完了まで実行する"""
+    result = resolve_entry(entry)()
+    if inspect.isawaitable(result):
+        asyncio.run(_await(result))
+
+
+async def _await(awaitable: Any) -> Any:
+    return await awaitable
+
+
+def _flush_ingest_queue() -> None:
+    # センサーログの書き込みバッファを各実行の終わりに書き出しておく
+    # (ワーカーが強制終了された場合にバッファ中の行を失わないように)
+    from core import ingest_queue
+    try:
+        ingest_queue.flush()
+    except Exception as e:
+        logger.warning(f"⚠️ Ingest queue flush after task failed: {e}")
+
+
+# ==========================================
+# 常駐ワーカープロセス
+# ==========================================
+def _worker_main(conn) -> None:
+    """ワーカープロセス本体: エントリ名を受け取って実行し、結果を返し続ける"""
+    while True:
+        try:
+            entry = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if entry is None:
+            break
+        started_cpu = time.process_time()
+        try:
+            call_entry(entry)
+            result = {"ok": True, "error": None}
+        except BaseException as e:  # 監視スクリプトの sys.exit() 等もワーカーを落とさず結果として返す
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"}
+        _flush_ingest_queue()
+        result["cpu_sec"] = time.process_time() - started_cpu
+        try:
+            conn.send(result)
+        except (BrokenPipeError, OSError):
+            break
+    # multiprocessing の子プロセスは atexit が実行されないため、ここで明示的に書き出す
+    from core import ingest_queue
+    ingest_queue.shutdown(timeout=2.0)
+
+
+class WorkerProcess:
+    """1タスク専用の常駐ワーカープロセス。異常終了・タイムアウト時は次回実行時に再起動する"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.restarts = 0
+        self._proc: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn = None
+        self._started_once = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self._proc is not None else None
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def _start(self) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(target=_worker_main, args=(child_conn,), name=f"task-worker-{self.name}", daemon=True)
+        proc.start()
+        child_conn.close()
+        if self._started_once:
+            self.restarts += 1
+            logger.warning(f"🔁 Restarted worker for {self.name} (pid={proc.pid}, restarts={self.restarts})")
+        self._started_once = True
+        self._proc, self._conn = proc, parent_conn
+
+    def run(self, entry: str, timeout: float) -> Tuple[str, Optional[str], Optional[float]]:
+        """エントリを実行し (結果, エラー内容, CPU秒) を返す"""
+        if not self.is_alive():
+            self.kill()
+            self._start()
+        try:
+            self._conn.send(entry)
+            if not self._conn.poll(timeout):
+                self.kill()
+                return OUTCOME_TIMEOUT, f"exceeded {timeout:.0f} seconds (worker killed)", None
+            result = self._conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            exitcode = None
+            if self._proc is not None:
+                self._proc.join(1)
+                exitcode = self._proc.exitcode
+            self.kill()
+            return OUTCOME_CRASH, f"worker died (exitcode={exitcode}): {e!r}", None
+        outcome = OUTCOME_OK if result.get("ok") else OUTCOME_ERROR
+        return outcome, result.get("error"), result.get("cpu_sec")
+
+    def kill(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        if self._proc is not None and self._proc.is_alive():
+            self._proc.kill()
+            self._proc.join(5)
+        self._proc, self._conn = None, None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """実行中でなければ正常終了させ、応答が無ければ強制終了する"""
+        if self.is_alive():
+            try:
+                self._conn.send(None)
+                self._proc.join(timeout)
+            except Exception:
+                pass
+        self.kill()
+
+
+# ==========================================
+# 実行履歴 (scheduler_runs)
+# ==========================================
+def record_run(task: str, mode: str, started_at: str, duration_sec: float,
+               cpu_sec: Optional[float], outcome: str, error: Optional[str] = None) -> None:
+    try:
+        with get_db_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO scheduler_runs (task, mode, started_at, duration_sec, cpu_sec, outcome, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task, mode, started_at, duration_sec, cpu_sec, outcome, error[:2000] if error else None),
+            )
+    except Exception as e:
+        # 記録の失敗でスケジューラ自体を止めない
+        logger.warning(f"⚠️ Failed to record scheduler run ({task}): {e}")
+
+
+def prune_runs(retention_days: int, now: Optional[datetime] = None) -> int:
+    if retention_days <= 0:
+        return 0
+    threshold = ((now or datetime.now()) - timedelta(days=retention_days)).isoformat(timespec="seconds")
+    try:
+        with get_db_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM scheduler_runs WHERE started_at < ?", (threshold,))
+            return cur.rowcount
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to prune scheduler_runs: {e}")
+        return 0
+
+
+# ==========================================
+# スケジューラ本体
+# ==========================================
+class _TaskState:
+    __slots__ = ("task", "base", "due", "future", "started", "timeout_warned")
+
+    def __init__(self, task: ScheduledTask, base: float, due: float) -> None:
+        self.task = task
+        # 次回実行の基準時刻 (揺らぎを含まない)
+        self.base = base
+        self.due = due
+        self.future: Optional[Future] = None
+        self.started = 0.0
+        self.timeout_warned = False
+
+
+SubprocessRunner = Callable[[str, List[str], float], bool]
+
+
+class TaskScheduler:
+    def __init__(
+        self,
+        tasks: List[ScheduledTask],
+        subprocess_runner: SubprocessRunner,
+        mode: str = MODE_INPROCESS,
+        jitter_sec: float = 0.0,
+        recorder: Callable[..., None] = record_run,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.mode = mode
+        self.jitter_sec = max(jitter_sec, 0.0)
+        self._subprocess_runner = subprocess_runner
+        self._recorder = recorder
+        self._clock = clock
+        now = clock()
+        # 起動直後に全タスクが同時に走らないよう、初回も揺らぎの範囲で分散させる
+        self._states = [_TaskState(t, now, now + self._jitter()) for t in tasks]
+        self._workers: Dict[str, WorkerProcess] = {}
+        # import に失敗した等の理由で subprocess モードへ切り替えたタスク
+        self._fallback: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(tasks), 1), thread_name_prefix="scheduler")
+        self._stop = threading.Event()
+
+    def _jitter(self) -> float:
+        return random.uniform(0, self.jitter_sec) if self.jitter_sec else 0.0
+
+    def mode_for(self, task: ScheduledTask) -> str:
+        if self.mode == MODE_SUBPROCESS or task.entry is None or task.name in self._fallback:
+            return MODE_SUBPROCESS
+        return MODE_WORKER if task.isolate else MODE_INPROCESS
+
+    def interval_for(self, task: ScheduledTask) -> float:
+        if task.subprocess_interval is not None and self.mode_for(task) == MODE_SUBPROCESS:
+            return task.subprocess_interval
+        return task.interval
+
+    def preload(self) -> None:
+        """inprocess 実行するタスクのモジュールを事前にimportする。失敗したタスクは subprocess へ切り替える"""
+        for state in self._states:
+            task = state.task
+            if self.mode_for(task) != MODE_INPROCESS:
+                continue
+            try:
+                resolve_entry(task.entry)
+            except Exception as e:
+                logger.error(f"❌ Failed to import {task.entry}; falling back to subprocess mode: {e}")
+                self._fallback.add(task.name)
+
+    # --- 1回分の判定 ---
+    def tick(self) -> List[str]:
+        """実行時刻に達したタスクを投入し、投入したタスク名を返す"""
+        now = self._clock()
+        submitted = []
+        for state in self._states:
+            task = state.task
+            running = state.future is not None and not state.future.done()
+
+            if running and not state.timeout_warned and now - state.started > task.timeout:
+                # inprocess のスレッドは止められないため、警告して終了を待つ
+                logger.warning(f"⏰ {task.name} is still running after {task.timeout:.0f}s; next runs are skipped until it finishes")
+                state.timeout_warned = True
+
+            if now < state.due:
+                continue
+
+            # 次回の実行時刻 = 基準時刻 + 間隔 (+ 揺らぎ)。
+            # 長時間停止等で1間隔以上遅れた場合は、遅れた分をまとめて実行せず現在から数え直す
+            interval = self.interval_for(task)
+            state.base += interval
+            if state.base <= now:
+                state.base = now + interval
+            state.due = state.base + self._jitter()
+
+            if running:
+                # 前回実行がまだ完了していなければ、今回はスキップして多重起動を防ぐ
+                logger.debug(f"⏭️ Skip {task.name}: previous run still in progress")
+                self._recorder(task.name, self.mode_for(task), datetime.now().isoformat(timespec="seconds"),
+                               0.0, None, OUTCOME_SKIPPED, None)
+                continue
+
+            state.started = now
+            state.timeout_warned = False
+            state.future = self._executor.submit(self.run_task, task)
+            submitted.append(task.name)
+        return submitted
+
+    # --- 1タスクの実行 ---
+    def run_task(self, task: ScheduledTask) -> str:
+        """タスクを1回実行して結果を記録し、結果 (ok/error/timeout/crash) を返す"""
+        mode = self.mode_for(task)
+        started_at = datetime.now().isoformat(timespec="seconds")
+        started = time.perf_counter()
+        cpu_sec: Optional[float] = None
+        error: Optional[str] = None
+
+        try:
+            if mode == MODE_SUBPROCESS:
+                ok = self._subprocess_runner(task.script, task.args, task.timeout)
+                outcome = OUTCOME_OK if ok else OUTCOME_ERROR
+            elif mode == MODE_WORKER:
+                worker = self._workers.get(task.name)
+                if worker is None:
+                    worker = self._workers[task.name] = WorkerProcess(task.name)
+                outcome, error, cpu_sec = worker.run(task.entry, task.timeout)
+            else:
+                started_cpu = time.thread_time()
+                try:
+                    call_entry(task.entry)
+                    outcome = OUTCOME_OK
+                finally:
+                    cpu_sec = time.thread_time() - started_cpu
+                    _flush_ingest_queue()
+        except BaseException as e:  # 監視スクリプトの sys.exit() でスケジューラのスレッドを落とさない
+            outcome = OUTCOME_ERROR
+            error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+
+        duration = time.perf_counter() - started
+        if outcome == OUTCOME_OK and duration > task.timeout:
+            outcome, error = OUTCOME_TIMEOUT, f"finished after {duration:.0f}s (timeout {task.timeout:.0f}s)"
+
+        if outcome == OUTCOME_OK:
+            logger.debug(f"✅ Finished: {task.name} [{mode}] {duration:.2f}s")
+        else:
+            logger.error(f"⚠️ Task {outcome} [{task.name}/{mode}] after {duration:.2f}s: {error or ''}".rstrip())
+        self._recorder(task.name, mode, started_at, duration, cpu_sec, outcome, error)
+        return outcome
+
+    # --- ループ ---
+    def run_forever(self, poll_sec: float = 1.0, retention_days: Optional[int] = None) -> None:
+        if retention_days is None:
+            retention_days = config.SCHEDULER_RUNS_RETENTION_DAYS
+        self.preload()
+        last_prune = None
+        while not self._stop.is_set():
+            today = datetime.now().date()
+            if last_prune != today:
+                prune_runs(retention_days)
+                last_prune = today
+            self.tick()
+            self._stop.wait(poll_sec)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._stop.set()
+        for worker in self._workers.values():
+            worker.stop()
+        self._executor.shutdown(wait=wait)
@@ -8,11 +8,11 @@ import streamlit as st
 # 自作モジュール
 import common
 import config
-from services import analysis_service
 
 # Viewコンポーネント
 from views.dashboard import (
     common as view_common,
+    data,
     summary,
     quest_tab,
     sensor_tab,
@@ -41,7 +41,7 @@ def main():
     with st.sidebar:
         st.header("設定")
         if st.button("🔄 データを更新"):
-            st.cache_data.clear()
+            data.clear()
             st.rerun()
         
         # 共通CSSの適用
@@ -55,19 +55,15 @@ def main():
         st.markdown(view_common.CUSTOM_CSS, unsafe_allow_html=True)
         now = datetime.now(pytz.timezone("Asia/Tokyo"))
 
-        # --- データ読み込み (Service層へ委譲) ---
-        df_sensor = analysis_service.load_sensor_data(limit=10000)
-        df_child = analysis_service.load_generic_data(config.SQLITE_TABLE_CHILD)
-        df_poop = analysis_service.load_generic_data(config.SQLITE_TABLE_DEFECATION)
-        df_food = analysis_service.load_generic_data(config.SQLITE_TABLE_FOOD)
-        df_car = analysis_service.load_generic_data(config.SQLITE_TABLE_CAR)
-        df_security_log = analysis_service.load_generic_data("security_logs", limit=100)
-        df_security_log = analysis_service.apply_friendly_names(df_security_log)
-        df_bicycle = analysis_service.load_bicycle_data(limit=3000)
-        nas_data = analysis_service.load_nas_status()
+        # --- データ読み込み (views/dashboard/data.py のキャッシュ経由) ---
+        # サマリーに使う分だけを毎回読み、各タブのデータは選択中のタブを描画するときに読む
+        sensors = data.sensor_bundle()
+        df_car = data.generic_records(config.SQLITE_TABLE_CAR)
+        df_bicycle = data.bicycle_data()
+        nas_data = data.nas_status()
 
         # --- AIレポート表示 ---
-        report = analysis_service.load_ai_report()
+        report = data.ai_report()
         if report is not None:
             # タイムゾーン処理は Service/Pandas で行われている前提だが念のため変換
             ts = report["timestamp"]
@@ -84,51 +80,34 @@ def main():
                 st.markdown(report["message"].replace("\n", "  \n"))
 
         # --- サマリー (トップ) 表示 ---
-        summary.render_summary(now, df_sensor, df_car, df_bicycle, nas_data)
+        summary.render_summary(now, sensors.views["summary"], df_car, df_bicycle, nas_data)
 
         # --- タブ切り替え ---
-        tabs = st.tabs([
-            "⚔️ クエスト",
-            "🚃 電車遅延",
-            "📸 防犯カメラ",
-            "💡 電力・環境",
-            "🌡️ 気温詳細",
-            "🏥 健康管理",
-            "👵 高砂実家",
-            "📝 ログ分析",
-            "📊 トレンド",
-            "🔧 システム管理",
-            "🚲 駐輪場",
-        ])
-
-        (
-            tab_quest, tab_train, tab_photo, tab_elec, tab_temp, 
-            tab_health, tab_taka, tab_log, tab_trends, tab_sys, tab_bicycle
-        ) = tabs
-
-        # --- 各タブのレンダリング (View層へ委譲) ---
-        with tab_quest:
-            quest_tab.render()
-        with tab_train:
-            misc_tab.render_traffic()
-        with tab_photo:
-            misc_tab.render_photos(df_security_log)
-        with tab_elec:
-            sensor_tab.render_electricity(df_sensor, now)
-        with tab_temp:
-            sensor_tab.render_temperature(df_sensor, now)
-        with tab_health:
-            health_tab.render(df_child, df_poop, df_food)
-        with tab_taka:
-            sensor_tab.render_takasago(df_sensor)
-        with tab_log:
-            log_tab.render_logs(df_sensor)
-        with tab_trends:
-            log_tab.render_trends()
-        with tab_sys:
-            log_tab.render_system()
-        with tab_bicycle:
-            misc_tab.render_bicycle(df_bicycle)
+        # st.tabs は非表示のタブも毎回すべて描画する (データ読み込みも走る) ため、
+        # 選択中のタブだけを描画する
+        tabs = {
+            "⚔️ クエスト": lambda: quest_tab.render(),
+            "🚃 電車遅延": lambda: misc_tab.render_traffic(),
+            "📸 防犯カメラ": lambda: misc_tab.render_photos(data.security_logs()),
+            "💡 電力・環境": lambda: sensor_tab.render_electricity(sensors.views["electricity"], now, sensors.index),
+            "🌡️ 気温詳細": lambda: sensor_tab.render_temperature(sensors.views["temperature"], now, sensors.index),
+            "🏥 健康管理": lambda: health_tab.render(
+                data.generic_records(config.SQLITE_TABLE_CHILD),
+                data.generic_records(config.SQLITE_TABLE_DEFECATION),
+                data.generic_records(config.SQLITE_TABLE_FOOD),
+            ),
+            "👵 高砂実家": lambda: sensor_tab.render_takasago(sensors.views["takasago"]),
+            "📝 ログ分析": lambda: log_tab.render_logs(sensors.views["logs"]),
+            "📊 トレンド": lambda: log_tab.render_trends(),
+            "🔧 システム管理": lambda: log_tab.render_system(),
+            "🚲 駐輪場": lambda: misc_tab.render_bicycle(df_bicycle),
+        }
+        labels = list(tabs)
+        selected = st.segmented_control(
+            "表示するタブ", labels, default=labels[0], key="dashboard_tab", label_visibility="collapsed"
+        )
+        # 選択中のボタンを押すと選択が外れる (None) ため、先頭のタブに戻す
+        tabs[selected or labels[0]]()
 
     except Exception as e:
         err_msg = f"📉 Dashboard Error: {e}"
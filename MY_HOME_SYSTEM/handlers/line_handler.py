@@ -24,6 +24,8 @@ from linebot.v3.messaging import (
 from linebot.v3.webhooks import MessageEvent, TextMessageContent, PostbackEvent
 
 import config
+from core.async_cache import AsyncTTLCache
+from core.keyed_dispatcher import KeyedDispatcher
 from core.logger import setup_logging
 from models.line import LinePostbackData
 from services import line_service, ai_service
@@ -46,25 +48,26 @@ if config.LINE_CHANNEL_ACCESS_TOKEN and config.LINE_CHANNEL_SECRET:
 
 # プロフィール表示名のキャッシュ (ログ用のためだけに毎回 LINE API を叩かないようにする)
 _PROFILE_CACHE_TTL_SEC = 3600
-_profile_cache: Dict[str, tuple] = {}  # user_id -> (display_name, cached_at)
 
 
-def _get_display_name(user_id: str) -> str:
-    """LINEのユーザー表示名を取得する。TTL付きでキャッシュし、API呼び出し頻度を抑える。"""
-    cached = _profile_cache.get(user_id)
-    if cached and (time.time() - cached[1]) < _PROFILE_CACHE_TTL_SEC:
-        return cached[0]
-
-    user_name = "Unknown"
+async def _fetch_display_name(user_id: str) -> str:
+    """LINE API から表示名を取得する (HTTP 呼び出しはスレッドで行い、ループを止めない)"""
     try:
         if line_bot_api:
-            profile = line_bot_api.get_profile(user_id)
-            user_name = profile.display_name
+            profile = await asyncio.to_thread(line_bot_api.get_profile, user_id)
+            return profile.display_name
     except Exception:
         pass
+    return "Unknown"
 
-    _profile_cache[user_id] = (user_name, time.time())
-    return user_name
+
+# 同じユーザーのイベントが同時に来ても、プロフィール取得は1回にまとめる
+_profile_cache = AsyncTTLCache(_fetch_display_name, _PROFILE_CACHE_TTL_SEC, clock=lambda: time.time())
+
+
+async def _get_display_name(user_id: str) -> str:
+    """LINEのユーザー表示名を取得する。TTL付きでキャッシュし、API呼び出し頻度を抑える。"""
+    return await _profile_cache.get(user_id)
 
 
 # === Helper Methods ===
@@ -85,23 +88,27 @@ def reply_message(reply_token: str, messages: List[Any]):
         logger.error(f"LINE Reply Failed: {e}")
 
 # === Event Handlers ===
-# 注: ディスパッチロジック自体はLINE SDKの初期化有無に関わらず常に定義する。
-# SDKへの登録(line_handler.add)のみを `if line_handler:` 配下で行うことで、
-# 認証情報が無い環境(テスト等)でもロジック単体をimport・実行できるようにしている。
+# Webhook の署名検証・パースはリクエスト処理内 (webhook_router) で行い、パース済みのイベントを
+# dispatch_event でサーバー本体のイベントループ上のキューへ積む。同じユーザーのイベントは届いた順に
+# 1件ずつ、異なるユーザーのイベントは並行に処理される。
+# 以前はイベントごとにスレッド + asyncio.run() で新しいイベントループを作っていたが、
+# 1件ごとのループ生成コストが大きく、ユーザー間の処理順も保証されなかった。
 
-def handle_message(event: MessageEvent):
+async def handle_message_async(event: MessageEvent):
     """テキストメッセージ受信時の処理"""
     user_id = event.source.user_id
     msg_text = event.message.text.strip()
     reply_token = event.reply_token
 
-    user_name = _get_display_name(user_id)
+    user_name = await _get_display_name(user_id)
 
     logger.info(f"📩 Recv [{user_name}]: {msg_text}")
 
-    asyncio.run(
-        _process_message_async(user_id, user_name, msg_text, reply_token)
-    )
+    await _process_message_async(user_id, user_name, msg_text, reply_token)
+
+async def _reply(reply_token: str, messages: Any):
+    """返信 (同期 HTTP 呼び出し) をスレッドで行い、イベントループを止めない"""
+    await asyncio.to_thread(reply_message, reply_token, messages)
 
 async def _process_message_async(user_id: str, user_name: str, msg_text: str, reply_token: str):
     """非同期メッセージ処理ロジック"""
@@ -109,17 +116,17 @@ async def _process_message_async(user_id: str, user_name: str, msg_text: str, re
     # 1. Family Quest Commands (優先度高)
     if msg_text == "ステータス":
         resp = await line_service.get_user_status_message(user_id)
-        reply_message(reply_token, resp)
+        await _reply(reply_token, resp)
         return
 
     if msg_text == "クエスト":
         resp = await line_service.get_active_quests_message(user_id)
-        reply_message(reply_token, resp)
+        await _reply(reply_token, resp)
         return
 
     if msg_text.startswith("承認") or msg_text.startswith("却下"):
         resp = await line_service.process_approval_command(user_id, msg_text)
-        reply_message(reply_token, resp)
+        await _reply(reply_token, resp)
         return
 
     # 2. Health & Life Log Commands
@@ -128,7 +135,7 @@ async def _process_message_async(user_id: str, user_name: str, msg_text: str, re
             if child in msg_text:
                 cond = "元気" if "元気" in msg_text else ("風邪" if "風邪" in msg_text else "不明")
                 resp = await line_service.log_child_health(user_id, user_name, child, cond)
-                reply_message(reply_token, resp)
+                await _reply(reply_token, resp)
                 return
 
     # 3. AI Analysis (Fallback)
@@ -137,12 +144,12 @@ async def _process_message_async(user_id: str, user_name: str, msg_text: str, re
             user_id, user_name, msg_text
         )
         if ai_resp_text:
-            reply_message(reply_token, TextMessage(text=ai_resp_text))
+            await _reply(reply_token, TextMessage(text=ai_resp_text))
     except Exception as e:
         logger.error(f"AI Processing Error: {e}")
-        reply_message(reply_token, TextMessage(text="😓 すみません、うまく処理できませんでした。"))
+        await _reply(reply_token, TextMessage(text="😓 すみません、うまく処理できませんでした。"))
 
-def handle_postback(event: PostbackEvent):
+async def handle_postback_async(event: PostbackEvent):
     """Postbackイベント（ボタン押下など）の処理"""
     user_id = event.source.user_id
     data_str = event.postback.data
@@ -156,22 +163,50 @@ def handle_postback(event: PostbackEvent):
         try:
             action, hist_id = data_str.split(":")
             cmd_text = f"{cmd_map[action]} {hist_id}"
-            # 非同期で処理を実行（承認処理は時間がかかる場合があるため）
-            asyncio.run(_process_message_async(user_id, "Postback", cmd_text, reply_token))
         except ValueError:
             logger.error(f"Invalid Postback format: {data_str}")
+            return
+        await _process_message_async(user_id, "Postback", cmd_text, reply_token)
         return
 
     # 2. 既存ロジック (line_logic.py) への委譲
     # show_health_input, child_check, その他のボタン操作はここで処理
     try:
-        # line_logic側に処理を丸投げする
-        line_logic.handle_postback(event, line_bot_api)
+        # line_logic 側は同期処理 (LINE API / DB) のためスレッドで実行する。
+        # DB保存のコルーチンは line_logic.sync_run がこのイベントループへ戻して実行する。
+        line_logic.main_loop = asyncio.get_running_loop()
+        await asyncio.to_thread(line_logic.handle_postback, event, line_bot_api)
     except Exception as e:
         logger.error(f"Logic Delegation Error: {e}")
         # 万が一のエラー時はユーザーに通知（任意）
         # reply_message(reply_token, TextMessage(text="⚠️ 処理中にエラーが発生しました。"))
 
-if line_handler:
-    line_handler.add(MessageEvent, message=TextMessageContent)(handle_message)
-    line_handler.add(PostbackEvent)(handle_postback)
\ No newline at end of file
+async def handle_event_async(event: Any):
+    """パース済みイベントを種類ごとのハンドラへ振り分ける (未対応の種類は無視)"""
+    if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+        await handle_message_async(event)
+    elif isinstance(event, PostbackEvent):
+        await handle_postback_async(event)
+
+
+# ユーザー (グループ/トークルーム) ごとの順序付きキュー
+event_dispatcher = KeyedDispatcher(
+    handle_event_async,
+    max_pending=config.LINE_EVENT_QUEUE_PER_USER,
+    idle_sec=config.LINE_EVENT_WORKER_IDLE_SEC,
+    name="line_events",
+)
+
+
+def _event_key(event: Any) -> str:
+    source = getattr(event, "source", None)
+    for attr in ("user_id", "group_id", "room_id"):
+        value = getattr(source, attr, None)
+        if value:
+            return value
+    return "unknown"
+
+
+def dispatch_event(event: Any) -> bool:
+    """イベントを送信元ごとのキューへ積んで即座に戻る。イベントループ上から呼ぶこと"""
+    return event_dispatcher.submit(_event_key(event), event)
@@ -4,6 +4,7 @@ import asyncio
 import json
 import sqlite3
 import datetime
+from typing import Optional
 from urllib.parse import parse_qsl
 
 # ▼▼▼ v3 Imports ▼▼▼
@@ -36,19 +37,37 @@ TARGET_MEMBERS = config.FAMILY_SETTINGS["members"]
 
 # --- Helper Functions ---
 
+# Webhook イベントを処理しているイベントループ (line_handler が設定する)
+main_loop: Optional[asyncio.AbstractEventLoop] = None
+
 def sync_run(coro):
     """
     スレッドプール内で非同期関数(DB保存等)を実行するためのヘルパー。
-    Webhookハンドラは別スレッドで動いているため、asyncio.run()で
-    新しいイベントループを作って実行して完了を待機する。
+    Webhookハンドラ (main_loop) が動いていれば、そのループへコルーチンを渡して完了を待機する
+    (呼び出しごとに新しいイベントループを作らない)。main_loop が無い場合は asyncio.run() で実行する。
+    イベントループのスレッド (main_loop 自身を含む) から呼ばれた場合は、そのループを止めて待つことも
+    asyncio.run() もできないため、実行せずにエラーを記録して False を返す (コルーチン内で await すること)。
     戻り値はコルーチンの戻り値。実行時に例外が発生した場合はFalseを返す。
     """
+    if _running_loop() is not None:
+        coro.close()
+        logger.error("Sync execution error: sync_run はイベントループのスレッドからは呼べません (await してください)")
+        return False
     try:
+        loop = main_loop
+        if loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, loop).result()
         return asyncio.run(coro)
     except Exception as e:
         logger.error(f"Sync execution error: {e}")
         return False
 
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
 def send_reply_text(api: MessagingApi, reply_token: str, text: str, quick_reply: QuickReply = None):
     """テキストメッセージ返信のショートカット"""
     try:
@@ -0,0 +1,84 @@
+-- センサーログ(power_usage / switchbot_meter_logs / device_records)の集計テーブルを追加する。
+-- 生データは全件を永久に保持しており、ダッシュボードの月間電気代・年間室温グラフが
+-- 年々肥大化するテーブルを substr(timestamp) の GROUP BY で全走査していた。
+-- services/rollup_service.py が resolution = 'minute' / 'hour' / 'day' の3段階で
+-- 最小・最大・平均・件数(電力は kWh 積算値も)を差分更新し、集計済みの生データは
+-- 保持期間を過ぎたものから削除する。
+-- 平均値は差分マージのため合計(_sum)と件数(_count)から算出して保持する。
+-- bucket は各区間の開始時刻 (JSTの壁時計時刻, 'YYYY-MM-DDTHH:MM:00')。
+CREATE TABLE IF NOT EXISTS sensor_rollup_state (
+    source_table TEXT PRIMARY KEY,
+    last_rolled_id INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS power_usage_rollup (
+    resolution TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    device_name TEXT,
+    sample_count INTEGER NOT NULL DEFAULT 0,
+    wattage_min REAL,
+    wattage_max REAL,
+    wattage_sum REAL,
+    wattage_count INTEGER NOT NULL DEFAULT 0,
+    wattage_avg REAL,
+    kwh REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, device_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS switchbot_meter_rollup (
+    resolution TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    device_name TEXT,
+    sample_count INTEGER NOT NULL DEFAULT 0,
+    temperature_min REAL,
+    temperature_max REAL,
+    temperature_sum REAL,
+    temperature_count INTEGER NOT NULL DEFAULT 0,
+    temperature_avg REAL,
+    humidity_min REAL,
+    humidity_max REAL,
+    humidity_sum REAL,
+    humidity_count INTEGER NOT NULL DEFAULT 0,
+    humidity_avg REAL,
+    PRIMARY KEY (resolution, device_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS device_records_rollup (
+    resolution TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    device_name TEXT,
+    device_type TEXT,
+    sample_count INTEGER NOT NULL DEFAULT 0,
+    temperature_celsius_min REAL,
+    temperature_celsius_max REAL,
+    temperature_celsius_sum REAL,
+    temperature_celsius_count INTEGER NOT NULL DEFAULT 0,
+    temperature_celsius_avg REAL,
+    humidity_percent_min REAL,
+    humidity_percent_max REAL,
+    humidity_percent_sum REAL,
+    humidity_percent_count INTEGER NOT NULL DEFAULT 0,
+    humidity_percent_avg REAL,
+    power_watts_min REAL,
+    power_watts_max REAL,
+    power_watts_sum REAL,
+    power_watts_count INTEGER NOT NULL DEFAULT 0,
+    power_watts_avg REAL,
+    kwh REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, device_id, bucket)
+);
+
+-- 期間指定の読み出し(全デバイス横断)用
+CREATE INDEX IF NOT EXISTS idx_power_usage_rollup_res_bucket ON power_usage_rollup (resolution, bucket);
+CREATE INDEX IF NOT EXISTS idx_switchbot_meter_rollup_res_bucket ON switchbot_meter_rollup (resolution, bucket);
+CREATE INDEX IF NOT EXISTS idx_device_records_rollup_res_bucket ON device_records_rollup (resolution, bucket);
+
+-- 生データの保持期間による削除、および load_sensor_data の「全デバイス横断で最新N件」の
+-- 読み出しは既存の (device_id, timestamp) インデックスを使えず全走査になるため追加する
+CREATE INDEX IF NOT EXISTS idx_power_usage_ts ON power_usage (timestamp);
+CREATE INDEX IF NOT EXISTS idx_switchbot_logs_ts ON switchbot_meter_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_device_records_ts ON device_records (timestamp);
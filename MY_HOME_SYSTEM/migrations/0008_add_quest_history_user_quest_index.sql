@@ -0,0 +1,6 @@
+-- クエスト完了状況の集計 (quest_service.fetch_completion_stats) と
+-- 完了時のスパムチェック・周期チェック (user_id, quest_id ごとの直近履歴の取得) 用の複合インデックス。
+-- status を末尾に含めることで、(user_id, quest_id) ごとの MAX(completed_at) 等の集計を
+-- テーブル本体を読まずにインデックスだけで処理できる (カバリングインデックス)。
+CREATE INDEX IF NOT EXISTS idx_quest_history_user_quest_completed
+    ON quest_history (user_id, quest_id, completed_at, status);
@@ -0,0 +1,16 @@
+-- 定期タスクスケジューラ (core/task_scheduler.py) の実行履歴。
+-- mode: inprocess / worker / subprocess
+-- outcome: ok / error / timeout / crash / skipped (前回実行が未完了のため見送り)
+-- cpu_sec は subprocess モードでは計測しないため NULL。
+CREATE TABLE IF NOT EXISTS scheduler_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    duration_sec REAL NOT NULL,
+    cpu_sec REAL,
+    outcome TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_runs_task_started ON scheduler_runs (task, started_at);
+CREATE INDEX IF NOT EXISTS idx_scheduler_runs_started ON scheduler_runs (started_at);
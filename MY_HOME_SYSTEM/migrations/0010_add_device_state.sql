@@ -0,0 +1,14 @@
+-- デバイスごとの最新のデジタル状態 (core/device_state.py)。
+-- 電力・温湿度の最新値は power_usage / switchbot_logs の最新行から復元するため持たない。
+-- motion_active: 見守り中 (動きあり) なら 1
+-- last_notify_at: 開閉通知の最終送信時刻 (UNIXエポック秒、クールダウン判定用)
+-- status: switchbot_power_monitor が取得した前回ステータス (JSON)
+CREATE TABLE IF NOT EXISTS device_state (
+    device_id TEXT PRIMARY KEY,
+    device_name TEXT,
+    contact_state TEXT,
+    motion_active INTEGER NOT NULL DEFAULT 0,
+    last_notify_at REAL NOT NULL DEFAULT 0,
+    status TEXT,
+    last_seen TEXT
+);
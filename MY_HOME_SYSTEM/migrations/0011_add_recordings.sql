@@ -0,0 +1,23 @@
+-- NVR録画ファイルのカタログ (services/recording_catalog.py)。
+-- camera: NVR_RECORD_DIR 配下のフォルダ名 (devices.json の nas_folder。未設定ならカメラ名)
+-- start_ts: ファイル名 (YYYYMMDD_HHMMSS.mp4) の時刻 (UNIXエポック秒)
+-- end_ts: 最終更新時刻から推定した録画の終了時刻。duration = end_ts - start_ts
+-- settled: 書き込みが終わった (mtime が十分古い) ファイルは 1。再走査で stat しない
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    camera TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    duration REAL NOT NULL,
+    settled INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_camera_start ON recordings (camera, start_ts);
+
+-- カメラ (フォルダ) ごとの最終走査時刻。別プロセスが走査した結果も鮮度の判定に使う
+CREATE TABLE IF NOT EXISTS recording_scans (
+    camera TEXT PRIMARY KEY,
+    scanned_at REAL NOT NULL,
+    files INTEGER NOT NULL
+);
@@ -0,0 +1,38 @@
+-- 通知の送信箱と配達不能キュー (services/notification_dispatcher.py)。
+-- target: discord / line
+-- destination: discord は通知チャンネル名 (notify / error / report)、line は送信先 (ユーザー/グループID)
+-- messages: メッセージのJSON配列。LINE v3 オブジェクトは {"sdk": to_dict()} の形で保存する
+-- coalesce_key: 同じ (target, destination, coalesce_key) の未送信分をまとめて1通にする (NULL はまとめない)
+-- next_attempt_at: 次に送信を試みてよい時刻 (UNIXエポック秒)。まとめ待ち・再試行の間隔・429 の Retry-After を反映する
+-- locked_until: ワーカーが取り出して送信中の行はこの時刻まで他のワーカーが取り出さない (送信中にプロセスが落ちたら再送される)
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    image BLOB,
+    filename TEXT,
+    coalesce_key TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    locked_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due ON notification_outbox (next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_coalesce ON notification_outbox (target, destination, coalesce_key);
+
+-- 再試行しても送れなかった (または恒久的なエラーで送れない) 通知。id は送信箱での id
+CREATE TABLE IF NOT EXISTS notification_dead_letters (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    image BLOB,
+    filename TEXT,
+    coalesce_key TEXT,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    failed_at TEXT NOT NULL
+);
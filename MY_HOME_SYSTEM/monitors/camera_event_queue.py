@@ -0,0 +1,258 @@
+# MY_HOME_SYSTEM/monitors/camera_event_queue.py
+"""
+ONVIFカメライベントの受付キューとワーカープール。
+
+camera_monitor の PullMessages ループは、以前はイベントごとに文字列照合・DB記録・
+NVRからのスナップショット切り出し (ffmpeg + リトライ待ち) をその場で実行していた。
+スナップショットが遅いとそのカメラの PullMessages が止まり、イベントの取りこぼしや
+購読のタイムアウトにつながる。本モジュールはその後段処理をワーカースレッドへ移す。
+
+- 受付 (put): PullMessages のスレッドはイベントを解析して投入するだけで、すぐに次の取得へ戻る。
+- 合体 (coalescing): 同じカメラのイベントがワーカーに取られる前に続けて届いた場合は1件にまとめ、
+  回数 (count) だけを加算する。キューの深さは最大でもカメラ台数に収まる。
+- 順序: 同じカメラのイベントは同時に1件しか処理しない (クールダウン判定の競合を防ぐ)。
+- 指標: キューの深さ、処理中の件数、受付から処理完了までの遅延 (直近/平均/最大/p95) を stats() で返し、
+  CAMERA_EVENT_STATS_INTERVAL_SEC ごとにログへ出す。
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import config
+from core.logger import setup_logging
+
+logger = setup_logging("camera")
+
+# 動体とみなす Data/SimpleItem の値
+_TRUE_VALUES = ("true", "1")
+
+
+@dataclass
+class CameraEvent:
+    """解析済みのONVIFイベント1件 (合体した場合は最初の1件の受付時刻を保持する)"""
+    cam_conf: Dict[str, Any]
+    topic: str
+    data: Dict[str, str]
+    received_at: float
+    received_wall: float = field(default_factory=time.time)
+    count: int = 1
+
+    @property
+    def cam_id(self) -> str:
+        return self.cam_conf['id']
+
+
+def extract_topic(msg: Any) -> str:
+    """
+    NotificationMessage の Topic を文字列で返す。zeep は混在コンテンツの Topic 本文を
+    _value_1 に入れないことがあるため、取得できなければ "Unknown"。
+    """
+    topic = getattr(msg, 'Topic', None)
+    value = getattr(topic, '_value_1', None) if topic is not None else None
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    if isinstance(topic, str) and topic.strip():
+        return topic.strip()
+    return "Unknown"
+
+
+def extract_simple_items(element: Any, section: str = "Data") -> Dict[str, str]:
+    """tt:Message 要素から Source/Data 配下の SimpleItem を {Name: Value} で返す"""
+    if element is None or not hasattr(element, 'xpath'):
+        return {}
+    items = element.xpath(f".//*[local-name()='{section}']/*[local-name()='SimpleItem']")
+    return {item.get('Name'): item.get('Value', '') for item in items if item.get('Name')}
+
+
+def is_motion_event(topic: str, data: Dict[str, str]) -> bool:
+    """
+    動体検知の開始イベントか。
+    - IsMotion が true
+    - Topic が取れていて Motion を含む場合 (VideoSource/MotionAlarm の State など) は Data のいずれかが true
+    - Topic が RuleEngine の場合は Is* (IsPeople, IsVehicle 等) のいずれかが true
+    """
+    def is_true(name: str) -> bool:
+        return data.get(name, '').strip().lower() in _TRUE_VALUES
+
+    if is_true('IsMotion'):
+        return True
+    topic_lower = topic.lower()
+    if 'motion' in topic_lower:
+        return any(is_true(name) for name in data)
+    if 'ruleengine' in topic_lower:
+        return any(is_true(name) for name in data if name.startswith('Is'))
+    return False
+
+
+def parse_event(msg: Any, cam_conf: Dict[str, Any], clock: Callable[[], float] = time.monotonic) -> Optional[CameraEvent]:
+    """NotificationMessage を解析し、動体検知なら CameraEvent を返す (それ以外は None)"""
+    topic = extract_topic(msg)
+    element = getattr(getattr(msg, 'Message', None), '_value_1', None)
+    data = extract_simple_items(element)
+    logger.debug(f"🕵️ [TOPIC AUDIT] {cam_conf['name']} | Topic: {topic} | Data: {data}")
+    if not is_motion_event(topic, data):
+        return None
+    return CameraEvent(cam_conf=cam_conf, topic=topic, data=data, received_at=clock())
+
+
+class CameraEventQueue:
+    """カメラ単位で合体するイベントキューと、後段処理を行うワーカースレッド群"""
+
+    def __init__(
+        self,
+        handler: Callable[[CameraEvent], None],
+        workers: int = 2,
+        stats_interval_sec: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+        latency_window: int = 256,
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.stats_interval_sec = stats_interval_sec
+        self.clock = clock
+
+        # カメラID -> 未処理のイベント (挿入順 = 受付順)
+        self._pending: Dict[str, CameraEvent] = {}
+        self._in_flight: set = set()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._last_report = clock()
+        self._stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "handled": 0,
+            "failed": 0,
+            "max_depth": 0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+
+    # --- 受付 ---
+    def put(self, event: CameraEvent) -> bool:
+        """イベントを投入する。同じカメラの未処理イベントがあれば合体して False を返す"""
+        with self._cond:
+            self._stats["enqueued"] += 1
+            pending = self._pending.get(event.cam_id)
+            if pending is not None:
+                pending.count += event.count
+                self._stats["coalesced"] += 1
+                return False
+            self._pending[event.cam_id] = event
+            self._stats["max_depth"] = max(self._stats["max_depth"], len(self._pending))
+            self._cond.notify()
+        return True
+
+    # --- ワーカー ---
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._run, name=f"camera-event-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"📥 Camera event queue started ({self.workers} workers)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """受付済みのイベントを処理し終えてからワーカーを止める (timeout で打ち切り)"""
+        self.drain(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """未処理・処理中のイベントが無くなるまで待つ"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._threads:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _take(self) -> Optional[CameraEvent]:
+        """処理中でないカメラのうち、最も早く受け付けたイベントを取り出す (ロック保持中に呼ぶ)"""
+        for cam_id, event in self._pending.items():
+            if cam_id not in self._in_flight:
+                del self._pending[cam_id]
+                self._in_flight.add(cam_id)
+                return event
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                event = self._take()
+                while event is None:
+                    if self._stopping:
+                        return
+                    self._cond.wait(timeout=self._report_wait())
+                    self._maybe_report()
+                    event = self._take()
+            try:
+                self.handler(event)
+                failed = False
+            except Exception as e:
+                failed = True
+                logger.warning(f"⚠️ [{event.cam_conf.get('name')}] Event handler error: {e}")
+            latency_ms = (self.clock() - event.received_at) * 1000
+            with self._cond:
+                self._in_flight.discard(event.cam_id)
+                self._stats["failed" if failed else "handled"] += 1
+                self._latencies.append(latency_ms)
+                self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], latency_ms)
+                self._stats["total_latency_ms"] += latency_ms
+                self._cond.notify_all()
+            self._maybe_report()
+
+    # --- 指標 ---
+    def _report_wait(self) -> Optional[float]:
+        if self.stats_interval_sec <= 0:
+            return None
+        return max(0.1, self.stats_interval_sec - (self.clock() - self._last_report))
+
+    def _maybe_report(self) -> None:
+        if self.stats_interval_sec <= 0 or self.clock() - self._last_report < self.stats_interval_sec:
+            return
+        self._last_report = self.clock()
+        s = self.stats()
+        logger.info(
+            f"📊 Camera event queue: depth={s['depth']} in_flight={s['in_flight']} "
+            f"handled={s['handled']} coalesced={s['coalesced']} failed={s['failed']} "
+            f"latency avg={s['latency_ms']['avg']:.0f}ms p95={s['latency_ms']['p95']:.0f}ms max={s['latency_ms']['max']:.0f}ms"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            snapshot = dict(self._stats)
+            latencies = sorted(self._latencies)
+            last = self._latencies[-1] if self._latencies else 0.0
+            snapshot["depth"] = len(self._pending)
+            snapshot["in_flight"] = len(self._in_flight)
+        done = snapshot["handled"] + snapshot["failed"]
+        snapshot["latency_ms"] = {
+            "last": last,
+            "avg": snapshot.pop("total_latency_ms") / done if done else 0.0,
+            "max": snapshot.pop("max_latency_ms"),
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        }
+        return snapshot
+
+
+def create_queue(handler: Callable[[CameraEvent], None]) -> CameraEventQueue:
+    return CameraEventQueue(
+        handler,
+        workers=getattr(config, "CAMERA_EVENT_WORKERS", 2),
+        stats_interval_sec=getattr(config, "CAMERA_EVENT_STATS_INTERVAL_SEC", 600.0),
+    )
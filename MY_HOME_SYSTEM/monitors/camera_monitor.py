@@ -8,7 +8,6 @@ import logging
 import subprocess
 import traceback
 import signal
-import uuid
 import requests
 import datetime
 import platform
@@ -37,8 +36,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
 from core.logger import setup_logging
-from core.database import save_log_generic
+from core import device_registry, ingest_queue
 from services.notification_service import send_push
+from services import snapshot_service
+from monitors.camera_event_queue import CameraEvent, create_queue, parse_event
 
 # === ログ・定数設定 ===
 logger = setup_logging("camera")
@@ -80,6 +81,16 @@ def cleanup_handler(signum: int, frame: Any) -> None:
                 svc.service.Unsubscribe(_soapheaders=None)
         except Exception:
             pass
+    # 受付済みの動体検知イベントを処理してから、バッファ済みのログを書き込む
+    try:
+        event_queue.stop(timeout=5.0)
+    except Exception:
+        pass
+    # os._exit() では atexit が走らないため、バッファ済みのログをここで書き込む
+    try:
+        ingest_queue.shutdown(timeout=2.0)
+    except Exception:
+        pass
     logger.info("👋 Cleanup completed. Exiting.")
     os._exit(0)
 
@@ -171,91 +182,24 @@ def check_camera_time(devicemgmt: Any, cam_name: str) -> bool:
 def capture_snapshot_from_nvr(cam_conf: dict, target_time: dt_class = None) -> Optional[bytes]:
     """
     NAS(NVR)に常時録画されている最新の動画ファイル(.mp4)から、
-    FFmpegを使用して該当時刻のフレームを切り出す（カメラ本体のRTSP負荷ゼロ）
+    FFmpegを使用してフレームを切り出す（カメラ本体のRTSP負荷ゼロ）。
+    処理本体は unified_server と共用するため services/snapshot_service.py にある。
     """
-    import subprocess
-    import glob
-    import time
-    
-    if target_time is None:
-        target_time = dt_class.now()
-
-    # nas_folder は NVR録画ベースディレクトリ配下の「フォルダ名」であり、絶対パスではない
-    # (camera_service.py の get_rtsp_url等と同じ解決ロジックに合わせる)
-    nvr_base_dir = getattr(config, 'NVR_RECORD_DIR', os.getenv("NVR_RECORD_DIR", "/mnt/nas/home_system/nvr_recordings"))
-    nas_folder_name = cam_conf.get("nas_folder") or cam_conf["name"]
-    nas_folder = os.path.join(nvr_base_dir, nas_folder_name)
-    if not os.path.exists(nas_folder):
-        # 設計書準拠: 介入が必要なエラー(NASマウント外れ等)は ERROR
-        logger.error(f"❌ [{cam_conf['name']}] NAS folder not found or unmounted: {nas_folder}")
-        return None
-
-    # 最新のmp4ファイルを取得 (NVRの仕様に依存しますが、直近に更新されたファイルを取得)
-    # 検索範囲を絞るため、本日分の日付ディレクトリなどを指定するとより高速です
-    search_pattern = os.path.join(nas_folder, "**", "*.mp4")
-    mp4_files = sorted(glob.glob(search_pattern, recursive=True), key=os.path.getmtime, reverse=True)
-    
-    if not mp4_files:
-        logger.warning(f"⚠️ [{cam_conf['name']}] No NVR video files found in {nas_folder}.")
-        return None
-
-    latest_mp4 = mp4_files[0]
-    output_tmp = f"/tmp/snapshot_{cam_conf['name']}_{uuid.uuid4().hex}.jpg"
-    
-    # 設計書「エラーハンドリングと自動復旧」準拠: NVRのバッファフラッシュ遅延を考慮したリトライ
-    max_retries = 3
-    try:
-        for attempt in range(1, max_retries + 1):
-            try:
-                # 最新の動画の「最後から1秒前」のフレームを抽出（動体検知直後の映像）
-                # 実際には target_time と最新mp4のタイムスタンプを比較して -ss のシーク時間を計算するのが理想的です
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-sseof", "-1", # ファイル末尾から1秒前
-                    "-i", latest_mp4,
-                    "-vframes", "1",
-                    "-q:v", "2",    # 高画質
-                    output_tmp
-                ]
-
-                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10, check=True)
-
-                if os.path.exists(output_tmp):
-                    with open(output_tmp, "rb") as f:
-                        image_data = f.read()
-                    return image_data
-
-            except subprocess.TimeoutExpired:
-                logger.warning(f"⏳ [{cam_conf['name']}] FFmpeg timeout on NVR file (Attempt {attempt}/{max_retries})")
-            except subprocess.CalledProcessError as e:
-                logger.warning(f"⚠️ [{cam_conf['name']}] FFmpeg extraction failed: {e} (Attempt {attempt}/{max_retries})")
-            except Exception as e:
-                logger.error(f"❌ [{cam_conf['name']}] Unexpected error in NVR extraction: {e}")
-                break
-
-            time.sleep(2 ** attempt)  # Exponential Backoff
-
-        return None
-    finally:
-        # Low: タイムアウトや異常終了でffmpegが output_tmp に部分書き込みしたファイルを
-        # 残したまま関数を抜けると、/tmp に snapshot_*.jpg の残骸が蓄積し続けていた。
-        # 成功時に読み取った後の削除も含め、どの終了経路でも確実にクリーンアップする。
-        try:
-            if os.path.exists(output_tmp):
-                os.remove(output_tmp)
-        except OSError:
-            pass
-
+    return snapshot_service.extract_from_recording(cam_conf)
 
 def save_image_from_stream(cam_name: str, event_type: str = "motion") -> Optional[str]:
-    cam_conf = next((c for c in config.CAMERAS if c["name"] == cam_name), None)
+    cam_conf = device_registry.get_camera_by_name(cam_name)
     if not cam_conf:
         return None
 
-    logger.debug(f"📸 [{cam_name}] 映像フレームの取得を開始します (方式: NVR切り出し)")
-    
-    # ここを cv2 から nvr に変更
-    image_data = capture_snapshot_from_nvr(cam_conf)
+    # unified_server がメモリに持つ最新画像 (ライブ配信中の latest.jpg 等) を先に使い、
+    # 無い場合だけ従来どおり録画から ffmpeg で切り出す
+    image_data = snapshot_service.fetch_from_server(cam_conf['id'])
+    if image_data:
+        logger.debug(f"📸 [{cam_name}] スナップショットをサーバーのキャッシュから取得しました")
+    else:
+        logger.debug(f"📸 [{cam_name}] 映像フレームの取得を開始します (方式: NVR切り出し)")
+        image_data = capture_snapshot_from_nvr(cam_conf)
 
     if not image_data:
         # 取得に失敗した場合でも、システム自体を落とさず（Fail-Soft）Noneを返してスキップする
@@ -300,77 +244,68 @@ def force_close_session(service_obj: Any) -> None:
     except Exception as e:
         logger.debug(f"Session close warning: {e}")
 
-def process_camera_event(msg: Any, cam_conf: Dict[str, Any]) -> None:
+def process_camera_event(msg: Any, cam_conf: Dict[str, Any]) -> bool:
     """
-    単一のONVIFイベントメッセージをパースし、動体検知イベントを処理します。
-    処理結果に関わらず確実にリソースを解放し、連続発火を防ぐためのクールダウン（Debounce）処理を行います。
+    単一のONVIFイベントメッセージを解析し、動体検知イベントであればワーカーのキューへ投入します。
+    PullMessages のループから呼ばれるため、DB記録・スナップショット取得などの重い処理はここでは行いません
+    (handle_motion_event がワーカースレッドで実行します)。
 
     Args:
         msg (Any): ONVIFイベントメッセージオブジェクト
         cam_conf (Dict[str, Any]): カメラ設定辞書
+
+    Returns:
+        bool: 動体検知イベントとして投入した場合 True
     """
-    global last_motion_detected
     cam_name: str = cam_conf['name']
-    cam_id: str = cam_conf['id']
-    topic_str: str = "Unknown"
-    debug_val: str = "N/A"
-    is_motion: bool = False
-    
     try:
-        # 1. Topicの抽出
-        if hasattr(msg, 'Topic'):
-            if hasattr(msg.Topic, '_value_1') and msg.Topic._value_1 is not None:
-                topic_str = str(msg.Topic._value_1)
-            else:
-                topic_str = str(msg.Topic)
-
-        # 2. Message(XML)のパース
-        if hasattr(msg, 'Message') and hasattr(msg.Message, '_value_1'):
-            element: Any = msg.Message._value_1
-            if type(element).__name__ == '_Element':
-                xml_str: str = etree.tostring(element, encoding='unicode')
-                debug_val = xml_str
-                xml_lower: str = xml_str.lower()
-                if ('motion' in xml_lower or 'ruleengine' in xml_lower) and ('value="true"' in xml_lower or 'value="1"' in xml_lower):
-                    is_motion = True
-            else:
-                debug_val = str(element)
-        
-        logger.debug(f"🕵️ [TOPIC AUDIT] {cam_name} | Topic: {topic_str} | Data: {debug_val}")
-
-        # 3. 早期リターン（対象外イベント）
-        if not is_motion:
-            # 動体検知ではない場合、ここで処理を終了（finallyへ飛ぶ）
-            return
-
-        # 4. クールダウン（Debounce）処理の追加
-        current_time: float = time.time()
-        last_detected_time: float = last_motion_detected.get(cam_id, 0.0)
-        
-        if current_time - last_detected_time < MOTION_COOLDOWN_SEC:
-            logger.debug(f"🏃 [{cam_name}] Motion Detected (Skipped due to cooldown)")
-            return
-            
-        # 状態更新（有効な検知として処理を進めるため、タイムスタンプを更新）
-        last_motion_detected[cam_id] = current_time
-
-        # 5. 動体検知時のアクション（DB保存・画像取得）
-        logger.info(f"🏃 [{cam_name}] Motion Detected!")
-        JST = datetime.timezone(datetime.timedelta(hours=9))
-        now_str = dt_class.now(JST).isoformat()             
-
-        columns = ["timestamp", "device_name", "device_id", "device_type", "movement_state"]
-        values = (now_str, cam_name, cam_conf['id'], "ONVIF_CAMERA", "ON")
-
-        save_log_generic("device_records", columns, values)
-        save_image_from_stream(cam_name, "motion")
-        
+        event = parse_event(msg, cam_conf)
+        if event is None:
+            return False
+        event_queue.put(event)
+        return True
     except Exception as e:
         logger.warning(f"⚠️ [{cam_name}] Event Parse Error: {e} | Trace: {traceback.format_exc().splitlines()[-1]}")
+        return False
     finally:
         # ✅ いかなる場合（早期リターン・例外発生）でも確実にリソースを解放する
         del msg
-        logger.debug(f"🧹 [{cam_name}] Event processing completed / Local resources released.")
+
+
+def handle_motion_event(event: CameraEvent) -> None:
+    """
+    キューから取り出した動体検知イベントを処理します (ワーカースレッドで実行)。
+    連続発火を防ぐためのクールダウン（Debounce）判定のあと、DB記録とスナップショット保存を行います。
+    """
+    cam_conf: Dict[str, Any] = event.cam_conf
+    cam_name: str = cam_conf['name']
+    cam_id: str = cam_conf['id']
+
+    # クールダウン（Debounce）処理
+    current_time: float = time.time()
+    last_detected_time: float = last_motion_detected.get(cam_id, 0.0)
+
+    if current_time - last_detected_time < MOTION_COOLDOWN_SEC:
+        logger.debug(f"🏃 [{cam_name}] Motion Detected (Skipped due to cooldown, {event.count} events)")
+        return
+
+    # 状態更新（有効な検知として処理を進めるため、タイムスタンプを更新）
+    last_motion_detected[cam_id] = current_time
+
+    # 動体検知時のアクション（DB保存・画像取得）。記録時刻はキューでの待ち時間を含めず受信時刻とする
+    logger.info(f"🏃 [{cam_name}] Motion Detected!")
+    JST = datetime.timezone(datetime.timedelta(hours=9))
+    now_str = dt_class.fromtimestamp(event.received_wall, JST).isoformat()
+
+    columns = ["timestamp", "device_name", "device_id", "device_type", "movement_state"]
+    values = (now_str, cam_name, cam_id, "ONVIF_CAMERA", "ON")
+
+    ingest_queue.enqueue_log("device_records", columns, values)
+    save_image_from_stream(cam_name, "motion")
+    logger.debug(f"🧹 [{cam_name}] Event processing completed.")
+
+
+event_queue = create_queue(handle_motion_event)
 
 
 def monitor_single_camera(cam_conf: Dict[str, Any]) -> None:
@@ -618,8 +553,10 @@ def monitor_single_camera(cam_conf: Dict[str, Any]) -> None:
 async def main() -> None:
     if not WSDL_DIR: return logger.error("WSDL not found")
     loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor(max_workers=len(config.CAMERAS)) as executor:
-        await asyncio.gather(*[loop.run_in_executor(executor, monitor_single_camera, cam) for cam in config.CAMERAS])
+    cameras = device_registry.cameras()
+    event_queue.start()
+    with ThreadPoolExecutor(max_workers=len(cameras)) as executor:
+        await asyncio.gather(*[loop.run_in_executor(executor, monitor_single_camera, cam) for cam in cameras])
 
 if __name__ == "__main__":
     try: asyncio.run(main())
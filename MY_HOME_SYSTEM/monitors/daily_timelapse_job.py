@@ -2,12 +2,10 @@ import os
 import sys
 import datetime
 import time
-import glob
 import json
 import tempfile
 import traceback
 import argparse
-import re
 from pathlib import Path
 from dataclasses import asdict
 
@@ -19,6 +17,7 @@ if PROJECT_ROOT not in sys.path:
 import config
 from core.logger import setup_logging
 from services.notification_service import send_push
+from services import recording_catalog
 
 # コアエンジンから必要なクラス・関数をそのままインポート
 from monitors.smart_timelapse_generator import (
@@ -85,39 +84,27 @@ def run_daily_timelapse(camera_name: str, target_date_str: str = None, start_tim
         logger.error(f"カメラディレクトリが見つかりません: {nvr_dir}")
         return
 
-    # YYYYMMDD形式でファイルを検索し、時系列にソート
-    date_prefix = target_date.strftime('%Y%m%d')
-    target_files = sorted(glob.glob(os.path.join(nvr_dir, f"{date_prefix}_*.mp4")))
-    
-    # --- 時間帯フィルタリング処理 ---
-    if target_files and (start_time_str or end_time_str):
+    # 対象日の録画を録画カタログから時系列順に取得する
+    if start_time_str or end_time_str:
         try:
             start_time = parse_time(start_time_str) if start_time_str else None
             end_time = parse_time(end_time_str) if end_time_str else None
         except ValueError as ve:
             logger.error(str(ve))
             return
-            
-        filter_start_dt = datetime.datetime.combine(target_date, start_time) if start_time else datetime.datetime.min
-        filter_end_dt = datetime.datetime.combine(target_date, end_time) if end_time else datetime.datetime.max
-        
-        filtered_files = []
-        for f in target_files:
-            base_name = os.path.basename(f)
-            m = re.search(r'\d{8}_(\d{6})\.mp4', base_name)
-            if m:
-                t_str = m.group(1)
-                file_start_time = datetime.time(int(t_str[0:2]), int(t_str[2:4]), int(t_str[4:6]))
-                file_start_dt = datetime.datetime.combine(target_date, file_start_time)
-                # チャンクの最大長を安全を見て15分と仮定し、終了時刻を算出
-                file_end_dt = file_start_dt + datetime.timedelta(minutes=15)
-                
-                # 重複判定: (ファイル開始 < フィルタ終了) AND (ファイル終了 > フィルタ開始)
-                # 例: 05:56開始でも、06:00以降に被っていれば対象に含める
-                if file_start_dt < filter_end_dt and file_end_dt > filter_start_dt:
-                    filtered_files.append(f)
-        
-        target_files = filtered_files
+
+        filter_start_dt = datetime.datetime.combine(target_date, start_time or datetime.time.min)
+        filter_end_dt = (datetime.datetime.combine(target_date, end_time) if end_time
+                         else datetime.datetime.combine(target_date + datetime.timedelta(days=1), datetime.time.min))
+        # 録画の終了時刻 (カタログが最終更新時刻から推定) が指定範囲と重なるものを対象にする
+        # 例: 05:56開始でも、06:00以降に被っていれば対象に含める
+        recordings = [
+            r for r in recording_catalog.clips(camera_name, filter_start_dt, filter_end_dt)
+            if r.start.date() == target_date
+        ]
+    else:
+        recordings = recording_catalog.clips_on(camera_name, target_date)
+    target_files = [r.path for r in recordings]
 
     if not target_files:
         logger.info(f"対象期間の録画ファイルが存在しません。処理を終了します。")
@@ -139,7 +126,7 @@ def run_daily_timelapse(camera_name: str, target_date_str: str = None, start_tim
     video_builder = VideoBuilder()
     uploader = Uploader()
 
-    all_clip_files = []
+    clip_jobs = []
     global_event_idx = 0
     total_event_duration = 0
 
@@ -159,48 +146,47 @@ def run_daily_timelapse(camera_name: str, target_date_str: str = None, start_tim
 
     try:
         with tempfile.TemporaryDirectory() as temp_dir:
-            # チャンクファイルを順番に解析
+            # チャンクファイルの長さと開始時刻を取得
+            chunks = []
             for filepath in target_files:
                 time.sleep(1)
                 base_name = os.path.basename(filepath)
-                logger.info(f"--- チャンク処理開始: {base_name} ---")
-                
                 info = get_video_info(filepath)
-                start_dt = get_video_start_dt(filepath, info)
                 duration = float(info.get('format', {}).get('duration', 0))
                 
                 if duration <= 0:
                     logger.warning(f"動画長が不正なためスキップします: {base_name}")
                     continue
+                chunks.append((filepath, duration, get_video_start_dt(filepath, info)))
+
+            # 1. 動き検知 (チャンクごとにプロセスを分けて並列実行。motion_<ファイル名>.csv を出力)
+            all_records = motion_detector.detect_many([(filepath, duration) for filepath, duration, _ in chunks], work)
+
+            for (filepath, _, start_dt), records in zip(chunks, all_records):
+                base_name = os.path.basename(filepath)
+                logger.info(f"--- チャンク処理: {base_name} ---")
 
-                # 1. 動き検知
-                records = motion_detector.detect(filepath, work, duration)
-                
                 # 2. イベント構築
                 events = event_builder.build(records, work)
                 
                 # CSVファイルの退避 (次チャンクでの上書きを防止)
                 file_no_ext = os.path.splitext(base_name)[0]
-                for csv_name in ["motion.csv", "events.csv", "events_enriched.csv"]:
+                for csv_name in ["events.csv", "events_enriched.csv"]:
                     src_csv = os.path.join(work, csv_name)
                     if os.path.exists(src_csv):
                         dst_csv = os.path.join(work, f"{os.path.splitext(csv_name)[0]}_{file_no_ext}.csv")
                         os.rename(src_csv, dst_csv)
                 
-                if events:
-                    # 3. 各イベントごとにクリップを切り出し
-                    for ev in events:
-                        global_event_idx += 1
-                        # 1日通して一意のEvent IDを再採番 (Event001, Event002...)
-                        ev.event_id = f"Event{global_event_idx:03d}"
-                        total_event_duration += ev.duration
-                        
-                        # エンジンの隠蔽メソッドを直接利用してクリップを生成
-                        clip_path = video_builder._build_clip(filepath, ev, temp_dir, start_dt)
-                        if clip_path:
-                            all_clip_files.append(clip_path)
+                for ev in events:
+                    global_event_idx += 1
+                    # 1日通して一意のEvent IDを再採番 (Event001, Event002...)
+                    ev.event_id = f"Event{global_event_idx:03d}"
+                    total_event_duration += ev.duration
+                    clip_jobs.append((filepath, ev, start_dt))
 
             # 全ファイルの解析ループ終了
+            # 3. 全イベントのクリップを並列に切り出し (結合順はイベント順のまま)
+            all_clip_files, copy_mode = video_builder.build_clips(clip_jobs, temp_dir)
             if not all_clip_files:
                 logger.info(f"{camera_name} の対象期間内 ({target_date_str}{time_range_log}) に動き検知イベントはありませんでした。")
                 send_push(
@@ -215,7 +201,7 @@ def run_daily_timelapse(camera_name: str, target_date_str: str = None, start_tim
             logger.info(f"クリップの一括結合と全体サムネイル生成を開始します...")
             
             # 4. 全クリップを1本の動画に結合
-            if video_builder._build_concat(all_clip_files, sum_info.output_path, temp_dir):
+            if video_builder._build_concat(all_clip_files, sum_info.output_path, temp_dir, copy_mode):
                 video_builder._generate_thumbnail(sum_info.output_path)
                 logger.info(f"日次タイムラプス動画の生成完了: {sum_info.output_path}")
                 
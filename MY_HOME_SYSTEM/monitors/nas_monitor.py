@@ -285,6 +285,9 @@ class NasMonitor:
             target="discord", channel=channel
         )
 
+def main() -> None:
+    """スケジューラからの呼び出し用エントリ"""
+    NasMonitor().run()
+
 if __name__ == "__main__":
-    monitor = NasMonitor()
-    monitor.run()
\ No newline at end of file
+    main()
\ No newline at end of file
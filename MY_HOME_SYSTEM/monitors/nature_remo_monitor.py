@@ -2,15 +2,13 @@
 import asyncio
 import sys
 import os
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from typing import Optional, List, Dict, Any, Tuple
 
 # プロジェクトルートへのパス解決
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
+from core.http_client import AsyncHttpClient, TokenBucket
 from core.logger import setup_logging
 from services import sensor_service
 
@@ -19,24 +17,22 @@ logger = setup_logging("nature_remo")
 
 # --- API Client Setup ---
 
-def create_session() -> requests.Session:
-    """リトライロジック付きセッションの作成"""
-    session = requests.Session()
-    retry = Retry(
-        total=3,
-        backoff_factor=1,
-        status_forcelist=[500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("https://", adapter)
-    return session
+# アクセストークンごとのレート制限 (5分あたり NATURE_REMO_RATE_PER_5MIN 回)。プロセス内で共有する
+_RATE_LIMITERS: Dict[str, TokenBucket] = {}
+
+
+def _limiter_for(token: str) -> TokenBucket:
+    if token not in _RATE_LIMITERS:
+        _RATE_LIMITERS[token] = TokenBucket.per_period(config.NATURE_REMO_RATE_PER_5MIN, 300)
+    return _RATE_LIMITERS[token]
 
-def fetch_data_sync(location: str, token: str) -> Dict[str, List[Dict[str, Any]]]:
+
+async def fetch_data(client: AsyncHttpClient, location: str, token: str) -> Dict[str, List[Dict[str, Any]]]:
     """
-    Nature Remo APIからデータを取得・整形して返す (同期処理)
+    Nature Remo APIからデータを取得・整形して返す
     
     Args:
+        client (AsyncHttpClient): 共有HTTPクライアント (接続プールを拠点間で共有する)
         location (str): 拠点名（伊丹/高砂など）
         token (str): APIアクセストークン
 
@@ -51,43 +47,35 @@ def fetch_data_sync(location: str, token: str) -> Dict[str, List[Dict[str, Any]]
         return {}
     
     headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
-    session = create_session()
-    result = {"appliances": [], "devices": []}
+    limiter = _limiter_for(token)
 
-    try:
-        # 1. Appliances (電力情報など)
-        url_app = "https://api.nature.global/1/appliances"
-        res_app = session.get(url_app, headers=headers, timeout=10)
-        res_app.raise_for_status()
-        result["appliances"] = res_app.json()
-
-        # 2. Devices (センサー情報など)
-        url_dev = "https://api.nature.global/1/devices"
-        res_dev = session.get(url_dev, headers=headers, timeout=10)
-        res_dev.raise_for_status()
-        result["devices"] = res_dev.json()
-        
-    except Exception as e:
-        # 通信エラー等は介入が必要な可能性があるため ERROR/WARNING で出力
-        logger.error("API Error at %s: %s", location, e)
-    
-    return result
+    # Appliances (電力情報など) と Devices (センサー情報など) を並行して取得する
+    appliances, devices = await asyncio.gather(
+        client.get_json(f"{config.NATURE_REMO_API_HOST}/1/appliances", headers=headers, limiter=limiter),
+        client.get_json(f"{config.NATURE_REMO_API_HOST}/1/devices", headers=headers, limiter=limiter),
+    )
+    if appliances is None or devices is None:
+        # 通信エラー等は介入が必要な可能性があるため ERROR で出力
+        logger.error("API Error at %s: appliances=%s devices=%s", location,
+                     "ok" if appliances is not None else "failed", "ok" if devices is not None else "failed")
+
+    return {"appliances": appliances or [], "devices": devices or []}
 
 # --- Main Logic (Async) ---
 
-async def process_location(location: str, token: str) -> None:
+async def process_location(client: AsyncHttpClient, location: str, token: str) -> None:
     """
     1つの拠点(伊丹/高砂)のデータを処理する
     
     Args:
+        client (AsyncHttpClient): 共有HTTPクライアント
         location (str): 拠点名
         token (str): APIトークン
     """
     if not token:
         return
 
-    # APIコールはブロッキングなのでスレッドに逃がす
-    data = await asyncio.to_thread(fetch_data_sync, location, token)
+    data = await fetch_data(client, location, token)
     
     # 1. 電力データの処理 (Appliances)
     for app in data.get("appliances", []):
@@ -148,9 +136,8 @@ async def main() -> None:
         ("高砂", config.NATURE_REMO_ACCESS_TOKEN_TAKASAGO)
     ]
 
-    for loc, token in targets:
-        if token:
-            await process_location(loc, token)
+    async with AsyncHttpClient(max_connections=config.DEVICE_POLL_CONCURRENCY) as client:
+        await asyncio.gather(*(process_location(client, loc, token) for loc, token in targets if token))
 
     logger.debug("🏁 --- Monitor Completed ---")
 
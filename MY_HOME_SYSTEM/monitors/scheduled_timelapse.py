@@ -241,21 +241,19 @@ def main(args):
                             with open(part_file, "rb") as f:
                                 video_data = f.read()
                             
-                            push_success = send_push(line_user_id, [message], image_data=video_data, target="discord", channel="notify", filename=part_filename)
+                            # send_push は送信箱へ積むだけ (送信・レート制限への追従は配送ワーカーが行う)。
+                            # 後から Discord に拒否された場合は、配送ワーカーがエラーチャンネルへ知らせる
+                            queued = send_push(line_user_id, [{"type": "text", "text": message}], image_data=video_data, target="discord", channel="notify", filename=part_filename)
                             
-                            if push_success:
-                                logger.info(f"Discordへタイムラプス動画({part_filename})の送信完了")
+                            if queued:
+                                logger.info(f"タイムラプス動画({part_filename})をDiscordの送信キューへ登録しました")
                             else:
-                                logger.error(f"Discordへのタイムラプス動画({part_filename})送信に失敗しました")
+                                logger.error(f"タイムラプス動画({part_filename})をDiscordの送信キューへ登録できませんでした")
                                 notify_error(f"⚠️ 【通知エラー】[{camera_name}] {schedule_name} のタイムラプス動画({part_filename})のDiscord送信に失敗しました。")
                                 
                         except Exception as e:
                             logger.error(f"通知送信処理中に例外発生 ({part_filename}): {e}")
                             notify_error(f"⚠️ 【システムエラー】[{camera_name}] {schedule_name} の通知送信中に例外が発生しました: {e}")
-                        
-                        # APIのレートリミットを回避するためのインターバル
-                        if idx < total_parts:
-                            time_module.sleep(5)
                 else:
                     # FFmpegの生成に失敗した場合
                     logger.error(f"[{camera_name}] {schedule_name} の動画生成に失敗しました。")
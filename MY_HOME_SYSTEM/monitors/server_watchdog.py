@@ -153,8 +153,12 @@ def check_health() -> None:
         err = traceback.format_exc()
         logger.error("Watchdog Crashed: %s", err)
 
-if __name__ == "__main__":
+def main() -> None:
+    """スケジューラからの呼び出し用エントリ"""
     # ハードウェアの健全性確認（スロットリング監視）
     check_throttling_status()
     # ソフトウェアの健全性確認（プロセス死活監視）
-    check_health()
\ No newline at end of file
+    check_health()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -12,9 +12,14 @@ import cv2
 import traceback
 import shutil
 import re
+import bisect
+import queue
+import threading
+import multiprocessing
 import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Union, Callable
 from dataclasses import dataclass, field, asdict
 
 try:
@@ -58,13 +63,39 @@ BUFFER_SEC = getattr(config, 'TIMELAPSE_BUFFER_SEC', 3)
 SPEEDUP_FACTOR = getattr(config, 'TIMELAPSE_SPEEDUP_FACTOR', 4)
 
 DEBUG_FFMPEG = getattr(config, 'TIMELAPSE_DEBUG_FFMPEG', False)
-FAST_STREAM_COPY_MODE = getattr(config, 'TIMELAPSE_FAST_STREAM_COPY_MODE', False)
+
+def _parse_copy_mode(value: Any) -> Union[bool, str]:
+    """TIMELAPSE_FAST_STREAM_COPY_MODE を True / False / "auto" に正規化する"""
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value == "auto":
+            return "auto"
+        return value in ("1", "true", "yes", "on")
+    return bool(value)
+
+FAST_STREAM_COPY_MODE = _parse_copy_mode(getattr(config, 'TIMELAPSE_FAST_STREAM_COPY_MODE', False))
+KEYFRAME_TOLERANCE_SEC = getattr(config, 'TIMELAPSE_KEYFRAME_TOLERANCE_SEC', 0.1)
+ENCODE_MAX_WORKERS = getattr(config, 'TIMELAPSE_ENCODE_MAX_WORKERS', 0)
+
+# 動き検知パイプライン
+FRAME_RING_SIZE = getattr(config, 'TIMELAPSE_FRAME_RING_SIZE', 64)
+SKIP_STATIC_FRAMES = getattr(config, 'TIMELAPSE_SKIP_STATIC_FRAMES', True)
+STATIC_DIFF_THRESH = getattr(config, 'TIMELAPSE_STATIC_DIFF_THRESH', 10)
+STATIC_MAX_PIXELS = getattr(config, 'TIMELAPSE_STATIC_MAX_PIXELS', 20)
+STATIC_REFRESH_FRAMES = getattr(config, 'TIMELAPSE_STATIC_REFRESH_FRAMES', 10)
+MOTION_CSV_FLUSH_ROWS = getattr(config, 'TIMELAPSE_MOTION_CSV_FLUSH_ROWS', 256)
+WARMUP_SEC = getattr(config, 'TIMELAPSE_WARMUP_SEC', 30)
+ANALYZE_MAX_WORKERS = getattr(config, 'TIMELAPSE_ANALYZE_MAX_WORKERS', 0)
 
 FONT_FILE = getattr(config, 'TIMELAPSE_FONT_FILE', '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc')
 MAX_FILE_SIZE_MB = getattr(config, 'TIMELAPSE_MAX_FILE_SIZE_MB', 22)
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 SAFE_SPLIT_BYTES = 10 * 1024 * 1024 # 分割処理用バッファマージン
 
+def _fmt_sec(sec: float) -> str:
+    """ffmpeg のフィルタ式に埋め込む秒数 (不要な小数点以下を付けない)"""
+    return f"{sec:.3f}".rstrip("0").rstrip(".")
+
 def get_ffmpeg_stderr():
     return sys.stderr if DEBUG_FFMPEG else subprocess.DEVNULL
 
@@ -104,7 +135,7 @@ class SummaryInfo:
     version: str = __version__
     ffmpeg_version: str = ""
     opencv_version: str = cv2.__version__
-    fast_stream_copy_mode: bool = FAST_STREAM_COPY_MODE
+    fast_stream_copy_mode: Union[bool, str] = FAST_STREAM_COPY_MODE
 
 # ==========================================
 # ユーティリティ
@@ -234,63 +265,208 @@ def log_cpu_usage():
     if HAS_PSUTIL:
         logger.info(f"現在のCPU使用率: {psutil.cpu_percent()}%")
 
+def encode_worker_count(max_workers: int = 0, cpu_count: Optional[int] = None, load: Optional[float] = None) -> int:
+    """
+    同時に走らせる ffmpeg エンコードの数を決める。
+    CPU コア数から直近1分のロードアベレージ (他プロセスが使っているコア) を差し引き、
+    最低1・最大 max_workers (0 なら上限なし) に収める。
+    """
+    cpus = cpu_count or os.cpu_count() or 1
+    if load is None:
+        try:
+            load = os.getloadavg()[0]
+        except (OSError, AttributeError):
+            load = 0.0
+    workers = max(1, int(cpus - load))
+    if max_workers > 0:
+        workers = min(workers, max_workers)
+    return min(workers, cpus)
+
+def get_keyframe_times(input_path: str) -> List[float]:
+    """
+    映像ストリームのキーフレーム位置 (先頭パケットからの秒) を返す。
+    デコードせずパケットのフラグだけを読むため、10分の録画でも数百ms程度で終わる。取得に失敗したら空リスト。
+    """
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path]
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=300)
+    except Exception as e:
+        logger.warning(f"キーフレーム位置の取得に失敗しました ({input_path}): {e}")
+        return []
+    times, origin = [], None
+    for line in res.stdout.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or parts[0] in ("", "N/A"):
+            continue
+        pts = float(parts[0])
+        origin = pts if origin is None else min(origin, pts)
+        if "K" in parts[1]:
+            times.append(pts)
+    return sorted(t - origin for t in times)
+
+def is_keyframe_aligned(keyframes: List[float], sec: float, tolerance: float = KEYFRAME_TOLERANCE_SEC) -> bool:
+    """sec の前後 tolerance 秒以内にキーフレームがあるか (keyframes は昇順)"""
+    i = bisect.bisect_left(keyframes, sec - tolerance)
+    return i < len(keyframes) and keyframes[i] <= sec + tolerance
+
 # ==========================================
 # モジュール 1: MotionDetector
 # ==========================================
+class FrameRing:
+    """
+    ffmpeg の rawvideo 出力を受ける固定長のフレームバッファ。
+    読み込みスレッドが空きスロットへ直接 readinto し、解析スレッドは使い終わったスロットを release で返す。
+    解析が遅れている間も ffmpeg は capacity フレーム分まで先にデコードできる。
+    """
+    def __init__(self, capacity: int, height: int, width: int):
+        self.frames = np.empty((max(2, capacity), height, width), dtype=np.uint8)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        self._filled: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._closed = False
+        for i in range(len(self.frames)):
+            self._free.put(i)
+
+    def fill(self, stream) -> None:
+        """読み込みスレッドの本体。ストリームの終端 (または close) で None を流して終わる"""
+        try:
+            while True:
+                idx = self._free.get()
+                if self._closed:
+                    break
+                if not self._read_exact(stream, memoryview(self.frames[idx]).cast('B')):
+                    break
+                self._filled.put(idx)
+        except (OSError, ValueError):
+            # 解析側の異常終了でパイプが閉じられた
+            pass
+        finally:
+            self._filled.put(None)
+
+    @staticmethod
+    def _read_exact(stream, view: memoryview) -> bool:
+        got = 0
+        while got < len(view):
+            n = stream.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def __iter__(self):
+        while True:
+            idx = self._filled.get()
+            if idx is None:
+                return
+            yield idx
+
+    def release(self, idx: int) -> None:
+        self._free.put(idx)
+
+    def close(self) -> None:
+        self._closed = True
+        self._free.put(-1)
+
 class MotionDetector:
     def __init__(self):
         check_roi(WIDTH, HEIGHT)
         self.fgbg = cv2.createBackgroundSubtractorMOG2(history=BG_HISTORY, varThreshold=BG_VAR_THRESH, detectShadows=False)
         self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (MORPH_KERNEL_SIZE, MORPH_KERNEL_SIZE))
-
-    def detect(self, input_path: str, work_dir: str, duration_sec: float) -> List[MotionRecord]:
+        self.skip_static = SKIP_STATIC_FRAMES
+        self.stats = {"frames": 0, "analyzed": 0, "skipped": 0}
+        self._reference: Optional[np.ndarray] = None
+        self._reference_had_motion = True
+        self._since_apply = 0
+
+    def detect(self, input_path: str, work_dir: str, duration_sec: float,
+               csv_name: str = "motion.csv", warmup_path: Optional[str] = None) -> List[MotionRecord]:
         logger.info(f"[1/4] 動き検知を開始します: {input_path}")
         os.makedirs(work_dir, exist_ok=True)
         log_cpu_usage()
-        
-        cmd = [
-            'nice', '-n', '15',
-            'ffmpeg', '-v', 'error', '-nostdin', '-i', input_path,
+
+        if warmup_path:
+            self._warmup(warmup_path)
+
+        records: List[MotionRecord] = []
+        total_expected_frames = int(duration_sec * FPS_ANALYZE) if duration_sec else 0
+        progress_step = max(1, int(total_expected_frames / 10))
+        motion_csv = os.path.join(work_dir, csv_name)
+
+        with open(motion_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "largest_area", "contour_count"])
+            pending: List[list] = []
+
+            def on_frame(frame: np.ndarray, current_sec: int) -> None:
+                record = self._analyze(frame, current_sec)
+                if record:
+                    records.append(record)
+                    pending.append([sec_to_time(record.time_sec), record.largest_area, record.contour_count])
+                    if len(pending) >= MOTION_CSV_FLUSH_ROWS:
+                        writer.writerows(pending)
+                        f.flush()
+                        pending.clear()
+                if total_expected_frames > 0 and (current_sec + 1) % progress_step == 0:
+                    logger.info(f"解析進捗: {((current_sec + 1) / total_expected_frames) * 100:.0f}%")
+
+            self._read_frames(self._frame_command(input_path), on_frame)
+            writer.writerows(pending)
+
+        logger.info(f"動き検知完了: {self.stats['frames']} フレーム (MOG2 {self.stats['analyzed']} / 静止スキップ {self.stats['skipped']})")
+        return records
+
+    def detect_many(self, jobs: List[Tuple[str, float]], work_dir: str, workers: Optional[int] = None) -> List[List[MotionRecord]]:
+        """
+        複数ファイル (入力パス, 長さ秒) の動き検知をプロセスを分けて並列に行い、jobs の順で結果を返す。
+        motion.csv はファイルごとに motion_<ファイル名>.csv へ書く。
+        逐次処理では前のファイルの背景モデルを引き継いでいたため、2本目以降は直前のファイルの末尾で暖機する。
+        """
+        tasks = [(path, work_dir, duration, f"motion_{Path(path).stem}.csv", jobs[i - 1][0] if i else None)
+                 for i, (path, duration) in enumerate(jobs)]
+        workers = min(workers or encode_worker_count(ANALYZE_MAX_WORKERS), len(tasks))
+        if workers <= 1:
+            # 1プロセスなら背景モデルをそのまま引き継げるので暖機しない
+            return [self.detect(path, work_dir, duration, csv_name) for path, work_dir, duration, csv_name, _ in tasks]
+
+        logger.info(f"{len(tasks)} ファイルの動き検知を {workers} プロセスで並列に実行します")
+        # OpenCV の内部スレッドと fork の組み合わせはデッドロックし得るため spawn で起動する
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_analyze_worker) as pool:
+            return list(pool.map(_detect_file, tasks))
+
+    def _frame_command(self, input_path: str, tail_sec: Optional[int] = None) -> List[str]:
+        cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin']
+        if tail_sec:
+            cmd += ['-sseof', f'-{tail_sec}']
+        cmd += [
+            '-i', input_path,
             '-vf', f'fps={FPS_ANALYZE},scale={WIDTH}:{HEIGHT}',
             '-f', 'image2pipe', '-pix_fmt', 'gray', '-vcodec', 'rawvideo', '-'
         ]
         if shutil.which('ionice'):
             cmd = ['ionice', '-c', '2', '-n', '7'] + cmd
-        
+        return cmd
+
+    def _read_frames(self, cmd: List[str], on_frame: Callable[[np.ndarray, int], None]) -> int:
+        """ffmpeg を起動し、読み込みスレッド経由で1フレームずつ on_frame(フレーム, 秒) を呼ぶ"""
         try:
             process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         except Exception as e:
             logger.error(f"ffmpegプロセスの起動に失敗しました: {e}")
             raise
-        
-        records: List[MotionRecord] = []
+
+        ring = FrameRing(FRAME_RING_SIZE, HEIGHT, WIDTH)
+        reader = threading.Thread(target=ring.fill, args=(process.stdout,), name="motion-frame-reader", daemon=True)
+        reader.start()
         current_sec = 0
-        frame_size = WIDTH * HEIGHT
-        total_expected_frames = int(duration_sec * FPS_ANALYZE) if duration_sec else 0
 
         try:
-            while True:
-                raw_frame = process.stdout.read(frame_size)
-                if len(raw_frame) != frame_size:
-                    break
-                    
-                frame = np.frombuffer(raw_frame, dtype=np.uint8).reshape((HEIGHT, WIDTH))
-                roi_frame = frame[ROI_Y:ROI_Y+ROI_H, ROI_X:ROI_X+ROI_W]
-                fgmask = self.fgbg.apply(roi_frame)
-                fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel)
-                fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_CLOSE, self.kernel)
-                
-                contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                if contours:
-                    largest_contour = max(contours, key=cv2.contourArea)
-                    largest_area = cv2.contourArea(largest_contour)
-                    if largest_area > MIN_AREA_THRESHOLD:
-                        records.append(MotionRecord(current_sec, largest_area, len(contours)))
-                        
+            for idx in ring:
+                try:
+                    on_frame(ring.frames[idx], current_sec)
+                finally:
+                    ring.release(idx)
                 current_sec += 1
-                if total_expected_frames > 0 and current_sec % max(1, int(total_expected_frames / 10)) == 0:
-                    logger.info(f"解析進捗: {(current_sec / total_expected_frames) * 100:.0f}%")
-            
+
             process.wait(timeout=60)
             if process.returncode != 0:
                 err_msg = ""
@@ -304,6 +480,7 @@ class MotionDetector:
             logger.exception(f"フレーム解析中に例外が発生しました: {e}")
             raise
         finally:
+            ring.close()
             if process.stdout:
                 process.stdout.close()
             if process.stderr:
@@ -315,15 +492,68 @@ class MotionDetector:
                 logger.error("FFmpegプロセスの終了がタイムアウトしました。強制終了します。")
                 process.kill()
                 process.wait()
+            reader.join(timeout=5)
+        return current_sec
 
-        motion_csv = os.path.join(work_dir, "motion.csv")
-        with open(motion_csv, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["time", "largest_area", "contour_count"])
-            for rec in records:
-                writer.writerow([sec_to_time(rec.time_sec), rec.largest_area, rec.contour_count])
+    def _warmup(self, path: str) -> None:
+        """path の末尾 WARMUP_SEC 秒を背景モデルに学習させる (検知結果は捨てる)"""
+        def learn(frame: np.ndarray, _sec: int) -> None:
+            self.fgbg.apply(frame[ROI_Y:ROI_Y+ROI_H, ROI_X:ROI_X+ROI_W])
 
-        return records
+        try:
+            frames = self._read_frames(self._frame_command(path, tail_sec=WARMUP_SEC), learn)
+            logger.info(f"背景モデルを暖機しました: {os.path.basename(path)} 末尾 {frames} フレーム")
+        except Exception as e:
+            logger.warning(f"背景モデルの暖機に失敗しました。暖機なしで解析します ({path}): {e}")
+
+    def _is_static(self, roi_frame: np.ndarray) -> bool:
+        """直前に MOG2 へ渡したフレームからほとんど変化していないか"""
+        if not self.skip_static or self._reference is None or self._reference_had_motion:
+            return False
+        if self._since_apply >= STATIC_REFRESH_FRAMES:
+            return False
+        diff = cv2.absdiff(roi_frame, self._reference)
+        _, changed = cv2.threshold(diff, STATIC_DIFF_THRESH, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(changed) <= STATIC_MAX_PIXELS
+
+    def _analyze(self, frame: np.ndarray, current_sec: int) -> Optional[MotionRecord]:
+        """
+        1フレームを解析する。直前の MOG2 で前景が無く、そこから静止しているフレームは MOG2 を省略する
+        (前景が残っている間は省略しないため、止まった物体が背景に溶け込むまでの検知は変わらない)。
+        """
+        self.stats["frames"] += 1
+        roi_frame = frame[ROI_Y:ROI_Y+ROI_H, ROI_X:ROI_X+ROI_W]
+        if self._is_static(roi_frame):
+            self.stats["skipped"] += 1
+            self._since_apply += 1
+            return None
+
+        self.stats["analyzed"] += 1
+        self._since_apply = 0
+        if self._reference is None:
+            self._reference = np.empty_like(roi_frame)
+        np.copyto(self._reference, roi_frame)
+
+        fgmask = self.fgbg.apply(roi_frame)
+        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, self.kernel)
+        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_CLOSE, self.kernel)
+
+        contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self._reference_had_motion = bool(contours)
+        if contours:
+            largest_contour = max(contours, key=cv2.contourArea)
+            largest_area = cv2.contourArea(largest_contour)
+            if largest_area > MIN_AREA_THRESHOLD:
+                return MotionRecord(current_sec, largest_area, len(contours))
+        return None
+
+def _init_analyze_worker() -> None:
+    # ファイル単位でプロセスを分けているため、各プロセス内の OpenCV は1スレッドで足りる
+    cv2.setNumThreads(1)
+
+def _detect_file(task: Tuple[str, str, float, str, Optional[str]]) -> List[MotionRecord]:
+    input_path, work_dir, duration, csv_name, warmup_path = task
+    return MotionDetector().detect(input_path, work_dir, duration, csv_name=csv_name, warmup_path=warmup_path)
 
 # ==========================================
 # モジュール 2: EventBuilder
@@ -401,18 +631,55 @@ class EventBuilder:
 # ==========================================
 # モジュール 3: VideoBuilder
 # ==========================================
+class EncodeScheduler:
+    """
+    クリップ用 ffmpeg を上限付きの並列数で実行する。
+    各 ffmpeg は独立したプロセスなので、スレッドプールは起動と終了待ちだけを受け持つ。
+    結果は投入順に返すため、結合リストの順序は完了順に左右されない。
+    """
+    def __init__(self, workers: Optional[int] = None, runner: Callable = subprocess.run, timeout: int = 3600):
+        self.workers = workers or encode_worker_count(ENCODE_MAX_WORKERS)
+        self.runner = runner
+        self.timeout = timeout
+        # 並列数で割った残りのコアを各 libx264 に割り当てる (並列数 x 全コアのスレッド競合を避ける)
+        self.threads_per_job = max(1, (os.cpu_count() or 1) // self.workers)
+
+    def run(self, jobs: List[Tuple[str, List[str]]]) -> List[bool]:
+        """(ラベル, コマンド) のリストを実行し、成否を投入順に返す"""
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs)), thread_name_prefix="timelapse-encode") as pool:
+            futures = [pool.submit(self._run_one, label, cmd) for label, cmd in jobs]
+            return [f.result() for f in futures]
+
+    def _run_one(self, label: str, cmd: List[str]) -> bool:
+        try:
+            self.runner(cmd, stdout=subprocess.DEVNULL, stderr=get_ffmpeg_stderr(), check=True, timeout=self.timeout)
+            return True
+        except subprocess.CalledProcessError:
+            logger.error(f"FFmpeg切り出しエラー ({label})")
+        except subprocess.TimeoutExpired:
+            logger.error(f"FFmpeg処理がタイムアウトしました ({label})")
+        except Exception as e:
+            logger.error(f"FFmpeg実行エラー ({label}): {e}")
+        return False
+
+# (入力動画, イベント, 入力動画の開始時刻)
+ClipJob = Tuple[str, EventRecord, datetime.datetime]
+
 class VideoBuilder:
+    def __init__(self, scheduler: Optional[EncodeScheduler] = None, keyframe_probe: Callable[[str], List[float]] = get_keyframe_times):
+        self.scheduler = scheduler or EncodeScheduler()
+        self.keyframe_probe = keyframe_probe
+        # ストリームコピーで切り出したクリップ -> (イベント, 開始時刻)。結合時の再エンコードで文字を重ねるのに使う
+        self._clip_overlays: Dict[str, Tuple[EventRecord, datetime.datetime]] = {}
+
     def build(self, input_path: str, events: List[EventRecord], output_path: str, temp_dir: str, video_start_dt: datetime.datetime) -> bool:
         if not events:
             return False
 
-        logger.info(f"[3/4] 切り出し開始 (FAST_STREAM_COPY_MODE={FAST_STREAM_COPY_MODE})...")
-        clip_files = []
-        
-        for ev in events:
-            clip_path = self._build_clip(input_path, ev, temp_dir, video_start_dt)
-            if clip_path:
-                clip_files.append(clip_path)
+        logger.info(f"[3/4] 切り出し開始 (FAST_STREAM_COPY_MODE={FAST_STREAM_COPY_MODE}, 並列数={self.scheduler.workers})...")
+        clip_files, copy_mode = self.build_clips([(input_path, ev, video_start_dt) for ev in events], temp_dir)
 
         if not clip_files:
             logger.warning("有効なクリップが一つも生成されませんでした。")
@@ -421,34 +688,67 @@ class VideoBuilder:
         logger.info("[4/4] クリップの結合と全体サムネイル生成...")
         log_cpu_usage()
         
-        if not self._build_concat(clip_files, output_path, temp_dir):
+        if not self._build_concat(clip_files, output_path, temp_dir, copy_mode):
             return False
             
         self._generate_thumbnail(output_path)
         logger.info(f"タイムラプス動画の生成完了: {output_path}")
         return True
 
-    def _build_clip(self, input_path: str, ev: EventRecord, temp_dir: str, video_start_dt: datetime.datetime) -> str:
-        clip_path = os.path.join(temp_dir, f"{ev.event_id}.mp4")
-        cmd = self._build_ffmpeg_command(input_path, ev, clip_path, video_start_dt)
-        
-        try:
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=get_ffmpeg_stderr(), check=True, timeout=3600)
-            
-            event_thumb_path = clip_path.replace(".mp4", ".jpg")
-            self._generate_thumbnail(clip_path, event_thumb_path)
-            
-            return clip_path
-        except subprocess.CalledProcessError:
-            logger.error(f"FFmpeg切り出しエラー ({ev.event_id})")
-            return ""
-        except subprocess.TimeoutExpired:
-            logger.error(f"FFmpeg処理がタイムアウトしました ({ev.event_id})")
-            return ""
+    def build_clips(self, jobs: List[ClipJob], temp_dir: str) -> Tuple[List[str], bool]:
+        """
+        全イベントのクリップ (とサムネイル) を並列に生成する。
+        戻り値は (成功したクリップのパス [jobs の順], ストリームコピーで切り出したか)。
+        コピーしたクリップと再エンコードしたクリップは結合方法が異なるため、方式はバッチ全体で1つに決める。
+        """
+        copy_mode = self.resolve_copy_mode(jobs)
+        commands, clip_paths = [], []
+        for input_path, ev, video_start_dt in jobs:
+            clip_path = os.path.join(temp_dir, f"{ev.event_id}.mp4")
+            thumb_path = clip_path.replace(".mp4", ".jpg")
+            cmd = self._build_ffmpeg_command(input_path, ev, clip_path, video_start_dt, thumb_path=thumb_path,
+                                             copy=copy_mode, threads=self.scheduler.threads_per_job)
+            commands.append((ev.event_id, cmd))
+            clip_paths.append(clip_path)
+            if copy_mode:
+                self._clip_overlays[clip_path] = (ev, video_start_dt + datetime.timedelta(seconds=ev.start_sec))
+        results = self.scheduler.run(commands)
+        return [path for path, ok in zip(clip_paths, results) if ok], copy_mode
+
+    def resolve_copy_mode(self, jobs: List[ClipJob]) -> bool:
+        """FAST_STREAM_COPY_MODE が "auto" のときは、全イベントの開始位置がキーフレームに揃っている場合だけコピーする"""
+        if FAST_STREAM_COPY_MODE != "auto":
+            return bool(FAST_STREAM_COPY_MODE)
+        if not jobs:
+            return False
+        # -c copy の切り出しは直前のキーフレームから始まるため、ずれるのは開始位置だけ (終了はパケット単位で切れる)
+        keyframes: Dict[str, List[float]] = {}
+        for input_path, ev, _ in jobs:
+            if input_path not in keyframes:
+                keyframes[input_path] = self.keyframe_probe(input_path)
+            if not is_keyframe_aligned(keyframes[input_path], ev.start_sec):
+                return False
+        logger.info("全イベントの開始位置がキーフレームに揃っているため、ストリームコピーで切り出します。")
+        return True
 
-    def _build_ffmpeg_command(self, input_path: str, ev: EventRecord, clip_path: str, video_start_dt: datetime.datetime) -> List[str]:
-        if FAST_STREAM_COPY_MODE:
-            cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin', '-y', '-ss', str(ev.start_sec), '-i', input_path, '-t', str(ev.duration), '-c', 'copy', '-avoid_negative_ts', '1', clip_path]
+    def _build_clip(self, input_path: str, ev: EventRecord, temp_dir: str, video_start_dt: datetime.datetime) -> str:
+        clips, _ = self.build_clips([(input_path, ev, video_start_dt)], temp_dir)
+        return clips[0] if clips else ""
+
+    def _build_ffmpeg_command(self, input_path: str, ev: EventRecord, clip_path: str, video_start_dt: datetime.datetime,
+                              thumb_path: Optional[str] = None, copy: Optional[bool] = None, threads: Optional[int] = None) -> List[str]:
+        """
+        クリップ切り出しの ffmpeg コマンド。thumb_path を渡すと同じ ffmpeg の2つ目の出力として
+        クリップ先頭フレームの JPEG を書き出す (サムネイルのために入力を開き直さない)。
+        """
+        copy = FAST_STREAM_COPY_MODE is True if copy is None else copy
+        if copy:
+            cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin', '-y', '-ss', str(ev.start_sec), '-i', input_path, '-t', str(ev.duration)]
+            if thumb_path:
+                cmd += ['-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy', '-avoid_negative_ts', '1', clip_path,
+                        '-map', '0:v:0', '-frames:v', '1', '-q:v', '2', thumb_path]
+            else:
+                cmd += ['-c', 'copy', '-avoid_negative_ts', '1', clip_path]
         else:
             start_dt = video_start_dt + datetime.timedelta(seconds=ev.start_sec)
             vf = self._build_drawtext(ev, start_dt)
@@ -456,32 +756,71 @@ class VideoBuilder:
             # --- 軽量化のためのチューニング設定を追加 ---
             # 解像度を幅854に縮小、フレームレートを15fpsに落として劇的にサイズ削減
             vf += ",scale=854:-2,fps=15"
-            cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin', '-y', '-ss', str(ev.start_sec), '-to', str(ev.end_sec), '-i', input_path, '-vf', vf, '-an', '-c:v', 'libx264', '-preset', 'superfast', '-crf', '32', clip_path]
+            encode = ['-an', '-c:v', 'libx264', '-preset', 'superfast', '-crf', '32']
+            if threads:
+                encode += ['-threads', str(threads)]
+            cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin', '-y', '-ss', str(ev.start_sec), '-to', str(ev.end_sec), '-i', input_path]
+            if thumb_path:
+                cmd += ['-filter_complex', f"[0:v]{vf},split=2[clip][thumb]", '-map', '[clip]'] + encode + [clip_path,
+                        '-map', '[thumb]', '-frames:v', '1', '-q:v', '2', thumb_path]
+            else:
+                cmd += ['-vf', vf] + encode + [clip_path]
         
         if shutil.which('ionice'): cmd = ['ionice', '-c', '2', '-n', '7'] + cmd
         return cmd
 
     def _build_drawtext(self, ev: EventRecord, start_dt: datetime.datetime) -> str:
+        return ",".join(self._overlay_filters(ev, start_dt)) + f",setpts={1.0 / SPEEDUP_FACTOR}*PTS"
+
+    def _overlay_filters(self, ev: EventRecord, start_dt: datetime.datetime,
+                         offset: float = 0.0, duration: Optional[float] = None) -> List[str]:
+        """
+        撮影時刻と EventID の drawtext。offset / duration を渡すと、結合後の動画の
+        [offset, offset + duration) 秒の区間にだけ表示する (ストリームコピーしたクリップの結合用)。
+        """
         escaped_font_file = FONT_FILE.replace(':', '\\\\:')
         font_opt = f":fontfile='{escaped_font_file}'" if os.path.exists(FONT_FILE) else ""
+        window = f":enable='between(t,{_fmt_sec(offset)},{_fmt_sec(offset + duration)})'" if duration is not None else ""
         if HAS_DRAWTEXT_LOCALTIME:
-            ts = int(start_dt.timestamp())
-            expr = r'%{pts\:localtime\:' + str(ts) + r'\:%Y-%m-%d %H\\\:%M\\\:%S}'
-            vf = f"drawtext=text='{expr}'{font_opt}:x=10:y=10:fontsize=24:fontcolor=white:box=1:boxcolor=black@0.5"
+            # pts は結合後の動画の先頭からの秒数なので、区間の開始分だけ基準時刻を戻す
+            ts = _fmt_sec(int(start_dt.timestamp()) - offset)
+            expr = r'%{pts\:localtime\:' + ts + r'\:%Y-%m-%d %H\\\:%M\\\:%S}'
+            vf = f"drawtext=text='{expr}'{font_opt}{window}:x=10:y=10:fontsize=24:fontcolor=white:box=1:boxcolor=black@0.5"
         else:
             time_str = escape_drawtext(start_dt.strftime('%Y-%m-%d %H:%M:%S'))
-            vf = f"drawtext=text='{time_str}'{font_opt}:x=10:y=10:fontsize=24:fontcolor=white:box=1:boxcolor=black@0.5"
-        return f"{vf},drawtext=text='{escape_drawtext(ev.event_id)}'{font_opt}:enable='between(t,0,1)':x=10:y=50:fontsize=24:fontcolor=yellow:box=1:boxcolor=black@0.5,setpts={1.0 / SPEEDUP_FACTOR}*PTS"
-
-    def _build_concat(self, clip_files: List[str], output_path: str, temp_dir: str) -> bool:
+            vf = f"drawtext=text='{time_str}'{font_opt}{window}:x=10:y=10:fontsize=24:fontcolor=white:box=1:boxcolor=black@0.5"
+        event_window = f"between(t,{_fmt_sec(offset)},{_fmt_sec(offset + 1)})"
+        return [vf, f"drawtext=text='{escape_drawtext(ev.event_id)}'{font_opt}:enable='{event_window}':x=10:y=50:fontsize=24:fontcolor=yellow:box=1:boxcolor=black@0.5"]
+
+    def _copied_clip_overlays(self, clip_files: List[str]) -> List[str]:
+        """ストリームコピーしたクリップを結合する際に、各クリップの区間へ重ねる drawtext"""
+        filters: List[str] = []
+        offset = 0.0
+        for clip in clip_files:
+            overlay = self._clip_overlays.get(clip)
+            # コピーしたクリップは直前のキーフレームから始まるため、長さは実際のファイルから求める
+            try:
+                duration = float(get_video_info(clip, retries=1).get('format', {}).get('duration', 0))
+            except (TypeError, ValueError):
+                duration = 0.0
+            if duration <= 0 and overlay is not None:
+                duration = float(overlay[0].duration)
+            if overlay is not None:
+                filters += self._overlay_filters(overlay[0], overlay[1], offset, duration)
+            offset += duration
+        return filters
+
+    def _build_concat(self, clip_files: List[str], output_path: str, temp_dir: str, copy: Optional[bool] = None) -> bool:
         concat_txt = os.path.join(temp_dir, "concat.txt")
         with open(concat_txt, "w", encoding="utf-8") as f:
             for clip in clip_files: f.write(f"file '{escape_ffmpeg_filename(Path(clip).as_posix())}'\n")
         cmd = ['nice', '-n', '15', 'ffmpeg', '-v', 'error', '-nostdin', '-y', '-f', 'concat', '-safe', '0', '-i', concat_txt]
         
-        if FAST_STREAM_COPY_MODE:
-            # FAST_STREAM_COPY の結合時にも軽量化オプションを適用
-            cmd += ['-vf', f"setpts={1.0 / SPEEDUP_FACTOR}*PTS,scale=854:-2,fps=15", '-an', '-c:v', 'libx264', '-preset', 'superfast', '-crf', '32']
+        if (FAST_STREAM_COPY_MODE is True if copy is None else copy):
+            # FAST_STREAM_COPY の結合時にも軽量化オプションを適用し、切り出し時に省いた
+            # 撮影時刻・EventID の表示をこの再エンコードでまとめて重ねる (再エンコード方式と同じ見た目にする)
+            vf = ",".join(self._copied_clip_overlays(clip_files) + [f"setpts={1.0 / SPEEDUP_FACTOR}*PTS", "scale=854:-2", "fps=15"])
+            cmd += ['-vf', vf, '-an', '-c:v', 'libx264', '-preset', 'superfast', '-crf', '32']
         else:
             cmd += ['-c', 'copy']
             
@@ -4,7 +4,10 @@ import sys
 import os
 import time
 import json
-from typing import Dict, Any, Optional, List, Set
+from datetime import datetime
+from typing import Dict, Any, Mapping, Optional, List, Set
+
+import pytz
 
 # プロジェクトルートへのパス解決
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,6 +15,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
 from services import switchbot_service as sb_tool
 from services import sensor_service
+from core import device_registry, device_state
+from core.http_client import AsyncHttpClient
 from core.logger import setup_logging
 
 logger = setup_logging("device_monitor")
@@ -22,39 +27,90 @@ TARGET_DEVICE_TYPES: List[str] = [
     "Nature Remo E Lite"
 ]
 
-# 状態変化検知用のキャッシュ。
-# M-4-5: このスクリプトは scheduler_boot.py により5分ごとに subprocess.run(...) で
-# 毎回新しいプロセスとして起動される(run_scriptは実行完了を待機してから次のタスクへ
-# 進む使い捨てプロセスモデル)。プロセス内メモリのみのキャッシュだと実行のたびに
-# 空の辞書から始まってしまい、log_device_state_change() は常に「初回取得」として
-# 扱うため、ON/OFF等のデジタル状態変化が INFO ログとして一度も記録されない
-# (構造的に機能しない)不具合があった。ディスク上のJSONファイルへ永続化することで
-# プロセス再起動をまたいでも前回状態を復元できるようにする。
-_last_device_states: Dict[str, Dict[str, Any]] = {}
-_STATE_FILE: str = os.path.join(config.BASE_DIR, "switchbot_device_states.json")
+# 状態変化検知用の前回ステータスは core/device_state.py (device_state テーブル) に保持する。
+# M-4-5: 以前は scheduler_boot.py が毎回新しいプロセスとして起動していたため、
+# プロセス内メモリのみのキャッシュでは前回状態が失われ、ON/OFF等のデジタル状態変化が
+# INFO ログとして一度も記録されない不具合があった。その対策として使っていた
+# JSONファイル (switchbot_device_states.json) は、初回実行時にストアへ取り込む。
+_LEGACY_STATE_FILE: str = os.path.join(config.BASE_DIR, "switchbot_device_states.json")
 
 
-def _load_persisted_states() -> Dict[str, Dict[str, Any]]:
+def _import_legacy_state_file() -> None:
+    """旧JSONファイルの前回ステータスをストアへ取り込み、取り込み済みとしてリネームする"""
+    if not os.path.exists(_LEGACY_STATE_FILE):
+        return
     try:
-        if os.path.exists(_STATE_FILE):
-            with open(_STATE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+        with open(_LEGACY_STATE_FILE, "r", encoding="utf-8") as f:
+            legacy: Dict[str, Dict[str, Any]] = json.load(f)
+        for did, status in legacy.items():
+            current = device_state.get(did)
+            if current is None or current.status is None:
+                device_state.update(did, status=status)
+        device_state.flush()
+        os.replace(_LEGACY_STATE_FILE, _LEGACY_STATE_FILE + ".migrated")
+        logger.info(f"Imported {len(legacy)} device states from {_LEGACY_STATE_FILE}")
     except Exception as e:
-        logger.warning(f"⚠️ Failed to load persisted device states: {e}")
-    return {}
+        logger.warning(f"⚠️ Failed to import legacy device states: {e}")
+
+# デバイスごとの最終ポーリング時刻 (UNIXエポック秒)。常駐スケジューラでは実行をまたいで保持され、
+# 新しいプロセスでは device_state の last_seen から補う。
+_last_polled: Dict[str, float] = {}
+
+
+def poll_interval(device: Dict[str, Any], snapshot: Optional[device_state.DeviceSnapshot]) -> float:
+    """電力を消費中のプラグは短い間隔、それ以外 (待機中・温湿度計) は長い間隔でポーリングする"""
+    settings: Dict[str, Any] = device.get("notify_settings") or {}
+    active_watts: float = min(config.SWITCHBOT_POLL_ACTIVE_WATTS,
+                              settings.get("power_threshold_watts") or config.SWITCHBOT_POLL_ACTIVE_WATTS)
+    if snapshot is not None and snapshot.wattage is not None and snapshot.wattage >= active_watts:
+        return float(config.SWITCHBOT_POLL_ACTIVE_INTERVAL_SEC)
+    return float(config.SWITCHBOT_POLL_IDLE_INTERVAL_SEC)
+
+
+def plan_intervals(devices: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    各デバイスのポーリング間隔を決める。1日あたりの想定呼び出し回数が
+    sb_tool.POLL_DAILY_BUDGET を超える場合は、全デバイスの間隔を同じ比率で延ばす。
+    """
+    intervals: Dict[str, float] = {d["id"]: poll_interval(d, device_state.get(d["id"])) for d in devices}
+    planned: float = estimate_daily_calls(intervals)
+    if planned > sb_tool.POLL_DAILY_BUDGET > 0:
+        scale: float = planned / sb_tool.POLL_DAILY_BUDGET
+        logger.warning(f"⚠️ Planned {planned:.0f} SwitchBot calls/day exceeds budget {sb_tool.POLL_DAILY_BUDGET}, "
+                       f"stretching intervals x{scale:.2f}")
+        intervals = {did: interval * scale for did, interval in intervals.items()}
+    return intervals
+
 
+def estimate_daily_calls(intervals: Dict[str, float]) -> float:
+    return sum(86400.0 / interval for interval in intervals.values() if interval > 0)
 
-def _save_persisted_states(states: Dict[str, Dict[str, Any]]) -> None:
+
+def _last_polled_at(device_id: str) -> Optional[float]:
+    if device_id in _last_polled:
+        return _last_polled[device_id]
+    snapshot = device_state.get(device_id)
+    if snapshot is None or not snapshot.last_seen:
+        return None
     try:
-        with open(_STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(states, f)
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to persist device states: {e}")
+        seen = datetime.fromisoformat(snapshot.last_seen)
+    except ValueError:
+        return None
+    if seen.tzinfo is None:
+        seen = pytz.timezone("Asia/Tokyo").localize(seen)
+    return seen.timestamp()
+
 
-def fetch_device_status_sync(device_id: str, device_type: str) -> Optional[Dict[str, Any]]:
-    """SwitchBot APIからステータスを取得する（同期処理ラッパー）。"""
+def is_due(device_id: str, interval: float, now: float) -> bool:
+    """前回ポーリングから interval 秒経過していれば True (スケジューラの揺らぎ分の余裕を持たせる)"""
+    last = _last_polled_at(device_id)
+    slack: float = config.SWITCHBOT_POLL_ACTIVE_INTERVAL_SEC / 2
+    return last is None or now - last + slack >= interval
+
+
+def parse_device_status(status: Optional[Dict[str, Any]], device_id: str, device_type: str) -> Optional[Dict[str, Any]]:
+    """SwitchBot APIのステータス応答から電力・温湿度・ON/OFF状態を取り出す"""
     try:
-        status: Optional[Dict[str, Any]] = sb_tool.get_device_status(device_id)
         if not status:
             logger.warning(f"⚠️ Status unavailable for {device_id} (Type: {device_type})")
             return None
@@ -104,6 +160,11 @@ def fetch_device_status_sync(device_id: str, device_type: str) -> Optional[Dict[
         logger.error(f"❌ Fetch Error [{device_id}]: {e}")
         return None
 
+async def fetch_device_status(client: AsyncHttpClient, device_id: str, device_type: str) -> Optional[Dict[str, Any]]:
+    """SwitchBot APIからステータスを取得する (共有クライアント・レート制限付き)"""
+    status: Optional[Dict[str, Any]] = await sb_tool.get_device_status_async(client, device_id)
+    return parse_device_status(status, device_id, device_type)
+
 def log_device_state_change(
     dname: str, 
     did: str, 
@@ -147,67 +208,84 @@ def log_device_state_change(
         # アナログな変化（温度 24.8 -> 24.9 等）のみの場合は DEBUG
         logger.debug(f"🔄 Device state changed [Analog]: {dname} (ID: {did}) -> {current_status}")
 
+async def poll_device(client: AsyncHttpClient, device: Dict[str, Any]) -> bool:
+    """1デバイスのステータスを取得して保存・通知判定まで行う。データを保存した場合は True"""
+    did: str = device["id"]
+    dname: str = device.get("name", "Unknown")
+    dtype: str = device.get("type") or device.get("device_type") or "Unknown"
+
+    status: Optional[Dict[str, Any]] = await fetch_device_status(client, did, dtype)
+    if not status:
+        return False
+    _last_polled[did] = time.time()
+
+    snapshot: Optional[device_state.DeviceSnapshot] = device_state.get(did)
+    last_status: Optional[Dict[str, Any]] = snapshot.status if snapshot else None
+
+    # ログ設計のポリシーに従い、変化の質を評価して出力
+    log_device_state_change(dname, did, last_status, status)
+
+    # 状態ストアの更新 (変化があった場合のみ永続化対象になる)
+    device_state.update(did, device_name=dname, status=status)
+
+    has_data: bool = False
+
+    if "power" in status:
+        await sensor_service.process_power_data(
+            did, dname, status["power"], device.get("notify_settings", {})
+        )
+        has_data = True
+
+    if "temperature" in status:
+        await sensor_service.process_meter_data(
+            did, dname, status["temperature"], status.get("humidity", 0.0)
+        )
+        has_data = True
+
+    return has_data
+
 async def main() -> None:
     # 定常起動はDEBUGに降格
     logger.debug("🚀 --- SwitchBot Monitor Started (Fixed Architecture v2) ---")
 
-    # M-4-5: 前回実行(別プロセス)時点の状態をディスクから復元する。
-    _last_device_states.clear()
-    _last_device_states.update(_load_persisted_states())
+    _import_legacy_state_file()
 
-    devices: List[Dict[str, Any]] = getattr(config, "MONITOR_DEVICES", [])
-    processed_count: int = 0
+    # 常駐スケジューラでは PUT /settings 等による devices.json の更新をここで取り込む
+    device_registry.reload_if_modified()
+    devices = device_registry.devices()
 
     if not devices:
-        logger.warning("⚠️ No devices found in config.MONITOR_DEVICES.")
+        logger.warning("⚠️ No devices found in devices.json (monitor_devices).")
         return
 
-    for i, device in enumerate(devices):
-        did: str = device.get("id", "")
-        dname: str = device.get("name", "Unknown")
-        dtype: str = device.get("type") or device.get("device_type") or "Unknown"
-
-        if not did:
-            continue
-
-        is_target: bool = any(t in dtype for t in TARGET_DEVICE_TYPES)
-        if not is_target:
-            continue
+    targets: List[Mapping[str, Any]] = [
+        d for d in devices
+        if d.get("id") and any(t in (d.get("type") or d.get("device_type") or "Unknown") for t in TARGET_DEVICE_TYPES)
+    ]
+    intervals: Dict[str, float] = plan_intervals(targets)
+    now: float = time.time()
+    due: List[Dict[str, Any]] = [d for d in targets if is_due(d["id"], intervals[d["id"]], now)]
+    if targets and not due:
+        logger.debug("💤 No devices due for polling")
+        return
 
-        status: Optional[Dict[str, Any]] = await asyncio.to_thread(fetch_device_status_sync, did, dtype)
-        
-        if status:
-            last_status: Optional[Dict[str, Any]] = _last_device_states.get(did)
-            
-            # ログ設計のポリシーに従い、変化の質を評価して出力
-            log_device_state_change(dname, did, last_status, status)
-            
-            # キャッシュの更新
-            if last_status != status:
-                _last_device_states[did] = status
+    semaphore = asyncio.Semaphore(config.DEVICE_POLL_CONCURRENCY)
+    async with AsyncHttpClient(max_connections=config.DEVICE_POLL_CONCURRENCY) as client:
+        async def _guarded(device: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await poll_device(client, device)
 
-            has_data: bool = False
-            
-            if "power" in status:
-                await sensor_service.process_power_data(
-                    did, dname, status["power"], device.get("notify_settings", {})
-                )
-                has_data = True
-            
-            if "temperature" in status:
-                await sensor_service.process_meter_data(
-                    did, dname, status["temperature"], status.get("humidity", 0.0)
-                )
-                has_data = True
-            
-            if has_data:
-                processed_count += 1
+        results = await asyncio.gather(*(_guarded(d) for d in due), return_exceptions=True)
 
-        await asyncio.sleep(2)
+    processed_count: int = 0
+    for device, result in zip(due, results):
+        if isinstance(result, BaseException):
+            logger.error(f"❌ Poll failed [{device.get('name')}]: {result!r}")
+        elif result:
+            processed_count += 1
 
-    # M-4-5: 次回実行(次の新規プロセス)でも状態変化を検知できるよう、
-    # プロセス終了前に最新状態をディスクへ永続化する。
-    _save_persisted_states(_last_device_states)
+    # 次回実行 (スケジューラやプロセスの再起動後を含む) でも状態変化を検知できるよう永続化する
+    await asyncio.to_thread(device_state.flush)
 
     if processed_count == 0:
         logger.warning("⚠️ --- Monitor Completed but 0 devices were processed. Check 'type' in devices.json ---")
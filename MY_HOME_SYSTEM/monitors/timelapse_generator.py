@@ -10,9 +10,11 @@ import math
 from typing import List
 
 import config
+from core import device_registry
 from core.database import get_db_cursor
 from core.logger import setup_logging
 from services.notification_service import send_push
+from services import recording_catalog
 
 logger = setup_logging("timelapse_generator")
 
@@ -105,47 +107,14 @@ def process_video_clips(camera_name: str, nas_folder: str, event_times: List[dat
         if last_end_time and dt < last_end_time:
             continue
 
-        # --- 修正: 日またぎファイル検索ロジック ---
-        dt_prev = dt - datetime.timedelta(hours=1)
-        date_str_current = dt.strftime("%Y%m%d")
-        date_str_prev = dt_prev.strftime("%Y%m%d")
-        
-        search_patterns = [
-            os.path.join(config.NVR_RECORD_DIR, nas_folder, f"{date_str_current}_*.mp4")
-        ]
-        if date_str_current != date_str_prev:
-            search_patterns.append(os.path.join(config.NVR_RECORD_DIR, nas_folder, f"{date_str_prev}_*.mp4"))
-
-        found_files = []
-        for pattern in search_patterns:
-            found_files.extend(glob.glob(pattern))
-        found_files.sort()
-        
-        if not found_files:
-            logger.warning(f"⚠️ 動画ファイルが見つかりません (検索パターン: {search_patterns})")
-            continue
-            
-        # --- 🎬 修正: 常に最新ファイルを選ぶバグを修正し、イベント時刻に合ったファイルを探す ---
+        # イベント時刻以前に開始した最後の録画を録画カタログから引く (日またぎも開始時刻で比較される)
         dt_naive = dt.replace(tzinfo=None)
-        src_video = None
-        f_start_dt = None
-        
-        # 録画ファイルを順番にチェックし、イベント時刻(dt)以前の最後のファイルを見つける
-        for f in found_files:
-            f_name = os.path.basename(f).split('.')[0]
-            try:
-                f_time = datetime.datetime.strptime(f_name, "%Y%m%d_%H%M%S")
-                if f_time <= dt_naive:
-                    src_video = f
-                    f_start_dt = f_time
-                else:
-                    break # ソート済みなので、時刻を超えたら探索終了
-            except ValueError:
-                continue
-        
-        if not src_video or not f_start_dt:
+        recording = recording_catalog.clip_at(nas_folder, dt_naive)
+        if recording is None:
             logger.warning(f"⚠️ イベント時刻 {dt.strftime('%H:%M:%S')} に対応する録画ファイルがありません。スキップします。")
             continue
+        src_video = recording.path
+        f_start_dt = recording.start
 
         logger.info(f"🎥 動画ファイルを発見: {src_video} (対象イベント: {dt.strftime('%H:%M:%S')})")
         
@@ -289,13 +258,11 @@ def main():
     
     os.makedirs(config.TMP_VIDEO_DIR, exist_ok=True)
 
-    TARGET_CAM_MAP = {
-        "防犯カメラ": "garden", 
-        "駐車場カメラ": "parking",
-        "玄関カメラ": "entrance"
-    }
+    # DB上のカメラ名 -> NASの録画フォルダ名 (devices.json の nas_folder。未設定ならカメラ名)
+    device_registry.reload_if_modified()
+    target_cam_map = {cam["name"]: cam.get("nas_folder") or cam["name"] for cam in device_registry.cameras()}
 
-    for db_name, nas_folder in TARGET_CAM_MAP.items():
+    for db_name, nas_folder in target_cam_map.items():
         logger.info(f"Generating timelapse for {db_name}...")
         # ログを追加して、探している時間帯を確認
         logger.debug(f"Search window: {start_time_str} to {end_time_str}")
@@ -1,11 +1,13 @@
+import asyncio
 import os
-import time
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import config
+from core import device_registry
 from services import camera_service
+from services.live_session_manager import LiveSessionLimitError
 
 router = APIRouter()
 
@@ -14,6 +16,13 @@ class CameraSettingsUpdate(BaseModel):
     enabled: bool
 
 
+def _viewer_id(request: Optional[Request]) -> str:
+    """視聴者の識別子 (クライアントのIPアドレスとUser-Agent)"""
+    if request is None or request.client is None:
+        return "anonymous"
+    return f"{request.client.host}|{request.headers.get('user-agent', '')}"
+
+
 def _resolve_segment_path(base_dir: str, camera_id: str, filename: str) -> str:
     """
     base_dir/camera_id/filename を解決し、パストラバーサル（`..`等）で
@@ -34,8 +43,8 @@ def _resolve_segment_path(base_dir: str, camera_id: str, filename: str) -> str:
 def get_camera_settings():
     """フロントエンドへ有効なカメラの一覧と設定を返す"""
     settings = []
-    # devices.json からロードされた config.CAMERAS を使用
-    for idx, cam in enumerate(config.CAMERAS):
+    # devices.json からロードされた device_registry のカメラ一覧を使用
+    for idx, cam in enumerate(device_registry.cameras()):
         settings.append({
             "id": cam["id"],
             "name": cam["name"],
@@ -53,29 +62,31 @@ def update_camera_settings(camera_id: str, payload: CameraSettingsUpdate):
     return {"id": camera_id, "enabled": payload.enabled}
 
 @router.get("/live/{camera_id}/stream.m3u8")
-def get_live_stream(camera_id: str):
+async def get_live_stream(camera_id: str, request: Request):
     """ライブHLSプレイリスト（.m3u8）の取得"""
-    cam_conf = next((c for c in config.CAMERAS if c["id"] == camera_id), None)
+    cam_conf = device_registry.get_camera(camera_id)
     if not cam_conf:
         raise HTTPException(status_code=404, detail="Camera not found")
 
-    playlist_path = camera_service.start_hls_stream(cam_conf)
-    
-    if not playlist_path:
+    # ffmpeg の起動 (RTSP URL の取得を含む) はブロッキングのためスレッドで行う
+    try:
+        session = await asyncio.to_thread(camera_service.open_live_session, cam_conf, _viewer_id(request))
+    except LiveSessionLimitError:
+        raise HTTPException(status_code=503, detail="Too many live streams")
+
+    if not session:
         raise HTTPException(status_code=500, detail="Failed to initialize stream")
 
-    # ffmpegの初期セグメント生成を最大5秒待機
-    for _ in range(10):
-        if os.path.exists(playlist_path):
-            return FileResponse(playlist_path, media_type="application/vnd.apple.mpegurl")
-        time.sleep(0.5)
+    # ffmpegの初期セグメント生成をイベントで待つ (ワーカースレッドは占有しない)
+    if not await camera_service.live_sessions.wait_ready(session, config.LIVE_READY_TIMEOUT_SEC):
+        raise HTTPException(status_code=503, detail="Stream generation timeout")
 
-    raise HTTPException(status_code=503, detail="Stream generation timeout")
+    return FileResponse(session.playlist_path, media_type="application/vnd.apple.mpegurl")
 
 @router.get("/record/{camera_id}/{target_date}/info")
 def get_record_info(camera_id: str, target_date: str):
     """指定日の録画ファイルのメタデータ（最初のファイルのオフセット秒数）を返す"""
-    cam_conf = next((c for c in config.CAMERAS if c["id"] == camera_id), None)
+    cam_conf = device_registry.get_camera(camera_id)
     if not cam_conf:
         raise HTTPException(status_code=404, detail="Camera not found")
 
@@ -83,23 +94,25 @@ def get_record_info(camera_id: str, target_date: str):
     return {"offset_seconds": offset}
 
 @router.get("/record/{camera_id}/{target_date}/{filename}")
-def get_record_file(camera_id: str, target_date: str, filename: str):
+async def get_record_file(camera_id: str, target_date: str, filename: str):
     """録画VODのプレイリスト（.m3u8）またはセグメント（.ts）を配信"""
     # .m3u8 プレイリストの要求の場合
     if filename.endswith(".m3u8"):
-        cam_conf = next((c for c in config.CAMERAS if c["id"] == camera_id), None)
+        cam_conf = device_registry.get_camera(camera_id)
         if not cam_conf:
             raise HTTPException(status_code=404, detail="Camera not found")
 
-        playlist_path = camera_service.generate_record_playlist(cam_conf, target_date)
+        # 未分割の録画の追記はバックグラウンドで進み、最初の1ファイル分ができた時点で応答する
+        playlist_path = await camera_service.get_record_playlist(cam_conf, target_date)
         if not playlist_path:
             raise HTTPException(status_code=404, detail="Recordings not found for the specified date")
 
-        return FileResponse(playlist_path, media_type="application/vnd.apple.mpegurl")
+        # 当日分は追記され続けるため、プレイヤーの再読み込みがキャッシュに当たらないようにする
+        return FileResponse(playlist_path, media_type="application/vnd.apple.mpegurl", headers={"Cache-Control": "no-cache"})
 
     # .ts セグメントの要求の場合
     elif filename.endswith(".ts"):
-        cam_conf = next((c for c in config.CAMERAS if c["id"] == camera_id), None)
+        cam_conf = device_registry.get_camera(camera_id)
         if not cam_conf:
             raise HTTPException(status_code=404, detail="Camera not found")
 
@@ -114,9 +127,9 @@ def get_record_file(camera_id: str, target_date: str, filename: str):
         raise HTTPException(status_code=400, detail="Unsupported file extension")
 
 @router.get("/live/{camera_id}/{segment_file}")
-def get_live_segment(camera_id: str, segment_file: str):
+def get_live_segment(camera_id: str, segment_file: str, request: Request = None):
     """ライブのHLSセグメント（.tsファイル）を配信"""
-    cam_conf = next((c for c in config.CAMERAS if c["id"] == camera_id), None)
+    cam_conf = device_registry.get_camera(camera_id)
     if not cam_conf:
         raise HTTPException(status_code=404, detail="Camera not found")
 
@@ -124,4 +137,31 @@ def get_live_segment(camera_id: str, segment_file: str):
     if not os.path.exists(segment_path):
         raise HTTPException(status_code=404, detail="Segment not found")
 
-    return FileResponse(segment_path, media_type="video/MP2T")
\ No newline at end of file
+    # セグメントの取得も視聴として記録する (途絶えると ffmpeg が停止される)
+    camera_service.live_sessions.touch(camera_id, _viewer_id(request))
+    return FileResponse(segment_path, media_type="video/MP2T")
+
+
+@router.get("/{camera_id}/snapshot.jpg")
+async def get_snapshot(camera_id: str, max_age: Optional[float] = None, fallback: bool = True):
+    """
+    カメラの最新画像 (JPEG) を返す。メモリ上の画像 → ライブ配信中の latest.jpg の順に探し、
+    max_age 秒 (既定 SNAPSHOT_MAX_AGE_SEC) 以内のものが無ければ録画から切り出す (fallback=false なら 404)。
+    """
+    cam_conf = device_registry.get_camera(camera_id)
+    if not cam_conf:
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    # 録画からの切り出し (ffmpeg) はブロッキングのためスレッドで行う
+    snap = await asyncio.to_thread(camera_service.snapshots.get, cam_conf, max_age, fallback)
+    if snap is None:
+        raise HTTPException(status_code=404, detail="Snapshot not available")
+    return Response(
+        content=snap.data,
+        media_type="image/jpeg",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Snapshot-Source": snap.source,
+            "X-Snapshot-Age": f"{snap.age():.1f}",
+        },
+    )
@@ -1,6 +1,6 @@
 # MY_HOME_SYSTEM/routers/quest_router.py
-from fastapi import APIRouter, HTTPException, File, UploadFile
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, File, UploadFile, Request, Response
+from typing import Dict, Any, Optional
 import os
 import uuid
 import sys
@@ -34,14 +34,30 @@ logger = setup_logging("quest_router")
 def sync_master_data():
     return game_system.sync_master_data()
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
 @router.get("/data")
-def get_all_data() -> Dict[str, Any]:
+def get_all_data(request: Request) -> Response:
+    """
+    表示データ一式。キャッシュ済みのJSONをそのまま返し、ETagが一致する場合は304を返す。
+    Cache-Control: no-cache により、ブラウザは毎回 If-None-Match 付きで再検証する
+    (fetch側の変更なしで、未変更時は本文の転送とJSONパースが省かれる)。
+    """
     try:
-        return game_system.get_all_view_data()
+        snapshot = game_system.get_view_snapshot()
     except Exception as e:
         logger.error(f"Data Fetch Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch data")
 
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
 @router.post("/complete", response_model=CompleteResponse)
 def complete_quest(action: QuestAction):
     return quest_service.process_complete_quest(action.user_id, action.quest_id)
@@ -1,7 +1,7 @@
-# MY_HOME_SYSTEM/routers/system_router.py
 from fastapi import APIRouter, HTTPException
 from typing import Dict, Any
 
+from core import database
 from services import backup_service
 
 router = APIRouter()
@@ -12,4 +12,9 @@ async def manual_backup() -> Dict[str, Any]:
     success, msg, size = backup_service.perform_backup()
     if not success: 
         raise HTTPException(status_code=500, detail=msg)
-    return {"status": "success", "message": msg, "size_mb": size}
\ No newline at end of file
+    return {"status": "success", "message": msg, "size_mb": size}
+
+@router.get("/db/pool")
+async def db_pool_stats() -> Dict[str, Any]:
+    """SQLite接続プールの統計 (ヒット数・待ち時間・ロック時リトライ回数)"""
+    return database.get_pool_stats()
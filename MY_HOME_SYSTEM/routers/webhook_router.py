@@ -1,13 +1,13 @@
 # MY_HOME_SYSTEM/routers/webhook_router.py
-import asyncio
 import hmac
 import time
 from fastapi import APIRouter, Request, Header, HTTPException
 from linebot.v3.exceptions import InvalidSignatureError
 
 import config
+from core import device_registry
 from core.logger import setup_logging
-from core.database import save_log_async
+from core.ingest_queue import enqueue_log_async
 from core.utils import get_now_iso
 from services import sensor_service, switchbot_service as sb_tool
 from handlers import line_handler
@@ -24,12 +24,15 @@ async def callback_line(request: Request, x_line_signature: str = Header(None))
     
     body = (await request.body()).decode('utf-8')
     try:
-        # 同期ハンドラをスレッドで実行
-        await asyncio.to_thread(line_handler.line_handler.handle, body, x_line_signature)
+        # 署名検証とパースはここで行い (軽量)、イベントの処理はユーザーごとのキューへ積んで即座に応答する
+        events = line_handler.line_handler.parser.parse(body, x_line_signature)
     except InvalidSignatureError:
         raise HTTPException(status_code=400)
     except Exception as e:
         logger.error(f"LINE callback error: {e}")
+        return "OK"
+    for event in events:
+        line_handler.dispatch_event(event)
     return "OK"
 
 # 対象とするセンサーのデバイスタイプ（温湿度計やプラグ等は除外）
@@ -77,15 +80,13 @@ async def switchbot_webhook(body: SwitchBotWebhookBody, token: str = None):
 
     # --- これ以降は重複していない有効なイベントのみが通過する ---
     
-    # デバイス情報の解決 (既存ロジック)
-    api_name = sb_tool.get_device_name_by_id(mac)
-    device_conf = next((d for d in config.MONITOR_DEVICES if d.get("id") == mac), None)
-    
-    name = api_name or (device_conf.get("name") if device_conf else f"Unknown_{mac}")
+    # デバイス情報の解決 (deviceMac は区切りの有無を問わず devices.json の id と照合する)
+    device_conf = device_registry.get_device(mac)
+    name = device_registry.device_name(mac) or f"Unknown_{mac}"
     location = device_conf.get("location", "未登録") if device_conf else "場所不明"
 
     # 1. ログ保存 (互換性維持)
-    await save_log_async("device_records", 
+    await enqueue_log_async("device_records", 
         ["timestamp", "device_name", "device_id", "device_type", "contact_state", "brightness_state"],
         (get_now_iso(), name, mac, "Webhook", state, ctx.brightness or "")
     )
@@ -93,7 +94,7 @@ async def switchbot_webhook(body: SwitchBotWebhookBody, token: str = None):
     # 2. 新テーブル(daily_logs)への保存
     if state in ["detected", "open", "timeoutnotclose"]:
         detail_msg = f"{name}: {state}"
-        await save_log_async(config.SQLITE_TABLE_DAILY_LOGS,
+        await enqueue_log_async(config.SQLITE_TABLE_DAILY_LOGS,
             ["category", "detail", "timestamp"],
             ("Sensor", detail_msg, get_now_iso())
         )
@@ -1,11 +1,9 @@
 # MY_HOME_SYSTEM/scheduler.py
-import time
+import argparse
 import subprocess
 import sys
 import os
-from concurrent.futures import ThreadPoolExecutor, Future
-from datetime import datetime
-from typing import List, Dict, Any, TypedDict
+from typing import List, Dict, Optional
 
 # プロジェクトルートへのパス解決
 PROJECT_ROOT: str = os.path.dirname(os.path.abspath(__file__))
@@ -13,42 +11,58 @@ sys.path.append(PROJECT_ROOT)
 
 import config
 from core.logger import setup_logging
+from core.task_scheduler import MODE_INPROCESS, MODE_SUBPROCESS, ScheduledTask, TaskScheduler
 
 # ロガー設定
 logger = setup_logging("scheduler")
 
-class Task(TypedDict):
-    """実行タスクのデータ構造定義。"""
-    script: str
-    interval: int
-    last_run: float
-    args: List[str]
+# 1回あたりの実行時間の上限(秒)。タイムラプスなど長時間タスクを許容するため既定は60分
+DEFAULT_TIMEOUT_SEC: int = 3600
 
-# === 設定: 定期実行するスクリプトと間隔(秒) ===
+# === 設定: 定期実行するタスクと間隔(秒) ===
 # 基本設計書およびこれまでのリファクタリング内容に基づき構成
-TASKS: List[Task] = [
-    # 頻度: 高 (5分〜10分)
-    {"script": "monitors/switchbot_power_monitor.py", "interval": 300,  "last_run": 0, "args": []},
-    {"script": "monitors/nature_remo_monitor.py",     "interval": 300,  "last_run": 0, "args": []},
-    {"script": "monitors/server_watchdog.py",         "interval": 600,  "last_run": 0, "args": []},
+# entry: 常駐モードで呼び出す関数。isolate=True のタスクは専用の常駐ワーカープロセスで実行し、
+#        ハング時に強制終了できるようにする (外部コマンド・マウント操作を伴うもの)。
+# script: subprocess モード(フォールバック)で実行するスクリプト
+TASKS: List[ScheduledTask] = [
+    # 頻度: 高 (1分〜10分)
+    # SwitchBot は毎分起動し、デバイスごとの間隔 (消費中は短く、待機中は長く) に達したものだけ問い合わせる。
+    # subprocess モードでは毎分インタプリタを起動しないよう、従来の5分間隔のままにする
+    ScheduledTask("switchbot_power_monitor", "monitors/switchbot_power_monitor.py",
+                  config.SWITCHBOT_POLL_ACTIVE_INTERVAL_SEC,
+                  entry="monitors.switchbot_power_monitor:main", timeout=120, subprocess_interval=300),
+    ScheduledTask("nature_remo_monitor", "monitors/nature_remo_monitor.py", 300,
+                  entry="monitors.nature_remo_monitor:main", timeout=240),
+    # センサーログの集計(1分/1時間/1日)と保持期間を過ぎた生データの削除
+    ScheduledTask("rollup_service", "services/rollup_service.py", 300,
+                  entry="services.rollup_service:run_maintenance", timeout=600),
+    # NVR録画カタログの差分走査 (動体検知・録画再生の問い合わせ時にも鮮度に応じて走査される)
+    ScheduledTask("recording_catalog", "services/recording_catalog.py", 300,
+                  entry="services.recording_catalog:main", isolate=True, timeout=600),
+    ScheduledTask("server_watchdog", "monitors/server_watchdog.py", 600,
+                  entry="monitors.server_watchdog:main", isolate=True, timeout=300),
 
     # 頻度: 中 (30分)
-    {"script": "monitors/tv_lock_monitor.py",         "interval": 300,  "last_run": 0, "args": []},
-    # {"script": "monitors/timelapse_runner.py", "interval": 300, "last_run": 0, "args": []},
+    ScheduledTask("tv_lock_monitor", "monitors/tv_lock_monitor.py", 300,
+                  entry="monitors.tv_lock_monitor:main", timeout=120),
+    # ScheduledTask("timelapse_runner", "monitors/timelapse_runner.py", 300),
     # 頻度: 中 (10分 = 600秒)
-    {"script": "monitors/memory_monitor.py",          "interval": 600,  "last_run": 0, "args": []},
+    ScheduledTask("memory_monitor", "monitors/memory_monitor.py", 600,
+                  entry="monitors.memory_monitor:main", timeout=120),
 
     # 頻度: 低 (1時間〜)
-    {"script": "monitors/nas_monitor.py",             "interval": 3600, "last_run": 0, "args": []},
+    ScheduledTask("nas_monitor", "monitors/nas_monitor.py", 3600,
+                  entry="monitors.nas_monitor:main", isolate=True, timeout=1800),
 ]
 
-def run_script(script_path: str, args: List[str]) -> bool:
+def run_script(script_path: str, args: List[str], timeout: float = DEFAULT_TIMEOUT_SEC) -> bool:
     """
-    指定されたスクリプトをサブプロセスとして実行する。
+    指定されたスクリプトをサブプロセスとして実行する (subprocess モード)。
     
     Args:
         script_path (str): 実行するスクリプトの相対パス
         args (List[str]): スクリプトに渡す引数
+        timeout (float): 実行時間の上限(秒)
         
     Returns:
         bool: 実行成功(returncode 0)ならTrue
@@ -72,7 +86,7 @@ def run_script(script_path: str, args: List[str]) -> bool:
             env=env,
             capture_output=True,
             text=True,
-            timeout=3600  # タイムラプスなど長時間タスクを許容するため60分に延長
+            timeout=timeout
         )
 
         if result.returncode == 0:
@@ -85,49 +99,46 @@ def run_script(script_path: str, args: List[str]) -> bool:
             return False
 
     except subprocess.TimeoutExpired:
-        logger.error(f"⏰ Timeout: {script_path} exceeded 3600 seconds.")
+        logger.error(f"⏰ Timeout: {script_path} exceeded {timeout:.0f} seconds.")
         return False
     except Exception as e:
         logger.exception(f"🔥 Unexpected error running {script_path}: {e}")
         return False
 
-def main() -> None:
+def main(mode: Optional[str] = None) -> None:
     """
     メインループ。
 
-    各タスクは ThreadPoolExecutor 上で並列実行する。
+    既定 (inprocess) では各監視モジュールを1度だけimportし、常駐プロセス内の
+    スレッドプールで呼び出す。実行のたびにPythonを起動しないため、
+    pandas / requests 等のimportに要するCPU時間とメモリの山を毎回払わずに済む。
+    SCHEDULER_MODE=subprocess (または --mode subprocess) で従来の
+    「実行ごとに新しいプロセスを起動する」方式に戻せる。
+
+    いずれのモードでも各タスクは並列に実行する。
     直列実行だと1タスク（例: 長時間かかるNAS監視）がブロックしている間、
     server_watchdog 等の重要な監視タスクまで丸ごと遅延してしまうため。
     同一タスクが実行中の間は、そのタスクだけ次回実行をスキップして
     多重起動（前回実行が長引いた際の連続再実行）を防ぐ。
     """
-    logger.info("⏰ --- MY_HOME_SYSTEM Scheduler Started (Parallel Mode) ---")
-
-    in_flight: Dict[str, Future] = {}
-
-    with ThreadPoolExecutor(max_workers=max(len(TASKS), 1), thread_name_prefix="scheduler") as executor:
-        while True:
-            now: float = time.time()
-
-            for task in TASKS:
-                script = task["script"]
+    mode = mode or config.SCHEDULER_MODE
+    if mode not in (MODE_INPROCESS, MODE_SUBPROCESS):
+        logger.warning(f"⚠️ Unknown SCHEDULER_MODE '{mode}'. Falling back to '{MODE_SUBPROCESS}'.")
+        mode = MODE_SUBPROCESS
+    logger.info(f"⏰ --- MY_HOME_SYSTEM Scheduler Started (Parallel Mode, {mode}) ---")
 
-                # 前回実行がまだ完了していなければ、今回はスキップして詰まりを防ぐ
-                running_future = in_flight.get(script)
-                if running_future is not None and not running_future.done():
-                    continue
-
-                # 実行タイミングの判定
-                if now - task["last_run"] >= task["interval"]:
-                    task["last_run"] = now
-                    in_flight[script] = executor.submit(run_script, script, task["args"])
-
-            # CPU負荷軽減のための短いスリープ
-            time.sleep(10)
+    scheduler = TaskScheduler(TASKS, run_script, mode=mode, jitter_sec=config.SCHEDULER_JITTER_SEC)
+    try:
+        scheduler.run_forever()
+    finally:
+        scheduler.shutdown()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MY_HOME_SYSTEM 定期タスクスケジューラ")
+    parser.add_argument("--mode", choices=[MODE_INPROCESS, MODE_SUBPROCESS], help="実行モード (既定: SCHEDULER_MODE)")
+    cli_args = parser.parse_args()
     try:
-        main()
+        main(cli_args.mode)
     except KeyboardInterrupt:
         logger.info("👋 Scheduler stopped by user.")
     except Exception as e:
@@ -1,11 +1,14 @@
 # MY_HOME_SYSTEM/services/ai_service.py
 import asyncio
+import contextvars
 import re
 import threading
 import time
 import json
 import traceback
-from typing import Optional, Dict, Any, List
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 
 import google.generativeai as genai
@@ -22,8 +25,9 @@ from tenacity import (
 
 import config
 import common
+from core.database import get_ro_connection
 from core.logger import setup_logging
-from core.utils import get_now_iso
+from core.utils import get_now_iso, get_today_date_str
 
 # Service連携
 from services import line_service
@@ -88,10 +92,194 @@ class SimpleRateLimiter:
             self.count += 1
             return True
 
-# グローバルインスタンス
+    def seconds_until_slot(self) -> float:
+        """次のリクエストが許可されるまでの秒数 (今すぐ許可されるなら0)"""
+        with self._lock:
+            if self.count < self.limit:
+                return 0.0
+            return max(0.0, 60 - (time.time() - self.last_reset_time)) + 0.01
+
+    async def acquire(self, max_wait: float = 0.0) -> bool:
+        """
+        リクエストの枠を確保する。枠が無い場合は最大 max_wait 秒まで、イベントループを止めずに空きを待つ。
+        カウンタは threading.Lock で守っているため、スレッドごとに別のイベントループから呼ばれても共有できる。
+
+        Returns:
+            bool: 枠を確保できたらTrue, max_wait 秒以内に空かない場合はFalse
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            if await self.allow_request():
+                return True
+            wait = self.seconds_until_slot()
+            if wait <= 0 or wait > deadline - time.monotonic():
+                return False
+            await asyncio.sleep(wait)
+
+# グローバルインスタンス (全スレッド・全イベントループで共有する)
 rate_limiter = SimpleRateLimiter()
 
 
+# ==========================================
+# 0.5 Caches (モデル・会話セッション・検索結果・回答)
+# ==========================================
+
+class VersionedCache:
+    """
+    参照テーブルのデータ版と一緒に値を覚える LRU キャッシュ。
+    呼び出し側が現在のデータ版と比べ、一致した場合だけ値を使う。ttl_sec を過ぎた値は返さない。
+    """
+    def __init__(self, size: int, ttl_sec: float, clock=time.monotonic) -> None:
+        self.size = size
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, Tuple[Tuple[str, ...], Any, Any, float]]" = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Tuple[Tuple[str, ...], Any, Any]]:
+        """(参照テーブル, データ版, 値) を返す。無い・古い場合は None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() - entry[3] >= self.ttl_sec:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[:3]
+
+    def put(self, key: Any, tables: Tuple[str, ...], versions: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (tables, versions, value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ChatSessionStore:
+    """
+    ユーザーごとの Gemini 会話セッション。最大 max_users 人分を保持し、最終利用から ttl_sec 秒で捨てる。
+    同じユーザーのメッセージが同時に届いた場合、2通目以降は使い捨てのセッションで応答する。
+    """
+    def __init__(self, max_users: Optional[int] = None, ttl_sec: Optional[float] = None,
+                 max_history: Optional[int] = None, clock=time.monotonic) -> None:
+        self.max_users = config.AI_CHAT_SESSION_MAX_USERS if max_users is None else max_users
+        self.ttl_sec = config.AI_CHAT_SESSION_TTL_SEC if ttl_sec is None else ttl_sec
+        self.max_history = config.AI_CHAT_HISTORY_MAX_CONTENTS if max_history is None else max_history
+        self.clock = clock
+        self._lock = threading.Lock()
+        # user_id -> {"session", "model", "busy", "last_used"}
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def acquire(self, user_id: str, model: Any) -> Any:
+        with self._lock:
+            now = self.clock()
+            for uid in [u for u, e in self._sessions.items() if not e["busy"] and now - e["last_used"] >= self.ttl_sec]:
+                del self._sessions[uid]
+            entry = self._sessions.get(user_id)
+            if entry is not None and entry["busy"]:
+                return model.start_chat(enable_automatic_function_calling=False)
+            if entry is None or entry["model"] is not model:
+                entry = {"session": model.start_chat(enable_automatic_function_calling=False), "model": model}
+                self._sessions[user_id] = entry
+                _count("sessions_created")
+            entry["busy"] = True
+            self._sessions.move_to_end(user_id)
+            idle = [u for u, e in self._sessions.items() if not e["busy"]]
+            while len(self._sessions) > self.max_users and idle:
+                del self._sessions[idle.pop(0)]
+            return entry["session"]
+
+    def in_conversation(self, user_id: str) -> bool:
+        """ユーザーの会話が続いているか (期限内のセッションに履歴があるか、応答中か)"""
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return False
+            if entry["busy"]:
+                return True
+            return self.clock() - entry["last_used"] < self.ttl_sec and bool(entry["session"].history)
+
+    def record(self, user_id: str, model: Any, turn: List[Any]) -> None:
+        """Gemini を呼ばずに返した応答 (キャッシュした回答) を、やり取りとしてユーザーの会話履歴へ加える"""
+        session = self.acquire(user_id, model)
+        try:
+            session.history = [*session.history, *turn]
+        finally:
+            self.release(user_id, session, ok=True)
+
+    def release(self, user_id: str, session: Any, ok: bool) -> None:
+        """応答を終えたセッションを返す。途中で失敗した場合 (ok=False) は履歴が不完全なため捨てる"""
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None or entry["session"] is not session:
+                return
+            if not ok:
+                del self._sessions[user_id]
+                return
+            entry["busy"] = False
+            entry["last_used"] = self.clock()
+        _trim_history(session, self.max_history)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+
+def _trim_history(session: Any, max_contents: int) -> None:
+    """会話履歴を直近 max_contents 件に抑える。関数呼び出しとその結果の途中から始まらないよう、ユーザーの発話から始める"""
+    history = list(session.history)
+    if len(history) <= max_contents:
+        return
+    history = history[-max_contents:]
+    while history and not (
+        history[0].role == "user" and not any(getattr(p, "function_response", None) for p in history[0].parts)
+    ):
+        history.pop(0)
+    session.history = history
+
+
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+_sessions = ChatSessionStore()
+_search_cache = VersionedCache(config.AI_SEARCH_CACHE_SIZE, config.AI_CACHE_TTL_SEC)
+_answer_cache = VersionedCache(config.AI_ANSWER_CACHE_SIZE, config.AI_CACHE_TTL_SEC)
+# tool_search_db が直前に使った (参照テーブル, データ版)。検索に基づく回答をキャッシュする際に使う
+_last_search: "contextvars.ContextVar[Optional[Tuple[Tuple[str, ...], Any]]]" = contextvars.ContextVar(
+    "ai_last_search", default=None
+)
+_stats = {
+    "model_builds": 0, "sessions_created": 0,
+    "search_hits": 0, "search_misses": 0, "answer_hits": 0, "answer_misses": 0,
+}
+# 応答はスレッド (asyncio.to_thread・別スレッドのイベントループ) からも来るため、_stats はこのロックの下で数える
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats() -> Dict[str, int]:
+    """モデル生成・セッション生成・キャッシュのヒット数 (計測用)"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def clear_caches() -> None:
+    """モデル・会話セッション・検索結果・回答のキャッシュを捨てる (設定変更時・テスト用)"""
+    with _models_lock:
+        _models.clear()
+    _sessions.clear()
+    _search_cache.clear()
+    _answer_cache.clear()
+
+
 # ==========================================
 # 1. Tool Functions (実装)
 # ==========================================
@@ -207,16 +395,70 @@ async def tool_search_db(args: Dict[str, Any]) -> str:
         logger.warning(f"⚠️ search_db blocked disallowed table(s): {disallowed} (sql={sql!r})")
         return "エラー: 許可されていないテーブルへのアクセスです。"
 
+    # 同じSQL (空白・大文字小文字の違いは無視) で参照テーブルに追加・削除が無ければ、前回の結果を使う
+    tables = tuple(sorted(set(referenced_tables)))
+    key = (config.SQLITE_DB_PATH, _normalize_sql(sql))
+    versions = await asyncio.to_thread(_table_versions, tables)
+    if versions is not None:
+        cached = _search_cache.get(key)
+        if cached is not None and cached[1] == versions:
+            _count("search_hits")
+            _last_search.set((tables, versions))
+            return cached[2]
+    _count("search_misses")
+
     try:
         # 読み取り専用で実行
         rows = await asyncio.to_thread(common.execute_read_query, sql)
         if not rows:
-            return "該当するデータは見つかりませんでした。"
-        # 結果を文字列化して返す（長すぎる場合はカット）
-        return str(rows)[:2000]
+            result = "該当するデータは見つかりませんでした。"
+        else:
+            # 結果を文字列化して返す（長すぎる場合はカット）
+            result = str(rows)[:2000]
     except Exception as e:
         return f"DB検索エラー: {e}"
 
+    # execute_read_query は失敗時も例外ではなく「検索エラー: ...」を返すため、それは覚えない
+    if versions is not None and not result.startswith("検索エラー"):
+        _search_cache.put(key, tables, versions, result)
+        _last_search.set((tables, versions))
+    return result
+
+
+_SQL_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+def _normalize_sql(sql: str) -> str:
+    """キャッシュのキー用に、文字列リテラル以外の空白をまとめて大文字にする"""
+    parts = []
+    pos = 0
+    for m in _SQL_STRING_LITERAL.finditer(sql):
+        parts.append(re.sub(r"\s+", " ", sql[pos:m.start()]).upper())
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(re.sub(r"\s+", " ", sql[pos:]).upper())
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _table_versions(tables: Tuple[str, ...]) -> Optional[Tuple[Any, ...]]:
+    """
+    テーブルのデータ版 (最大rowidと行数の組)。行の追加・削除で変わる。
+    tables は許可リストで確認済みの名前であること。読めない場合は None (キャッシュを使わない)。
+    """
+    if not tables:
+        return None
+    columns = ", ".join(f"(SELECT MAX(rowid) FROM {t}), (SELECT COUNT(*) FROM {t})" for t in tables)
+    try:
+        conn = get_ro_connection()
+        try:
+            row = conn.execute(f"SELECT {columns}").fetchone()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.debug(f"データ版の取得に失敗しました ({tables}): {e}")
+        return None
+    return tuple(row)
+
 
 # ==========================================
 # 2. Tool Definitions (Schema)
@@ -322,11 +564,75 @@ async def _call_gemini_api_with_retry(chat_session, prompt: str):
 # 4. Main Logic
 # ==========================================
 
+SYSTEM_INSTRUCTION = """
+あなたは「セバスチャン」という名前の、有能で忠実な執事です。
+ユーザー（メッセージに添えたユーザー名の方。「〇〇様」とお呼びします）の生活をサポートするために、
+会話を通じて記録を行ったり、情報を検索したりします。
+
+【振る舞いの指針】
+- 丁寧で落ち着いた口調（です・ます調）で話してください。
+- ユーザーが記録を求めた場合は、適切なツールを呼び出してください。
+- ユーザーが質問をした場合は、search_dbツールを使って過去のデータを検索してください。
+- ツールを呼び出した後は、その結果に基づいて「承知いたしました。〜を記録しました。」のように完了報告をしてください。
+- 雑談の場合は、気の利いた返答を短めに返してください。
+"""
+
+
+def _get_model() -> Any:
+    """設定済みの GenerativeModel (ツール定義・システム指示込み) をモデル名ごとに1つだけ作って使い回す"""
+    with _models_lock:
+        model = _models.get(MODEL_NAME)
+        if model is None:
+            model = genai.GenerativeModel(MODEL_NAME, tools=tools_schema, system_instruction=SYSTEM_INSTRUCTION)
+            _models[MODEL_NAME] = model
+            _count("model_builds")
+        return model
+
+
+def _answer_key(user_name: str, text: str) -> Tuple[str, str, str, str]:
+    """回答キャッシュのキー。全角半角・空白の違いは無視し、日付が変わったら別の質問として扱う (「今日」等のため)"""
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return (config.SQLITE_DB_PATH, get_today_date_str(), user_name, normalized)
+
+
+def _build_prompt(user_name: str, text: str) -> str:
+    return f"""
+        【現在情報】
+        - 現在時刻: {get_now_iso()}
+        - ユーザー名: {user_name}
+
+        ユーザーメッセージ: {text}"""
+
+
+def _cached_turn(prompt: str, answer: str) -> List[Any]:
+    """キャッシュから返した回答を、会話履歴に加える (ユーザーの発話, モデルの応答) の組にする"""
+    return [
+        content.Content(role="user", parts=[content.Part(text=prompt)]),
+        content.Content(role="model", parts=[content.Part(text=answer)]),
+    ]
+
+
+def _cached_answer(key: Tuple[str, str, str, str]) -> Optional[str]:
+    """同じ質問への検索に基づく回答で、参照テーブルのデータ版が変わっていないものを返す"""
+    cached = _answer_cache.get(key)
+    if cached is None:
+        return None
+    tables, versions, answer = cached
+    if _table_versions(tables) != versions:
+        return None
+    return answer
+
+
 async def analyze_text_and_execute(user_id: str, user_name: str, text: str) -> Optional[str]:
     """
     ユーザーの入力を解析し、適切なツールを実行するか、会話応答を返す。
     レートリミットおよびリトライロジックを含む。
 
+    モデルは使い回し、会話はユーザーごとのセッションで続ける。会話の最初 (履歴の無いセッション) に
+    search_db の結果だけで答えた質問は、参照テーブルにデータの追加・削除が無い間 (AI_CACHE_TTL_SEC 秒まで)、
+    次に会話の最初に同じ質問が来たとき同じ回答を Gemini を呼ばずに返す。回答は答えた文脈 (会話履歴) に依存しうるため、
+    会話の途中では使わず、覚えもしない。キャッシュから返したやり取りも会話履歴へ加え、続く質問の文脈に含める。
+
     Args:
         user_id (str): LINEユーザーID
         user_name (str): ユーザー名
@@ -338,33 +644,30 @@ async def analyze_text_and_execute(user_id: str, user_name: str, text: str) -> O
     if not MODEL_NAME or not config.GEMINI_API_KEY:
         return None
 
-    # 1. 簡易レートリミットチェック
-    if not await rate_limiter.allow_request():
+    answer_key = _answer_key(user_name, text)
+    if _answer_cache.get(answer_key) is not None and not _sessions.in_conversation(user_id):
+        answer = await asyncio.to_thread(_cached_answer, answer_key)
+        if answer is not None:
+            _count("answer_hits")
+            _sessions.record(user_id, _get_model(), _cached_turn(_build_prompt(user_name, text), answer))
+            return answer
+    _count("answer_misses")
+
+    # 1. 簡易レートリミットチェック (枠が空くまで少し待つ)
+    if not await rate_limiter.acquire(config.AI_RATE_LIMIT_WAIT_SEC):
         logger.warning(f"⚠️ Rate limit exceeded for AI service (User: {user_name})")
         return FALLBACK_MESSAGE
 
+    chat_manual = None
+    completed = False
     try:
-        model = genai.GenerativeModel(MODEL_NAME, tools=tools_schema)
-        
-        system_prompt = f"""
-        あなたは「セバスチャン」という名前の、有能で忠実な執事です。
-        ユーザー（{user_name}様）の生活をサポートするために、会話を通じて記録を行ったり、情報を検索したりします。
-        
-        【現在情報】
-        - 現在時刻: {get_now_iso()}
-        - ユーザー名: {user_name}
-        
-        【振る舞いの指針】
-        - 丁寧で落ち着いた口調（です・ます調）で話してください。
-        - ユーザーが記録を求めた場合は、適切なツールを呼び出してください。
-        - ユーザーが質問をした場合は、search_dbツールを使って過去のデータを検索してください。
-        - ツールを呼び出した後は、その結果に基づいて「承知いたしました。〜を記録しました。」のように完了報告をしてください。
-        - 雑談の場合は、気の利いた返答を短めに返してください。
-        """
+        model = _get_model()
 
-        # Geminiセッション開始 (Auto Function Calling無効化)
-        chat_manual = model.start_chat(enable_automatic_function_calling=False)
-        full_prompt = f"{system_prompt}\n\nユーザーメッセージ: {text}"
+        # Geminiセッション (Auto Function Calling無効化)。ユーザーごとに会話を続ける
+        chat_manual = _sessions.acquire(user_id, model)
+        # 履歴の無い (会話の最初の) 応答だけを回答キャッシュに入れる
+        first_turn = not chat_manual.history
+        full_prompt = _build_prompt(user_name, text)
 
         # 2. API呼び出し (Retry Logic適用)
         try:
@@ -391,6 +694,7 @@ async def analyze_text_and_execute(user_id: str, user_name: str, text: str) -> O
             logger.info(f"🤖 AI Triggered Tool: {fname} args={fargs}")
             
             tool_result = ""
+            search_token = _last_search.set(None)
             if fname == "record_child_health":
                 tool_result = await tool_record_child_health(user_id, user_name, fargs)
             elif fname == "record_food":
@@ -399,6 +703,8 @@ async def analyze_text_and_execute(user_id: str, user_name: str, text: str) -> O
                 tool_result = await tool_search_db(fargs)
             else:
                 tool_result = "エラー: 未知のツールが呼び出されました。"
+            searched = _last_search.get()
+            _last_search.reset(search_token)
 
             # 結果をAIに返して最終回答を生成
             function_response = content.Part(
@@ -411,16 +717,26 @@ async def analyze_text_and_execute(user_id: str, user_name: str, text: str) -> O
             # ツールの結果送信もリトライ対象にする (今回は簡易的に同じリトライ関数を利用)
             try:
                 final_res = await _call_gemini_api_with_retry(chat_manual, [function_response])
-                return final_res.text
             except ResourceExhausted:
                 # ツール実行は成功しているが、最終回答生成でコケた場合
                 logger.warning("⚠️ Gemini Quota Exhausted during tool output generation.")
                 return f"{tool_result}\n(AIの応答生成が制限を超過したため、実行結果のみ表示します)"
+            answer = final_res.text
+            completed = True
+            # 検索結果だけで答えた質問は、データが変わるまで同じ回答を返せる
+            if fname == "search_db" and first_turn and searched is not None and isinstance(answer, str):
+                _answer_cache.put(answer_key, searched[0], searched[1], answer)
+            return answer
 
         # --- Normal Chat ---
-        return response.text
+        answer = response.text
+        completed = True
+        return answer
 
     except Exception as e:
         logger.error(f"AI Analysis Unexpected Error: {e}")
         logger.debug(traceback.format_exc())
-        return "申し訳ございません。処理中にエラーが発生しました。"
\ No newline at end of file
+        return "申し訳ございません。処理中にエラーが発生しました。"
+    finally:
+        if chat_manual is not None:
+            _sessions.release(user_id, chat_manual, completed)
@@ -6,12 +6,17 @@ import requests
 import os
 from datetime import datetime, timedelta, date
 import pytz
-from typing import Dict, List, Optional, Any
+from contextlib import closing
+from typing import Dict, List, Optional, Any, Tuple
 
+import numpy as np
 import pandas as pd
 
 import config
+from core import device_registry
+from core.database import get_ro_connection
 from core.logger import setup_logging
+from services import rollup_service
 
 # ロガー設定
 logger = setup_logging("analysis_service")
@@ -33,10 +38,11 @@ def get_ro_db_connection() -> sqlite3.Connection:
     """
     読み取り専用でデータベース接続を取得します。
     Service層内部またはView層でキャッシュする際に使用します。
+
+    接続は core.database の読み取り専用プールから払い出され、close() で
+    プールへ返却されます(呼び出しのたびに接続を確立し直すことはありません)。
     """
-    return sqlite3.connect(
-        f"file:{config.SQLITE_DB_PATH}?mode=ro", uri=True, timeout=10.0
-    )
+    return get_ro_connection()
 
 def _parse_timestamp_to_jst(value) -> pd.Timestamp:
     """
@@ -55,6 +61,43 @@ def _parse_timestamp_to_jst(value) -> pd.Timestamp:
     return ts.tz_convert("Asia/Tokyo")
 
 
+# 文字列の11文字目以降 (日付 YYYY-MM-DD の後ろ) にオフセット表記があれば aware とみなす
+_OFFSET_PATTERN = r"[Zz+-]"
+
+
+def to_jst(values: pd.Series) -> pd.Series:
+    """
+    タイムスタンプの列をまとめてJSTへ変換する (_parse_timestamp_to_jst の列版、結果は同一)。
+
+    ISO8601 文字列の列は、オフセット付き (aware) の行を pd.to_datetime(..., utc=True, format="ISO8601")
+    で一括変換し、オフセットの無い (naive) 行は壁時計の時刻のまま JST として localize する。
+    datetime 型の列はそのまま tz_localize / tz_convert する。
+    それ以外 (数値・datetime オブジェクトの混在・ISO8601 以外の書式) は行ごとの変換に戻す。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is None:
+            return values.dt.tz_localize("Asia/Tokyo")
+        return values.dt.tz_convert("Asia/Tokyo")
+
+    if values.notna().any() and pd.api.types.infer_dtype(values, skipna=True) == "string":
+        # pandas は aware の直後の naive 行に直前のオフセットを引き継いで解釈することがあるため、
+        # aware と naive を分けてから変換する
+        aware = values.str[10:].str.contains(_OFFSET_PATTERN, regex=True, na=False)
+        try:
+            result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, Asia/Tokyo]")
+            if aware.any():
+                parsed = pd.to_datetime(values[aware], utc=True, format="ISO8601")
+                result[aware] = parsed.dt.as_unit("ns").dt.tz_convert("Asia/Tokyo")
+            if not aware.all():
+                parsed = pd.to_datetime(values[~aware], format="ISO8601")
+                result[~aware] = parsed.dt.as_unit("ns").dt.tz_localize("Asia/Tokyo")
+            return result
+        except (ValueError, TypeError):
+            pass
+
+    return values.apply(_parse_timestamp_to_jst)
+
+
 def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """DataFrameのタイムスタンプを日本時間に変換し、表示名を適用する共通処理"""
     if df.empty or "timestamp" not in df.columns:
@@ -62,10 +105,46 @@ def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.copy()
 
-    df["timestamp"] = df["timestamp"].apply(_parse_timestamp_to_jst)
+    df["timestamp"] = to_jst(df["timestamp"])
 
     return df
 
+
+# (device_registry のスナップショット, 表示名の対応表, 設置場所の対応表)
+_device_lookups_cache: Optional[Tuple[Any, Dict[str, Any], Dict[str, Any]]] = None
+
+
+def _device_lookups() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """デバイスID -> 表示名 / 設置場所の対応表 (device_registry のスナップショットが変わるまで使い回す)"""
+    global _device_lookups_cache
+    snapshot = device_registry.snapshot()
+    cached = _device_lookups_cache
+    if cached is None or cached[0] is not snapshot:
+        devices_by_id = snapshot.device_by_id
+        cached = (
+            snapshot,
+            {k: d.get("name", k) for k, d in devices_by_id.items()},
+            {k: d.get("location", "その他") for k, d in devices_by_id.items()},
+        )
+        _device_lookups_cache = cached
+    return cached[1], cached[2]
+
+
+def _map_by_codes(keys: pd.Series, mapping: Dict[Any, Any]) -> pd.Series:
+    """
+    keys.map(mapping) と同じ結果を、重複を除いた値 (factorize のコード) にだけ map して作る。
+    センサーログはデバイス数に対して行数が桁違いに多いため、辞書引きはデバイス数回で済む。
+    """
+    codes, uniques = pd.factorize(keys)
+    # コード -1 (欠損) は reindex で NaN になる。factorize は None を NaN にまとめるため、欠損行は元の値で引き直す
+    result = pd.Series(uniques).map(mapping).reindex(codes)
+    result.index = keys.index
+    missing = codes == -1
+    if missing.any():
+        result[missing] = keys[missing].map(mapping)
+    return result
+
+
 def apply_friendly_names(df: pd.DataFrame) -> pd.DataFrame:
     """デバイスIDから表示名への変換と、特定の名称置換を行う"""
     if df.empty:
@@ -84,13 +163,13 @@ def apply_friendly_names(df: pd.DataFrame) -> pd.DataFrame:
         return df
 
     # 2. Configからデフォルトのマッピングを作成
-    id_map = {d["id"]: d.get("name", d["id"]) for d in config.MONITOR_DEVICES}
-    loc_map = {d["id"]: d.get("location", "その他") for d in config.MONITOR_DEVICES}
+    config_names, loc_map = _device_lookups()
+    id_map = dict(config_names)
 
     # 3. DB内の「最新のデバイス名」を取得してマッピングを上書き
     if "device_name" in df.columns and "timestamp" in df.columns:
         try:
-            latest_df = df.sort_values("timestamp", ascending=False)
+            latest_df = df[["timestamp", "device_id", "device_name"]].sort_values("timestamp", ascending=False)
             latest_df = latest_df.drop_duplicates(subset="device_id", keep="first")
             valid_latest = latest_df[latest_df["device_name"].notna() & (latest_df["device_name"] != "")]
             db_latest_map = valid_latest.set_index("device_id")["device_name"].to_dict()
@@ -99,7 +178,7 @@ def apply_friendly_names(df: pd.DataFrame) -> pd.DataFrame:
             logger.warning(f"Friendly name mapping update failed: {e}")
 
     # 4. マッピングの適用
-    df["friendly_name"] = df["device_id"].map(id_map)
+    df["friendly_name"] = _map_by_codes(df["device_id"], id_map)
     
     # マッピングで見つからなかった場合は device_name -> device_id の順でフォールバック
     if "device_name" in df.columns:
@@ -107,13 +186,49 @@ def apply_friendly_names(df: pd.DataFrame) -> pd.DataFrame:
     df["friendly_name"] = df["friendly_name"].fillna(df["device_id"])
 
     # 5. ロケーションの適用
-    df["location"] = df["device_id"].map(loc_map).fillna("その他")
+    df["location"] = _map_by_codes(df["device_id"], loc_map).fillna("その他")
 
     # 6. 名称の微調整
     df["friendly_name"] = df["friendly_name"].replace(FRIENDLY_NAME_FIXES)
 
     return df
 
+
+# ダッシュボードの各タブが load_sensor_data の結果から使う列
+SENSOR_VIEW_COLUMNS: Dict[str, List[str]] = {
+    "summary": ["timestamp", "device_name", "device_type", "location", "movement_state", "contact_state", "power_watts"],
+    "electricity": ["timestamp", "device_type", "friendly_name", "power_watts"],
+    "temperature": ["timestamp", "device_type", "friendly_name", "temperature_celsius", "humidity_percent"],
+    "takasago": ["timestamp", "location", "friendly_name", "contact_state"],
+    "logs": ["timestamp", "location", "friendly_name", "contact_state", "power_watts"],
+}
+
+
+def downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    数値列を値の変わらない範囲で小さい型にする (整数は int8〜int32、浮動小数は float32 で
+    全値が元と一致する場合のみ)。温湿度のような小数は float32 で値が変わるため float64 のまま残る。
+    """
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            narrowed = series.astype(np.float32)
+            if narrowed.astype(series.dtype).equals(series):
+                df[col] = narrowed
+    return df
+
+
+def sensor_view(df: pd.DataFrame, view: str) -> pd.DataFrame:
+    """load_sensor_data の結果から、タブが使う列だけを取り出して数値列を縮める"""
+    if df.empty:
+        return df
+    columns = [c for c in SENSOR_VIEW_COLUMNS[view] if c in df.columns]
+    return downcast_numeric(df[columns].copy())
+
 def load_data_from_db(query: str, date_column: str = "timestamp") -> pd.DataFrame:
     """汎用データロード関数"""
     conn = None
@@ -146,7 +261,7 @@ def load_nas_status() -> Optional[pd.Series]:
     """NASの最新状態を取得"""
     table_name = getattr(config, "SQLITE_TABLE_NAS", "nas_records")
     try:
-        with get_ro_db_connection() as conn:
+        with closing(get_ro_db_connection()) as conn:
             cur = conn.cursor()
             cur.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
             if not cur.fetchone():
@@ -164,57 +279,58 @@ def load_generic_data(table_name: str, limit: int = 500) -> pd.DataFrame:
     query = f"SELECT * FROM {table_name} ORDER BY timestamp DESC LIMIT {limit}"
     return load_data_from_db(query)
 
-def load_sensor_data(limit: int = 5000) -> pd.DataFrame:
-    """
-    新旧テーブルからセンサーデータを統合して取得する
-    Target Tables: device_records, switchbot_meter_logs, power_usage
-    """
-    # 1. Legacy / Others (開閉センサー等)
-    query_legacy = f"""
-        SELECT timestamp, device_id, device_name, device_type, 
-               temperature_celsius, humidity_percent, power_watts, 
-               contact_state, movement_state, brightness_state
-        FROM device_records 
-        ORDER BY timestamp DESC LIMIT {limit}
+# load_sensor_data が統合する取得元: (テーブル, SELECT する列, 取得後に入れる device_type)
+SensorSource = Tuple[str, str, Optional[str]]
+
+
+def sensor_sources() -> List[SensorSource]:
+    return [
+        # 1. Legacy / Others (開閉センサー等)
+        ("device_records",
+         "timestamp, device_id, device_name, device_type, temperature_celsius, humidity_percent, power_watts, "
+         "contact_state, movement_state, brightness_state",
+         None),
+        # 2. SwitchBot Meter Logs (New: 温湿度)
+        (config.SQLITE_TABLE_SWITCHBOT_LOGS,
+         "timestamp, device_id, device_name, temperature as temperature_celsius, humidity as humidity_percent",
+         "Meter"),
+        # 3. Power Usage (New: 電力)
+        # 以前は device_name に "Remo" を含むかで Plug と分けた後、Plug も Nature Remo E Lite へ
+        # 置換していた (結果は全行 Nature Remo E Lite)。行ごとの apply を省いて同じ値を入れる
+        (config.SQLITE_TABLE_POWER_USAGE,
+         "timestamp, device_id, device_name, wattage as power_watts",
+         "Nature Remo E Lite"),
+    ]
+
+
+def load_sensor_source(source: SensorSource, limit: int, after_id: Optional[int] = None) -> pd.DataFrame:
     """
-    df_legacy = load_data_from_db(query_legacy)
-
-    # 2. SwitchBot Meter Logs (New: 温湿度)
-    query_meter = f"""
-        SELECT timestamp, device_id, device_name, 
-               temperature as temperature_celsius, 
-               humidity as humidity_percent
-        FROM {config.SQLITE_TABLE_SWITCHBOT_LOGS}
-        ORDER BY timestamp DESC LIMIT {limit}
+    取得元1つから最新 limit 件を読み込む。id 列 (差分取得の目印) を含めて返す。
+    after_id を指定した場合は、それより後に追加された行 (id > after_id) だけを読む。
     """
-    df_meter = load_data_from_db(query_meter)
-    if not df_meter.empty:
-        df_meter["device_type"] = "Meter"
-
-    # 3. Power Usage (New: 電力)
-    query_power = f"""
-        SELECT timestamp, device_id, device_name, 
-               wattage as power_watts
-        FROM {config.SQLITE_TABLE_POWER_USAGE}
-        ORDER BY timestamp DESC LIMIT {limit}
+    table, columns, device_type = source
+    where = f"WHERE id > {int(after_id)}" if after_id is not None else ""
+    query = f"""
+        SELECT id, {columns}
+        FROM {table} {where}
+        ORDER BY timestamp DESC LIMIT {int(limit)}
     """
-    df_power = load_data_from_db(query_power)
-    if not df_power.empty:
-        df_power["device_type"] = df_power["device_name"].apply(
-            lambda x: "Nature Remo E Lite" if x and "Remo" in str(x) else "Plug"
-        )
-        df_power["device_type"] = df_power["device_type"].replace("Plug", "Nature Remo E Lite") 
+    df = load_data_from_db(query)
+    if not df.empty and device_type is not None:
+        df["device_type"] = device_type
+    return df
 
-    # --- 統合 ---
-    df_list = []
-    if not df_legacy.empty: df_list.append(df_legacy)
-    if not df_meter.empty: df_list.append(df_meter)
-    if not df_power.empty: df_list.append(df_power)
 
+def merge_sensor_frames(frames: List[pd.DataFrame], limit: int) -> pd.DataFrame:
+    """取得元ごとの DataFrame を統合し、新しい順に並べて表示名を付け、最新 limit 件にする"""
+    df_list = [df.drop(columns="id", errors="ignore") for df in frames if not df.empty]
     if not df_list:
         return pd.DataFrame()
 
-    df_merged = pd.concat(df_list, ignore_index=True)
+    # 取得元ごとに列が異なり (device_type は一部の取得元のみ)、値が全て欠損の列もある。
+    # 全欠損の列を結合前に外し、後から全取得元の列へ揃える (全欠損の列で統合後の dtype が変わらないように)
+    columns = list(dict.fromkeys(c for df in df_list for c in df.columns))
+    df_merged = pd.concat([df.dropna(axis=1, how="all") for df in df_list], ignore_index=True).reindex(columns=columns)
     
     if "timestamp" in df_merged.columns:
         df_merged["timestamp"] = pd.to_datetime(df_merged["timestamp"])
@@ -222,38 +338,71 @@ def load_sensor_data(limit: int = 5000) -> pd.DataFrame:
 
     return apply_friendly_names(df_merged).head(limit)
 
+
+def load_sensor_data(limit: int = 5000) -> pd.DataFrame:
+    """
+    新旧テーブルからセンサーデータを統合して取得する
+    Target Tables: device_records, switchbot_meter_logs, power_usage
+
+    直近の生データ(最新 limit 件)が必要なため集計テーブルは使わない。
+    生データは保持期間(config.SENSOR_RAW_RETENTION_DAYS)で削除され、「全デバイス横断で
+    最新N件」の読み出しは timestamp 単独のインデックス (migrations/0007) で解決される。
+    ダッシュボードは services/dashboard_data.py で差分だけを読み足す。
+    """
+    return merge_sensor_frames([load_sensor_source(source, limit) for source in sensor_sources()], limit)
+
+def load_sensor_rollup(
+    table: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    step_sec: int = 3600,
+    device_ids: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    センサーログの集計値 (min/max/avg/件数、電力は kWh) を取得する。
+
+    step_sec(欲しいグラフの刻み)を満たす最も粗い集計単位 (1分/1時間/1日) を自動で選び、
+    まだ集計されていない直近の生データも合成して返す (services/rollup_service.py 参照)。
+    bucket 列は各区間の開始時刻 (JST) を "timestamp" 列として返す。
+    """
+    end = end or datetime.now(pytz.timezone("Asia/Tokyo"))
+    resolution = rollup_service.choose_resolution(start, step_sec)
+    try:
+        with closing(get_ro_db_connection()) as conn:
+            rows = rollup_service.load_rollup(conn, table, start, end, resolution, device_ids)
+    except Exception as e:
+        logger.error(f"Rollup Load Error ({table}): {e}")
+        return pd.DataFrame()
+
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows).rename(columns={"bucket": "timestamp"})
+    return process_dataframe(df)
+
 def calculate_monthly_cost_cumulative() -> int:
-    """今月の電気代概算"""
+    """
+    今月の電気代概算
+
+    月初からの日次集計 (kWh) の合計から算出する。以前は今月分の生データを全件読み込み、
+    デバイスを区別せずに時刻差分で積算していたが、現在はデバイスごとに積算した値を合算する。
+    """
     try:
         now = datetime.now(pytz.timezone("Asia/Tokyo"))
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0).isoformat()
+        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        month_sec = 31 * 86400
 
         # 1. 新テーブル (power_usage) から取得
-        query = f"""
-            SELECT timestamp, wattage as power_watts 
-            FROM {config.SQLITE_TABLE_POWER_USAGE} 
-            WHERE timestamp >= '{start_of_month}'
-            ORDER BY timestamp ASC
-        """
-        df = load_data_from_db(query)
+        df = load_sensor_rollup(config.SQLITE_TABLE_POWER_USAGE, start_of_month, now, step_sec=month_sec)
 
         # 2. 新テーブルが空なら旧テーブル (device_records) へフォールバック
         if df.empty:
-            query_old = f"""
-                SELECT timestamp, power_watts FROM device_records
-                WHERE device_type = 'Nature Remo E Lite' AND timestamp >= '{start_of_month}'
-                ORDER BY timestamp ASC
-            """
-            df = load_data_from_db(query_old)
+            df = load_sensor_rollup(config.SQLITE_TABLE_SENSOR, start_of_month, now, step_sec=month_sec)
+            if not df.empty:
+                df = df[df["device_type"] == "Nature Remo E Lite"]
 
         if df.empty:
             return 0
 
-        df["time_diff"] = df["timestamp"].diff().dt.total_seconds() / 3600
-        df = df.dropna(subset=["time_diff"])
-        df = df[df["time_diff"] <= 1.0]
-
-        df["kwh"] = (df["power_watts"] / 1000) * df["time_diff"]
         return int(df["kwh"].sum() * 31)
     except Exception as e:
         logger.error(f"Cost Calc Error: {e}")
@@ -290,32 +439,29 @@ def load_yearly_temperature_stats(year: int, location: str = "伊丹") -> pd.Dat
         """
         df_weather = pd.read_sql_query(q_weather, conn)
         
-        itami_ids = [d["id"] for d in config.MONITOR_DEVICES if d.get("location") == location]
+        itami_ids = [d["id"] for d in device_registry.devices_at(location)]
         if not itami_ids:
             return df_weather
             
-        ids_str = "'" + "','".join(itami_ids) + "'"
+        # 室温は日次集計の最大・最小から取得する (未集計の直近分も合成される)
+        tz = pytz.timezone("Asia/Tokyo")
+        year_start = tz.localize(datetime(year, 1, 1))
+        year_end = tz.localize(datetime(year + 1, 1, 1))
+
+        def _daily_indoor(table: str, metric: str) -> pd.DataFrame:
+            df = load_sensor_rollup(table, year_start, year_end, step_sec=86400, device_ids=itami_ids)
+            if df.empty or df[f"{metric}_count"].sum() == 0:
+                return pd.DataFrame()
+            df = df[df[f"{metric}_count"] > 0].copy()
+            df["date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+            return (
+                df.groupby("date")
+                .agg(in_max=(f"{metric}_max", "max"), in_min=(f"{metric}_min", "min"))
+                .reset_index()
+            )
 
-        q_new = f"""
-            SELECT substr(timestamp, 1, 10) as date, MAX(temperature) as in_max, MIN(temperature) as in_min
-            FROM {config.SQLITE_TABLE_SWITCHBOT_LOGS}
-            WHERE timestamp >= '{start_date}' AND timestamp <= '{end_date}T23:59:59'
-            AND device_id IN ({ids_str}) AND temperature IS NOT NULL GROUP BY date
-        """
-        q_old = f"""
-            SELECT substr(timestamp, 1, 10) as date, MAX(temperature_celsius) as in_max, MIN(temperature_celsius) as in_min
-            FROM device_records
-            WHERE timestamp >= '{start_date}' AND timestamp <= '{end_date}T23:59:59'
-            AND device_id IN ({ids_str}) AND temperature_celsius IS NOT NULL GROUP BY date
-        """
-        
-        df_new = pd.DataFrame()
-        try: df_new = pd.read_sql_query(q_new, conn)
-        except: pass
-            
-        df_old = pd.DataFrame()
-        try: df_old = pd.read_sql_query(q_old, conn)
-        except: pass
+        df_new = _daily_indoor(config.SQLITE_TABLE_SWITCHBOT_LOGS, "temperature")
+        df_old = _daily_indoor(config.SQLITE_TABLE_SENSOR, "temperature_celsius")
 
         if not df_new.empty and not df_old.empty:
             df_sensor = pd.concat([df_new, df_old]).groupby("date").agg({"in_max": "max", "in_min": "min"}).reset_index()
@@ -341,7 +487,7 @@ def load_bicycle_data(limit: int = 2000) -> pd.DataFrame:
     """駐輪場データを取得"""
     table_name = getattr(config, "SQLITE_TABLE_BICYCLE", "bicycle_parking_records")
     try:
-        with get_ro_db_connection() as conn:
+        with closing(get_ro_db_connection()) as conn:
             cur = conn.cursor()
             cur.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
             if not cur.fetchone():
@@ -361,7 +507,7 @@ def load_ai_report() -> Optional[pd.Series]:
 def load_ranking_dates(limit: int = 3) -> List[str]:
     """ランキングの日付リストを取得"""
     try:
-        with get_ro_db_connection() as conn:
+        with closing(get_ro_db_connection()) as conn:
             cur = conn.cursor()
             cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='app_rankings'")
             if not cur.fetchone(): return []
@@ -1,14 +1,16 @@
+import asyncio
 import json
 import os
 import sys
 import subprocess
-import threading
-import time
 import urllib.parse
-import glob
-from datetime import datetime
 from typing import Optional, Dict, Any, List
+from core import device_registry
 from core.logger import setup_logging
+from services.live_session_manager import LiveSession, LiveSessionManager
+from services import recording_catalog
+from services.snapshot_service import LIVE_SNAPSHOT_NAME, SnapshotService
+from services.vod_playlist_builder import VodDay, VodPlaylistBuilder
 import config
 
 try:
@@ -23,33 +25,25 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 HLS_LIVE_DIR = os.path.join(BASE_DIR, "data", "hls_streams", "live")
 HLS_VOD_DIR = os.path.join(BASE_DIR, "data", "hls_streams", "vod")
 
-_active_processes: Dict[str, subprocess.Popen] = {}
-_active_vod_processes: Dict[str, subprocess.Popen] = {} # VOD排他制御用の辞書を追加
+# ライブ配信の ffmpeg は視聴状況に応じて起動・停止する (services/live_session_manager.py)
+live_sessions = LiveSessionManager(
+    idle_timeout_sec=config.LIVE_IDLE_TIMEOUT_SEC,
+    viewer_ttl_sec=config.LIVE_VIEWER_TTL_SEC,
+    max_sessions=config.LIVE_MAX_SESSIONS,
+)
+# 録画プレイリストは mp4 1ファイルごとに分割して追記する (services/vod_playlist_builder.py)
+vod_builder = VodPlaylistBuilder(
+    lister=lambda source_dir, date: [r.path for r in recording_catalog.clips_on(os.path.basename(source_dir), date)],
+    settle_sec=config.VOD_SOURCE_SETTLE_SEC,
+    max_jobs=config.VOD_MAX_JOBS,
+)
+# 最新のスナップショットはメモリに保持し、ライブ配信中は ffmpeg が書く latest.jpg から更新する (services/snapshot_service.py)
+snapshots = SnapshotService(
+    live_path=lambda camera_id: os.path.join(HLS_LIVE_DIR, camera_id, LIVE_SNAPSHOT_NAME),
+    max_age_sec=config.SNAPSHOT_MAX_AGE_SEC,
+)
 _rtsp_cache: Dict[str, str] = {}
 
-# VOD生成のcheck-then-act競合(同一cam_id・日付への同時リクエストで
-# ffmpegが二重起動し同一ファイルへ書き込む)を防ぐための、process_key単位ロック。
-_vod_generation_locks: Dict[str, threading.Lock] = {}
-_vod_generation_locks_guard = threading.Lock()
-
-
-def _get_vod_generation_lock(process_key: str) -> threading.Lock:
-    with _vod_generation_locks_guard:
-        lock = _vod_generation_locks.get(process_key)
-        if lock is None:
-            lock = threading.Lock()
-            _vod_generation_locks[process_key] = lock
-        return lock
-
-
-def _prune_finished_vod_processes() -> None:
-    """完了済み(poll()がNoneでない)プロセスを_active_vod_processesから除去する。
-    キーがcam_id×target_dateの組み合わせのため、剪定しないと日々増え続けて
-    無限に蓄積してしまう。"""
-    finished_keys = [key for key, proc in _active_vod_processes.items() if proc.poll() is not None]
-    for key in finished_keys:
-        _active_vod_processes.pop(key, None)
-
 
 def _mask_rtsp_url_for_log(url: str) -> str:
     """RTSP URLの認証情報(user:pass)をログ出力用にマスクする。
@@ -124,18 +118,11 @@ def get_rtsp_url(cam_conf: Dict[str, Any]) -> str:
         logger.error(f"❌ [{cam_conf['name']}] ONVIF経由のRTSP URL取得に失敗: {e}")
         raise
 
-def start_hls_stream(cam_conf: Dict[str, Any]) -> str:
-    cam_id = cam_conf['id']
-    cam_dir = init_output_dir(HLS_LIVE_DIR, cam_id)
-    playlist_path = os.path.join(cam_dir, "stream.m3u8")
-
-    if cam_id in _active_processes and _active_processes[cam_id].poll() is None:
-        return playlist_path
-
+def _spawn_live_ffmpeg(cam_conf: Dict[str, Any], cam_dir: str, playlist_path: str) -> Optional[subprocess.Popen]:
     try:
         rtsp_url = get_rtsp_url(cam_conf)
     except Exception:
-        return ""
+        return None
 
     logger.info(f"🎥 [{cam_conf['name']}] ライブHLS配信を開始 (RTSP: {_mask_rtsp_url_for_log(rtsp_url)})")
 
@@ -157,6 +144,15 @@ def start_hls_stream(cam_conf: Dict[str, Any]) -> str:
         "-hls_flags", "delete_segments",
         playlist_path
     ]
+    if config.SNAPSHOT_LIVE_FPS > 0:
+        # 2つ目の出力: 配信中は最新フレームを latest.jpg に上書きし続け、スナップショットAPIがそれを返す
+        cmd += [
+            "-an",
+            "-vf", f"fps={config.SNAPSHOT_LIVE_FPS:g}",
+            "-q:v", "5",
+            "-update", "1",
+            os.path.join(cam_dir, LIVE_SNAPSHOT_NAME),
+        ]
 
     # FFmpegのエラーを追えるようにログファイルへ出力。
     # 他ローカルユーザーからの閲覧を防ぐため所有者のみ読み書き可能にする。
@@ -167,160 +163,84 @@ def start_hls_stream(cam_conf: Dict[str, Any]) -> str:
     except OSError:
         pass
     try:
-        process = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT)
+        return subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT)
     finally:
         # 子プロセスがdup()で自分のfdを持つため、親側はPopen呼び出し後に
         # 閉じてよい。閉じないと、プロセスがクラッシュして再起動されるたびに
         # ファイルハンドルがプロセス内に蓄積してリークする。
         log_file.close()
-    _active_processes[cam_id] = process
-    return playlist_path
-
-def get_record_start_offset(cam_conf: Dict[str, Any], target_date: str) -> int:
-        """指定日の最初の録画ファイルの開始時刻を0時からの秒数で返す"""
-        nas_folder_name = cam_conf.get("nas_folder", cam_conf["name"])
-        nvr_base_dir = getattr(config, 'NVR_RECORD_DIR', os.getenv("NVR_RECORD_DIR", "/mnt/nas/home_system/nvr_recordings"))
-        search_dir = os.path.join(nvr_base_dir, nas_folder_name)
-        
-        search_pattern = os.path.join(search_dir, f"{target_date}_*.mp4")
-        mp4_files = sorted(glob.glob(search_pattern))
-        
-        if not mp4_files:
-            return 0
-            
-        try:
-            first_file = os.path.basename(mp4_files[0])
-            time_str = first_file.split("_")[1].split(".")[0]
-            dt = datetime.strptime(time_str, "%H%M%S")
-            return dt.hour * 3600 + dt.minute * 60 + dt.second
-        except Exception as e:
-            logger.warning(f"Failed to parse start offset for {cam_conf['name']}: {e}")
-            return 0
 
 
-def generate_record_playlist(cam_conf: Dict[str, Any], target_date: str) -> Optional[str]:
+def open_live_session(cam_conf: Dict[str, Any], viewer: Optional[str] = None) -> Optional[LiveSession]:
     """
-    指定された日付の録画ファイル群を結合し、シームレス再生用のVODプレイリストを生成する
-    target_date 形式: YYYYMMDD (例: 20260716)
+    カメラのライブ配信セッションを取得する (起動済みなら共有、無ければ ffmpeg を起動)。
+    配信枠が全て視聴中の場合は LiveSessionLimitError を送出する。
     """
     cam_id = cam_conf['id']
-    process_key = f"{cam_id}_{target_date}"
-
-    # process_key単位でロックし、以降の「実行中チェック→未実行ならPopen起動・登録」を
-    # 単一の原子的な区間にする。ロック無しだと、同一カメラ・日付への同時リクエストが
-    # どちらも「実行中でない」と判定してffmpegを二重起動し、同一ファイルへ競合書き込みし得た。
-    with _get_vod_generation_lock(process_key):
-        return _generate_record_playlist_locked(cam_conf, target_date, process_key)
+    cam_dir = init_output_dir(HLS_LIVE_DIR, cam_id)
+    playlist_path = os.path.join(cam_dir, "stream.m3u8")
+    return live_sessions.acquire(
+        cam_id, playlist_path, lambda: _spawn_live_ffmpeg(cam_conf, cam_dir, playlist_path), viewer
+    )
 
 
-def _generate_record_playlist_locked(cam_conf: Dict[str, Any], target_date: str, process_key: str) -> Optional[str]:
-    cam_id = cam_conf['id']
-    nas_folder_name = cam_conf.get("nas_folder", cam_conf["name"])
+def start_hls_stream(cam_conf: Dict[str, Any]) -> str:
+    """ライブ配信を開始してプレイリストのパスを返す (失敗時は空文字)。準備完了は待たない"""
+    session = open_live_session(cam_conf)
+    return session.playlist_path if session else ""
 
-    # NVRの保存ディレクトリ (config.NVR_RECORD_DIR が未定義の場合は環境変数やフォールバックを使用)
+def _record_source_dir(cam_conf: Dict[str, Any]) -> str:
+    """NVRの録画保存先 (config.NVR_RECORD_DIR が未定義の場合は環境変数やフォールバックを使用)"""
     nvr_base_dir = getattr(config, 'NVR_RECORD_DIR', os.getenv("NVR_RECORD_DIR", "/mnt/nas/home_system/nvr_recordings"))
-    search_dir = os.path.join(nvr_base_dir, nas_folder_name)
+    return os.path.join(nvr_base_dir, recording_catalog.camera_folder(cam_conf))
 
-    if not os.path.exists(search_dir):
-        logger.warning(f"⚠️ [{cam_conf['name']}] 録画保存先が存在しません: {search_dir}")
-        return None
 
-    # 指定日の10分分割mp4ファイル一覧を取得
-    search_pattern = os.path.join(search_dir, f"{target_date}_*.mp4")
-    mp4_files = sorted(glob.glob(search_pattern))
+def get_record_start_offset(cam_conf: Dict[str, Any], target_date: str) -> int:
+        """指定日の最初の録画ファイルの開始時刻を0時からの秒数で返す"""
+        recordings = recording_catalog.clips_on(recording_catalog.camera_folder(cam_conf), target_date)
+        
+        if not recordings:
+            return 0
+            
+        start = recordings[0].start
+        return start.hour * 3600 + start.minute * 60 + start.second
 
-    if not mp4_files:
-        logger.warning(f"⚠️ [{cam_conf['name']}] {target_date} の録画ファイルが存在しません")
-        return None
 
-    cam_dir = init_output_dir(HLS_VOD_DIR, cam_id)
-    concat_file_path = os.path.join(cam_dir, f"concat_{target_date}.txt")
-    playlist_path = os.path.join(cam_dir, f"record_{target_date}.m3u8")
-
-    # 完了済みプロセスを剪定してから登録状況を確認する(無限蓄積の防止)
-    _prune_finished_vod_processes()
-
-    # 1. 排他制御: 既に同じカメラ・日付の変換プロセスが実行中の場合は処理をスキップ
-    if process_key in _active_vod_processes and _active_vod_processes[process_key].poll() is None:
-        logger.info(f"⏳ [{cam_conf['name']}] {target_date} の録画プレイリスト生成は既に実行中です。")
-        # フロントエンドが500エラー（FileResponseのクラッシュ）にならないよう、生成を待機する
-        for _ in range(10):
-            if os.path.exists(playlist_path):
-                return playlist_path
-            time.sleep(0.5)
+def _request_record_playlist(cam_conf: Dict[str, Any], target_date: str) -> Optional[VodDay]:
+    search_dir = _record_source_dir(cam_conf)
+    if not os.path.exists(search_dir):
+        logger.warning(f"⚠️ [{cam_conf['name']}] 録画保存先が存在しません: {search_dir}")
         return None
 
-    # 2. キャッシュ: 過去日付（録画が確定済み）かつ既にプレイリストが生成済みであれば、再エンコードせずそれを返す
-    #    当日分は録画ファイルが増え続けるため、キャッシュ対象から除外し毎回最新の状態で再生成する
-    today_str = datetime.now().strftime("%Y%m%d")
-    if target_date < today_str and os.path.exists(playlist_path):
-        logger.debug(f"✅ [{cam_conf['name']}] {target_date} のプレイリストは生成済みのためキャッシュを返します。")
-        return playlist_path
-
-    # ffmpegのconcatファイルリスト作成 (ffconcat version 1.0 を使用しタイムラインを補正)
-    with open(concat_file_path, "w", encoding="utf-8") as f:
-        f.write("ffconcat version 1.0\n")
-        
-        for i in range(len(mp4_files)):
-            mp4 = mp4_files[i]
-            f.write(f"file '{mp4}'\n")
-            
-            # 次のファイルとの時間差を計算し、動画の再生時間(duration)を明示する
-            duration = 600.0  # 正常な10分ファイル(600秒)をデフォルトとする
-            
-            if i < len(mp4_files) - 1:
-                try:
-                    # 20260720_210200.mp4 のようなファイル名から時刻部分(210200)を抽出
-                    curr_time_str = os.path.basename(mp4).split("_")[1].split(".")[0]
-                    next_time_str = os.path.basename(mp4_files[i+1]).split("_")[1].split(".")[0]
-                    
-                    dt_curr = datetime.strptime(curr_time_str, "%H%M%S")
-                    dt_next = datetime.strptime(next_time_str, "%H%M%S")
-                    
-                    diff_seconds = (dt_next - dt_curr).total_seconds()
-                    
-                    # 0秒以上かつ異常値(12時間以上等)でなければ、実時間差をdurationに設定
-                    # これにより、ファイルが欠落している隙間は最終フレームで停止したまま時間を稼ぐ
-                    if 0 < diff_seconds <= 43200:
-                        duration = diff_seconds
-                except Exception as e:
-                    logger.warning(f"Failed to calculate duration for {mp4}: {e}")
-            
-            f.write(f"duration {duration}\n")
-
-    logger.info(f"🎞️ [{cam_conf['name']}] {target_date} の録画プレイリスト生成中...")
+    cam_dir = init_output_dir(HLS_VOD_DIR, cam_conf['id'])
+    day = vod_builder.request(cam_conf['id'], target_date, cam_dir, search_dir)
+    if day is None:
+        logger.warning(f"⚠️ [{cam_conf['name']}] {target_date} の録画ファイルが存在しません")
+    return day
 
-    cmd = [
-        "nice", "-n", "15",
-        "ffmpeg", "-y",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", concat_file_path,
-        "-c:v", "copy",
-        "-an",
-        "-f", "hls",
-        "-hls_time", "4",
-        "-hls_playlist_type", "vod",
-        playlist_path
-    ]
 
-    
+async def get_record_playlist(cam_conf: Dict[str, Any], target_date: str) -> Optional[str]:
+    """
+    指定された日付の録画プレイリストを返す (未分割の録画があれば追記を始め、最初の1ファイル分ができるまで待つ)
+    target_date 形式: YYYYMMDD (例: 20260716)
+    """
+    # NASの走査・マニフェストの読み込みはブロックするためスレッドで行う
+    day = await asyncio.to_thread(_request_record_playlist, cam_conf, target_date)
+    if day is None:
+        return None
+    return await vod_builder.wait_playlist(day, config.VOD_FIRST_PLAYLIST_TIMEOUT_SEC)
 
-    # 3. subprocess.run (ブロック) から Popen (非同期) に変更し、プロセスを登録する
-    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    _active_vod_processes[process_key] = process
 
-    # 4. フロントエンドが404にならないよう、プレイリストファイルが生成されるまで少し待機する
-    for _ in range(10):
-        if os.path.exists(playlist_path):
-            break
-        time.sleep(0.5)
-    
-    return playlist_path if os.path.exists(playlist_path) else None
+def generate_record_playlist(cam_conf: Dict[str, Any], target_date: str) -> Optional[str]:
+    """get_record_playlist の同期版 (スクリプトなどイベントループ外から使う)"""
+    day = _request_record_playlist(cam_conf, target_date)
+    if day is None:
+        return None
+    return vod_builder.wait_playlist_sync(day, config.VOD_FIRST_PLAYLIST_TIMEOUT_SEC)
 
 
 def set_camera_enabled(camera_id: str, enabled: bool) -> bool:
-    """devices.json 上の該当カメラの enabled フラグを更新し、config.CAMERAS にも反映する。
+    """devices.json 上の該当カメラの enabled フラグを更新し、device_registry (config.CAMERAS) にも反映する。
     devices.json が存在しない、または該当カメラが見つからない場合は False を返す。"""
     if not os.path.exists(config.DEVICES_JSON_PATH):
         return False
@@ -341,9 +261,9 @@ def set_camera_enabled(camera_id: str, enabled: bool) -> bool:
         json.dump(devices_data, f, ensure_ascii=False, indent=2)
     os.replace(tmp_path, config.DEVICES_JSON_PATH)
 
-    for cam in config.CAMERAS:
-        if cam.get("id") == camera_id:
-            cam["enabled"] = enabled
-            break
+    # メモリ上の設定は device_registry がスナップショットごと差し替える (config.CAMERAS も更新される)。
+    # 起動後に devices.json へ追加されたカメラなど、メモリ上に無い場合はファイルから読み直す
+    if not device_registry.set_camera_enabled(camera_id, enabled):
+        device_registry.reload()
 
     return True
\ No newline at end of file
@@ -0,0 +1,139 @@
+# MY_HOME_SYSTEM/services/dashboard_data.py
+"""
+ダッシュボード (dashboard.py) 向けのセンサーデータの差分キャッシュと、グラフ用のデバイス別索引。
+
+以前のダッシュボードは Streamlit の再実行 (操作のたびに発生する) ごとに
+load_sensor_data(10000) で3テーブル x 1万行を読み直し、タイムスタンプの変換と表示名の付与をやり直していた。
+グラフは1本ごとに全行へ device_type と時間帯の条件を当てて絞り込んでいた。
+
+- SensorFrameCache: 取得元 (analysis_service.sensor_sources) ごとに読み込み済みの行と最大の id を保持し、
+  2回目以降は id がそれより大きい行 (前回以降に追加された行) だけを読んで先頭に足し、最新 limit 件に切り詰める。
+  集計 (rollup_service) と同じく id を高水位標として使う。ingest_queue のまとめ書きや
+  Webhook の遅延記録で、追加が記録時刻の順にならない場合も取りこぼさない。
+  保持期間による削除や行の更新を反映するため、full_refresh_sec ごとに全件を読み直す。
+  新しい行が無ければ統合・表示名付与もやり直さず、前回の結果を返す。
+- SensorIndex: 統合済みの DataFrame をデバイスごとに時刻順で分けておき、
+  「device_type の条件に合うデバイスの [start, end) の行」を二分探索で切り出す。
+
+Streamlit のキャッシュ (TTL) との組み合わせは views/dashboard/data.py が行う。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from core.logger import setup_logging
+from services import analysis_service
+
+logger = setup_logging("dashboard_data")
+
+SourceLoader = Callable[..., pd.DataFrame]
+
+
+class SensorFrameCache:
+    """load_sensor_data(limit) と同じ結果を、差分の読み込みで保つキャッシュ"""
+
+    def __init__(
+        self,
+        limit: int = 10000,
+        full_refresh_sec: float = 600.0,
+        loader: SourceLoader = analysis_service.load_sensor_source,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limit = limit
+        self.full_refresh_sec = full_refresh_sec
+        self.loader = loader
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._high_water: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._merged: Optional[pd.DataFrame] = None
+        self.stats: Dict[str, int] = {"full_loads": 0, "incremental_loads": 0, "rows_appended": 0, "merges": 0}
+
+    def invalidate(self) -> None:
+        """次の get で全件を読み直す"""
+        with self._lock:
+            self._loaded_at = None
+
+    def get(self) -> pd.DataFrame:
+        with self._lock:
+            now = self.clock()
+            full = self._loaded_at is None or now - self._loaded_at >= self.full_refresh_sec
+            changed = full
+            for source in analysis_service.sensor_sources():
+                table = source[0]
+                if full:
+                    fetched = frame = self.loader(source, self.limit)
+                    self._high_water.pop(table, None)
+                else:
+                    fetched = self.loader(source, self.limit, after_id=self._high_water.get(table, 0))
+                    if fetched.empty:
+                        continue
+                    frame = self._append(self._frames.get(table), fetched)
+                    self.stats["rows_appended"] += len(fetched)
+                    changed = True
+                self._frames[table] = frame
+                # 切り詰める前の取得行から更新する (古い時刻で後から追加された行を毎回読み直さないため)
+                if not fetched.empty and "id" in fetched.columns:
+                    self._high_water[table] = max(self._high_water.get(table, 0), int(fetched["id"].max()))
+
+            if full:
+                self._loaded_at = now
+                self.stats["full_loads"] += 1
+            else:
+                self.stats["incremental_loads"] += 1
+            if changed or self._merged is None:
+                self._merged = analysis_service.merge_sensor_frames(list(self._frames.values()), self.limit)
+                self.stats["merges"] += 1
+            return self._merged
+
+    def _append(self, cached: Optional[pd.DataFrame], new_rows: pd.DataFrame) -> pd.DataFrame:
+        """新しい行を先頭に足して重複 (同じ id) を除き、記録時刻の新しい順に limit 件へ切り詰める"""
+        if cached is None or cached.empty:
+            combined = new_rows
+        else:
+            combined = pd.concat([new_rows, cached], ignore_index=True)
+        combined = combined.drop_duplicates(subset="id", keep="first")
+        return combined.sort_values("timestamp", ascending=False, kind="stable").head(self.limit).reset_index(drop=True)
+
+
+class SensorIndex:
+    """統合済みセンサーデータのデバイス別索引 (各デバイスの行を時刻の昇順で保持する)"""
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.columns = list(df.columns)
+        self.devices: Dict[str, pd.DataFrame] = {}
+        self.device_types: Dict[str, List[str]] = {}
+        if df.empty or "device_id" not in df.columns or "timestamp" not in df.columns:
+            return
+        ordered = df.sort_values("timestamp", kind="stable")
+        for device_id, rows in ordered.groupby("device_id", sort=False):
+            self.devices[device_id] = rows
+            if "device_type" in rows.columns:
+                self.device_types[device_id] = [t for t in rows["device_type"].dropna().unique()]
+
+    def window(self, start, end, device_type: Optional[Callable[[pd.Series], pd.Series]] = None) -> pd.DataFrame:
+        """
+        [start, end) の行を、device_type (device_type 列を受け取り真偽の Series を返す条件) に合う
+        デバイスについて集め、元の DataFrame と同じく記録時刻の新しい順で返す。
+        """
+        parts = []
+        for device_id, rows in self.devices.items():
+            if device_type is not None:
+                types = self.device_types.get(device_id, [])
+                if not types or not device_type(pd.Series(types)).any():
+                    continue
+            ts = rows["timestamp"]
+            lo, hi = ts.searchsorted(start, side="left"), ts.searchsorted(end, side="left")
+            if lo >= hi:
+                continue
+            part = rows.iloc[lo:hi]
+            if device_type is not None:
+                part = part[device_type(part["device_type"]).fillna(False).astype(bool)]
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(parts).sort_values("timestamp", ascending=False, kind="stable")
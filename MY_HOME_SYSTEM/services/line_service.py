@@ -107,9 +107,8 @@ def get_daily_health_summary_text() -> str:
 async def get_user_status_message(user_id: str) -> Union[TextMessage, FlexMessage]:
     """ユーザーのステータス情報を取得して返す"""
     try:
-        data = await asyncio.to_thread(game_system.get_all_view_data)
-        users = data.get("users", [])
-        target_user = next((u for u in users if u["user_id"] == user_id), None)
+        # 表示データ全体をコピーせず、/api/quest/data と共有のキャッシュから1ユーザー分だけ読む
+        target_user = await asyncio.to_thread(game_system.get_user_view, user_id)
 
         if not target_user:
             return TextMessage(text="⚠️ ユーザーデータが見つかりません。登録を確認してください。")
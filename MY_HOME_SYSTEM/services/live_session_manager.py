@@ -0,0 +1,410 @@
+# MY_HOME_SYSTEM/services/live_session_manager.py
+"""
+ライブHLS配信の ffmpeg プロセスを視聴者単位で管理するセッションマネージャー。
+
+以前の camera_service.start_hls_stream はカメラごとに ffmpeg を起動したまま停止せず
+(視聴者がいなくなっても RTSP の受信と HLS 書き出しを続けていた)、
+/live/{id}/stream.m3u8 はプレイリストができるまでスレッドプールのワーカーを
+time.sleep(0.5) x 10 で占有していた。本モジュールは
+- プレイリスト/セグメントの取得を「視聴」として記録し、一定時間 (LIVE_IDLE_TIMEOUT_SEC)
+  取得が途絶えたセッションの ffmpeg を停止する (リーパースレッド)。
+- 同じカメラへの同時リクエストでは ffmpeg を1つだけ起動し、全員で共有する。
+- プレイリストの生成は watchdog (inotify) のファイルイベントで検知し、待機側は
+  asyncio の Future で待つ (ポーリングしない)。ffmpeg が先に異常終了した場合も即座に起こす。
+- 同時に起動する ffmpeg を LIVE_MAX_SESSIONS 個までに制限する。上限到達時は視聴者のいない
+  セッションを停止して枠を空け、全セッションに視聴者がいる場合は LiveSessionLimitError を送出する。
+
+リクエストごとに別のイベントループで動くこともある (テストクライアント等) ため、
+状態は threading のロックで保護し、イベントループには依存しない。
+"""
+import asyncio
+import glob
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.logger import setup_logging
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog が無い環境ではプレイリストの存在確認にフォールバックする
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = setup_logging("live_session_manager")
+
+# watchdog が使えない場合の存在確認の間隔 (秒)
+_FALLBACK_CHECK_SEC = 0.25
+
+
+class LiveSessionLimitError(RuntimeError):
+    """全ての配信枠が視聴中のセッションで埋まっている"""
+
+
+class LiveSession:
+    """1カメラ分のライブ配信 (ffmpeg 1プロセス) と視聴者の状態"""
+
+    def __init__(self, camera_id: str, playlist_path: str, clock: Callable[[], float]) -> None:
+        self.camera_id = camera_id
+        self.playlist_path = playlist_path
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = clock()
+        self.ready_at: Optional[float] = None
+        self.last_access = self.started_at
+        self.viewers: Dict[str, float] = {}
+        self.state = "starting"  # starting -> ready -> exited / stopped
+        self.watch: Any = None
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def alive(self) -> bool:
+        return self.state in ("starting", "ready") and (self.process is None or self.process.poll() is None)
+
+    def active_viewers(self, now: float, ttl: float) -> int:
+        return sum(1 for seen in self.viewers.values() if now - seen <= ttl)
+
+
+class _PlaylistHandler(FileSystemEventHandler):
+    """ffmpeg が stream.m3u8 を書き出した (一時ファイルからの rename を含む) ことを通知する"""
+
+    def __init__(self, manager: "LiveSessionManager") -> None:
+        super().__init__()
+        self._manager = manager
+
+    def on_any_event(self, event: Any) -> None:
+        if event.is_directory:
+            return
+        for path in (getattr(event, "dest_path", ""), event.src_path):
+            if path and path.endswith(".m3u8"):
+                self._manager._on_playlist_written(os.fsdecode(path))
+
+
+class LiveSessionManager:
+    def __init__(
+        self,
+        idle_timeout_sec: float = 30.0,
+        viewer_ttl_sec: float = 10.0,
+        max_sessions: int = 3,
+        reap_interval_sec: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_timeout_sec = idle_timeout_sec
+        self.viewer_ttl_sec = viewer_ttl_sec
+        self.max_sessions = max_sessions
+        self.reap_interval_sec = reap_interval_sec or max(1.0, min(5.0, idle_timeout_sec / 3))
+        self._clock = clock
+        self._sessions: Dict[str, LiveSession] = {}
+        self._by_playlist: Dict[str, LiveSession] = {}
+        self._lock = threading.RLock()
+        self._camera_locks: Dict[str, threading.Lock] = {}
+        self._observer: Any = None
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.stats: Dict[str, int] = {"started": 0, "reused": 0, "reaped": 0, "evicted": 0, "rejected": 0}
+
+    # --- 起動 ---
+    def _camera_lock(self, camera_id: str) -> threading.Lock:
+        with self._lock:
+            return self._camera_locks.setdefault(camera_id, threading.Lock())
+
+    def acquire(
+        self,
+        camera_id: str,
+        playlist_path: str,
+        spawn: Callable[[], Optional[subprocess.Popen]],
+        viewer: Optional[str] = None,
+    ) -> Optional[LiveSession]:
+        """
+        カメラのセッションを返す。起動中のものがあれば共有し、無ければ spawn() で ffmpeg を起動する。
+        spawn が失敗 (None) した場合は None。ブロッキングのため、イベントループからは to_thread で呼ぶ。
+        """
+        with self._camera_lock(camera_id):
+            session = self._sessions.get(camera_id)
+            if session is not None and session.alive:
+                self.stats["reused"] += 1
+                self.touch(camera_id, viewer)
+                return session
+            if session is not None:
+                self._stop(session, reason="exited")
+
+            session = LiveSession(camera_id, playlist_path, self._clock)
+            victim = self._reserve_slot(session)
+            if victim is not None:
+                logger.info(f"♻️ [{victim.camera_id}] 配信枠の上限のため視聴者のいないライブ配信を停止します")
+                self._stop(victim, reason="evicted")
+
+            _remove_stale_outputs(playlist_path)
+            self._watch(session)
+            try:
+                process = spawn()
+            except Exception as e:
+                logger.error(f"❌ [{camera_id}] ライブ配信の起動に失敗: {type(e).__name__}: {e}")
+                process = None
+            if process is None:
+                self._stop(session, reason="spawn_failed")
+                return None
+
+            session.process = process
+            self.stats["started"] += 1
+            threading.Thread(
+                target=self._wait_exit, args=(session,), name=f"live-exit-{camera_id}", daemon=True
+            ).start()
+            self._ensure_reaper()
+            if os.path.exists(playlist_path):
+                self._mark_ready(session)
+            self.touch(camera_id, viewer)
+            return session
+
+    def _reserve_slot(self, session: LiveSession) -> Optional[LiveSession]:
+        """上限内なら枠を確保する。満杯なら視聴者のいない最古のセッションを追い出し対象として返す"""
+        with self._lock:
+            victim = None
+            alive = [s for s in self._sessions.values() if s.alive]
+            if len(alive) >= self.max_sessions:
+                now = self._clock()
+                idle = [s for s in alive if s.active_viewers(now, self.viewer_ttl_sec) == 0]
+                if not idle:
+                    self.stats["rejected"] += 1
+                    raise LiveSessionLimitError(
+                        f"Live stream limit reached ({self.max_sessions} sessions in use)"
+                    )
+                victim = min(idle, key=lambda s: s.last_access)
+                self._sessions.pop(victim.camera_id, None)
+                self.stats["evicted"] += 1
+            self._sessions[session.camera_id] = session
+            self._by_playlist[os.path.abspath(session.playlist_path)] = session
+            return victim
+
+    # --- 視聴の記録 ---
+    def touch(self, camera_id: str, viewer: Optional[str] = None) -> bool:
+        """プレイリスト/セグメントの取得を記録する。起動中のセッションが無ければ False"""
+        with self._lock:
+            session = self._sessions.get(camera_id)
+            if session is None or not session.alive:
+                return False
+            now = self._clock()
+            session.last_access = now
+            session.viewers[viewer or "anonymous"] = now
+            return True
+
+    # --- 準備完了の待機 ---
+    async def wait_ready(self, session: LiveSession, timeout: float) -> bool:
+        """プレイリストが生成されるまで待つ。ffmpeg が先に終了した・タイムアウトした場合は False"""
+        if session.state == "ready":
+            return True
+        if session.state not in ("starting",):
+            return False
+        if Observer is None:
+            return await self._wait_ready_fallback(session, timeout)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            if session.state != "starting":
+                return session.state == "ready"
+            session._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏳ [{session.camera_id}] ライブ配信のプレイリスト生成がタイムアウトしました ({timeout}s)")
+            return False
+        finally:
+            with self._lock:
+                if waiter in session._waiters:
+                    session._waiters.remove(waiter)
+
+    async def _wait_ready_fallback(self, session: LiveSession, timeout: float) -> bool:
+        deadline = self._clock() + timeout
+        while self._clock() < deadline:
+            if os.path.exists(session.playlist_path):
+                self._mark_ready(session)
+            if session.state != "starting":
+                return session.state == "ready"
+            await asyncio.sleep(_FALLBACK_CHECK_SEC)
+        return False
+
+    def _on_playlist_written(self, path: str) -> None:
+        with self._lock:
+            session = self._by_playlist.get(os.path.abspath(path))
+        if session is not None and os.path.exists(session.playlist_path):
+            self._mark_ready(session)
+
+    def _mark_ready(self, session: LiveSession) -> None:
+        with self._lock:
+            if session.state != "starting":
+                return
+            session.state = "ready"
+            session.ready_at = self._clock()
+            self._wake(session, True)
+        logger.debug(f"[{session.camera_id}] live playlist ready in {session.ready_at - session.started_at:.2f}s")
+
+    def _wake(self, session: LiveSession, result: bool) -> None:
+        """待機中の全ての Future を (それぞれのイベントループ上で) 完了させる。_lock を保持して呼ぶ"""
+        waiters, session._waiters = session._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, result)
+            except RuntimeError:
+                pass  # 待機側のイベントループが既に閉じている
+
+    def _wait_exit(self, session: LiveSession) -> None:
+        process = session.process
+        try:
+            returncode = process.wait()
+        except Exception:
+            return
+        with self._lock:
+            if session.state in ("starting", "ready"):
+                logger.warning(f"⚠️ [{session.camera_id}] ライブ配信の ffmpeg が終了しました (code={returncode})")
+                session.state = "exited"
+                self._wake(session, False)
+
+    # --- 停止 ---
+    def reap_idle(self) -> int:
+        """一定時間視聴の無いセッション・終了済みのセッションを停止し、停止した数を返す"""
+        now = self._clock()
+        with self._lock:
+            expired = [
+                s for s in self._sessions.values()
+                if not s.alive or now - s.last_access >= self.idle_timeout_sec
+            ]
+            # 視聴を終えたクライアントの記録を捨てる (長時間の配信で溜まり続けないように)
+            for s in self._sessions.values():
+                s.viewers = {v: seen for v, seen in s.viewers.items() if now - seen <= self.viewer_ttl_sec}
+        stopped = 0
+        for s in expired:
+            # 停止・片付けの間に同じカメラの新しい ffmpeg が起動し、その出力を消してしまわないよう
+            # acquire と同じカメラ単位のロックを保持して停止する
+            with self._camera_lock(s.camera_id):
+                with self._lock:
+                    if self._sessions.get(s.camera_id) is not s:
+                        continue  # 既に停止・再起動済み
+                    alive = s.alive
+                    if alive and self._clock() - s.last_access < self.idle_timeout_sec:
+                        continue  # 判定後に視聴が再開された
+                    self._sessions.pop(s.camera_id, None)
+                if alive:
+                    logger.info(f"💤 [{s.camera_id}] {self.idle_timeout_sec:g}秒間視聴が無いためライブ配信を停止します")
+                    self.stats["reaped"] += 1
+                self._stop(s, reason="idle")
+                stopped += 1
+        return stopped
+
+    def stop(self, camera_id: str) -> bool:
+        with self._camera_lock(camera_id):
+            with self._lock:
+                session = self._sessions.pop(camera_id, None)
+            if session is None:
+                return False
+            self._stop(session, reason="stopped")
+            return True
+
+    def _stop(self, session: LiveSession, reason: str) -> None:
+        with self._lock:
+            if self._sessions.get(session.camera_id) is session:
+                self._sessions.pop(session.camera_id, None)
+            if self._by_playlist.get(os.path.abspath(session.playlist_path)) is session:
+                self._by_playlist.pop(os.path.abspath(session.playlist_path), None)
+            if session.state in ("starting", "ready"):
+                session.state = "stopped"
+            self._wake(session, False)
+            watch, session.watch = session.watch, None
+        if watch is not None and self._observer is not None:
+            try:
+                self._observer.unschedule(watch)
+            except (KeyError, ValueError):
+                pass
+        process = session.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        if reason != "spawn_failed":
+            with self._lock:
+                newer = self._by_playlist.get(os.path.abspath(session.playlist_path))
+            # 配信枠の追い出しはカメラ単位のロックの外で行われるため、同じ出力先で既に
+            # 新しいセッションが起動していれば、その出力は消さない
+            if newer is None:
+                _remove_stale_outputs(session.playlist_path)
+        logger.debug(f"[{session.camera_id}] live session stopped ({reason})")
+
+    def shutdown(self) -> None:
+        """全セッションの ffmpeg を停止し、リーパー・ファイル監視を終了する (サーバー停止時)"""
+        self._stop_event.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for s in sessions:
+            self._stop(s, reason="shutdown")
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=2)
+        reaper, self._reaper = self._reaper, None
+        if reaper is not None and reaper is not threading.current_thread():
+            reaper.join(timeout=2)
+        self._stop_event.clear()
+
+    # --- バックグラウンド ---
+    def _watch(self, session: LiveSession) -> None:
+        if Observer is None:
+            return
+        with self._lock:
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            observer = self._observer
+        cam_dir = os.path.dirname(os.path.abspath(session.playlist_path))
+        os.makedirs(cam_dir, exist_ok=True)
+        session.watch = observer.schedule(_PlaylistHandler(self), cam_dir, recursive=False)
+
+    def _ensure_reaper(self) -> None:
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="live-session-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self) -> None:
+        while not self._stop_event.wait(self.reap_interval_sec):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"❌ Live session reaper error: {type(e).__name__}: {e}")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """起動中のセッションの一覧 (監視・デバッグ用)"""
+        now = self._clock()
+        with self._lock:
+            return [
+                {
+                    "camera_id": s.camera_id,
+                    "state": s.state,
+                    "pid": s.process.pid if s.process is not None else None,
+                    "viewers": s.active_viewers(now, self.viewer_ttl_sec),
+                    "idle_sec": round(now - s.last_access, 1),
+                }
+                for s in self._sessions.values()
+            ]
+
+
+def _resolve(future: asyncio.Future, result: bool) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _remove_stale_outputs(playlist_path: str) -> None:
+    """前回の配信のプレイリスト・セグメントを削除する (古いプレイリストを「準備完了」と誤認しないため)"""
+    cam_dir = os.path.dirname(playlist_path)
+    for path in [playlist_path, *glob.glob(os.path.join(cam_dir, "*.ts"))]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
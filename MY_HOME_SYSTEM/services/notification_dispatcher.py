@@ -0,0 +1,581 @@
+# MY_HOME_SYSTEM/services/notification_dispatcher.py
+"""
+通知の送信箱 (outbox) と配送ワーカー。
+
+以前の send_push は呼び出し元のスレッドで Discord Webhook (画像付きはタイムアウト60秒) と
+LINE Push (呼び出しごとに ApiClient を作り直す) を同期的に送っていた。リクエスト処理・
+DBトランザクション中のアイテム申請・センサーのしきい値通知・カメラのイベント等が送信の完了を待たされていた。
+
+- 受付 (enqueue_push): 通知を SQLite の notification_outbox へ1行ずつ積むだけで戻る。
+  呼び出し元のカーソルを渡せば同じトランザクションに入る (コミットされた通知だけが送られる)。
+- 配送 (NotificationDispatcher): 各プロセスで最初の受付時にバックグラウンドスレッドを起動し、
+  送信時刻に達した行を取り出して送る。Discord は requests.Session (keep-alive) を、
+  LINE は ApiClient / MessagingApi を使い回す。複数プロセスのワーカーが同じ送信箱を見ても、
+  取り出し時に locked_until を条件付き UPDATE で立てるため二重に送らない。
+- まとめ送信: coalesce_key 付きの通知は NOTIFY_COALESCE_WINDOW_SEC 秒待ち、同じ
+  (送信先, キー) の未送信分を Discord は1つの embed、LINE は1通のテキストにまとめる。
+- レート制限: Discord の 429 は Retry-After (ヘッダーまたは本文の retry_after) の間その Webhook への送信を止め、
+  X-RateLimit-Remaining が 0 のときも X-RateLimit-Reset-After の間は次を送らない。
+  LINE は月間の送信上限 (get_message_quota / get_message_quota_consumption) を定期的に確認し、
+  使い切っている場合は送らない。
+- 失敗: 5xx・通信エラーは指数バックオフで NOTIFY_MAX_ATTEMPTS 回まで再試行し、それ以外の 4xx・上限到達・
+  再試行切れは notification_dead_letters へ移す。LINE の失敗は従来どおり、Discord の失敗 (エラーチャンネル宛て以外) は
+  添付ファイル名を添えて、Discord のエラーチャンネルへ知らせる。配達不能キューは画像・動画を BLOB のまま持つため、
+  NOTIFY_DEAD_LETTER_RETENTION_DAYS 日より古い行をワーカーが1日1回削除する。
+- 終了時: unified_server の lifespan 終了処理と atexit で、送信時刻前のまとめ待ちも含めて送り切る
+  (cron 等の短命プロセスでも通知を取りこぼさない)。
+"""
+import atexit
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytz
+import requests
+from linebot.v3.messaging import ApiClient, ApiException, Message, MessagingApi, PushMessageRequest, TextMessage
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+from core.utils import get_now_iso
+from services import notification_service
+
+logger = setup_logging("service.notification_dispatcher")
+
+# 1回に取り出す行数
+CLAIM_BATCH = 50
+# 取り出した行を他のワーカーが拾わない秒数 (画像付き Discord 送信のタイムアウトより長くする)
+LEASE_SEC = 120.0
+# 429 に Retry-After が付いていない場合の待ち秒数
+DEFAULT_RETRY_AFTER_SEC = 60.0
+DISCORD_EMBED_DESCRIPTION_LIMIT = 4096
+LINE_TEXT_LIMIT = 5000
+LINE_IMAGE_NOTE = "※画像はDiscordを確認してください"
+# 配達不能キューの古い行を削除する間隔
+DEAD_LETTER_PRUNE_INTERVAL_SEC = 24 * 60 * 60.0
+
+# 送信結果
+SENT = "sent"
+RETRY = "retry"  # 一時的なエラー (再試行する)
+RATE_LIMITED = "rate_limited"  # retry_after 秒後に再送する (再試行回数に数えない)
+FAILED = "failed"  # 恒久的なエラー (配達不能キューへ)
+
+
+@dataclass
+class Outcome:
+    status: str
+    error: Optional[str] = None
+    retry_after: float = 0.0
+
+
+@dataclass
+class OutboxItem:
+    id: int
+    target: str
+    destination: str
+    messages: List[Any]
+    image: Optional[bytes]
+    filename: Optional[str]
+    coalesce_key: Optional[str]
+    attempts: int
+
+
+def encode_messages(messages: List[Any]) -> str:
+    """メッセージ (dict / LINE v3 オブジェクト) を送信箱に保存できる JSON にする"""
+    encoded = []
+    for msg in messages:
+        if isinstance(msg, Message):
+            encoded.append({"sdk": msg.to_dict()})
+        elif isinstance(msg, dict):
+            encoded.append(msg)
+        else:
+            # Discord では本文として表示し、LINE では従来どおり送らない
+            encoded.append({"type": "unknown", "text": notification_service.message_text(msg)})
+    return json.dumps(encoded, ensure_ascii=False)
+
+
+def decode_messages(data: str) -> List[Any]:
+    return [Message.from_dict(m["sdk"]) if isinstance(m, dict) and "sdk" in m else m for m in json.loads(data)]
+
+
+def _plain_text(msg: Any) -> Optional[str]:
+    """テキストメッセージなら本文を、それ以外は None を返す (LINE でまとめられるかの判定)"""
+    if isinstance(msg, TextMessage):
+        return msg.text
+    if isinstance(msg, dict) and msg.get("type") == "text":
+        return msg.get("text", "")
+    return None
+
+
+class NotificationDispatcher:
+    """送信箱からの配送ワーカー。db_path を省略した場合は config.SQLITE_DB_PATH を使う"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        line_api_factory: Optional[Callable[[], Any]] = None,
+        clock: Callable[[], float] = time.time,
+        autostart: bool = True,
+        coalesce_window_sec: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_sec: Optional[float] = None,
+        retry_max_sec: Optional[float] = None,
+        poll_interval_sec: Optional[float] = None,
+        quota_check_sec: Optional[float] = None,
+        dead_letter_retention_days: Optional[int] = None,
+    ) -> None:
+        self.db_path = db_path
+        self.session = session or requests.Session()
+        self.clock = clock
+        self.autostart = autostart
+        self.coalesce_window_sec = config.NOTIFY_COALESCE_WINDOW_SEC if coalesce_window_sec is None else coalesce_window_sec
+        self.max_attempts = config.NOTIFY_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.retry_base_sec = config.NOTIFY_RETRY_BASE_SEC if retry_base_sec is None else retry_base_sec
+        self.retry_max_sec = config.NOTIFY_RETRY_MAX_SEC if retry_max_sec is None else retry_max_sec
+        self.poll_interval_sec = config.NOTIFY_POLL_INTERVAL_SEC if poll_interval_sec is None else poll_interval_sec
+        self.quota_check_sec = config.NOTIFY_LINE_QUOTA_CHECK_SEC if quota_check_sec is None else quota_check_sec
+        self.dead_letter_retention_days = (
+            config.NOTIFY_DEAD_LETTER_RETENTION_DAYS if dead_letter_retention_days is None else dead_letter_retention_days
+        )
+
+        self._line_api_factory = line_api_factory
+        self._line_client: Optional[ApiClient] = None
+        self._line_api: Any = None
+        # LINE の残り送信数 (None は上限なし・不明) と確認時刻
+        self._line_remaining: Optional[int] = None
+        self._line_quota_checked_at: Optional[float] = None
+        # 送信先 (Discord は Webhook URL、LINE は "line") ごとの送信停止期限
+        self._blocked_until: Dict[str, float] = {}
+        # 配達不能キューを最後に整理した時刻
+        self._pruned_at: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # 取り出し〜結果の反映は1つずつ行う (ワーカーと終了時の送り切りが重ならないように)
+        self._process_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.stats: Dict[str, int] = {
+            "enqueued": 0, "sent": 0, "coalesced": 0, "retried": 0, "rate_limited": 0, "dead": 0,
+        }
+
+    # --- 受付 ---
+    def enqueue_push(
+        self,
+        user_id: str,
+        messages: List[Any],
+        image_data: Optional[bytes] = None,
+        target: str = "both",
+        channel: str = "notify",
+        filename: str = "snapshot.jpg",
+        coalesce_key: Optional[str] = None,
+        cursor: Optional[Any] = None,
+    ) -> bool:
+        """
+        send_push と同じ引数で通知を送信箱へ積む。送信先が未設定のため積めなかった宛先がある場合は False。
+        LINE へ送れない場合は、従来どおり Discord のエラーチャンネルへの通知を代わりに積む。
+        """
+        items: List[Tuple[str, str, List[Any], Optional[bytes]]] = []
+        accepted = True
+
+        if target in ["discord", "both"]:
+            if notification_service.discord_webhook_url(channel):
+                items.append(("discord", channel, list(messages), image_data))
+            else:
+                logger.warning("Discordへの通知に失敗しました (Webhook URL が未設定です)")
+                accepted = False
+
+        if target in ["line", "both"]:
+            # LINE には画像を送らない (Discord を見るよう注記する)
+            line_msgs = list(messages)
+            if image_data:
+                line_msgs.append(TextMessage(text=LINE_IMAGE_NOTE))
+            if notification_service.line_configuration and user_id and notification_service.to_line_messages(line_msgs):
+                items.append(("line", user_id, line_msgs, None))
+            else:
+                logger.error("LINE送信失敗。Discordへフォールバック通知を行います。")
+                if notification_service.discord_webhook_url("error"):
+                    items.append(("discord", "error", [{"type": "text", "text": "⚠️ LINE送信失敗: (詳細ログ確認)"}], None))
+                accepted = False
+
+        if items:
+            if cursor is not None:
+                self._insert(cursor, items, filename, coalesce_key)
+            else:
+                with get_db_cursor(commit=True, db_path=self.db_path) as cur:
+                    self._insert(cur, items, filename, coalesce_key)
+            with self._lock:
+                self.stats["enqueued"] += len(items)
+                self._wakeup.notify()
+            if self.autostart:
+                self.start()
+        return accepted
+
+    def _insert(self, cur: Any, items: List[Tuple[str, str, List[Any], Optional[bytes]]],
+                filename: Optional[str], coalesce_key: Optional[str]) -> None:
+        now = self.clock()
+        created_at = get_now_iso()
+        for target, destination, messages, image in items:
+            # 画像付きはまとめない
+            key = coalesce_key if image is None else None
+            due = now + self.coalesce_window_sec if key else now
+            cur.execute(
+                "INSERT INTO notification_outbox "
+                "(target, destination, messages, image, filename, coalesce_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (target, destination, encode_messages(messages), image, filename, key, due, created_at),
+            )
+
+    # --- 配送 ---
+    def process_due(self, flush: bool = False) -> int:
+        """
+        送信時刻に達した通知を送り、処理した行数を返す。
+        flush=True では、まとめ待ちの通知も待たずに送る (再試行・429 の待ち時間は守る)。
+        """
+        with self._process_lock:
+            now = self.clock()
+            items = self._claim(now, flush)
+            for group in self._group(items):
+                self._settle(group, self._deliver(group, now), now)
+            return len(items)
+
+    def _claim(self, now: float, flush: bool) -> List[OutboxItem]:
+        waiting = "OR (coalesce_key IS NOT NULL AND attempts = 0 AND last_error IS NULL)" if flush else ""
+        claimed: List[OutboxItem] = []
+        with get_db_cursor(commit=True, db_path=self.db_path) as cur:
+            rows = cur.execute(
+                f"SELECT * FROM notification_outbox WHERE (next_attempt_at <= ? {waiting}) AND locked_until <= ? "
+                "ORDER BY id LIMIT ?",
+                (now, now, CLAIM_BATCH),
+            ).fetchall()
+            rows = list(rows)
+            # まとめ送信: 同じキーの未送信分は、まとめ待ちの途中でも一緒に取り出す
+            seen = {row["id"] for row in rows}
+            for key in {(r["target"], r["destination"], r["coalesce_key"]) for r in rows if r["coalesce_key"]}:
+                for row in cur.execute(
+                    "SELECT * FROM notification_outbox WHERE target = ? AND destination = ? AND coalesce_key = ? "
+                    "AND attempts = 0 AND last_error IS NULL AND locked_until <= ? ORDER BY id",
+                    (*key, now),
+                ).fetchall():
+                    if row["id"] not in seen:
+                        seen.add(row["id"])
+                        rows.append(row)
+
+            for row in rows:
+                cur.execute(
+                    "UPDATE notification_outbox SET locked_until = ? WHERE id = ? AND locked_until <= ?",
+                    (now + LEASE_SEC, row["id"], now),
+                )
+                if cur.rowcount == 1:
+                    claimed.append(OutboxItem(
+                        id=row["id"], target=row["target"], destination=row["destination"],
+                        messages=decode_messages(row["messages"]), image=row["image"], filename=row["filename"],
+                        coalesce_key=row["coalesce_key"], attempts=row["attempts"],
+                    ))
+        return claimed
+
+    def _group(self, items: List[OutboxItem]) -> List[List[OutboxItem]]:
+        groups: Dict[Any, List[OutboxItem]] = {}
+        for item in items:
+            key = (item.target, item.destination, item.coalesce_key) if item.coalesce_key else item.id
+            groups.setdefault(key, []).append(item)
+        result = []
+        for group in groups.values():
+            # LINE はテキストだけの通知をまとめる。それ以外を含む場合は1件ずつ送る
+            if len(group) > 1 and group[0].target == "line" and any(
+                _plain_text(m) is None for item in group for m in item.messages
+            ):
+                result.extend([item] for item in group)
+            else:
+                result.append(sorted(group, key=lambda i: i.id))
+        return result
+
+    def _deliver(self, group: List[OutboxItem], now: float) -> Outcome:
+        first = group[0]
+        block_key = notification_service.discord_webhook_url(first.destination) if first.target == "discord" else "line"
+        blocked = self._blocked_until.get(block_key or "", 0.0)
+        if blocked > now:
+            return Outcome(RATE_LIMITED, "rate limited", blocked - now)
+        try:
+            if first.target == "discord":
+                return self._deliver_discord(group, now)
+            return self._deliver_line(group, now)
+        except Exception as e:
+            return Outcome(RETRY, f"{type(e).__name__}: {e}")
+
+    def _deliver_discord(self, group: List[OutboxItem], now: float) -> Outcome:
+        first = group[0]
+        url = notification_service.discord_webhook_url(first.destination)
+        if not url:
+            return Outcome(FAILED, f"Discord Webhook URL が未設定です ({first.destination})")
+
+        if len(group) == 1:
+            content = "".join(f"{notification_service.message_text(m)}\n\n" for m in first.messages)
+            if first.image:
+                files = {"file": (first.filename or "snapshot.jpg", first.image)}
+                res = self.session.post(url, files=files, data={"content": content}, timeout=60)
+            else:
+                res = self.session.post(url, json={"content": content}, timeout=10)
+        else:
+            texts = ["\n".join(notification_service.message_text(m) for m in item.messages) for item in group]
+            embed = {
+                "title": f"🔔 {len(group)}件の通知",
+                "description": "\n\n".join(texts)[:DISCORD_EMBED_DESCRIPTION_LIMIT],
+            }
+            res = self.session.post(url, json={"embeds": [embed]}, timeout=10)
+        return self._discord_outcome(res, url, now)
+
+    def _discord_outcome(self, res: requests.Response, url: str, now: float) -> Outcome:
+        if res.status_code in [200, 204]:
+            # 残り0回なら、リセットまで次の送信を控える (429 を受けてから待つより先に止める)
+            if res.headers.get("X-RateLimit-Remaining") == "0":
+                reset_after = _float_or_none(res.headers.get("X-RateLimit-Reset-After"))
+                if reset_after:
+                    self._blocked_until[url] = now + reset_after
+            return Outcome(SENT)
+        if res.status_code == 429:
+            retry_after = _float_or_none(res.headers.get("Retry-After"))
+            if retry_after is None:
+                try:
+                    retry_after = _float_or_none(res.json().get("retry_after"))
+                except ValueError:
+                    retry_after = None
+            retry_after = DEFAULT_RETRY_AFTER_SEC if retry_after is None else retry_after
+            self._blocked_until[url] = now + retry_after
+            return Outcome(RATE_LIMITED, f"Discord 429 (retry after {retry_after}s)", retry_after)
+        error = f"Discord API エラー: {res.status_code} - {res.text[:200]}"
+        return Outcome(RETRY if res.status_code >= 500 else FAILED, error)
+
+    def _deliver_line(self, group: List[OutboxItem], now: float) -> Outcome:
+        remaining = self._line_quota_remaining(now)
+        if remaining is not None and remaining <= 0:
+            return Outcome(FAILED, "LINE の月間送信数の上限に達しています")
+
+        if len(group) == 1:
+            sdk_messages = notification_service.to_line_messages(group[0].messages)
+        else:
+            texts = ["\n".join(_plain_text(m) for m in item.messages) for item in group]
+            sdk_messages = [TextMessage(text="\n\n".join(texts)[:LINE_TEXT_LIMIT])]
+        if not sdk_messages:
+            return Outcome(FAILED, "LINE送信対象のメッセージがありません")
+
+        try:
+            self._get_line_api().push_message(PushMessageRequest(to=group[0].destination, messages=sdk_messages))
+        except ApiException as e:
+            if e.status == 429:
+                body = e.body.decode("utf-8", "replace") if isinstance(e.body, bytes) else str(e.body or "")
+                if "monthly limit" in body:
+                    self._line_remaining, self._line_quota_checked_at = 0, now
+                    return Outcome(FAILED, "LINE の月間送信数の上限に達しています")
+                retry_after = _float_or_none((e.headers or {}).get("Retry-After")) or DEFAULT_RETRY_AFTER_SEC
+                self._blocked_until["line"] = now + retry_after
+                return Outcome(RATE_LIMITED, f"LINE 429 (retry after {retry_after}s)", retry_after)
+            error = f"LINE Push Error: {e.status} {e.reason}"
+            return Outcome(RETRY if e.status is None or e.status >= 500 else FAILED, error)
+        if self._line_remaining is not None:
+            self._line_remaining -= 1
+        return Outcome(SENT)
+
+    def _get_line_api(self) -> Any:
+        """LINE の MessagingApi (接続プールを持つ ApiClient ごと使い回す)"""
+        if self._line_api is None:
+            if self._line_api_factory is not None:
+                self._line_api = self._line_api_factory()
+            else:
+                self._line_client = ApiClient(notification_service.line_configuration)
+                self._line_api = MessagingApi(self._line_client)
+        return self._line_api
+
+    def _line_quota_remaining(self, now: float) -> Optional[int]:
+        """今月の残り送信数。上限なし・確認できない場合は None (送信は試みる)"""
+        if self._line_quota_checked_at is not None and now - self._line_quota_checked_at < self.quota_check_sec:
+            return self._line_remaining
+        self._line_quota_checked_at = now
+        try:
+            api = self._get_line_api()
+            quota = api.get_message_quota()
+            if getattr(quota.type, "value", quota.type) != "limited" or quota.value is None:
+                self._line_remaining = None
+            else:
+                used = api.get_message_quota_consumption().total_usage
+                self._line_remaining = int(quota.value) - int(used)
+        except Exception as e:
+            logger.warning(f"⚠️ LINE の送信数を確認できませんでした: {e}")
+            self._line_remaining = None
+        return self._line_remaining
+
+    # --- 結果の反映 ---
+    def _settle(self, group: List[OutboxItem], outcome: Outcome, now: float) -> None:
+        ids = [item.id for item in group]
+        marks = ", ".join("?" * len(ids))
+        with get_db_cursor(commit=True, db_path=self.db_path) as cur:
+            if outcome.status == SENT:
+                cur.execute(f"DELETE FROM notification_outbox WHERE id IN ({marks})", ids)
+                with self._lock:
+                    self.stats["sent"] += 1
+                    self.stats["coalesced"] += len(group) - 1
+                return
+
+            if outcome.status == RATE_LIMITED:
+                cur.execute(
+                    f"UPDATE notification_outbox SET next_attempt_at = ?, locked_until = 0, last_error = ? "
+                    f"WHERE id IN ({marks})",
+                    (now + outcome.retry_after, outcome.error, *ids),
+                )
+                with self._lock:
+                    self.stats["rate_limited"] += 1
+                return
+
+            dead = []
+            for item in group:
+                attempts = item.attempts + 1
+                if outcome.status == RETRY and attempts < self.max_attempts:
+                    delay = min(self.retry_max_sec, self.retry_base_sec * 2 ** (attempts - 1))
+                    cur.execute(
+                        "UPDATE notification_outbox SET attempts = ?, next_attempt_at = ?, locked_until = 0, "
+                        "last_error = ? WHERE id = ?",
+                        (attempts, now + delay, outcome.error, item.id),
+                    )
+                    with self._lock:
+                        self.stats["retried"] += 1
+                else:
+                    dead.append(item)
+                    cur.execute(
+                        "INSERT INTO notification_dead_letters (id, target, destination, messages, image, filename, "
+                        "coalesce_key, attempts, last_error, created_at, failed_at) "
+                        "SELECT id, target, destination, messages, image, filename, coalesce_key, ?, ?, created_at, ? "
+                        "FROM notification_outbox WHERE id = ?",
+                        (attempts, outcome.error, get_now_iso(), item.id),
+                    )
+                    cur.execute("DELETE FROM notification_outbox WHERE id = ?", (item.id,))
+            if dead:
+                logger.error(f"❌ 通知を送れませんでした ({group[0].target}, {len(dead)}件): {outcome.error}")
+                with self._lock:
+                    self.stats["dead"] += len(dead)
+                if group[0].target == "line" and notification_service.discord_webhook_url("error"):
+                    # LINE 失敗時は Discord のエラーチャンネルへ知らせる (本文も添える)
+                    texts = "\n".join(notification_service.message_text(m) for item in dead for m in item.messages
+                                      if notification_service.message_text(m) != LINE_IMAGE_NOTE)
+                    notice = {"type": "text", "text": f"⚠️ LINE送信失敗: {outcome.error}\n{texts}"}
+                    self._insert(cur, [("discord", "error", [notice], None)], None, None)
+                elif (group[0].target == "discord" and group[0].destination != "error"
+                      and notification_service.discord_webhook_url("error")):
+                    # Discord 失敗時も (エラーチャンネル自体の失敗でなければ) エラーチャンネルへ知らせる。
+                    # 動画等の添付は送らず、ファイル名だけ添える
+                    texts = "\n".join(notification_service.message_text(m) for item in dead for m in item.messages)
+                    files = ", ".join(item.filename for item in dead if item.image is not None and item.filename)
+                    attached = f"\n添付: {files}" if files else ""
+                    notice = {"type": "text", "text": f"⚠️ Discord送信失敗 ({group[0].destination}): "
+                                                      f"{outcome.error}\n{texts}{attached}"}
+                    self._insert(cur, [("discord", "error", [notice], None)], None, None)
+
+    # --- 配達不能キューの整理 ---
+    def prune_dead_letters(self, now: Optional[datetime] = None) -> int:
+        """failed_at が保持日数より古い配達不能の行を削除し、削除件数を返す"""
+        if self.dead_letter_retention_days <= 0:
+            return 0
+        now = now or datetime.now(pytz.timezone("Asia/Tokyo"))
+        threshold = (now - timedelta(days=self.dead_letter_retention_days)).isoformat()
+        try:
+            with get_db_cursor(commit=True, db_path=self.db_path) as cur:
+                cur.execute("DELETE FROM notification_dead_letters WHERE failed_at < ?", (threshold,))
+                return cur.rowcount
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to prune notification_dead_letters: {e}")
+            return 0
+
+    def _maybe_prune(self) -> None:
+        now = self.clock()
+        if self._pruned_at is not None and now - self._pruned_at < DEAD_LETTER_PRUNE_INTERVAL_SEC:
+            return
+        self._pruned_at = now
+        removed = self.prune_dead_letters()
+        if removed:
+            logger.info(f"🧹 配達不能の通知を{removed}件削除しました (保持{self.dead_letter_retention_days}日)")
+
+    # --- バックグラウンドスレッド ---
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+            self._maybe_prune()
+            try:
+                handled = self.process_due()
+            except Exception as e:
+                logger.error(f"❌ Notification dispatch error: {e}")
+                handled = 0
+            if handled == 0:
+                with self._lock:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=self.poll_interval_sec)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """バックグラウンドスレッドを止め、timeout 秒まで送信箱の残り (まとめ待ちを含む) を送る"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with self._lock:
+                self._stopping = True
+                self._wakeup.notify()
+            thread.join(timeout)
+        self._thread = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if self.process_due(flush=True) == 0:
+                    break
+            except Exception as e:
+                logger.error(f"❌ Notification drain error: {e}")
+                break
+
+
+def _float_or_none(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_default_dispatcher = NotificationDispatcher()
+
+
+def enqueue_push(user_id: str, messages: List[Any], **kwargs: Any) -> bool:
+    return _default_dispatcher.enqueue_push(user_id, messages, **kwargs)
+
+
+def start() -> None:
+    _default_dispatcher.start()
+
+
+def shutdown(timeout: float = 10.0) -> None:
+    _default_dispatcher.shutdown(timeout)
+
+
+def get_stats() -> Dict[str, int]:
+    with _default_dispatcher._lock:
+        return dict(_default_dispatcher.stats)
+
+
+@atexit.register
+def _drain_on_exit() -> None:
+    # cron 等の短命プロセスでも、積んだ通知を送ってから終了する
+    if _default_dispatcher.stats["enqueued"] == 0 and _default_dispatcher._thread is None:
+        return
+    try:
+        _default_dispatcher.shutdown(timeout=config.NOTIFY_DRAIN_ON_EXIT_SEC)
+    except Exception:
+        pass
@@ -27,30 +27,52 @@ line_configuration: Optional[Configuration] = None
 if config.LINE_CHANNEL_ACCESS_TOKEN:
     line_configuration = Configuration(access_token=config.LINE_CHANNEL_ACCESS_TOKEN)
 
-def _send_discord_webhook(messages: List[Any], image_data: Optional[bytes] = None, channel: str = "notify", filename: str = "snapshot.jpg") -> bool:
-    """DiscordへのWebhook送信"""
+def discord_webhook_url(channel: str = "notify") -> Optional[str]:
+    """通知チャンネル名 (notify / error / report) に対応する Discord Webhook URL"""
     if channel == "error":
-        url = config.DISCORD_WEBHOOK_ERROR
+        return config.DISCORD_WEBHOOK_ERROR
     elif channel == "report":
-        url = config.DISCORD_WEBHOOK_REPORT
-    else:
-        url = config.DISCORD_WEBHOOK_NOTIFY or config.DISCORD_WEBHOOK_URL
-    
+        return config.DISCORD_WEBHOOK_REPORT
+    return config.DISCORD_WEBHOOK_NOTIFY or config.DISCORD_WEBHOOK_URL
+
+def message_text(msg: Any) -> str:
+    """Discord 向けにメッセージ (dict / LINE v3 オブジェクト) の本文を取り出す"""
+    # v3オブジェクトの場合は text 属性などを取得
+    if hasattr(msg, "text"):
+        return msg.text
+    elif hasattr(msg, "alt_text"):
+        return msg.alt_text
+    elif isinstance(msg, dict):
+        return msg.get("text") or msg.get("altText") or "（画像またはスタンプ）"
+    return "（メッセージ）"
+
+def to_line_messages(messages: List[Any]) -> List[Message]:
+    """LINE v3 のメッセージへ変換する (dict はテキストのみ対応、それ以外は除外)"""
+    sdk_messages: List[Message] = []
+    for msg in messages:
+        # A. 既に v3 オブジェクトの場合
+        if isinstance(msg, Message):
+            sdk_messages.append(msg)
+
+        # B. 辞書型の場合 (互換性維持)
+        elif isinstance(msg, dict):
+            msg_type = msg.get("type")
+            if msg_type == "text":
+                sdk_messages.append(TextMessage(text=msg.get("text", "")))
+            elif msg_type == "flex":
+                # FlexMessageオブジェクトへの変換は複雑なため、
+                # 可能な限り呼び出し元でオブジェクト化することを推奨
+                pass
+            # 必要に応じて ImageMessage 等も追加
+    return sdk_messages
+
+def _send_discord_webhook(messages: List[Any], image_data: Optional[bytes] = None, channel: str = "notify", filename: str = "snapshot.jpg") -> bool:
+    """DiscordへのWebhook送信"""
+    url = discord_webhook_url(channel)
     if not url:
         return False
     
-    text_content = ""
-    for msg in messages:
-        # v3オブジェクトの場合は text 属性などを取得
-        if hasattr(msg, "text"):
-            text = msg.text
-        elif hasattr(msg, "alt_text"):
-            text = msg.alt_text
-        elif isinstance(msg, dict):
-            text = msg.get("text") or msg.get("altText") or "（画像またはスタンプ）"
-        else:
-            text = "（メッセージ）"
-        text_content += f"{text}\n\n"
+    text_content = "".join(f"{message_text(msg)}\n\n" for msg in messages)
     
     try:
         if image_data:
@@ -75,25 +97,8 @@ def _send_line_push(user_id: str, messages: List[Any]) -> bool:
     if not line_configuration:
         return False
     
-    sdk_messages: List[Message] = []
-    
     try:
-        for msg in messages:
-            # A. 既に v3 オブジェクトの場合
-            if isinstance(msg, Message): 
-                sdk_messages.append(msg)
-            
-            # B. 辞書型の場合 (互換性維持)
-            elif isinstance(msg, dict):
-                msg_type = msg.get("type")
-                if msg_type == "text":
-                    sdk_messages.append(TextMessage(text=msg.get("text", "")))
-                elif msg_type == "flex":
-                    # FlexMessageオブジェクトへの変換は複雑なため、
-                    # 可能な限り呼び出し元でオブジェクト化することを推奨
-                    pass 
-                # 必要に応じて ImageMessage 等も追加
-            
+        sdk_messages = to_line_messages(messages)
         if not sdk_messages:
             logger.warning("LINE送信対象のメッセージがありません")
             return False
@@ -113,8 +118,37 @@ def _send_line_push(user_id: str, messages: List[Any]) -> bool:
         logger.error(f"LINE Push Error: {e}")
         return False
 
-def send_push(user_id: str, messages: List[Any], image_data: Optional[bytes] = None, target: str = "both", channel: str = "notify", filename: str = "snapshot.jpg") -> bool:
-    """統合プッシュ通知関数"""
+def send_push(
+    user_id: str,
+    messages: List[Any],
+    image_data: Optional[bytes] = None,
+    target: str = "both",
+    channel: str = "notify",
+    filename: str = "snapshot.jpg",
+    coalesce_key: Optional[str] = None,
+    cursor: Optional[Any] = None,
+) -> bool:
+    """
+    統合プッシュ通知関数。送信箱 (services/notification_dispatcher.py) へ積むだけで、
+    実際の送信はバックグラウンドのワーカーが行う。戻り値は「受け付けたかどうか」。
+
+    - coalesce_key: 同じキーの通知を NOTIFY_COALESCE_WINDOW_SEC 秒の間まとめて1通にする (画像付きは対象外)
+    - cursor: DBトランザクション中の呼び出し元はそのカーソルを渡す。送信箱への追加が同じトランザクションに入り、
+      ロック待ちにならず、ロールバック時は通知も取り消される
+    送信箱が使えない場合 (マイグレーション未適用等) は従来どおりその場で送信する (send_push_now)。
+    """
+    from services import notification_dispatcher
+    try:
+        return notification_dispatcher.enqueue_push(
+            user_id, messages, image_data=image_data, target=target, channel=channel,
+            filename=filename, coalesce_key=coalesce_key, cursor=cursor,
+        )
+    except Exception as e:
+        logger.error(f"通知の送信箱への追加に失敗しました。直接送信します: {e}")
+        return send_push_now(user_id, messages, image_data, target, channel, filename)
+
+def send_push_now(user_id: str, messages: List[Any], image_data: Optional[bytes] = None, target: str = "both", channel: str = "notify", filename: str = "snapshot.jpg") -> bool:
+    """送信箱を通さずにその場で送信する (送信完了まで戻らない)"""
     success = True
     
     # 1. Discord送信
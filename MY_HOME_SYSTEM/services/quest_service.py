@@ -1,10 +1,15 @@
 import datetime
+import copy
+import functools
+import hashlib
 import importlib
+import json
 import random
 import math
 import threading
+import time
 import pytz
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
 from fastapi import HTTPException
 import common
@@ -77,6 +82,106 @@ def _get_user_balance_lock(user_id: str) -> threading.Lock:
         return lock
 
 
+# ==========================================
+# View Cache (get_all_view_data)
+# ==========================================
+# /api/quest/data はSPAから10秒間隔でポーリングされ、そのたびに全ユーザー・全クエスト・
+# 全報酬の再読込、クエストごとのブースト計算、30日分の履歴照合を行っていた。
+# 組み立て済みの表示データ(とJSONシリアライズ結果・ETag)をキャッシュし、
+# クエスト・報酬・所持品・ユーザー・マスタを書き換える操作のたびに世代番号を進めて
+# 無効化する。表示データは現在時刻(時間帯・曜日・当日の完了判定)にも依存するため、
+# JSTの「分」とDBパスもキャッシュキーに含める。別プロセス(reset_game.py 等)からの
+# 更新は検知できないため、config.QUEST_VIEW_CACHE_TTL_SEC を鮮度の上限とする。
+
+class ViewSnapshot:
+    """組み立て済みの表示データと、そのJSON表現・ETag (読み取り専用として扱う)"""
+    __slots__ = ("data", "body", "etag", "generation", "key", "built_at")
+
+    def __init__(self, data: Dict[str, Any], generation: int, key: Tuple[str, str]) -> None:
+        self.data = data
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.generation = generation
+        self.key = key
+        self.built_at = time.monotonic()
+
+
+class QuestViewCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # 再構築は1つずつ行い、同時ポーリング時に同じ集計を重複実行しない
+        self._build_lock = threading.Lock()
+        self._generation = 0
+        self._snapshot: Optional[ViewSnapshot] = None
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["generation"] = self._generation
+        return snapshot
+
+    def _current_key(self) -> Tuple[str, str]:
+        now = datetime.datetime.now(pytz.timezone("Asia/Tokyo"))
+        return (config.SQLITE_DB_PATH, now.strftime("%Y-%m-%d %H:%M"))
+
+    def _fresh(self, snapshot: Optional[ViewSnapshot], key: Tuple[str, str]) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.generation == self._generation
+            and snapshot.key == key
+            and time.monotonic() - snapshot.built_at < config.QUEST_VIEW_CACHE_TTL_SEC
+        )
+
+    def get(self, builder: Callable[[], Dict[str, Any]]) -> ViewSnapshot:
+        key = self._current_key()
+        with self._lock:
+            if self._fresh(self._snapshot, key):
+                self._stats["hits"] += 1
+                return self._snapshot
+
+        with self._build_lock:
+            with self._lock:
+                # 待っている間に他のスレッドが再構築済みであればそれを使う
+                if self._fresh(self._snapshot, key):
+                    self._stats["hits"] += 1
+                    return self._snapshot
+                self._stats["misses"] += 1
+                # DBを読む前の世代を記録する。組み立て中に更新が入った場合は
+                # 世代が一致しなくなるため、次回の取得で再構築される。
+                generation = self._generation
+
+            snapshot = ViewSnapshot(builder(), generation, key)
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = snapshot
+            return snapshot
+
+
+_view_cache = QuestViewCache()
+
+
+def invalidate_view_cache() -> None:
+    """表示データキャッシュを無効化する (本モジュール外からDBを書き換えた場合に使用)"""
+    _view_cache.invalidate()
+
+
+def _invalidates_view(func: Callable) -> Callable:
+    """クエスト・報酬・所持品・ユーザー情報を書き換えるメソッドに付与する (コミット後に無効化)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _view_cache.invalidate()
+    return wrapper
+
+
 # ==========================================
 # Service Classes
 # ==========================================
@@ -124,6 +229,7 @@ class UserService:
             })
         return formatted
     
+    @_invalidates_view
     def update_avatar(self, user_id: str, avatar_url: str) -> Dict[str, Any]:
         with common.get_db_cursor(commit=True) as cur:
             user = cur.execute("SELECT * FROM quest_users WHERE user_id = ?", (user_id,)).fetchone()
@@ -137,39 +243,123 @@ class UserService:
             return {"status": "updated", "avatar": avatar_url}
 
 
-class QuestService:
-    def is_within_reset_period(self, completed_at_str: str, reset_period: str) -> bool:
-        if not completed_at_str: return False
-        
-        import datetime
-        # 外部ライブラリを使わず、標準機能でJST（+9時間）を定義
-        JST = datetime.timezone(datetime.timedelta(hours=9), 'JST')
-        now_jst = datetime.datetime.now(JST)
-        today_jst = now_jst.date()
-        
+# ==========================================
+# Completion Stats (Set-based)
+# ==========================================
+# completed_at の保存規約 (common.get_now_iso) はJST。
+# tzinfo の無いレガシーデータもJSTで記録されているとみなす (M-1-4)
+JST = datetime.timezone(datetime.timedelta(hours=9), 'JST')
+
+
+def parse_completed_date(completed_at: Any) -> Optional[datetime.date]:
+    """completed_at (ISO文字列 / datetime / date) をJSTの日付へ変換する。解釈できなければ None"""
+    if not completed_at:
+        return None
+    if isinstance(completed_at, datetime.datetime):
+        dt = completed_at if completed_at.tzinfo else completed_at.replace(tzinfo=JST)
+        return dt.astimezone(JST).date()
+    if isinstance(completed_at, datetime.date):
+        return completed_at
+    try:
+        return parse_completed_date(datetime.datetime.fromisoformat(completed_at))
+    except Exception:
         try:
-            # DBの文字列をdatetimeオブジェクトへ変換
-            dt = datetime.datetime.fromisoformat(completed_at_str)
-            # M-1-4: タイムゾーン情報がない場合、以前はUTCとして記録されている
-            # とみなしていたが、保存規約(common.get_now_iso)は常にJSTで記録する
-            # ため、tzinfo無しの古いデータも実際はJSTで記録されている。
-            # このファイル内の他の日時比較(スパムチェック等)もJSTとして扱っており、
-            # UTCとみなす本実装だけが矛盾して9時間ズレていた。
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=JST)
-
-            completed_date = dt.astimezone(JST).date()
+            return datetime.datetime.strptime(completed_at.split(' ')[0], "%Y-%m-%d").date()
         except Exception:
-            try:
-                completed_date = datetime.datetime.strptime(completed_at_str.split(' ')[0], "%Y-%m-%d").date()
-            except:
-                return False
+            return None
+
+
+# (user_id, quest_id) ごとの承認済み履歴の集計を1回の GROUP BY で求める。
+# 以前は calculate_quest_boost がクエストごとに直近履歴を1件ずつ問い合わせ、
+# 表示データの組み立てでも履歴全体をクエストごとに走査していた。
+# idx_quest_history_user_quest_completed (user_id, quest_id, completed_at, status) だけで
+# 完結するため、テーブル本体は読まない。
+# ※ROW_NUMBER() 等のウィンドウ関数でも書けるが、全履歴に対するソートが発生し
+#   1万件で10倍以上遅かったため集約関数で求めている。
+# :today はブースト判定と同じくサーバーのローカル日付 (completed_at の日付部分と比較する)
+_COMPLETION_STATS_SQL = """
+    SELECT s.user_id, s.quest_id, s.last_completed_at, s.today_count,
+           CAST(julianday(:today) - julianday(substr(s.last_completed_at, 1, 10)) AS INTEGER) AS days_since,
+           COALESCE(q.quest_type = 'daily' AND COALESCE(q.day_of_week, '') = ''
+                    AND julianday(:today) - julianday(substr(s.last_completed_at, 1, 10)) > 1, 0) AS boost_eligible
+    FROM (
+        SELECT user_id, quest_id,
+               MAX(completed_at) AS last_completed_at,
+               SUM(substr(completed_at, 1, 10) = :today) AS today_count
+        FROM quest_history
+        WHERE status = 'approved' {filters}
+        GROUP BY user_id, quest_id
+    ) s
+    LEFT JOIN quest_master q ON q.quest_id = s.quest_id
+"""
+
+
+def fetch_completion_stats(cur, since: Optional[str] = None, user_id: Optional[str] = None,
+                           quest_id: Optional[int] = None) -> Dict[Tuple[str, Any], Dict[str, Any]]:
+    """
+    承認済みのクエスト履歴を (user_id, quest_id) 単位で集計して返す。
+
+    値は以下のキーを持つ dict:
+      - last_completed_at: 最新の完了日時 (文字列)
+      - last_date: last_completed_at をJSTの日付へ変換したもの
+      - today_count: 本日(サーバーのローカル日付)の完了回数
+      - days_since: 最新の完了から本日までの日数 (解釈できない日付は None)
+      - boost_eligible: 連続未達成ボーナスの対象か (daily かつ曜日指定なし、かつ2日以上空いている)
+      - recent: since 以降の完了履歴行 (completed_at 降順)。since 未指定時は空
+    """
+    filters = ""
+    params: Dict[str, Any] = {"today": datetime.datetime.now().strftime("%Y-%m-%d")}
+    if user_id is not None:
+        filters += " AND user_id = :user_id"
+        params["user_id"] = user_id
+    if quest_id is not None:
+        filters += " AND quest_id = :quest_id"
+        params["quest_id"] = quest_id
+
+    stats: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    for row in cur.execute(_COMPLETION_STATS_SQL.format(filters=filters), params):
+        stats[(row['user_id'], row['quest_id'])] = {
+            "last_completed_at": row['last_completed_at'],
+            "last_date": parse_completed_date(row['last_completed_at']),
+            "today_count": row['today_count'] or 0,
+            "days_since": row['days_since'],
+            "boost_eligible": bool(row['boost_eligible']),
+            "recent": [],
+        }
+
+    if since is not None:
+        params["since"] = since
+        recent_rows = cur.execute(
+            f"SELECT * FROM quest_history WHERE status = 'approved' AND completed_at >= :since {filters} "
+            "ORDER BY completed_at DESC, id DESC",
+            params,
+        )
+        for row in recent_rows:
+            stat = stats.get((row['user_id'], row['quest_id']))
+            if stat is not None:
+                stat["recent"].append(dict(row))
+    return stats
+
+
+class QuestService:
+    def is_within_reset_period(self, completed_at: Any, reset_period: str,
+                               today: Optional[datetime.date] = None) -> bool:
+        """
+        completed_at が現在のリセット周期 (daily/weekly) 内かを判定する。
+        completed_at には ISO文字列のほか、事前に変換済みの datetime/date も渡せる。
+        多数の履歴を判定する場合は today (JSTの本日) も渡すと毎回の現在時刻取得を省ける。
+        """
+        completed_date = parse_completed_date(completed_at)
+        if completed_date is None:
+            return False
+        if today is None:
+            today = datetime.datetime.now(JST).date()
 
         if reset_period == 'daily':
-            return completed_date == today_jst
+            return completed_date == today
         elif reset_period == 'weekly':
             # 週の月曜日を基準にする
-            start_of_week = today_jst - datetime.timedelta(days=today_jst.weekday())
+            start_of_week = today - datetime.timedelta(days=today.weekday())
             return completed_date >= start_of_week
         
         return False
@@ -177,7 +367,12 @@ class QuestService:
     def __init__(self):
         self.user_service = UserService()
 
-    def calculate_quest_boost(self, cur, user_id: str, quest: Any) -> Dict[str, int]:
+    def calculate_quest_boost(self, cur, user_id: str, quest: Any,
+                              stats: Optional[Dict[Tuple[str, Any], Dict[str, Any]]] = None) -> Dict[str, int]:
+        """
+        連続未達成ボーナスを算出する。stats (fetch_completion_stats の結果) を渡した場合は
+        DBを参照せずにその集計から判定する。
+        """
         # 修正: 型ヒントを dict から Any (sqlite3.Row) へ変更し、実態に合わせる
         
         # 1. クエストタイプのチェック
@@ -192,39 +387,22 @@ class QuestService:
         if quest['day_of_week']: 
             return {"gold": 0, "exp": 0}
 
-        # --- 以下、既存ロジック ---
-        last_hist = cur.execute("""
-            SELECT completed_at FROM quest_history 
-            WHERE user_id = ? AND quest_id = ? AND status = 'approved'
-            ORDER BY completed_at DESC LIMIT 1
-        """, (user_id, quest['quest_id'])).fetchone()
+        if stats is None:
+            stats = fetch_completion_stats(cur, user_id=user_id, quest_id=quest['quest_id'])
+        stat = stats.get((user_id, quest['quest_id']))
 
-        now = datetime.datetime.now()
-        last_date = None
-
-        if last_hist:
-            try:
-                dt = datetime.datetime.fromisoformat(last_hist['completed_at'])
-                last_date = dt.date()
-            except Exception:
-                pass
-        
-        if not last_date:
+        # 直近の完了が無い・昨日以降に完了済みの場合はボーナスなし
+        if not stat or not stat['boost_eligible']:
             return {"gold": 0, "exp": 0}
 
-        today_date = now.date()
-        days_diff = (today_date - last_date).days
-
-        if days_diff <= 1:
-            return {"gold": 0, "exp": 0}
-        
-        missed_days = days_diff - 1
+        missed_days = stat['days_since'] - 1
         bonus_ratio = min(missed_days * 0.10, 1.0)
         bonus_gold = int(quest['gold_gain'] * bonus_ratio)
         bonus_exp = int(quest['exp_gain'] * bonus_ratio)
 
         return {"gold": bonus_gold, "exp": bonus_exp}
 
+    @_invalidates_view
     def process_complete_quest(self, user_id: str, quest_id: int) -> Dict[str, Any]:
         # 同一ユーザー・同一クエストへの同時多重リクエストによる二重加算を防ぐため、
         # DBトランザクションの外側でプロセス内ロックを取得して処理全体を直列化する。
@@ -350,6 +528,7 @@ class QuestService:
             "message": "親の承認待ちです（兄妹クエスト）"
         }
 
+    @_invalidates_view
     def process_approve_quest(self, approver_id: str, history_id: int) -> Dict[str, Any]:
         # ロック対象ユーザー(quest_historyの本来の完了者。gold/exp更新の対象)を
         # 先に特定してから、そのユーザー単位でロックを取得する。
@@ -441,6 +620,7 @@ class QuestService:
         t = threading.Thread(target=unlock_task, daemon=True)
         t.start()
     
+    @_invalidates_view
     def process_reject_quest(self, approver_id: str, history_id: int, reason: Optional[str] = None) -> Dict[str, str]:
         with common.get_db_cursor(commit=True) as cur:
             approver = cur.execute("SELECT role FROM quest_users WHERE user_id = ?", (approver_id,)).fetchone()
@@ -509,6 +689,7 @@ class QuestService:
             "earnedGold": earned_gold, "earnedExp": earned_exp, "earnedMedals": earned_medals
         }
 
+    @_invalidates_view
     def process_cancel_quest(self, user_id: str, history_id: int) -> Dict[str, str]:
         with _get_user_balance_lock(user_id):
             return self._process_cancel_quest_locked(user_id, history_id)
@@ -600,6 +781,7 @@ class QuestService:
     
 
 class ShopService:
+    @_invalidates_view
     def process_purchase_reward(self, user_id: str, reward_id: int) -> Dict[str, Any]:
         with common.get_db_cursor(commit=True) as cur:
             reward = cur.execute("SELECT * FROM reward_master WHERE reward_id = ?", (reward_id,)).fetchone()
@@ -652,6 +834,7 @@ class InventoryService:
             rows = cur.execute(sql, (user_id,)).fetchall()
             return [dict(row) for row in rows]
 
+    @_invalidates_view
     def use_item(self, user_id: str, inventory_id: int) -> Dict[str, str]:
         """
         アイテム使用を「申請」する。即時消費はせず status='pending' にし、
@@ -684,12 +867,14 @@ class InventoryService:
             msg = f"🎒 {item['user_name']}が「{item['title']}」の使用を申請しました。承認をお願いします。"
             notification_service.send_push(
                 user_id=config.LINE_USER_ID,
-                messages=[{"type": "text", "text": msg}]
+                messages=[{"type": "text", "text": msg}],
+                cursor=cur,  # 送信箱への追加をこのトランザクションに含める (ロック待ち・送信待ちをしない)
             )
             sound_manager.play("submit")
 
             return {"status": "pending", "message": "使用を申請しました！おうちの人の確認を待とう。"}
 
+    @_invalidates_view
     def consume_item(self, approver_id: str, inventory_id: int) -> Dict[str, str]:
         """親がアイテム使用申請を承認し、消費を確定する。"""
         with common.get_db_cursor(commit=True) as cur:
@@ -725,12 +910,14 @@ class InventoryService:
             msg = f"🎒 {item['user_name']}が「{item['title']}」を使用しました。"
             notification_service.send_push(
                 user_id=config.LINE_USER_ID,
-                messages=[{"type": "text", "text": msg}]
+                messages=[{"type": "text", "text": msg}],
+                cursor=cur,  # 送信箱への追加をこのトランザクションに含める (ロック待ち・送信待ちをしない)
             )
             sound_manager.play("quest_clear")
 
             return {"status": "consumed", "message": "承認しました"}
 
+    @_invalidates_view
     def cancel_usage(self, user_id: str, inventory_id: int) -> Dict[str, str]:
         with common.get_db_cursor(commit=True) as cur:
             item = cur.execute("SELECT * FROM user_inventory WHERE id = ?", (inventory_id,)).fetchone()
@@ -763,6 +950,7 @@ class GameSystem:
         self.user_service = UserService()
         self.shop_service = ShopService()
 
+    @_invalidates_view
     def sync_master_data(self) -> Dict[str, str]:
         logger.info("🔄 Starting Master Data Sync...")
         try:
@@ -891,7 +1079,21 @@ class GameSystem:
         logger.info("✅ Master data sync completed.")
         return {"status": "synced", "message": "Master data updated."}
 
+    def get_view_snapshot(self) -> ViewSnapshot:
+        """キャッシュ済みの表示データ(JSON・ETag付き)を返す。data は書き換えないこと"""
+        return _view_cache.get(self._build_view_data)
+
     def get_all_view_data(self) -> Dict[str, Any]:
+        # キャッシュを呼び出し元の書き換えから守るため、コピーを返す
+        return copy.deepcopy(self.get_view_snapshot().data)
+
+    def get_user_view(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """表示データキャッシュから1ユーザー分のステータスを返す"""
+        users = self.get_view_snapshot().data["users"]
+        user = next((u for u in users if u["user_id"] == user_id), None)
+        return dict(user) if user else None
+
+    def _build_view_data(self) -> Dict[str, Any]:
         with common.get_db_cursor() as cur:
             users = [dict(row) for row in cur.execute("SELECT * FROM quest_users")]
             for u in users:
@@ -902,9 +1104,27 @@ class GameSystem:
             all_quests = [dict(row) for row in cur.execute("SELECT * FROM quest_master")]
             filtered_quests = self.quest_service.filter_active_quests(all_quests)
 
+            # 周期判定はJSTの本日を基準にする
+            # ※SQLiteの date('now') はUTC基準のため、Python側でJSTの閾値文字列を生成する
+            try:
+                today_jst = datetime.datetime.now(pytz.timezone("Asia/Tokyo")).date()
+            except Exception as jst_err:
+                # 万が一のタイムゾーンエラーに対する防御型フォールバック（Safety Guard）
+                logger.error(f"❌ Failed to calculate JST time for analytics: {jst_err}")
+                today_jst = datetime.datetime.now().date()
+            # weekly の周期開始(月曜)より前の履歴は判定に不要。
+            # UTCオフセット付きで保存された行の日付ズレを考慮して1日余裕を持たせる
+            since = (today_jst - datetime.timedelta(days=today_jst.weekday() + 1)).strftime("%Y-%m-%d")
+
+            # 全ユーザー×全クエストの完了状況を1回のクエリで集計する
+            stats = fetch_completion_stats(cur, since=since)
+            stats_by_quest: Dict[Any, List[Dict[str, Any]]] = {}
+            for (_, q_id), stat in stats.items():
+                stats_by_quest.setdefault(q_id, []).append(stat)
+
             for q in filtered_quests:
                 if q['target_user'] and q['target_user'] != 'all':
-                    boost = self.quest_service.calculate_quest_boost(cur, q['target_user'], q)
+                    boost = self.quest_service.calculate_quest_boost(cur, q['target_user'], q, stats=stats)
                     q['bonus_gold'] = boost['gold']
                     q['bonus_exp'] = boost['exp']
                 else:
@@ -916,22 +1136,6 @@ class GameSystem:
                 r['icon'] = r['icon_key']
                 r['cost'] = r['cost_gold']
 
-            # 過去1ヶ月の完了履歴を取得して周期を判定する
-            # ※SQLiteの date('now') はUTC基準のため、Python側でJSTの閾値文字列を生成する
-            try:
-                now_jst = datetime.datetime.now(pytz.timezone("Asia/Tokyo"))
-                one_month_ago = (now_jst - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-            except Exception as jst_err:
-                # 万が一のタイムゾーンエラーに対する防御型フォールバック（Safety Guard）
-                logger.error(f"❌ Failed to calculate JST time for analytics: {jst_err}")
-                now_native = datetime.datetime.now()
-                one_month_ago = (now_native - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-
-            recent_completed = [dict(row) for row in cur.execute(
-                "SELECT * FROM quest_history WHERE status='approved' AND completed_at >= ? ORDER BY completed_at DESC",
-                (one_month_ago,)
-            )]
-
             pending = [dict(row) for row in cur.execute(
                 "SELECT * FROM quest_history WHERE status='pending' ORDER BY completed_at DESC"
             )]
@@ -939,40 +1143,40 @@ class GameSystem:
             # ユーザーマップ作成
             user_map = {u['user_id']: u['name'] for u in users}
 
+            first_pending_by_quest: Dict[Any, dict] = {}
+            for p in pending:
+                first_pending_by_quest.setdefault(p['quest_id'], p)
+
             valid_completed = []
 
             for q in filtered_quests:
                 q_id = q['quest_id']
                 reset_period = q.get('reset_period') or 'daily'
                 is_infinite = (q.get('quest_type') == 'infinite')
-                
-                if is_infinite:
-                    # 無限クエストは条件を満たす全履歴を追加
-                    for c in recent_completed:
-                        if c['quest_id'] == q_id:
-                            if self.quest_service.is_within_reset_period(c['completed_at'], reset_period):
-                                valid_completed.append(c)
-                else:
-                    # 通常クエストの場合、ユーザーごとに最新の履歴を評価する
-                    users_processed = set()
-                    for c in recent_completed:
-                        if c['quest_id'] == q_id:
-                            uid = c['user_id']
-                            if uid not in users_processed:
-                                if self.quest_service.is_within_reset_period(c['completed_at'], reset_period):
-                                    valid_completed.append(c)
-                                # 期間外であっても最新履歴を処理済みにし、同ユーザーの過去履歴検索を終了する
-                                users_processed.add(uid)
+                valid_for_quest = []
+
+                for stat in stats_by_quest.get(q_id, []):
+                    if is_infinite:
+                        # 無限クエストは周期内の全履歴を追加
+                        valid_for_quest.extend(
+                            c for c in stat['recent']
+                            if self.quest_service.is_within_reset_period(c['completed_at'], reset_period, today_jst)
+                        )
+                    elif stat['recent'] and self.quest_service.is_within_reset_period(stat['last_date'], reset_period, today_jst):
+                        # 通常クエストはユーザーごとに最新の履歴のみを評価する
+                        valid_for_quest.append(stat['recent'][0])
+                valid_for_quest.sort(key=lambda c: c['completed_at'] or '', reverse=True)
+                valid_completed.extend(valid_for_quest)
 
                 # 共有クエスト(複数人ターゲット)の他者対応状況を判定
                 target = q.get('target_user')
                 if target and target.startswith('role_'):
-                    completed_by_someone = next((c for c in valid_completed if c['quest_id'] == q_id), None)
+                    completed_by_someone = valid_for_quest[0] if valid_for_quest else None
                     if completed_by_someone:
                         q['is_shared_completed_by'] = completed_by_someone['user_id']
                         q['shared_completed_by_name'] = user_map.get(completed_by_someone['user_id'], '誰か')
                     else:
-                        pending_by_someone = next((p for p in pending if p['quest_id'] == q_id), None)
+                        pending_by_someone = first_pending_by_quest.get(q_id)
                         if pending_by_someone:
                             q['is_shared_pending_by'] = pending_by_someone['user_id']
                             q['shared_pending_by_name'] = user_map.get(pending_by_someone['user_id'], '誰か')
@@ -0,0 +1,492 @@
+# MY_HOME_SYSTEM/services/recording_catalog.py
+"""
+NVR録画ファイル (NVR_RECORD_DIR/<フォルダ>/YYYYMMDD_HHMMSS.mp4) のカタログ。
+
+録画を探す処理はこれまで、呼び出しのたびに NAS 上のディレクトリを走査していた。
+- camera_monitor.capture_snapshot_from_nvr: 動体検知のたびに `**/*.mp4` を再帰globし、全ファイルを mtime でソート
+- camera_service / vod_playlist_builder: 日付ごとの glob
+- timelapse_generator.process_video_clips: イベントごとに glob して線形探索
+- daily_timelapse_job: 1日分の glob とファイル名による時間帯の絞り込み
+
+本モジュールは録画の一覧を recordings テーブル (migrations/0011) に保持し、
+「カメラXの [t0, t1] と重なる録画」「カメラXの最新の録画」を (camera, start_ts) の
+インデックスで引けるようにする。
+- 差分走査 (reconcile): フォルダのファイル名一覧とテーブルを突き合わせ、stat するのは
+  新しいファイルと書き込み中 (settled=0) のファイルだけ。書き込みが終わったファイルは再度 stat しない。
+- 鮮度: 問い合わせ時、そのカメラの最終走査 (recording_scans、別プロセスの走査も含む) が
+  max_age 秒より古ければ先に差分走査する。scheduler_boot から5分間隔で全カメラを走査し、
+  unified_server は watchdog (inotify) の通知でも即時に反映する。NASのマウント (CIFS/NFS) では
+  NVR 側の書き込みが通知されないことがあるため、通知は走査を補うものとして扱う。
+- 録画の長さは ffprobe せず、ファイル名の開始時刻と最終更新時刻 (書き込みの終了時刻) から推定する。
+- DB が使えない場合 (マイグレーション未適用等) はフォルダを直接走査して同じ結果を返す。
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - watchdog は requirements.txt に含まれる
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = setup_logging("recording_catalog")
+
+RECORDING_NAME_PATTERN = re.compile(r"^(\d{8})_(\d{6})\.mp4$")
+
+TimeLike = Union[datetime, float, int]
+
+
+@dataclass(frozen=True)
+class Recording:
+    """1つの録画ファイル"""
+    camera: str
+    path: str
+    start_ts: float
+    end_ts: float
+    size: int
+    duration: float
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.start_ts)
+
+    @property
+    def end(self) -> datetime:
+        return datetime.fromtimestamp(self.end_ts)
+
+
+def camera_folder(cam_conf: Dict) -> str:
+    """カメラ設定から NVR_RECORD_DIR 配下のフォルダ名を返す"""
+    return cam_conf.get("nas_folder") or cam_conf["name"]
+
+
+def parse_start(filename: str) -> Optional[float]:
+    """`20260720_210200.mp4` のようなファイル名から録画開始時刻 (エポック秒) を返す"""
+    m = RECORDING_NAME_PATTERN.match(os.path.basename(filename))
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(1) + m.group(2), "%Y%m%d%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+
+def _to_ts(value: TimeLike) -> float:
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+def _day_range(day: Union[str, date]) -> Tuple[float, float]:
+    if isinstance(day, str):
+        day = datetime.strptime(day.replace("-", ""), "%Y%m%d").date()
+    start = datetime.combine(day, datetime.min.time())
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+class RecordingCatalog:
+    # 最新の録画の切り替わりを待っている間の再走査の最短間隔
+    rollover_rescan_sec = 5.0
+
+    def __init__(
+        self,
+        root: Optional[Callable[[], str]] = None,
+        clip_sec: Optional[float] = None,
+        settle_sec: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._root = root or (lambda: getattr(config, "NVR_RECORD_DIR", os.getenv("NVR_RECORD_DIR", "/mnt/nas/home_system/nvr_recordings")))
+        self.clip_sec = clip_sec if clip_sec is not None else config.RECORDING_CLIP_SEC
+        self.settle_sec = settle_sec if settle_sec is not None else config.RECORDING_SETTLE_SEC
+        self._clock = clock
+        self._scan_locks: Dict[str, threading.Lock] = {}
+        self._scan_locks_guard = threading.Lock()
+        self.stats: Dict[str, int] = {"scans": 0, "stats": 0, "fallbacks": 0}
+
+    @property
+    def root(self) -> str:
+        return self._root()
+
+    @property
+    def max_clip_sec(self) -> float:
+        """1ファイルの最大の長さ。範囲検索で start_ts の下限を決める (これより長い推定値は採用しない)"""
+        return self.clip_sec * 3
+
+    def _scan_lock(self, camera: str) -> threading.Lock:
+        with self._scan_locks_guard:
+            return self._scan_locks.setdefault(camera, threading.Lock())
+
+    def _estimate_end(self, start_ts: float, mtime: float) -> float:
+        # 書き込みの終了時刻 = 最終更新時刻。コピー等で mtime が当てにならない場合は標準の長さとみなす
+        if 0 < mtime - start_ts <= self.max_clip_sec:
+            return mtime
+        return start_ts + self.clip_sec
+
+    def _entry(self, camera: str, path: str, st: os.stat_result) -> Optional[tuple]:
+        start_ts = parse_start(path)
+        if start_ts is None:
+            return None
+        end_ts = self._estimate_end(start_ts, st.st_mtime)
+        settled = int(self._clock() - st.st_mtime >= self.settle_sec)
+        return (path, camera, start_ts, end_ts, st.st_size, st.st_mtime, end_ts - start_ts, settled)
+
+    # --- 走査 ---
+    def _list_files(self, camera: str) -> Optional[List[str]]:
+        """フォルダ内の録画ファイルのパス一覧 (stat はしない)。フォルダが無ければ None"""
+        folder = os.path.join(self.root, camera)
+        if not os.path.isdir(folder):
+            return None
+        paths = []
+        for dirpath, _, filenames in os.walk(folder):
+            paths.extend(os.path.join(dirpath, f) for f in filenames if RECORDING_NAME_PATTERN.match(f))
+        return paths
+
+    def cameras(self) -> List[str]:
+        try:
+            return sorted(e.name for e in os.scandir(self.root) if e.is_dir())
+        except OSError:
+            return []
+
+    def reconcile(self, camera: str) -> Dict[str, int]:
+        """フォルダとテーブルの差分を反映する。追加・更新・削除の件数を返す"""
+        with self._scan_lock(camera):
+            return self._reconcile(camera)
+
+    def _reconcile(self, camera: str) -> Dict[str, int]:
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        paths = self._list_files(camera)
+        found = set(paths or ())
+        with get_db_cursor() as cur:
+            known = {
+                row["path"]: (row["size"], row["mtime"], row["settled"])
+                for row in cur.execute("SELECT path, size, mtime, settled FROM recordings WHERE camera = ?", (camera,))
+            }
+
+        upserts = []
+        for path in sorted(found):
+            previous = known.get(path)
+            if previous is not None and previous[2]:
+                continue  # 書き込み済み
+            try:
+                st = os.stat(path)
+            except OSError:
+                found.discard(path)
+                continue
+            self.stats["stats"] += 1
+            if previous is not None and (previous[0], previous[1]) == (st.st_size, st.st_mtime):
+                if self._clock() - st.st_mtime < self.settle_sec:
+                    continue
+            entry = self._entry(camera, path, st)
+            if entry is not None:
+                upserts.append(entry)
+                counts["added" if previous is None else "updated"] += 1
+        removed = [(p,) for p in known if p not in found]
+        counts["removed"] = len(removed)
+
+        with get_db_cursor(commit=True) as cur:
+            if upserts:
+                cur.executemany(
+                    "INSERT OR REPLACE INTO recordings (path, camera, start_ts, end_ts, size, mtime, duration, settled) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    upserts,
+                )
+            if removed:
+                cur.executemany("DELETE FROM recordings WHERE path = ?", removed)
+            cur.execute(
+                "INSERT OR REPLACE INTO recording_scans (camera, scanned_at, files) VALUES (?, ?, ?)",
+                (camera, self._clock(), len(found)),
+            )
+        self.stats["scans"] += 1
+        if any(counts.values()):
+            logger.debug(f"[{camera}] recordings reconciled: {counts}")
+        return counts
+
+    def reconcile_all(self) -> Dict[str, Dict[str, int]]:
+        results = {camera: self.reconcile(camera) for camera in self.cameras()}
+        # フォルダごと削除されたカメラの行も片付ける
+        with get_db_cursor() as cur:
+            stale = [row["camera"] for row in cur.execute("SELECT camera FROM recording_scans")]
+        for camera in stale:
+            if camera not in results:
+                results[camera] = self.reconcile(camera)
+        return results
+
+    def _ensure_fresh(self, camera: str, max_age: Optional[float]) -> None:
+        if max_age is None:
+            max_age = config.RECORDING_CATALOG_MAX_AGE_SEC
+        with get_db_cursor() as cur:
+            row = cur.execute("SELECT scanned_at FROM recording_scans WHERE camera = ?", (camera,)).fetchone()
+        if row is not None and self._clock() - row["scanned_at"] <= max_age:
+            return
+        with self._scan_lock(camera):
+            # 待っている間に別スレッドが走査を終えていれば繰り返さない
+            with get_db_cursor() as cur:
+                row = cur.execute("SELECT scanned_at FROM recording_scans WHERE camera = ?", (camera,)).fetchone()
+            if row is None or self._clock() - row["scanned_at"] > max_age:
+                self._reconcile(camera)
+
+    # --- 通知による反映 (RecordingWatcher) ---
+    def upsert_path(self, path: str) -> bool:
+        camera = self._camera_of(path)
+        if camera is None or not RECORDING_NAME_PATTERN.match(os.path.basename(path)):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return self.remove_path(path)
+        entry = self._entry(camera, path, st)
+        if entry is None:
+            return False
+        with get_db_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO recordings (path, camera, start_ts, end_ts, size, mtime, duration, settled) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                entry,
+            )
+        return True
+
+    def remove_path(self, path: str) -> bool:
+        with get_db_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM recordings WHERE path = ?", (path,))
+            return cur.rowcount > 0
+
+    def _camera_of(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(os.pardir) or os.sep not in rel:
+            return None
+        return rel.split(os.sep, 1)[0]
+
+    # --- 問い合わせ ---
+    def _query(self, camera: str, max_age: Optional[float], where: str, params: tuple, order: str,
+               limit: Optional[int] = None) -> List[Recording]:
+        sql = (f"SELECT camera, path, start_ts, end_ts, size, duration FROM recordings "
+               f"WHERE camera = ? AND {where} ORDER BY start_ts {order}")
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        try:
+            self._ensure_fresh(camera, max_age)
+            with get_db_cursor() as cur:
+                return [Recording(**dict(row)) for row in cur.execute(sql, (camera, *params))]
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Recording catalog unavailable, scanning {camera} directly: {e}")
+            self.stats["fallbacks"] += 1
+            return self._query_directory(camera, where, params, order, limit)
+
+    def _query_directory(self, camera: str, where: str, params: tuple, order: str,
+                         limit: Optional[int]) -> List[Recording]:
+        """DBを使わずに同じ条件で絞り込む (カタログが使えない場合の代替)"""
+        entries = []
+        for path in self._list_files(camera) or ():
+            try:
+                entry = self._entry(camera, path, os.stat(path))
+            except OSError:
+                continue
+            if entry is not None:
+                entries.append(Recording(camera, path, entry[2], entry[3], entry[4], entry[6]))
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("CREATE TABLE recordings (camera TEXT, path TEXT, start_ts REAL, end_ts REAL, size INTEGER, duration REAL)")
+            conn.executemany("INSERT INTO recordings VALUES (?, ?, ?, ?, ?, ?)",
+                             [(r.camera, r.path, r.start_ts, r.end_ts, r.size, r.duration) for r in entries])
+            sql = f"SELECT * FROM recordings WHERE camera = ? AND {where} ORDER BY start_ts {order}"
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            return [Recording(**dict(row)) for row in conn.execute(sql, (camera, *params))]
+        finally:
+            conn.close()
+
+    def clips(self, camera: str, start: TimeLike, end: TimeLike, max_age: Optional[float] = None) -> List[Recording]:
+        """[start, end) と重なる録画を開始時刻順に返す"""
+        t0, t1 = _to_ts(start), _to_ts(end)
+        return self._query(camera, max_age, "start_ts > ? AND start_ts < ? AND end_ts > ?",
+                           (t0 - self.max_clip_sec, t1, t0), "ASC")
+
+    def clips_on(self, camera: str, day: Union[str, date], max_age: Optional[float] = None) -> List[Recording]:
+        """指定日 (YYYYMMDD / YYYY-MM-DD / date) に開始した録画を開始時刻順に返す"""
+        t0, t1 = _day_range(day)
+        return self._query(camera, max_age, "start_ts >= ? AND start_ts < ?", (t0, t1), "ASC")
+
+    def clip_at(self, camera: str, moment: TimeLike, lookback_sec: float = 86400,
+                max_age: Optional[float] = None) -> Optional[Recording]:
+        """moment 以前に開始した最後の録画 (lookback_sec 秒より前に開始したものは対象外)"""
+        t = _to_ts(moment)
+        found = self._query(camera, max_age, "start_ts <= ? AND start_ts > ?", (t, t - lookback_sec), "DESC", 1)
+        return found[0] if found else None
+
+    def newest(self, camera: str, max_age: Optional[float] = None) -> Optional[Recording]:
+        """
+        最新の録画を返す。既知の最新ファイルの標準の長さが過ぎていれば (NVR が次のファイルに
+        切り替えているはずなので) rollover_rescan_sec 秒より古い走査結果は使わない。
+        """
+        found = self._query(camera, float("inf"), "1 = 1", (), "DESC", 1)
+        if found and found[0].start_ts + self.clip_sec > self._clock() and max_age is None:
+            return found[0]
+        if not found or found[0].start_ts + self.clip_sec <= self._clock():
+            limit = config.RECORDING_CATALOG_MAX_AGE_SEC if max_age is None else max_age
+            max_age = min(limit, self.rollover_rescan_sec)
+        found = self._query(camera, max_age, "1 = 1", (), "DESC", 1)
+        return found[0] if found else None
+
+
+class _RecordingEventHandler(FileSystemEventHandler):
+    def __init__(
+        self, catalog: RecordingCatalog, min_interval_sec: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        super().__init__()
+        self.catalog = catalog
+        self.min_interval_sec = min_interval_sec
+        self._clock = clock
+        self._last_update: Dict[str, float] = {}
+        self._last_prune = clock()
+
+    def _prune(self, now: float) -> None:
+        """間隔を過ぎた記録を捨てる (録画ファイルが増えるたびに溜まり続けないように)"""
+        if now - self._last_prune < self.min_interval_sec:
+            return
+        self._last_prune = now
+        self._last_update = {
+            path: seen for path, seen in self._last_update.items() if now - seen < self.min_interval_sec
+        }
+
+    def _upsert(self, path: str, force: bool = False) -> None:
+        if not path.endswith(".mp4"):
+            return
+        # 書き込み中のファイルは更新通知が連続するため、一定間隔ごとにだけ反映する
+        now = self._clock()
+        self._prune(now)
+        if not force and now - self._last_update.get(path, 0.0) < self.min_interval_sec:
+            return
+        self._last_update[path] = now
+        try:
+            self.catalog.upsert_path(path)
+        except Exception as e:
+            logger.debug(f"Recording catalog update failed for {path}: {e}")
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._upsert(event.src_path, force=True)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._upsert(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self._upsert(event.src_path, force=True)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._last_update.pop(event.src_path, None)
+            try:
+                self.catalog.remove_path(event.src_path)
+            except Exception as e:
+                logger.debug(f"Recording catalog update failed for {event.src_path}: {e}")
+            self._upsert(event.dest_path, force=True)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._last_update.pop(event.src_path, None)
+            try:
+                self.catalog.remove_path(event.src_path)
+            except Exception as e:
+                logger.debug(f"Recording catalog update failed for {event.src_path}: {e}")
+
+
+class RecordingWatcher:
+    """NVR_RECORD_DIR の変更を watchdog で受け取ってカタログへ反映する"""
+
+    def __init__(self, catalog: RecordingCatalog, min_interval_sec: float = 5.0) -> None:
+        self.catalog = catalog
+        self.min_interval_sec = min_interval_sec
+        self._observer = None
+
+    def start(self) -> bool:
+        if self._observer is not None:
+            return True
+        if Observer is None:
+            logger.info("ℹ️ watchdog is not installed; recording catalog relies on periodic scans")
+            return False
+        root = self.catalog.root
+        if not os.path.isdir(root):
+            logger.warning(f"⚠️ NVR record directory not found, recording watcher not started: {root}")
+            return False
+        observer = Observer()
+        observer.daemon = True
+        observer.schedule(_RecordingEventHandler(self.catalog, self.min_interval_sec), root, recursive=True)
+        try:
+            observer.start()
+        except OSError as e:
+            logger.warning(f"⚠️ Recording watcher failed to start ({root}): {e}")
+            return False
+        self._observer = observer
+        return True
+
+    def stop(self) -> None:
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=5)
+
+
+_default_catalog = RecordingCatalog()
+_default_watcher = RecordingWatcher(_default_catalog)
+
+
+def reconcile(camera: str) -> Dict[str, int]:
+    return _default_catalog.reconcile(camera)
+
+
+def reconcile_all() -> Dict[str, Dict[str, int]]:
+    return _default_catalog.reconcile_all()
+
+
+def clips(camera: str, start: TimeLike, end: TimeLike, max_age: Optional[float] = None) -> List[Recording]:
+    return _default_catalog.clips(camera, start, end, max_age)
+
+
+def clips_on(camera: str, day: Union[str, date], max_age: Optional[float] = None) -> List[Recording]:
+    return _default_catalog.clips_on(camera, day, max_age)
+
+
+def clip_at(camera: str, moment: TimeLike, lookback_sec: float = 86400,
+            max_age: Optional[float] = None) -> Optional[Recording]:
+    return _default_catalog.clip_at(camera, moment, lookback_sec, max_age)
+
+
+def newest(camera: str, max_age: Optional[float] = None) -> Optional[Recording]:
+    return _default_catalog.newest(camera, max_age)
+
+
+def start_watcher() -> bool:
+    return _default_watcher.start()
+
+
+def stop_watcher() -> None:
+    _default_watcher.stop()
+
+
+def main() -> Dict[str, Dict[str, int]]:
+    """全カメラのフォルダを差分走査する (scheduler_boot から定期実行)"""
+    results = reconcile_all()
+    changed = {camera: counts for camera, counts in results.items() if any(counts.values())}
+    if changed:
+        logger.info(f"🎞️ Recording catalog updated: {changed}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+# MY_HOME_SYSTEM/services/rollup_service.py
+"""
+センサーログの集計(ロールアップ)と保持期間管理。
+
+power_usage / switchbot_meter_logs / device_records は生データを全件保持しており、
+analysis_service の月間電気代・年間室温の集計が年々肥大化するテーブルを全走査していた。
+本モジュールは生データを 1分 / 1時間 / 1日 単位の集計テーブル (migrations/0007) へ
+差分で積み上げ、集計済みの生データを保持期間経過後に削除する。
+
+- 差分更新: テーブルごとに「集計済みの最大id」(high-water mark) を sensor_rollup_state に
+  記録し、それより新しい行だけを集計して既存の集計行へマージする。マージと
+  high-water mark の更新は同一トランザクションで行うため、途中で失敗しても二重計上しない。
+- 遅れて届いた行(過去の時刻のサンプル)も、該当する過去の区間へ加算される。
+- 読み出し (load_rollup): 集計済みの区間に、まだ集計されていない生データ(high-water mark
+  より新しい行)を同じロジックで集計して合成するため、集計ジョブの実行タイミングに
+  関わらず生データを直接集計した場合と同じ結果になる。
+- 区間の基準時刻は他の集計処理と同じくJSTの壁時計時刻。tzinfoの無いレガシー値は
+  JSTとして記録されたものとみなす (analysis_service._parse_timestamp_to_jst と同じ規約)。
+
+scheduler_boot.py から5分間隔でスクリプトとして実行される。
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pytz
+
+import config
+from core.database import get_db_cursor
+from core.logger import setup_logging
+
+logger = setup_logging("rollup_service")
+
+JST = pytz.timezone("Asia/Tokyo")
+
+STATE_TABLE = "sensor_rollup_state"
+
+# 区間の長さ(秒)。RESOLUTION_ORDER は粗い順
+RESOLUTION_SECONDS: Dict[str, int] = {"minute": 60, "hour": 3600, "day": 86400}
+RESOLUTION_ORDER: Tuple[str, ...] = ("day", "hour", "minute")
+
+# 電力量の積算で、同一デバイスの前回サンプルとの間隔がこれを超える区間は欠測として扱う
+# (analysis_service の従来の電気代計算と同じ基準)
+MAX_ENERGY_GAP_HOURS = 1.0
+
+# (resolution, bucket, device_id)
+_AggKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class RollupSource:
+    """集計対象の生データテーブルと、その集計テーブルの対応"""
+    table: str
+    rollup_table: str
+    metrics: Tuple[str, ...]
+    # 電力量(kWh)を積算する対象のワット数カラム (無い場合は None)
+    energy_metric: Optional[str] = None
+    # 数値以外で集計行に引き継ぐ属性 (最新の値で上書き)
+    attributes: Tuple[str, ...] = ("device_name",)
+    # 生データの保持日数を参照する config のキー
+    retention_config_key: str = "SENSOR_RAW_RETENTION_DAYS"
+
+    def retention_days(self) -> int:
+        return int(getattr(config, self.retention_config_key, 0) or 0)
+
+
+SOURCES: Dict[str, RollupSource] = {
+    src.table: src for src in (
+        RollupSource(
+            table=config.SQLITE_TABLE_POWER_USAGE,
+            rollup_table="power_usage_rollup",
+            metrics=("wattage",),
+            energy_metric="wattage",
+        ),
+        RollupSource(
+            table=config.SQLITE_TABLE_SWITCHBOT_LOGS,
+            rollup_table="switchbot_meter_rollup",
+            metrics=("temperature", "humidity"),
+        ),
+        RollupSource(
+            table=config.SQLITE_TABLE_SENSOR,
+            rollup_table="device_records_rollup",
+            metrics=("temperature_celsius", "humidity_percent", "power_watts"),
+            energy_metric="power_watts",
+            attributes=("device_name", "device_type"),
+            retention_config_key="DEVICE_RECORDS_RETENTION_DAYS",
+        ),
+    )
+}
+
+
+# ==========================================
+# 区間・集計ロジック (集計ジョブと読み出しで共通)
+# ==========================================
+
+def to_jst_naive(value: Any) -> Optional[datetime]:
+    """タイムスタンプをJSTの壁時計時刻(naive)へ変換する。解釈できない値は None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(JST).replace(tzinfo=None)
+    return dt
+
+
+def bucket_start(dt: datetime, resolution: str) -> str:
+    """dt が属する区間の開始時刻 ('YYYY-MM-DDTHH:MM:00')"""
+    if resolution == "day":
+        dt = dt.replace(hour=0, minute=0)
+    elif resolution == "hour":
+        dt = dt.replace(minute=0)
+    return dt.strftime("%Y-%m-%dT%H:%M:00")
+
+
+def _new_agg(source: RollupSource) -> Dict[str, Any]:
+    agg: Dict[str, Any] = {attr: None for attr in source.attributes}
+    agg["sample_count"] = 0
+    for m in source.metrics:
+        agg.update({f"{m}_min": None, f"{m}_max": None, f"{m}_sum": None, f"{m}_count": 0})
+    if source.energy_metric:
+        agg["kwh"] = 0.0
+    return agg
+
+
+def _min(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    return a if b is None else min(a, b)
+
+
+def _max(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    return a if b is None else max(a, b)
+
+
+def _merge_into(source: RollupSource, dst: Dict[str, Any], src: Dict[str, Any]) -> None:
+    """集計値 src を dst へマージする (_upsert の ON CONFLICT 句と同じ規則)"""
+    for attr in source.attributes:
+        if src.get(attr) is not None:
+            dst[attr] = src[attr]
+    dst["sample_count"] += src["sample_count"]
+    for m in source.metrics:
+        dst[f"{m}_min"] = _min(dst[f"{m}_min"], src[f"{m}_min"])
+        dst[f"{m}_max"] = _max(dst[f"{m}_max"], src[f"{m}_max"])
+        if src[f"{m}_sum"] is not None:
+            dst[f"{m}_sum"] = (dst[f"{m}_sum"] or 0.0) + src[f"{m}_sum"]
+        dst[f"{m}_count"] += src[f"{m}_count"]
+    if source.energy_metric:
+        dst["kwh"] += src.get("kwh") or 0.0
+
+
+def _finalize(source: RollupSource, agg: Dict[str, Any]) -> Dict[str, Any]:
+    for m in source.metrics:
+        count = agg[f"{m}_count"]
+        agg[f"{m}_avg"] = agg[f"{m}_sum"] / count if count else None
+    return agg
+
+
+def aggregate_rows(
+    source: RollupSource,
+    rows: Iterable[Any],
+    prev_samples: Optional[Dict[str, Tuple[datetime, float]]] = None,
+    resolutions: Sequence[str] = RESOLUTION_ORDER,
+) -> Dict[_AggKey, Dict[str, Any]]:
+    """
+    生データの行を (resolution, bucket, device_id) 単位に集計する。
+
+    prev_samples は電力量積算用の「デバイスごとの直前のサンプル (時刻, ワット数)」。
+    各サンプルの kWh は、直前サンプルからの経過時間 × 当該サンプルのワット数とし、
+    当該サンプルの区間に計上する (従来の calculate_monthly_cost_cumulative と同じ規則)。
+    """
+    prev = dict(prev_samples or {})
+    parsed = []
+    for row in rows:
+        dt = to_jst_naive(row["timestamp"])
+        if dt is not None:
+            parsed.append((dt, row))
+    # 電力量はデバイスごとに時刻順で積算するため、時刻順に並べてから処理する
+    parsed.sort(key=lambda item: item[0])
+
+    aggs: Dict[_AggKey, Dict[str, Any]] = {}
+    for dt, row in parsed:
+        device_id = row["device_id"] or ""
+        sample = _new_agg(source)
+        for attr in source.attributes:
+            sample[attr] = row[attr]
+        sample["sample_count"] = 1
+        for m in source.metrics:
+            value = row[m]
+            if value is None:
+                continue
+            value = float(value)
+            sample.update({f"{m}_min": value, f"{m}_max": value, f"{m}_sum": value, f"{m}_count": 1})
+
+        if source.energy_metric and row[source.energy_metric] is not None:
+            watts = float(row[source.energy_metric])
+            last = prev.get(device_id)
+            if last is not None and dt > last[0]:
+                gap_hours = (dt - last[0]).total_seconds() / 3600
+                if gap_hours <= MAX_ENERGY_GAP_HOURS:
+                    sample["kwh"] = watts / 1000 * gap_hours
+            if last is None or dt > last[0]:
+                prev[device_id] = (dt, watts)
+
+        for resolution in resolutions:
+            key = (resolution, bucket_start(dt, resolution), device_id)
+            if key not in aggs:
+                aggs[key] = _new_agg(source)
+            _merge_into(source, aggs[key], sample)
+    return aggs
+
+
+# ==========================================
+# DB アクセス
+# ==========================================
+
+def _select_columns(source: RollupSource) -> str:
+    cols = ["id", "timestamp", "device_id"]
+    for col in source.attributes + source.metrics:
+        if col not in cols:
+            cols.append(col)
+    return ", ".join(cols)
+
+
+def get_high_water_mark(conn: sqlite3.Connection, table: str) -> int:
+    """集計済みの最大id。状態テーブルが無い(マイグレーション未適用)場合は 0"""
+    try:
+        row = conn.execute(
+            f"SELECT last_rolled_id FROM {STATE_TABLE} WHERE source_table = ?", (table,)
+        ).fetchone()
+    except sqlite3.Error:
+        return 0
+    return int(row[0]) if row else 0
+
+
+def _load_prev_samples(
+    conn: sqlite3.Connection, source: RollupSource, before_id: int, device_ids: Iterable[str]
+) -> Dict[str, Tuple[datetime, float]]:
+    """high-water mark 以前の、デバイスごとの直前の電力サンプル"""
+    prev: Dict[str, Tuple[datetime, float]] = {}
+    if not source.energy_metric or before_id <= 0:
+        return prev
+    for device_id in set(device_ids):
+        row = conn.execute(
+            f"SELECT timestamp, {source.energy_metric} FROM {source.table} "
+            f"WHERE device_id = ? AND id <= ? AND {source.energy_metric} IS NOT NULL "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (device_id, before_id),
+        ).fetchone()
+        if row is None:
+            continue
+        dt = to_jst_naive(row[0])
+        if dt is not None:
+            prev[device_id] = (dt, float(row[1]))
+    return prev
+
+
+def _upsert_sql(source: RollupSource) -> Tuple[str, List[str]]:
+    value_cols = list(source.attributes) + ["sample_count"]
+    updates = [f"{attr} = COALESCE(excluded.{attr}, {attr})" for attr in source.attributes]
+    updates.append("sample_count = sample_count + excluded.sample_count")
+    for m in source.metrics:
+        value_cols += [f"{m}_min", f"{m}_max", f"{m}_sum", f"{m}_count", f"{m}_avg"]
+        updates += [
+            f"{m}_min = COALESCE(MIN({m}_min, excluded.{m}_min), {m}_min, excluded.{m}_min)",
+            f"{m}_max = COALESCE(MAX({m}_max, excluded.{m}_max), {m}_max, excluded.{m}_max)",
+            f"{m}_sum = CASE WHEN {m}_sum IS NULL THEN excluded.{m}_sum "
+            f"WHEN excluded.{m}_sum IS NULL THEN {m}_sum ELSE {m}_sum + excluded.{m}_sum END",
+            f"{m}_count = {m}_count + excluded.{m}_count",
+            # SET句の右辺は更新前の値を参照するため、合計・件数から平均を計算し直す
+            f"{m}_avg = CASE WHEN {m}_count + excluded.{m}_count > 0 THEN "
+            f"(COALESCE({m}_sum, 0) + COALESCE(excluded.{m}_sum, 0)) / ({m}_count + excluded.{m}_count) END",
+        ]
+    if source.energy_metric:
+        value_cols.append("kwh")
+        updates.append("kwh = kwh + excluded.kwh")
+
+    cols = ["resolution", "bucket", "device_id"] + value_cols
+    sql = (
+        f"INSERT INTO {source.rollup_table} ({', '.join(cols)}) "
+        f"VALUES ({', '.join(['?'] * len(cols))}) "
+        f"ON CONFLICT(resolution, device_id, bucket) DO UPDATE SET {', '.join(updates)}"
+    )
+    return sql, value_cols
+
+
+def _upsert(cur: sqlite3.Cursor, source: RollupSource, aggs: Dict[_AggKey, Dict[str, Any]]) -> None:
+    sql, value_cols = _upsert_sql(source)
+    params = []
+    for (resolution, bucket, device_id), agg in aggs.items():
+        agg = _finalize(source, agg)
+        params.append((resolution, bucket, device_id) + tuple(agg[c] for c in value_cols))
+    cur.executemany(sql, params)
+
+
+def _rollup_batch(source: RollupSource, batch_rows: int) -> int:
+    with get_db_cursor(commit=True) as cur:
+        conn = cur.connection
+        last_id = get_high_water_mark(conn, source.table)
+        rows = cur.execute(
+            f"SELECT {_select_columns(source)} FROM {source.table} WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_rows),
+        ).fetchall()
+        if not rows:
+            return 0
+
+        prev = _load_prev_samples(conn, source, last_id, (r["device_id"] or "" for r in rows))
+        _upsert(cur, source, aggregate_rows(source, rows, prev))
+        cur.execute(
+            f"INSERT INTO {STATE_TABLE} (source_table, last_rolled_id, updated_at) "
+            "VALUES (?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(source_table) DO UPDATE SET "
+            "last_rolled_id = excluded.last_rolled_id, updated_at = excluded.updated_at",
+            (source.table, rows[-1]["id"]),
+        )
+        return len(rows)
+
+
+def run_rollup(tables: Optional[Iterable[str]] = None, batch_rows: Optional[int] = None) -> Dict[str, int]:
+    """未集計の生データを集計テーブルへ積み上げる。テーブルごとの処理行数を返す"""
+    batch_rows = batch_rows or config.ROLLUP_BATCH_ROWS
+    result: Dict[str, int] = {}
+    for table in (tables or SOURCES.keys()):
+        source = SOURCES[table]
+        total = 0
+        try:
+            while True:
+                # バッチごとにコミットし、Webhook等の書き込みを長時間ブロックしない
+                n = _rollup_batch(source, batch_rows)
+                total += n
+                if n < batch_rows:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"❌ Rollup failed ({table}): {e}")
+        result[table] = total
+    return result
+
+
+def _delete_in_chunks(where_sql: str, table: str, params: tuple, chunk_rows: int) -> int:
+    deleted = 0
+    while True:
+        with get_db_cursor(commit=True) as cur:
+            cur.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE {where_sql} LIMIT ?)",
+                params + (chunk_rows,),
+            )
+            n = cur.rowcount
+        deleted += n
+        if n < chunk_rows:
+            return deleted
+
+
+def prune(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    保持期間を過ぎたデータを削除する。
+    - 生データ: 集計済み(high-water mark 以前)かつ保持日数より古い行のみ
+    - 1分単位の集計: ROLLUP_MINUTE_RETENTION_DAYS より古い区間 (1時間・1日単位は保持し続ける)
+    """
+    now = to_jst_naive(now) if now is not None else datetime.now(JST).replace(tzinfo=None)
+    chunk = config.ROLLUP_BATCH_ROWS
+    result: Dict[str, int] = {}
+    for source in SOURCES.values():
+        try:
+            days = source.retention_days()
+            if days > 0:
+                with get_db_cursor() as cur:
+                    last_id = get_high_water_mark(cur.connection, source.table)
+                # 日付部分のみで比較し、'T'区切り/空白区切りの混在による境界のずれを避ける
+                cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d")
+                result[source.table] = _delete_in_chunks(
+                    "timestamp < ? AND id <= ?", source.table, (cutoff, last_id), chunk
+                )
+
+            minute_days = config.ROLLUP_MINUTE_RETENTION_DAYS
+            if minute_days > 0:
+                cutoff = bucket_start(now - timedelta(days=minute_days), "day")
+                result[source.rollup_table] = _delete_in_chunks(
+                    "resolution = 'minute' AND bucket < ?", source.rollup_table, (cutoff,), chunk
+                )
+        except sqlite3.Error as e:
+            logger.error(f"❌ Prune failed ({source.table}): {e}")
+    return result
+
+
+def run_maintenance() -> Dict[str, Dict[str, int]]:
+    """集計 → 保持期間による削除 の順に実行する (scheduler_boot から定期実行)"""
+    rolled = run_rollup()
+    pruned = prune()
+    if any(rolled.values()) or any(pruned.values()):
+        logger.info(f"📊 Sensor rollup: rolled={rolled} pruned={pruned}")
+    return {"rolled": rolled, "pruned": pruned}
+
+
+# ==========================================
+# 読み出し
+# ==========================================
+
+def choose_resolution(start: datetime, step_sec: int, now: Optional[datetime] = None) -> str:
+    """
+    要求された粒度 (step_sec) を満たす、最も粗い集計単位を選ぶ。
+    1分単位の集計は ROLLUP_MINUTE_RETENTION_DAYS 分しか残らないため、
+    それより古い期間を含む場合は1時間単位を最小とする。
+    """
+    now = to_jst_naive(now) if now is not None else datetime.now(JST).replace(tzinfo=None)
+    start = to_jst_naive(start) or now
+    candidates = list(RESOLUTION_ORDER)
+    minute_days = config.ROLLUP_MINUTE_RETENTION_DAYS
+    if minute_days > 0 and start < now - timedelta(days=minute_days):
+        candidates.remove("minute")
+    for resolution in candidates:
+        if RESOLUTION_SECONDS[resolution] <= step_sec:
+            return resolution
+    return candidates[-1]
+
+
+def load_rollup(
+    conn: sqlite3.Connection,
+    table: str,
+    start: datetime,
+    end: datetime,
+    resolution: str,
+    device_ids: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    [start, end) の集計値を返す。集計テーブルの値に、未集計の生データ
+    (high-water mark より新しい行) を集計して合成する。
+    """
+    source = SOURCES[table]
+    start_dt, end_dt = to_jst_naive(start), to_jst_naive(end)
+    first_bucket = bucket_start(start_dt, resolution)
+    end_str = end_dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+    device_filter, device_params = "", ()
+    if device_ids is not None:
+        if not device_ids:
+            return []
+        device_filter = f" AND device_id IN ({', '.join(['?'] * len(device_ids))})"
+        device_params = tuple(device_ids)
+
+    last_id = get_high_water_mark(conn, table)
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    if last_id > 0:
+        cur = conn.cursor()
+        cur.row_factory = sqlite3.Row
+        for row in cur.execute(
+            f"SELECT * FROM {source.rollup_table} WHERE resolution = ? AND bucket >= ? AND bucket < ?{device_filter}",
+            (resolution, first_bucket, end_str) + device_params,
+        ):
+            agg = _new_agg(source)
+            _merge_into(source, agg, dict(row))
+            merged[(row["bucket"], row["device_id"])] = agg
+
+    # 未集計分: 日付の前方一致で大まかに絞り込み、厳密な範囲はPython側で判定する
+    cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
+    tail = cur.execute(
+        f"SELECT {_select_columns(source)} FROM {source.table} "
+        f"WHERE id > ? AND timestamp >= ?{device_filter} ORDER BY id",
+        (last_id, (start_dt - timedelta(days=1)).strftime("%Y-%m-%d")) + device_params,
+    ).fetchall()
+    if tail:
+        prev = _load_prev_samples(conn, source, last_id, (r["device_id"] or "" for r in tail))
+        for (_, bucket, device_id), agg in aggregate_rows(source, tail, prev, (resolution,)).items():
+            if not (first_bucket <= bucket < end_str):
+                continue
+            if (bucket, device_id) in merged:
+                _merge_into(source, merged[(bucket, device_id)], agg)
+            else:
+                merged[(bucket, device_id)] = agg
+
+    result = []
+    for (bucket, device_id), agg in sorted(merged.items()):
+        row = {"resolution": resolution, "bucket": bucket, "device_id": device_id}
+        row.update(_finalize(source, agg))
+        result.append(row)
+    return result
+
+
+if __name__ == "__main__":
+    run_maintenance()
@@ -4,18 +4,17 @@ import time
 from typing import Dict, Optional, List, Any
 
 import config
-import common
 from core.logger import setup_logging
 from core.utils import get_now_iso
-from core.database import save_log_async
+from core import device_state, ingest_queue
 from services.notification_service import send_push
 
 # ロガー設定
 logger = setup_logging("sensor_service")
 
 # === Global State (状態管理) ===
-LAST_NOTIFY_TIME: Dict[str, float] = {}
-IS_ACTIVE: Dict[str, bool] = {}
+# 見守り状態 (motion_active)・開閉通知の最終送信時刻 (last_notify_at)・最新の電力/温湿度は
+# core/device_state.py に保持する (再起動をまたいで復元される)
 MOTION_TASKS: Dict[str, asyncio.Task] = {}
 
 # Webhook重複排除用のインメモリーキャッシュ
@@ -64,11 +63,13 @@ async def send_inactive_notification(mac: str, name: str, location: str, timeout
             send_push,
             config.LINE_USER_ID, 
             [{"type": "text", "text": msg}], 
-            None, "discord", "notify"
+            None, "discord", "notify",
+            coalesce_key="sensor",
         )
         # 状態の大きな変化（タイムアウト）なので INFO を維持
         logger.info(f"通知送信 [Digital Event]: {msg}")
-        IS_ACTIVE[mac] = False
+        device_state.update(mac, device_name=name, motion_active=False)
+        await asyncio.to_thread(device_state.flush)
         if mac in MOTION_TASKS:
             del MOTION_TASKS[mac]
             
@@ -93,10 +94,11 @@ async def process_sensor_data(mac: str, name: str, location: str, dev_type: str,
                 MOTION_TASKS[mac].cancel()
             
             # 非アクティブ状態からの復帰時のみ通知・INFOログを出力
-            if not IS_ACTIVE.get(mac, False):
+            state_snapshot = device_state.get(mac)
+            if not (state_snapshot and state_snapshot.motion_active):
                 logger.info(f"🚶 [Digital Event] Motion detected (Active): {name}")
                 msg = f"👀【{location}・見守り】\n{name} で動きがありました"
-                IS_ACTIVE[mac] = True
+                device_state.update(mac, device_name=name, motion_active=True)
             else:
                 # 継続的な検知はノイズになるためDEBUGレベルに降格
                 logger.debug(f"🚶 [Analog/Continuous] Motion detected (Already Active): {name}")
@@ -110,16 +112,28 @@ async def process_sensor_data(mac: str, name: str, location: str, dev_type: str,
     elif state in ["open", "timeoutnotclose"]:
         # 開閉は明確なデジタル状態変化のためINFO
         logger.info(f"🚪 [Digital Event] Contact sensor state: {name} ({state})")
-        if now - LAST_NOTIFY_TIME.get(mac, 0.0) > CONTACT_COOLDOWN:
+        state_snapshot = device_state.get(mac)
+        last_notify_at: float = state_snapshot.last_notify_at if state_snapshot else 0.0
+        if now - last_notify_at > CONTACT_COOLDOWN:
             msg = f"🚪【{location}・防犯】\n{name} が開きました" if state == "open" else f"⚠️【{location}・注意】\n{name} が開けっ放しです"
-            LAST_NOTIFY_TIME[mac] = now
-            
+            last_notify_at = now
+        device_state.update(mac, device_name=name, contact_state=state, last_notify_at=last_notify_at)
+
+    elif dev_type and "Contact" in dev_type:
+        # 閉 (close) 等の通知対象外の状態も最新状態として保持する
+        device_state.update(mac, device_name=name, contact_state=state)
+
+    # デジタル状態の変化は頻度が低いため、その都度 device_state テーブルへ書き出す
+    if device_state.dirty_count():
+        await asyncio.to_thread(device_state.flush)
+
     if msg:
         await asyncio.to_thread(
             send_push, 
             config.LINE_USER_ID, 
             [{"type": "text", "text": msg}], 
-            None, "discord", "notify"
+            None, "discord", "notify",
+            coalesce_key="sensor",
         )
 
 def cancel_all_tasks() -> None:
@@ -139,49 +153,39 @@ async def process_meter_data(device_id: str, device_name: str, temp: float, humi
     Silence Policy:
     - DEBUG: 温湿度のアナログ値保存は定常処理のため、ログノイズ防止として DEBUG に限定。
     """
-    await save_log_async(
+    timestamp: str = get_now_iso()
+    await ingest_queue.enqueue_log_async(
         config.SQLITE_TABLE_SWITCHBOT_LOGS,
         ["device_id", "device_name", "temperature", "humidity", "timestamp"],
-        (device_id, device_name, temp, humidity, get_now_iso())
+        (device_id, device_name, temp, humidity, timestamp)
     )
+    device_state.record_meter(device_id, device_name, temp, humidity, timestamp)
     logger.debug(f"🌡️ [Analog] Meter data saved: {device_name} (Temp: {temp}℃, Hum: {humidity}%)")
 
 async def process_power_data(device_id: str, device_name: str, wattage: float, notify_settings: Dict[str, Any]) -> None:
     """
     電力データの保存と通知判定
-    - 前回のDB値を参照して、閾値をまたいだ場合のみ通知する (Stateful Check)
+    - 前回値 (core/device_state.py) を参照して、閾値をまたいだ場合のみ通知する (Stateful Check)
     
     Silence Policy:
     - INFO: 閾値を跨ぐ（ON/OFF）状態の切り替わりが発生した場合。
     - DEBUG: 平常時の電力値（アナログ値）の保存処理。
     """
-    # 1. 保存前の最新値を取得（前回値）
+    # 1. データを保存し、デバイス状態ストアから前回値を取得する
+    #    (ストアは起動時に各デバイスの最新行から復元済みのため、サンプルごとのDB参照は不要)
+    timestamp: str = get_now_iso()
+    await ingest_queue.enqueue_log_async(
+        config.SQLITE_TABLE_POWER_USAGE,
+        ["device_id", "device_name", "wattage", "timestamp"],
+        (device_id, device_name, wattage, timestamp)
+    )
     prev_wattage: float = 0.0
     try:
-        def _fetch_prev_wattage() -> float:
-            with common.get_db_cursor() as cur:
-                row = cur.execute(
-                    f"SELECT wattage FROM {config.SQLITE_TABLE_POWER_USAGE} WHERE device_id = ? ORDER BY timestamp DESC LIMIT 1",
-                    (device_id,)
-                ).fetchone()
-                if row:
-                    try:
-                        return float(row['wattage'])
-                    except (TypeError, IndexError, KeyError):
-                        return float(row[0])
-                return 0.0
-
-        prev_wattage = await asyncio.to_thread(_fetch_prev_wattage)
-        
+        prev = device_state.record_power(device_id, device_name, wattage, timestamp)
+        if prev is not None:
+            prev_wattage = float(prev)
     except Exception as e:
         logger.debug(f"Prev power fetch skipped for {device_name}: {e}")
-
-    # 2. データを保存
-    await save_log_async(
-        config.SQLITE_TABLE_POWER_USAGE,
-        ["device_id", "device_name", "wattage", "timestamp"],
-        (device_id, device_name, wattage, get_now_iso())
-    )
     logger.debug(f"⚡ [Analog] Power data saved: {device_name} ({wattage}W)")
     
     # 3. 通知判定 (閾値クロス検知)
@@ -207,5 +211,6 @@ async def process_power_data(device_id: str, device_name: str, wattage: float, n
             send_push,
             config.LINE_USER_ID,
             [{"type": "text", "text": msg}],
-            None, target_platform, "notify"
+            None, target_platform, "notify",
+            coalesce_key="sensor",
         )
\ No newline at end of file
@@ -0,0 +1,248 @@
+# MY_HOME_SYSTEM/services/snapshot_service.py
+"""
+カメラごとの最新スナップショット (JPEG) をメモリに保持するサービス。
+
+以前は動体検知の通知のたびに camera_monitor.capture_snapshot_from_nvr が最新の録画mp4を探し、
+`ffmpeg -sseof -1` で /tmp へ1枚切り出していた (NVRの書き込み中はリトライ待ちが入り、数秒かかる)。
+本モジュールは次の順で画像を返し、ffmpeg の起動は手元に新しい画像が無いときだけにする。
+1. メモリ: 直前に取得した画像が max_age 秒以内ならそのまま返す。
+2. ライブ配信: ライブHLSの ffmpeg が動いている間は、2つ目の出力 (`-update 1`) で
+   カメラごとの latest.jpg を毎秒上書きしている (camera_service._spawn_live_ffmpeg)。
+   更新時刻が max_age 秒以内なら読み込んでメモリへ載せる (更新時刻が変わらない限り再読み込みしない)。
+3. 録画: 最新の録画ファイルの末尾から ffmpeg で切り出す (従来の方式)。同じカメラへの同時要求は
+   1回の切り出しを待って共有し、結果はメモリへ載せる。
+
+unified_server は /api/cameras/{camera_id}/snapshot.jpg でこの画像を返す。別プロセスの camera_monitor は
+fetch_from_server でサーバーのメモリを先に参照し、無ければ従来どおり自分で録画から切り出す。
+"""
+import os
+import subprocess
+import threading
+import time
+import urllib.parse
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+import config
+from core.logger import setup_logging
+from services import recording_catalog
+
+logger = setup_logging("snapshot_service")
+
+# ライブ配信の ffmpeg が上書きし続ける最新フレームのファイル名
+LIVE_SNAPSHOT_NAME = "latest.jpg"
+
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+
+
+@dataclass
+class Snapshot:
+    """取得済みの画像1枚"""
+    data: bytes
+    captured_at: float
+    source: str
+    mtime: Optional[float] = None
+
+    def age(self, now: Optional[float] = None) -> float:
+        return max(0.0, (time.time() if now is None else now) - self.captured_at)
+
+
+def is_complete_jpeg(data: bytes) -> bool:
+    """SOI で始まり EOI で終わるか (ffmpeg が上書き中の読みかけを弾く)"""
+    return len(data) > 4 and data.startswith(_JPEG_SOI) and data.rstrip(b"\0").endswith(_JPEG_EOI)
+
+
+def extract_from_recording(cam_conf: Dict[str, Any]) -> Optional[bytes]:
+    """
+    NAS(NVR)に常時録画されている最新の動画ファイル(.mp4)から、
+    FFmpegを使用して末尾1秒前のフレームを切り出す（カメラ本体のRTSP負荷ゼロ）
+    """
+    # nas_folder は NVR録画ベースディレクトリ配下の「フォルダ名」であり、絶対パスではない
+    # (camera_service.py の get_rtsp_url等と同じ解決ロジックに合わせる)
+    nvr_base_dir = getattr(config, 'NVR_RECORD_DIR', os.getenv("NVR_RECORD_DIR", "/mnt/nas/home_system/nvr_recordings"))
+    nas_folder_name = recording_catalog.camera_folder(cam_conf)
+    nas_folder = os.path.join(nvr_base_dir, nas_folder_name)
+    if not os.path.exists(nas_folder):
+        # 設計書準拠: 介入が必要なエラー(NASマウント外れ等)は ERROR
+        logger.error(f"❌ [{cam_conf['name']}] NAS folder not found or unmounted: {nas_folder}")
+        return None
+
+    # 最新のmp4ファイルを録画カタログから取得する (NAS全体の再帰globと mtime ソートは行わない)
+    latest = recording_catalog.newest(nas_folder_name)
+
+    if latest is None:
+        logger.warning(f"⚠️ [{cam_conf['name']}] No NVR video files found in {nas_folder}.")
+        return None
+
+    latest_mp4 = latest.path
+    output_tmp = f"/tmp/snapshot_{cam_conf['name']}_{uuid.uuid4().hex}.jpg"
+
+    # 設計書「エラーハンドリングと自動復旧」準拠: NVRのバッファフラッシュ遅延を考慮したリトライ
+    max_retries = 3
+    try:
+        for attempt in range(1, max_retries + 1):
+            try:
+                # 最新の動画の「最後から1秒前」のフレームを抽出（動体検知直後の映像）
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-sseof", "-1",  # ファイル末尾から1秒前
+                    "-i", latest_mp4,
+                    "-vframes", "1",
+                    "-q:v", "2",    # 高画質
+                    output_tmp
+                ]
+
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10, check=True)
+
+                if os.path.exists(output_tmp):
+                    with open(output_tmp, "rb") as f:
+                        image_data = f.read()
+                    return image_data
+
+            except subprocess.TimeoutExpired:
+                logger.warning(f"⏳ [{cam_conf['name']}] FFmpeg timeout on NVR file (Attempt {attempt}/{max_retries})")
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"⚠️ [{cam_conf['name']}] FFmpeg extraction failed: {e} (Attempt {attempt}/{max_retries})")
+            except Exception as e:
+                logger.error(f"❌ [{cam_conf['name']}] Unexpected error in NVR extraction: {e}")
+                break
+
+            time.sleep(2 ** attempt)  # Exponential Backoff
+
+        return None
+    finally:
+        # タイムアウトや異常終了でffmpegが output_tmp に部分書き込みしたファイルを
+        # 残したまま関数を抜けると /tmp に残骸が蓄積するため、どの終了経路でも削除する。
+        try:
+            if os.path.exists(output_tmp):
+                os.remove(output_tmp)
+        except OSError:
+            pass
+
+
+class SnapshotService:
+    """カメラごとの最新画像のキャッシュ (メモリ → ライブ配信の latest.jpg → 録画からの切り出し)"""
+
+    def __init__(
+        self,
+        live_path: Callable[[str], str],
+        extractor: Callable[[Dict[str, Any]], Optional[bytes]] = extract_from_recording,
+        max_age_sec: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.live_path = live_path
+        self.extractor = extractor
+        self.max_age_sec = max_age_sec
+        self.clock = clock
+
+        self._cache: Dict[str, Snapshot] = {}
+        self._lock = threading.Lock()
+        # 録画からの切り出しはカメラごとに1本だけ走らせる
+        self._extract_locks: Dict[str, threading.Lock] = {}
+        self.stats: Dict[str, int] = {"memory": 0, "live": 0, "recording": 0, "miss": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _cached(self, cam_id: str, max_age: float) -> Optional[Snapshot]:
+        with self._lock:
+            snap = self._cache.get(cam_id)
+        if snap is not None and snap.age(self.clock()) <= max_age:
+            return snap
+        return None
+
+    def _store(self, cam_id: str, snap: Snapshot) -> Snapshot:
+        with self._lock:
+            self._cache[cam_id] = snap
+        return snap
+
+    def _read_live(self, cam_id: str, max_age: float) -> Optional[Snapshot]:
+        """ライブ配信の ffmpeg が書いた latest.jpg が新しければ読み込む"""
+        path = self.live_path(cam_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if self.clock() - mtime > max_age:
+            return None
+        with self._lock:
+            current = self._cache.get(cam_id)
+        if current is not None and current.mtime == mtime:
+            return None  # 読み込み済みの画像と同じ (メモリ側の鮮度判定で期限切れ)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not is_complete_jpeg(data):
+            # ffmpeg の上書き途中。次の要求 (1秒後には書き終わっている) に任せる
+            logger.debug(f"[{cam_id}] latest.jpg is being rewritten, skipped")
+            return None
+        return self._store(cam_id, Snapshot(data, captured_at=mtime, source="live", mtime=mtime))
+
+    def get(self, cam_conf: Dict[str, Any], max_age: Optional[float] = None,
+            fallback: bool = True) -> Optional[Snapshot]:
+        """
+        max_age 秒以内の画像を返す。メモリにもライブ配信にも無い場合、fallback なら録画から切り出す。
+        切り出しにも失敗した場合は None。
+        """
+        cam_id = cam_conf['id']
+        max_age = self.max_age_sec if max_age is None else max_age
+
+        snap = self._cached(cam_id, max_age)
+        if snap is not None:
+            self._count("memory")
+            return snap
+        snap = self._read_live(cam_id, max_age)
+        if snap is not None:
+            self._count("live")
+            return snap
+        if not fallback:
+            self._count("miss")
+            return None
+
+        with self._lock:
+            extract_lock = self._extract_locks.setdefault(cam_id, threading.Lock())
+        with extract_lock:
+            # 待っている間に別の要求が切り出し終えていればそれを使う
+            snap = self._cached(cam_id, max_age)
+            if snap is not None:
+                self._count("memory")
+                return snap
+            data = self.extractor(cam_conf)
+            if not data:
+                self._count("miss")
+                return None
+            self._count("recording")
+            return self._store(cam_id, Snapshot(data, captured_at=self.clock(), source="recording"))
+
+    def forget(self, cam_id: str) -> None:
+        with self._lock:
+            self._cache.pop(cam_id, None)
+
+
+def fetch_from_server(cam_id: str, max_age: Optional[float] = None,
+                      timeout: Optional[float] = None) -> Optional[bytes]:
+    """
+    unified_server のメモリ上の画像を取得する (camera_monitor など別プロセス向け)。
+    サーバー側では録画からの切り出しを行わせず、無ければ None を返して呼び出し側に任せる。
+    """
+    base_url = getattr(config, "SNAPSHOT_SERVER_URL", "http://127.0.0.1:8000").rstrip("/")
+    url = f"{base_url}/api/cameras/{urllib.parse.quote(cam_id, safe='')}/snapshot.jpg"
+    params = {"fallback": "false"}
+    if max_age is not None:
+        params["max_age"] = str(max_age)
+    try:
+        res = requests.get(url, params=params,
+                           timeout=timeout if timeout is not None else getattr(config, "SNAPSHOT_FETCH_TIMEOUT_SEC", 1.0))
+    except requests.RequestException as e:
+        logger.debug(f"[{cam_id}] Snapshot server unavailable: {e}")
+        return None
+    if res.status_code != 200 or not is_complete_jpeg(res.content):
+        return None
+    return res.content
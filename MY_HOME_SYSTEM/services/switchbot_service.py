@@ -10,18 +10,30 @@ import requests
 import config 
 # from common import retry_api_call # 削除
 
+from core import device_registry
+from core.http_client import AsyncHttpClient, TokenBucket
 from core.logger import setup_logging   # 修正: core.loggerを使用
 from models.switchbot import DeviceStatusResponse
 
 logger = setup_logging("service.switchbot")
 
-DEVICE_NAME_CACHE: Dict[str, str] = {}
+# ポーリング用のAPI呼び出し予算 (1日の上限のうち SWITCHBOT_POLL_BUDGET_RATIO 分)。プロセス内で共有する
+POLL_DAILY_BUDGET: int = int(config.SWITCHBOT_API_DAILY_LIMIT * config.SWITCHBOT_POLL_BUDGET_RATIO)
+RATE_LIMITER = TokenBucket.per_period(POLL_DAILY_BUDGET, 86400, burst=config.SWITCHBOT_RATE_BURST)
+# 同期呼び出し (デバイス名キャッシュ・単発のステータス取得・コマンド送信) で共有する接続プール
+_SESSION = requests.Session()
 
 def request_switchbot_api(url: str, headers: Dict[str, str], max_retries: int = 4) -> Optional[Dict[str, Any]]:
-    """SwitchBot APIへのリクエスト（Exponential Backoff リトライ付き）"""
+    """
+    SwitchBot APIへのリクエスト（Exponential Backoff リトライ付き）。
+    非同期のポーリングと同じ RATE_LIMITER の予算から消費し、予算切れの場合は問い合わせずに None を返す。
+    """
     for attempt in range(max_retries):
+        if RATE_LIMITER.try_acquire() > 0.0:
+            logger.warning(f"⚠️ SwitchBot API rate budget exhausted, skipped: {url}")
+            return None
         try:
-            response = requests.get(url, headers=headers, timeout=10.0)
+            response = _SESSION.get(url, headers=headers, timeout=10.0)
             response.raise_for_status()
             
             raw_data = response.json()
@@ -50,7 +62,8 @@ def request_switchbot_api(url: str, headers: Dict[str, str], max_retries: int =
 
 def post_switchbot_api(url: str, headers: Dict[str, str], json_data: Dict[str, Any]) -> Dict[str, Any]:
     """SwitchBot APIへのPOSTリクエスト（リトライ付き・コマンド動作用）"""
-    response = requests.post(url, headers=headers, json=json_data, timeout=10)
+    # 利用者の操作によるコマンドはポーリングの予算に含めない (接続プールのみ共有する)
+    response = _SESSION.post(url, headers=headers, json=json_data, timeout=10)
     response.raise_for_status()
     # コマンド送信レスポンスは汎用的なJSONが返るため、モデルバリデーションは行わずに返す
     return response.json()
@@ -105,12 +118,11 @@ def create_switchbot_auth_headers() -> Dict[str, str]:
     }
 
 def fetch_device_name_cache() -> bool:
-    """全デバイスの名前を取得してメモリに記憶する関数"""
-    global DEVICE_NAME_CACHE
+    """全デバイスの名前を取得して device_registry に登録する関数"""
     logger.info("SwitchBotデバイスリストを取得中...") # 修正: print -> logger
     
     try:
-        url = "https://api.switch-bot.com/v1.1/devices"
+        url = f"{config.SWITCHBOT_API_HOST}/v1.1/devices"
         headers = create_switchbot_auth_headers()
         if not headers:
             return False
@@ -124,14 +136,16 @@ def fetch_device_name_cache() -> bool:
         # statusCodeのチェックは request_switchbot_api 内のPydanticモデルでも行われるが念のため
         if res.get('statusCode') == 100:
             body = res.get('body', {})
+            names: Dict[str, str] = {}
             # 通常デバイス
             for d in body.get('deviceList', []): 
-                DEVICE_NAME_CACHE[d['deviceId']] = d['deviceName']
+                names[d['deviceId']] = d['deviceName']
             # 赤外線デバイス
             for d in body.get('infraredRemoteList', []): 
-                DEVICE_NAME_CACHE[d['deviceId']] = d['deviceName']
+                names[d['deviceId']] = d['deviceName']
             
-            logger.info(f"✅ {len(DEVICE_NAME_CACHE)} 個のデバイス名をキャッシュしました。") # 修正: print -> logger
+            device_registry.set_api_names(names)
+            logger.info(f"✅ {len(names)} 個のデバイス名をキャッシュしました。") # 修正: print -> logger
             return True
         else:
             logger.error(f"SwitchBot API Error: {res}")
@@ -142,8 +156,8 @@ def fetch_device_name_cache() -> bool:
         return False
 
 def get_device_name_by_id(device_id: str) -> Optional[str]:
-    """IDから名前を検索する関数"""
-    return DEVICE_NAME_CACHE.get(device_id, None)
+    """IDから名前を検索する関数 (SwitchBot API から取得した名前のみ)"""
+    return device_registry.api_name(device_id)
 
 def get_device_status(device_id: str) -> Optional[Dict[str, Any]]:
     """
@@ -158,4 +172,24 @@ def get_device_status(device_id: str) -> Optional[Dict[str, Any]]:
         return response_data
     except Exception as e:
         logger.error(f"Failed to get device status [ID:{device_id}]: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+async def get_device_status_async(client: AsyncHttpClient, device_id: str) -> Optional[Dict[str, Any]]:
+    """
+    get_device_status の非同期版。共有クライアントの接続プールと RATE_LIMITER を使う。
+    署名の nonce は試行ごとに作り直す。
+    """
+    if not config.SWITCHBOT_API_TOKEN or not config.SWITCHBOT_API_SECRET:
+        logger.warning("SwitchBot Token/Secret is missing in config.")
+        return None
+
+    url = f"{config.SWITCHBOT_API_HOST}/v1.1/devices/{device_id}/status"
+    raw_data = await client.get_json(url, limiter=RATE_LIMITER, headers_factory=create_switchbot_auth_headers)
+    if raw_data is None:
+        return None
+    try:
+        return DeviceStatusResponse(**raw_data).model_dump()
+    except Exception as e:
+        logger.error(f"Invalid status response [ID:{device_id}]: {e}")
+        return None
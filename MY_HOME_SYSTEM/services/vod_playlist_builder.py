@@ -0,0 +1,392 @@
+# MY_HOME_SYSTEM/services/vod_playlist_builder.py
+"""
+録画 (NVRの10分分割mp4) から日単位のHLSプレイリストを差分で組み立てるビルダー。
+
+以前の camera_service.generate_record_playlist は、当日分が要求されるたびに
+その日の全mp4を ffconcat で連結し直して ffmpeg で HLS VOD を丸ごと再生成していた
+(過去日付のみキャッシュ)。`-hls_playlist_type vod` のプレイリストは全体の変換が
+終わるまで書き出されないため、当日の録画が増えるほど最初の応答が遅くなり、5秒の
+待機で間に合わなければ 404 になっていた。本モジュールは
+- mp4 1ファイルごとに HLS セグメントへ分割 (`-c:v copy`) し、分割済みのファイルを
+  マニフェスト (record_YYYYMMDD.json) に記録する。2回目以降は新しいファイルだけを分割して
+  プレイリストの末尾に追記する。
+- ファイルごとにタイムスタンプが0から始まるため、ファイルの境目に `#EXT-X-DISCONTINUITY` を入れる。
+  録画の欠落 (ファイル間の隙間) は `#EXT-X-GAP` のセグメントで埋め、再生位置と時刻の対応
+  (get_record_start_offset からのオフセット) を ffconcat の duration 指定と同様に保つ。
+- 当日分は `#EXT-X-PLAYLIST-TYPE:EVENT` で ENDLIST を付けず (プレイヤーが再読み込みして追記分を取得する)、
+  過去日付は全ファイルを分割し終えた時点で VOD として ENDLIST を付け、以降は再走査しない。
+- 分割はバックグラウンドのスレッドで行い、最初の1ファイル分が書けた時点で待機側を起こす。
+  待機側は asyncio の Future (または threading.Event) で待ち、ポーリングしない。
+- NVR が書き込み中の最新ファイル (moov が未確定) は、次のファイルが現れるか
+  settle_sec 秒更新が止まるまで分割しない。
+"""
+import asyncio
+import glob
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.logger import setup_logging
+
+logger = setup_logging("vod_playlist_builder")
+
+Segment = Tuple[str, float]
+Segmenter = Callable[[str, str, str], Optional[List[Segment]]]
+Lister = Callable[[str, str], List[str]]
+
+MANIFEST_VERSION = 1
+# これより短いファイル間の隙間は無視する (NVRのファイル切り替えで生じる1秒未満のずれ)
+GAP_MIN_SEC = 1.0
+GAP_URI = "gap.ts"
+
+
+def source_start_seconds(filename: str) -> Optional[int]:
+    """`20260720_210200.mp4` のようなファイル名から0時からの秒数を返す"""
+    try:
+        time_str = os.path.basename(filename).split("_")[1].split(".")[0]
+        dt = datetime.strptime(time_str, "%H%M%S")
+    except (IndexError, ValueError):
+        return None
+    return dt.hour * 3600 + dt.minute * 60 + dt.second
+
+
+def parse_media_playlist(path: str) -> List[Segment]:
+    """ffmpeg が書き出したメディアプレイリストから (セグメントURI, 秒数) の一覧を読む"""
+    segments: List[Segment] = []
+    duration: Optional[float] = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((os.path.basename(line), duration))
+                duration = None
+    return segments
+
+
+def ffmpeg_segmenter(source_path: str, out_dir: str, prefix: str, hls_time: int = 4) -> Optional[List[Segment]]:
+    """mp4 1ファイルを再エンコードせずに HLS セグメントへ分割する。失敗時は None"""
+    media_playlist = os.path.join(out_dir, f"{prefix}.m3u8")
+    cmd = [
+        "nice", "-n", "15",
+        "ffmpeg", "-y",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", source_path,
+        "-c:v", "copy",
+        "-an",
+        "-f", "hls",
+        "-hls_time", str(hls_time),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, f"{prefix}_%04d.ts"),
+        media_playlist,
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=600)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.error(f"❌ Segmenting failed: {os.path.basename(source_path)} {type(e).__name__}: {e}")
+        return None
+    if result.returncode != 0 or not os.path.exists(media_playlist):
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()[-300:]
+        logger.error(f"❌ Segmenting failed: {os.path.basename(source_path)} (code={result.returncode}) {stderr}")
+        return None
+    try:
+        return parse_media_playlist(media_playlist)
+    finally:
+        try:
+            os.remove(media_playlist)
+        except OSError:
+            pass
+
+
+def glob_lister(source_dir: str, date: str) -> List[str]:
+    """source_dir 直下の指定日 (YYYYMMDD) の録画を開始時刻順に返す"""
+    return sorted(glob.glob(os.path.join(source_dir, f"{date}_*.mp4")))
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class VodDay:
+    """1カメラ・1日分のプレイリストの状態"""
+
+    def __init__(self, camera_id: str, date: str, out_dir: str, source_dir: str) -> None:
+        self.camera_id = camera_id
+        self.date = date
+        self.out_dir = out_dir
+        self.source_dir = source_dir
+        self.playlist_path = os.path.join(out_dir, f"record_{date}.m3u8")
+        self.manifest_path = os.path.join(out_dir, f"record_{date}.json")
+        self.sources: List[Dict[str, Any]] = []
+        self.complete = False
+        self.job: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self._waiters: List[Callable[[], None]] = []
+
+    @property
+    def key(self) -> str:
+        return f"{self.camera_id}_{self.date}"
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.sources) and os.path.exists(self.playlist_path)
+
+    @property
+    def building(self) -> bool:
+        return self.job is not None and self.job.is_alive()
+
+    # --- 永続化 ---
+    def load(self, today: str) -> None:
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.sources = data.get("sources", [])
+                    self.complete = bool(data.get("complete")) and os.path.exists(self.playlist_path)
+                    return
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ [{self.key}] VOD manifest is unreadable, rebuilding: {e}")
+        elif self.date < today and os.path.exists(self.playlist_path):
+            # 差分生成の導入前に一括生成された過去日付のプレイリストはそのまま使う
+            self.complete = True
+            self.sources = [{"file": "(legacy)", "start": 0, "segments": []}]
+            return
+        self.reset()
+
+    def reset(self) -> None:
+        self.sources = []
+        self.complete = False
+        for path in (self.playlist_path, self.manifest_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def save(self) -> None:
+        """プレイリストとマニフェストを書き出す (いずれも一時ファイル経由で置き換える)"""
+        _write_atomic(self.playlist_path, self.render())
+        _write_atomic(self.manifest_path, json.dumps(
+            {"version": MANIFEST_VERSION, "complete": self.complete, "sources": self.sources},
+            ensure_ascii=False,
+        ))
+
+    def render(self) -> str:
+        durations = [d for s in self.sources for _, d in s["segments"]]
+        target = max(1, math.ceil(max(durations))) if durations else 4
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            f"#EXT-X-PLAYLIST-TYPE:{'VOD' if self.complete else 'EVENT'}",
+        ]
+        expected_start: Optional[float] = None
+        for i, source in enumerate(self.sources):
+            if not source["segments"]:
+                continue
+            start = source.get("start")
+            if expected_start is not None and start is not None and start - expected_start >= GAP_MIN_SEC:
+                # 録画の欠落: 再生位置が時刻とずれないよう、取得不要なGAPセグメントで埋める
+                lines.append("#EXT-X-DISCONTINUITY")
+                remaining = start - expected_start
+                while remaining > 0.0005:
+                    chunk = min(float(target), remaining)
+                    lines += [f"#EXTINF:{chunk:.3f},", "#EXT-X-GAP", GAP_URI]
+                    remaining -= chunk
+            if expected_start is not None:
+                lines.append("#EXT-X-DISCONTINUITY")
+            for uri, duration in source["segments"]:
+                lines += [f"#EXTINF:{duration:.3f},", uri]
+            source_duration = sum(d for _, d in source["segments"])
+            base = start if start is not None else (expected_start or 0.0)
+            expected_start = max(expected_start or 0.0, base + source_duration)
+        if self.complete:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    # --- 待機 ---
+    def add_waiter(self, callback: Callable[[], None]) -> bool:
+        """プレイリストの更新・生成の終了時に呼ぶコールバックを登録する。既に待つ必要が無ければ False"""
+        with self.lock:
+            if self.ready or not self.building:
+                return False
+            self._waiters.append(callback)
+            return True
+
+    def remove_waiter(self, callback: Callable[[], None]) -> None:
+        with self.lock:
+            if callback in self._waiters:
+                self._waiters.remove(callback)
+
+    def notify(self) -> None:
+        with self.lock:
+            waiters, self._waiters = self._waiters, []
+        for callback in waiters:
+            try:
+                callback()
+            except RuntimeError:
+                pass  # 待機側のイベントループが既に閉じている
+
+
+class VodPlaylistBuilder:
+    def __init__(
+        self,
+        segmenter: Segmenter = ffmpeg_segmenter,
+        lister: Lister = glob_lister,
+        settle_sec: float = 60.0,
+        max_jobs: int = 2,
+        clock: Callable[[], float] = time.time,
+        today: Callable[[], str] = lambda: datetime.now().strftime("%Y%m%d"),
+    ) -> None:
+        self.segmenter = segmenter
+        self.lister = lister
+        self.settle_sec = settle_sec
+        self._clock = clock
+        self._today = today
+        self._days: Dict[str, VodDay] = {}
+        self._lock = threading.Lock()
+        self._job_slots = threading.BoundedSemaphore(max_jobs)
+        self.stats: Dict[str, int] = {"segmented": 0, "failed": 0, "rebuilt": 0}
+
+    def _day(self, camera_id: str, date: str, out_dir: str, source_dir: str) -> VodDay:
+        key = f"{camera_id}_{date}"
+        with self._lock:
+            day = self._days.get(key)
+            if day is None or day.out_dir != out_dir or day.source_dir != source_dir:
+                os.makedirs(out_dir, exist_ok=True)
+                day = VodDay(camera_id, date, out_dir, source_dir)
+                day.load(self._today())
+                self._days[key] = day
+            return day
+
+    def request(self, camera_id: str, date: str, out_dir: str, source_dir: str) -> Optional[VodDay]:
+        """
+        プレイリストを最新化する。未分割の録画があればバックグラウンドで分割を始める (既に実行中なら共有)。
+        録画が1件も無い場合は None。NASの走査を伴うため、イベントループからは to_thread で呼ぶ。
+        """
+        day = self._day(camera_id, date, out_dir, source_dir)
+        with day.lock:
+            if day.complete or day.building:
+                return day
+            pending = self._pending_sources(day)
+            if pending:
+                day.job = threading.Thread(target=self._run_job, args=(day,), name=f"vod-{day.key}", daemon=True)
+                day.job.start()
+            elif not day.sources:
+                return None
+            elif self._finalize_if_done(day):
+                day.save()
+        return day
+
+    def _pending_sources(self, day: VodDay) -> List[str]:
+        """分割が必要なmp4 (書き込み中の最新ファイルを除く) を返す。day.lock を保持して呼ぶ"""
+        if not os.path.isdir(day.source_dir):
+            return []
+        files = self.lister(day.source_dir, day.date)
+        if files and self._is_being_written(files[-1]):
+            files = files[:-1]
+        done = [s["file"] for s in day.sources]
+        names = [os.path.basename(f) for f in files]
+        if names[:len(done)] != done:
+            # 分割済みより前に録画が追加された・削除された場合は先頭から作り直す
+            logger.info(f"🔁 [{day.key}] Recordings changed before the last segmented file, rebuilding playlist")
+            self.stats["rebuilt"] += 1
+            day.reset()
+            done = []
+        return [f for f in files[len(done):]]
+
+    def _is_being_written(self, path: str) -> bool:
+        try:
+            return self._clock() - os.path.getmtime(path) < self.settle_sec
+        except OSError:
+            return True
+
+    def _finalize_if_done(self, day: VodDay) -> bool:
+        """過去日付で未分割のファイルが無ければ ENDLIST を付けて確定する"""
+        if day.complete or day.date >= self._today():
+            return False
+        day.complete = True
+        logger.debug(f"[{day.key}] VOD playlist finalized ({len(day.sources)} files)")
+        return True
+
+    def _run_job(self, day: VodDay) -> None:
+        try:
+            with self._job_slots:
+                while True:
+                    with day.lock:
+                        pending = self._pending_sources(day)
+                        if not pending:
+                            if self._finalize_if_done(day):
+                                day.save()
+                            break
+                    for source_path in pending:
+                        self._append_source(day, source_path)
+        except Exception as e:
+            logger.error(f"❌ [{day.key}] VOD playlist generation failed: {type(e).__name__}: {e}")
+        finally:
+            with day.lock:
+                day.job = None
+            day.notify()
+
+    def _append_source(self, day: VodDay, source_path: str) -> None:
+        name = os.path.basename(source_path)
+        prefix = os.path.splitext(name)[0]
+        started = time.perf_counter()
+        segments = self.segmenter(source_path, day.out_dir, prefix)
+        if segments is None:
+            # 壊れた録画は空のエントリとして記録し、以降は再試行しない (前後の隙間はGAPで埋まる)
+            self.stats["failed"] += 1
+            segments = []
+        else:
+            self.stats["segmented"] += 1
+        with day.lock:
+            day.sources.append({"file": name, "start": source_start_seconds(name), "segments": segments})
+            day.save()
+        logger.debug(f"[{day.key}] segmented {name}: {len(segments)} segments in {time.perf_counter() - started:.2f}s")
+        day.notify()
+
+    # --- 待機 ---
+    async def wait_playlist(self, day: VodDay, timeout: float) -> Optional[str]:
+        """最初のプレイリストが書き出されるまで待ってパスを返す。生成に失敗・タイムアウトした場合は None"""
+        if not day.ready:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+
+            def _wake() -> None:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            if day.add_waiter(_wake):
+                try:
+                    await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"⏳ [{day.key}] VOD playlist is still being generated ({timeout}s)")
+                finally:
+                    day.remove_waiter(_wake)
+        return day.playlist_path if day.ready else None
+
+    def wait_playlist_sync(self, day: VodDay, timeout: float) -> Optional[str]:
+        """wait_playlist の同期版 (スクリプト・スレッドから使う)"""
+        if not day.ready:
+            event = threading.Event()
+            if day.add_waiter(event.set):
+                event.wait(timeout)
+                day.remove_waiter(event.set)
+        return day.playlist_path if day.ready else None
+
+    def wait_idle(self, day: VodDay, timeout: Optional[float] = None) -> bool:
+        """バックグラウンドの分割が終わるまで待つ (ベンチマーク・テスト用)"""
+        job = day.job
+        if job is not None:
+            job.join(timeout)
+        return not day.building
@@ -17,6 +17,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
 import init_unified_db
+from core import ingest_queue
 
 
 @pytest.fixture
@@ -29,7 +30,9 @@ def isolated_db(tmp_path, monkeypatch):
     db_path = tmp_path / "test_home_system.db"
     monkeypatch.setattr(config, "SQLITE_DB_PATH", str(db_path))
     init_unified_db.init_db()
-    return str(db_path)
+    yield str(db_path)
+    # 書き込みバッファ(core/ingest_queue.py)に残った行をテスト終了前に書き切る
+    ingest_queue.flush()
 
 
 @pytest.fixture
@@ -49,3 +52,90 @@ def api_client(isolated_db):
     import unified_server
 
     return TestClient(unified_server.app)
+
+
+class FakeDeviceApi:
+    """
+    SwitchBot / Nature Remo API のローカル偽サーバー (aiohttp.web)。
+    応答遅延・一時的なエラー応答を設定でき、パスごとの呼び出し回数と
+    クライアント側の接続 (送信元ポート) を記録する。
+    """
+
+    def __init__(self):
+        self.latency_sec = 0.0
+        self.switchbot_status = {}
+        self.remo_appliances = []
+        self.remo_devices = []
+        self.calls = {}
+        self.client_ports = set()
+        self.fail_next = []  # 次の応答から順に返すHTTPステータス
+        self.url = None
+        self._runner = None
+
+    async def _handle(self, request):
+        import asyncio
+        from aiohttp import web
+
+        path = request.path
+        self.calls[path] = self.calls.get(path, 0) + 1
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer:
+            self.client_ports.add(peer[1])
+        if self.latency_sec:
+            await asyncio.sleep(self.latency_sec)
+        if self.fail_next:
+            return web.Response(status=self.fail_next.pop(0))
+
+        if path.startswith("/v1.1/devices/") and path.endswith("/status"):
+            device_id = path.split("/")[3]
+            if device_id not in self.switchbot_status:
+                return web.json_response({"statusCode": 190, "message": "device not found", "body": {}})
+            return web.json_response({"statusCode": 100, "message": "success", "body": self.switchbot_status[device_id]})
+        if path == "/1/appliances":
+            return web.json_response(self.remo_appliances)
+        if path == "/1/devices":
+            return web.json_response(self.remo_devices)
+        return web.Response(status=404)
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+@pytest.fixture
+async def fake_device_api(monkeypatch):
+    """
+    FakeDeviceApi を起動し、SwitchBot / Nature Remo のAPIホスト・認証情報をそこへ向ける。
+    SwitchBot のレート制限は各テストで新しいバケットに差し替える。
+    """
+    from core.http_client import TokenBucket
+    from services import switchbot_service
+
+    server = FakeDeviceApi()
+    await server.start()
+    monkeypatch.setattr(config, "SWITCHBOT_API_HOST", server.url)
+    monkeypatch.setattr(config, "NATURE_REMO_API_HOST", server.url)
+    monkeypatch.setattr(config, "SWITCHBOT_API_TOKEN", "token")
+    monkeypatch.setattr(config, "SWITCHBOT_API_SECRET", "secret")
+    monkeypatch.setattr(
+        switchbot_service, "RATE_LIMITER",
+        TokenBucket.per_period(switchbot_service.POLL_DAILY_BUDGET, 86400, burst=config.SWITCHBOT_RATE_BURST),
+    )
+    yield server
+    await server.stop()
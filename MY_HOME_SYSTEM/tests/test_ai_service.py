@@ -9,6 +9,9 @@ services/ai_service.py のテスト。
   汎用例外)
 - tool_record_child_health / tool_record_food のline_serviceへの委譲
 - _call_gemini_api_with_retry のtenacityリトライ挙動
+- モデルの使い回し・ユーザーごとの会話セッション・search_db 結果と回答のキャッシュ
+  (スタブの genai で100通あたりのモデル生成数・Gemini呼び出し数・DBクエリ数を数える)
+- 回答キャッシュは会話の最初だけで使い、返したやり取りを会話履歴へ加えること
 
 実際のGemini API・LINE APIへは一切アクセスしない。
 _call_gemini_api_with_retry自体を直接差し替えることで、analyze_text_and_execute
@@ -20,6 +23,7 @@ import queue
 import sys
 import threading
 import time
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -27,6 +31,7 @@ from google.api_core.exceptions import GoogleAPIError, ResourceExhausted
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import common
 import config
 from services import ai_service
 
@@ -53,6 +58,14 @@ def make_function_call(name, args):
     return fc
 
 
+@pytest.fixture(autouse=True)
+def fresh_ai_caches():
+    """モデル・会話セッション・検索結果・回答のキャッシュをテストごとに捨てる"""
+    ai_service.clear_caches()
+    yield
+    ai_service.clear_caches()
+
+
 @pytest.fixture
 def no_retry_sleep(monkeypatch):
     """tenacityの実待機を無効化する(stop_after_attempt等のリトライ回数ロジックは実物のまま)。"""
@@ -602,3 +615,194 @@ class TestRateLimiterLockIsThreadSafeAcrossEventLoops:
         kind, value = outcome
         assert kind == "ok", f"allow_request() raised: {value!r}"
         assert value is True
+
+
+class TestRateLimiterAcquire:
+    @pytest.mark.asyncio
+    async def test_waits_for_next_window_within_max_wait(self, monkeypatch):
+        limiter = ai_service.SimpleRateLimiter(limit=1)
+        assert await limiter.acquire() is True
+        limiter.last_reset_time = time.time() - 60  # 次のウィンドウまで残りわずか
+        started = time.monotonic()
+        assert await limiter.acquire(max_wait=1) is True
+        assert time.monotonic() - started < 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_when_window_does_not_reset_in_time(self):
+        limiter = ai_service.SimpleRateLimiter(limit=1)
+        await limiter.acquire()
+        started = time.monotonic()
+        assert await limiter.acquire(max_wait=1) is False
+        assert time.monotonic() - started < 0.5  # 間に合わないと分かっている場合は待たない
+
+
+# --- スタブの genai ---------------------------------------------------------
+
+SEARCH_SQL = {
+    "今週の食事を教えて": f"SELECT * FROM {config.SQLITE_TABLE_FOOD} WHERE timestamp >= '2026-01-01'",
+    "食事は何件？": f"select count(*)  from {config.SQLITE_TABLE_FOOD}",
+}
+
+
+class StubChat:
+    def __init__(self, model):
+        self.model = model
+        self.history = []
+
+    def send_message(self, prompt):
+        self.model.calls += 1
+        if isinstance(prompt, list):
+            result = prompt[0].function_response.response["result"]
+            self.history += [SimpleNamespace(role="user", parts=[prompt[0]]),
+                             SimpleNamespace(role="model", parts=[])]
+            return make_response(text=f"検索結果: {result[:20]}")
+        text = prompt.rsplit("ユーザーメッセージ: ", 1)[1]
+        self.history += [SimpleNamespace(role="user", parts=[SimpleNamespace(function_response=None)]),
+                         SimpleNamespace(role="model", parts=[])]
+        if text in SEARCH_SQL:
+            return make_response(function_call=make_function_call("search_db", {"sql_query": SEARCH_SQL[text]}))
+        return make_response(text=f"雑談: {text}")
+
+
+class StubModel:
+    def __init__(self, name, tools=None, system_instruction=None):
+        self.calls = 0
+        StubGenai.models.append(self)
+
+    def start_chat(self, enable_automatic_function_calling=False):
+        return StubChat(self)
+
+
+class StubGenai:
+    models = []
+    GenerativeModel = StubModel
+
+
+@pytest.fixture
+def stub_genai(ai_configured, isolated_db, monkeypatch):
+    StubGenai.models = []
+    monkeypatch.setattr(ai_service, "genai", StubGenai)
+    monkeypatch.setattr(ai_service, "rate_limiter", ai_service.SimpleRateLimiter(limit=10000))
+    counts = {"queries": 0, "versions": 0}
+    original_query, original_versions = common.execute_read_query, ai_service._table_versions
+
+    def counting_query(sql, params=()):
+        counts["queries"] += 1
+        return original_query(sql, params)
+
+    def counting_versions(tables):
+        counts["versions"] += 1
+        return original_versions(tables)
+
+    monkeypatch.setattr(ai_service.common, "execute_read_query", counting_query)
+    monkeypatch.setattr(ai_service, "_table_versions", counting_versions)
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {config.SQLITE_TABLE_FOOD} (user_id, menu_category, timestamp) VALUES (?, ?, ?)",
+            [("U1", f"メニュー{i}", f"2026-01-0{i + 1}T12:00:00+09:00") for i in range(5)],
+        )
+    return counts
+
+
+def _gemini_calls():
+    return sum(m.calls for m in StubGenai.models)
+
+
+class TestExecutionLayerWithStubGenai:
+    MESSAGES = ["今週の食事を教えて", "こんにちは", "食事は何件？", "ありがとう"]
+
+    def _run(self, count, users=5):
+        async def run():
+            return [
+                await ai_service.analyze_text_and_execute(f"U{i % users}", f"ユーザー{i % users}",
+                                                          self.MESSAGES[(i // users) % len(self.MESSAGES)])
+                for i in range(count)
+            ]
+        return asyncio.run(run())
+
+    def test_100_messages_reuse_model_sessions_and_cached_answers(self, stub_genai):
+        stats = ai_service.get_stats()
+        replies = self._run(100)
+
+        assert all(r.startswith(("検索結果", "雑談")) for r in replies)
+        after = ai_service.get_stats()
+        # 以前は1通ごとに GenerativeModel と会話セッションを作り、毎回 Gemini を呼んで検索し直していた
+        assert len(StubGenai.models) == 1
+        assert after["model_builds"] - stats["model_builds"] == 1
+        assert after["sessions_created"] - stats["sessions_created"] == 5
+        # 会話の途中では回答キャッシュを使わないため、雑談50通は1回、検索の質問50通は2回ずつ Gemini を呼ぶ
+        assert _gemini_calls() == 50 + 50 * 2
+        # 検索SQLは2種類なので、実際の検索は2回だけ (同じ検索は結果キャッシュ)
+        assert stub_genai["queries"] == 2
+        assert after["answer_hits"] - stats["answer_hits"] == 0
+        # データ版の確認: 検索50回
+        assert stub_genai["versions"] == 50
+
+    def test_first_turn_answer_is_reused_only_at_the_start_of_a_conversation(self, stub_genai):
+        self._run(5)  # 5人が会話の最初に「今週の食事を教えて」
+        calls, stats = _gemini_calls(), ai_service.get_stats()
+
+        ai_service._sessions.clear()  # 会話セッションの期限切れ
+        replies = self._run(5)
+        assert _gemini_calls() == calls
+        assert ai_service.get_stats()["answer_hits"] - stats["answer_hits"] == 5
+        assert all(r.startswith("検索結果") for r in replies)
+        # キャッシュから返したやり取りも会話履歴に残り、続く質問の文脈になる
+        session = ai_service._sessions.acquire("U0", StubGenai.models[0])
+        assert [c.role for c in session.history] == ["user", "model"]
+        assert session.history[1].parts[0].text == replies[0]
+        ai_service._sessions.release("U0", session, ok=True)
+
+        # 会話の途中の同じ質問は、Gemini に履歴ごと問い合わせる
+        asyncio.run(ai_service.analyze_text_and_execute("U0", "ユーザー0", "今週の食事を教えて"))
+        assert _gemini_calls() == calls + 2
+
+    def test_data_change_invalidates_search_and_answer(self, stub_genai):
+        self._run(20)
+        calls, queries = _gemini_calls(), stub_genai["queries"]
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute(f"INSERT INTO {config.SQLITE_TABLE_FOOD} (user_id, menu_category, timestamp) "
+                        "VALUES ('U1', 'カレー', '2026-01-09T19:00:00+09:00')")
+        self._run(20)
+        # 20通のうち検索の質問10通が Gemini へ、データが変わったため DB へも検索SQL2種類ぶん問い合わせる
+        assert _gemini_calls() - calls == 10 + 10 * 2
+        assert stub_genai["queries"] - queries == 2
+
+    def test_session_history_is_bounded(self, stub_genai, monkeypatch):
+        monkeypatch.setattr(ai_service, "_sessions", ai_service.ChatSessionStore(max_history=6))
+        self._run(40, users=1)
+        session = ai_service._sessions.acquire("U0", StubGenai.models[0])
+        assert 0 < len(session.history) <= 6
+        assert session.history[0].role == "user"
+
+
+class TestChatSessionStore:
+    def test_evicts_least_recently_used_and_expired_sessions(self):
+        now = [0.0]
+        store = ai_service.ChatSessionStore(max_users=2, ttl_sec=100, max_history=10, clock=lambda: now[0])
+        model = StubModel("m")
+        sessions = {}
+        for uid in ("A", "B", "C"):
+            sessions[uid] = store.acquire(uid, model)
+            store.release(uid, sessions[uid], ok=True)
+        assert store.acquire("A", model) is not sessions["A"]  # 上限2人を超えた A は捨てられている
+        store.release("A", sessions["A"], ok=True)
+
+        now[0] += 100
+        assert store.acquire("C", model) is not sessions["C"]  # TTL 切れ
+
+    def test_concurrent_message_gets_temporary_session_and_failure_drops_session(self):
+        store = ai_service.ChatSessionStore(max_users=2, ttl_sec=100, max_history=10)
+        model = StubModel("m")
+        first = store.acquire("A", model)
+        assert store.acquire("A", model) is not first  # 応答中のセッションは共有しない
+        store.release("A", first, ok=False)
+        assert store.acquire("A", model) is not first
+
+
+class TestSqlNormalization:
+    def test_whitespace_and_case_are_ignored_outside_literals(self):
+        assert ai_service._normalize_sql("select *\n  from food_records where a = 'Ab  c';") == \
+            ai_service._normalize_sql("SELECT * FROM food_records WHERE a = 'Ab  c'")
+        assert ai_service._normalize_sql("SELECT * FROM t WHERE a = 'x'") != \
+            ai_service._normalize_sql("SELECT * FROM t WHERE a = 'X'")
@@ -236,3 +236,86 @@ class TestSystemStats:
         urls = analysis_service.get_ngrok_url()
         assert urls["server"] == "https://server.ngrok.io"
         assert urls["dashboard"] == "https://dashboard.ngrok.io"
+
+
+class TestVectorizedPreparation:
+    """process_dataframe / apply_friendly_names の一括変換が、行ごとの変換と同じ結果になること"""
+
+    # オフセット違い・naive・小数秒・日付のみ・欠損が混在する列と、その期待値 (JST)
+    GOLDEN = [
+        ("2026-01-01T00:00:00Z", "2026-01-01 09:00:00"),
+        ("2026-01-01 09:00:00", "2026-01-01 09:00:00"),
+        ("2026-07-01T10:00:00-05:00", "2026-07-02 00:00:00"),
+        ("2026-07-01 10:00:00", "2026-07-01 10:00:00"),
+        ("2026-07-01 10:00:00+0530", "2026-07-01 13:30:00"),
+        ("2026-07-01T10:00:00.123456", "2026-07-01 10:00:00.123456"),
+        ("2026-03-15T23:59:59.5+09:00", "2026-03-15 23:59:59.5"),
+        ("2026-03-15", "2026-03-15 00:00:00"),
+        (None, None),
+    ]
+
+    def test_mixed_offsets_match_golden_values(self):
+        df = pd.DataFrame({"timestamp": [raw for raw, _ in self.GOLDEN]})
+        result = analysis_service.process_dataframe(df)["timestamp"]
+        expected = pd.Series(
+            [pd.Timestamp(v, tz="Asia/Tokyo") if v else pd.NaT for _, v in self.GOLDEN],
+            dtype="datetime64[ns, Asia/Tokyo]", name="timestamp",
+        )
+        pd.testing.assert_series_equal(result, expected)
+
+    def test_matches_row_by_row_conversion(self):
+        raw = [raw for raw, _ in self.GOLDEN] * 50
+        df = pd.DataFrame({"timestamp": raw})
+        expected = df["timestamp"].apply(analysis_service._parse_timestamp_to_jst)
+        pd.testing.assert_series_equal(analysis_service.process_dataframe(df)["timestamp"], expected)
+
+    def test_non_iso_strings_fall_back_to_row_by_row_conversion(self):
+        df = pd.DataFrame({"timestamp": ["2026/01/01 09:00"]})
+        ts = analysis_service.process_dataframe(df)["timestamp"].iloc[0]
+        assert ts == pd.Timestamp("2026-01-01 09:00", tz="Asia/Tokyo")
+
+    def test_datetime_column_is_localized_or_converted(self):
+        naive = pd.DataFrame({"timestamp": pd.to_datetime(["2026-01-01 09:00"])})
+        aware = pd.DataFrame({"timestamp": pd.to_datetime(["2026-01-01 00:00"]).tz_localize("UTC")})
+        assert analysis_service.process_dataframe(naive)["timestamp"].iloc[0].hour == 9
+        assert analysis_service.process_dataframe(aware)["timestamp"].iloc[0].hour == 9
+
+    def test_friendly_names_match_per_row_mapping(self, monkeypatch):
+        monkeypatch.setattr(config, "MONITOR_DEVICES", [
+            {"id": "dev1", "name": "居間", "location": "伊丹"},
+            {"id": "dev2", "name": "玄関", "location": "高砂"},
+        ])
+        df = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2026-01-03", "2026-01-02", "2026-01-01", "2026-01-04", "2026-01-05"]).tz_localize("Asia/Tokyo"),
+            "device_id": ["dev1", "dev2", "dev3", None, "dev3"],
+            "device_name": ["", "玄関ドア", "リビング", "匿名", None],
+        })
+        result = analysis_service.apply_friendly_names(df)
+        # dev1: 最新行の名前が空なので設定の名前 (居間 -> 伊丹のリビング)
+        # dev2: DBの最新名 / dev3: 最新行 (01-05) の名前が無いので行ごとの device_name、それも無ければ ID
+        assert result["friendly_name"].tolist() == ["伊丹のリビング", "玄関ドア", "高砂のリビング", "匿名", "dev3"]
+        assert result["location"].tolist() == ["伊丹", "高砂", "その他", "その他", "その他"]
+
+
+class TestSensorView:
+    def test_projects_columns_and_downcasts_losslessly(self):
+        df = pd.DataFrame({
+            "timestamp": pd.to_datetime(["2026-01-01", "2026-01-02"]).tz_localize("Asia/Tokyo"),
+            "device_type": ["Meter", "Plug"],
+            "friendly_name": ["a", "b"],
+            "power_watts": [100.0, 12.5],
+            "temperature_celsius": [25.1, 24.9],
+            "contact_state": [None, None],
+        })
+        view = analysis_service.sensor_view(df, "electricity")
+        assert list(view.columns) == ["timestamp", "device_type", "friendly_name", "power_watts"]
+        assert view["power_watts"].dtype == "float32"
+        assert view["power_watts"].tolist() == [100.0, 12.5]
+
+        temp = analysis_service.sensor_view(df, "temperature")
+        # float32 にすると値が変わる小数は float64 のまま
+        assert temp["temperature_celsius"].dtype == "float64"
+        assert "humidity_percent" not in temp.columns
+
+    def test_empty_dataframe_passes_through(self):
+        assert analysis_service.sensor_view(pd.DataFrame(), "logs").empty
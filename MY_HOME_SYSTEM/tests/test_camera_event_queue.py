@@ -0,0 +1,199 @@
+# MY_HOME_SYSTEM/tests/test_camera_event_queue.py
+"""
+monitors/camera_event_queue.py と camera_monitor のイベント受付のテスト。
+PullPoint は同梱の events.wsdl から作った zeep クライアントに、SOAP応答を返す偽のトランスポートを
+差し込んで再現する (実際の PullMessages と同じ zeep オブジェクト・lxml 要素が得られる)。
+- Data/SimpleItem の構造から動体検知を判定すること
+- 後段処理が遅くても PullMessages 側の処理 (解析と投入) はすぐ戻ること
+- 同じカメラの連続イベントが合体され、カメラごとに順番に処理されること
+- キューの深さと受付から処理完了までの遅延が stats に出ること
+"""
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from monitors import camera_event_queue, camera_monitor
+from monitors.camera_event_queue import CameraEvent, CameraEventQueue, is_motion_event, parse_event
+
+zeep = pytest.importorskip("zeep")
+from onvif.client import ONVIFService  # noqa: E402
+from zeep.transports import Transport  # noqa: E402
+
+CAM = {"id": "cam_garden", "name": "庭カメラ"}
+CAM2 = {"id": "cam_parking", "name": "駐車場カメラ"}
+
+_ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope" xmlns:tev="http://www.onvif.org/ver10/events/wsdl"
+  xmlns:wsnt="http://docs.oasis-open.org/wsn/b-2" xmlns:tns1="http://www.onvif.org/ver10/topics"
+  xmlns:tt="http://www.onvif.org/ver10/schema">
+<env:Body><tev:PullMessagesResponse>
+<tev:CurrentTime>2026-01-10T00:00:00Z</tev:CurrentTime><tev:TerminationTime>2026-01-10T00:10:00Z</tev:TerminationTime>
+{messages}
+</tev:PullMessagesResponse></env:Body></env:Envelope>"""
+
+_MESSAGE = """<wsnt:NotificationMessage>
+<wsnt:Topic Dialect="http://www.onvif.org/ver10/tev/topicExpression/ConcreteSet">{topic}</wsnt:Topic>
+<wsnt:Message><tt:Message UtcTime="2026-01-10T00:00:00Z" PropertyOperation="Changed">
+<tt:Source><tt:SimpleItem Name="VideoSourceConfigurationToken" Value="vsconf"/><tt:SimpleItem Name="Rule" Value="MyMotionDetectorRule"/></tt:Source>
+<tt:Data><tt:SimpleItem Name="{name}" Value="{value}"/></tt:Data>
+</tt:Message></wsnt:Message></wsnt:NotificationMessage>"""
+
+
+def _message(name="IsMotion", value="true", topic="tns1:RuleEngine/CellMotionDetector/Motion"):
+    return _MESSAGE.format(topic=topic, name=name, value=value)
+
+
+class FakePullPointTransport(Transport):
+    """PullMessages の呼び出しごとに、用意した応答を順に返す"""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+
+    def post_xml(self, address, envelope, headers):
+        body = self.responses.pop(0) if self.responses else ""
+        response = requests.Response()
+        response.status_code = 200
+        response._content = _ENVELOPE.format(messages=body).encode("utf-8")
+        response.headers["Content-Type"] = "application/soap+xml; charset=utf-8"
+        response.encoding = "utf-8"
+        return response
+
+
+@pytest.fixture
+def pullpoint():
+    """同梱WSDLの PullPointSubscriptionBinding で作った偽の PullPoint サービス"""
+    wsdl_dir = camera_monitor.find_wsdl_path()
+    if not wsdl_dir:
+        pytest.skip("ONVIF WSDL is not installed")
+
+    def create(*responses):
+        return ONVIFService(
+            xaddr="http://192.0.2.10/onvif/pullpoint", user="user", passwd="pass",
+            url=os.path.join(wsdl_dir, "events.wsdl"), encrypt=True, no_cache=True,
+            binding_name=camera_monitor.BINDING_NAME, transport=FakePullPointTransport(responses),
+        )
+    return create
+
+
+def _pull(service):
+    events = service.PullMessages({'Timeout': timedelta(seconds=2), 'MessageLimit': 100})
+    return list(getattr(events, 'NotificationMessage', None) or [])
+
+
+class TestParse:
+    def test_structured_data_decides_motion(self, pullpoint):
+        service = pullpoint(_message("IsMotion", "true") + _message("IsMotion", "false")
+                            + _message("IsTamper", "true", topic="tns1:RuleEngine/TamperDetector/Tamper"))
+        messages = _pull(service)
+
+        parsed = [parse_event(msg, CAM) for msg in messages]
+        assert parsed[0] is not None and parsed[0].data == {"IsMotion": "true"}
+        # Source の Rule 名に Motion を含んでいても、Data が false なら動体ではない
+        assert parsed[1] is None
+        # zeep は Topic 本文を落とすため、IsMotion 以外は Topic から判定できない限り動体としない
+        assert parsed[2] is None
+
+    def test_topic_rules(self):
+        assert is_motion_event("tns1:VideoSource/MotionAlarm", {"State": "true"})
+        assert not is_motion_event("tns1:VideoSource/MotionAlarm", {"State": "false"})
+        assert is_motion_event("tns1:RuleEngine/PeopleDetector/People", {"IsPeople": "1"})
+        assert not is_motion_event("tns1:Device/Trigger/DigitalInput", {"LogicalState": "true"})
+        assert is_motion_event("Unknown", {"IsMotion": "true"})
+
+
+class TestQueue:
+    def test_bursts_are_coalesced_per_camera(self):
+        started, release = threading.Event(), threading.Event()
+        handled = []
+
+        def handler(event):
+            handled.append((event.cam_id, event.count))
+            started.set()
+            release.wait(5)
+
+        queue = CameraEventQueue(handler, workers=2, stats_interval_sec=0)
+        queue.start()
+        try:
+            queue.put(CameraEvent(CAM, "t", {}, time.monotonic()))
+            assert started.wait(5)
+            # 1件目の処理中に届いた同じカメラのイベントは1件にまとまり、処理中は取り出されない
+            for _ in range(5):
+                queue.put(CameraEvent(CAM, "t", {}, time.monotonic()))
+            time.sleep(0.05)
+            assert queue.stats()["depth"] == 1
+            assert handled == [("cam_garden", 1)]
+            release.set()
+            assert queue.drain(5)
+        finally:
+            queue.stop()
+
+        assert handled == [("cam_garden", 1), ("cam_garden", 5)]
+        stats = queue.stats()
+        assert stats["coalesced"] == 4 and stats["handled"] == 2 and stats["depth"] == 0
+
+    def test_cameras_are_handled_in_parallel_and_latency_is_reported(self):
+        barrier = threading.Barrier(2, timeout=5)
+        queue = CameraEventQueue(lambda event: barrier.wait(), workers=2, stats_interval_sec=0)
+        queue.start()
+        try:
+            queue.put(CameraEvent(CAM, "t", {}, time.monotonic()))
+            queue.put(CameraEvent(CAM2, "t", {}, time.monotonic()))
+            assert queue.drain(5)
+        finally:
+            queue.stop()
+        stats = queue.stats()
+        assert stats["handled"] == 2 and stats["max_depth"] == 2
+        assert stats["latency_ms"]["max"] >= stats["latency_ms"]["avg"] > 0
+
+    def test_handler_error_is_counted(self):
+        def handler(event):
+            raise RuntimeError("boom")
+
+        queue = CameraEventQueue(handler, workers=1, stats_interval_sec=0)
+        queue.start()
+        try:
+            queue.put(CameraEvent(CAM, "t", {}, time.monotonic()))
+            assert queue.drain(5)
+        finally:
+            queue.stop()
+        assert queue.stats()["failed"] == 1
+
+
+def test_slow_snapshot_does_not_block_pull_loop(pullpoint, isolated_db, monkeypatch):
+    snapshots = []
+
+    def slow_snapshot(cam_name, event_type="motion"):
+        time.sleep(0.3)
+        snapshots.append(cam_name)
+
+    queue = camera_event_queue.CameraEventQueue(camera_monitor.handle_motion_event, workers=2, stats_interval_sec=0)
+    monkeypatch.setattr(camera_monitor, "event_queue", queue)
+    monkeypatch.setattr(camera_monitor, "save_image_from_stream", slow_snapshot)
+    monkeypatch.setattr(camera_monitor, "last_motion_detected", {})
+    queue.start()
+    try:
+        service = pullpoint(_message() * 3, _message(), _message("IsMotion", "false"))
+        started = time.perf_counter()
+        enqueued = [camera_monitor.process_camera_event(msg, CAM) for _ in range(3) for msg in _pull(service)]
+        pull_loop_sec = time.perf_counter() - started
+        assert queue.drain(5)
+    finally:
+        queue.stop()
+
+    assert pull_loop_sec < 0.3
+    assert enqueued == [True, True, True, True, False]
+    # 最初のイベントで記録・撮影し、残りはクールダウンで捨てられる
+    assert snapshots == ["庭カメラ"]
+    camera_monitor.ingest_queue.flush()
+    from core.database import get_db_cursor
+    with get_db_cursor() as cur:
+        rows = cur.execute("SELECT device_id, movement_state FROM device_records WHERE device_type = 'ONVIF_CAMERA'").fetchall()
+    assert [tuple(r) for r in rows] == [("cam_garden", "ON")]
@@ -27,12 +27,12 @@ class TestCaptureSnapshotCleansUpOnFailure:
     残したまま関数を抜けると、/tmp に残骸が蓄積し続けていた。
     """
 
-    def test_leftover_tmp_file_is_removed_when_all_retries_fail(self, tmp_path, monkeypatch):
+    def test_leftover_tmp_file_is_removed_when_all_retries_fail(self, isolated_db, tmp_path, monkeypatch):
         # 他のテスト・実プロセスの /tmp/snapshot_*.jpg と衝突しないよう一意なカメラ名にする。
         cam_name = f"TestCam_{uuid.uuid4().hex[:8]}"
         nas_folder = tmp_path / cam_name
         nas_folder.mkdir()
-        (nas_folder / "recording.mp4").write_bytes(b"fake video")
+        (nas_folder / "20260101_100000.mp4").write_bytes(b"fake video")
 
         cam_conf = {"name": cam_name, "nas_folder": cam_name}
         monkeypatch.setattr(camera_monitor.config, "NVR_RECORD_DIR", str(tmp_path), raising=False)
@@ -8,6 +8,7 @@ routers/camera_router.py の成功パス(TestClient経由)。
 import json
 import os
 import sys
+from unittest.mock import AsyncMock
 
 import pytest
 
@@ -15,6 +16,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
 from routers import camera_router
+from services.live_session_manager import LiveSessionLimitError
 
 
 @pytest.fixture
@@ -68,11 +70,18 @@ def test_update_camera_settings_unknown_camera_returns_404(api_client, one_camer
     assert res.status_code == 404
 
 
+class _ReadySession:
+    def __init__(self, playlist_path):
+        self.playlist_path = playlist_path
+
+
 def test_get_live_stream_returns_playlist_once_ready(api_client, one_camera, tmp_path, monkeypatch):
     playlist = tmp_path / "stream.m3u8"
     playlist.write_text("#EXTM3U\n")
 
-    monkeypatch.setattr(camera_router.camera_service, "start_hls_stream", lambda cam_conf: str(playlist))
+    monkeypatch.setattr(camera_router.camera_service, "open_live_session",
+                        lambda cam_conf, viewer=None: _ReadySession(str(playlist)))
+    monkeypatch.setattr(camera_router.camera_service.live_sessions, "wait_ready", AsyncMock(return_value=True))
 
     res = api_client.get("/api/cameras/live/cam1/stream.m3u8")
     assert res.status_code == 200
@@ -85,18 +94,29 @@ def test_get_live_stream_unknown_camera_returns_404(api_client, one_camera):
 
 
 def test_get_live_stream_failed_initialization_returns_500(api_client, one_camera, monkeypatch):
-    monkeypatch.setattr(camera_router.camera_service, "start_hls_stream", lambda cam_conf: None)
+    monkeypatch.setattr(camera_router.camera_service, "open_live_session", lambda cam_conf, viewer=None: None)
     res = api_client.get("/api/cameras/live/cam1/stream.m3u8")
     assert res.status_code == 500
 
 
 def test_get_live_stream_times_out_if_playlist_never_appears(api_client, one_camera, tmp_path, monkeypatch):
     never_created = tmp_path / "never.m3u8"
-    monkeypatch.setattr(camera_router.camera_service, "start_hls_stream", lambda cam_conf: str(never_created))
-    monkeypatch.setattr(camera_router.time, "sleep", lambda s: None)  # 実時間の待機をスキップ
+    monkeypatch.setattr(camera_router.camera_service, "open_live_session",
+                        lambda cam_conf, viewer=None: _ReadySession(str(never_created)))
+    monkeypatch.setattr(camera_router.camera_service.live_sessions, "wait_ready", AsyncMock(return_value=False))
+
+    res = api_client.get("/api/cameras/live/cam1/stream.m3u8")
+    assert res.status_code == 503
+
+
+def test_get_live_stream_returns_503_when_all_slots_are_watched(api_client, one_camera, monkeypatch):
+    def _full(cam_conf, viewer=None):
+        raise LiveSessionLimitError("full")
+    monkeypatch.setattr(camera_router.camera_service, "open_live_session", _full)
 
     res = api_client.get("/api/cameras/live/cam1/stream.m3u8")
     assert res.status_code == 503
+    assert res.json()["detail"] == "Too many live streams"
 
 
 def test_get_record_info_returns_offset(api_client, one_camera, monkeypatch):
@@ -115,13 +135,14 @@ def test_get_record_file_playlist_success(api_client, one_camera, tmp_path, monk
     playlist = tmp_path / "record.m3u8"
     playlist.write_text("#EXTM3U\n")
     monkeypatch.setattr(
-        camera_router.camera_service, "generate_record_playlist", lambda cam_conf, date: str(playlist)
+        camera_router.camera_service, "get_record_playlist", AsyncMock(return_value=str(playlist))
     )
     res = api_client.get("/api/cameras/record/cam1/2026-01-01/record.m3u8")
     assert res.status_code == 200
+    assert res.headers["cache-control"] == "no-cache"
 
 
 def test_get_record_file_playlist_not_found_returns_404(api_client, one_camera, monkeypatch):
-    monkeypatch.setattr(camera_router.camera_service, "generate_record_playlist", lambda cam_conf, date: None)
+    monkeypatch.setattr(camera_router.camera_service, "get_record_playlist", AsyncMock(return_value=None))
     res = api_client.get("/api/cameras/record/cam1/2026-01-01/record.m3u8")
     assert res.status_code == 404
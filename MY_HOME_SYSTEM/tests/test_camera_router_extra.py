@@ -20,10 +20,10 @@ from routers.camera_router import _resolve_segment_path, get_record_file, get_li
 
 
 class TestUnknownCameraIsRejectedBeforePathResolution:
-    def test_get_record_file_unknown_camera_returns_404(self, monkeypatch):
+    async def test_get_record_file_unknown_camera_returns_404(self, monkeypatch):
         monkeypatch.setattr(config, "CAMERAS", [{"id": "cam1", "name": "Cam1"}])
         with pytest.raises(HTTPException) as exc_info:
-            get_record_file("nonexistent_camera", "2026-01-01", "seg1.ts")
+            await get_record_file("nonexistent_camera", "2026-01-01", "seg1.ts")
         assert exc_info.value.status_code == 404
 
     def test_get_live_segment_unknown_camera_returns_404(self, monkeypatch):
@@ -41,10 +41,10 @@ class TestUnknownCameraIsRejectedBeforePathResolution:
 
 
 class TestUnsupportedExtension:
-    def test_unsupported_extension_returns_400(self, monkeypatch):
+    async def test_unsupported_extension_returns_400(self, monkeypatch):
         monkeypatch.setattr(config, "CAMERAS", [{"id": "cam1", "name": "Cam1"}])
         with pytest.raises(HTTPException) as exc_info:
-            get_record_file("cam1", "2026-01-01", "video.mp4")
+            await get_record_file("cam1", "2026-01-01", "video.mp4")
         assert exc_info.value.status_code == 400
 
 
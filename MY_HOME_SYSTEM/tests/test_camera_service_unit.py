@@ -19,19 +19,16 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
 from services import camera_service
+from services.vod_playlist_builder import VodPlaylistBuilder
 
 
 @pytest.fixture(autouse=True)
 def _reset_module_state():
     """モジュールグローバルの辞書がテスト間で干渉しないようにする"""
-    camera_service._active_processes.clear()
-    camera_service._active_vod_processes.clear()
-    camera_service._vod_generation_locks.clear()
+    camera_service.live_sessions.shutdown()
     camera_service._rtsp_cache.clear()
     yield
-    camera_service._active_processes.clear()
-    camera_service._active_vod_processes.clear()
-    camera_service._vod_generation_locks.clear()
+    camera_service.live_sessions.shutdown()
     camera_service._rtsp_cache.clear()
 
 
@@ -64,22 +61,6 @@ class TestMaskRtspUrlForLog:
         assert isinstance(result, str)
 
 
-class TestPruneFinishedVodProcesses:
-    def test_removes_only_finished_processes(self):
-        running = MagicMock()
-        running.poll.return_value = None
-        finished = MagicMock()
-        finished.poll.return_value = 0
-
-        camera_service._active_vod_processes["cam1_20260101"] = running
-        camera_service._active_vod_processes["cam1_20260102"] = finished
-
-        camera_service._prune_finished_vod_processes()
-
-        assert "cam1_20260101" in camera_service._active_vod_processes
-        assert "cam1_20260102" not in camera_service._active_vod_processes
-
-
 class TestSetCameraEnabledAtomicWrite:
     def test_writes_atomically_and_no_tmp_file_left_behind(self, tmp_path, monkeypatch):
         devices_path = tmp_path / "devices.json"
@@ -140,9 +121,9 @@ class TestStartHlsStreamLogFileHandling:
 
 
 class TestGenerateRecordPlaylistConcurrency:
-    def test_concurrent_calls_for_same_key_spawn_ffmpeg_only_once(self, tmp_path, monkeypatch):
-        """M-3-4回帰防止: 同一cam_id・日付への同時リクエストでffmpegが
-        二重起動しないこと(check-then-act競合のレース修正)。"""
+    def test_concurrent_calls_for_same_key_segment_each_file_only_once(self, tmp_path, monkeypatch):
+        """M-3-4回帰防止: 同一cam_id・日付への同時リクエストで同じ録画を
+        二重に分割しないこと(check-then-act競合のレース修正)。"""
         nvr_dir = tmp_path / "nvr"
         cam_nvr_dir = nvr_dir / "TestCam"
         cam_nvr_dir.mkdir(parents=True)
@@ -151,34 +132,30 @@ class TestGenerateRecordPlaylistConcurrency:
         monkeypatch.setattr(config, "NVR_RECORD_DIR", str(nvr_dir), raising=False)
         monkeypatch.setattr(camera_service, "HLS_VOD_DIR", str(tmp_path / "vod"))
 
-        popen_call_count = {"n": 0}
-        lock_for_playlist = threading.Lock()
+        segmented = []
+        lock_for_count = threading.Lock()
 
-        def _fake_popen(cmd, **kwargs):
-            with lock_for_playlist:
-                popen_call_count["n"] += 1
-                # プレイリストファイルの生成を模倣
-                playlist_path = cmd[-1]
-                with open(playlist_path, "w") as f:
-                    f.write("#EXTM3U\n")
-            proc = MagicMock()
-            proc.poll.return_value = 0  # 即完了扱い
-            return proc
+        def _fake_segmenter(source_path, out_dir, prefix):
+            with lock_for_count:
+                segmented.append(os.path.basename(source_path))
+            return [(f"{prefix}_0000.ts", 4.0)]
 
+        monkeypatch.setattr(camera_service, "vod_builder", VodPlaylistBuilder(segmenter=_fake_segmenter, settle_sec=0))
         cam_conf = {"id": "cam1", "name": "TestCam"}
 
-        with patch.object(camera_service.subprocess, "Popen", side_effect=_fake_popen):
-            results = [None, None]
+        results = [None, None]
+        barrier = threading.Barrier(2)
 
-            def _call(idx):
-                results[idx] = camera_service.generate_record_playlist(cam_conf, "20260101")
+        def _call(idx):
+            barrier.wait()
+            results[idx] = camera_service.generate_record_playlist(cam_conf, "20260101")
 
-            t1 = threading.Thread(target=_call, args=(0,))
-            t2 = threading.Thread(target=_call, args=(1,))
-            t1.start()
-            t2.start()
-            t1.join()
-            t2.join()
+        t1 = threading.Thread(target=_call, args=(0,))
+        t2 = threading.Thread(target=_call, args=(1,))
+        t1.start()
+        t2.start()
+        t1.join()
+        t2.join()
 
-        assert popen_call_count["n"] == 1
+        assert segmented == ["20260101_100000.mp4"]
         assert all(r is not None for r in results)
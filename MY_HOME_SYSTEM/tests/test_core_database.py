@@ -10,10 +10,12 @@ save_log_generic / save_log_async / execute_read_query のテスト。
 - with文本体実行中(接続確立後)のlockedエラーはリトライされずrollback+再送出されること
 - "locked" 以外のOperationalError・想定外の例外でのrollback
 - save_log_generic の成功/失敗、save_log_asyncのラッパー動作
+- スレッド単位の接続プール(再利用・ネスト時の分離・DBファイル差し替え検知・統計)
 """
 import os
 import sqlite3
 import sys
+import threading
 from unittest.mock import patch
 
 import pytest
@@ -52,6 +54,9 @@ class TestGetDbCursorRetry:
         assert row is not None
 
     def test_retries_on_locked_error_then_succeeds(self, isolated_db):
+        # isolated_db(init_db)で確立した接続がプールに残っていると接続確立自体が
+        # 発生しないため、プールを空にしてから検証する
+        db.reset_connection_pools()
         real_connect = sqlite3.connect
         call_count = {"n": 0}
 
@@ -77,6 +82,7 @@ class TestGetDbCursorRetry:
         本文中でRuntimeErrorに化けることなく、元のOperationalErrorがそのまま
         呼び出し元に伝播すること(H-1修正の回帰防止)。
         """
+        db.reset_connection_pools()
         call_count = {"n": 0}
 
         def _always_locked(*args, **kwargs):
@@ -191,3 +197,123 @@ class TestExecuteReadQuery:
     def test_returns_error_message_on_malformed_sql(self, isolated_db):
         result = db.execute_read_query("SELECT * FROM nonexistent_table_xyz")
         assert result.startswith("検索エラー:")
+
+
+class TestConnectionPool:
+    def test_connection_is_reused_within_the_same_thread(self, isolated_db):
+        db.reset_connection_pools()
+        with db.get_db_cursor() as cur:
+            first = cur.connection
+        with db.get_db_cursor() as cur:
+            second = cur.connection
+        assert first is second
+
+    def test_nested_cursor_gets_a_separate_connection(self, isolated_db):
+        """ネストした取得でトランザクションを共有すると、内側のrollbackが外側の
+        未コミット変更まで巻き戻してしまうため、別接続が払い出されること"""
+        with db.get_db_cursor(commit=True) as outer:
+            _seed_table(outer)
+            with pytest.raises(sqlite3.OperationalError):
+                with db.get_db_cursor(commit=True) as inner:
+                    assert inner.connection is not outer.connection
+                    raise sqlite3.OperationalError("boom")
+
+        with db.get_db_cursor() as cur:
+            row = cur.execute("SELECT name FROM quest_users WHERE user_id='dad'").fetchone()
+        assert row["name"] == "Dad"
+
+    def test_uncommitted_changes_are_discarded_on_release(self, isolated_db):
+        """commit=Falseで書き込んだ変更は、従来のclose()と同様に破棄されること"""
+        with db.get_db_cursor() as cur:
+            _seed_table(cur)
+        with db.get_db_cursor() as cur:
+            row = cur.execute("SELECT * FROM quest_users WHERE user_id='dad'").fetchone()
+        assert row is None
+
+    def test_connections_are_not_shared_across_threads(self, isolated_db):
+        with db.get_db_cursor() as cur:
+            main_conn_id = id(cur.connection)
+
+        seen = {}
+
+        def _worker():
+            with db.get_db_cursor() as cur:
+                seen["id"] = id(cur.connection)
+                seen["value"] = cur.execute("SELECT 1").fetchone()[0]
+
+        t = threading.Thread(target=_worker)
+        t.start()
+        t.join()
+        assert seen["value"] == 1
+        assert seen["id"] != main_conn_id
+
+    def test_replaced_db_file_is_detected(self, tmp_path, monkeypatch):
+        """DBファイルが削除・再作成された場合、古いinodeを指す接続は再利用されないこと"""
+        db_path = str(tmp_path / "replaced.db")
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", db_path)
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("CREATE TABLE t (v INTEGER)")
+            cur.execute("INSERT INTO t VALUES (1)")
+
+        os.remove(db_path)
+        with sqlite3.connect(db_path) as fresh:
+            fresh.execute("CREATE TABLE t (v INTEGER)")
+            fresh.execute("INSERT INTO t VALUES (2)")
+        fresh.close()
+
+        with db.get_db_cursor() as cur:
+            assert cur.execute("SELECT v FROM t").fetchone()[0] == 2
+
+    def test_db_path_change_switches_connection(self, tmp_path, monkeypatch):
+        path_a = str(tmp_path / "a.db")
+        path_b = str(tmp_path / "b.db")
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", path_a)
+        with db.get_db_cursor(commit=True) as cur:
+            cur.execute("CREATE TABLE only_in_a (v INTEGER)")
+
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", path_b)
+        with db.get_db_cursor() as cur:
+            row = cur.execute(
+                "SELECT name FROM sqlite_master WHERE name='only_in_a'"
+            ).fetchone()
+        assert row is None
+
+    def test_stats_count_hits_misses_and_busy_retries(self, isolated_db):
+        db.reset_connection_pools()
+        db._rw_pool.reset_stats()
+        real_connect = sqlite3.connect
+        call_count = {"n": 0}
+
+        def _flaky_connect(*args, **kwargs):
+            call_count["n"] += 1
+            if call_count["n"] < 2:
+                raise sqlite3.OperationalError("database is locked")
+            return real_connect(*args, **kwargs)
+
+        with patch("core.database.time.sleep", return_value=None), \
+             patch("core.database.sqlite3.connect", side_effect=_flaky_connect):
+            with db.get_db_cursor():
+                pass
+        with db.get_db_cursor():
+            pass
+
+        stats = db.get_pool_stats()["rw"]
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["busy_retries"] == 1
+        assert stats["wait_time_sec"] >= 0.0
+
+    def test_read_only_connection_is_pooled_and_rejects_writes(self, isolated_db):
+        conn = db.get_ro_connection()
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO quest_users (user_id, name) VALUES ('x', 'x')")
+        finally:
+            conn.close()
+
+        again = db.get_ro_connection()
+        try:
+            assert again is conn
+            assert isinstance(again, sqlite3.Connection)
+        finally:
+            again.close()
@@ -0,0 +1,175 @@
+# MY_HOME_SYSTEM/tests/test_dashboard_data.py
+"""
+services/dashboard_data.py (ダッシュボードのセンサーデータ差分キャッシュとデバイス別索引) のテスト。
+
+- 差分の読み込みを重ねた結果が、毎回 load_sensor_data(limit) で全件を読み直した結果と一致すること
+- 2回目以降は id の高水位標より新しい行だけを読み、新しい行が無ければ統合をやり直さないこと
+- full_refresh_sec を過ぎると全件を読み直し、削除された行が消えること
+- merge_sensor_frames の統合結果の dtype (timestamp・電力・温度) が、取得元ごとの全欠損の列に左右されないこと
+- SensorIndex.window が、全行へ device_type と時間帯の条件を当てた絞り込みと同じ行を返すこと
+"""
+import os
+import sys
+import warnings
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+from services import analysis_service
+from services.dashboard_data import SensorFrameCache, SensorIndex
+
+POWER = config.SQLITE_TABLE_POWER_USAGE
+METER = config.SQLITE_TABLE_SWITCHBOT_LOGS
+BASE = datetime(2026, 1, 10, 9, 0, 0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _ts(minute: int) -> str:
+    return (BASE + timedelta(minutes=minute)).isoformat() + "+09:00"
+
+
+def _insert(start: int, count: int) -> None:
+    """start 分目から1分おきに、電力・温湿度・開閉の各テーブルへ count 行ずつ追加する"""
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {POWER} (device_id, device_name, wattage, timestamp) VALUES (?, ?, ?, ?)",
+            [(f"plug{m % 2}", f"プラグ{m % 2}", 100 + m, _ts(m)) for m in range(start, start + count)],
+        )
+        cur.executemany(
+            f"INSERT INTO {METER} (device_id, device_name, temperature, humidity, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(f"meter{m % 3}", f"温湿度計{m % 3}", 20 + m % 5, 50, _ts(m) if m % 7 else _ts(m)[:-6])
+             for m in range(start, start + count)],
+        )
+        cur.executemany(
+            "INSERT INTO device_records (timestamp, device_id, device_name, device_type, contact_state) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(_ts(m), "door", "玄関", "Contact Sensor", "open" if m % 2 else "close")
+             for m in range(start, start + count)],
+        )
+
+
+def _assert_same(actual: pd.DataFrame, expected: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+class TestSensorFrameCache:
+    def test_incremental_matches_full_reload(self, isolated_db):
+        clock = Clock()
+        cache = SensorFrameCache(limit=40, full_refresh_sec=600, clock=clock)
+        _insert(0, 30)
+        _assert_same(cache.get(), analysis_service.load_sensor_data(limit=40))
+
+        for start in (30, 45, 60):
+            _insert(start, 15)
+            clock.now += 30
+            _assert_same(cache.get(), analysis_service.load_sensor_data(limit=40))
+
+        assert cache.stats["full_loads"] == 1
+        assert cache.stats["incremental_loads"] == 3
+        assert cache.stats["rows_appended"] == 3 * 15 * 3
+
+    def test_only_new_rows_are_queried(self, isolated_db):
+        calls = []
+
+        def loader(source, limit, after_id=None):
+            calls.append((source[0], after_id))
+            return analysis_service.load_sensor_source(source, limit, after_id=after_id)
+
+        clock = Clock()
+        cache = SensorFrameCache(limit=100, full_refresh_sec=600, loader=loader, clock=clock)
+        _insert(0, 10)
+        first = cache.get()
+        assert all(after_id is None for _, after_id in calls)
+
+        calls.clear()
+        clock.now += 30
+        assert cache.get() is first  # 新しい行が無ければ統合をやり直さない
+        assert cache.stats["merges"] == 1
+        assert {table: after_id for table, after_id in calls} == {POWER: 10, METER: 10, "device_records": 10}
+
+        _insert(10, 2)
+        clock.now += 30
+        assert len(cache.get()) == 36
+        assert cache.stats["rows_appended"] == 6
+
+    def test_full_refresh_picks_up_deletions(self, isolated_db):
+        clock = Clock()
+        cache = SensorFrameCache(limit=100, full_refresh_sec=600, clock=clock)
+        _insert(0, 10)
+        assert len(cache.get()) == 30
+
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute(f"DELETE FROM {POWER}")
+        clock.now += 30
+        assert len(cache.get()) == 30  # 差分の読み込みでは削除は分からない
+        clock.now += 600
+        _assert_same(cache.get(), analysis_service.load_sensor_data(limit=100))
+        assert cache.stats["full_loads"] == 2
+
+    def test_invalidate_forces_full_reload(self, isolated_db):
+        cache = SensorFrameCache(limit=100, full_refresh_sec=600, clock=Clock())
+        cache.get()
+        cache.invalidate()
+        cache.get()
+        assert cache.stats["full_loads"] == 2
+
+
+class TestMergeSensorFrames:
+    def test_merged_dtypes_do_not_depend_on_all_na_columns(self, isolated_db):
+        _insert(0, 20)
+        frames = [analysis_service.load_sensor_source(source, 100) for source in analysis_service.sensor_sources()]
+        only_power = [f for f, source in zip(frames, analysis_service.sensor_sources()) if source[0] == POWER]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", FutureWarning)
+            merged = analysis_service.merge_sensor_frames(frames, 100)
+            power = analysis_service.merge_sensor_frames(only_power, 100)
+
+        # 開閉センサー (device_records) の全欠損の power_watts・temperature_celsius は dtype に影響しない
+        assert len(merged) == 60
+        assert str(merged["timestamp"].dtype) == str(power["timestamp"].dtype) == "datetime64[ns, Asia/Tokyo]"
+        assert merged["power_watts"].dtype == power["power_watts"].dtype == "float64"
+        assert merged["temperature_celsius"].dtype == "float64"
+        # 全欠損で外した列も、取得元の列の順で残る
+        expected = [c for c in frames[0].columns if c != "id"]
+        assert list(merged.columns[:len(expected)]) == expected
+
+
+class TestSensorIndex:
+    @pytest.fixture
+    def frame(self, isolated_db):
+        _insert(0, 120)
+        return analysis_service.load_sensor_data(limit=1000)
+
+    @pytest.mark.parametrize("device_type", [
+        lambda t: t == "Nature Remo E Lite",
+        lambda t: t.str.contains("Meter", na=False),
+        lambda t: t.str.contains("Plug", na=False),
+    ])
+    def test_window_matches_boolean_mask(self, frame, device_type):
+        index = SensorIndex(frame)
+        start, end = frame["timestamp"].min() + timedelta(minutes=30), frame["timestamp"].min() + timedelta(minutes=90)
+        expected = frame[
+            device_type(frame["device_type"]) & (frame["timestamp"] >= start) & (frame["timestamp"] < end)
+        ].sort_values("timestamp", ascending=False, kind="stable")
+
+        actual = index.window(start, end, device_type)
+        assert sorted(actual.index) == sorted(expected.index)
+        assert list(actual.columns) == list(frame.columns)
+        assert actual["timestamp"].is_monotonic_decreasing
+
+    def test_empty_frame(self):
+        index = SensorIndex(pd.DataFrame())
+        assert index.window(BASE, BASE + timedelta(days=1)).empty
@@ -45,3 +45,9 @@ class TestExpectedIndexesExist:
             info = cur.execute(f"PRAGMA index_info({EXPECTED_INDEXES['power_usage']})").fetchall()
             columns = [row["name"] for row in info]
             assert columns == ["device_id", "timestamp"]
+
+    def test_quest_history_has_user_quest_completed_index(self, isolated_db):
+        """クエスト完了状況の集計が (user_id, quest_id, completed_at, status) のカバリングインデックスを使えること"""
+        with common.get_db_cursor() as cur:
+            info = cur.execute("PRAGMA index_info(idx_quest_history_user_quest_completed)").fetchall()
+            assert [row["name"] for row in info] == ["user_id", "quest_id", "completed_at", "status"]
@@ -0,0 +1,170 @@
+# MY_HOME_SYSTEM/tests/test_device_poller.py
+"""
+SwitchBot / Nature Remo のポーリング (core/http_client.py と各監視スクリプト) のテスト。
+外部APIには接続せず、conftest.py の fake_device_api (ローカルの偽サーバー) を使う。
+
+- TokenBucket が1日/5分あたりの上限に合わせてトークンを補充し、上限超過時は待つか諦めること
+- AsyncHttpClient が 5xx を再試行し、4xx は即座に諦めること
+- SwitchBot のデバイスを並行して問い合わせ、接続を使い回すこと (1周期の所要時間を計測)
+- 電力消費中のプラグは短い間隔、待機中は長い間隔でポーリングし、
+  1日の想定呼び出し回数が予算を超える場合は間隔を延ばすこと
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from core import device_state
+from core.http_client import AsyncHttpClient, TokenBucket
+from monitors import nature_remo_monitor
+from monitors import switchbot_power_monitor as spm
+from services import switchbot_service
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def poll_state(isolated_db, monkeypatch):
+    device_state.reset()
+    monkeypatch.setattr(spm, "_last_polled", {})
+    monkeypatch.setattr(spm.sensor_service, "send_push", lambda *a, **kw: True)
+    yield
+    device_state.reset()
+
+
+def _plugs(count):
+    return [{"id": f"plug{i}", "name": f"Plug{i}", "type": "Plug Mini (JP)"} for i in range(count)]
+
+
+class TestTokenBucket:
+    def test_refills_at_daily_rate(self):
+        clock = _Clock()
+        bucket = TokenBucket.per_period(8640, 86400, burst=2, clock=clock)  # 0.1回/秒
+        assert bucket.try_acquire() == 0.0
+        assert bucket.try_acquire() == 0.0
+        assert bucket.try_acquire() == pytest.approx(10.0)
+        clock.now += 10
+        assert bucket.try_acquire() == 0.0
+
+    async def test_acquire_gives_up_when_wait_exceeds_limit(self):
+        bucket = TokenBucket(rate_per_sec=0.001, capacity=1)
+        assert await bucket.acquire() is True
+        assert await bucket.acquire(max_wait=0.1) is False
+        assert (bucket.acquired, bucket.rejected) == (1, 1)
+
+
+class TestAsyncHttpClient:
+    async def test_server_error_is_retried(self, fake_device_api):
+        fake_device_api.fail_next = [503, 502]
+        async with AsyncHttpClient(backoff_sec=0.01) as client:
+            assert await client.get_json(f"{fake_device_api.url}/1/devices") == []
+        assert fake_device_api.calls["/1/devices"] == 3
+
+    async def test_client_error_is_not_retried(self, fake_device_api):
+        fake_device_api.fail_next = [401]
+        async with AsyncHttpClient(backoff_sec=0.01) as client:
+            assert await client.get_json(f"{fake_device_api.url}/1/devices") is None
+        assert fake_device_api.calls["/1/devices"] == 1
+
+    async def test_exhausted_budget_skips_request(self, fake_device_api):
+        limiter = TokenBucket(rate_per_sec=0.0, capacity=1)
+        async with AsyncHttpClient() as client:
+            assert await client.get_json(f"{fake_device_api.url}/1/devices", limiter=limiter) == []
+            assert await client.get_json(f"{fake_device_api.url}/1/devices", limiter=limiter) is None
+            assert client.stats["rate_limited"] == 1
+        assert fake_device_api.total_calls == 1
+
+
+class TestSwitchBotPollCycle:
+    async def test_devices_are_polled_concurrently_over_pooled_connections(
+        self, fake_device_api, poll_state, monkeypatch
+    ):
+        devices = _plugs(8)
+        fake_device_api.latency_sec = 0.2
+        fake_device_api.switchbot_status = {d["id"]: {"power": "on", "weight": 12.5} for d in devices}
+        monkeypatch.setattr(config, "MONITOR_DEVICES", devices, raising=False)
+        monkeypatch.setattr(config, "DEVICE_POLL_CONCURRENCY", 4)
+
+        started = time.perf_counter()
+        await spm.main()
+        elapsed = time.perf_counter() - started
+        print(f"\npoll cycle: {len(devices)} devices, {fake_device_api.total_calls} calls, {elapsed:.2f}s")
+
+        assert fake_device_api.total_calls == 8
+        # 逐次 (0.2秒 x 8台、旧実装ではさらにデバイス間に2秒の待機) より十分短いこと
+        assert elapsed < 8 * 0.2 * 0.75
+        # 並列数ぶんの接続を使い回す
+        assert len(fake_device_api.client_ports) <= 4
+        assert device_state.get("plug0").wattage == 12.5
+
+    async def test_active_plugs_are_polled_more_often_than_idle_ones(self, fake_device_api, poll_state, monkeypatch):
+        devices = _plugs(2)
+        fake_device_api.switchbot_status = {"plug0": {"weight": 120.0}, "plug1": {"weight": 0.0}}
+        monkeypatch.setattr(config, "MONITOR_DEVICES", devices, raising=False)
+
+        await spm.main()
+        assert fake_device_api.total_calls == 2
+
+        # 前回ポーリングから 90秒経過: 消費中(60秒間隔)のみ対象、待機中(300秒間隔)は見送る
+        for device_id in spm._last_polled:
+            spm._last_polled[device_id] -= 90
+        await spm.main()
+        assert fake_device_api.calls == {"/v1.1/devices/plug0/status": 2, "/v1.1/devices/plug1/status": 1}
+
+        # 再起動後 (メモリ上の最終ポーリング時刻なし) は device_state の last_seen から判断する
+        spm._last_polled.clear()
+        device_state.reset()
+        await spm.main()
+        assert fake_device_api.total_calls == 3
+
+    def test_daily_calls_fit_the_switchbot_budget(self, poll_state, monkeypatch):
+        devices = _plugs(8)
+        for d in devices[:2]:
+            device_state.record_power(d["id"], d["name"], 300.0)
+
+        intervals = spm.plan_intervals(devices)
+        per_day = spm.estimate_daily_calls(intervals)
+        print(f"\nplanned SwitchBot calls/day: {per_day:.0f} (budget {switchbot_service.POLL_DAILY_BUDGET})")
+        # 消費中2台 x 1440回 + 待機中6台 x 288回
+        assert per_day == pytest.approx(2 * 1440 + 6 * 288)
+        assert per_day <= switchbot_service.POLL_DAILY_BUDGET
+
+        monkeypatch.setattr(switchbot_service, "POLL_DAILY_BUDGET", 1000)
+        stretched = spm.plan_intervals(devices)
+        assert spm.estimate_daily_calls(stretched) == pytest.approx(1000)
+        assert stretched["plug0"] < stretched["plug7"]
+
+
+class TestNatureRemoPollCycle:
+    async def test_locations_are_fetched_concurrently_and_saved(self, fake_device_api, isolated_db, monkeypatch):
+        device_state.reset()
+        monkeypatch.setattr(config, "NATURE_REMO_ACCESS_TOKEN", "token-a")
+        monkeypatch.setattr(config, "NATURE_REMO_ACCESS_TOKEN_TAKASAGO", "token-b")
+        monkeypatch.setattr(nature_remo_monitor, "_RATE_LIMITERS", {})
+        fake_device_api.latency_sec = 0.2
+        fake_device_api.remo_appliances = [{
+            "id": "meter1", "type": "EL_SMART_METER", "nickname": "Meter",
+            "smart_meter": {"echonetlite_properties": [{"epc": 231, "val": "850"}]},
+        }]
+        fake_device_api.remo_devices = [{"id": "remo1", "name": "Remo", "newest_events": {"te": {"val": 23.5}, "hu": {"val": 40}}}]
+
+        started = time.perf_counter()
+        await nature_remo_monitor.main()
+        elapsed = time.perf_counter() - started
+
+        assert fake_device_api.calls == {"/1/appliances": 2, "/1/devices": 2}
+        # 2拠点 x 2エンドポイントを並行して取得する (逐次なら 0.8秒)
+        assert elapsed < 0.6
+        states = device_state.snapshot()
+        assert states["meter1"].wattage == 850.0
+        assert states["remo1"].temperature == 23.5
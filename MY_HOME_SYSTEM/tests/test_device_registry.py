@@ -0,0 +1,131 @@
+# MY_HOME_SYSTEM/tests/test_device_registry.py
+"""
+core/device_registry.py のテスト。
+- ID・MAC (区切りの有無を問わない)・名前・設置場所で検索できること
+- エントリが読み取り専用であること
+- devices.json の書き換え (PUT /settings・set_camera_enabled) でスナップショットが差し替わること
+- config のリストが差し替えられた場合はインデックスを作り直すこと
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from core import device_registry
+from services import camera_service
+
+CAMERAS = [
+    {"id": "cam1", "name": "防犯カメラ", "nas_folder": "garden", "location": "庭", "ip": "192.168.1.50"},
+    {"id": "cam2", "name": "玄関カメラ", "location": "玄関", "ip": "192.168.1.51", "enabled": False},
+]
+DEVICES = [
+    {"id": "AABBCCDDEE01", "type": "Contact Sensor", "location": "伊丹", "name": "玄関ドア"},
+    {"id": "AABBCCDDEE02", "type": "Plug Mini (JP)", "location": "伊丹", "name": "冷蔵庫"},
+    {"id": "remo-meter", "type": "Meter", "location": "高砂", "name": "リビング温度計"},
+]
+
+
+@pytest.fixture
+def devices_json(tmp_path, monkeypatch):
+    path = tmp_path / "devices.json"
+    path.write_text(json.dumps({"cameras": CAMERAS, "monitor_devices": DEVICES}, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(config, "DEVICES_JSON_PATH", str(path))
+    monkeypatch.setattr(config, "CAMERAS", [dict(c) for c in CAMERAS])
+    monkeypatch.setattr(config, "MONITOR_DEVICES", [dict(d) for d in DEVICES])
+    device_registry.set_api_names({})
+    yield path
+    device_registry.set_api_names({})
+
+
+def _rewrite(path, **changes):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data.update(changes)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    # mtime の粒度が粗いファイルシステムでも変更を検知できるようにずらす
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestLookup:
+    def test_cameras_by_id_name_and_location(self, devices_json):
+        assert device_registry.get_camera("cam1")["name"] == "防犯カメラ"
+        assert device_registry.get_camera_by_name("玄関カメラ")["id"] == "cam2"
+        assert [c["id"] for c in device_registry.cameras_at("庭")] == ["cam1"]
+        assert [c["id"] for c in device_registry.cameras(enabled_only=True)] == ["cam1"]
+        assert device_registry.get_camera("missing") is None
+
+    def test_devices_by_mac_in_any_notation(self, devices_json):
+        assert device_registry.get_device("AABBCCDDEE01")["name"] == "玄関ドア"
+        assert device_registry.get_device("aa:bb:cc:dd:ee:01")["name"] == "玄関ドア"
+        assert device_registry.get_device_by_name("冷蔵庫")["id"] == "AABBCCDDEE02"
+        assert [d["id"] for d in device_registry.devices_at("伊丹")] == ["AABBCCDDEE01", "AABBCCDDEE02"]
+        assert device_registry.devices_at("存在しない場所") == ()
+
+    def test_api_name_takes_precedence_over_configured_name(self, devices_json):
+        assert device_registry.device_name("AA:BB:CC:DD:EE:01") == "玄関ドア"
+        device_registry.set_api_names({"AABBCCDDEE01": "玄関ドア(アプリ)"})
+        assert device_registry.device_name("AA:BB:CC:DD:EE:01") == "玄関ドア(アプリ)"
+        assert device_registry.api_name("remo-meter") is None
+        assert device_registry.device_name("unknown") is None
+
+    def test_entries_are_read_only(self, devices_json):
+        with pytest.raises(TypeError):
+            device_registry.get_camera("cam1")["enabled"] = False
+
+    def test_replaced_config_lists_are_reindexed(self, devices_json, monkeypatch):
+        assert device_registry.get_device("new-plug") is None
+        monkeypatch.setattr(config, "MONITOR_DEVICES", [{"id": "new-plug", "name": "新しいプラグ", "location": "伊丹"}])
+        assert device_registry.get_device("new-plug")["name"] == "新しいプラグ"
+        assert device_registry.get_device("AABBCCDDEE01") is None
+
+
+class TestHotReload:
+    def test_set_camera_enabled_swaps_snapshot(self, devices_json):
+        before = device_registry.snapshot()
+
+        assert camera_service.set_camera_enabled("cam1", False) is True
+
+        after = device_registry.snapshot()
+        assert after is not before
+        # 差し替え前のスナップショットを参照している読み取り側には影響しない
+        assert before.camera_by_id["cam1"].get("enabled", True) is True
+        assert after.camera_by_id["cam1"]["enabled"] is False
+        assert config.CAMERAS[0]["enabled"] is False
+        # 自プロセスで書き込んだ変更は読み直さない
+        assert device_registry.reload_if_modified() is False
+
+    def test_reload_if_modified_picks_up_external_writes(self, devices_json):
+        device_registry.reload_if_modified()  # 基準となる mtime を記録
+        assert device_registry.reload_if_modified() is False
+
+        _rewrite(devices_json, monitor_devices=DEVICES[:1])
+        assert device_registry.reload_if_modified() is True
+        assert [d["id"] for d in device_registry.devices()] == ["AABBCCDDEE01"]
+        assert len(config.MONITOR_DEVICES) == 1
+
+    def test_invalid_file_keeps_current_configuration(self, devices_json):
+        devices_json.write_text("{not valid json", encoding="utf-8")
+        assert device_registry.reload() is False
+        assert device_registry.get_camera("cam1") is not None
+
+    def test_lookup_cost_does_not_grow_with_device_count(self, devices_json, monkeypatch):
+        many = [{"id": f"{i:012X}", "name": f"dev{i}", "location": "伊丹"} for i in range(20000)]
+        monkeypatch.setattr(config, "MONITOR_DEVICES", many)
+        device_registry.snapshot()  # インデックス構築
+
+        started = time.perf_counter()
+        for _ in range(10000):
+            device_registry.get_device(many[-1]["id"])
+        indexed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(100):
+            next(d for d in config.MONITOR_DEVICES if d["id"] == many[-1]["id"])
+        scan = (time.perf_counter() - started) * 100
+        print(f"\nlookup x10000: indexed {indexed * 1000:.1f}ms, linear scan {scan * 1000:.1f}ms (estimated)")
+        assert indexed < scan
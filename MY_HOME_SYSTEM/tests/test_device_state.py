@@ -0,0 +1,105 @@
+# MY_HOME_SYSTEM/tests/test_device_state.py
+"""
+core/device_state.py (デバイス状態ストア) のテスト。
+
+- 初回アクセス時に device_state テーブルと各ログテーブルの最新行から復元されること
+- アナログ値の更新はDBへ書き込まず、デジタル状態の変更のみ flush() で永続化されること
+- 別プロセス (別ストア) が同じデバイスの別の列を更新しても互いに上書きしないこと
+"""
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+from core import device_state
+from core.device_state import DeviceStateStore
+
+
+@pytest.fixture
+def store(isolated_db):
+    device_state.reset()
+    yield DeviceStateStore()
+    device_state.reset()
+
+
+def _insert(sql, params):
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(sql, params)
+
+
+class TestWarmUp:
+    def test_latest_row_per_device_is_loaded(self, store):
+        _insert(
+            f"INSERT INTO {config.SQLITE_TABLE_POWER_USAGE} (device_id, device_name, wattage, timestamp) VALUES (?, ?, ?, ?)",
+            [("plug", "Plug", 10, "2026-01-01T00:00:00"), ("plug", "Plug", 30, "2026-01-01T00:10:00"),
+             ("plug", "Plug", 20, "2026-01-01T00:05:00")],
+        )
+        _insert(
+            f"INSERT INTO {config.SQLITE_TABLE_SWITCHBOT_LOGS} (device_id, device_name, temperature, humidity, timestamp) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [("meter", "Meter", 20.0, 40.0, "2026-01-01T00:00:00"), ("meter", "Meter", 21.5, 45.0, "2026-01-01T01:00:00")],
+        )
+        _insert(
+            "INSERT INTO device_state (device_id, device_name, motion_active, last_notify_at, status, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [("plug", None, 0, 0, '{"power_state": "ON"}', "2025-12-31T00:00:00")],
+        )
+
+        plug = store.get("plug")
+        assert (plug.device_name, plug.wattage, plug.status) == ("Plug", 30, {"power_state": "ON"})
+        assert plug.last_seen == "2026-01-01T00:10:00"
+        meter = store.get("meter")
+        assert (meter.temperature, meter.humidity) == (21.5, 45.0)
+        assert store.get("unknown") is None
+
+    def test_snapshot_is_a_copy(self, store):
+        store.update("plug", status={"power_state": "ON"})
+        store.snapshot()["plug"].status["power_state"] = "OFF"
+        assert store.get("plug").status == {"power_state": "ON"}
+
+
+class TestPersistence:
+    def test_only_digital_changes_are_flushed(self, store):
+        assert store.record_power("plug", "Plug", 100) is None
+        assert store.record_power("plug", "Plug", 5) == 100
+        store.record_meter("meter", "Meter", 22.0, 50.0)
+        assert store.dirty_count() == 0
+        assert store.flush() == 0
+
+        store.update("door", device_name="Door", contact_state="open", last_notify_at=123.0)
+        store.update("door", contact_state="open")  # 変化なし
+        assert store.flush() == 1
+        with common.get_db_cursor() as cur:
+            rows = [dict(r) for r in cur.execute("SELECT device_id, contact_state, last_notify_at FROM device_state")]
+        assert rows == [{"device_id": "door", "contact_state": "open", "last_notify_at": 123.0}]
+
+    def test_concurrent_stores_do_not_overwrite_each_others_columns(self, store):
+        other = DeviceStateStore()
+        store.get("sensor")
+        other.get("sensor")
+
+        store.update("sensor", motion_active=True)
+        other.update("sensor", status={"battery": 90})
+        store.flush()
+        other.flush()
+
+        reloaded = DeviceStateStore().get("sensor")
+        assert reloaded.motion_active is True
+        assert reloaded.status == {"battery": 90}
+
+    def test_failed_flush_is_retried(self, store):
+        store.update("door", contact_state="open")
+
+        with patch.object(device_state, "get_db_cursor", side_effect=RuntimeError("db locked")):
+            assert store.flush() == 0
+        assert store.dirty_count() == 1
+        assert store.flush() == 1
+
+    def test_unknown_field_is_rejected(self, store):
+        with pytest.raises(ValueError):
+            store.update("door", colour="red")
@@ -0,0 +1,181 @@
+# MY_HOME_SYSTEM/tests/test_ingest_queue.py
+"""
+core/ingest_queue.py (センサーログの書き込みバッファ) のテスト。
+
+- 件数しきい値・明示フラッシュで executemany によりまとめて書き込まれること
+- 不正な行が混ざってもバッチ全体を失わず、正常な行は書き込まれること
+- バッファ上限到達時に受付側でフラッシュされ、メモリ上限を超えないこと(バックプレッシャー)
+- shutdown() でバックグラウンドスレッドが停止し、残りが書き込まれること
+- 受付時点のDBパスへ書き込まれること(フラッシュ前にDBパスが変わっても混ざらない)
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+from core.ingest_queue import IngestQueue
+
+COLUMNS = ["device_id", "device_name", "temperature", "humidity", "timestamp"]
+
+
+def _row(i):
+    return (f"dev{i % 3}", "温湿度計", 20.0 + i, 50.0, f"2026-01-01T00:00:{i:02d}")
+
+
+def _count(table=config.SQLITE_TABLE_SWITCHBOT_LOGS):
+    with common.get_db_cursor() as cur:
+        return cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+@pytest.fixture
+def queue():
+    # 時間しきい値で勝手に書き込まれないよう、十分長いインターバルにしておく
+    q = IngestQueue(batch_rows=50, flush_interval_sec=60.0, max_pending_rows=100)
+    yield q
+    q.shutdown(timeout=1.0)
+
+
+class TestBuffering:
+    def test_rows_are_buffered_until_flush(self, isolated_db, queue):
+        for i in range(10):
+            assert queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(i)) is True
+        assert queue.pending_count() == 10
+        assert _count() == 0
+
+        assert queue.flush() == 10
+        assert queue.pending_count() == 0
+        assert _count() == 10
+
+    def test_rows_keep_insertion_order(self, isolated_db, queue):
+        for i in range(5):
+            queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(i))
+        queue.flush()
+        with common.get_db_cursor() as cur:
+            temps = [r[0] for r in cur.execute(
+                f"SELECT temperature FROM {config.SQLITE_TABLE_SWITCHBOT_LOGS} ORDER BY id"
+            ).fetchall()]
+        assert temps == [20.0, 21.0, 22.0, 23.0, 24.0]
+
+    def test_batch_threshold_wakes_background_flusher(self, isolated_db, queue):
+        for i in range(queue.batch_rows):
+            queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(i))
+
+        deadline = time.time() + 5
+        while queue.pending_count() and time.time() < deadline:
+            time.sleep(0.01)
+        assert queue.pending_count() == 0
+        assert _count() == queue.batch_rows
+
+    def test_flush_single_table_leaves_others_pending(self, isolated_db, queue):
+        queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(0))
+        queue.enqueue(
+            config.SQLITE_TABLE_POWER_USAGE,
+            ["device_id", "device_name", "wattage", "timestamp"],
+            ("plug", "プラグ", 10.0, "2026-01-01T00:00:00"),
+        )
+        assert queue.flush(config.SQLITE_TABLE_POWER_USAGE) == 1
+        assert queue.pending_count(config.SQLITE_TABLE_SWITCHBOT_LOGS) == 1
+        assert _count(config.SQLITE_TABLE_POWER_USAGE) == 1
+
+
+class TestFailureHandling:
+    def test_column_value_mismatch_is_rejected_up_front(self, isolated_db, queue):
+        assert queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, ("only-one",)) is False
+        assert queue.pending_count() == 0
+
+    def test_bad_row_does_not_lose_the_rest_of_the_batch(self, isolated_db, queue):
+        # quest_users.user_id は PRIMARY KEY のため、重複行だけがIntegrityErrorになる
+        columns = ["user_id", "name", "job_class", "level", "exp", "gold"]
+        queue.enqueue("quest_users", columns, ("dad", "Dad", "Warrior", 1, 0, 0))
+        queue.enqueue("quest_users", columns, ("dad", "Dad2", "Warrior", 1, 0, 0))
+        queue.enqueue("quest_users", columns, ("mom", "Mom", "Mage", 1, 0, 0))
+        queue.flush()
+
+        assert _count("quest_users") == 2
+        stats = queue.stats()
+        assert stats["written"] == 2
+        assert stats["failed"] == 1
+
+    def test_unknown_table_is_logged_not_raised(self, isolated_db, queue):
+        queue.enqueue("table_that_does_not_exist", ["col"], ("v",))
+        assert queue.flush() == 1
+        assert queue.stats()["failed"] == 1
+
+
+class TestBackpressure:
+    def test_pending_rows_never_exceed_limit(self, isolated_db, queue):
+        for i in range(queue.max_pending_rows * 3):
+            queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(i % 60))
+            assert queue.pending_count() <= queue.max_pending_rows
+        queue.flush()
+        assert _count() == queue.max_pending_rows * 3
+        assert queue.stats()["backpressure_flushes"] >= 1
+
+    def test_concurrent_producers_respect_limit(self, isolated_db, queue, monkeypatch):
+        peak = []
+        original_take = queue._take
+
+        def take(table):
+            peak.append(queue._pending)
+            return original_take(table)
+
+        monkeypatch.setattr(queue, "_take", take)
+
+        def produce(n):
+            for i in range(queue.max_pending_rows):
+                queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row((n + i) % 60))
+
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        queue.flush()
+
+        assert max(peak) <= queue.max_pending_rows
+        assert _count() == queue.max_pending_rows * 8
+
+    @pytest.mark.asyncio
+    async def test_enqueue_async_full_buffer_flushes_off_the_event_loop(self, isolated_db, queue):
+        loop_thread = threading.get_ident()
+        flushed_on = []
+        original_flush = queue.flush
+
+        def flush(table=None):
+            flushed_on.append(threading.get_ident())
+            return original_flush(table)
+
+        queue.flush = flush
+        for i in range(queue.max_pending_rows + 1):
+            assert await queue.enqueue_async(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(i % 60))
+
+        assert flushed_on and loop_thread not in flushed_on
+        assert queue.pending_count() <= queue.max_pending_rows
+
+
+class TestShutdownAndRouting:
+    def test_shutdown_flushes_remaining_rows_and_stops_thread(self, isolated_db, queue):
+        queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(0))
+        thread = queue._thread
+        queue.shutdown(timeout=2.0)
+        assert not thread.is_alive()
+        assert _count() == 1
+
+    def test_rows_are_written_to_the_db_active_at_enqueue_time(self, isolated_db, queue, tmp_path, monkeypatch):
+        queue.enqueue(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(0))
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", str(tmp_path / "other.db"))
+        queue.flush()
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", isolated_db)
+        assert _count() == 1
+
+    @pytest.mark.asyncio
+    async def test_enqueue_async(self, isolated_db, queue):
+        assert await queue.enqueue_async(config.SQLITE_TABLE_SWITCHBOT_LOGS, COLUMNS, _row(1)) is True
+        queue.flush()
+        assert _count() == 1
@@ -0,0 +1,276 @@
+# MY_HOME_SYSTEM/tests/test_line_event_dispatch.py
+"""
+LINE Webhook イベントのディスパッチのテスト。
+
+- core/keyed_dispatcher.py の KeyedDispatcher:
+  同じキーは届いた順に1件ずつ処理、異なるキーは並行処理、キューの上限、アイドルワーカーの片付け、
+  ハンドラの例外で後続が止まらないこと、shutdown で処理待ちを処理し切ること。
+- /callback/line に署名付きの合成イベント500件を送り、署名検証後すぐ 200 を返すこと、
+  全件がユーザーごとの順序を保って処理されること、不正な署名は 400 で何も処理されないこと。
+  (アプリへは ASGI を直接呼び出し、テスト自身のイベントループ上で処理させる)
+- handlers/line_logic.py の sync_run がスレッドからサーバーのイベントループへコルーチンを渡すこと。
+  イベントループのスレッドから呼ばれた場合は実行せずに False を返すこと。
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+
+import pytest
+from linebot.v3 import WebhookHandler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.keyed_dispatcher import KeyedDispatcher
+from handlers import line_handler
+
+CHANNEL_SECRET = "test-channel-secret"
+
+
+class TestKeyedDispatcher:
+    async def test_same_key_is_processed_in_order_one_at_a_time(self):
+        seen = []
+        running = {"now": 0, "max": 0}
+
+        async def handler(item):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.001)
+            seen.append(item)
+            running["now"] -= 1
+
+        dispatcher = KeyedDispatcher(handler, max_pending=100)
+        for i in range(30):
+            assert dispatcher.submit("U1", i)
+        assert await dispatcher.join(timeout=5)
+
+        assert seen == list(range(30))
+        assert running["max"] == 1
+
+    async def test_different_keys_are_processed_concurrently(self):
+        release = asyncio.Event()
+        started = []
+
+        async def handler(item):
+            started.append(item)
+            await release.wait()
+
+        dispatcher = KeyedDispatcher(handler)
+        for key in ("U1", "U2", "U3"):
+            dispatcher.submit(key, key)
+        await asyncio.sleep(0.01)
+
+        # 1人目の処理が終わっていなくても、他のユーザーの処理は始まっている
+        assert sorted(started) == ["U1", "U2", "U3"]
+        release.set()
+        assert await dispatcher.join(timeout=5)
+
+    async def test_full_queue_drops_new_events(self):
+        release = asyncio.Event()
+
+        async def handler(item):
+            await release.wait()
+
+        dispatcher = KeyedDispatcher(handler, max_pending=3)
+        results = [dispatcher.submit("U1", i) for i in range(5)]
+
+        assert results == [True, True, True, False, False]
+        assert dispatcher.stats["dropped"] == 2
+        release.set()
+        assert await dispatcher.join(timeout=5)
+        assert dispatcher.stats["processed"] == 3
+
+    async def test_handler_exception_does_not_stop_later_events(self):
+        seen = []
+
+        async def handler(item):
+            if item == 1:
+                raise RuntimeError("boom")
+            seen.append(item)
+
+        dispatcher = KeyedDispatcher(handler)
+        for i in range(3):
+            dispatcher.submit("U1", i)
+        assert await dispatcher.join(timeout=5)
+
+        assert seen == [0, 2]
+        assert dispatcher.stats["failed"] == 1
+
+    async def test_idle_worker_is_cleaned_up_and_recreated(self):
+        seen = []
+
+        async def handler(item):
+            seen.append(item)
+
+        dispatcher = KeyedDispatcher(handler, idle_sec=0.02)
+        dispatcher.submit("U1", "a")
+        await asyncio.sleep(0.1)
+        assert dispatcher._queues == {}
+        assert dispatcher._workers == {}
+
+        dispatcher.submit("U1", "b")
+        assert await dispatcher.join(timeout=5)
+        assert seen == ["a", "b"]
+
+    async def test_shutdown_drains_pending_events(self):
+        seen = []
+
+        async def handler(item):
+            await asyncio.sleep(0.001)
+            seen.append(item)
+
+        dispatcher = KeyedDispatcher(handler)
+        for i in range(10):
+            dispatcher.submit(f"U{i % 2}", i)
+        await dispatcher.shutdown(timeout=5)
+
+        assert sorted(seen) == list(range(10))
+        assert dispatcher._workers == {}
+
+
+def _signed(body: str) -> str:
+    digest = hmac.new(CHANNEL_SECRET.encode(), body.encode(), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def _text_event(user_id: str, text: str, i: int) -> dict:
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": 1_700_000_000_000 + i,
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": f"EV{i:05d}",
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": f"tok{i}",
+        "message": {"id": str(i), "type": "text", "quoteToken": f"q{i}", "text": text},
+    }
+
+
+async def _post(app, body: str, signature: str):
+    """ASGI アプリへ POST /callback/line を直接送り、(status, body) を返す"""
+    raw = body.encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/callback/line", "raw_path": b"/callback/line",
+        "root_path": "", "query_string": b"", "server": ("testserver", 80), "client": ("testclient", 50000),
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(raw)).encode()),
+            (b"x-line-signature", signature.encode()),
+        ],
+    }
+    received = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": raw, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+@pytest.fixture
+def line_app(isolated_db, monkeypatch):
+    """実際の WebhookHandler (署名検証) と、処理内容を記録するだけの _process_message_async"""
+    import unified_server
+
+    monkeypatch.setattr(line_handler, "line_handler", WebhookHandler(CHANNEL_SECRET))
+    monkeypatch.setattr(line_handler, "line_bot_api", None)
+    processed = []
+
+    async def fake_process(user_id, user_name, msg_text, reply_token):
+        await asyncio.sleep(0.001)
+        processed.append((user_id, msg_text))
+
+    monkeypatch.setattr(line_handler, "_process_message_async", fake_process)
+    # 1ユーザー50件を一気に送るため、上限で捨てられないようにしておく
+    monkeypatch.setattr(line_handler.event_dispatcher, "max_pending", 100)
+    line_handler._profile_cache.clear()
+    yield unified_server.app, processed
+    line_handler._profile_cache.clear()
+
+
+class TestLineCallbackDispatch:
+    async def test_500_signed_events_are_acknowledged_then_processed_in_per_user_order(self, line_app):
+        app, processed = line_app
+        users = [f"U{n:02d}" for n in range(10)]
+        sent = {u: [] for u in users}
+
+        for i in range(500):
+            user = users[i % len(users)]
+            text = f"msg-{i}"
+            sent[user].append(text)
+            body = json.dumps({"destination": "Ubot", "events": [_text_event(user, text, i)]})
+            status, resp = await _post(app, body, _signed(body))
+            assert status == 200
+            assert resp == b'"OK"'
+
+        # 応答はイベントの処理を待たずに返っている
+        assert len(processed) < 500
+        assert await line_handler.event_dispatcher.join(timeout=30)
+
+        assert len(processed) == 500
+        for user in users:
+            assert [text for uid, text in processed if uid == user] == sent[user]
+
+    async def test_invalid_signature_returns_400_and_dispatches_nothing(self, line_app):
+        app, processed = line_app
+        body = json.dumps({"destination": "Ubot", "events": [_text_event("U1", "hello", 1)]})
+
+        status, _ = await _post(app, body, _signed(body + "tampered"))
+
+        assert status == 400
+        assert await line_handler.event_dispatcher.join(timeout=5)
+        assert processed == []
+
+
+class TestSyncRunOnMainLoop:
+    async def test_sync_run_from_worker_thread_runs_coroutine_on_main_loop(self, monkeypatch):
+        from handlers import line_logic
+
+        main = asyncio.get_running_loop()
+        monkeypatch.setattr(line_logic, "main_loop", main)
+
+        async def which_loop():
+            return asyncio.get_running_loop()
+
+        ran_on = await asyncio.to_thread(line_logic.sync_run, which_loop())
+        assert ran_on is main
+
+    def test_sync_run_without_main_loop_uses_its_own_loop(self, monkeypatch):
+        from handlers import line_logic
+
+        monkeypatch.setattr(line_logic, "main_loop", None)
+
+        async def answer():
+            return 42
+
+        assert line_logic.sync_run(answer()) == 42
+
+    async def test_sync_run_on_the_loop_thread_refuses_without_running(self, monkeypatch):
+        from handlers import line_logic
+
+        monkeypatch.setattr(line_logic, "main_loop", asyncio.get_running_loop())
+        ran = []
+
+        async def work():
+            ran.append(True)
+
+        coro = work()
+        assert line_logic.sync_run(coro) is False
+        assert ran == []
+        assert coro.cr_frame is None  # close() 済み (never awaited の警告を出さない)
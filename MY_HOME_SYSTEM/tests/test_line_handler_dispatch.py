@@ -1,7 +1,7 @@
 # MY_HOME_SYSTEM/tests/test_line_handler_dispatch.py
 """
 handlers/line_handler.py のディスパッチロジック
-(_process_message_async / handle_message / handle_postback) のテスト。
+(_process_message_async / handle_message_async / handle_postback_async) のテスト。
 
 これらの関数は元々 `if line_handler:` ブロック内で条件付き定義されており、
 LINE_CHANNEL_ACCESS_TOKEN/SECRET が設定されていない環境(CI含む)では
@@ -173,8 +173,9 @@ class TestReplyMessage:
         line_handler.reply_message("tok", TextMessage(text="hi"))  # 例外が外に漏れないこと
 
 
+@pytest.mark.asyncio
 class TestHandleMessageWrapper:
-    def test_parses_event_strips_text_and_dispatches(self, monkeypatch):
+    async def test_parses_event_strips_text_and_dispatches(self, monkeypatch):
         mock_fn = AsyncMock(return_value=MagicMock(text="reply"))
         monkeypatch.setattr(line_handler.line_service, "get_user_status_message", mock_fn)
         monkeypatch.setattr(line_handler, "reply_message", MagicMock())
@@ -184,13 +185,14 @@ class TestHandleMessageWrapper:
         event.message.text = " ステータス "
         event.reply_token = "tok"
 
-        line_handler.handle_message(event)
+        await line_handler.handle_message_async(event)
 
         mock_fn.assert_called_once_with("U1")
 
 
+@pytest.mark.asyncio
 class TestHandlePostbackWrapper:
-    def test_approve_postback_dispatches_as_approve_command(self, monkeypatch):
+    async def test_approve_postback_dispatches_as_approve_command(self, monkeypatch):
         mock_fn = AsyncMock(return_value=MagicMock(text="approved"))
         monkeypatch.setattr(line_handler.line_service, "process_approval_command", mock_fn)
 
@@ -199,11 +201,11 @@ class TestHandlePostbackWrapper:
         event.postback.data = "approve:42"
         event.reply_token = "tok"
 
-        line_handler.handle_postback(event)
+        await line_handler.handle_postback_async(event)
 
         mock_fn.assert_called_once_with("U1", "承認 42")
 
-    def test_reject_postback_dispatches_as_reject_command(self, monkeypatch):
+    async def test_reject_postback_dispatches_as_reject_command(self, monkeypatch):
         mock_fn = AsyncMock(return_value=MagicMock(text="rejected"))
         monkeypatch.setattr(line_handler.line_service, "process_approval_command", mock_fn)
 
@@ -212,11 +214,11 @@ class TestHandlePostbackWrapper:
         event.postback.data = "reject:7"
         event.reply_token = "tok"
 
-        line_handler.handle_postback(event)
+        await line_handler.handle_postback_async(event)
 
         mock_fn.assert_called_once_with("U1", "却下 7")
 
-    def test_malformed_approval_postback_is_caught_without_raising(self, monkeypatch):
+    async def test_malformed_approval_postback_is_caught_without_raising(self, monkeypatch):
         mock_fn = AsyncMock()
         monkeypatch.setattr(line_handler.line_service, "process_approval_command", mock_fn)
 
@@ -225,11 +227,11 @@ class TestHandlePostbackWrapper:
         event.postback.data = "approve:1:extra"
         event.reply_token = "tok"
 
-        line_handler.handle_postback(event)
+        await line_handler.handle_postback_async(event)
 
         mock_fn.assert_not_called()
 
-    def test_non_approval_postback_delegates_to_line_logic(self, monkeypatch):
+    async def test_non_approval_postback_delegates_to_line_logic(self, monkeypatch):
         mock_delegate = MagicMock()
         monkeypatch.setattr(line_handler.line_logic, "handle_postback", mock_delegate)
 
@@ -238,11 +240,11 @@ class TestHandlePostbackWrapper:
         event.postback.data = "show_health_input"
         event.reply_token = "tok"
 
-        line_handler.handle_postback(event)
+        await line_handler.handle_postback_async(event)
 
         mock_delegate.assert_called_once_with(event, line_handler.line_bot_api)
 
-    def test_line_logic_delegation_exception_is_caught_silently(self, monkeypatch):
+    async def test_line_logic_delegation_exception_is_caught_silently(self, monkeypatch):
         monkeypatch.setattr(
             line_handler.line_logic, "handle_postback", MagicMock(side_effect=Exception("boom"))
         )
@@ -252,4 +254,4 @@ class TestHandlePostbackWrapper:
         event.postback.data = "some_other_action"
         event.reply_token = "tok"
 
-        line_handler.handle_postback(event)  # 例外が外に漏れないこと
+        await line_handler.handle_postback_async(event)  # 例外が外に漏れないこと
@@ -6,8 +6,13 @@ handlers/line_handler.py の _get_display_name TTLキャッシュのテスト
 修正前はメッセージ受信のたびに line_bot_api.get_profile() を呼んでおり、
 利用者・メッセージ頻度が増えるほどLINE APIのレート制限を消費するボトルネックに
 なりうる、と指摘されていた。現在はTTL付きインメモリキャッシュで抑制されている。
+
+キャッシュはイベントループ上の AsyncTTLCache (core/async_cache.py) で、同じユーザーの
+イベントが同時に届いても get_profile は1回しか呼ばれないこと (single-flight) も確認する。
 """
+import asyncio
 import os
+import threading
 import sys
 from unittest.mock import MagicMock
 
@@ -33,53 +38,95 @@ def fake_line_api(monkeypatch):
     return fake_api
 
 
-def test_first_call_fetches_profile_from_api(fake_line_api):
-    name = line_handler._get_display_name("U123")
+async def test_first_call_fetches_profile_from_api(fake_line_api):
+    name = await line_handler._get_display_name("U123")
     assert name == "太郎"
     fake_line_api.get_profile.assert_called_once_with("U123")
 
 
-def test_repeated_calls_within_ttl_use_cache(fake_line_api, monkeypatch):
+async def test_repeated_calls_within_ttl_use_cache(fake_line_api, monkeypatch):
     base_time = 1_700_000_000.0
     monkeypatch.setattr(line_handler.time, "time", lambda: base_time)
 
-    line_handler._get_display_name("U123")
+    await line_handler._get_display_name("U123")
     monkeypatch.setattr(line_handler.time, "time", lambda: base_time + 100)  # TTL(3600s)内
-    line_handler._get_display_name("U123")
-    line_handler._get_display_name("U123")
+    await line_handler._get_display_name("U123")
+    await line_handler._get_display_name("U123")
 
     assert fake_line_api.get_profile.call_count == 1
 
 
-def test_call_after_ttl_expires_refetches_profile(fake_line_api, monkeypatch):
+async def test_call_after_ttl_expires_refetches_profile(fake_line_api, monkeypatch):
     base_time = 1_700_000_000.0
     monkeypatch.setattr(line_handler.time, "time", lambda: base_time)
-    line_handler._get_display_name("U123")
+    await line_handler._get_display_name("U123")
 
     monkeypatch.setattr(
         line_handler.time, "time", lambda: base_time + line_handler._PROFILE_CACHE_TTL_SEC + 1
     )
-    line_handler._get_display_name("U123")
+    await line_handler._get_display_name("U123")
 
     assert fake_line_api.get_profile.call_count == 2
 
 
-def test_different_users_are_cached_independently(fake_line_api):
-    line_handler._get_display_name("U_A")
-    line_handler._get_display_name("U_B")
+async def test_different_users_are_cached_independently(fake_line_api):
+    await line_handler._get_display_name("U_A")
+    await line_handler._get_display_name("U_B")
     assert fake_line_api.get_profile.call_count == 2
 
 
-def test_returns_unknown_without_error_when_line_api_not_configured(monkeypatch):
+async def test_returns_unknown_without_error_when_line_api_not_configured(monkeypatch):
     monkeypatch.setattr(line_handler, "line_bot_api", None)
-    name = line_handler._get_display_name("U123")
+    name = await line_handler._get_display_name("U123")
     assert name == "Unknown"
 
 
-def test_api_exception_falls_back_to_unknown_without_raising(monkeypatch):
+async def test_api_exception_falls_back_to_unknown_without_raising(monkeypatch):
     fake_api = MagicMock()
     fake_api.get_profile.side_effect = Exception("LINE API error")
     monkeypatch.setattr(line_handler, "line_bot_api", fake_api)
 
-    name = line_handler._get_display_name("U123")
+    name = await line_handler._get_display_name("U123")
     assert name == "Unknown"
+
+
+async def test_concurrent_calls_for_same_user_share_one_profile_fetch(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_get_profile(user_id):
+        calls.append(user_id)
+        release.wait(5)
+        return MagicMock(display_name="太郎")
+
+    fake_api = MagicMock()
+    fake_api.get_profile.side_effect = slow_get_profile
+    monkeypatch.setattr(line_handler, "line_bot_api", fake_api)
+
+    tasks = [asyncio.create_task(line_handler._get_display_name("U123")) for _ in range(10)]
+    await asyncio.sleep(0.05)
+    release.set()
+    names = await asyncio.gather(*tasks)
+
+    assert names == ["太郎"] * 10
+    assert calls == ["U123"]
+
+
+async def test_failed_fetch_is_not_shared_with_later_calls(monkeypatch):
+    """読み込みが例外になった場合は何も覚えず、次の呼び出しで再取得すること"""
+    from core.async_cache import AsyncTTLCache
+
+    attempts = []
+
+    async def flaky_loader(key):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise RuntimeError("temporary")
+        return "ok"
+
+    cache = AsyncTTLCache(flaky_loader, ttl_sec=60)
+    with pytest.raises(RuntimeError):
+        await cache.get("k")
+    assert await cache.get("k") == "ok"
+    assert await cache.get("k") == "ok"
+    assert attempts == ["k", "k"]
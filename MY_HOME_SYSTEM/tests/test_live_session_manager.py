@@ -0,0 +1,229 @@
+# MY_HOME_SYSTEM/tests/test_live_session_manager.py
+"""
+services/live_session_manager.py のテスト。
+RTSPカメラの代わりに、一定時間後に stream.m3u8 を書き出して待機し続ける
+偽の ffmpeg (Pythonの子プロセス) を使う。ffmpeg がインストールされている環境では
+`ffmpeg -f lavfi -i testsrc` による実際のHLS出力でも検証する。
+
+- 同じカメラへの同時リクエストで ffmpeg が1つしか起動しないこと
+- プレイリストの生成をイベントで検知し、旧実装 (0.5秒間隔のポーリング) より早く応答すること
+- 視聴が途絶えた ffmpeg が停止されること、セグメント取得中は停止されないこと
+- 停止処理の最中に同じカメラの配信が起動し直されても、新しい配信の出力を消さないこと
+- 同時起動数の上限を守ること
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.live_session_manager import LiveSessionLimitError, LiveSessionManager
+
+# argv: playlist_path, delay_sec, exit_code (exit_code >= 0 の場合はプレイリストを書かずに終了する)
+_FAKE_FFMPEG = """
+import os, sys, time
+playlist, delay, exit_code = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+time.sleep(delay)
+if exit_code >= 0:
+    sys.exit(exit_code)
+tmp = playlist + ".tmp"
+with open(tmp, "w") as f:
+    f.write("#EXTM3U\\n#EXT-X-TARGETDURATION:2\\n#EXTINF:2.0,\\nstream0.ts\\n")
+os.replace(tmp, playlist)
+time.sleep(60)
+"""
+
+
+# SIGTERM を受けてから終了するまでに時間がかかる偽の ffmpeg (argv: playlist_path, term_delay_sec)
+_SLOW_STOP_FFMPEG = """
+import os, signal, sys, time
+playlist, term_delay = sys.argv[1], float(sys.argv[2])
+signal.signal(signal.SIGTERM, lambda *a: (time.sleep(term_delay), sys.exit(0)))
+with open(playlist, "w") as f:
+    f.write("#EXTM3U\\n")
+while True:
+    time.sleep(0.05)
+"""
+
+
+def _fake_spawn(playlist, delay=0.3, exit_code=-1, counter=None):
+    def spawn():
+        if counter is not None:
+            counter.append(1)
+        return subprocess.Popen([sys.executable, "-c", _FAKE_FFMPEG, playlist, str(delay), str(exit_code)])
+    return spawn
+
+
+@pytest.fixture
+def manager():
+    m = LiveSessionManager(idle_timeout_sec=0.6, viewer_ttl_sec=0.3, max_sessions=2, reap_interval_sec=0.1)
+    yield m
+    m.shutdown()
+
+
+def _playlist(tmp_path, camera_id):
+    return str(tmp_path / camera_id / "stream.m3u8")
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestStartup:
+    def test_concurrent_starts_share_one_ffmpeg(self, manager, tmp_path):
+        spawned = []
+        playlist = _playlist(tmp_path, "cam1")
+        sessions = []
+        barrier = threading.Barrier(5)
+
+        def _open(i):
+            barrier.wait()
+            sessions.append(manager.acquire("cam1", playlist, _fake_spawn(playlist, counter=spawned), f"viewer{i}"))
+
+        threads = [threading.Thread(target=_open, args=(i,)) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(spawned) == 1
+        assert len({id(s) for s in sessions}) == 1
+        assert manager.snapshot()[0]["viewers"] == 5
+
+    async def test_ready_is_signalled_by_playlist_write(self, manager, tmp_path):
+        playlist = _playlist(tmp_path, "cam1")
+        started = time.perf_counter()
+        session = await asyncio.to_thread(manager.acquire, "cam1", playlist, _fake_spawn(playlist, delay=0.3))
+        assert await manager.wait_ready(session, timeout=5) is True
+        elapsed = time.perf_counter() - started
+        print(f"\ncold start: {elapsed:.2f}s (playlist written after 0.30s)")
+        # 旧実装は0.5秒ごとに存在確認していたため、0.3秒で書かれても応答は0.5秒以降だった
+        assert elapsed < 0.5
+
+        # 起動済みのセッションは待たずに返す
+        again = await asyncio.to_thread(manager.acquire, "cam1", playlist, _fake_spawn(playlist))
+        assert again is session
+        assert await manager.wait_ready(again, timeout=0.01) is True
+
+    async def test_ffmpeg_exit_wakes_waiters_immediately(self, manager, tmp_path):
+        playlist = _playlist(tmp_path, "cam1")
+        session = await asyncio.to_thread(manager.acquire, "cam1", playlist, _fake_spawn(playlist, delay=0.1, exit_code=1))
+        started = time.perf_counter()
+        assert await manager.wait_ready(session, timeout=5) is False
+        assert time.perf_counter() - started < 2
+
+        # 終了済みのセッションは次回の取得で起動し直す
+        retry = await asyncio.to_thread(manager.acquire, "cam1", playlist, _fake_spawn(playlist, delay=0.05))
+        assert retry is not session
+        assert await manager.wait_ready(retry, timeout=5) is True
+
+    def test_spawn_failure_returns_none(self, manager, tmp_path):
+        assert manager.acquire("cam1", _playlist(tmp_path, "cam1"), lambda: None) is None
+        assert manager.snapshot() == []
+
+
+class TestReaping:
+    def test_idle_ffmpeg_is_reaped(self, manager, tmp_path):
+        playlist = _playlist(tmp_path, "cam1")
+        session = manager.acquire("cam1", playlist, _fake_spawn(playlist, delay=0.05))
+        assert _wait_until(lambda: os.path.exists(playlist))
+
+        assert _wait_until(lambda: session.process.poll() is not None, timeout=3)
+        assert manager.snapshot() == []
+        assert manager.stats["reaped"] == 1
+        # 次の配信が古いプレイリストを準備完了と誤認しないよう出力を片付ける
+        assert not os.path.exists(playlist)
+
+    def test_segment_fetches_keep_session_alive(self, manager, tmp_path):
+        playlist = _playlist(tmp_path, "cam1")
+        session = manager.acquire("cam1", playlist, _fake_spawn(playlist, delay=0.05))
+
+        deadline = time.monotonic() + 1.5  # idle_timeout (0.6秒) を十分超える間、視聴を続ける
+        while time.monotonic() < deadline:
+            assert manager.touch("cam1", "viewer1") is True
+            time.sleep(0.1)
+        assert session.process.poll() is None
+
+        assert _wait_until(lambda: session.process.poll() is not None, timeout=3)
+        assert manager.touch("cam1", "viewer1") is False
+
+
+    def test_reap_does_not_remove_outputs_of_a_session_restarted_meanwhile(self, tmp_path):
+        manager = LiveSessionManager(idle_timeout_sec=0.2, viewer_ttl_sec=0.1, max_sessions=2, reap_interval_sec=60)
+        playlist = _playlist(tmp_path, "cam1")
+        os.makedirs(os.path.dirname(playlist), exist_ok=True)
+        try:
+            old = manager.acquire("cam1", playlist, lambda: subprocess.Popen(
+                [sys.executable, "-c", _SLOW_STOP_FFMPEG, playlist, "0.5"]))
+            assert _wait_until(lambda: os.path.exists(playlist))
+            time.sleep(0.3)
+
+            # リーパーが古い ffmpeg の終了を待っている間に、同じカメラへの視聴が来る
+            reaper = threading.Thread(target=manager.reap_idle)
+            reaper.start()
+            time.sleep(0.1)
+            new = manager.acquire("cam1", playlist, _fake_spawn(playlist, delay=0.05), "viewer")
+            reaper.join()
+
+            assert new is not old and old.process.poll() is not None
+            assert _wait_until(lambda: new.state == "ready")
+            time.sleep(0.3)
+            assert os.path.exists(playlist)
+            assert manager.touch("cam1", "viewer") is True
+        finally:
+            manager.shutdown()
+
+
+class TestCapacity:
+    def test_idle_session_is_evicted_for_a_new_camera(self, manager, tmp_path):
+        first = manager.acquire("cam1", _playlist(tmp_path, "cam1"), _fake_spawn(_playlist(tmp_path, "cam1")), "a")
+        manager.acquire("cam2", _playlist(tmp_path, "cam2"), _fake_spawn(_playlist(tmp_path, "cam2")), "b")
+        time.sleep(0.35)  # viewer_ttl を過ぎて cam1・cam2 とも視聴者なし
+        manager.touch("cam2", "b")
+
+        manager.acquire("cam3", _playlist(tmp_path, "cam3"), _fake_spawn(_playlist(tmp_path, "cam3")), "c")
+
+        assert first.process.poll() is not None
+        assert sorted(s["camera_id"] for s in manager.snapshot()) == ["cam2", "cam3"]
+        assert manager.stats["evicted"] == 1
+
+    def test_limit_error_when_every_session_is_watched(self, manager, tmp_path):
+        manager.acquire("cam1", _playlist(tmp_path, "cam1"), _fake_spawn(_playlist(tmp_path, "cam1")), "a")
+        manager.acquire("cam2", _playlist(tmp_path, "cam2"), _fake_spawn(_playlist(tmp_path, "cam2")), "b")
+        spawned = []
+        with pytest.raises(LiveSessionLimitError):
+            manager.acquire("cam3", _playlist(tmp_path, "cam3"), _fake_spawn(_playlist(tmp_path, "cam3"), counter=spawned))
+        assert spawned == []
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+async def test_real_ffmpeg_testsrc_is_served_and_reaped(manager, tmp_path):
+    playlist = _playlist(tmp_path, "lavfi")
+    os.makedirs(os.path.dirname(playlist), exist_ok=True)
+
+    def spawn():
+        return subprocess.Popen(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-re",
+             "-f", "lavfi", "-i", "testsrc=size=320x240:rate=10",
+             "-c:v", "libx264", "-preset", "ultrafast", "-g", "10",
+             "-f", "hls", "-hls_time", "1", "-hls_list_size", "3", "-hls_flags", "delete_segments", playlist],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    started = time.perf_counter()
+    session = await asyncio.to_thread(manager.acquire, "lavfi", playlist, spawn, "viewer")
+    assert await manager.wait_ready(session, timeout=15) is True
+    print(f"\nffmpeg testsrc cold start: {time.perf_counter() - started:.2f}s")
+
+    assert await asyncio.to_thread(_wait_until, lambda: session.process.poll() is not None, 5)
@@ -10,17 +10,24 @@ Discord側が遅い/落ちている場合、ログを出したリクエスト処
 あわせて、Low項目として報告されていた `"Discord" not in record.msg` が
 record.msg が非文字列(例外オブジェクト等)の場合にTypeErrorになりうる問題も
 同時に修正する(str化してから比較する)。
+
+setup_logging はロガーに PipelineHandler を1つだけ付け、出力はプロセス共通の QueueListener が行う。
+エラーの嵐 (1万件) でもスレッド数と Discord への送信数が増え続けないこと、同じエラーが
+「xN in last Ns」のまとめ送信に集約されることも確認する。
 """
 import logging
 import os
+import re
 import sys
+import threading
 import time
 from unittest.mock import patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
-from core.logger import DiscordErrorHandler
+from core import logger as core_logger
+from core.logger import DiscordErrorHandler, PipelineHandler, setup_logging
 
 
 def _make_error_record(msg="something broke") -> logging.LogRecord:
@@ -84,3 +91,70 @@ class TestEmitSkipsDiscordOriginatedMessages:
             handler.emit(record)
             time.sleep(0.3)
             assert mock_post.call_count == 0
+
+
+class TestSetupLoggingIsIdempotent:
+    def test_repeated_setup_keeps_single_handler_and_listener(self):
+        logger = setup_logging("test_logger_idempotent", webhook_url="https://discord.example/a")
+        handler = logger.handlers[0]
+        listener = core_logger._listener
+        threads = threading.active_count()
+
+        for _ in range(5):
+            assert setup_logging("test_logger_idempotent", webhook_url="https://discord.example/a") is logger
+        assert logger.handlers == [handler]
+        assert isinstance(handler, PipelineHandler)
+        assert core_logger._listener is listener
+        assert threading.active_count() == threads
+
+        setup_logging("test_logger_idempotent", webhook_url="https://discord.example/b")
+        assert len(logger.handlers) == 1 and logger.handlers[0].webhook_url == "https://discord.example/b"
+
+
+class TestErrorStorm:
+    def test_10k_errors_keep_threads_and_posts_bounded(self, monkeypatch):
+        url = "https://discord.example/storm"
+        monkeypatch.setattr(config, "LOG_DISCORD_DIGEST_SEC", 0.5)
+        monkeypatch.setattr(config, "LOG_DISCORD_BURST", 5)
+        monkeypatch.setattr(config, "LOG_DISCORD_PER_MINUTE", 60)
+        logger = setup_logging("test_logger_storm", webhook_url=url)
+        discord = next(h for h in core_logger._sinks if isinstance(h, DiscordErrorHandler))
+        for handler in core_logger._sinks:
+            if handler is not discord:
+                # コンソール・ログファイルへ1万行を出さない
+                monkeypatch.setattr(handler, "level", logging.CRITICAL + 1)
+
+        posts = []
+        monkeypatch.setattr(core_logger.requests, "post", lambda u, **kw: posts.append((u, kw["json"]["content"])))
+        received = discord.stats["received"]
+        baseline = threading.active_count()
+        peak = [baseline]
+
+        def storm():
+            for i in range(1250):
+                logger.error(f"NAS が応答しません ({i % 20})")
+                if i % 100 == 0:
+                    peak[0] = max(peak[0], threading.active_count())
+
+        workers = [threading.Thread(target=storm) for _ in range(8)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        def counted():
+            storm_posts = [c for u, c in posts if u == url]
+            digests = sum(int(n) for c in storm_posts for n in re.findall(r"x(\d+) in last", c))
+            immediate = sum(1 for c in storm_posts if "システムエラー発生" in c)
+            return storm_posts, digests + immediate
+
+        deadline = time.monotonic() + 15
+        while counted()[1] < 10000 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        storm_posts, total = counted()
+        assert discord.stats["received"] - received == 10000
+        assert total == 10000  # 1件も落とさず、すぐ送った分とまとめ送信の件数で全件を数える
+        assert len(storm_posts) <= 15
+        # 増えてよいのは嵐を起こしたスレッドと Discord 送信スレッド1つまで (1件ごとにスレッドを立てない)
+        assert peak[0] <= baseline + len(workers) + 1
@@ -20,8 +20,10 @@ def _make_minimal_schema(conn: sqlite3.Connection) -> None:
         CREATE TABLE quest_users (user_id TEXT PRIMARY KEY, name TEXT);
         CREATE TABLE quest_master (quest_id INTEGER PRIMARY KEY, title TEXT);
         CREATE TABLE reward_master (reward_id INTEGER PRIMARY KEY, title TEXT);
-        CREATE TABLE quest_history (id INTEGER PRIMARY KEY, user_id TEXT, quest_id INTEGER);
-        CREATE TABLE device_records (id INTEGER PRIMARY KEY, device_id TEXT);
+        CREATE TABLE quest_history (id INTEGER PRIMARY KEY, user_id TEXT, quest_id INTEGER, completed_at DATETIME, status TEXT);
+        CREATE TABLE device_records (id INTEGER PRIMARY KEY, device_id TEXT, timestamp DATETIME);
+        CREATE TABLE power_usage (id INTEGER PRIMARY KEY, device_id TEXT, timestamp DATETIME);
+        CREATE TABLE switchbot_meter_logs (id INTEGER PRIMARY KEY, device_id TEXT, timestamp DATETIME);
     """)
     conn.commit()
 
@@ -55,6 +57,11 @@ def test_apply_pending_migrations_adds_expected_columns():
         assert "0002_add_quest_master_reset_period.sql" in applied
         assert "0003_add_reward_master_description.sql" in applied
         assert "0004_add_coop_quest_link.sql" in applied
+        assert "0007_add_sensor_rollups.sql" in applied
+        assert "0008_add_quest_history_user_quest_index.sql" in applied
+
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+        assert {"sensor_rollup_state", "power_usage_rollup", "switchbot_meter_rollup", "device_records_rollup"} <= tables
     finally:
         conn.close()
 
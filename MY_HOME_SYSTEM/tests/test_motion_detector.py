@@ -0,0 +1,164 @@
+# MY_HOME_SYSTEM/tests/test_motion_detector.py
+"""
+monitors/smart_timelapse_generator.py の動き検知パイプラインのテスト。
+- 読み込みスレッド + フレームバッファ経由でも全フレームが順番どおり解析されること
+- 静止フレームの MOG2 省略が、省略しない場合と同じ検知結果になること
+- motion.csv がまとめて書き出されても全行が残ること
+- 複数ファイルの検知結果が入力順に返ること
+"""
+import csv
+import io
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from monitors import smart_timelapse_generator as stg
+from monitors.smart_timelapse_generator import FrameRing, MotionDetector
+
+W, H = stg.WIDTH, stg.HEIGHT
+
+
+def _frames(n, moving=()):
+    """灰色の静止画に、moving に含まれる秒だけ白い四角が横に動く合成フレーム"""
+    frames = []
+    for sec in range(n):
+        frame = np.full((H, W), 100, dtype=np.uint8)
+        if sec in moving:
+            x = 10 + (sec * 25) % (W - 60)
+            frame[60:110, x:x + 40] = 250
+        frames.append(frame)
+    return frames
+
+
+class FakeProcess:
+    def __init__(self, frames):
+        self.stdout = io.BufferedReader(io.BytesIO(b"".join(f.tobytes() for f in frames)))
+        self.stderr = io.BytesIO(b"")
+        self.returncode = 0
+
+    def wait(self, timeout=None):
+        return 0
+
+    def poll(self):
+        return 0
+
+    def kill(self):
+        pass
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """ffmpeg の代わりにコマンドの入力パスに対応する合成フレームを流す"""
+    sources = {}
+
+    def popen(cmd, **kwargs):
+        return FakeProcess(sources[cmd[cmd.index("-i") + 1]])
+
+    monkeypatch.setattr(stg.subprocess, "Popen", popen)
+    return sources
+
+
+MOVING = set(range(20, 30)) | set(range(60, 66))
+
+
+class TestFrameRing:
+    def test_reads_frames_in_order_with_small_buffer(self):
+        frames = _frames(10)
+        for i, f in enumerate(frames):
+            f[0, 0] = i
+        ring = FrameRing(2, H, W)
+        stream = io.BufferedReader(io.BytesIO(b"".join(f.tobytes() for f in frames)))
+        reader = threading.Thread(target=ring.fill, args=(stream,))
+        reader.start()
+
+        seen = []
+        for idx in ring:
+            seen.append(int(ring.frames[idx][0, 0]))
+            ring.release(idx)
+        reader.join(timeout=5)
+        assert seen == list(range(10))
+
+    def test_partial_trailing_frame_is_dropped(self):
+        ring = FrameRing(4, H, W)
+        ring.fill(io.BufferedReader(io.BytesIO(b"\0" * (W * H + 10))))
+        assert len(list(ring)) == 1
+
+
+class TestDetect:
+    def test_static_skip_keeps_detection_parity(self, fake_ffmpeg, tmp_path):
+        fake_ffmpeg["clip.mp4"] = _frames(120, MOVING)
+
+        baseline = MotionDetector()
+        baseline.skip_static = False
+        expected = baseline.detect("clip.mp4", str(tmp_path), 120)
+
+        detector = MotionDetector()
+        records = detector.detect("clip.mp4", str(tmp_path), 120)
+
+        assert [r.time_sec for r in records] == [r.time_sec for r in expected]
+        # 0秒目は MOG2 の初期化で画面全体が前景になる (従来から同じ)
+        assert {r.time_sec for r in records} - {0} <= MOVING | {s + 1 for s in MOVING}
+        assert detector.stats["frames"] == 120
+        assert detector.stats["skipped"] > 60
+
+    def test_motion_csv_is_written_in_batches(self, fake_ffmpeg, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "MOTION_CSV_FLUSH_ROWS", 3)
+        fake_ffmpeg["clip.mp4"] = _frames(80, MOVING)
+
+        records = MotionDetector().detect("clip.mp4", str(tmp_path), 80, csv_name="motion_clip.csv")
+
+        with open(tmp_path / "motion_clip.csv", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["time", "largest_area", "contour_count"]
+        assert len(rows) - 1 == len(records) > 3
+
+    def test_warmup_learns_previous_clip_tail(self, fake_ffmpeg, tmp_path, monkeypatch):
+        fake_ffmpeg["prev.mp4"] = _frames(5)
+        fake_ffmpeg["clip.mp4"] = _frames(5)
+        commands = []
+        original = stg.subprocess.Popen
+
+        def popen(cmd, **kwargs):
+            commands.append(cmd)
+            return original(cmd, **kwargs)
+
+        monkeypatch.setattr(stg.subprocess, "Popen", popen)
+        detector = MotionDetector()
+        detector.detect("clip.mp4", str(tmp_path), 5, warmup_path="prev.mp4")
+
+        assert "-sseof" in commands[0] and commands[0][commands[0].index("-i") + 1] == "prev.mp4"
+        assert detector.stats["frames"] == 5
+
+
+def test_detect_many_returns_results_in_input_order(tmp_path, monkeypatch):
+    calls = []
+
+    def detect(self, path, work_dir, duration, csv_name="motion.csv", warmup_path=None):
+        calls.append((path, csv_name))
+        return [stg.MotionRecord(int(duration), 500.0, 1)]
+
+    monkeypatch.setattr(MotionDetector, "detect", detect)
+    results = MotionDetector().detect_many([("/nvr/a/0900.mp4", 1), ("/nvr/a/0910.mp4", 2)], str(tmp_path), workers=1)
+
+    assert [r[0].time_sec for r in results] == [1, 2]
+    assert calls == [("/nvr/a/0900.mp4", "motion_0900.csv"), ("/nvr/a/0910.mp4", "motion_0910.csv")]
+
+
+@pytest.mark.skipif(stg.shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_detect_many_in_worker_processes(tmp_path):
+    clips = []
+    for i in range(2):
+        path = str(tmp_path / f"2026011{i}_090000.mp4")
+        stg.subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=5", "-t", "6", path], check=True)
+        clips.append((path, 6.0))
+
+    results = MotionDetector().detect_many(clips, str(tmp_path), workers=2)
+
+    assert len(results) == 2
+    assert os.path.exists(tmp_path / "motion_20260110_090000.csv")
+    assert os.path.exists(tmp_path / "motion_20260111_090000.csv")
@@ -0,0 +1,325 @@
+# MY_HOME_SYSTEM/tests/test_notification_dispatcher.py
+"""
+services/notification_dispatcher.py (通知の送信箱と配送ワーカー) のテスト。
+
+外部へは送らず、127.0.0.1 で立てた偽の Webhook サーバー (Discord Webhook と LINE Messaging API の
+push / quota エンドポイント) へ送る。時計は差し替え、ワーカーは起動せずに process_due() を直接呼ぶ。
+
+- 受付は送信箱へ積むだけで、送信後に行が消えること
+- coalesce_key 付きの通知 (センサー通知) がまとめ待ちの間に溜まった分ごと1つの embed になること
+- Discord の 429 は Retry-After の間その Webhook へ送らず、再試行回数にも数えないこと
+- 5xx は指数バックオフで再試行し、上限で配達不能キューへ移ること。4xx はすぐ移り、Discord のエラーチャンネルへ知らせること
+- 配達不能キューの保持日数より古い行が、1日1回の整理で削除されること
+- LINE の月間上限に達していると送らずに配達不能キューへ移し、Discord のエラーチャンネルへ知らせること
+- 呼び出し元のカーソルで積んだ通知は、そのトランザクションがロールバックされると送られないこと
+- shutdown はまとめ待ちの通知も送り切ること
+"""
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from linebot.v3.messaging import ApiClient, Configuration, MessagingApi, TextMessage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+from services import notification_service
+from services.notification_dispatcher import NotificationDispatcher
+
+
+class FakeServer:
+    """受け取ったリクエストを記録し、パスごとに登録した応答 (status, headers, body) を順に返す"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                server.requests.append({
+                    "method": self.command, "path": self.path,
+                    "content_type": self.headers.get("Content-Type", ""), "body": body,
+                })
+                queue = server.responses.get(self.path)
+                status, headers, payload = queue.pop(0) if queue and len(queue) > 1 else (
+                    queue[0] if queue else (204, {}, b""))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def respond(self, path, *responses):
+        """path への応答を登録する。最後の1つはそれ以降も返し続ける"""
+        self.responses[path] = [
+            (status, headers, json.dumps(body).encode() if isinstance(body, (dict, list)) else body)
+            for status, headers, body in responses
+        ]
+
+    def to(self, path):
+        return [r for r in self.requests if r["path"] == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server():
+    fake = FakeServer()
+    fake.respond("/v2/bot/message/push", (200, {"Content-Type": "application/json"}, {"sentMessages": [{"id": "1"}]}))
+    fake.respond("/v2/bot/message/quota", (200, {"Content-Type": "application/json"}, {"type": "none"}))
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def dispatcher(isolated_db, server, clock, monkeypatch):
+    monkeypatch.setattr(config, "DISCORD_WEBHOOK_NOTIFY", f"{server.url}/notify")
+    monkeypatch.setattr(config, "DISCORD_WEBHOOK_URL", None)
+    monkeypatch.setattr(config, "DISCORD_WEBHOOK_ERROR", f"{server.url}/error")
+    monkeypatch.setattr(config, "DISCORD_WEBHOOK_REPORT", f"{server.url}/report")
+    line_configuration = Configuration(host=server.url, access_token="test-token")
+    monkeypatch.setattr(notification_service, "line_configuration", line_configuration)
+    d = NotificationDispatcher(
+        clock=clock, autostart=False, coalesce_window_sec=5, max_attempts=3, retry_base_sec=10,
+        line_api_factory=lambda: MessagingApi(ApiClient(line_configuration)),
+    )
+    yield d
+    d.shutdown(timeout=0)
+
+
+def _outbox():
+    with common.get_db_cursor() as cur:
+        return [dict(r) for r in cur.execute("SELECT * FROM notification_outbox ORDER BY id").fetchall()]
+
+
+def _dead_letters():
+    with common.get_db_cursor() as cur:
+        return [dict(r) for r in cur.execute("SELECT * FROM notification_dead_letters ORDER BY id").fetchall()]
+
+
+def _json(request):
+    return json.loads(request["body"])
+
+
+class TestEnqueueAndDeliver:
+    def test_enqueue_only_stores_then_delivers_and_deletes(self, dispatcher, server):
+        assert dispatcher.enqueue_push("U1", [{"type": "text", "text": "こんにちは"}], target="both") is True
+        assert len(_outbox()) == 2
+        assert server.requests == []
+
+        assert dispatcher.process_due() == 2
+        assert _json(server.to("/notify")[0]) == {"content": "こんにちは\n\n"}
+        push = _json(server.to("/v2/bot/message/push")[0])
+        assert push["to"] == "U1"
+        assert push["messages"][0]["text"] == "こんにちは"
+        assert _outbox() == []
+        assert dispatcher.stats["sent"] == 2
+
+    def test_sdk_messages_and_images_round_trip(self, dispatcher, server):
+        dispatcher.enqueue_push("U1", [TextMessage(text="来客です")], image_data=b"\xff\xd8jpeg", filename="a.jpg")
+        dispatcher.process_due()
+
+        discord = server.to("/notify")[0]
+        assert discord["content_type"].startswith("multipart/form-data")
+        assert b"jpeg" in discord["body"] and b"a.jpg" in discord["body"]
+        texts = [m["text"] for m in _json(server.to("/v2/bot/message/push")[0])["messages"]]
+        assert texts == ["来客です", "※画像はDiscordを確認してください"]
+
+    def test_missing_line_configuration_falls_back_to_discord_error(self, dispatcher, server, monkeypatch):
+        monkeypatch.setattr(notification_service, "line_configuration", None)
+        assert dispatcher.enqueue_push("U1", [{"type": "text", "text": "x"}], target="line") is False
+        dispatcher.process_due()
+        assert "LINE送信失敗" in _json(server.to("/error")[0])["content"]
+
+    def test_cursor_enqueue_is_rolled_back_with_transaction(self, dispatcher):
+        with pytest.raises(RuntimeError):
+            with common.get_db_cursor(commit=True) as cur:
+                dispatcher.enqueue_push("U1", [{"type": "text", "text": "申請"}], target="discord", cursor=cur)
+                raise RuntimeError("申請失敗")
+        assert _outbox() == []
+
+        with common.get_db_cursor(commit=True) as cur:
+            dispatcher.enqueue_push("U1", [{"type": "text", "text": "申請"}], target="discord", cursor=cur)
+        assert len(_outbox()) == 1
+
+
+class TestCoalescing:
+    def test_sensor_burst_becomes_one_embed(self, dispatcher, server, clock):
+        for i in range(3):
+            dispatcher.enqueue_push("", [{"type": "text", "text": f"温度警告 {i}"}], target="discord",
+                                    coalesce_key="sensor")
+            clock.now += 1
+        assert dispatcher.process_due() == 0  # まとめ待ち
+
+        clock.now += 5
+        assert dispatcher.process_due() == 3
+        requests_ = server.to("/notify")
+        assert len(requests_) == 1
+        embed = _json(requests_[0])["embeds"][0]
+        assert embed["title"] == "🔔 3件の通知"
+        assert embed["description"] == "温度警告 0\n\n温度警告 1\n\n温度警告 2"
+        assert dispatcher.stats["coalesced"] == 2
+
+    def test_line_burst_becomes_one_text(self, dispatcher, server, clock):
+        for i in range(2):
+            dispatcher.enqueue_push("U1", [{"type": "text", "text": f"警告 {i}"}], target="line", coalesce_key="sensor")
+        clock.now += 5
+        dispatcher.process_due()
+        pushes = server.to("/v2/bot/message/push")
+        assert len(pushes) == 1
+        assert _json(pushes[0])["messages"] == [{"type": "text", "text": "警告 0\n\n警告 1"}]
+
+    def test_shutdown_flushes_waiting_notifications(self, dispatcher, server):
+        dispatcher.enqueue_push("", [{"type": "text", "text": "終了前"}], target="discord", coalesce_key="sensor")
+        dispatcher.shutdown(timeout=5)
+        assert _json(server.to("/notify")[0]) == {"content": "終了前\n\n"}
+        assert _outbox() == []
+
+
+class TestFailures:
+    def test_discord_429_blocks_webhook_without_consuming_attempts(self, dispatcher, server, clock):
+        server.respond("/notify", (429, {"Retry-After": "30"}, {"retry_after": 30}), (204, {}, b""))
+        dispatcher.enqueue_push("", [{"type": "text", "text": "a"}], target="discord")
+        dispatcher.enqueue_push("", [{"type": "text", "text": "b"}], target="discord")
+
+        dispatcher.process_due()
+        assert len(server.to("/notify")) == 1  # 2件目は 429 を受けた Webhook へ送らない
+        assert [r["attempts"] for r in _outbox()] == [0, 0]
+
+        clock.now += 29
+        assert dispatcher.process_due() == 0
+        clock.now += 1
+        assert dispatcher.process_due() == 2
+        assert len(server.to("/notify")) == 3
+        assert _outbox() == []
+
+    def test_discord_429_retry_after_from_json_body(self, dispatcher, server, clock):
+        server.respond("/notify", (429, {"Content-Type": "application/json"}, {"retry_after": 2.5}))
+        dispatcher.enqueue_push("", [{"type": "text", "text": "a"}], target="discord")
+        dispatcher.process_due()
+        assert _outbox()[0]["next_attempt_at"] == clock.now + 2.5
+
+    def test_5xx_retries_with_backoff_then_dead_letters(self, dispatcher, server, clock):
+        server.respond("/notify", (503, {}, b"unavailable"))
+        dispatcher.enqueue_push("", [{"type": "text", "text": "a"}], target="discord")
+
+        dispatcher.process_due()
+        row = _outbox()[0]
+        assert (row["attempts"], row["next_attempt_at"]) == (1, clock.now + 10)
+        clock.now += 10
+        dispatcher.process_due()
+        assert _outbox()[0]["next_attempt_at"] == clock.now + 20
+        clock.now += 20
+        dispatcher.process_due()
+
+        # 送信箱に残るのはエラーチャンネルへの知らせだけ
+        assert [row["destination"] for row in _outbox()] == ["error"]
+        dead = _dead_letters()
+        assert len(dead) == 1 and dead[0]["attempts"] == 3 and "503" in dead[0]["last_error"]
+
+    def test_4xx_dead_letters_immediately_and_reports_to_error_channel(self, dispatcher, server):
+        server.respond("/notify", (400, {}, b"bad request"))
+        dispatcher.enqueue_push("", [{"type": "text", "text": "タイムラプス Part 1/2"}], image_data=b"video", target="discord",
+                                filename="part1.mp4")
+        dispatcher.process_due()
+        assert len(_dead_letters()) == 1
+
+        dispatcher.process_due()
+        assert _outbox() == []
+        notice = _json(server.to("/error")[0])["content"]
+        assert "Discord送信失敗 (notify)" in notice and "タイムラプス Part 1/2" in notice and "part1.mp4" in notice
+
+    def test_error_channel_failure_is_not_reported_again(self, dispatcher, server):
+        server.respond("/error", (400, {}, b"bad request"))
+        dispatcher.enqueue_push("", [{"type": "text", "text": "x"}], target="discord", channel="error")
+        dispatcher.process_due()
+        assert _outbox() == []
+        assert len(_dead_letters()) == 1
+
+    def test_line_monthly_quota_exhausted(self, dispatcher, server):
+        server.respond("/v2/bot/message/quota", (200, {"Content-Type": "application/json"},
+                                                 {"type": "limited", "value": 200}))
+        server.respond("/v2/bot/message/quota/consumption", (200, {"Content-Type": "application/json"},
+                                                             {"totalUsage": 200}))
+        dispatcher.enqueue_push("U1", [{"type": "text", "text": "電池残量低下"}], target="line")
+        dispatcher.process_due()
+
+        assert server.to("/v2/bot/message/push") == []
+        assert _dead_letters()[0]["target"] == "line"
+        dispatcher.process_due()
+        notice = _json(server.to("/error")[0])["content"]
+        assert "LINE送信失敗" in notice and "電池残量低下" in notice
+
+    def test_line_quota_is_checked_periodically(self, dispatcher, server, clock):
+        for _ in range(3):
+            dispatcher.enqueue_push("U1", [{"type": "text", "text": "a"}], target="line")
+            dispatcher.process_due()
+        assert len(server.to("/v2/bot/message/quota")) == 1
+        assert len(server.to("/v2/bot/message/push")) == 3
+
+
+class TestDeadLetterRetention:
+    def test_old_dead_letters_are_pruned(self, dispatcher, server):
+        server.respond("/error", (400, {}, b"bad request"))
+        for text in ("old", "new"):
+            dispatcher.enqueue_push("", [{"type": "text", "text": text}], image_data=b"video", target="discord", channel="error")
+            dispatcher.process_due()
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute("UPDATE notification_dead_letters SET failed_at = ? WHERE messages LIKE '%old%'",
+                        ("2026-01-01T00:00:00+09:00",))
+
+        dispatcher.dead_letter_retention_days = 14
+        assert dispatcher.prune_dead_letters(now=datetime.fromisoformat("2026-01-20T00:00:00+09:00")) == 1
+        assert ["old" in row["messages"] for row in _dead_letters()] == [False]
+
+    def test_pruning_runs_once_per_interval(self, dispatcher, clock, monkeypatch):
+        calls = []
+        monkeypatch.setattr(dispatcher, "prune_dead_letters", lambda now=None: calls.append(clock.now) or 0)
+        dispatcher._maybe_prune()
+        clock.now += 60
+        dispatcher._maybe_prune()
+        clock.now += 24 * 60 * 60
+        dispatcher._maybe_prune()
+        assert len(calls) == 2
+
+
+class TestLease:
+    def test_claimed_rows_are_not_claimed_twice(self, dispatcher, isolated_db, clock):
+        other = NotificationDispatcher(clock=clock, autostart=False)
+        dispatcher.enqueue_push("", [{"type": "text", "text": "a"}], target="discord")
+        assert len(dispatcher._claim(clock.now, flush=False)) == 1
+        assert other._claim(clock.now, flush=False) == []
@@ -3,9 +3,10 @@
 services/notification_service.py の通知経路のテスト。
 
 実際のDiscord/LINE APIには一切アクセスしない(requests.post・LINE SDKをモック)。
-send_push(target="both") は「Discordが失敗してもLINEへはフォールバックしない」
+send_push_now(target="both") (送信箱を通さない直接送信) は「Discordが失敗してもLINEへはフォールバックしない」
 「LINEが失敗したらDiscordのエラーチャンネルへフォールバックする」という
 非対称な設計になっており、この既存の意図した挙動を回帰テストとして固定する。
+send_push (送信箱への受付) と配送は tests/test_notification_dispatcher.py を参照。
 """
 import os
 import sys
@@ -89,7 +90,7 @@ class TestSendPushFallbackBehavior:
         )
         _install_fake_line_sdk(monkeypatch)
 
-        result = notification_service.send_push(
+        result = notification_service.send_push_now(
             user_id="dad", messages=[{"type": "text", "text": "hi"}], target="both"
         )
         assert result is True
@@ -106,7 +107,7 @@ class TestSendPushFallbackBehavior:
         monkeypatch.setattr(notification_service.requests, "post", _fake_post)
         _install_fake_line_sdk(monkeypatch, push_side_effect=Exception("LINE API down"))
 
-        result = notification_service.send_push(
+        result = notification_service.send_push_now(
             user_id="dad", messages=[{"type": "text", "text": "hi"}], target="line"
         )
 
@@ -124,7 +125,7 @@ class TestSendPushFallbackBehavior:
         )
         fake_api = _install_fake_line_sdk(monkeypatch)
 
-        result = notification_service.send_push(
+        result = notification_service.send_push_now(
             user_id="dad", messages=[{"type": "text", "text": "hi"}], target="discord"
         )
 
@@ -0,0 +1,164 @@
+# MY_HOME_SYSTEM/tests/test_quest_completion_stats.py
+"""
+services/quest_service.py のクエスト完了状況の一括集計 (fetch_completion_stats) のテスト。
+
+- (user_id, quest_id) ごとの最新完了・本日の完了回数・ブースト対象判定が正しいこと
+- calculate_quest_boost が集計結果を渡された場合にDBを参照しないこと
+- is_within_reset_period が変換済みの datetime/date を受け付けること
+- 表示データの completedQuests が従来どおり (通常=ユーザーごとの最新、無限=周期内の全件) 組み立てられること
+"""
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+from services import quest_service as quest_service_module
+from services.quest_service import GameSystem, QuestService, fetch_completion_stats
+
+JST = quest_service_module.JST
+
+
+def _days_ago(days, hour=10):
+    d = datetime.datetime.now() - datetime.timedelta(days=days)
+    return d.replace(hour=hour, minute=0, second=0, microsecond=0).isoformat()
+
+
+def _jst_days_ago(days, hour=10):
+    """表示データの周期判定はJST基準のため、JSTの日付でタイムスタンプを作る"""
+    d = datetime.datetime.now(JST) - datetime.timedelta(days=days)
+    return d.replace(hour=hour, minute=0, second=0, microsecond=0).isoformat()
+
+
+def _seed(history):
+    with common.get_db_cursor(commit=True) as cur:
+        cur.execute(
+            "INSERT INTO quest_users (user_id, name, job_class, level, exp, gold, role) VALUES "
+            "('dad', 'Dad', 'Warrior', 1, 0, 0, 'role_adult'), ('mom', 'Mom', 'Mage', 1, 0, 0, 'role_adult')"
+        )
+        cur.execute(
+            "INSERT INTO quest_master (quest_id, title, quest_type, target_user, exp_gain, gold_gain, reset_period, day_of_week) VALUES "
+            "(101, 'Daily', 'daily', 'dad', 100, 100, 'daily', NULL), "
+            "(102, 'Infinite', 'infinite', 'all', 10, 5, 'daily', NULL), "
+            "(103, 'Shared', 'daily', 'role_adult', 10, 5, 'daily', NULL), "
+            "(104, 'Monday', 'daily', 'dad', 10, 5, 'daily', '0')"
+        )
+        cur.executemany(
+            "INSERT INTO quest_history (user_id, quest_id, quest_title, exp_earned, gold_earned, completed_at, status) "
+            "VALUES (?, ?, 't', 1, 1, ?, ?)",
+            history,
+        )
+
+
+class TestFetchCompletionStats:
+    def test_latest_completion_and_today_count_per_user_and_quest(self, isolated_db):
+        _seed([
+            ("dad", 102, _days_ago(0, 8), "approved"),
+            ("dad", 102, _days_ago(0, 9), "approved"),
+            ("dad", 102, _days_ago(2), "approved"),
+            ("dad", 102, _days_ago(0, 11), "pending"),
+            ("mom", 102, _days_ago(1), "approved"),
+        ])
+        with common.get_db_cursor() as cur:
+            stats = fetch_completion_stats(cur)
+
+        dad = stats[("dad", 102)]
+        assert dad["last_completed_at"] == _days_ago(0, 9)
+        assert dad["today_count"] == 2
+        assert dad["days_since"] == 0
+        assert dad["recent"] == []
+
+        mom = stats[("mom", 102)]
+        assert mom["today_count"] == 0
+        assert mom["days_since"] == 1
+
+    def test_boost_eligibility(self, isolated_db):
+        _seed([
+            ("dad", 101, _days_ago(3), "approved"),
+            ("dad", 104, _days_ago(3), "approved"),
+            ("dad", 102, _days_ago(3), "approved"),
+            ("mom", 101, _days_ago(1), "approved"),
+        ])
+        with common.get_db_cursor() as cur:
+            stats = fetch_completion_stats(cur)
+
+        assert stats[("dad", 101)]["boost_eligible"] is True
+        # 曜日指定・非daily・昨日完了済みは対象外
+        assert stats[("dad", 104)]["boost_eligible"] is False
+        assert stats[("dad", 102)]["boost_eligible"] is False
+        assert stats[("mom", 101)]["boost_eligible"] is False
+
+    def test_since_returns_recent_rows_newest_first(self, isolated_db):
+        _seed([
+            ("dad", 102, _days_ago(0, 8), "approved"),
+            ("dad", 102, _days_ago(0, 9), "approved"),
+            ("dad", 102, _days_ago(20), "approved"),
+        ])
+        since = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+        with common.get_db_cursor() as cur:
+            stats = fetch_completion_stats(cur, since=since)
+        dad = stats[("dad", 102)]
+        assert [r["completed_at"] for r in dad["recent"]] == [_days_ago(0, 9), _days_ago(0, 8)]
+        # 集計値は since に関係なく全期間の履歴から求める
+        assert dad["today_count"] == 2
+        assert dad["recent"][0]["quest_title"] == "t"
+
+    def test_filters_by_user_and_quest(self, isolated_db):
+        _seed([("dad", 101, _days_ago(3), "approved"), ("mom", 101, _days_ago(3), "approved")])
+        with common.get_db_cursor() as cur:
+            stats = fetch_completion_stats(cur, user_id="dad", quest_id=101)
+        assert list(stats) == [("dad", 101)]
+
+
+class TestBoostFromStats:
+    def test_boost_uses_given_stats_without_querying(self, isolated_db):
+        _seed([("dad", 101, _days_ago(3), "approved")])
+        with common.get_db_cursor() as cur:
+            stats = fetch_completion_stats(cur)
+            quest = cur.execute("SELECT * FROM quest_master WHERE quest_id = 101").fetchone()
+        # cur=None でも集計結果だけで算出できる
+        assert QuestService().calculate_quest_boost(None, "dad", quest, stats=stats) == {"gold": 20, "exp": 20}
+        assert QuestService().calculate_quest_boost(None, "mom", quest, stats=stats) == {"gold": 0, "exp": 0}
+
+
+class TestIsWithinResetPeriodParsed:
+    def test_accepts_datetime_and_date(self):
+        service = QuestService()
+        now_jst = datetime.datetime.now(JST)
+        assert service.is_within_reset_period(now_jst, "daily") is True
+        assert service.is_within_reset_period(now_jst.date(), "daily") is True
+        assert service.is_within_reset_period(now_jst.date() - datetime.timedelta(days=1), "daily") is False
+
+    def test_explicit_today(self):
+        service = QuestService()
+        today = datetime.date(2026, 1, 7)  # 水曜日
+        assert service.is_within_reset_period("2026-01-05T09:00:00+09:00", "weekly", today) is True
+        assert service.is_within_reset_period("2026-01-04T23:00:00+09:00", "weekly", today) is False
+        # UTC表記でもJSTの日付で判定する (2026-01-04T15:00Z = JST 1/5 0:00)
+        assert service.is_within_reset_period("2026-01-04T15:00:00+00:00", "weekly", today) is True
+
+
+class TestViewDataCompletedQuests:
+    def test_completed_quests_match_reset_rules(self, isolated_db):
+        _seed([
+            ("dad", 101, _jst_days_ago(0, 8), "approved"),
+            ("dad", 101, _jst_days_ago(0, 7), "approved"),
+            ("dad", 102, _jst_days_ago(0, 8), "approved"),
+            ("dad", 102, _jst_days_ago(0, 9), "approved"),
+            ("mom", 102, _jst_days_ago(1), "approved"),
+            ("mom", 103, _jst_days_ago(0, 6), "approved"),
+            ("dad", 103, _jst_days_ago(0, 7), "approved"),
+        ])
+        quest_service_module.invalidate_view_cache()
+        data = GameSystem().get_all_view_data()
+
+        completed = [(c["user_id"], c["quest_id"], c["completed_at"]) for c in data["completedQuests"]]
+        # 通常クエストはユーザーごとに最新1件、無限クエストは本日分すべて
+        assert completed.count(("dad", 101, _jst_days_ago(0, 8))) == 1
+        assert ("dad", 101, _jst_days_ago(0, 7)) not in completed
+        assert [c for c in completed if c[1] == 102] == [("dad", 102, _jst_days_ago(0, 9)), ("dad", 102, _jst_days_ago(0, 8))]
+
+        # 共有クエストは最も新しい完了者が表示される
+        shared = next(q for q in data["quests"] if q["quest_id"] == 103)
+        assert shared["is_shared_completed_by"] == "dad"
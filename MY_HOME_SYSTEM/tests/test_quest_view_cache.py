@@ -0,0 +1,221 @@
+# MY_HOME_SYSTEM/tests/test_quest_view_cache.py
+"""
+GameSystem.get_all_view_data の表示データキャッシュ (services/quest_service.py) のテスト。
+
+- 更新操作が無い限り、2回目以降はDBを読まずにキャッシュから返すこと
+- クエスト完了・承認/却下・購入・所持品操作・マスタ同期のたびに無効化されること
+- 時刻(分)が変わると再構築されること (時間帯・曜日限定クエストの表示切替のため)
+- /api/quest/data が ETag を返し、If-None-Match 一致時は 304 を返すこと
+- 同時ポーリング時に再構築が1回にまとめられること
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+from services import quest_service as quest_service_module
+from services.quest_service import game_system, inventory_service, quest_service, shop_service
+
+
+def _seed():
+    with common.get_db_cursor(commit=True) as cur:
+        cur.execute(
+            "INSERT INTO quest_users (user_id, name, job_class, level, exp, gold, role) VALUES "
+            "('dad', 'Dad', 'Warrior', 1, 0, 100, 'role_adult'), "
+            "('daughter', 'Daughter', 'Novice', 1, 0, 100, 'role_child')"
+        )
+        cur.execute(
+            "INSERT INTO quest_master (quest_id, title, quest_type, target_user, exp_gain, gold_gain) VALUES "
+            "(101, 'お皿洗い', 'infinite', 'all', 10, 5)"
+        )
+        cur.execute("INSERT INTO reward_master (reward_id, title, cost_gold) VALUES (201, 'おやつ', 50)")
+
+
+def _stats():
+    return quest_service_module._view_cache.stats()
+
+
+def _gold(data, user_id):
+    return next(u["gold"] for u in data["users"] if u["user_id"] == user_id)
+
+
+@pytest.fixture
+def seeded(isolated_db):
+    _seed()
+    quest_service_module.invalidate_view_cache()
+    yield
+
+
+class TestCaching:
+    def test_repeated_reads_are_served_from_cache(self, seeded):
+        first = game_system.get_view_snapshot()
+        before = _stats()
+        second = game_system.get_view_snapshot()
+        after = _stats()
+
+        assert second is first
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"]
+
+    def test_direct_db_writes_are_not_visible_until_invalidated(self, seeded):
+        game_system.get_view_snapshot()
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute("UPDATE quest_users SET gold = 999 WHERE user_id = 'dad'")
+        assert _gold(game_system.get_all_view_data(), "dad") == 100
+
+        quest_service_module.invalidate_view_cache()
+        assert _gold(game_system.get_all_view_data(), "dad") == 999
+
+    def test_returned_data_is_a_copy(self, seeded):
+        data = game_system.get_all_view_data()
+        data["users"].clear()
+        assert game_system.get_all_view_data()["users"]
+
+    def test_minute_change_rebuilds_view(self, seeded, monkeypatch):
+        first = game_system.get_view_snapshot()
+        monkeypatch.setattr(
+            quest_service_module._view_cache, "_current_key", lambda: (config.SQLITE_DB_PATH, "2099-01-01 00:00")
+        )
+        assert game_system.get_view_snapshot() is not first
+
+    def test_zero_ttl_disables_cache(self, seeded, monkeypatch):
+        monkeypatch.setattr(config, "QUEST_VIEW_CACHE_TTL_SEC", 0)
+        first = game_system.get_view_snapshot()
+        assert game_system.get_view_snapshot() is not first
+
+    def test_cache_is_not_shared_across_databases(self, seeded, tmp_path, monkeypatch):
+        game_system.get_view_snapshot()
+        import init_unified_db
+        monkeypatch.setattr(config, "SQLITE_DB_PATH", str(tmp_path / "other.db"))
+        init_unified_db.init_db()
+        assert game_system.get_all_view_data()["users"] == []
+
+    def test_get_user_view_reads_single_user_from_cache(self, seeded):
+        game_system.get_view_snapshot()
+        before = _stats()
+        user = game_system.get_user_view("dad")
+        assert user["gold"] == 100
+        assert "nextLevelExp" in user
+        assert game_system.get_user_view("nobody") is None
+        assert _stats()["misses"] == before["misses"]
+
+
+class TestInvalidation:
+    def test_quest_completion_invalidates(self, seeded):
+        game_system.get_view_snapshot()
+        quest_service.process_complete_quest("dad", 101)
+        data = game_system.get_all_view_data()
+        assert _gold(data, "dad") > 100
+        assert any("お皿洗い" in log["text"] for log in data["logs"])
+
+    def test_child_completion_and_approval_invalidate(self, seeded):
+        quest_service.process_complete_quest("daughter", 101)
+        pending = game_system.get_all_view_data()["pendingQuests"]
+        assert len(pending) == 1
+
+        quest_service.process_approve_quest("dad", pending[0]["id"])
+        data = game_system.get_all_view_data()
+        assert data["pendingQuests"] == []
+        assert _gold(data, "daughter") > 100
+
+    def test_rejection_invalidates(self, seeded):
+        quest_service.process_complete_quest("daughter", 101)
+        history_id = game_system.get_all_view_data()["pendingQuests"][0]["id"]
+        quest_service.process_reject_quest("dad", history_id)
+        assert game_system.get_all_view_data()["pendingQuests"] == []
+
+    def test_purchase_and_inventory_changes_invalidate(self, seeded, monkeypatch):
+        monkeypatch.setattr(quest_service_module.notification_service, "send_push", lambda **kw: True)
+        before = _stats()["invalidations"]
+        shop_service.process_purchase_reward("dad", 201)
+        assert _gold(game_system.get_all_view_data(), "dad") == 50
+
+        inventory_id = inventory_service.get_user_inventory("dad")[0]["id"]
+        inventory_service.use_item("dad", inventory_id)
+        inventory_service.consume_item("dad", inventory_id)
+        logs = game_system.get_all_view_data()["logs"]
+        assert any("アイテム使用" in log["text"] for log in logs)
+        assert _stats()["invalidations"] >= before + 3
+
+    def test_failed_operation_still_invalidates(self, seeded):
+        before = _stats()["invalidations"]
+        with pytest.raises(Exception):
+            shop_service.process_purchase_reward("dad", 99999)
+        assert _stats()["invalidations"] == before + 1
+
+    def test_sync_master_data_invalidates(self, seeded):
+        game_system.get_view_snapshot()
+        game_system.sync_master_data()
+        quests = game_system.get_all_view_data()["quests"]
+        assert all(q["quest_id"] != 101 for q in quests)
+
+    def test_update_during_build_is_not_cached(self, seeded):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            data = game_system._build_view_data()
+            if len(calls) == 1:
+                # 組み立て中に別スレッドの更新が入った状況を再現
+                quest_service_module.invalidate_view_cache()
+            return data
+
+        cache = quest_service_module._view_cache
+        cache.get(builder)
+        cache.get(builder)
+        assert len(calls) == 2
+
+
+class TestConcurrentPolling:
+    def test_concurrent_misses_build_only_once(self, seeded):
+        quest_service_module.invalidate_view_cache()
+        builds = []
+        gate = threading.Event()
+
+        def slow_builder():
+            builds.append(1)
+            gate.wait(1.0)
+            return game_system._build_view_data()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(quest_service_module._view_cache.get(slow_builder)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join()
+
+        assert len(builds) == 1
+        assert len({id(r) for r in results}) == 1
+
+
+class TestDataEndpointEtag:
+    def test_returns_etag_and_304_when_unchanged(self, seeded, api_client):
+        res = api_client.get("/api/quest/data")
+        assert res.status_code == 200
+        etag = res.headers["etag"]
+        assert res.headers["cache-control"] == "no-cache"
+        assert any(u["user_id"] == "dad" for u in res.json()["users"])
+
+        res = api_client.get("/api/quest/data", headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.content == b""
+
+        res = api_client.get("/api/quest/data", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert res.status_code == 304
+
+    def test_etag_changes_after_completion(self, seeded, api_client):
+        etag = api_client.get("/api/quest/data").headers["etag"]
+        api_client.post("/api/quest/complete", json={"user_id": "dad", "quest_id": 101})
+
+        res = api_client.get("/api/quest/data", headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.headers["etag"] != etag
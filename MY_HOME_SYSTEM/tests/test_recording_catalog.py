@@ -0,0 +1,223 @@
+# MY_HOME_SYSTEM/tests/test_recording_catalog.py
+"""
+services/recording_catalog.py のテスト。
+- 差分走査で追加・更新・削除が反映され、書き込み済みのファイルは再度 stat しないこと
+- 範囲 (重なり)・日付・時刻・最新の問い合わせがフォルダの走査と同じ結果になること
+- 最終走査が新しいうちはフォルダを走査しないこと、NVR のファイル切り替え後は走査し直すこと
+- DB が使えない場合はフォルダを直接走査して答えること
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.database import get_db_cursor
+from services import recording_catalog
+from services.recording_catalog import RecordingCatalog, RecordingWatcher, _RecordingEventHandler
+
+DAY = datetime(2026, 1, 10)
+
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now.timestamp()
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _record(root, camera, start: datetime, duration=600):
+    folder = root / camera
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"{start:%Y%m%d_%H%M%S}.mp4"
+    path.write_bytes(b"x" * 10)
+    mtime = (start + timedelta(seconds=duration)).timestamp()
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def clock():
+    return Clock(DAY + timedelta(hours=12))
+
+
+@pytest.fixture
+def catalog(isolated_db, tmp_path, clock):
+    return RecordingCatalog(root=lambda: str(tmp_path / "nvr"), clip_sec=600, settle_sec=120, clock=clock)
+
+
+@pytest.fixture
+def nvr(tmp_path):
+    root = tmp_path / "nvr"
+    root.mkdir()
+    return root
+
+
+def _names(recordings):
+    return [r.name for r in recordings]
+
+
+class TestReconcile:
+    def test_adds_updates_and_removes(self, catalog, nvr, clock):
+        for h in (9, 10, 11):
+            _record(nvr, "garden", DAY.replace(hour=h))
+        assert catalog.reconcile("garden") == {"added": 3, "updated": 0, "removed": 0}
+
+        os.remove(nvr / "garden" / "20260110_090000.mp4")
+        _record(nvr, "garden", DAY.replace(hour=11, minute=59), duration=5)  # 書き込み中
+        assert catalog.reconcile("garden") == {"added": 1, "updated": 0, "removed": 1}
+
+        clock.advance(600)
+        assert catalog.reconcile("garden") == {"added": 0, "updated": 1, "removed": 0}
+
+    def test_settled_files_are_not_stat_again(self, catalog, nvr):
+        for i in range(60):
+            _record(nvr, "garden", DAY + timedelta(minutes=10 * i))
+        catalog.reconcile("garden")
+        first = catalog.stats["stats"]
+
+        catalog.reconcile("garden")
+        assert first == 60
+        assert catalog.stats["stats"] == first
+
+    def test_non_recording_files_are_ignored(self, catalog, nvr):
+        _record(nvr, "garden", DAY.replace(hour=9))
+        (nvr / "garden" / "notes.txt").write_text("x")
+        (nvr / "garden" / "20260110_090000_part1.mp4").write_bytes(b"x")
+        catalog.reconcile("garden")
+        assert _names(catalog.clips_on("garden", "20260110")) == ["20260110_090000.mp4"]
+
+
+class TestQueries:
+    @pytest.fixture(autouse=True)
+    def _recordings(self, nvr):
+        for start in (DAY.replace(hour=9), DAY.replace(hour=9, minute=10), DAY.replace(hour=9, minute=40),
+                      DAY - timedelta(minutes=5)):
+            _record(nvr, "garden", start)
+        _record(nvr, "parking", DAY.replace(hour=9, minute=5))
+
+    def test_clips_overlapping_range(self, catalog):
+        found = catalog.clips("garden", DAY.replace(hour=9, minute=15), DAY.replace(hour=9, minute=45))
+        assert _names(found) == ["20260110_091000.mp4", "20260110_094000.mp4"]
+        # 前日 23:55 開始の録画は 0:05 まで重なる
+        assert _names(catalog.clips("garden", DAY, DAY.replace(minute=1))) == ["20260109_235500.mp4"]
+        assert catalog.clips("garden", DAY.replace(hour=9, minute=20), DAY.replace(hour=9, minute=40)) == []
+
+    def test_clips_on_day_and_duration(self, catalog):
+        found = catalog.clips_on("garden", "2026-01-10")
+        assert _names(found) == ["20260110_090000.mp4", "20260110_091000.mp4", "20260110_094000.mp4"]
+        assert found[0].duration == 600
+        assert found[0].start == DAY.replace(hour=9)
+
+    def test_clip_at_and_newest(self, catalog):
+        assert catalog.clip_at("garden", DAY.replace(hour=9, minute=39)).name == "20260110_091000.mp4"
+        assert catalog.clip_at("garden", DAY.replace(hour=8)).name == "20260109_235500.mp4"
+        assert catalog.clip_at("garden", DAY.replace(hour=8), lookback_sec=3600) is None
+        assert catalog.newest("garden").name == "20260110_094000.mp4"
+        assert catalog.newest("parking").name == "20260110_090500.mp4"
+        assert catalog.newest("missing") is None
+
+    def test_fallback_without_catalog_table(self, catalog):
+        expected = _names(catalog.clips_on("garden", "20260110"))
+        with get_db_cursor(commit=True) as cur:
+            cur.execute("DROP TABLE recordings")
+            cur.execute("DROP TABLE recording_scans")
+        assert _names(catalog.clips_on("garden", "20260110")) == expected
+        assert catalog.newest("garden").name == "20260110_094000.mp4"
+        assert catalog.stats["fallbacks"] >= 2
+
+
+class TestFreshness:
+    def test_recent_scan_is_reused_until_max_age(self, catalog, nvr, clock):
+        _record(nvr, "garden", DAY.replace(hour=9))
+        catalog.clips_on("garden", "20260110", max_age=60)
+        _record(nvr, "garden", DAY.replace(hour=9, minute=10))
+
+        assert len(catalog.clips_on("garden", "20260110", max_age=60)) == 1
+        clock.advance(61)
+        assert len(catalog.clips_on("garden", "20260110", max_age=60)) == 2
+
+    def test_newest_rescans_after_expected_rollover(self, catalog, nvr, clock):
+        clock.now = DAY.replace(hour=9, minute=5).timestamp()
+        _record(nvr, "garden", DAY.replace(hour=9), duration=300)
+        assert catalog.newest("garden").name == "20260110_090000.mp4"
+
+        # 09:10 に NVR が次のファイルへ切り替える。切り替え前は走査しない
+        _record(nvr, "garden", DAY.replace(hour=9, minute=10), duration=1)
+        clock.now = DAY.replace(hour=9, minute=9).timestamp()
+        scans = catalog.stats["scans"]
+        assert catalog.newest("garden").name == "20260110_090000.mp4"
+        assert catalog.stats["scans"] == scans
+
+        clock.now = DAY.replace(hour=9, minute=10, second=10).timestamp()
+        assert catalog.newest("garden").name == "20260110_091000.mp4"
+
+    def test_scan_by_another_process_is_shared(self, catalog, nvr, tmp_path, clock):
+        _record(nvr, "garden", DAY.replace(hour=9))
+        other = RecordingCatalog(root=lambda: str(nvr), clip_sec=600, settle_sec=120, clock=clock)
+        other.reconcile("garden")
+
+        assert len(catalog.clips_on("garden", "20260110")) == 1
+        assert catalog.stats["scans"] == 0
+
+
+class TestWatcher:
+    def test_events_update_catalog(self, catalog, nvr):
+        catalog.reconcile("garden")
+        handler = _RecordingEventHandler(catalog, min_interval_sec=5)
+
+        class Event:
+            is_directory = False
+
+            def __init__(self, src, dest=None):
+                self.src_path, self.dest_path = src, dest
+
+        path = _record(nvr, "garden", DAY.replace(hour=9))
+        handler.on_created(Event(path))
+        assert _names(catalog.clips_on("garden", "20260110", max_age=3600)) == ["20260110_090000.mp4"]
+
+        moved = str(nvr / "garden" / "20260110_091000.mp4")
+        os.rename(path, moved)
+        handler.on_moved(Event(path, moved))
+        assert _names(catalog.clips_on("garden", "20260110", max_age=3600)) == ["20260110_091000.mp4"]
+
+        os.remove(moved)
+        handler.on_deleted(Event(moved))
+        assert catalog.clips_on("garden", "20260110", max_age=3600) == []
+
+    def test_debounce_entries_are_pruned_after_the_interval(self, catalog, nvr):
+        now = [100.0]
+        handler = _RecordingEventHandler(catalog, min_interval_sec=5, clock=lambda: now[0])
+
+        class Event:
+            is_directory = False
+
+            def __init__(self, src):
+                self.src_path = src
+
+        for minute in range(10):
+            handler.on_modified(Event(_record(nvr, "garden", DAY.replace(hour=9, minute=minute))))
+        assert len(handler._last_update) == 10
+
+        now[0] += 6
+        latest = _record(nvr, "garden", DAY.replace(hour=10))
+        handler.on_modified(Event(latest))
+        assert list(handler._last_update) == [latest]
+
+    def test_watcher_does_not_start_without_nvr_directory(self, isolated_db, tmp_path):
+        watcher = RecordingWatcher(RecordingCatalog(root=lambda: str(tmp_path / "missing")))
+        assert watcher.start() is False
+
+
+def test_module_level_queries_use_nvr_record_dir(isolated_db, nvr, monkeypatch):
+    monkeypatch.setattr(recording_catalog.config, "NVR_RECORD_DIR", str(nvr))
+    _record(nvr, "garden", DAY.replace(hour=9))
+    assert recording_catalog.main()["garden"]["added"] == 1
+    assert recording_catalog.camera_folder({"name": "庭", "nas_folder": "garden"}) == "garden"
+    assert recording_catalog.newest("garden").name == "20260110_090000.mp4"
@@ -0,0 +1,230 @@
+# MY_HOME_SYSTEM/tests/test_rollup_service.py
+"""
+services/rollup_service.py (センサーログの集計と保持期間管理) のテスト。
+
+- 1分/1時間/1日の各単位で min/max/avg/件数が正しく集計されること
+- high-water mark により新しい行だけが差分で集計され、二重計上されないこと
+- 読み出し時に未集計の生データが合成され、集計ジョブの実行有無で結果が変わらないこと
+- 電力量(kWh)がデバイスごとに積算され、1時間を超える欠測区間は計上されないこと
+- 保持期間を過ぎた「集計済みの」生データのみが削除されること
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import config
+import services.analysis_service as analysis_service
+from services import rollup_service
+
+POWER = config.SQLITE_TABLE_POWER_USAGE
+METER = config.SQLITE_TABLE_SWITCHBOT_LOGS
+
+
+def _insert_power(rows):
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {POWER} (device_id, device_name, wattage, timestamp) VALUES (?, ?, ?, ?)", rows
+        )
+
+
+def _insert_meter(rows):
+    with common.get_db_cursor(commit=True) as cur:
+        cur.executemany(
+            f"INSERT INTO {METER} (device_id, device_name, temperature, humidity, timestamp) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def _rollup_rows(table, resolution):
+    with common.get_db_cursor() as cur:
+        return [dict(r) for r in cur.execute(
+            f"SELECT * FROM {table} WHERE resolution = ? ORDER BY device_id, bucket", (resolution,)
+        ).fetchall()]
+
+
+def _load(table, resolution, start="2026-01-01T00:00:00", end="2026-01-03T00:00:00", device_ids=None):
+    with common.get_db_cursor() as cur:
+        return rollup_service.load_rollup(
+            cur.connection, table, datetime.fromisoformat(start), datetime.fromisoformat(end), resolution, device_ids
+        )
+
+
+class TestAggregation:
+    def test_meter_rows_are_rolled_up_at_each_resolution(self, isolated_db):
+        _insert_meter([
+            ("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:05"),
+            ("m1", "リビング", 22.0, 50.0, "2026-01-01T10:00:45+09:00"),
+            ("m1", "リビング", 24.0, None, "2026-01-01T10:30:00"),
+            ("m2", "寝室", 18.0, 60.0, "2026-01-01T10:00:10"),
+        ])
+        assert rollup_service.run_rollup([METER]) == {METER: 4}
+
+        minute = [r for r in _rollup_rows("switchbot_meter_rollup", "minute") if r["device_id"] == "m1"]
+        assert [r["bucket"] for r in minute] == ["2026-01-01T10:00:00", "2026-01-01T10:30:00"]
+        assert minute[0]["sample_count"] == 2
+        assert (minute[0]["temperature_min"], minute[0]["temperature_max"]) == (20.0, 22.0)
+        assert minute[0]["temperature_avg"] == pytest.approx(21.0)
+
+        hour = [r for r in _rollup_rows("switchbot_meter_rollup", "hour") if r["device_id"] == "m1"]
+        assert len(hour) == 1
+        assert hour[0]["sample_count"] == 3
+        assert hour[0]["temperature_avg"] == pytest.approx(22.0)
+        # NULLの湿度は平均・件数に含めない
+        assert hour[0]["humidity_count"] == 2
+        assert hour[0]["humidity_avg"] == pytest.approx(45.0)
+
+        day = _rollup_rows("switchbot_meter_rollup", "day")
+        assert {r["device_id"]: r["sample_count"] for r in day} == {"m1": 3, "m2": 1}
+
+    def test_utc_timestamps_are_bucketed_in_jst(self, isolated_db):
+        _insert_meter([("m1", "リビング", 20.0, 40.0, "2026-01-01T15:30:00Z")])
+        rollup_service.run_rollup([METER])
+        day = _rollup_rows("switchbot_meter_rollup", "day")
+        assert day[0]["bucket"] == "2026-01-02T00:00:00"
+
+
+class TestIncrementalRollup:
+    def test_only_new_rows_are_merged_into_existing_buckets(self, isolated_db):
+        _insert_meter([("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:00")])
+        rollup_service.run_rollup([METER])
+        _insert_meter([("m1", "リビング", 30.0, 60.0, "2026-01-01T10:20:00")])
+
+        assert rollup_service.run_rollup([METER]) == {METER: 1}
+        assert rollup_service.run_rollup([METER]) == {METER: 0}
+
+        hour = _rollup_rows("switchbot_meter_rollup", "hour")[0]
+        assert hour["sample_count"] == 2
+        assert (hour["temperature_min"], hour["temperature_max"]) == (20.0, 30.0)
+        assert hour["temperature_avg"] == pytest.approx(25.0)
+
+    def test_small_batches_give_the_same_result_as_one_batch(self, isolated_db):
+        _insert_power([("p1", "冷蔵庫", float(w), f"2026-01-01T10:{m:02d}:00") for m, w in enumerate(range(100, 130))])
+        rollup_service.run_rollup([POWER], batch_rows=7)
+
+        hour = _rollup_rows("power_usage_rollup", "hour")[0]
+        assert hour["sample_count"] == 30
+        assert hour["wattage_avg"] == pytest.approx(114.5)
+        # 29区間 × 1分 (各区間は後側のサンプルのワット数で積算)
+        expected_kwh = sum(w / 1000 / 60 for w in range(101, 130))
+        assert hour["kwh"] == pytest.approx(expected_kwh)
+
+    def test_load_rollup_combines_rolled_and_pending_rows(self, isolated_db):
+        _insert_meter([
+            ("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:00"),
+            ("m1", "リビング", 26.0, 40.0, "2026-01-01T11:00:00"),
+        ])
+        before = _load(METER, "hour")
+
+        rollup_service.run_rollup([METER])
+        _insert_meter([("m1", "リビング", 28.0, 40.0, "2026-01-01T11:30:00")])
+        after = _load(METER, "hour")
+
+        assert [r["sample_count"] for r in before] == [1, 1]
+        assert [r["sample_count"] for r in after] == [1, 2]
+        assert after[1]["temperature_max"] == 28.0
+        assert after[1]["temperature_avg"] == pytest.approx(27.0)
+
+    def test_load_rollup_filters_by_range_and_device(self, isolated_db):
+        _insert_meter([
+            ("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:00"),
+            ("m2", "寝室", 21.0, 40.0, "2026-01-01T10:00:00"),
+            ("m1", "リビング", 22.0, 40.0, "2026-01-05T10:00:00"),
+        ])
+        rollup_service.run_rollup([METER])
+        rows = _load(METER, "day", device_ids=["m1"])
+        assert [(r["bucket"], r["device_id"]) for r in rows] == [("2026-01-01T00:00:00", "m1")]
+
+
+class TestEnergy:
+    def test_kwh_is_integrated_per_device_and_skips_gaps(self, isolated_db):
+        _insert_power([
+            ("p1", "冷蔵庫", 100.0, "2026-01-01T10:00:00"),
+            ("p2", "エアコン", 1000.0, "2026-01-01T10:10:00"),
+            ("p1", "冷蔵庫", 200.0, "2026-01-01T10:30:00"),
+            ("p2", "エアコン", 1000.0, "2026-01-01T10:40:00"),
+            # 前回から1時間超の欠測は計上しない
+            ("p1", "冷蔵庫", 300.0, "2026-01-01T12:00:00"),
+        ])
+        rollup_service.run_rollup([POWER])
+        day = {r["device_id"]: r for r in _rollup_rows("power_usage_rollup", "day")}
+        assert day["p1"]["kwh"] == pytest.approx(0.2 * 0.5)
+        assert day["p2"]["kwh"] == pytest.approx(1.0 * 0.5)
+
+    def test_kwh_continues_across_rollup_runs(self, isolated_db):
+        _insert_power([("p1", "冷蔵庫", 100.0, "2026-01-01T10:00:00")])
+        rollup_service.run_rollup([POWER])
+        _insert_power([("p1", "冷蔵庫", 600.0, "2026-01-01T10:30:00")])
+
+        # 未集計分の読み出しでも、集計済みの直前サンプルを起点に積算される
+        assert _load(POWER, "day")[0]["kwh"] == pytest.approx(0.3)
+        rollup_service.run_rollup([POWER])
+        assert _rollup_rows("power_usage_rollup", "day")[0]["kwh"] == pytest.approx(0.3)
+
+    def test_monthly_cost_uses_daily_rollups(self, isolated_db):
+        now = datetime.now(rollup_service.JST)
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        _insert_power([
+            ("remo", "Nature Remo E Lite", 1000.0, start.replace(minute=0).isoformat()),
+            ("remo", "Nature Remo E Lite", 1000.0, start.replace(minute=30).isoformat()),
+        ])
+        rollup_service.run_rollup([POWER])
+        # 0.5kWh × 31円
+        assert analysis_service.calculate_monthly_cost_cumulative() == 15
+
+
+class TestPrune:
+    def test_only_rolled_up_rows_past_retention_are_deleted(self, isolated_db, monkeypatch):
+        monkeypatch.setattr(config, "SENSOR_RAW_RETENTION_DAYS", 30)
+        _insert_meter([
+            ("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:00"),
+            ("m1", "リビング", 21.0, 40.0, "2026-03-01T10:00:00"),
+        ])
+        rollup_service.run_rollup([METER])
+        # 集計前の古い行は削除されない
+        _insert_meter([("m1", "リビング", 22.0, 40.0, "2026-01-02T10:00:00")])
+
+        pruned = rollup_service.prune(now=datetime(2026, 3, 2, 0, 0))
+        assert pruned[METER] == 1
+        with common.get_db_cursor() as cur:
+            remaining = [r[0] for r in cur.execute(f"SELECT timestamp FROM {METER} ORDER BY id").fetchall()]
+        assert remaining == ["2026-03-01T10:00:00", "2026-01-02T10:00:00"]
+        # 集計値は残る
+        assert len(_rollup_rows("switchbot_meter_rollup", "day")) == 2
+
+    def test_device_records_are_kept_when_retention_is_disabled(self, isolated_db, monkeypatch):
+        monkeypatch.setattr(config, "DEVICE_RECORDS_RETENTION_DAYS", 0)
+        with common.get_db_cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT INTO device_records (timestamp, device_name, device_id, device_type, movement_state) "
+                "VALUES ('2020-01-01T00:00:00', 'カメラ', 'cam1', 'ONVIF Camera', 'detected')"
+            )
+        rollup_service.run_maintenance()
+        with common.get_db_cursor() as cur:
+            assert cur.execute("SELECT COUNT(*) FROM device_records").fetchone()[0] == 1
+
+    def test_minute_rollups_expire_but_hourly_rollups_remain(self, isolated_db, monkeypatch):
+        monkeypatch.setattr(config, "ROLLUP_MINUTE_RETENTION_DAYS", 7)
+        _insert_meter([("m1", "リビング", 20.0, 40.0, "2026-01-01T10:00:00")])
+        rollup_service.run_rollup([METER])
+        rollup_service.prune(now=datetime(2026, 1, 20))
+        assert _rollup_rows("switchbot_meter_rollup", "minute") == []
+        assert len(_rollup_rows("switchbot_meter_rollup", "hour")) == 1
+
+
+class TestChooseResolution:
+    @pytest.mark.parametrize("step_sec, expected", [
+        (30, "minute"), (60, "minute"), (900, "minute"), (3600, "hour"), (6 * 3600, "hour"), (86400 * 31, "day"),
+    ])
+    def test_picks_coarsest_resolution_within_step(self, step_sec, expected):
+        now = datetime(2026, 1, 10, 12, 0)
+        assert rollup_service.choose_resolution(datetime(2026, 1, 10), step_sec, now=now) == expected
+
+    def test_minute_resolution_is_skipped_beyond_its_retention(self, monkeypatch):
+        monkeypatch.setattr(config, "ROLLUP_MINUTE_RETENTION_DAYS", 14)
+        now = datetime(2026, 3, 1)
+        assert rollup_service.choose_resolution(datetime(2026, 1, 1), 60, now=now) == "hour"
@@ -17,19 +17,20 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import common
 import config
+from core import device_state, ingest_queue
 from services import sensor_service
 
 
 @pytest.fixture(autouse=True)
-def _reset_sensor_state():
-    """各テストの前後でセンサーのグローバル状態をリセットする"""
-    sensor_service.IS_ACTIVE.clear()
-    sensor_service.LAST_NOTIFY_TIME.clear()
+def _reset_sensor_state(isolated_db):
+    """各テストの前後でセンサーのグローバル状態・デバイス状態ストアをリセットする"""
+    device_state.reset()
     sensor_service.EVENT_CACHE.clear()
     sensor_service.MOTION_TASKS.clear()
     yield
     sensor_service.cancel_all_tasks()
     sensor_service.MOTION_TASKS.clear()
+    device_state.reset()
 
 
 class TestIsDuplicateWebhook:
@@ -71,14 +72,14 @@ class TestProcessSensorDataMotion:
                 "mac_motion", "リビングセンサー", "リビング", "Motion Sensor", "detected"
             )
 
-        assert sensor_service.IS_ACTIVE["mac_motion"] is True
+        assert device_state.get("mac_motion").motion_active is True
         assert "mac_motion" in sensor_service.MOTION_TASKS
         mock_send.assert_called_once()
         args = mock_send.call_args[0]
         assert "動きがありました" in args[1][0]["text"]
 
     async def test_motion_detected_while_already_active_does_not_resend_notification(self):
-        sensor_service.IS_ACTIVE["mac_motion"] = True
+        device_state.update("mac_motion", motion_active=True)
         with patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
             await sensor_service.process_sensor_data(
                 "mac_motion", "リビングセンサー", "リビング", "Motion Sensor", "detected"
@@ -104,11 +105,32 @@ class TestProcessSensorDataContact:
             )
             assert mock_send.call_count == 1
 
+    async def test_cooldown_and_motion_state_survive_restart(self):
+        """見守り状態・通知クールダウンは device_state テーブルから復元される"""
+        with patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
+            await sensor_service.process_sensor_data("mac_door", "玄関ドア", "玄関", "Contact Sensor", "open")
+            await sensor_service.process_sensor_data(
+                "mac_motion", "リビングセンサー", "リビング", "Motion Sensor", "detected"
+            )
+            assert mock_send.call_count == 2
+
+            sensor_service.cancel_all_tasks()
+            device_state.reset()  # プロセス再起動相当
+
+            await sensor_service.process_sensor_data("mac_door", "玄関ドア", "玄関", "Contact Sensor", "open")
+            await sensor_service.process_sensor_data(
+                "mac_motion", "リビングセンサー", "リビング", "Motion Sensor", "detected"
+            )
+            assert mock_send.call_count == 2
+
+        assert device_state.get("mac_door").contact_state == "open"
+
 
 @pytest.mark.asyncio
 class TestProcessMeterData:
     async def test_saves_temperature_and_humidity(self, isolated_db):
         await sensor_service.process_meter_data("dev1", "リビング温湿度計", 25.5, 48.0)
+        ingest_queue.flush()
         with common.get_db_cursor() as cur:
             row = cur.execute(
                 f"SELECT * FROM {config.SQLITE_TABLE_SWITCHBOT_LOGS} WHERE device_id='dev1'"
@@ -116,6 +138,8 @@ class TestProcessMeterData:
         assert row is not None
         assert row["temperature"] == 25.5
         assert row["humidity"] == 48.0
+        snapshot = device_state.get("dev1")
+        assert (snapshot.temperature, snapshot.humidity) == (25.5, 48.0)
 
 
 @pytest.mark.asyncio
@@ -126,6 +150,7 @@ class TestProcessPowerData:
         with patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
             await sensor_service.process_power_data("dev1", "エアコン", 500, {"power_threshold_watts": 100})
 
+        ingest_queue.flush()
         with common.get_db_cursor() as cur:
             row = cur.execute(
                 f"SELECT * FROM {config.SQLITE_TABLE_POWER_USAGE} WHERE device_id='dev1'"
@@ -140,6 +165,7 @@ class TestProcessPowerData:
         mock_send.assert_not_called()
 
     async def test_crossing_threshold_upward_sends_on_notification(self, isolated_db):
+        # DBに既存の前回値は、状態ストアの初回読み込み時に復元される
         with common.get_db_cursor(commit=True) as cur:
             cur.execute(
                 f"INSERT INTO {config.SQLITE_TABLE_POWER_USAGE} (device_id, device_name, wattage, timestamp) "
@@ -174,3 +200,29 @@ class TestProcessPowerData:
         with patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
             await sensor_service.process_power_data("dev1", "エアコン", 10, {"power_threshold_watts": 100})
         mock_send.assert_not_called()
+
+
+    async def test_buffered_previous_sample_is_used_for_threshold_detection(self, isolated_db):
+        """前回サンプルが書き込みバッファに残っていても、閾値判定の前回値として参照されること"""
+        with patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
+            await sensor_service.process_power_data("dev1", "エアコン", 500, {"power_threshold_watts": 100})
+            await sensor_service.process_power_data("dev1", "エアコン", 5, {"power_threshold_watts": 100})
+
+        assert mock_send.call_count == 2
+        assert "使用終了" in mock_send.call_args[0][1][0]["text"]
+
+    async def test_previous_value_comes_from_state_store_without_db_queries(self, isolated_db):
+        """初回読み込み後は、サンプルごとに power_usage を問い合わせない"""
+        with patch.object(sensor_service, "send_push", MagicMock(return_value=True)):
+            await sensor_service.process_power_data("dev1", "エアコン", 500, {"power_threshold_watts": 100})
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("unexpected DB access")
+
+        with patch.object(device_state, "get_db_cursor", _fail), \
+             patch.object(ingest_queue, "flush", _fail), \
+             patch.object(sensor_service, "send_push", MagicMock(return_value=True)) as mock_send:
+            await sensor_service.process_power_data("dev1", "エアコン", 5, {"power_threshold_watts": 100})
+
+        assert "使用終了" in mock_send.call_args[0][1][0]["text"]
+        assert device_state.get("dev1").wattage == 5
@@ -0,0 +1,208 @@
+# MY_HOME_SYSTEM/tests/test_snapshot_service.py
+"""
+services/snapshot_service.py と /api/cameras/{camera_id}/snapshot.jpg のテスト。
+- 鮮度内の画像はメモリから返し、録画からの切り出し (ffmpeg) を起動しないこと
+- ライブ配信の latest.jpg は更新時刻で鮮度を判定し、書きかけのファイルは使わないこと
+- メモリにもライブにも無い場合だけ録画から切り出し、同時要求では1回にまとめること
+- camera_monitor はサーバーのキャッシュを先に使い、無ければ従来の切り出しに戻ること
+"""
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from monitors import camera_monitor
+from services import camera_service, snapshot_service
+from services.snapshot_service import SnapshotService, is_complete_jpeg
+
+JPEG = b"\xff\xd8" + b"\x00" * 64 + b"\xff\xd9"
+CAM = {"id": "cam1", "name": "玄関カメラ"}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def live_dir(tmp_path):
+    return tmp_path / "live"
+
+
+def _service(live_dir, clock, extractor=None):
+    calls = []
+
+    def extract(cam_conf):
+        calls.append(cam_conf["id"])
+        return JPEG if extractor is None else extractor(cam_conf)
+
+    service = SnapshotService(
+        live_path=lambda cam_id: str(live_dir / cam_id / "latest.jpg"),
+        extractor=extract, max_age_sec=5, clock=clock,
+    )
+    return service, calls
+
+
+def _write_live(live_dir, data, mtime):
+    path = live_dir / "cam1" / "latest.jpg"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_is_complete_jpeg():
+    assert is_complete_jpeg(JPEG)
+    assert not is_complete_jpeg(JPEG[:-2])
+    assert not is_complete_jpeg(b"")
+
+
+class TestSnapshotService:
+    def test_fresh_image_is_served_from_memory(self, live_dir, clock):
+        service, calls = _service(live_dir, clock)
+        assert service.get(CAM).source == "recording"
+        clock.now += 4
+        assert service.get(CAM).source == "recording"
+        assert calls == ["cam1"]
+        assert service.stats["memory"] == 1
+
+        clock.now += 2  # 鮮度切れで再度切り出す
+        service.get(CAM)
+        assert calls == ["cam1", "cam1"]
+
+    def test_live_jpeg_is_used_while_fresh(self, live_dir, clock):
+        service, calls = _service(live_dir, clock)
+        _write_live(live_dir, JPEG, clock.now - 1)
+
+        snap = service.get(CAM)
+        assert snap.source == "live" and snap.data == JPEG
+        assert calls == []
+
+        # ライブ配信が止まり latest.jpg が古くなったら録画から切り出す
+        clock.now += 10
+        assert service.get(CAM).source == "recording"
+        assert calls == ["cam1"]
+
+    def test_partially_written_live_jpeg_is_skipped(self, live_dir, clock):
+        service, calls = _service(live_dir, clock)
+        _write_live(live_dir, JPEG[:20], clock.now)
+
+        assert service.get(CAM, fallback=False) is None
+        assert service.stats["miss"] == 1
+        assert service.get(CAM).source == "recording"
+
+    def test_concurrent_misses_share_one_extraction(self, live_dir, clock):
+        started = threading.Event()
+
+        def slow(cam_conf):
+            started.set()
+            time.sleep(0.2)
+            return JPEG
+
+        service, calls = _service(live_dir, clock, slow)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(service.get(CAM))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        assert calls == ["cam1"]
+        assert len(results) == 4 and all(r.data == JPEG for r in results)
+
+    def test_failed_extraction_returns_none(self, live_dir, clock):
+        service, calls = _service(live_dir, clock, lambda cam_conf: None)
+        assert service.get(CAM) is None
+        assert service.stats["miss"] == 1
+
+
+def test_live_ffmpeg_writes_latest_jpeg(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(camera_service, "get_rtsp_url", lambda cam_conf: "rtsp://192.0.2.1/stream")
+    monkeypatch.setattr(camera_service.subprocess, "Popen", lambda cmd, **kwargs: commands.append(cmd))
+    monkeypatch.setattr(config, "SNAPSHOT_LIVE_FPS", 1.0)
+
+    camera_service._spawn_live_ffmpeg(CAM, str(tmp_path), str(tmp_path / "stream.m3u8"))
+
+    cmd = commands[0]
+    assert cmd[cmd.index("-update") + 1] == "1"
+    assert cmd[-1] == str(tmp_path / "latest.jpg")
+    assert cmd[cmd.index("-vf") + 1] == "fps=1"
+
+
+class TestEndpoint:
+    @pytest.fixture
+    def one_camera(self, monkeypatch, live_dir, clock):
+        monkeypatch.setattr(config, "CAMERAS", [dict(CAM, ip="192.168.1.50")])
+        service, calls = _service(live_dir, clock)
+        monkeypatch.setattr(camera_service, "snapshots", service)
+        return calls
+
+    def test_snapshot_is_returned_as_jpeg(self, api_client, one_camera, live_dir, clock):
+        _write_live(live_dir, JPEG, clock.now)
+        res = api_client.get("/api/cameras/cam1/snapshot.jpg")
+        assert res.status_code == 200
+        assert res.headers["content-type"] == "image/jpeg"
+        assert res.headers["x-snapshot-source"] == "live"
+        assert res.content == JPEG
+        assert one_camera == []
+
+    def test_miss_without_fallback_is_404(self, api_client, one_camera):
+        res = api_client.get("/api/cameras/cam1/snapshot.jpg", params={"fallback": "false"})
+        assert res.status_code == 404
+        assert one_camera == []
+
+    def test_unknown_camera_is_404(self, api_client, one_camera):
+        assert api_client.get("/api/cameras/nope/snapshot.jpg").status_code == 404
+
+
+class TestCameraMonitor:
+    @pytest.fixture
+    def cam(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(camera_monitor.device_registry, "get_camera_by_name", lambda name: CAM)
+        monkeypatch.setattr(camera_monitor, "ASSETS_DIR", str(tmp_path))
+        extracted = []
+        monkeypatch.setattr(camera_monitor, "capture_snapshot_from_nvr", lambda cam_conf: extracted.append(1) or JPEG)
+        return extracted
+
+    def test_server_cache_is_used_first(self, cam, monkeypatch):
+        monkeypatch.setattr(snapshot_service, "fetch_from_server", lambda cam_id, **kwargs: JPEG)
+        path = camera_monitor.save_image_from_stream("玄関カメラ")
+        assert open(path, "rb").read() == JPEG
+        assert cam == []
+
+    def test_falls_back_to_nvr_extraction(self, cam, monkeypatch):
+        monkeypatch.setattr(snapshot_service, "fetch_from_server", lambda cam_id, **kwargs: None)
+        assert camera_monitor.save_image_from_stream("玄関カメラ") is not None
+        assert cam == [1]
+
+    def test_fetch_from_server_handles_unreachable_server(self, monkeypatch):
+        monkeypatch.setattr(config, "SNAPSHOT_SERVER_URL", "http://127.0.0.1:9")
+        assert snapshot_service.fetch_from_server("cam1", timeout=0.5) is None
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_real_recording_extraction(tmp_path, monkeypatch, isolated_db):
+    folder = tmp_path / "entrance"
+    folder.mkdir()
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=5",
+                    "-t", "3", str(folder / "20260110_090000.mp4")], check=True)
+    monkeypatch.setattr(config, "NVR_RECORD_DIR", str(tmp_path))
+
+    data = snapshot_service.extract_from_recording({"id": "cam1", "name": "entrance", "nas_folder": "entrance"})
+    assert data and is_complete_jpeg(data)
@@ -1,37 +1,41 @@
 # MY_HOME_SYSTEM/tests/test_switchbot_power_monitor.py
 """
-monitors/switchbot_power_monitor.py の状態変化検知(_last_device_states)のテスト。
+monitors/switchbot_power_monitor.py の状態変化検知のテスト。
 
-M-4-5: _last_device_states はプロセス内メモリのみのキャッシュだったが、
+M-4-5: 前回ステータスはプロセス内メモリのみのキャッシュ(_last_device_states)だったが、
 scheduler_boot.py はこのスクリプトを5分ごとに subprocess.run(...) で
 **毎回新しいプロセスとして**起動する(run_script参照)。そのため
 _last_device_states は実行のたびに空の辞書から始まり、log_device_state_change()
 は常に「初回取得(last_status is None)」として扱ってしまい、ON/OFF等の
 デジタル状態変化が INFO ログとして一度も記録されない構造的なバグがあった。
 
-このテストでは、モジュールレベルの `_last_device_states` を明示的に clear()
-することで「scheduler_boot.py が新規プロセスを起動した直後」の状態を再現し、
-ディスクへの永続化ファイルから前回状態が正しく復元されることを検証する。
+前回ステータスは現在 core/device_state.py (device_state テーブル) に保持している。
+このテストでは device_state.reset() でメモリ上の状態を破棄することで
+「プロセスを再起動した直後」の状態を再現し、DBから前回状態が正しく復元されることを検証する。
 """
+import json
 import os
 import sys
 
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
+from core import device_state
 from monitors import switchbot_power_monitor as spm
 
 
 @pytest.fixture
-def isolated_state_file(tmp_path, monkeypatch):
+def isolated_state_file(isolated_db, tmp_path, monkeypatch):
     state_path = str(tmp_path / "switchbot_device_states.json")
-    monkeypatch.setattr(spm, "_STATE_FILE", state_path)
-    spm._last_device_states.clear()
+    monkeypatch.setattr(spm, "_LEGACY_STATE_FILE", state_path)
+    # ポーリング間隔の判定はこのテストの対象外のため、毎回すべてのデバイスを問い合わせる
+    monkeypatch.setattr(spm, "is_due", lambda device_id, interval, now: True)
+    device_state.reset()
     yield state_path
-    spm._last_device_states.clear()
+    device_state.reset()
 
 
 async def _run_main_with_status(monkeypatch, device, status):
@@ -43,7 +47,7 @@ async def _run_main_with_status(monkeypatch, device, status):
     monkeypatch.setattr(spm.sensor_service, "process_power_data", _noop)
     monkeypatch.setattr(spm.sensor_service, "process_meter_data", _noop)
 
-    with patch.object(spm, "fetch_device_status_sync", return_value=status):
+    with patch.object(spm, "fetch_device_status", AsyncMock(return_value=status)):
         await spm.main()
 
 
@@ -52,16 +56,17 @@ class TestDeviceStatePersistsAcrossProcessRestarts:
         device = {"id": "dev1", "name": "TestPlug", "type": "Plug Mini (JP)"}
 
         await _run_main_with_status(monkeypatch, device, {"power_state": "OFF"})
-        assert os.path.exists(isolated_state_file), "device state should be persisted to disk after main()"
+        assert device_state.dirty_count() == 0, "device state should be persisted to the DB after main()"
 
-        # scheduler_boot.py の subprocess.run による「毎回新規プロセス」を再現するため、
-        # プロセス内メモリキャッシュだけを明示的にクリアする(ディスクの永続化ファイルは残る)。
-        spm._last_device_states.clear()
+        # プロセス再起動を再現するため、メモリ上の状態だけを破棄する(DBの device_state は残る)。
+        device_state.reset()
+        assert device_state.get("dev1").status == {"power_state": "OFF"}
 
         await _run_main_with_status(monkeypatch, device, {"power_state": "ON"})
+        device_state.reset()
 
-        # ディスクから前回状態(OFF)が読み込まれ、正しく最新値(ON)へ更新されていること。
-        assert spm._last_device_states["dev1"] == {"power_state": "ON"}
+        # DBの前回状態(OFF)が読み込まれ、正しく最新値(ON)へ更新されていること。
+        assert device_state.get("dev1").status == {"power_state": "ON"}
 
     async def test_on_off_change_is_detected_as_digital_change_not_initial_state(
         self, isolated_state_file, monkeypatch
@@ -69,7 +74,7 @@ class TestDeviceStatePersistsAcrossProcessRestarts:
         device = {"id": "dev1", "name": "TestPlug", "type": "Plug Mini (JP)"}
 
         await _run_main_with_status(monkeypatch, device, {"power_state": "OFF"})
-        spm._last_device_states.clear()  # 「新規プロセスでの2回目の定期実行」を再現
+        device_state.reset()  # 「新規プロセスでの2回目の定期実行」を再現
 
         with patch.object(spm, "log_device_state_change") as mock_log:
             await _run_main_with_status(monkeypatch, device, {"power_state": "ON"})
@@ -79,7 +84,21 @@ class TestDeviceStatePersistsAcrossProcessRestarts:
         mock_log.assert_called_once()
         _dname, _did, last_status_arg, current_status_arg = mock_log.call_args[0]
         assert last_status_arg == {"power_state": "OFF"}, (
-            "last_status should be restored from the persisted state file, not None, "
+            "last_status should be restored from the device_state table, not None, "
             "even though this simulates a freshly-started process"
         )
         assert current_status_arg == {"power_state": "ON"}
+
+
+class TestLegacyStateFile:
+    async def test_legacy_json_is_imported_once(self, isolated_state_file, monkeypatch):
+        with open(isolated_state_file, "w", encoding="utf-8") as f:
+            json.dump({"dev1": {"power_state": "OFF"}}, f)
+        device = {"id": "dev1", "name": "TestPlug", "type": "Plug Mini (JP)"}
+
+        with patch.object(spm, "log_device_state_change") as mock_log:
+            await _run_main_with_status(monkeypatch, device, {"power_state": "ON"})
+
+        assert mock_log.call_args[0][2] == {"power_state": "OFF"}
+        assert not os.path.exists(isolated_state_file)
+        assert os.path.exists(isolated_state_file + ".migrated")
@@ -5,7 +5,8 @@ services/switchbot_service.py のテスト。
 - create_switchbot_auth_headers: SwitchBot API仕様に沿ったHMAC-SHA256署名が
   正しく生成されること(署名ロジックの回帰防止)
 - request_switchbot_api: Timeout/ConnectionError発生時にExponential Backoffで
-  リトライし、最終的に失敗してもNoneを返してシステムを止めない(Fail-Soft)こと
+  リトライし、最終的に失敗してもNoneを返してシステムを止めない(Fail-Soft)こと。
+  共有の接続プールを使い、ポーリングと同じ RATE_LIMITER の予算から消費すること
   (実ネットワークには一切アクセスしない)
 """
 import base64
@@ -21,6 +22,8 @@ import requests
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
+from core import device_registry
+from core.http_client import TokenBucket
 from services import switchbot_service
 
 
@@ -30,6 +33,12 @@ def _no_real_sleep(monkeypatch):
     monkeypatch.setattr(switchbot_service.time, "sleep", lambda seconds: None)
 
 
+@pytest.fixture(autouse=True)
+def _fresh_budget(monkeypatch):
+    """テストごとに予算が満タンのバケットを使う"""
+    monkeypatch.setattr(switchbot_service, "RATE_LIMITER", TokenBucket(0.0, 100))
+
+
 class TestCreateSwitchbotAuthHeaders:
     def test_missing_token_returns_empty_dict_without_computing_signature(self, monkeypatch):
         monkeypatch.setattr(config, "SWITCHBOT_API_TOKEN", None)
@@ -93,7 +102,7 @@ class TestRequestSwitchbotApiRetry:
                 raise requests.exceptions.Timeout("simulated timeout")
             return mock_response
 
-        monkeypatch.setattr(switchbot_service.requests, "get", _flaky_get)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _flaky_get)
 
         result = switchbot_service.request_switchbot_api("http://fake", {}, max_retries=4)
 
@@ -104,7 +113,7 @@ class TestRequestSwitchbotApiRetry:
         def _always_times_out(url, headers, timeout):
             raise requests.exceptions.ConnectionError("simulated connection error")
 
-        monkeypatch.setattr(switchbot_service.requests, "get", _always_times_out)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _always_times_out)
 
         result = switchbot_service.request_switchbot_api("http://fake", {}, max_retries=3)
 
@@ -120,7 +129,7 @@ class TestRequestSwitchbotApiRetry:
             response.raise_for_status.side_effect = requests.exceptions.HTTPError("401 Unauthorized")
             return response
 
-        monkeypatch.setattr(switchbot_service.requests, "get", _unauthorized)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _unauthorized)
 
         result = switchbot_service.request_switchbot_api("http://fake", {}, max_retries=4)
 
@@ -128,12 +137,27 @@ class TestRequestSwitchbotApiRetry:
         assert call_count["n"] == 1
 
 
+    def test_each_attempt_draws_from_shared_budget_and_stops_when_exhausted(self, monkeypatch):
+        monkeypatch.setattr(switchbot_service, "RATE_LIMITER", TokenBucket(0.0, 2))
+        calls = []
+
+        def _always_times_out(url, headers, timeout):
+            calls.append(url)
+            raise requests.exceptions.Timeout("simulated timeout")
+
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _always_times_out)
+
+        assert switchbot_service.request_switchbot_api("http://fake", {}, max_retries=4) is None
+        assert len(calls) == 2
+        assert switchbot_service.RATE_LIMITER.acquired == 2
+
+
 class TestSendDeviceCommand:
     def test_missing_credentials_returns_none_without_http_call(self, monkeypatch):
         monkeypatch.setattr(config, "SWITCHBOT_API_TOKEN", None)
         monkeypatch.setattr(config, "SWITCHBOT_API_SECRET", None)
         calls = []
-        monkeypatch.setattr(switchbot_service.requests, "post", lambda *a, **kw: calls.append(1))
+        monkeypatch.setattr(switchbot_service._SESSION, "post", lambda *a, **kw: calls.append(1))
 
         result = switchbot_service.send_device_command("dev1", "turnOn")
 
@@ -146,7 +170,7 @@ class TestSendDeviceCommand:
         fake_response = MagicMock()
         fake_response.json.return_value = {"statusCode": 100, "message": "success"}
         fake_response.raise_for_status.return_value = None
-        monkeypatch.setattr(switchbot_service.requests, "post", lambda *a, **kw: fake_response)
+        monkeypatch.setattr(switchbot_service._SESSION, "post", lambda *a, **kw: fake_response)
 
         result = switchbot_service.send_device_command("dev1", "turnOn")
 
@@ -159,7 +183,7 @@ class TestSendDeviceCommand:
         def _raise(*a, **kw):
             raise requests.exceptions.RequestException("device offline")
 
-        monkeypatch.setattr(switchbot_service.requests, "post", _raise)
+        monkeypatch.setattr(switchbot_service._SESSION, "post", _raise)
 
         assert switchbot_service.send_device_command("dev1", "turnOn") is None
 
@@ -171,7 +195,7 @@ class TestGetDeviceStatus:
         fake_response = MagicMock()
         fake_response.json.return_value = {"statusCode": 100, "message": "success", "body": {"power": "on"}}
         fake_response.raise_for_status.return_value = None
-        monkeypatch.setattr(switchbot_service.requests, "get", lambda *a, **kw: fake_response)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", lambda *a, **kw: fake_response)
 
         result = switchbot_service.get_device_status("dev1")
 
@@ -180,7 +204,7 @@ class TestGetDeviceStatus:
     def test_exception_is_caught_and_returns_none(self, monkeypatch):
         def _raise(*a, **kw):
             raise requests.exceptions.Timeout("no response")
-        monkeypatch.setattr(switchbot_service.requests, "get", _raise)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _raise)
 
         assert switchbot_service.get_device_status("dev1") is None
 
@@ -188,9 +212,9 @@ class TestGetDeviceStatus:
 class TestFetchDeviceNameCache:
     @pytest.fixture(autouse=True)
     def _clean_cache(self):
-        switchbot_service.DEVICE_NAME_CACHE.clear()
+        device_registry.set_api_names({})
         yield
-        switchbot_service.DEVICE_NAME_CACHE.clear()
+        device_registry.set_api_names({})
 
     def test_missing_credentials_returns_false(self, monkeypatch):
         monkeypatch.setattr(config, "SWITCHBOT_API_TOKEN", None)
@@ -210,7 +234,7 @@ class TestFetchDeviceNameCache:
             },
         }
         fake_response.raise_for_status.return_value = None
-        monkeypatch.setattr(switchbot_service.requests, "get", lambda *a, **kw: fake_response)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", lambda *a, **kw: fake_response)
 
         result = switchbot_service.fetch_device_name_cache()
 
@@ -227,7 +251,7 @@ class TestFetchDeviceNameCache:
         fake_response = MagicMock()
         fake_response.json.return_value = {"statusCode": 190, "message": "invalid auth", "body": {}}
         fake_response.raise_for_status.return_value = None
-        monkeypatch.setattr(switchbot_service.requests, "get", lambda *a, **kw: fake_response)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", lambda *a, **kw: fake_response)
 
         assert switchbot_service.fetch_device_name_cache() is False
 
@@ -237,6 +261,6 @@ class TestFetchDeviceNameCache:
 
         def _always_fails(*a, **kw):
             raise requests.exceptions.ConnectionError("offline")
-        monkeypatch.setattr(switchbot_service.requests, "get", _always_fails)
+        monkeypatch.setattr(switchbot_service._SESSION, "get", _always_fails)
 
         assert switchbot_service.fetch_device_name_cache() is False
@@ -63,7 +63,7 @@ class TestOfficialPayloadContract:
         body = SwitchBotWebhookBody(**OFFICIAL_CONTACT_SENSOR_PAYLOAD)
         assert body.context.deviceType == "WoContact"
 
-        with patch("routers.webhook_router.save_log_async", new=AsyncMock(return_value=True)), \
+        with patch("routers.webhook_router.enqueue_log_async", new=AsyncMock(return_value=True)), \
              patch.object(webhook_router.sensor_service, "process_sensor_data", new=AsyncMock(return_value=None)), \
              patch.object(webhook_router.sb_tool, "get_device_name_by_id", return_value="玄関ドア"):
             result = await webhook_router.switchbot_webhook(body, token=None)
@@ -75,7 +75,7 @@ class TestOfficialPayloadContract:
         body = SwitchBotWebhookBody(**OFFICIAL_MOTION_SENSOR_PAYLOAD)
         assert body.context.deviceType == "WoPresence"
 
-        with patch("routers.webhook_router.save_log_async", new=AsyncMock(return_value=True)), \
+        with patch("routers.webhook_router.enqueue_log_async", new=AsyncMock(return_value=True)), \
              patch.object(webhook_router.sensor_service, "process_sensor_data", new=AsyncMock(return_value=None)), \
              patch.object(webhook_router.sb_tool, "get_device_name_by_id", return_value="人感センサー"):
             result = await webhook_router.switchbot_webhook(body, token=None)
@@ -57,3 +57,11 @@ def test_backup_endpoint_currently_requires_no_authentication(api_client, monkey
     res = api_client.post("/api/system/backup")
     assert res.status_code == 200
     assert len(calls) == 1
+
+
+def test_db_pool_stats_exposes_rw_and_ro_counters(api_client):
+    res = api_client.get("/api/system/db/pool")
+    assert res.status_code == 200
+    body = res.json()
+    for pool_name in ("rw", "ro"):
+        assert {"hits", "misses", "busy_retries", "wait_time_sec", "hit_rate"} <= set(body[pool_name])
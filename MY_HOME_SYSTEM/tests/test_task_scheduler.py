@@ -0,0 +1,262 @@
+# MY_HOME_SYSTEM/tests/test_task_scheduler.py
+"""
+core/task_scheduler.py (常駐型の定期タスクスケジューラ) のテスト。
+
+- monotonic 時計基準の固定間隔で実行され、揺らぎが間隔に累積しないこと
+- 前回実行が未完了の間は次回実行をスキップし、"skipped" として記録すること
+- inprocess モードはモジュールを1度だけimportし、sys.exit() 等でもスケジューラが落ちないこと
+- import に失敗したタスクは subprocess モードへ切り替わること
+- worker モードはクラッシュ・タイムアウト時にワーカーを再起動すること
+- 実行結果が scheduler_runs テーブルに記録されること
+"""
+import os
+import sys
+import textwrap
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common
+import scheduler_boot
+from core import task_scheduler
+from core.task_scheduler import ScheduledTask, TaskScheduler, WorkerProcess
+
+PROBE_MODULE = "sched_probe_tasks"
+
+
+@pytest.fixture
+def probe_module(tmp_path, monkeypatch):
+    """エントリ関数を持つテスト用モジュール (ワーカープロセスからもimportできるよう sys.path に追加する)"""
+    (tmp_path / f"{PROBE_MODULE}.py").write_text(textwrap.dedent("""
+        import asyncio, os, sys, time
+        IMPORT_COUNT = globals().get("IMPORT_COUNT", 0) + 1
+        calls = []
+
+        def ok():
+            calls.append("ok")
+
+        async def async_ok():
+            await asyncio.sleep(0)
+            calls.append("async_ok")
+
+        def exits():
+            sys.exit(3)
+
+        def crash():
+            os._exit(7)
+
+        def hang():
+            time.sleep(30)
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(task_scheduler, "_entry_cache", {})
+    sys.modules.pop(PROBE_MODULE, None)
+    yield
+    sys.modules.pop(PROBE_MODULE, None)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Recorder:
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, task, mode, started_at, duration_sec, cpu_sec, outcome, error=None):
+        self.rows.append({"task": task, "mode": mode, "outcome": outcome, "error": error, "cpu_sec": cpu_sec})
+
+
+def _scheduler(tasks, clock=None, recorder=None, runner=None, mode="inprocess", jitter_sec=0.0):
+    return TaskScheduler(
+        tasks,
+        runner or (lambda script, args, timeout: True),
+        mode=mode,
+        jitter_sec=jitter_sec,
+        recorder=recorder or _Recorder(),
+        clock=clock or _Clock(),
+    )
+
+
+class TestSchedule:
+    def test_runs_on_fixed_interval_without_jitter_drift(self, monkeypatch):
+        clock = _Clock()
+        runs = []
+        monkeypatch.setattr(task_scheduler.random, "uniform", lambda a, b: b)
+        scheduler = _scheduler([ScheduledTask("t", "t.py", 300)], clock=clock, jitter_sec=10)
+        monkeypatch.setattr(scheduler, "run_task", lambda task: runs.append(clock.now))
+
+        for _ in range(400):
+            scheduler.tick()
+            if scheduler._states[0].future:
+                scheduler._states[0].future.result()
+            clock.now += 5
+        scheduler.shutdown(wait=True)
+
+        # 初回は揺らぎ(10秒)後、以降は 300秒間隔 + 揺らぎ。揺らぎは累積しない
+        assert runs[:4] == [1010.0, 1310.0, 1610.0, 1910.0]
+
+    def test_overlapping_run_is_skipped_and_recorded(self, monkeypatch):
+        clock = _Clock()
+        recorder = _Recorder()
+        release = threading.Event()
+        scheduler = _scheduler([ScheduledTask("slow", "slow.py", 60)], clock=clock, recorder=recorder)
+        monkeypatch.setattr(scheduler, "run_task", lambda task: release.wait(5))
+
+        assert scheduler.tick() == ["slow"]
+        clock.now += 60
+        assert scheduler.tick() == []
+        release.set()
+        scheduler._states[0].future.result(timeout=5)
+        clock.now += 60
+        assert scheduler.tick() == ["slow"]
+        scheduler.shutdown(wait=True)
+
+        assert [r["outcome"] for r in recorder.rows] == ["skipped"]
+
+    def test_long_pause_does_not_replay_missed_runs(self, monkeypatch):
+        clock = _Clock()
+        runs = []
+        scheduler = _scheduler([ScheduledTask("t", "t.py", 60)], clock=clock)
+        monkeypatch.setattr(scheduler, "run_task", lambda task: runs.append(clock.now))
+
+        scheduler.tick()
+        clock.now += 3600
+        scheduler.tick()
+        scheduler._states[0].future.result(timeout=5)
+        clock.now += 30
+        scheduler.tick()
+        scheduler.shutdown(wait=True)
+
+        assert runs == [1000.0, 4600.0]
+
+    @pytest.mark.parametrize("mode,expected", [("inprocess", 60), ("subprocess", 300)])
+    def test_subprocess_interval_applies_only_in_subprocess_mode(self, monkeypatch, mode, expected):
+        clock = _Clock()
+        runs = []
+        task = ScheduledTask("t", "t.py", 60, entry="os:getcwd", subprocess_interval=300)
+        scheduler = _scheduler([task], clock=clock, mode=mode)
+        monkeypatch.setattr(scheduler, "run_task", lambda task: runs.append(clock.now))
+
+        for _ in range(100):
+            scheduler.tick()
+            if scheduler._states[0].future:
+                scheduler._states[0].future.result()
+            clock.now += 5
+        scheduler.shutdown(wait=True)
+
+        assert runs[1] - runs[0] == expected
+
+    def test_switchbot_keeps_legacy_interval_in_subprocess_mode(self):
+        task = next(t for t in scheduler_boot.TASKS if t.name == "switchbot_power_monitor")
+        assert _scheduler([task], mode="subprocess").interval_for(task) == 300
+
+
+class TestInProcess:
+    def test_module_is_imported_once_and_async_entries_run(self, probe_module):
+        recorder = _Recorder()
+        scheduler = _scheduler([], recorder=recorder)
+        for _ in range(3):
+            scheduler.run_task(ScheduledTask("ok", "x.py", 60, entry=f"{PROBE_MODULE}:ok"))
+        scheduler.run_task(ScheduledTask("async", "x.py", 60, entry=f"{PROBE_MODULE}:async_ok"))
+        scheduler.shutdown()
+
+        module = sys.modules[PROBE_MODULE]
+        assert module.IMPORT_COUNT == 1
+        assert module.calls == ["ok", "ok", "ok", "async_ok"]
+        assert {r["outcome"] for r in recorder.rows} == {"ok"}
+        assert all(r["mode"] == "inprocess" and r["cpu_sec"] is not None for r in recorder.rows)
+
+    def test_sys_exit_is_recorded_as_error(self, probe_module):
+        recorder = _Recorder()
+        scheduler = _scheduler([], recorder=recorder)
+        assert scheduler.run_task(ScheduledTask("exits", "x.py", 60, entry=f"{PROBE_MODULE}:exits")) == "error"
+        scheduler.shutdown()
+        assert "SystemExit" in recorder.rows[0]["error"]
+
+    def test_overrun_is_recorded_as_timeout(self, probe_module):
+        recorder = _Recorder()
+        scheduler = _scheduler([], recorder=recorder)
+        task = ScheduledTask("ok", "x.py", 60, entry=f"{PROBE_MODULE}:ok", timeout=-1)
+        assert scheduler.run_task(task) == "timeout"
+        scheduler.shutdown()
+
+    def test_import_failure_falls_back_to_subprocess(self, probe_module):
+        calls = []
+        recorder = _Recorder()
+        task = ScheduledTask("missing", "monitors/missing.py", 60, entry="no_such_module_xyz:main", timeout=42)
+        scheduler = _scheduler([task], recorder=recorder,
+                               runner=lambda script, args, timeout: calls.append((script, timeout)) or True)
+        scheduler.preload()
+        assert scheduler.mode_for(task) == "subprocess"
+        assert scheduler.run_task(task) == "ok"
+        scheduler.shutdown()
+        assert calls == [("monitors/missing.py", 42)]
+        assert recorder.rows[0]["mode"] == "subprocess"
+
+    def test_subprocess_mode_uses_runner_for_all_tasks(self, probe_module):
+        calls = []
+        task = ScheduledTask("ok", "x.py", 60, entry=f"{PROBE_MODULE}:ok")
+        scheduler = _scheduler([task], mode="subprocess",
+                               runner=lambda script, args, timeout: calls.append(script) or False)
+        assert scheduler.run_task(task) == "error"
+        scheduler.shutdown()
+        assert calls == ["x.py"]
+
+
+class TestWorker:
+    def test_worker_is_persistent_and_restarted_after_crash_or_timeout(self, probe_module):
+        worker = WorkerProcess("probe")
+        try:
+            outcome, error, cpu = worker.run(f"{PROBE_MODULE}:ok", timeout=30)
+            assert (outcome, error) == ("ok", None)
+            pid = worker.pid
+            assert worker.run(f"{PROBE_MODULE}:ok", timeout=30)[0] == "ok"
+            assert worker.pid == pid
+
+            assert worker.run(f"{PROBE_MODULE}:exits", timeout=30)[0] == "error"
+            assert worker.pid == pid
+
+            outcome, error, _ = worker.run(f"{PROBE_MODULE}:crash", timeout=30)
+            assert outcome == "crash"
+            assert "exitcode=7" in error
+
+            assert worker.run(f"{PROBE_MODULE}:hang", timeout=0.5)[0] == "timeout"
+            assert not worker.is_alive()
+
+            assert worker.run(f"{PROBE_MODULE}:ok", timeout=30)[0] == "ok"
+            assert worker.restarts == 2
+        finally:
+            worker.stop()
+
+
+class TestRunsTable:
+    def test_runs_are_recorded_and_pruned(self, isolated_db):
+        task_scheduler.record_run("t", "inprocess", "2026-01-01T00:00:00", 1.5, 0.2, "ok")
+        task_scheduler.record_run("t", "worker", "2026-03-01T00:00:00", 0.1, None, "error", "boom")
+        with common.get_db_cursor() as cur:
+            rows = [dict(r) for r in cur.execute("SELECT task, mode, outcome, error FROM scheduler_runs ORDER BY id")]
+        assert rows == [
+            {"task": "t", "mode": "inprocess", "outcome": "ok", "error": None},
+            {"task": "t", "mode": "worker", "outcome": "error", "error": "boom"},
+        ]
+
+        from datetime import datetime
+        assert task_scheduler.prune_runs(30, now=datetime(2026, 3, 2)) == 1
+
+
+class TestBootTasks:
+    def test_all_entries_resolve_to_callables(self):
+        for task in scheduler_boot.TASKS:
+            module_name, _, func_name = task.entry.partition(":")
+            path = os.path.join(scheduler_boot.PROJECT_ROOT, module_name.replace(".", os.sep) + ".py")
+            assert os.path.exists(path), task.entry
+            assert os.path.exists(os.path.join(scheduler_boot.PROJECT_ROOT, task.script))
+            with open(path, encoding="utf-8") as f:
+                assert f"def {func_name}(" in f.read(), task.entry
@@ -0,0 +1,189 @@
+# MY_HOME_SYSTEM/tests/test_timelapse_encode.py
+"""
+monitors/smart_timelapse_generator.py のクリップ並列エンコードのテスト。
+- 並列数が CPU コア数と負荷・上限設定から決まること
+- 完了順に関係なく、結合に使うクリップがイベント順に並ぶこと (失敗したクリップは除外)
+- サムネイルが同じ ffmpeg の2つ目の出力として指定されること
+- "auto" のとき、全イベントの開始位置がキーフレームに揃っている場合だけストリームコピーになること
+- ストリームコピーしたクリップの結合時に、撮影時刻・EventID を各クリップの区間に重ねること
+"""
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from monitors import smart_timelapse_generator as stg
+from monitors.smart_timelapse_generator import (
+    EncodeScheduler, EventRecord, VideoBuilder, encode_worker_count, is_keyframe_aligned,
+)
+
+START = datetime.datetime(2026, 1, 10, 9, 0, 0)
+
+
+class FakeRunner:
+    """ffmpeg の代わりにコマンドと同時実行数を記録する。クリップ名ごとに待ち時間・失敗を指定できる"""
+
+    def __init__(self, fail=(), delays=None):
+        self.fail = set(fail)
+        self.delays = delays or {}
+        self.commands = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, cmd, **kwargs):
+        clip = [arg for arg in cmd if arg.endswith(".mp4")][-1]
+        name = os.path.basename(clip)
+        with self.lock:
+            self.commands.append(cmd)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delays.get(name, 0.01))
+            if name in self.fail:
+                raise subprocess.CalledProcessError(1, cmd)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def _events(n):
+    return [EventRecord(event_id=f"Event{i + 1:03d}", start_sec=10 * i, end_sec=10 * i + 5, max_area=1.0) for i in range(n)]
+
+
+def _builder(runner, workers=4, keyframes=None):
+    return VideoBuilder(scheduler=EncodeScheduler(workers=workers, runner=runner),
+                        keyframe_probe=lambda path: keyframes or [])
+
+
+class TestWorkerCount:
+    def test_subtracts_current_load(self):
+        assert encode_worker_count(cpu_count=8, load=0.0) == 8
+        assert encode_worker_count(cpu_count=8, load=5.5) == 2
+        assert encode_worker_count(cpu_count=4, load=9.0) == 1
+
+    def test_respects_max_workers(self):
+        assert encode_worker_count(max_workers=3, cpu_count=8, load=0.0) == 3
+        assert encode_worker_count(max_workers=16, cpu_count=8, load=0.0) == 8
+
+
+class TestBuildClips:
+    def test_order_follows_events_not_completion(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", False)
+        runner = FakeRunner(delays={f"Event{i + 1:03d}.mp4": 0.05 * (6 - i) for i in range(6)})
+        jobs = [("in.mp4", ev, START) for ev in _events(6)]
+
+        clips, copy_mode = _builder(runner, workers=3).build_clips(jobs, str(tmp_path))
+
+        assert [os.path.basename(c) for c in clips] == [f"Event{i + 1:03d}.mp4" for i in range(6)]
+        assert copy_mode is False
+        assert runner.max_running == 3
+
+    def test_failed_clip_is_skipped(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", False)
+        runner = FakeRunner(fail={"Event002.mp4"})
+        jobs = [("in.mp4", ev, START) for ev in _events(3)]
+
+        clips, _ = _builder(runner).build_clips(jobs, str(tmp_path))
+        assert [os.path.basename(c) for c in clips] == ["Event001.mp4", "Event003.mp4"]
+
+    def test_thumbnail_is_second_output_of_same_command(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", False)
+        runner = FakeRunner()
+        _builder(runner, workers=2).build_clips([("in.mp4", _events(1)[0], START)], str(tmp_path))
+
+        cmd = runner.commands[0]
+        assert len(runner.commands) == 1
+        assert cmd.index(str(tmp_path / "Event001.mp4")) < cmd.index(str(tmp_path / "Event001.jpg"))
+        assert cmd[cmd.index("-frames:v") + 1] == "1"
+        assert "split=2[clip][thumb]" in cmd[cmd.index("-filter_complex") + 1]
+        assert "-threads" in cmd
+
+
+class TestCopyMode:
+    def test_auto_copies_when_all_starts_are_keyframes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", "auto")
+        runner = FakeRunner()
+        keyframes = [float(s) for s in range(0, 60, 2)]
+        jobs = [("in.mp4", ev, START) for ev in _events(3)]  # 開始 0, 10, 20 秒
+
+        _, copy_mode = _builder(runner, keyframes=keyframes).build_clips(jobs, str(tmp_path))
+
+        assert copy_mode is True
+        assert all("copy" in cmd and "libx264" not in cmd for cmd in runner.commands)
+
+    def test_auto_encodes_when_any_start_is_off_keyframe(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", "auto")
+        keyframes = [float(s) for s in range(0, 60, 4)]  # 10 秒はキーフレームではない
+        jobs = [("in.mp4", ev, START) for ev in _events(3)]
+
+        _, copy_mode = _builder(FakeRunner(), keyframes=keyframes).build_clips(jobs, str(tmp_path))
+        assert copy_mode is False
+
+    def test_explicit_setting_skips_probe(self, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", True)
+
+        def probe(path):
+            raise AssertionError("probe should not run")
+
+        builder = VideoBuilder(scheduler=EncodeScheduler(workers=1, runner=FakeRunner()), keyframe_probe=probe)
+        assert builder.resolve_copy_mode([("in.mp4", _events(1)[0], START)]) is True
+
+    def test_default_mode_is_reencode(self):
+        assert stg._parse_copy_mode(stg.config.TIMELAPSE_FAST_STREAM_COPY_MODE) is False
+
+    def test_copy_mode_concat_draws_overlays_per_clip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", True)
+        monkeypatch.setattr(stg, "HAS_DRAWTEXT_LOCALTIME", False)
+        builder = _builder(FakeRunner())
+        clips, copy_mode = builder.build_clips([("in.mp4", ev, START) for ev in _events(2)], str(tmp_path))
+        # コピーしたクリップは直前のキーフレームから始まるため、実際の長さで区間を決める
+        monkeypatch.setattr(stg, "get_video_info", lambda path, retries=3: {"format": {"duration": "6.5"}})
+        concat = []
+        monkeypatch.setattr(stg.subprocess, "run", lambda cmd, **kwargs: concat.append(cmd))
+
+        assert builder._build_concat(clips, str(tmp_path / "out.mp4"), str(tmp_path), copy_mode)
+
+        vf = concat[0][concat[0].index("-vf") + 1]
+        assert "drawtext=text='2026-01-10 09\\:00\\:00'" in vf and "enable='between(t,0,6.5)'" in vf
+        assert "drawtext=text='2026-01-10 09\\:00\\:10'" in vf and "enable='between(t,6.5,13)'" in vf
+        assert "drawtext=text='Event002'" in vf and "enable='between(t,6.5,7.5)'" in vf
+        assert vf.index("drawtext") < vf.index("setpts")
+
+    def test_keyframe_tolerance(self):
+        assert is_keyframe_aligned([0.0, 2.0, 4.0], 2.05, tolerance=0.1)
+        assert not is_keyframe_aligned([0.0, 2.0, 4.0], 3.0, tolerance=0.1)
+        assert not is_keyframe_aligned([], 0.0)
+
+    def test_parse_copy_mode(self):
+        assert stg._parse_copy_mode("auto") == "auto"
+        assert stg._parse_copy_mode("True") is True
+        assert stg._parse_copy_mode("false") is False
+        assert stg._parse_copy_mode(False) is False
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg is not installed")
+def test_encodes_testsrc_with_inline_thumbnails(tmp_path, monkeypatch):
+    monkeypatch.setattr(stg, "FAST_STREAM_COPY_MODE", "auto")
+    source = str(tmp_path / "source.mp4")
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=15", "-t", "12",
+                    "-c:v", "libx264", "-g", "15", "-sc_threshold", "0", source], check=True)
+    events = [EventRecord(event_id="Event001", start_sec=1, end_sec=4, max_area=1.0),
+              EventRecord(event_id="Event002", start_sec=6, end_sec=9, max_area=1.0)]
+
+    builder = VideoBuilder(scheduler=EncodeScheduler(workers=2))
+    clips, copy_mode = builder.build_clips([(source, ev, START) for ev in events], str(tmp_path))
+
+    assert copy_mode is True  # 1秒ごとのキーフレーム
+    assert [os.path.basename(c) for c in clips] == ["Event001.mp4", "Event002.mp4"]
+    assert all(os.path.getsize(c.replace(".mp4", ".jpg")) > 0 for c in clips)
+    output = str(tmp_path / "summary.mp4")
+    assert builder._build_concat(clips, output, str(tmp_path), copy_mode)
+    assert os.path.getsize(output) > 0
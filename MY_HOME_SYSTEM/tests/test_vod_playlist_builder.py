@@ -0,0 +1,286 @@
+# MY_HOME_SYSTEM/tests/test_vod_playlist_builder.py
+"""
+services/vod_playlist_builder.py のテスト。
+ffmpeg の代わりに、呼び出しを記録してダミーのセグメントを返す分割関数を使う。
+ffmpeg がインストールされている環境では `-f lavfi -i testsrc` で作ったmp4でも検証する。
+
+- 2回目以降のリクエストでは新しい録画だけを分割して末尾に追記すること
+- ファイルの境目に DISCONTINUITY、録画の欠落に GAP が入り、時刻と再生位置が一致すること
+- 当日分は ENDLIST を付けず、過去日付は確定後に再走査しないこと
+- 書き込み中の最新ファイルを分割しないこと
+- 最初の1ファイル分ができた時点で待機側が起きること
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.vod_playlist_builder import VodPlaylistBuilder, parse_media_playlist
+
+TODAY = "20260101"
+PAST = "20251231"
+
+
+class FakeSegmenter:
+    """10分 (4秒 x 150) のセグメントを返す。delay 秒かけて分割したことにする"""
+
+    def __init__(self, delay=0.0, segment_sec=4.0, count=150, fail=()):
+        self.calls = []
+        self.delay = delay
+        self.segment_sec = segment_sec
+        self.count = count
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def __call__(self, source_path, out_dir, prefix):
+        with self._lock:
+            self.calls.append(os.path.basename(source_path))
+        time.sleep(self.delay)
+        if os.path.basename(source_path) in self.fail:
+            return None
+        return [(f"{prefix}_{i:04d}.ts", self.segment_sec) for i in range(self.count)]
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source_dir = tmp_path / "nvr" / "garden"
+    source_dir.mkdir(parents=True)
+    return str(tmp_path / "vod" / "cam1"), str(source_dir)
+
+
+def _record(source_dir, date, hhmmss, age_sec=3600):
+    path = os.path.join(source_dir, f"{date}_{hhmmss}.mp4")
+    with open(path, "wb") as f:
+        f.write(b"x")
+    mtime = time.time() - age_sec
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _builder(segmenter, **kwargs):
+    kwargs.setdefault("settle_sec", 60)
+    return VodPlaylistBuilder(segmenter=segmenter, today=lambda: TODAY, **kwargs)
+
+
+def _build(builder, dirs, date=TODAY):
+    day = builder.request("cam1", date, *dirs)
+    if day is not None:
+        assert builder.wait_idle(day, timeout=5)
+    return day
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _timeline(playlist_text):
+    """再生位置 (秒) → 最初のセグメントURI の対応を返す (GAPはスキップ)"""
+    position, pending, gap, starts = 0.0, None, False, {}
+    for line in playlist_text.splitlines():
+        if line.startswith("#EXTINF:"):
+            pending = float(line[len("#EXTINF:"):].rstrip(","))
+        elif line == "#EXT-X-GAP":
+            gap = True
+        elif line and not line.startswith("#"):
+            if not gap and line.endswith("_0000.ts"):
+                starts[line.split("_0000")[0]] = round(position, 3)
+            position += pending
+            gap = False
+    return starts
+
+
+class TestIncrementalAppend:
+    def test_only_new_recordings_are_segmented(self, dirs):
+        segmenter = FakeSegmenter()
+        builder = _builder(segmenter)
+        for hhmmss in ("100000", "101000", "102000"):
+            _record(dirs[1], TODAY, hhmmss)
+
+        day = _build(builder, dirs)
+        assert len(segmenter.calls) == 3
+        first = _read(day.playlist_path)
+        assert "#EXT-X-PLAYLIST-TYPE:EVENT" in first
+        assert "#EXT-X-ENDLIST" not in first
+        assert first.count("#EXT-X-DISCONTINUITY") == 2
+
+        _record(dirs[1], TODAY, "103000")
+        _build(builder, dirs)
+        assert segmenter.calls[3:] == [f"{TODAY}_103000.mp4"]
+        second = _read(day.playlist_path)
+        # 既存部分はそのままで、末尾に追記されるだけ (プレイヤーの再読み込みで位置がずれない)
+        assert second.startswith(first.rsplit("\n", 1)[0])
+
+        _build(builder, dirs)
+        assert len(segmenter.calls) == 4
+
+    def test_manifest_survives_restart(self, dirs):
+        for hhmmss in ("100000", "101000"):
+            _record(dirs[1], TODAY, hhmmss)
+        _build(_builder(FakeSegmenter()), dirs)
+
+        segmenter = FakeSegmenter()
+        _record(dirs[1], TODAY, "102000")
+        _build(_builder(segmenter), dirs)
+        assert segmenter.calls == [f"{TODAY}_102000.mp4"]
+
+    def test_recording_inserted_before_last_segmented_file_rebuilds(self, dirs):
+        segmenter = FakeSegmenter()
+        builder = _builder(segmenter)
+        _record(dirs[1], TODAY, "100000")
+        _record(dirs[1], TODAY, "102000")
+        _build(builder, dirs)
+
+        _record(dirs[1], TODAY, "101000")
+        day = _build(builder, dirs)
+        assert segmenter.calls[2:] == [f"{TODAY}_100000.mp4", f"{TODAY}_101000.mp4", f"{TODAY}_102000.mp4"]
+        assert [s["file"] for s in day.sources] == [f"{TODAY}_100000.mp4", f"{TODAY}_101000.mp4", f"{TODAY}_102000.mp4"]
+        assert builder.stats["rebuilt"] == 1
+
+
+class TestTimeline:
+    def test_missing_recordings_are_filled_with_gap_segments(self, dirs):
+        builder = _builder(FakeSegmenter())
+        for hhmmss in ("100000", "101000", "103000"):  # 10:20〜10:30 の録画が欠落
+            _record(dirs[1], TODAY, hhmmss)
+
+        day = _build(builder, dirs)
+        text = _read(day.playlist_path)
+        assert "#EXT-X-GAP" in text
+        # 再生位置 = 最初の録画からの経過時間 (フロントエンドは offset_seconds を足して時刻に換算する)
+        assert _timeline(text) == {f"{TODAY}_100000": 0.0, f"{TODAY}_101000": 600.0, f"{TODAY}_103000": 1800.0}
+        for line in text.splitlines():
+            if line.startswith("#EXTINF:"):
+                assert float(line[len("#EXTINF:"):].rstrip(",")) <= 4
+
+    def test_failed_recording_is_not_retried(self, dirs):
+        segmenter = FakeSegmenter(fail={f"{TODAY}_101000.mp4"})
+        builder = _builder(segmenter)
+        for hhmmss in ("100000", "101000", "102000"):
+            _record(dirs[1], TODAY, hhmmss)
+
+        day = _build(builder, dirs)
+        assert _timeline(_read(day.playlist_path)) == {f"{TODAY}_100000": 0.0, f"{TODAY}_102000": 1200.0}
+        _build(builder, dirs)
+        assert len(segmenter.calls) == 3
+        assert builder.stats["failed"] == 1
+
+
+class TestLiveAndPastDays:
+    def test_file_being_written_is_skipped_until_settled(self, dirs):
+        now = [time.time()]
+        segmenter = FakeSegmenter()
+        builder = _builder(segmenter, clock=lambda: now[0])
+        _record(dirs[1], TODAY, "100000")
+        _record(dirs[1], TODAY, "101000", age_sec=5)
+
+        _build(builder, dirs)
+        assert segmenter.calls == [f"{TODAY}_100000.mp4"]
+
+        now[0] += 120
+        _build(builder, dirs)
+        assert segmenter.calls[1:] == [f"{TODAY}_101000.mp4"]
+
+    def test_only_recording_being_written_means_no_playlist_yet(self, dirs):
+        builder = _builder(FakeSegmenter())
+        _record(dirs[1], TODAY, "100000", age_sec=0)
+        assert builder.request("cam1", TODAY, *dirs) is None
+
+    def test_past_day_is_finalized_and_not_rescanned(self, dirs):
+        segmenter = FakeSegmenter()
+        builder = _builder(segmenter)
+        _record(dirs[1], PAST, "230000")
+
+        day = _build(builder, dirs, PAST)
+        text = _read(day.playlist_path)
+        assert "#EXT-X-PLAYLIST-TYPE:VOD" in text
+        assert text.rstrip().endswith("#EXT-X-ENDLIST")
+
+        _record(dirs[1], PAST, "235000")
+        assert _builder(segmenter).request("cam1", PAST, *dirs).complete is True
+        assert segmenter.calls == [f"{PAST}_230000.mp4"]
+
+    def test_legacy_past_playlist_is_served_as_is(self, dirs):
+        os.makedirs(dirs[0])
+        legacy = os.path.join(dirs[0], f"record_{PAST}.m3u8")
+        with open(legacy, "w", encoding="utf-8") as f:
+            f.write("#EXTM3U\n#EXT-X-ENDLIST\n")
+        segmenter = FakeSegmenter()
+        _record(dirs[1], PAST, "230000")
+
+        day = _builder(segmenter).request("cam1", PAST, *dirs)
+        assert day.ready and day.complete
+        assert segmenter.calls == []
+
+
+class TestWaiting:
+    async def test_first_playlist_is_served_before_the_day_is_segmented(self, dirs):
+        builder = _builder(FakeSegmenter(delay=0.2))
+        for i in range(6):
+            _record(dirs[1], TODAY, f"1{i}0000")
+
+        started = time.perf_counter()
+        day = await asyncio.to_thread(builder.request, "cam1", TODAY, *dirs)
+        path = await builder.wait_playlist(day, timeout=5)
+        elapsed = time.perf_counter() - started
+        print(f"\nfirst playlist after {elapsed:.2f}s (all 6 files take 1.20s)")
+        assert path == day.playlist_path
+        assert elapsed < 0.6
+        assert len(day.sources) < 6
+
+        # 分割中に来たリクエストは同じジョブを共有し、既存のプレイリストをすぐに返す
+        again = await asyncio.to_thread(builder.request, "cam1", TODAY, *dirs)
+        assert again is day
+        assert await builder.wait_playlist(again, timeout=0.01) == path
+        await asyncio.to_thread(builder.wait_idle, day, 5)
+        assert len(day.sources) == 6
+
+    def test_concurrent_requests_share_one_job(self, dirs):
+        segmenter = FakeSegmenter(delay=0.05)
+        builder = _builder(segmenter)
+        for hhmmss in ("100000", "101000"):
+            _record(dirs[1], TODAY, hhmmss)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def _call():
+            barrier.wait()
+            results.append(builder.wait_playlist_sync(builder.request("cam1", TODAY, *dirs), 5))
+
+        threads = [threading.Thread(target=_call) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        builder.wait_idle(builder.request("cam1", TODAY, *dirs), 5)
+
+        assert sorted(segmenter.calls) == [f"{TODAY}_100000.mp4", f"{TODAY}_101000.mp4"]
+        assert len(set(results)) == 1 and results[0] is not None
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_real_ffmpeg_segments_testsrc_recordings(dirs):
+    for hhmmss in ("100000", "100010"):
+        path = os.path.join(dirs[1], f"{TODAY}_{hhmmss}.mp4")
+        subprocess.run(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "testsrc=size=320x240:rate=10", "-t", "10",
+             "-c:v", "libx264", "-preset", "ultrafast", "-g", "10", path],
+            check=True,
+        )
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+    day = _build(VodPlaylistBuilder(today=lambda: TODAY), dirs)
+    assert [len(s["segments"]) > 0 for s in day.sources] == [True, True]
+    for source in day.sources:
+        for uri, _ in source["segments"]:
+            assert os.path.exists(os.path.join(dirs[0], uri))
+    assert not os.path.exists(os.path.join(dirs[0], f"{TODAY}_100000.m3u8"))
+    assert parse_media_playlist(day.playlist_path)[0][0] == f"{TODAY}_100000_0000.ts"
@@ -60,7 +60,7 @@ async def test_rejects_wrong_token_when_configured(configured_token):
 
 @pytest.mark.asyncio
 async def test_allows_correct_token(configured_token):
-    with patch("routers.webhook_router.save_log_async", new=AsyncMock(return_value=True)), \
+    with patch("routers.webhook_router.enqueue_log_async", new=AsyncMock(return_value=True)), \
          patch.object(webhook_router.sensor_service, "process_sensor_data", new=AsyncMock(return_value=None)), \
          patch.object(webhook_router.sb_tool, "get_device_name_by_id", return_value="玄関ドア"):
         result = await webhook_router.switchbot_webhook(_make_body(), token=configured_token)
@@ -72,7 +72,7 @@ async def test_allows_correct_token(configured_token):
 async def test_no_token_required_when_not_configured():
     """SWITCHBOT_WEBHOOK_TOKEN 未設定時は従来通り検証なしで通ること(後方互換)"""
     assert config.SWITCHBOT_WEBHOOK_TOKEN is None
-    with patch("routers.webhook_router.save_log_async", new=AsyncMock(return_value=True)), \
+    with patch("routers.webhook_router.enqueue_log_async", new=AsyncMock(return_value=True)), \
          patch.object(webhook_router.sensor_service, "process_sensor_data", new=AsyncMock(return_value=None)), \
          patch.object(webhook_router.sb_tool, "get_device_name_by_id", return_value="玄関ドア"):
         result = await webhook_router.switchbot_webhook(_make_body(), token=None)
@@ -83,7 +83,8 @@ async def test_no_token_required_when_not_configured():
 class TestLineCallback:
     """
     /callback/line の署名検証結果によるレスポンス分岐。
-    実際のLINE SDKのWebhookHandlerは使わず、handleメソッドの呼び出し結果のみをモックする。
+    実際のLINE SDKのWebhookHandlerは使わず、parser.parse (署名検証+パース) の結果のみをモックする。
+    パース済みイベントは line_handler.dispatch_event でユーザーごとのキューへ積まれる。
     """
 
     def test_returns_501_when_line_bot_not_configured(self, api_client, monkeypatch):
@@ -93,20 +94,24 @@ class TestLineCallback:
 
     def test_returns_ok_when_signature_is_valid(self, api_client, monkeypatch):
         fake_handler = MagicMock()
+        fake_handler.parser.parse.return_value = ["ev1", "ev2"]
         monkeypatch.setattr(webhook_router.line_handler, "line_handler", fake_handler)
+        fake_dispatch = MagicMock(return_value=True)
+        monkeypatch.setattr(webhook_router.line_handler, "dispatch_event", fake_dispatch)
 
         res = api_client.post("/callback/line", content=b'{"events": []}', headers={"X-Line-Signature": "valid-sig"})
 
         assert res.status_code == 200
         assert res.text == '"OK"'
-        fake_handler.handle.assert_called_once()
-        called_body, called_sig = fake_handler.handle.call_args[0]
+        fake_handler.parser.parse.assert_called_once()
+        called_body, called_sig = fake_handler.parser.parse.call_args[0]
         assert called_body == '{"events": []}'
         assert called_sig == "valid-sig"
+        assert [c.args[0] for c in fake_dispatch.call_args_list] == ["ev1", "ev2"]
 
     def test_returns_400_on_invalid_signature(self, api_client, monkeypatch):
         fake_handler = MagicMock()
-        fake_handler.handle.side_effect = InvalidSignatureError("bad signature")
+        fake_handler.parser.parse.side_effect = InvalidSignatureError("bad signature")
         monkeypatch.setattr(webhook_router.line_handler, "line_handler", fake_handler)
 
         res = api_client.post("/callback/line", content=b"{}", headers={"X-Line-Signature": "wrong-sig"})
@@ -119,7 +124,7 @@ class TestLineCallback:
         リトライ挙動に巻き込まれる可能性があるため、想定外の例外はログのみで200を返す設計。
         """
         fake_handler = MagicMock()
-        fake_handler.handle.side_effect = RuntimeError("unexpected internal error")
+        fake_handler.parser.parse.side_effect = RuntimeError("unexpected internal error")
         monkeypatch.setattr(webhook_router.line_handler, "line_handler", fake_handler)
 
         res = api_client.post("/callback/line", content=b"{}", headers={"X-Line-Signature": "sig"})
@@ -27,7 +27,9 @@ import sqlite3
 import config
 from core.logger import setup_logging
 from core.migrations import apply_pending_migrations
-from services import sensor_service
+from core import device_state, ingest_queue
+from handlers import line_handler
+from services import camera_service, notification_dispatcher, recording_catalog, sensor_service
 
 # Routers
 from routers import quest_router, webhook_router, system_router, camera_router
@@ -109,6 +111,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     except Exception as e:
         logger.error(f"⚠️ Migration check failed (continuing startup): {e}")
 
+    # デバイス状態 (見守り・開閉・最新の電力値等) を各テーブルの最新行から1度だけ復元する
+    await asyncio.to_thread(device_state.snapshot)
+
+    # NVR録画の追加・削除を録画カタログへ即時に反映する (services/recording_catalog.py)
+    await asyncio.to_thread(recording_catalog.start_watcher)
+
+    # 通知の送信箱の配送ワーカー (services/notification_dispatcher.py)。
+    # 他プロセス (cron・監視スクリプト) が積んだまま終了した通知や、再試行待ちの通知もここで送る
+    notification_dispatcher.start()
+
     global camera_process
     camera_script = os.path.join(PROJECT_ROOT, "monitors/camera_monitor.py")
     camera_process = subprocess.Popen([sys.executable, camera_script])
@@ -148,6 +160,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         logger.info("Camera monitor stopped.")
 
     sensor_service.cancel_all_tasks()
+
+    # 受け付け済みの LINE イベントを処理し切ってから止める (handlers/line_handler.py)
+    await line_handler.event_dispatcher.shutdown(config.LINE_EVENT_DRAIN_ON_EXIT_SEC)
+
+    # 視聴中のライブ配信の ffmpeg を停止する (services/live_session_manager.py)
+    await asyncio.to_thread(camera_service.live_sessions.shutdown)
+    await asyncio.to_thread(recording_catalog.stop_watcher)
+
+    # バッファ済みのセンサーログ・デバイス状態を書き込んでから終了する (core/ingest_queue.py, core/device_state.py)
+    await asyncio.to_thread(ingest_queue.shutdown)
+    await asyncio.to_thread(device_state.flush)
+    await asyncio.to_thread(notification_dispatcher.shutdown, config.NOTIFY_DRAIN_ON_EXIT_SEC)
     logger.info("Bye!")
 
 app = FastAPI(
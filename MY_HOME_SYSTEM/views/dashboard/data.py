@@ -0,0 +1,107 @@
+# MY_HOME_SYSTEM/views/dashboard/data.py
+"""
+ダッシュボードのデータ取得層 (Streamlit のキャッシュ)。
+
+各タブ・サマリーはここを経由してデータを読む。取得元ごとに TTL を分け、
+Streamlit の再実行 (ウィジェット操作のたびに発生する) でも TTL 内は DB・外部APIへ問い合わせない。
+- センサーデータ: DASHBOARD_SENSOR_TTL_SEC (30秒)。期限切れ時は services/dashboard_data.SensorFrameCache が
+  前回以降の追加分だけを読み足す。タブ用の列の切り出し (sensor_view) とデバイス別索引 (SensorIndex) も
+  同時に作り、st.cache_resource で全セッションが同じオブジェクトを共有する (呼び出し側で変更しないこと)。
+- 記録・状態 (健康記録・車・防犯ログ・駐輪場・NAS・運行情報): DASHBOARD_RECORDS_TTL_SEC
+- AIレポート・電気代の月次概算: DASHBOARD_REPORT_TTL_SEC
+- 年間気温・アプリランキング: DASHBOARD_SLOW_TTL_SEC (時間単位)
+サイドバーの「データを更新」は clear() で全キャッシュを捨てる。
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import streamlit as st
+
+import config
+from services import analysis_service, train_service
+from services.dashboard_data import SensorFrameCache, SensorIndex
+
+# ダッシュボードで扱うセンサーデータの件数 (load_sensor_data の limit)
+SENSOR_LIMIT = 10000
+
+
+@dataclass(frozen=True)
+class SensorBundle:
+    """センサーデータ一式 (統合済みの全列・タブごとの列・デバイス別索引)"""
+    frame: pd.DataFrame
+    views: Dict[str, pd.DataFrame]
+    index: SensorIndex
+
+
+@st.cache_resource(show_spinner=False)
+def _sensor_cache() -> SensorFrameCache:
+    return SensorFrameCache(limit=SENSOR_LIMIT, full_refresh_sec=config.DASHBOARD_SENSOR_FULL_REFRESH_SEC)
+
+
+@st.cache_resource(ttl=config.DASHBOARD_SENSOR_TTL_SEC, show_spinner=False)
+def sensor_bundle() -> SensorBundle:
+    frame = _sensor_cache().get()
+    views = {view: analysis_service.sensor_view(frame, view) for view in analysis_service.SENSOR_VIEW_COLUMNS}
+    return SensorBundle(frame=frame, views=views, index=SensorIndex(frame))
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def generic_records(table_name: str, limit: int = 500) -> pd.DataFrame:
+    return analysis_service.load_generic_data(table_name, limit=limit)
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def security_logs(limit: int = 100) -> pd.DataFrame:
+    return analysis_service.apply_friendly_names(analysis_service.load_generic_data("security_logs", limit=limit))
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def bicycle_data(limit: int = 3000) -> pd.DataFrame:
+    return analysis_service.load_bicycle_data(limit=limit)
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def nas_status() -> Optional[pd.Series]:
+    return analysis_service.load_nas_status()
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def traffic_status() -> Dict[str, Dict[str, Any]]:
+    return train_service.get_jr_traffic_status()
+
+
+@st.cache_data(ttl=config.DASHBOARD_RECORDS_TTL_SEC, show_spinner=False)
+def route_info(from_station: str, to_station: str) -> Dict[str, Any]:
+    return train_service.get_route_info(from_station, to_station)
+
+
+@st.cache_data(ttl=config.DASHBOARD_REPORT_TTL_SEC, show_spinner=False)
+def ai_report() -> Optional[pd.Series]:
+    return analysis_service.load_ai_report()
+
+
+@st.cache_data(ttl=config.DASHBOARD_REPORT_TTL_SEC, show_spinner=False)
+def monthly_cost() -> int:
+    return analysis_service.calculate_monthly_cost_cumulative()
+
+
+@st.cache_data(ttl=config.DASHBOARD_SLOW_TTL_SEC, show_spinner=False)
+def yearly_temperature(year: int) -> pd.DataFrame:
+    return analysis_service.load_yearly_temperature_stats(year)
+
+
+@st.cache_data(ttl=config.DASHBOARD_SLOW_TTL_SEC, show_spinner=False)
+def ranking_dates(limit: int = 3) -> List[str]:
+    return analysis_service.load_ranking_dates(limit=limit)
+
+
+@st.cache_data(ttl=config.DASHBOARD_SLOW_TTL_SEC, show_spinner=False)
+def ranking_data(date_str: str, ranking_type: str) -> pd.DataFrame:
+    return analysis_service.load_ranking_data(date_str, ranking_type)
+
+
+def clear() -> None:
+    """全キャッシュを捨てる (センサーデータも次回は全件読み直す)"""
+    st.cache_data.clear()
+    st.cache_resource.clear()
@@ -6,6 +6,7 @@ import os
 import glob
 from datetime import datetime, date
 from services import analysis_service
+from . import data
 
 def render_logs(df_sensor: pd.DataFrame):
     """ログ分析タブ"""
@@ -22,7 +23,7 @@ def render_logs(df_sensor: pd.DataFrame):
 def render_trends():
     """トレンドタブ"""
     st.title("🌟 最近の流行・トレンド推移")
-    dates = analysis_service.load_ranking_dates(limit=3)
+    dates = data.ranking_dates(limit=3)
     if not dates:
         st.info("データがありません。")
         return
@@ -34,7 +35,7 @@ def render_trends():
             with cols[i]:
                 label = "今週" if i == 0 else ("先週" if i == 1 else "先々週")
                 st.markdown(f"**{label} ({date_str[5:]})**")
-                df = analysis_service.load_ranking_data(date_str, ranking_type)
+                df = data.ranking_data(date_str, ranking_type)
                 if df.empty:
                     st.write("- データなし -")
                     continue
@@ -77,7 +78,7 @@ def render_system():
     
     st.markdown("---")
     st.subheader("🗄️ NAS 状態")
-    nas_data = analysis_service.load_nas_status()
+    nas_data = data.nas_status()
     if nas_data is not None:
         c1, c2, c3 = st.columns(3)
         with c1: st.metric("Ping疎通", f"{'✅' if nas_data['status_ping']=='OK' else '❌'} {nas_data['status_ping']}")
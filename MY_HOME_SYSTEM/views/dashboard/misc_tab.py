@@ -8,12 +8,12 @@ from datetime import datetime, timedelta
 import pytz
 
 import config
-from services import train_service
+from . import data
 from .common import render_status_card_html
 
 def render_traffic():
     st.subheader("🚃 JR宝塚線・神戸線 運行状況")
-    jr_status = train_service.get_jr_traffic_status()
+    jr_status = data.traffic_status()
     line_g = jr_status["宝塚線"]
     line_a = jr_status["神戸線"]
 
@@ -53,12 +53,12 @@ def render_traffic():
 def _render_route_search(col, from_st: str, to_st: str, label_icon: str):
     with col:
         st.markdown(f"##### {label_icon} {from_st} → {to_st}")
-        data = train_service.get_route_info(from_st, to_st)
-        if data["summary"] == "取得成功":
+        route = data.route_info(from_st, to_st)
+        if route["summary"] == "取得成功":
             details_html = ""
-            if data.get("details"):
+            if route.get("details"):
                 steps = []
-                for d in data["details"]:
+                for d in route["details"]:
                     if "⬇️" in d: steps.append(f"<div class='line-node'>{d}</div>")
                     elif "🔄" in d: steps.append(f"<div class='transfer-mark'>{d}</div>")
                     else: steps.append(f"<div class='station-node'>{d}</div>")
@@ -67,22 +67,22 @@ def _render_route_search(col, from_st: str, to_st: str, label_icon: str):
             st.markdown(f"""
             <div class="route-card">
                 <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:10px;">
-                    <span style="font-size:1.3rem; font-weight:bold; color:#0d47a1;">{data['departure']}</span>
+                    <span style="font-size:1.3rem; font-weight:bold; color:#0d47a1;">{route['departure']}</span>
                     <span style="color:#777;">➡</span>
-                    <span style="font-size:1.3rem; font-weight:bold; color:#0d47a1;">{data['arrival']}</span>
+                    <span style="font-size:1.3rem; font-weight:bold; color:#0d47a1;">{route['arrival']}</span>
                 </div>
                 <div style="display:flex; justify-content:space-between; color:#555; margin-bottom:5px;">
-                    <span>⏱️ <b>{data['duration']}</b></span>
-                    <span>💰 {data['cost']}</span>
+                    <span>⏱️ <b>{route['duration']}</b></span>
+                    <span>💰 {route['cost']}</span>
                 </div>
                 <div style="font-size:0.9rem; color:#666;">
-                    <span>🔄 乗換: {data['transfer']}</span>
+                    <span>🔄 乗換: {route['transfer']}</span>
                 </div>
                 {details_html}
             </div>
             """, unsafe_allow_html=True)
-            if data["url"]:
-                st.link_button(f"🔗 Yahoo!路線情報で見る", data["url"])
+            if route["url"]:
+                st.link_button(f"🔗 Yahoo!路線情報で見る", route["url"])
         else:
             st.warning("ルート情報を取得できませんでした")
 
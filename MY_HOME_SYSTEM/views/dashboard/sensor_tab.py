@@ -4,9 +4,30 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from services import analysis_service
+from typing import Callable, Optional
+from services.dashboard_data import SensorIndex
+from . import data
 
-def render_electricity(df_sensor: pd.DataFrame, now: datetime):
+def _is_power_meter(device_type: pd.Series) -> pd.Series:
+    return device_type == "Nature Remo E Lite"
+
+def _is_plug(device_type: pd.Series) -> pd.Series:
+    return device_type.str.contains("Plug", na=False)
+
+def _is_meter(device_type: pd.Series) -> pd.Series:
+    return device_type.str.contains("Meter", na=False)
+
+def _window(df_sensor: pd.DataFrame, index: Optional[SensorIndex], start, end,
+            device_type: Callable[[pd.Series], pd.Series]) -> pd.DataFrame:
+    """[start, end) かつ device_type の条件に合う行。索引があればデバイス別の二分探索で切り出す"""
+    if index is not None:
+        return index.window(start, end, device_type)
+    return df_sensor[
+        device_type(df_sensor["device_type"]) &
+        (df_sensor["timestamp"] >= start) & (df_sensor["timestamp"] < end)
+    ]
+
+def render_electricity(df_sensor: pd.DataFrame, now: datetime, index: Optional[SensorIndex] = None):
     """電気・家電タブ"""
     if df_sensor.empty:
         st.info("データがありません")
@@ -19,14 +40,8 @@ def render_electricity(df_sensor: pd.DataFrame, now: datetime):
 
     with col_left:
         st.subheader("⚡ 消費電力 (今日 vs 昨日)")
-        df_today = df_sensor[
-            (df_sensor["device_type"] == "Nature Remo E Lite") &
-            (df_sensor["timestamp"] >= today_start) & (df_sensor["timestamp"] < today_end)
-        ].copy()
-        df_yesterday = df_sensor[
-            (df_sensor["device_type"] == "Nature Remo E Lite") &
-            (df_sensor["timestamp"] >= yesterday_start) & (df_sensor["timestamp"] < today_start)
-        ].copy()
+        df_today = _window(df_sensor, index, today_start, today_end, _is_power_meter).copy()
+        df_yesterday = _window(df_sensor, index, yesterday_start, today_start, _is_power_meter).copy()
 
         if not df_today.empty or not df_yesterday.empty:
             fig = go.Figure()
@@ -42,10 +57,7 @@ def render_electricity(df_sensor: pd.DataFrame, now: datetime):
 
     with col_right:
         st.subheader("🔌 個別家電 (今日)")
-        df_app = df_sensor[
-            (df_sensor["device_type"].str.contains("Plug", na=False)) &
-            (df_sensor["timestamp"] >= today_start) & (df_sensor["timestamp"] < today_end)
-        ]
+        df_app = _window(df_sensor, index, today_start, today_end, _is_plug)
         if not df_app.empty:
             fig_app = px.line(df_app, x="timestamp", y="power_watts", color="friendly_name", title="プラグ計測値")
             fig_app.update_xaxes(range=[today_start, today_end])
@@ -53,7 +65,7 @@ def render_electricity(df_sensor: pd.DataFrame, now: datetime):
         else:
             st.info("プラグデータなし")
 
-def render_temperature(df_sensor: pd.DataFrame, now: datetime):
+def render_temperature(df_sensor: pd.DataFrame, now: datetime, index: Optional[SensorIndex] = None):
     """気温詳細タブ"""
     if df_sensor.empty or "device_type" not in df_sensor.columns:
         st.info("データがありません")
@@ -62,10 +74,7 @@ def render_temperature(df_sensor: pd.DataFrame, now: datetime):
     st.subheader("🌡️ 室温・湿度 (今日の推移)")
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = today_start + timedelta(days=1)
-    df_temp = df_sensor[
-        (df_sensor["device_type"].str.contains("Meter", na=False)) &
-        (df_sensor["timestamp"] >= today_start) & (df_sensor["timestamp"] < today_end)
-    ]
+    df_temp = _window(df_sensor, index, today_start, today_end, _is_meter)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -86,7 +95,7 @@ def render_temperature(df_sensor: pd.DataFrame, now: datetime):
 
     st.markdown("---")
     st.subheader(f"📅 年間気温・室温推移 ({now.year}年)")
-    df_yearly = analysis_service.load_yearly_temperature_stats(now.year)
+    df_yearly = data.yearly_temperature(now.year)
 
     if not df_yearly.empty:
         fig = go.Figure()
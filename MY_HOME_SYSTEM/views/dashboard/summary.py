@@ -4,8 +4,8 @@ import streamlit as st
 from datetime import datetime, timedelta
 from typing import Tuple, Optional, Dict
 
-from services import train_service
 from services import analysis_service
+from . import data
 from .common import render_status_card_html
 
 # === Status Helpers ===
@@ -84,7 +84,7 @@ def get_itami_status(df_sensor: pd.DataFrame, now: datetime) -> Tuple[str, str]:
     return val, theme
 
 def get_traffic_status() -> Tuple[str, str]:
-    jr_status = train_service.get_jr_traffic_status()
+    jr_status = data.traffic_status()
     line_g = jr_status["宝塚線"]
     line_a = jr_status["神戸線"]
     if line_g.get("is_suspended") or line_a.get("is_suspended"):
@@ -213,7 +213,7 @@ def render_summary(
     car_val, car_theme = get_car_status(df_car)
     
     rice_val, rice_theme = get_rice_status(df_sensor, now)
-    cost = analysis_service.calculate_monthly_cost_cumulative()
+    cost = data.monthly_cost()
     elec_val = f"⚡ {cost:,} 円"
     bicycle_val, bicycle_theme = get_bicycle_status(df_bicycle)
     
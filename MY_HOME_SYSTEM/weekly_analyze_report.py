@@ -254,11 +254,11 @@ def run_report() -> None:
     full_msg = msg_header + msg_body + msg_footer
     
     # LINE通知実行 (設計書 4.4: LINE Bot連携) [cite: 72]
-    # common.send_push は設計書外の共通関数と想定されるが、ロガー運用に従い結果を記録
+    # common.send_push は送信箱へ積むだけ (送信は終了時の送り切りで行い、失敗は配送ワーカーがエラーチャンネルへ知らせる)
     if common.send_push(config.LINE_USER_ID, [{"type": "text", "text": full_msg}], target="discord"):
-        logger.info("✅ レポート送信完了")
+        logger.info("✅ レポートを送信キューに追加しました")
     else:
-        logger.error("❌ レポート送信失敗")
+        logger.error("❌ レポートを送信キューに追加できませんでした")
 
 if __name__ == "__main__":
     run_report()
\ No newline at end of file